@@ -18,8 +18,15 @@ Objectif:
     Le worker LLM ne doit JAMAIS acceder directement a Neon.
     Pattern identique a hr_rpc_handlers.py.
 
+Soldes (get_account_balance, compare_periods, get_trial_balance groupe):
+    Les mois complets sont lus dans accounting.period_balances, seules les
+    bornes partielles dans gl_entries (cf. tools/accounting_balance_planner).
+    Lecture brute integrale si les soldes sont en retard sur la
+    dataset_version GL. Resultats caches par (societe, requete, versions).
+
 Endpoints disponibles:
     - ACCOUNTING.resolve_company_id   -> mandate_path -> company_id UUID
+    - ACCOUNTING.resolve_company_ids  -> Resolution batch mandate_paths -> company_id
     - ACCOUNTING.search_gl_entries    -> Recherche GL (stored proc)
     - ACCOUNTING.get_account_balance  -> Soldes par compte/nature/function/month
     - ACCOUNTING.get_trial_balance    -> Balance de verification
@@ -41,6 +48,13 @@ from decimal import Decimal
 from typing import Any, Dict, List, Optional
 from uuid import UUID
 
+from .tools.accounting_balance_planner import (
+    balances_fresh,
+    build_source_sql,
+    get_balance_query_cache,
+    plan_period,
+    versions_key,
+)
 from .tools.neon_accounting_manager import get_neon_accounting_manager
 
 logger = logging.getLogger("accounting.rpc_handlers")
@@ -85,6 +99,25 @@ class AccountingRPCHandlers:
 
     NAMESPACE = "ACCOUNTING"
 
+    async def _cached_balance_query(self, manager, company_id, query_key: tuple, run) -> Dict[str, Any]:
+        """
+        Execute run(use_balances) ou renvoie le resultat cache.
+
+        La cle inclut les versions GL / COA / period_balances: tout changement
+        de donnees produit une nouvelle cle (pas d'invalidation explicite).
+        """
+        versions = await manager.get_dataset_versions(company_id)
+        key = (str(company_id), query_key, versions_key(versions))
+        cache = get_balance_query_cache()
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+        result = await run(balances_fresh(versions))
+        if result.get("success"):
+            cache.put(key, result)
+        return result
+
     # ------------------------------------------------------------------
     # resolve_company_id
     # ------------------------------------------------------------------
@@ -100,6 +133,26 @@ class AccountingRPCHandlers:
             return {"success": False, "error": f"Company not found for mandate_path: {mandate_path}"}
         return {"success": True, "company_id": str(company_id)}
 
+    # ------------------------------------------------------------------
+    # resolve_company_ids
+    # ------------------------------------------------------------------
+    async def resolve_company_ids(
+        self,
+        mandate_paths: List[str],
+        **kwargs,
+    ) -> Dict[str, Any]:
+        """Resout plusieurs mandate_path en une passe (caches puis une seule requete)."""
+        try:
+            manager = get_neon_accounting_manager()
+            mapping = await manager.get_company_ids_from_mandate_paths(mandate_paths or [])
+            return {
+                "success": True,
+                "company_ids": {path: str(cid) if cid else None for path, cid in mapping.items()},
+            }
+        except Exception as e:
+            logger.error("resolve_company_ids error: %s", e)
+            return {"success": False, "error": str(e)}
+
     # ------------------------------------------------------------------
     # search_gl_entries
     # ------------------------------------------------------------------
@@ -178,56 +231,44 @@ class AccountingRPCHandlers:
             as_of_date = date.fromisoformat(as_of) if as_of else date.today()
             pool = await manager.get_pool()
 
-            if group_by == "nature":
-                group_col = "coa.account_nature"
-            elif group_by == "function":
-                group_col = "coa.account_function"
+            label_col = ""
+            if group_by in ("nature", "function"):
+                group_col = f"coa.account_{group_by}"
             elif group_by == "month":
-                group_col = "TO_CHAR(gl.entry_date, 'YYYY-MM')"
+                group_col = "src.period"
             else:
-                group_col = None  # account-level
-
-            async with pool.acquire() as conn:
-                if group_col and group_by != "account":
-                    need_coa_join = group_by in ("nature", "function")
-                    coa_join = (
-                        "LEFT JOIN core.chart_of_accounts coa "
-                        "ON coa.company_id = gl.company_id AND coa.account_number = gl.account_number"
-                    ) if need_coa_join else ""
+                group_col = "src.account_number"  # account-level
+                label_col = "COALESCE(MAX(coa.account_name), MAX(src.account_name)) AS label,"
 
+            async def _run(use_balances: bool) -> Dict[str, Any]:
+                params: list = [company_id]
+                source = build_source_sql(
+                    plan_period(None, as_of_date, use_balances), params, account_prefix=account_number,
+                )
+                async with pool.acquire() as conn:
                     rows = await conn.fetch(f"""
-                        SELECT {group_col} AS group_key,
-                               SUM(gl.debit) AS total_debit, SUM(gl.credit) AS total_credit,
-                               SUM(gl.debit) - SUM(gl.credit) AS balance, COUNT(*) AS entry_count
-                        FROM accounting.gl_entries gl
-                        {coa_join}
-                        WHERE gl.company_id = $1 AND gl.account_number LIKE $2 || '%'
-                          AND gl.entry_date <= $3 AND NOT gl.is_deleted AND gl.entry_state = 'posted'
+                        SELECT {group_col} AS group_key, {label_col}
+                               SUM(src.debit) AS total_debit, SUM(src.credit) AS total_credit,
+                               SUM(src.debit) - SUM(src.credit) AS balance,
+                               SUM(src.entry_count)::BIGINT AS entry_count
+                        FROM ({source}) src
+                        LEFT JOIN core.chart_of_accounts coa
+                            ON coa.company_id = $1 AND coa.account_number = src.account_number
                         GROUP BY {group_col}
                         ORDER BY {group_col}
-                    """, company_id, account_number, as_of_date)
-                else:
-                    rows = await conn.fetch("""
-                        SELECT gl.account_number AS group_key,
-                               COALESCE(coa.account_name, gl.account_name) AS label,
-                               SUM(gl.debit) AS total_debit, SUM(gl.credit) AS total_credit,
-                               SUM(gl.debit) - SUM(gl.credit) AS balance, COUNT(*) AS entry_count
-                        FROM accounting.gl_entries gl
-                        LEFT JOIN core.chart_of_accounts coa
-                            ON coa.company_id = gl.company_id AND coa.account_number = gl.account_number
-                        WHERE gl.company_id = $1 AND gl.account_number LIKE $2 || '%'
-                          AND gl.entry_date <= $3 AND NOT gl.is_deleted AND gl.entry_state = 'posted'
-                        GROUP BY gl.account_number, coa.account_name, gl.account_name
-                        ORDER BY gl.account_number
-                    """, company_id, account_number, as_of_date)
+                    """, *params)
 
-            return {
-                "success": True,
-                "account_number_prefix": account_number,
-                "as_of": as_of_date.isoformat(),
-                "group_by": group_by,
-                "balances": _serialize(rows),
-            }
+                return {
+                    "success": True,
+                    "account_number_prefix": account_number,
+                    "as_of": as_of_date.isoformat(),
+                    "group_by": group_by,
+                    "balances": _serialize(rows),
+                }
+
+            return await self._cached_balance_query(
+                manager, company_id, ("account_balance", account_number, as_of_date, group_by), _run,
+            )
         except Exception as e:
             logger.error("get_account_balance error: %s", e)
             return {"success": False, "error": str(e)}
@@ -255,46 +296,68 @@ class AccountingRPCHandlers:
             d_to = date.fromisoformat(date_to)
             pool = await manager.get_pool()
 
-            async with pool.acquire() as conn:
-                if group_by == "account":
-                    rows = await conn.fetch(
-                        "SELECT * FROM accounting.get_trial_balance($1, $2, $3, $4)",
-                        company_id, d_from, d_to, journal_code,
-                    )
-                else:
-                    col_map = {
-                        "nature": "account_nature",
-                        "function": "account_function",
-                        "class": "account_class",
-                    }
-                    col = col_map.get(group_by, "account_nature")
-                    rows = await conn.fetch(f"""
-                        SELECT {col} AS group_key,
-                               SUM(total_debit)::NUMERIC(15,2) AS total_debit,
-                               SUM(total_credit)::NUMERIC(15,2) AS total_credit,
-                               SUM(balance)::NUMERIC(15,2) AS balance,
-                               SUM(entry_count) AS entry_count
-                        FROM accounting.get_trial_balance($1, $2, $3, $4)
-                        GROUP BY {col}
-                        ORDER BY {col}
-                    """, company_id, d_from, d_to, journal_code)
-
-            rows_serialized = _serialize(rows)
-            total_debit = sum(float(r.get("total_debit", 0) or 0) for r in rows_serialized)
-            total_credit = sum(float(r.get("total_credit", 0) or 0) for r in rows_serialized)
+            async def _run(use_balances: bool) -> Dict[str, Any]:
+                async with pool.acquire() as conn:
+                    if group_by == "account":
+                        rows = await conn.fetch(
+                            "SELECT * FROM accounting.get_trial_balance($1, $2, $3, $4)",
+                            company_id, d_from, d_to, journal_code,
+                        )
+                    else:
+                        col_map = {
+                            "nature": "account_nature",
+                            "function": "account_function",
+                            "class": "account_class",
+                        }
+                        col = col_map.get(group_by, "account_nature")
+                        if journal_code:
+                            # period_balances n'est pas ventile par journal
+                            rows = await conn.fetch(f"""
+                                SELECT {col} AS group_key,
+                                       SUM(total_debit)::NUMERIC(15,2) AS total_debit,
+                                       SUM(total_credit)::NUMERIC(15,2) AS total_credit,
+                                       SUM(balance)::NUMERIC(15,2) AS balance,
+                                       SUM(entry_count) AS entry_count
+                                FROM accounting.get_trial_balance($1, $2, $3, $4)
+                                GROUP BY {col}
+                                ORDER BY {col}
+                            """, company_id, d_from, d_to, journal_code)
+                        else:
+                            params: list = [company_id]
+                            source = build_source_sql(plan_period(d_from, d_to, use_balances), params)
+                            rows = await conn.fetch(f"""
+                                SELECT coa.{col} AS group_key,
+                                       SUM(src.debit)::NUMERIC(15,2) AS total_debit,
+                                       SUM(src.credit)::NUMERIC(15,2) AS total_credit,
+                                       (SUM(src.debit) - SUM(src.credit))::NUMERIC(15,2) AS balance,
+                                       SUM(src.entry_count)::BIGINT AS entry_count
+                                FROM ({source}) src
+                                LEFT JOIN core.chart_of_accounts coa
+                                    ON coa.company_id = $1 AND coa.account_number = src.account_number
+                                GROUP BY coa.{col}
+                                ORDER BY coa.{col}
+                            """, *params)
+
+                rows_serialized = _serialize(rows)
+                total_debit = sum(float(r.get("total_debit", 0) or 0) for r in rows_serialized)
+                total_credit = sum(float(r.get("total_credit", 0) or 0) for r in rows_serialized)
 
-            return {
-                "success": True,
-                "period": f"{date_from} - {date_to}",
-                "group_by": group_by,
-                "rows": rows_serialized,
-                "totals": {
-                    "total_debit": round(total_debit, 2),
-                    "total_credit": round(total_credit, 2),
-                    "difference": round(total_debit - total_credit, 2),
-                },
-                "is_balanced": abs(total_debit - total_credit) < 0.01,
-            }
+                return {
+                    "success": True,
+                    "period": f"{date_from} - {date_to}",
+                    "group_by": group_by,
+                    "rows": rows_serialized,
+                    "totals": {
+                        "total_debit": round(total_debit, 2),
+                        "total_credit": round(total_credit, 2),
+                        "difference": round(total_debit - total_credit, 2),
+                    },
+                    "is_balanced": abs(total_debit - total_credit) < 0.01,
+                }
+
+            return await self._cached_balance_query(
+                manager, company_id, ("trial_balance", d_from, d_to, journal_code, group_by), _run,
+            )
         except Exception as e:
             logger.error("get_trial_balance error: %s", e)
             return {"success": False, "error": str(e)}
@@ -374,70 +437,71 @@ class AccountingRPCHandlers:
 
             pool = await manager.get_pool()
 
+            account_prefix = None
             if metric == "revenue":
-                where_clause = "AND coa.account_function IN ('income', 'income_other')"
-                extra_params = []
+                where_clause = "WHERE coa.account_function IN ('income', 'income_other')"
             elif metric == "expenses":
-                where_clause = "AND coa.account_nature = 'PROFIT_AND_LOSS' AND coa.account_function NOT IN ('income', 'income_other')"
-                extra_params = []
+                where_clause = "WHERE coa.account_nature = 'PROFIT_AND_LOSS' AND coa.account_function NOT IN ('income', 'income_other')"
             elif metric == "net_income":
-                where_clause = "AND coa.account_nature = 'PROFIT_AND_LOSS'"
-                extra_params = []
+                where_clause = "WHERE coa.account_nature = 'PROFIT_AND_LOSS'"
             else:
-                if account_number:
-                    where_clause = "AND gl.account_number LIKE $4 || '%'"
-                    extra_params = [account_number]
-                else:
-                    where_clause = ""
-                    extra_params = []
+                where_clause = ""
+                account_prefix = account_number or None
 
-            async def _get_period_total(conn, from_str: str, to_str: str) -> Dict:
+            async def _get_period_total(conn, from_str: str, to_str: str, use_balances: bool) -> Dict:
+                params: list = [company_id]
+                plan = plan_period(date.fromisoformat(from_str), date.fromisoformat(to_str), use_balances)
+                source = build_source_sql(plan, params, account_prefix=account_prefix)
                 rows = await conn.fetch(f"""
-                    SELECT SUM(gl.debit)::NUMERIC(15,2) AS total_debit,
-                           SUM(gl.credit)::NUMERIC(15,2) AS total_credit,
-                           (SUM(gl.debit) - SUM(gl.credit))::NUMERIC(15,2) AS balance,
-                           COUNT(*) AS entry_count
-                    FROM accounting.gl_entries gl
+                    SELECT SUM(src.debit)::NUMERIC(15,2) AS total_debit,
+                           SUM(src.credit)::NUMERIC(15,2) AS total_credit,
+                           (SUM(src.debit) - SUM(src.credit))::NUMERIC(15,2) AS balance,
+                           COALESCE(SUM(src.entry_count), 0)::BIGINT AS entry_count
+                    FROM ({source}) src
                     LEFT JOIN core.chart_of_accounts coa
-                        ON coa.company_id = gl.company_id AND coa.account_number = gl.account_number
-                    WHERE gl.company_id = $1
-                      AND gl.entry_date BETWEEN $2 AND $3
-                      AND NOT gl.is_deleted AND gl.entry_state = 'posted'
-                      {where_clause}
-                """, company_id, date.fromisoformat(from_str), date.fromisoformat(to_str), *extra_params)
+                        ON coa.company_id = $1 AND coa.account_number = src.account_number
+                    {where_clause}
+                """, *params)
                 r = rows[0] if rows else {}
                 return _serialize(r) if r else {"total_debit": 0, "total_credit": 0, "balance": 0, "entry_count": 0}
 
-            async with pool.acquire() as conn:
-                p1 = await _get_period_total(conn, period1_from, period1_to)
-                p2 = await _get_period_total(conn, period2_from, period2_to)
+            async def _run(use_balances: bool) -> Dict[str, Any]:
+                async with pool.acquire() as conn:
+                    p1 = await _get_period_total(conn, period1_from, period1_to, use_balances)
+                    p2 = await _get_period_total(conn, period2_from, period2_to, use_balances)
 
-            p1_val = float(p1.get("balance") or 0)
-            p2_val = float(p2.get("balance") or 0)
-            p1_count = int(p1.get("entry_count") or 0)
-            p2_count = int(p2.get("entry_count") or 0)
-            variation = p1_val - p2_val
-            pct = (variation / abs(p2_val) * 100) if p2_val != 0 else None
+                p1_val = float(p1.get("balance") or 0)
+                p2_val = float(p2.get("balance") or 0)
+                p1_count = int(p1.get("entry_count") or 0)
+                p2_count = int(p2.get("entry_count") or 0)
+                variation = p1_val - p2_val
+                pct = (variation / abs(p2_val) * 100) if p2_val != 0 else None
 
-            result = {
-                "success": True,
-                "metric": metric,
-                "period_1": {"from": period1_from, "to": period1_to, **p1},
-                "period_2": {"from": period2_from, "to": period2_to, **p2},
-                "variation": {
-                    "absolute": round(variation, 2),
-                    "percentage": round(pct, 2) if pct is not None else None,
-                    "direction": "up" if variation > 0 else ("down" if variation < 0 else "stable"),
-                },
-            }
+                result = {
+                    "success": True,
+                    "metric": metric,
+                    "period_1": {"from": period1_from, "to": period1_to, **p1},
+                    "period_2": {"from": period2_from, "to": period2_to, **p2},
+                    "variation": {
+                        "absolute": round(variation, 2),
+                        "percentage": round(pct, 2) if pct is not None else None,
+                        "direction": "up" if variation > 0 else ("down" if variation < 0 else "stable"),
+                    },
+                }
 
-            if metric in ("revenue", "expenses", "net_income") and p1_count == 0 and p2_count == 0:
-                result["warning"] = (
-                    f"Aucune ecriture trouvee pour metric='{metric}' sur les deux periodes. "
-                    "Cause probable: le plan comptable (COA) n'est pas synchronise."
-                )
+                if metric in ("revenue", "expenses", "net_income") and p1_count == 0 and p2_count == 0:
+                    result["warning"] = (
+                        f"Aucune ecriture trouvee pour metric='{metric}' sur les deux periodes. "
+                        "Cause probable: le plan comptable (COA) n'est pas synchronise."
+                    )
 
-            return result
+                return result
+
+            return await self._cached_balance_query(
+                manager, company_id,
+                ("compare_periods", period1_from, period1_to, period2_from, period2_to, metric, account_prefix),
+                _run,
+            )
         except Exception as e:
             logger.error("compare_periods error: %s", e)
             return {"success": False, "error": str(e)}
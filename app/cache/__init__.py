@@ -7,9 +7,23 @@ from .unified_cache_manager import (
     get_firebase_cache_manager,
     get_drive_cache_manager,
 )
+from .list_query import (
+    ListQuery,
+    ListQueryEngine,
+    get_list_query_engine,
+)
+from .reference_data import (
+    ReferenceDataStore,
+    get_reference_data_store,
+)
 
 __all__ = [
     "UnifiedCacheManager",
     "get_firebase_cache_manager",
     "get_drive_cache_manager",
+    "ListQuery",
+    "ListQueryEngine",
+    "get_list_query_engine",
+    "ReferenceDataStore",
+    "get_reference_data_store",
 ]
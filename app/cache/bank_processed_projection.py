@@ -0,0 +1,229 @@
+"""
+Bank Processed Projection - Transactions bancaires traitées, maintenues dans Redis.
+
+PRINCIPE:
+    L'onglet "processed" de Banking lisait à chaque requête tout le
+    task_manager Bankbookeeper de la société (stream Firestore + filtre
+    Python). La projection garde ces entrées dans le cache business:
+
+        business:shared:{cid}:bank:processed        HASH job_id → entrée JSON
+        business:shared:{cid}:bank:processed:meta   HASH version, built_at
+
+    (tier partagé société: une seule projection pour toute l'équipe)
+
+    - Construction: une seule lecture Firestore quand la projection est absente
+      (premier accès, expiration, refresh explicite)
+    - Maintenance: RedisSubscriber applique les événements task_manager
+      (status traité → upsert, sortie du statut traité → suppression)
+    - Lecture: la version (meta) sert de version du cache pour le moteur
+      list_query; le HASH n'est relu que si l'index de cette version manque
+
+USAGE:
+    from app.cache.bank_processed_projection import get_bank_processed_projection
+
+    projection = get_bank_processed_projection()
+    version = projection.get_version(uid, company_id)   # None = à construire
+    entries = projection.get_entries(uid, company_id, account_id="12")
+"""
+
+import json
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.llm_service.redis_namespaces import build_business_key
+
+logger = logging.getLogger("cache.bank_processed_projection")
+
+# Statuts task_manager (bruts) considérés comme traités
+PROCESSED_STATUSES = ("matched", "completed", "success", "close")
+
+
+def is_processed_status(status: Optional[str]) -> bool:
+    return (status or "").lower() in PROCESSED_STATUSES
+
+
+def build_processed_entry(entry_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Entrée au format UI Banking (onglet processed).
+
+    Accepte un document task_manager comme un item du cache bank (format ERP:
+    name / ref / journal_id / currency_id).
+    """
+    return {
+        "id": entry_id,
+        "transaction_id": str(data.get("transaction_id") or data.get("id") or ""),
+        "job_id": data.get("job_id", "") or entry_id,
+        "account_id": str(data.get("account_id") or data.get("journal_id") or ""),
+        "account_name": data.get("account_name") or data.get("journal_name") or "",
+        "date": data.get("date", ""),
+        "description": data.get("description") or data.get("name") or "",
+        "reference": data.get("reference") or data.get("ref") or "",
+        "partner_name": data.get("partner_name", "") or "",
+        "amount": float(data.get("amount", 0) or 0),
+        "currency": data.get("currency") or data.get("currency_id") or "CHF",
+        "status": "processed",
+        "matched_invoice": data.get("matched_invoice", "") or "",
+        "timestamp": str(data.get("timestamp", "")),
+    }
+
+
+class BankProcessedProjection:
+    """Projection Redis des transactions bancaires traitées (par user / société)."""
+
+    TTL = 6 * 3600  # Reconstruction périodique (événements manqués)
+
+    def __init__(self, redis_client=None):
+        self._redis = redis_client
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            from app.redis_client import get_redis
+            self._redis = get_redis()
+        return self._redis
+
+    @staticmethod
+    def _entries_key(uid: str, company_id: str) -> str:
+        return build_business_key(uid, company_id, "bank", item_key="processed")
+
+    @classmethod
+    def _meta_key(cls, uid: str, company_id: str) -> str:
+        return f"{cls._entries_key(uid, company_id)}:meta"
+
+    # ═══════════════════════════════════════════════════════════════
+    # LECTURE
+    # ═══════════════════════════════════════════════════════════════
+
+    def get_version(self, uid: str, company_id: str) -> Optional[str]:
+        """Version courante de la projection, None si elle n'est pas construite."""
+        meta = self.redis.hmget(self._meta_key(uid, company_id), "built_at", "version")
+        if not meta or not meta[0]:
+            return None
+        return f"{meta[0]}#{meta[1] or 0}"
+
+    def get_entries(self, uid: str, company_id: str, account_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Entrées traitées (filtrées par compte), plus récentes d'abord."""
+        raw = self.redis.hvals(self._entries_key(uid, company_id))
+        entries = []
+        for value in raw:
+            try:
+                entry = json.loads(value)
+            except (TypeError, ValueError):
+                continue
+            if account_id and entry.get("account_id") != account_id:
+                continue
+            entries.append(entry)
+        entries.sort(key=lambda e: (e.get("date") or "", e.get("timestamp") or ""), reverse=True)
+        return entries
+
+    # ═══════════════════════════════════════════════════════════════
+    # ÉCRITURE
+    # ═══════════════════════════════════════════════════════════════
+
+    def rebuild(self, uid: str, company_id: str, documents: Iterable[Dict[str, Any]]) -> int:
+        """
+        Remplace la projection depuis les documents task_manager
+        ({"firebase_doc_id", "data"}, cf. fetch_journal_entries_by_mandat_id_without_source).
+        """
+        entries = {}
+        for doc in documents or []:
+            doc_data = doc.get("data", {}) if isinstance(doc, dict) else {}
+            if not is_processed_status(doc_data.get("status")):
+                continue
+            doc_id = doc.get("firebase_doc_id", "")
+            entries[doc_id] = json.dumps(build_processed_entry(doc_id, doc_data))
+
+        entries_key = self._entries_key(uid, company_id)
+        meta_key = self._meta_key(uid, company_id)
+        pipe = self.redis.pipeline()
+        pipe.delete(entries_key)
+        if entries:
+            pipe.hset(entries_key, mapping=entries)
+            pipe.expire(entries_key, self.TTL)
+        pipe.hset(meta_key, "built_at", datetime.now(timezone.utc).isoformat())
+        pipe.hincrby(meta_key, "version", 1)
+        pipe.expire(meta_key, self.TTL)
+        pipe.execute()
+
+        logger.info(f"[BANK_PROCESSED] Projection built: uid={uid} company={company_id} entries={len(entries)}")
+        return len(entries)
+
+    def apply_event(
+        self,
+        uid: str,
+        company_id: str,
+        job_id: str,
+        item_data: Dict[str, Any],
+        status: Optional[str] = None,
+    ) -> Optional[str]:
+        """
+        Applique un événement task_manager Bankbookeeper.
+
+        - status traité → upsert (merge avec l'entrée existante)
+        - status hors traité → suppression si l'entrée existait
+        - pas de status → mise à jour des champs si l'entrée existe
+
+        Sans projection construite, l'événement est ignoré (la prochaine
+        construction lit l'état à jour). Retourne "upsert", "remove" ou None.
+        """
+        if not job_id or self.get_version(uid, company_id) is None:
+            return None
+
+        entries_key = self._entries_key(uid, company_id)
+        status = (status or item_data.get("status") or "").lower()
+        existing_raw = self.redis.hget(entries_key, job_id)
+
+        if status and not is_processed_status(status):
+            if existing_raw is None:
+                return None
+            self._write(uid, company_id, remove=[job_id])
+            return "remove"
+
+        if not status and existing_raw is None:
+            return None
+
+        # Delta partiel: ne pas écraser les champs connus par des valeurs vides
+        existing = json.loads(existing_raw) if existing_raw else {}
+        delta = {k: v for k, v in item_data.items() if v not in ("", None)}
+        merged = build_processed_entry(job_id, {**existing, **delta})
+        self._write(uid, company_id, upsert={job_id: merged})
+        return "upsert"
+
+    def remove(self, uid: str, company_id: str, job_ids: List[str]) -> None:
+        """Retire des entrées (suppression explicite côté Banking)."""
+        if job_ids and self.get_version(uid, company_id) is not None:
+            self._write(uid, company_id, remove=job_ids)
+
+    def invalidate(self, uid: str, company_id: str) -> None:
+        self.redis.delete(self._entries_key(uid, company_id), self._meta_key(uid, company_id))
+
+    def _write(
+        self,
+        uid: str,
+        company_id: str,
+        upsert: Optional[Dict[str, Dict[str, Any]]] = None,
+        remove: Optional[List[str]] = None,
+    ) -> None:
+        entries_key = self._entries_key(uid, company_id)
+        meta_key = self._meta_key(uid, company_id)
+        pipe = self.redis.pipeline()
+        if remove:
+            pipe.hdel(entries_key, *remove)
+        if upsert:
+            pipe.hset(entries_key, mapping={k: json.dumps(v) for k, v in upsert.items()})
+        pipe.hincrby(meta_key, "version", 1)
+        pipe.expire(entries_key, self.TTL)
+        pipe.expire(meta_key, self.TTL)
+        pipe.execute()
+
+
+_projection: Optional[BankProcessedProjection] = None
+
+
+def get_bank_processed_projection() -> BankProcessedProjection:
+    """Singleton de la projection des transactions traitées."""
+    global _projection
+    if _projection is None:
+        _projection = BankProcessedProjection()
+    return _projection
@@ -0,0 +1,293 @@
+"""
+List Query - Recherche, tri et pagination côté serveur sur le cache business.
+
+PRINCIPE:
+    Les pages document (Banking, Invoices, Routing) lisent des listes par
+    catégorie (to_process, in_process, pending, processed) depuis le cache
+    business. Plutôt que de renvoyer toutes les catégories en entier, on
+    construit pour chaque catégorie, une seule fois par version du cache:
+        - un index de tri par colonne (construit à la première demande)
+        - un index de tokens (vocabulaire → positions) pour la recherche
+    Chaque requête ne renvoie ensuite que la page demandée + les compteurs.
+
+VERSION:
+    La version d'une catégorie est le `cached_at` de l'entrée du cache
+    business (nouvelle écriture = nouvelle version). Sans version (données
+    lues à la source), l'index est construit pour la requête et non conservé.
+
+USAGE:
+    from app.cache.list_query import ListQuery, get_list_query_engine
+
+    result = get_list_query_engine().query(
+        scope=("bank", uid, company_id),
+        categories={"to_process": [...], "pending": [...]},
+        versions={"to_process": cached_at, "pending": cached_at},
+        query=ListQuery(category="to_process", page=2, page_size=20, search="acme"),
+        search_fields=("description", "partner_name"),
+    )
+    # {"items": {"to_process": [...20 items]}, "counts": {...}, "totals": {...}, "pagination": {...}}
+"""
+
+import logging
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Set, Tuple, Union
+
+logger = logging.getLogger("cache.list_query")
+
+LIST_CATEGORIES: Tuple[str, ...] = ("to_process", "in_process", "pending", "processed")
+
+# Items d'une catégorie: liste, ou loader appelé seulement si l'index manque
+ItemsSource = Union[List[Dict[str, Any]], Callable[[], List[Dict[str, Any]]]]
+
+_TOKEN_RE = re.compile(r"[0-9a-zà-öø-ÿ]+")
+
+
+def tokenize(value: Any) -> List[str]:
+    """Découpe une valeur en tokens minuscules alphanumériques."""
+    if value is None or value == "":
+        return []
+    return _TOKEN_RE.findall(str(value).lower())
+
+
+# ═══════════════════════════════════════════════════════════════
+# TYPES
+# ═══════════════════════════════════════════════════════════════
+
+@dataclass(frozen=True)
+class ListQuery:
+    """Paramètres d'une requête de liste (tels que reçus du frontend)."""
+
+    category: str = "all"
+    page: int = 1
+    page_size: int = 20
+    search: Optional[str] = None
+    sort_column: Optional[str] = None
+    sort_direction: str = "asc"
+
+    @property
+    def descending(self) -> bool:
+        return (self.sort_direction or "").lower() == "desc"
+
+
+class CategoryIndex:
+    """
+    Index d'une catégorie: tri par colonne (paresseux) et index de tokens.
+
+    Immuable une fois construit pour une version donnée du cache.
+    """
+
+    def __init__(self, items: List[Dict[str, Any]], search_fields: Sequence[str]):
+        self.items = items
+        self._sort_orders: Dict[str, List[int]] = {}
+        self._empty_counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        # Vocabulaire → positions (un passage sur les champs recherchables)
+        postings: Dict[str, Set[int]] = {}
+        for position, item in enumerate(items):
+            if not isinstance(item, dict):
+                continue
+            for field_name in search_fields:
+                for token in tokenize(item.get(field_name)):
+                    postings.setdefault(token, set()).add(position)
+        self._postings = postings
+        self._vocabulary = sorted(postings)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def search(self, search: str) -> Optional[Set[int]]:
+        """
+        Positions correspondant à la recherche (None = pas de filtre).
+
+        Chaque token de la recherche doit apparaître comme sous-chaîne d'un
+        token indexé (ET entre tokens). Le balayage porte sur le vocabulaire,
+        pas sur les items.
+        """
+        terms = tokenize(search)
+        if not terms:
+            return None
+        matched: Optional[Set[int]] = None
+        for term in terms:
+            positions: Set[int] = set()
+            for token in self._vocabulary:
+                if term in token:
+                    positions |= self._postings[token]
+            matched = positions if matched is None else matched & positions
+            if not matched:
+                return set()
+        return matched
+
+    def order(self, column: Optional[str]) -> List[int]:
+        """Positions triées par colonne, ordre croissant (construit une fois)."""
+        if not column:
+            return list(range(len(self.items)))
+        order = self._sort_orders.get(column)
+        if order is None:
+            with self._lock:
+                order = self._sort_orders.get(column)
+                if order is None:
+                    keys = [_sort_key(item, column) for item in self.items]
+                    order = sorted(range(len(self.items)), key=keys.__getitem__)
+                    self._empty_counts[column] = sum(1 for key in keys if key[0] == 2)
+                    self._sort_orders[column] = order
+        return order
+
+    def page(self, query: ListQuery) -> Tuple[List[Dict[str, Any]], int]:
+        """Retourne (items de la page, nombre total de correspondances)."""
+        matched = self.search(query.search) if query.search else None
+        order = self.order(query.sort_column)
+        if query.descending and query.sort_column:
+            # Valeurs vides en dernier dans les deux sens
+            filled = len(order) - self._empty_counts.get(query.sort_column, 0)
+            order = order[:filled][::-1] + order[filled:]
+        if matched is not None:
+            order = [i for i in order if i in matched]
+
+        page_size = max(1, int(query.page_size or 1))
+        start = (max(1, int(query.page or 1)) - 1) * page_size
+        return [self.items[i] for i in order[start:start + page_size]], len(order)
+
+
+def _load(items: ItemsSource) -> List[Dict[str, Any]]:
+    return (items() if callable(items) else items) or []
+
+
+def _sort_key(item: Any, column: str) -> Tuple[int, Any]:
+    """Clé de tri: nombres avant textes, valeurs vides en dernier."""
+    value = item.get(column) if isinstance(item, dict) else None
+    if value is None or value == "":
+        return (2, "")
+    if isinstance(value, bool):
+        return (0, float(value))
+    if isinstance(value, (int, float)):
+        return (0, float(value))
+    return (1, str(value).lower())
+
+
+# ═══════════════════════════════════════════════════════════════
+# MOTEUR
+# ═══════════════════════════════════════════════════════════════
+
+class ListQueryEngine:
+    """
+    Registre des index par (scope, catégorie, version), borné en LRU.
+
+    Les index sont locaux au process; leur version vient du cache Redis
+    partagé, donc chaque instance converge sans coordination.
+    """
+
+    def __init__(self, max_indexes: int = 256):
+        self._max_indexes = max_indexes
+        self._indexes: "OrderedDict[Tuple[Hashable, ...], CategoryIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_index(
+        self,
+        scope: Tuple[Hashable, ...],
+        category: str,
+        version: Optional[str],
+        items: ItemsSource,
+        search_fields: Sequence[str],
+    ) -> CategoryIndex:
+        """Index de la catégorie pour cette version (construit au premier appel)."""
+        if version is None:
+            return CategoryIndex(_load(items), search_fields)
+
+        key = (*scope, category, version)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                self._indexes.move_to_end(key)
+                return index
+
+        index = CategoryIndex(_load(items), search_fields)
+        with self._lock:
+            # Les versions précédentes de la même catégorie sont obsolètes
+            for stale in [k for k in self._indexes if k[:-1] == key[:-1] and k != key]:
+                del self._indexes[stale]
+            self._indexes[key] = index
+            while len(self._indexes) > self._max_indexes:
+                self._indexes.popitem(last=False)
+        logger.debug(f"[LIST_QUERY] Index built: {key[:-1]} items={len(index)}")
+        return index
+
+    def query(
+        self,
+        scope: Tuple[Hashable, ...],
+        categories: Dict[str, ItemsSource],
+        query: ListQuery,
+        search_fields: Sequence[str],
+        versions: Optional[Dict[str, Optional[str]]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Exécute la requête sur les catégories.
+
+        Une catégorie peut être fournie par un loader (callable): il n'est
+        appelé que si l'index de cette version n'existe pas encore, ce qui
+        évite de re-formater les items à chaque page.
+
+        - category="all": la page demandée de chaque catégorie
+        - sinon: la page de la catégorie demandée, les autres listes vides
+
+        Returns:
+            {
+                "items": {category: [...]},
+                "counts": {category: nb correspondances},
+                "totals": {category: nb items (sans recherche)},
+                "pagination": {"page", "pageSize", "totalPages", "totalItems"}
+            }
+        """
+        versions = versions or {}
+        page_size = max(1, int(query.page_size or 1))
+
+        items: Dict[str, List[Dict[str, Any]]] = {}
+        counts: Dict[str, int] = {}
+        totals: Dict[str, int] = {}
+        for category, category_items in categories.items():
+            index = self.get_index(scope, category, versions.get(category), category_items, search_fields)
+            totals[category] = len(index)
+            if query.category in ("all", category):
+                items[category], counts[category] = index.page(query)
+            else:
+                items[category] = []
+                # Compteur de l'onglet (recherche incluse), sans matérialiser de page
+                matched = index.search(query.search) if query.search else None
+                counts[category] = len(index) if matched is None else len(matched)
+
+        if query.category == "all":
+            total_items = sum(counts.values())
+            total_pages = max([(c + page_size - 1) // page_size for c in counts.values()] or [0])
+        else:
+            total_items = counts.get(query.category, 0)
+            total_pages = (total_items + page_size - 1) // page_size
+
+        return {
+            "items": items,
+            "counts": counts,
+            "totals": totals,
+            "pagination": {
+                "page": max(1, int(query.page or 1)),
+                "pageSize": page_size,
+                "totalPages": total_pages,
+                "totalItems": total_items,
+            },
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._indexes.clear()
+
+
+_list_query_engine: Optional[ListQueryEngine] = None
+
+
+def get_list_query_engine() -> ListQueryEngine:
+    """Singleton du moteur de requêtes de liste."""
+    global _list_query_engine
+    if _list_query_engine is None:
+        _list_query_engine = ListQueryEngine()
+    return _list_query_engine
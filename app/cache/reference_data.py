@@ -0,0 +1,169 @@
+"""
+Reference Data Store - Données de référence globales, versionnées (ETag).
+
+PRINCIPE:
+    Les données de référence (listes statiques des dropdowns, tables ref_*
+    RH par pays / langue) sont identiques pour tous les utilisateurs. Elles
+    sont servies depuis un tier global à deux niveaux:
+
+        Process   dict nom → (version, data)      revalidé toutes les 30s
+        Redis     {key}          → {"version", "data", "built_at"} (JSON)
+                  {key}:version  → version seule (revalidation sans relire le blob)
+
+    - version = empreinte SHA-256 du contenu (JSON canonique), type ETag
+    - Un client qui envoie sa version reçoit "not modified" (pas de payload)
+    - Reconstruction (loader) une seule fois par process à la fois (lock par nom)
+
+USAGE:
+    from app.cache.reference_data import get_reference_data_store
+
+    store = get_reference_data_store()
+    result = await store.get("static_data:global:v2", loader, ttl=86400, client_version=v)
+    if result.not_modified:
+        ...  # le client garde sa copie
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger("cache.reference_data")
+
+Loader = Callable[[], Awaitable[Any]]
+
+
+def compute_version(data: Any) -> str:
+    """Empreinte du contenu (stable: clés triées)."""
+    payload = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+@dataclass
+class ReferenceResult:
+    version: str
+    data: Any = None
+    not_modified: bool = False
+    source: str = "memory"  # memory | redis | loader
+
+
+class ReferenceDataStore:
+    """Tier global process + Redis pour les données de référence versionnées."""
+
+    LOCAL_REVALIDATE_SECONDS = 30
+
+    def __init__(self, redis_client=None):
+        self._redis = redis_client
+        # nom → (version, data, revalidé à)
+        self._local: Dict[str, Tuple[str, Any, float]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            from app.redis_client import get_redis
+            self._redis = get_redis()
+        return self._redis
+
+    async def get(
+        self,
+        key: str,
+        loader: Loader,
+        ttl: int,
+        client_version: Optional[str] = None,
+        force_refresh: bool = False,
+    ) -> ReferenceResult:
+        """
+        Données de référence pour key (chargées par loader si absentes).
+
+        client_version égale à la version courante → not_modified, sans data.
+        """
+        if force_refresh:
+            version, data, source = await self._rebuild(key, loader, ttl)
+        else:
+            version, data, source = self._get_cached(key)
+            if version is None:
+                lock = self._locks.setdefault(key, asyncio.Lock())
+                async with lock:
+                    version, data, source = self._get_cached(key)
+                    if version is None:
+                        version, data, source = await self._rebuild(key, loader, ttl)
+
+        if client_version and client_version == version:
+            return ReferenceResult(version=version, not_modified=True, source=source)
+        return ReferenceResult(version=version, data=data, source=source)
+
+    def current_version(self, key: str) -> Optional[str]:
+        """Version courante (sans charger le blob), None si absente."""
+        return self._get_cached(key)[0]
+
+    def invalidate(self, key: str) -> None:
+        self._local.pop(key, None)
+        try:
+            self.redis.delete(key, f"{key}:version")
+        except Exception as e:
+            logger.warning(f"[REFDATA] Redis invalidate failed for {key}: {e}")
+
+    # ═══════════════════════════════════════════════════════════════
+    # INTERNES
+    # ═══════════════════════════════════════════════════════════════
+
+    def _get_cached(self, key: str) -> Tuple[Optional[str], Any, str]:
+        local = self._local.get(key)
+        now = time.monotonic()
+        if local and now - local[2] < self.LOCAL_REVALIDATE_SECONDS:
+            return local[0], local[1], "memory"
+
+        try:
+            remote_version = self.redis.get(f"{key}:version")
+            if isinstance(remote_version, bytes):
+                remote_version = remote_version.decode()
+            if local and remote_version == local[0]:
+                # Même contenu qu'en mémoire: pas de relecture du blob
+                self._local[key] = (local[0], local[1], now)
+                return local[0], local[1], "memory"
+            if remote_version:
+                raw = self.redis.get(key)
+                envelope = json.loads(raw) if raw else None
+                if isinstance(envelope, dict) and envelope.get("version") == remote_version:
+                    self._local[key] = (remote_version, envelope.get("data"), now)
+                    return remote_version, envelope.get("data"), "redis"
+        except Exception as e:
+            logger.warning(f"[REFDATA] Redis read failed for {key}: {e}")
+            if local:
+                return local[0], local[1], "memory"
+        return None, None, "loader"
+
+    async def _rebuild(self, key: str, loader: Loader, ttl: int) -> Tuple[str, Any, str]:
+        data = await loader()
+        version = compute_version(data)
+        envelope = {
+            "version": version,
+            "data": data,
+            "built_at": datetime.now(timezone.utc).isoformat(),
+        }
+        try:
+            pipe = self.redis.pipeline()
+            pipe.setex(key, ttl, json.dumps(envelope, default=str))
+            pipe.setex(f"{key}:version", ttl, version)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"[REFDATA] Redis write failed for {key}: {e}")
+        self._local[key] = (version, data, time.monotonic())
+        logger.info(f"[REFDATA] Rebuilt {key} version={version}")
+        return version, data, "loader"
+
+
+_store: Optional[ReferenceDataStore] = None
+
+
+def get_reference_data_store() -> ReferenceDataStore:
+    """Singleton du tier des données de référence."""
+    global _store
+    if _store is None:
+        _store = ReferenceDataStore()
+    return _store
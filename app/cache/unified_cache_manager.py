@@ -9,6 +9,7 @@ Architecture:
     - Cache-first: Tentative de lecture depuis Redis avant la source
     - Write-through: Mise à jour du cache après écriture source
     - Invalidation sélective: Suppression ciblée après modifications
+    - Invalidation de module: génération par domaine (INCR, pas de SCAN)
 
 ═══════════════════════════════════════════════════════════════════════════════
 ARCHITECTURE 3 NIVEAUX (Aligné avec redis_namespaces.py)
@@ -23,18 +24,24 @@ NIVEAU 2 - COMPANY (Context Société):
     company:{uid}:{cid}:settings
 
 NIVEAU 3 - BUSINESS (Logique Métier):
-    business:{uid}:{cid}:bank       (anciennement bank:transactions)
-    business:{uid}:{cid}:routing    (anciennement drive:documents)
-    business:{uid}:{cid}:invoices   (anciennement apbookeeper:documents)
-    business:{uid}:{cid}:expenses   (anciennement expenses:details)
-    business:{uid}:{cid}:coa
+    business:shared:{cid}:bank      (anciennement bank:transactions)
+    business:shared:{cid}:routing   (anciennement drive:documents)
+    business:shared:{cid}:invoices  (anciennement apbookeeper:documents)
+    business:shared:{cid}:expenses  (anciennement expenses:details)
+    business:shared:{cid}:coa
+    business:shared:{cid}:hr        (anciennement hr:employees)
     business:{uid}:{cid}:dashboard  (anciennement approval_pendinglist)
     business:{uid}:{cid}:chat
-    business:{uid}:{cid}:hr         (anciennement hr:employees)
+    business:{uid}:{cid}:{domain}:overlay  (part propre à l'utilisateur d'un domaine partagé)
 
 LEGACY (rétro-compatibilité avec migration automatique):
     cache:{user_id}:{company_id}:{data_type}:{sub_type}
 
+GÉNÉRATIONS (invalidation O(1)):
+    cache_gen:{uid|shared}:{cid}:{domain}
+    Chaque entrée écrite ici porte "generation"; une entrée dont la
+    génération ne correspond plus est ignorée à la lecture et expire par TTL.
+
 ═══════════════════════════════════════════════════════════════════════════════
 
 @see app/llm_service/redis_namespaces.py
@@ -50,12 +57,15 @@ import os
 from ..llm_service.redis_namespaces import (
     CacheLevel,
     BusinessDomain,
+    RedisNamespace,
     RedisTTL,
     # Helpers Niveau 2
     build_company_context_key,
     build_company_settings_key,
     # Helpers Niveau 3
     build_business_key,
+    build_business_overlay_key,
+    build_cache_generation_key,
     # Legacy
     build_cache_key as build_legacy_cache_key,
     # TTL
@@ -249,6 +259,28 @@ class UnifiedCacheManager:
         # Fallback legacy (should not happen with proper mapping)
         return build_legacy_cache_key(user_id, company_id, data_type, sub_type)
 
+    def _build_generation_key(
+        self,
+        user_id: str,
+        company_id: str,
+        data_type: str,
+        sub_type: str = None
+    ) -> str:
+        """Compteur de génération du domaine auquel appartient l'entrée."""
+        _, domain = _resolve_cache_level(data_type, sub_type)
+        return build_cache_generation_key(user_id, company_id, domain)
+
+    @staticmethod
+    def _is_current(raw: str, generation: int, unstamped_ok: bool) -> bool:
+        """L'entrée brute a-t-elle été écrite dans la génération courante ?"""
+        try:
+            stored = json.loads(raw).get("generation")
+        except (ValueError, AttributeError):
+            return False
+        if stored is None:
+            return unstamped_ok
+        return stored == generation
+
     def _get_legacy_key(
         self,
         user_id: str,
@@ -285,18 +317,28 @@ class UnifiedCacheManager:
         """
         new_cache_key = self._build_cache_key(user_id, company_id, data_type, sub_type)
         legacy_cache_key = self._get_legacy_key(user_id, company_id, data_type, sub_type)
+        generation_key = self._build_generation_key(user_id, company_id, data_type, sub_type)
 
         logger.debug(f"[{self.log_prefix}] GET: new={new_cache_key}, legacy={legacy_cache_key}")
 
         try:
             redis_client = await self._get_redis_client()
 
-            # 1. Essayer la nouvelle clé
-            cached_data = await redis_client.get(new_cache_key)
+            # Un seul aller-retour: nouvelle clé, clé legacy, génération du domaine
+            cached_data, legacy_data, raw_generation = await redis_client.mget(
+                new_cache_key, legacy_cache_key, generation_key
+            )
+            generation = int(raw_generation or 0)
+
+            # 1. Nouvelle clé (les entrées non marquées viennent d'autres écrivains)
+            if cached_data and not self._is_current(cached_data, generation, unstamped_ok=True):
+                logger.info(f"[{self.log_prefix}] STALE: {new_cache_key} (generation={generation})")
+                cached_data = None
 
             # 2. Fallback sur la clé legacy si nouvelle clé non trouvée
             if not cached_data and new_cache_key != legacy_cache_key:
-                cached_data = await redis_client.get(legacy_cache_key)
+                if legacy_data and self._is_current(legacy_data, generation, unstamped_ok=generation == 0):
+                    cached_data = legacy_data
                 if cached_data:
                     logger.info(f"[{self.log_prefix}] LEGACY HIT: {legacy_cache_key} (migrating)")
                     # Migration automatique: copier vers nouvelle clé
@@ -395,13 +437,17 @@ class UnifiedCacheManager:
             # Calculer la taille des données
             data_size = len(str(data)) if data else 0
 
+            generation_key = self._build_generation_key(user_id, company_id, data_type, sub_type)
+            generation = int(await redis_client.get(generation_key) or 0)
+
             # Ajouter des métadonnées de cache
             cached_payload = {
                 "data": data,
                 "cached_at": datetime.now().isoformat(),
                 "ttl_seconds": ttl_seconds,
                 "source": f"{data_type}.{sub_type}" if sub_type else data_type,
-                "cache_version": "3.0"  # Marqueur nouvelle architecture
+                "cache_version": "3.0",  # Marqueur nouvelle architecture
+                "generation": generation,
             }
 
             json_payload = json.dumps(cached_payload)
@@ -470,7 +516,9 @@ class UnifiedCacheManager:
         """
         Invalide tout le cache d'un module pour une société et un utilisateur.
 
-        Nettoie à la fois les nouvelles clés ET les clés legacy.
+        Incrémente la génération du domaine (un INCR, pas de SCAN): les
+        entrées par item et les clés legacy écrites avant deviennent
+        périmées et expirent par TTL.
 
         Args:
             user_id: Firebase UID de l'utilisateur
@@ -480,50 +528,30 @@ class UnifiedCacheManager:
         Returns:
             True si succès, False sinon
         """
-        # Déterminer le domaine business correspondant
         level, domain = _resolve_cache_level(data_type, None)
+        generation_key = build_cache_generation_key(user_id, company_id, domain)
 
-        # Patterns à nettoyer
-        patterns = []
-        if level == CacheLevel.BUSINESS:
-            patterns.append(f"business:{user_id}:{company_id}:{domain}")
-        elif level == CacheLevel.COMPANY:
-            patterns.append(f"company:{user_id}:{company_id}:{domain}")
-
-        # Toujours inclure le pattern legacy
-        patterns.append(f"cache:{user_id}:{company_id}:{data_type}:*")
+        # La clé de base est aussi supprimée: d'autres modules la lisent
+        # directement, sans vérifier la génération
+        if level == CacheLevel.COMPANY:
+            base_key = f"company:{user_id}:{company_id}:{domain}"
+        else:
+            base_key = build_business_key(user_id, company_id, domain)
 
-        logger.info(f"[{self.log_prefix}] INVALIDATE MODULE: {patterns}")
+        logger.info(f"[{self.log_prefix}] INVALIDATE MODULE: {generation_key}")
 
         try:
             redis_client = await self._get_redis_client()
-            total_deleted = 0
-
-            for pattern in patterns:
-                if pattern.endswith("*"):
-                    # SCAN pour les patterns avec wildcard
-                    cursor = 0
-                    keys_to_delete = []
-
-                    while True:
-                        cursor, batch = await redis_client.scan(
-                            cursor=cursor,
-                            match=pattern,
-                            count=100
-                        )
-                        keys_to_delete.extend(batch)
-                        if cursor == 0:
-                            break
-
-                    if keys_to_delete:
-                        await redis_client.delete(*keys_to_delete)
-                        total_deleted += len(keys_to_delete)
-                else:
-                    # Clé exacte
-                    deleted = await redis_client.delete(pattern)
-                    total_deleted += deleted
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.incr(generation_key)
+            pipe.expire(generation_key, RedisTTL.CACHE_GENERATION)
+            pipe.delete(base_key)
+            generation, _, deleted = await pipe.execute()
 
-            logger.info(f"[{self.log_prefix}] MODULE INVALIDATED: {total_deleted} keys")
+            logger.info(
+                f"[{self.log_prefix}] MODULE INVALIDATED: {domain} "
+                f"generation={generation} deleted={deleted}"
+            )
             return True
 
         except Exception as e:
@@ -559,6 +587,51 @@ class UnifiedCacheManager:
             logger.error(f"[{self.log_prefix}] INVALIDATE DOMAIN error: {e}")
             return False
 
+    # ════════════════════════════════════════════════════════════════════════════
+    # OVERLAYS UTILISATEUR (domaines partagés)
+    # Le tier partagé business:shared:{cid}:{domain} porte les données société;
+    # l'overlay business:{uid}:{cid}:{domain}:overlay ne porte que ce qui
+    # diffère pour un utilisateur (ex: statut OAuth Drive).
+    # ════════════════════════════════════════════════════════════════════════════
+
+    async def get_user_overlay(self, user_id: str, company_id: str, domain: str) -> Optional[Dict]:
+        """Overlay utilisateur d'un domaine, None si absent."""
+        key = build_business_overlay_key(user_id, company_id, domain)
+        try:
+            redis_client = await self._get_redis_client()
+            raw = await redis_client.get(key)
+            return json.loads(raw) if raw else None
+        except Exception as e:
+            logger.error(f"[{self.log_prefix}] OVERLAY GET error: {key} | {e}")
+            return None
+
+    async def set_user_overlay(
+        self,
+        user_id: str,
+        company_id: str,
+        domain: str,
+        data: Dict,
+        ttl_seconds: int = RedisTTL.BUSINESS_OVERLAY,
+    ) -> bool:
+        key = build_business_overlay_key(user_id, company_id, domain)
+        try:
+            redis_client = await self._get_redis_client()
+            await redis_client.setex(key, ttl_seconds, json.dumps(data))
+            return True
+        except Exception as e:
+            logger.error(f"[{self.log_prefix}] OVERLAY SET error: {key} | {e}")
+            return False
+
+    async def clear_user_overlay(self, user_id: str, company_id: str, domain: str) -> bool:
+        key = build_business_overlay_key(user_id, company_id, domain)
+        try:
+            redis_client = await self._get_redis_client()
+            await redis_client.delete(key)
+            return True
+        except Exception as e:
+            logger.error(f"[{self.log_prefix}] OVERLAY DELETE error: {key} | {e}")
+            return False
+
     async def get_cache_stats(
         self,
         user_id: str,
@@ -584,6 +657,7 @@ class UnifiedCacheManager:
             # Patterns à chercher
             patterns = [
                 f"business:{user_id}:{company_id}:*",
+                f"business:{RedisNamespace.SHARED_SCOPE}:{company_id}:*",
                 f"company:{user_id}:{company_id}:*",
                 f"cache:{user_id}:{company_id}:*",
             ]
@@ -591,7 +665,7 @@ class UnifiedCacheManager:
             if data_type:
                 level, domain = _resolve_cache_level(data_type, None)
                 if level == CacheLevel.BUSINESS:
-                    patterns = [f"business:{user_id}:{company_id}:{domain}"]
+                    patterns = [build_business_key(user_id, company_id, domain)]
                 patterns.append(f"cache:{user_id}:{company_id}:{data_type}:*")
 
             all_keys = []
@@ -883,22 +883,46 @@ class DriveClientServiceSingleton:
             print(f"Une erreur est survenue : {e}")
             return None
 
+    async def file_in_folder(self, user_id: str, file_id: str, folder_id: str) -> bool:
+        """
+        Vérifie qu'un fichier existe encore dans un dossier Drive (ni déplacé, ni à la corbeille).
+
+        Returns:
+            bool: True si le fichier est dans le dossier, False sinon (y compris en cas d'erreur)
+        """
+        def _get() -> dict:
+            creds = self._initialize_prod_credentials(user_id)
+            service = build('drive', 'v3', credentials=creds)
+            return service.files().get(fileId=file_id, fields='parents, trashed').execute()
+
+        try:
+            file = await asyncio.to_thread(_get)
+            return not file.get('trashed', False) and folder_id in file.get('parents', [])
+        except Exception as e:
+            print(f"⚠️ Erreur lors de la vérification du fichier {file_id}: {e}")
+            return False
+
     async def upload_file_to_drive(
-        self, user_id: str, file_bytes: bytes, file_name: str,
-        folder_id: str, mime_type: str = "application/octet-stream",
+        self, user_id: str, file_bytes: bytes = None, file_name: str = None,
+        folder_id: str = None, mime_type: str = "application/octet-stream",
+        file_obj=None, chunk_size: int = 8 * 1024 * 1024,
     ) -> dict:
         """
         Upload a file to a Google Drive folder.
 
         Uses MediaIoBaseUpload with resumable=True for robustness.
-        Runs blocking Drive API call in executor to avoid blocking the event loop.
+        Credentials, service build and the chunked upload all run in a worker
+        thread to avoid blocking the event loop.
 
         Args:
             user_id: Firebase UID (for OAuth credentials).
-            file_bytes: Raw file content.
+            file_bytes: Raw file content (small payloads).
             file_name: Target filename in Drive.
             folder_id: Drive folder ID to upload into.
             mime_type: MIME type of the file.
+            file_obj: Seekable file-like object, streamed in chunk_size
+                chunks instead of file_bytes (large uploads).
+            chunk_size: Resumable upload chunk size (multiple of 256 KB).
 
         Returns:
             {"success": True, "file_id": str, "file_name": str, "web_view_link": str}
@@ -907,7 +931,7 @@ class DriveClientServiceSingleton:
         import io
         from googleapiclient.http import MediaIoBaseUpload
 
-        try:
+        def _upload() -> dict:
             creds = self._initialize_prod_credentials(user_id)
             service = build('drive', 'v3', credentials=creds)
 
@@ -916,18 +940,19 @@ class DriveClientServiceSingleton:
                 'parents': [folder_id],
             }
             media = MediaIoBaseUpload(
-                io.BytesIO(file_bytes),
+                file_obj if file_obj is not None else io.BytesIO(file_bytes),
                 mimetype=mime_type,
+                chunksize=chunk_size,
                 resumable=True,
             )
+            return service.files().create(
+                body=file_metadata,
+                media_body=media,
+                fields='id, name, webViewLink',
+            ).execute()
 
-            created_file = await asyncio.to_thread(
-                service.files().create(
-                    body=file_metadata,
-                    media_body=media,
-                    fields='id, name, webViewLink',
-                ).execute
-            )
+        try:
+            created_file = await asyncio.to_thread(_upload)
 
             return {
                 "success": True,
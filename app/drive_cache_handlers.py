@@ -30,7 +30,7 @@ from typing import Any, Dict, List, Optional
 from datetime import datetime
 
 from .cache.unified_cache_manager import get_drive_cache_manager
-from .llm_service.redis_namespaces import RedisTTL
+from .llm_service.redis_namespaces import BusinessDomain, RedisTTL
 from .firebase_providers import get_firebase_management
 
 logger = logging.getLogger("drive.cache_handlers")
@@ -42,6 +42,9 @@ logger = logging.getLogger("drive.cache_handlers")
 
 TTL_DRIVE_DOCUMENTS = 1800  # 30 minutes
 
+# Documents: tier partagé société; statut OAuth: overlay par utilisateur
+ROUTING_DOMAIN = BusinessDomain.ROUTING.value
+
 
 class DriveCacheHandlers:
     """
@@ -107,15 +110,22 @@ class DriveCacheHandlers:
             }
         """
         try:
-            # 1. Tentative cache
+            # 1. Tentative cache (tier partagé société) — sauf si l'overlay
+            #    utilisateur signale un OAuth Drive à refaire: on retente alors
+            #    Drive avec ses propres credentials
             cache = get_drive_cache_manager()
-            cached = await cache.get_cached_data(
-                user_id,
-                company_id,
-                "drive",
-                "documents",
-                ttl_seconds=TTL_DRIVE_DOCUMENTS
-            )
+            overlay = await cache.get_user_overlay(user_id, company_id, ROUTING_DOMAIN)
+            reauth_flagged = bool(overlay and overlay.get("oauth", {}).get("reauth_required"))
+
+            cached = None
+            if not reauth_flagged:
+                cached = await cache.get_cached_data(
+                    user_id,
+                    company_id,
+                    "drive",
+                    "documents",
+                    ttl_seconds=TTL_DRIVE_DOCUMENTS
+                )
 
             if cached and cached.get("data"):
                 logger.info(
@@ -125,6 +135,7 @@ class DriveCacheHandlers:
                 return {
                     "data": cached["data"],
                     "source": "cache",
+                    "cached_at": cached.get("cached_at"),
                     "oauth_error": False
                 }
 
@@ -142,6 +153,10 @@ class DriveCacheHandlers:
                     f"DRIVE_CACHE.get_documents company_id={company_id} "
                     f"oauth_error={drive_data.get('error_message')}"
                 )
+                await cache.set_user_overlay(
+                    user_id, company_id, ROUTING_DOMAIN,
+                    {"oauth": {"connected": False, "reauth_required": True}},
+                )
                 return {
                     "data": None,
                     "source": "drive",
@@ -149,6 +164,9 @@ class DriveCacheHandlers:
                     "error_message": drive_data.get("error_message", "OAuth authentication required")
                 }
 
+            if reauth_flagged:
+                await cache.clear_user_overlay(user_id, company_id, ROUTING_DOMAIN)
+
             # 4. Sync vers Redis si succès
             if drive_data.get("data"):
                 await cache.set_cached_data(
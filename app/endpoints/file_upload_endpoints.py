@@ -6,6 +6,10 @@ Pipeline 1: POST /upload/chat-file   → GCS (chat_files/{thread_key}/)
 Pipeline 2: POST /upload/routing-file → Google Drive (input_drive_doc_id) + WS broadcast
 
 Both endpoints require Firebase ID token authentication (Authorization: Bearer <token>).
+
+Uploads are streamed in bounded chunks into a spooled temp file (hashed on
+the fly) and sent as resumable uploads off the event loop; identical content
+already stored for the company destination is reused (see file_upload_utils).
 """
 
 import asyncio
@@ -21,10 +25,19 @@ from fastapi.responses import JSONResponse
 
 from app.file_upload_utils import (
     CHAT_ALLOWED_EXTENSIONS,
+    CHAT_DEDUPE_TTL,
     GCS_BUCKET_NAME,
     MAX_CHAT_FILE_SIZE,
     MAX_ROUTING_FILE_SIZE,
+    RESUMABLE_CHUNK_SIZE,
     ROUTING_ALLOWED_EXTENSIONS,
+    ROUTING_DEDUPE_TTL,
+    FileTooLargeError,
+    SpooledUpload,
+    find_duplicate_upload,
+    forget_upload,
+    remember_upload,
+    spool_upload,
     validate_file,
     verify_firebase_id_token,
 )
@@ -55,7 +68,7 @@ async def upload_chat_file(
     # 1. Auth
     authorization = request.headers.get("Authorization", "")
     try:
-        uid = verify_firebase_id_token(authorization)
+        uid = await verify_firebase_id_token(authorization)
     except ValueError as e:
         raise HTTPException(status_code=401, detail=str(e))
     except Exception:
@@ -67,44 +80,68 @@ async def upload_chat_file(
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    # 3. Read bytes + check size
-    file_bytes = await file.read()
-    if len(file_bytes) > MAX_CHAT_FILE_SIZE:
-        return JSONResponse(
-            status_code=200,
-            content={
-                "success": False,
-                "error": f"File too large ({len(file_bytes)} bytes). Max {MAX_CHAT_FILE_SIZE // (1024*1024)} MB.",
-            },
-        )
-
-    # 4. Build GCS path
-    short_id = uuid.uuid4().hex[:8]
-    safe_name = "".join(c if c.isalnum() or c in ".-_" else "_" for c in file.filename)
-    blob_name = f"chat_files/{thread_key}/{short_id}_{safe_name}"
+    # 3. Stream into a spooled temp file (bounded chunks, hashed on the fly)
+    try:
+        spooled = await spool_upload(file, MAX_CHAT_FILE_SIZE)
+    except FileTooLargeError as e:
+        return JSONResponse(status_code=200, content={"success": False, "error": str(e)})
 
-    # 5. Upload to GCS
     from app.storage_client import get_storage_client
 
     storage = get_storage_client()
-    result = storage.upload_blob(GCS_BUCKET_NAME, blob_name, file_bytes, file.content_type)
+    dedupe_scope = f"chat:{thread_key}"
+    try:
+        # 4. Same content already stored for this company / thread → reuse it
+        blob_name = None
+        duplicate = find_duplicate_upload(company_id, dedupe_scope, spooled.sha256)
+        if duplicate and duplicate.get("gcs_path"):
+            if await asyncio.to_thread(storage.blob_exists, duplicate["gcs_path"]):
+                blob_name = duplicate["gcs_path"]
+            else:
+                forget_upload(company_id, dedupe_scope, spooled.sha256)
+        deduplicated = blob_name is not None
+
+        if not deduplicated:
+            # 5. Build GCS path + resumable upload off the event loop
+            short_id = uuid.uuid4().hex[:8]
+            safe_name = "".join(c if c.isalnum() or c in ".-_" else "_" for c in file.filename)
+            blob_name = f"chat_files/{thread_key}/{short_id}_{safe_name}"
+
+            result = await asyncio.to_thread(
+                storage.upload_blob,
+                GCS_BUCKET_NAME,
+                blob_name,
+                spooled.file,
+                file.content_type,
+                chunk_size=RESUMABLE_CHUNK_SIZE,
+                size=spooled.size,
+                metadata={"sha256": spooled.sha256},
+            )
 
-    if not result.get("success"):
-        return JSONResponse(
-            status_code=200,
-            content={"success": False, "error": result.get("error", "GCS upload failed")},
-        )
+            if not result.get("success"):
+                return JSONResponse(
+                    status_code=200,
+                    content={"success": False, "error": result.get("error", "GCS upload failed")},
+                )
+
+            remember_upload(
+                company_id, dedupe_scope, spooled.sha256, {"gcs_path": blob_name}, CHAT_DEDUPE_TTL,
+            )
+    finally:
+        spooled.close()
 
     # 6. Generate signed URL (7 days)
     try:
-        download_url = storage.generate_signed_url(blob_name, expiration_hours=168)
+        download_url = await asyncio.to_thread(
+            storage.generate_signed_url, blob_name, expiration_hours=168
+        )
     except Exception as url_err:
         logger.warning(f"[CHAT_UPLOAD] Signed URL generation failed: {url_err}")
         download_url = None
 
     logger.info(
         f"[CHAT_UPLOAD] success uid={uid} thread_key={thread_key} "
-        f"blob={blob_name} size={len(file_bytes)}"
+        f"blob={blob_name} size={spooled.size} deduplicated={deduplicated}"
     )
 
     return {
@@ -113,7 +150,9 @@ async def upload_chat_file(
             "gcs_path": blob_name,
             "download_url": download_url,
             "filename": file.filename,
-            "size": len(file_bytes),
+            "size": spooled.size,
+            "sha256": spooled.sha256,
+            "deduplicated": deduplicated,
             "content_type": file.content_type,
             "thread_key": thread_key,
             "uploaded_at": datetime.now(timezone.utc).isoformat(),
@@ -141,7 +180,7 @@ async def upload_routing_file(
     # 1. Auth
     authorization = request.headers.get("Authorization", "")
     try:
-        uid = verify_firebase_id_token(authorization)
+        uid = await verify_firebase_id_token(authorization)
     except ValueError as e:
         raise HTTPException(status_code=401, detail=str(e))
     except Exception:
@@ -153,18 +192,7 @@ async def upload_routing_file(
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    # 3. Read bytes + check size (before 202 response)
-    file_bytes = await file.read()
-    if len(file_bytes) > MAX_ROUTING_FILE_SIZE:
-        return JSONResponse(
-            status_code=200,
-            content={
-                "success": False,
-                "error": f"File too large ({len(file_bytes)} bytes). Max {MAX_ROUTING_FILE_SIZE // (1024*1024)} MB.",
-            },
-        )
-
-    # 4. Lookup input_drive_doc_id from Redis L2 cache
+    # 3. Lookup input_drive_doc_id from Redis L2 cache
     from app.redis_client import get_redis
 
     r = get_redis()
@@ -194,12 +222,43 @@ async def upload_routing_file(
             content={"success": False, "code": "CONTEXT_NOT_FOUND", "error": "input_drive_doc_id not found in context"},
         )
 
-    # 5. Fire background task and return 202
+    # 4. Stream into a spooled temp file (size checked before 202 response)
+    try:
+        spooled = await spool_upload(file, MAX_ROUTING_FILE_SIZE)
+    except FileTooLargeError as e:
+        return JSONResponse(status_code=200, content={"success": False, "error": str(e)})
+
+    # 5. Same content still waiting in this company's input folder → no re-upload
+    #    (the router moves processed files out of it: a re-upload is then legitimate)
+    dedupe_scope = f"routing:{input_drive_id}"
+    duplicate = find_duplicate_upload(company_id, dedupe_scope, spooled.sha256)
+    if duplicate:
+        from app.driveClientService import DriveClientServiceSingleton
+
+        file_id = duplicate.get("file_id")
+        if not file_id or not await DriveClientServiceSingleton().file_in_folder(uid, file_id, input_drive_id):
+            forget_upload(company_id, dedupe_scope, spooled.sha256)
+            duplicate = None
+    if duplicate:
+        spooled.close()
+        logger.info(
+            f"[ROUTING_UPLOAD] duplicate uid={uid} company={company_id} "
+            f"file={file.filename} existing_file_id={duplicate.get('file_id')}"
+        )
+        return {
+            "success": True,
+            "duplicate": True,
+            "file_id": duplicate.get("file_id"),
+            "file_name": duplicate.get("file_name"),
+            "message": "Identical file already uploaded",
+        }
+
+    # 6. Fire background task (owns the spooled file) and return 202
     asyncio.create_task(
         _background_drive_upload(
             uid=uid,
             company_id=company_id,
-            file_bytes=file_bytes,
+            spooled=spooled,
             file_name=file.filename,
             content_type=file.content_type or "application/octet-stream",
             input_drive_id=input_drive_id,
@@ -209,7 +268,7 @@ async def upload_routing_file(
 
     logger.info(
         f"[ROUTING_UPLOAD] accepted uid={uid} company={company_id} "
-        f"file={file.filename} size={len(file_bytes)} drive_folder={input_drive_id}"
+        f"file={file.filename} size={spooled.size} drive_folder={input_drive_id}"
     )
 
     return {"success": True, "message": "Upload accepted, processing in background"}
@@ -218,25 +277,29 @@ async def upload_routing_file(
 async def _background_drive_upload(
     uid: str,
     company_id: str,
-    file_bytes: bytes,
+    spooled: SpooledUpload,
     file_name: str,
     content_type: str,
     input_drive_id: str,
     mandate_path: str,
 ):
-    """Background task: upload to Drive → refresh cache → broadcast WS event."""
+    """Background task: resumable upload to Drive → refresh cache → broadcast WS event."""
     from app.driveClientService import DriveClientServiceSingleton
     from app.ws_hub import hub
 
     try:
         drive = DriveClientServiceSingleton()
-        result = await drive.upload_file_to_drive(
-            user_id=uid,
-            file_bytes=file_bytes,
-            file_name=file_name,
-            folder_id=input_drive_id,
-            mime_type=content_type,
-        )
+        try:
+            result = await drive.upload_file_to_drive(
+                user_id=uid,
+                file_obj=spooled.file,
+                file_name=file_name,
+                folder_id=input_drive_id,
+                mime_type=content_type,
+                chunk_size=RESUMABLE_CHUNK_SIZE,
+            )
+        finally:
+            spooled.close()
 
         if not result.get("success"):
             error_msg = result.get("error", "Drive upload failed")
@@ -255,6 +318,13 @@ async def _background_drive_upload(
             f"[ROUTING_UPLOAD] Drive upload success uid={uid} "
             f"file_id={result.get('file_id')} file={file_name}"
         )
+        remember_upload(
+            company_id,
+            f"routing:{input_drive_id}",
+            spooled.sha256,
+            {"file_id": result.get("file_id"), "file_name": result.get("file_name", file_name)},
+            ROUTING_DEDUPE_TTL,
+        )
 
         # Refresh Drive cache
         try:
@@ -2,18 +2,29 @@
 File Upload Utilities
 =====================
 
-Shared auth, validation, and constants for file upload endpoints.
+Shared auth, validation, streaming and constants for file upload endpoints.
+
+Uploads are never read whole into memory: the request body is copied in
+UPLOAD_READ_CHUNK_SIZE chunks into a spooled temp file (memory up to
+SPOOL_MAX_MEMORY, disk beyond) while its SHA-256 is computed. Identical
+content already stored for the same company/destination is reused instead
+of uploaded again (Redis index keyed by the content hash).
 
 Usage:
     from app.file_upload_utils import verify_firebase_id_token, validate_file
+    from app.file_upload_utils import spool_upload, find_duplicate_upload
 """
 
 import os
+import json
+import hashlib
 import logging
 import mimetypes
+import tempfile
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
 
-from firebase_admin import auth as firebase_auth
-from .firebase_client import get_firebase_app
+from .firebase_token_verifier import get_token_verifier
 
 logger = logging.getLogger("file_upload")
 
@@ -34,14 +45,23 @@ ROUTING_ALLOWED_EXTENSIONS = {
 
 GCS_BUCKET_NAME = os.getenv("GCS_BUCKET_NAME", "pinnokio-gpt.appspot.com")
 
+UPLOAD_READ_CHUNK_SIZE = 1024 * 1024  # 1 MB read from the request per await
+SPOOL_MAX_MEMORY = 1024 * 1024  # spooled file rolls over to disk beyond 1 MB
+RESUMABLE_CHUNK_SIZE = 8 * 1024 * 1024  # GCS / Drive resumable chunk (multiple of 256 KB)
+
+DEDUPE_KEY_PREFIX = "upload:dedupe"
+CHAT_DEDUPE_TTL = 7 * 24 * 3600  # matches the 7-day signed URL
+ROUTING_DEDUPE_TTL = 24 * 3600
+
 
 # ─── Auth ───
 
-def verify_firebase_id_token(authorization: str) -> str:
+async def verify_firebase_id_token(authorization: str) -> str:
     """
     Verify a Firebase ID token from the Authorization header.
 
-    Same pattern as auth_handlers.py:104.
+    Uses the shared verifier (same as auth_handlers.py): verification runs
+    off the event loop and decoded claims are cached until the token expires.
 
     Args:
         authorization: "Bearer <token>" header value.
@@ -58,11 +78,7 @@ def verify_firebase_id_token(authorization: str) -> str:
         raise ValueError("Missing or malformed Authorization header")
 
     token = authorization[len("Bearer "):]
-    decoded = firebase_auth.verify_id_token(
-        token,
-        app=get_firebase_app(),
-        clock_skew_seconds=5,
-    )
+    decoded = await get_token_verifier().verify(token)
     return decoded["uid"]
 
 
@@ -104,3 +120,110 @@ def validate_file(filename: str, allowed_extensions: set, max_size: int) -> str:
         )
 
     return ext
+
+
+# ─── Streaming ───
+
+class FileTooLargeError(ValueError):
+    """Upload exceeded the allowed size (detected while streaming)."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        super().__init__(f"File too large. Max {max_size // (1024 * 1024)} MB.")
+
+
+@dataclass
+class SpooledUpload:
+    """Upload content spooled to a temp file, rewound and ready to stream."""
+
+    file: Any
+    size: int
+    sha256: str
+
+    def close(self) -> None:
+        try:
+            self.file.close()
+        except Exception:
+            pass
+
+
+async def spool_upload(
+    upload,
+    max_size: int,
+    chunk_size: int = UPLOAD_READ_CHUNK_SIZE,
+) -> SpooledUpload:
+    """
+    Copy an UploadFile into a spooled temp file in bounded chunks.
+
+    Hashes the content on the fly and stops as soon as max_size is
+    exceeded, so peak memory stays at about one chunk whatever the size.
+
+    Raises:
+        FileTooLargeError: Content is larger than max_size.
+    """
+    spooled = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        while True:
+            chunk = await upload.read(chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_size:
+                raise FileTooLargeError(max_size)
+            digest.update(chunk)
+            spooled.write(chunk)
+    except BaseException:
+        spooled.close()
+        raise
+
+    spooled.seek(0)
+    return SpooledUpload(file=spooled, size=size, sha256=digest.hexdigest())
+
+
+# ─── Dedupe ───
+
+def _dedupe_key(company_id: str, scope: str, sha256: str) -> str:
+    return f"{DEDUPE_KEY_PREFIX}:{company_id}:{scope}:{sha256}"
+
+
+def find_duplicate_upload(company_id: str, scope: str, sha256: str) -> Optional[Dict[str, Any]]:
+    """
+    Previously stored upload with the same content, or None.
+
+    Args:
+        company_id: Company owning the upload.
+        scope: Destination (e.g. "chat:{thread_key}", "routing:{drive_folder_id}").
+        sha256: Content hash from spool_upload.
+    """
+    from .redis_client import get_redis
+
+    try:
+        raw = get_redis().get(_dedupe_key(company_id, scope, sha256))
+        return json.loads(raw) if raw else None
+    except Exception as e:
+        logger.warning(f"[FILE_UPLOAD] Dedupe lookup failed: {e}")
+        return None
+
+
+def remember_upload(
+    company_id: str, scope: str, sha256: str, stored: Dict[str, Any], ttl: int,
+) -> None:
+    """Index a stored upload by content hash for later dedupe."""
+    from .redis_client import get_redis
+
+    try:
+        get_redis().setex(_dedupe_key(company_id, scope, sha256), ttl, json.dumps(stored))
+    except Exception as e:
+        logger.warning(f"[FILE_UPLOAD] Dedupe index write failed: {e}")
+
+
+def forget_upload(company_id: str, scope: str, sha256: str) -> None:
+    """Drop a dedupe entry whose stored file no longer exists."""
+    from .redis_client import get_redis
+
+    try:
+        get_redis().delete(_dedupe_key(company_id, scope, sha256))
+    except Exception as e:
+        logger.warning(f"[FILE_UPLOAD] Dedupe index delete failed: {e}")
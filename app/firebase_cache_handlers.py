@@ -350,7 +350,8 @@ class FirebaseCacheHandlers:
                 )
                 return {
                     "data": cached["data"],
-                    "source": "cache"
+                    "source": "cache",
+                    "cached_at": cached.get("cached_at"),
                 }
 
             # 2. Fetch depuis task_manager (Source de Vérité)
@@ -470,7 +471,8 @@ class FirebaseCacheHandlers:
                     )
                     return {
                         "data": cached["data"],
-                        "source": "cache"
+                        "source": "cache",
+                        "cached_at": cached.get("cached_at"),
                     }
             else:
                 logger.info(
@@ -7,7 +7,7 @@ import threading
 import asyncio
 import logging
 from datetime import datetime, timezone
-from typing import Optional, Callable, Awaitable, Any,Dict
+from typing import Optional, Callable, Awaitable, Any,Dict, List, Tuple
 from concurrent.futures import TimeoutError as FutureTimeoutError
 from firebase_admin import credentials, firestore, initialize_app,auth
 import firebase_admin
@@ -34,6 +34,9 @@ except Exception:
 _FIREBASE_MANAGEMENT_SINGLETON: Optional["FirebaseManagement"] = None
 _FIREBASE_REALTIME_SINGLETON: Optional["FirebaseRealtimeChat"] = None
 
+# Queue Redis de dispatch vers le worker agentique (approbations APBookkeeper)
+APPROVAL_DISPATCH_QUEUE = "queue:agentic_dispatch"
+
 
 class FirebaseManagement:
     """
@@ -6235,31 +6238,28 @@ class FirebaseManagement:
 
 
 
-    def delete_document_recursive(self, doc_path: str, batch_size: int = 100) -> bool:
-        try:
-            doc_ref = self.db.document(doc_path)
+    def delete_document_recursive(self, doc_path: str, batch_size: int = 500, checkpoint=None) -> bool:
+        """
+        Supprime un document et toutes ses sous-collections.
 
-            # Supprime récursivement toutes les sous-collections
-            for coll_ref in doc_ref.collections():
-                self._delete_collection_recursive(coll_ref, batch_size)
+        Parcours parallèle + suppressions BulkWriter (voir tools.bulk_deletion);
+        avec un DeletionCheckpoint, une suppression interrompue reprend sans
+        reparcourir les collections déjà terminées.
+        """
+        from .tools.bulk_deletion import FirestoreTreeDeleter
 
-            # Supprime le document lui-même
-            doc_ref.delete()
+        try:
+            deleted = FirestoreTreeDeleter(self.db, page_size=batch_size, checkpoint=checkpoint).delete_document(doc_path)
+            logger.info(f"[DELETE] {doc_path}: {deleted} document(s) supprimé(s)")
             return True
         except Exception as e:
             print(f"Erreur suppression {doc_path}: {e}")
             return False
 
-    def _delete_collection_recursive(self, coll_ref, batch_size: int = 100):
-        while True:
-            docs = list(coll_ref.limit(batch_size).stream())
-            if not docs:
-                break
-            for d in docs:
-                # Sous-collections du document
-                for sub in d.reference.collections():
-                    self._delete_collection_recursive(sub, batch_size)
-                d.reference.delete()
+    def _delete_collection_recursive(self, coll_ref, batch_size: int = 500):
+        from .tools.bulk_deletion import FirestoreTreeDeleter
+
+        FirestoreTreeDeleter(self.db, page_size=batch_size).delete_collections([coll_ref])
 
 
     def delete_client_mandate(self, user_id, client_name, business_name):
@@ -9888,9 +9888,6 @@ class FirebaseManagement:
         Returns:
             bool: True si traitement réussi
         """
-        import uuid
-        from datetime import datetime, timezone
-
         try:
             # 1. Charger l'item depuis approval_pendinglist
             pending_path = f"{mandate_path}/approval_pendinglist/{item_id}"
@@ -9904,41 +9901,18 @@ class FirebaseManagement:
                 return False
 
             item_data = doc.to_dict()
-            context_payload = item_data.get("context_payload", {})
-
-            # Extraire les informations nécessaires
-            drive_file_id = context_payload.get("drive_file_id", "")
-            file_name = context_payload.get("file_name", "") or item_data.get("file_name", "")
 
             # Extraire company_id depuis mandate_path (format: bo_clients/{client}/mandates/{company})
-            path_parts = mandate_path.split("/")
-            company_id = path_parts[-1] if len(path_parts) >= 4 else ""
-            client_uuid = path_parts[1] if len(path_parts) >= 2 else ""
+            company_id, _ = self._approval_path_ids(mandate_path)
 
             # 2. Créer la notification avec approval_response_mode
-            batch_id = f"approval_batch_{uuid.uuid4().hex[:10]}"
             notification_path = f"clients/{user_id}/notifications"
-
-            notification_data = {
-                "job_id": item_id,
-                "file_id": drive_file_id,
-                "file_name": file_name,
-                "function_name": "Router",
-                "status": "in_queue",
-                "read": False,
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-                "collection_id": company_id,
-                "collection_name": company_id,
-                "batch_id": batch_id,
-                "approval_response_mode": True,  # ← Clé importante pour le jobbeur
-                "approval_status": "approved",
-                "selected_service": selected_service,
-                "selected_fiscal_year": selected_fiscal_year,
-                "instructions": instructions or "",
-                "user_id": user_id,
-                "client_uuid": client_uuid,
-                "mandates_path": mandate_path,
-            }
+            notification_data = self._build_approval_notification(
+                "router", mandate_path, item_id, item_data, user_id,
+                instructions=instructions,
+                selected_service=selected_service,
+                selected_fiscal_year=selected_fiscal_year,
+            )
 
             # Ajouter la notification
             notifications_ref = self.db.collection(notification_path)
@@ -10089,30 +10063,38 @@ class FirebaseManagement:
             department: Département source ("routing", "bank", "invoices")
         """
         try:
-            import json
             from .redis_client import get_redis
 
-            redis = get_redis()
-            channel = f"user:{user_id}/pending_approval"
-
-            from datetime import datetime, timezone as tz
-
-            payload = {
-                "type": f"pending_approval_{'deleted' if action == 'remove' else 'updated' if action == 'update' else 'created'}",
-                "action": action,
-                "department": department,
-                "job_id": item_id,
-                "company_id": company_id,
-                "data": data or {"id": item_id},
-                "timestamp": datetime.now(tz.utc).isoformat(),
-            }
-
-            redis.publish(channel, json.dumps(payload, default=str))
+            channel, message = self._pending_approval_message(
+                user_id, company_id, item_id, action, data, department
+            )
+            get_redis().publish(channel, message)
             logger.info(f"[REDIS] Published pending_approval to {channel}: action={action}, dept={department}")
 
         except Exception as e:
             logger.warning(f"[REDIS] Error publishing pending_approval: {e}")
 
+    @staticmethod
+    def _pending_approval_message(
+        user_id: str,
+        company_id: str,
+        item_id: str,
+        action: str,
+        data: dict = None,
+        department: str = "routing"
+    ) -> Tuple[str, str]:
+        """(canal, message JSON) d'un delta pending_approval."""
+        payload = {
+            "type": f"pending_approval_{'deleted' if action == 'remove' else 'updated' if action == 'update' else 'created'}",
+            "action": action,
+            "department": department,
+            "job_id": item_id,
+            "company_id": company_id,
+            "data": data or {"id": item_id},
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        }
+        return f"user:{user_id}/pending_approval", json.dumps(payload, default=str)
+
     # ─────────────────────────────────────────────────────────────
     # BANKER APPROVAL / REJECTION
     # ─────────────────────────────────────────────────────────────
@@ -10133,9 +10115,6 @@ class FirebaseManagement:
         3. Supprime l'item de approval_pendinglist
         4. Publie sur Redis pour mise à jour temps réel
         """
-        import uuid as uuid_mod
-        from datetime import datetime, timezone
-
         try:
             pending_path = f"{mandate_path}/approval_pendinglist/{item_id}"
             logger.info(f"[APPROVAL] Processing banker approval: {pending_path}")
@@ -10150,29 +10129,12 @@ class FirebaseManagement:
             item_data = doc.to_dict()
 
             # Extraire company_id depuis mandate_path
-            path_parts = mandate_path.split("/")
-            company_id = path_parts[-1] if len(path_parts) >= 4 else ""
-            client_uuid = path_parts[1] if len(path_parts) >= 2 else ""
+            company_id, _ = self._approval_path_ids(mandate_path)
 
             # 2. Créer la notification avec approval_response_mode
-            notification_data = {
-                "job_id": item_id,
-                "file_id": item_data.get("transaction_id", item_id),
-                "file_name": item_data.get("file_name", item_data.get("transaction_name", "")),
-                "function_name": "Bankbookeeper",
-                "status": "in_queue",
-                "read": False,
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-                "collection_id": company_id,
-                "collection_name": company_id,
-                "batch_id": item_data.get("batch_id", f"approval_batch_{uuid_mod.uuid4().hex[:10]}"),
-                "approval_response_mode": True,
-                "approval_status": "approved",
-                "instructions": instructions or "",
-                "user_id": user_id,
-                "client_uuid": client_uuid,
-                "mandates_path": mandate_path,
-            }
+            notification_data = self._build_approval_notification(
+                "banker", mandate_path, item_id, item_data, user_id, instructions=instructions,
+            )
 
             notification_path = f"clients/{user_id}/notifications"
             self.db.collection(notification_path).document(item_id).set(notification_data)
@@ -10298,8 +10260,7 @@ class FirebaseManagement:
         6. Publie un delta PENDING_APPROVAL_UPDATE action=remove
         """
         import json as json_mod
-        import uuid as uuid_mod
-        from datetime import datetime, timezone
+        from .redis_client import get_redis
 
         try:
             pending_path = f"{mandate_path}/approval_pendinglist/{item_id}"
@@ -10314,51 +10275,20 @@ class FirebaseManagement:
 
             item_data = doc.to_dict()
 
-            path_parts = mandate_path.split("/")
-            company_id = path_parts[-1] if len(path_parts) >= 4 else ""
-            client_uuid = path_parts[1] if len(path_parts) >= 2 else ""
+            company_id, _ = self._approval_path_ids(mandate_path)
 
             # 2. Merge updated_data into context_payload (PATCH mode)
             if updated_data:
-                ctx = item_data.get("context_payload", {})
-                # Merge invoice_details fields
-                if "invoice_details" in ctx and isinstance(updated_data, dict):
-                    invoice_edits = {
-                        k: v for k, v in updated_data.items()
-                        if k != "accounting_lines"
-                    }
-                    if invoice_edits:
-                        ctx["invoice_details"] = {**ctx.get("invoice_details", {}), **invoice_edits}
-                # Merge accounting_lines (full replace)
-                if "accounting_lines" in updated_data:
-                    ctx["accounting_lines"] = updated_data["accounting_lines"]
-                item_data["context_payload"] = ctx
+                self._merge_apbookeeper_updates(item_data, updated_data)
                 logger.info(f"[APPROVAL] Merged updated_data into context_payload for {item_id}")
 
             # 3. Créer la notification avec approval_response_mode
-            notification_data = {
-                "job_id": item_id,
-                "file_id": item_data.get("file_id", item_data.get("drive_file_id", item_id)),
-                "file_name": item_data.get("file_name", ""),
-                "function_name": "APbookeeper",
-                "status": "in_queue",
-                "read": False,
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-                "collection_id": company_id,
-                "collection_name": company_id,
-                "batch_id": item_data.get("batch_id", f"approval_batch_{uuid_mod.uuid4().hex[:10]}"),
-                "approval_response_mode": True,
-                "approval_status": "approved",
-                "approval_type": approval_type,
-                "instructions": instructions or "",
-                "user_id": user_id,
-                "client_uuid": client_uuid,
-                "mandates_path": mandate_path,
-            }
-
-            # Include the merged context_payload so the worker has updated data
-            if updated_data:
-                notification_data["context_payload"] = item_data.get("context_payload", {})
+            notification_data = self._build_approval_notification(
+                "apbookeeper", mandate_path, item_id, item_data, user_id,
+                instructions=instructions,
+                approval_type=approval_type,
+                include_context=bool(updated_data),
+            )
 
             notification_path = f"clients/{user_id}/notifications"
             self.db.collection(notification_path).document(item_id).set(notification_data)
@@ -10366,28 +10296,14 @@ class FirebaseManagement:
 
             # 4. Dispatch to worker via Redis queue
             try:
-                redis_client = self._get_redis()
-                if redis_client:
-                    dispatch_payload = {
-                        "job_id": item_id,
-                        "function_name": "APbookeeper",
-                        "mandate_path": mandate_path,
-                        "collection_id": company_id,
-                        "user_id": user_id,
-                        "client_uuid": client_uuid,
-                        "approval_response_mode": True,
-                        "approval_type": approval_type,
-                        "file_id": item_data.get("file_id", ""),
-                        "file_name": item_data.get("file_name", ""),
-                        "batch_id": notification_data["batch_id"],
-                        "context_payload": item_data.get("context_payload", {}),
-                        "instructions": instructions or "",
-                    }
-                    redis_client.lpush(
-                        "queue:agentic_dispatch",
-                        json_mod.dumps(dispatch_payload, default=str)
-                    )
-                    logger.info(f"[APPROVAL] Dispatched to queue:agentic_dispatch for {item_id}")
+                dispatch_payload = self._build_apbookeeper_dispatch(
+                    mandate_path, item_id, item_data, user_id, notification_data,
+                )
+                get_redis().lpush(
+                    APPROVAL_DISPATCH_QUEUE,
+                    json_mod.dumps(dispatch_payload, default=str)
+                )
+                logger.info(f"[APPROVAL] Dispatched to {APPROVAL_DISPATCH_QUEUE} for {item_id}")
             except Exception as redis_err:
                 logger.warning(f"[APPROVAL] Redis dispatch failed (notification still created): {redis_err}")
 
@@ -10486,6 +10402,330 @@ class FirebaseManagement:
             logger.error(f"[APPROVAL] Error processing apbookeeper rejection: {e}", exc_info=True)
             return False
 
+    # ─────────────────────────────────────────────────────────────
+    # APPROVAL BUILDERS (partagés unitaire / bulk)
+    # ─────────────────────────────────────────────────────────────
+
+    APPROVAL_FUNCTION_NAMES = {"router": "Router", "banker": "Bankbookeeper", "apbookeeper": "APbookeeper"}
+    APPROVAL_REDIS_DEPARTMENTS = {"router": "routing", "banker": "bank", "apbookeeper": "invoices"}
+
+    @staticmethod
+    def _approval_path_ids(mandate_path: str) -> Tuple[str, str]:
+        """(company_id, client_uuid) depuis bo_clients/{client}/mandates/{company}."""
+        path_parts = mandate_path.split("/")
+        company_id = path_parts[-1] if len(path_parts) >= 4 else ""
+        client_uuid = path_parts[1] if len(path_parts) >= 2 else ""
+        return company_id, client_uuid
+
+    @staticmethod
+    def _merge_apbookeeper_updates(item_data: dict, updated_data: dict) -> None:
+        """Merge updated_data dans item_data.context_payload (mode PATCH)."""
+        ctx = item_data.get("context_payload", {})
+        # Merge invoice_details fields
+        if "invoice_details" in ctx and isinstance(updated_data, dict):
+            invoice_edits = {
+                k: v for k, v in updated_data.items()
+                if k != "accounting_lines"
+            }
+            if invoice_edits:
+                ctx["invoice_details"] = {**ctx.get("invoice_details", {}), **invoice_edits}
+        # Merge accounting_lines (full replace)
+        if "accounting_lines" in updated_data:
+            ctx["accounting_lines"] = updated_data["accounting_lines"]
+        item_data["context_payload"] = ctx
+
+    def _build_approval_notification(
+        self,
+        department: str,
+        mandate_path: str,
+        item_id: str,
+        item_data: dict,
+        user_id: str,
+        instructions: str = None,
+        selected_service: str = "",
+        selected_fiscal_year: str = "",
+        approval_type: str = "invoice",
+        include_context: bool = False,
+    ) -> dict:
+        """
+        Notification approval_response_mode créée pour le jobbeur à l'approbation.
+
+        Args:
+            department: "router" | "banker" | "apbookeeper"
+            include_context: APBookkeeper - joint le context_payload modifié
+        """
+        company_id, client_uuid = self._approval_path_ids(mandate_path)
+        default_batch_id = f"approval_batch_{uuid.uuid4().hex[:10]}"
+
+        if department == "router":
+            context_payload = item_data.get("context_payload", {})
+            file_id = context_payload.get("drive_file_id", "")
+            file_name = context_payload.get("file_name", "") or item_data.get("file_name", "")
+            batch_id = default_batch_id
+        elif department == "banker":
+            file_id = item_data.get("transaction_id", item_id)
+            file_name = item_data.get("file_name", item_data.get("transaction_name", ""))
+            batch_id = item_data.get("batch_id", default_batch_id)
+        else:
+            file_id = item_data.get("file_id", item_data.get("drive_file_id", item_id))
+            file_name = item_data.get("file_name", "")
+            batch_id = item_data.get("batch_id", default_batch_id)
+
+        notification_data = {
+            "job_id": item_id,
+            "file_id": file_id,
+            "file_name": file_name,
+            "function_name": self.APPROVAL_FUNCTION_NAMES[department],
+            "status": "in_queue",
+            "read": False,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "collection_id": company_id,
+            "collection_name": company_id,
+            "batch_id": batch_id,
+            "approval_response_mode": True,  # ← Clé importante pour le jobbeur
+            "approval_status": "approved",
+            "instructions": instructions or "",
+            "user_id": user_id,
+            "client_uuid": client_uuid,
+            "mandates_path": mandate_path,
+        }
+        if department == "router":
+            notification_data["selected_service"] = selected_service
+            notification_data["selected_fiscal_year"] = selected_fiscal_year
+        elif department == "apbookeeper":
+            notification_data["approval_type"] = approval_type
+            if include_context:
+                notification_data["context_payload"] = item_data.get("context_payload", {})
+        return notification_data
+
+    def _build_apbookeeper_dispatch(
+        self,
+        mandate_path: str,
+        item_id: str,
+        item_data: dict,
+        user_id: str,
+        notification_data: dict,
+    ) -> dict:
+        """Payload queue:agentic_dispatch d'une approbation APBookkeeper."""
+        company_id, client_uuid = self._approval_path_ids(mandate_path)
+        return {
+            "job_id": item_id,
+            "function_name": "APbookeeper",
+            "mandate_path": mandate_path,
+            "collection_id": company_id,
+            "user_id": user_id,
+            "client_uuid": client_uuid,
+            "approval_response_mode": True,
+            "approval_type": notification_data.get("approval_type", "invoice"),
+            "file_id": item_data.get("file_id", ""),
+            "file_name": item_data.get("file_name", ""),
+            "batch_id": notification_data["batch_id"],
+            "context_payload": item_data.get("context_payload", {}),
+            "instructions": notification_data.get("instructions", ""),
+        }
+
+    # ─────────────────────────────────────────────────────────────
+    # BULK APPROVALS (get_all + WriteBatch + pipeline Redis)
+    # ─────────────────────────────────────────────────────────────
+
+    APPROVAL_BATCH_MAX_WRITES = 450  # Firestore: 500 opérations max par batch
+
+    def process_approvals_bulk(
+        self,
+        mandate_path: str,
+        department: str,
+        decisions: List[Dict[str, Any]],
+        user_id: str,
+    ) -> List[Dict[str, Any]]:
+        """
+        Applique un lot de décisions d'approbation d'un département.
+
+        Équivalent groupé de process_{router,banker,apbookeeper}_{approval,rejection}:
+        1. Une seule lecture get_all() des items et de leurs approval_context
+        2. Écritures (notification, suppression, statut rejeté) regroupées en
+           WriteBatch de ≤ APPROVAL_BATCH_MAX_WRITES opérations; les écritures
+           d'un item ne sont jamais réparties sur deux batches
+        3. Dispatch worker (APBookkeeper) et deltas pending_approval envoyés
+           en un seul pipeline Redis, pour les items effectivement commités
+
+        Une décision invalide ou un item dont la préparation échoue n'est
+        rapporté en erreur que pour lui-même; un batch dont le commit échoue
+        est rejoué item par item pour isoler l'item fautif.
+
+        Args:
+            mandate_path: Chemin du mandat
+            department: "router" | "banker" | "apbookeeper"
+            decisions: [{
+                "item_id", "approved", "instructions",
+                "selected_service", "selected_fiscal_year",     # router
+                "updated_data", "approval_type",                # apbookeeper
+                "rejection_reason", "close"                     # rejet
+            }]
+            user_id: ID de l'utilisateur Firebase
+
+        Returns:
+            [{"itemId": ..., "success": bool, "error": ...}] dans l'ordre des décisions
+        """
+        from .redis_client import get_redis
+
+        company_id, _ = self._approval_path_ids(mandate_path)
+        redis_department = self.APPROVAL_REDIS_DEPARTMENTS[department]
+        notifications = self.db.collection(f"clients/{user_id}/notifications")
+        errors: Dict[str, str] = {}
+
+        # 1. Lecture groupée (items + contextes); une seule décision par item
+        def _item_id(decision: Any) -> str:
+            return (decision.get("item_id") or "") if isinstance(decision, dict) else ""
+
+        decisions_by_id: Dict[str, Dict[str, Any]] = {}
+        for decision in decisions:
+            item_id = _item_id(decision)
+            if item_id:
+                decisions_by_id.setdefault(item_id, decision)
+        item_ids = list(decisions_by_id)
+
+        pending_refs = {i: self.db.document(f"{mandate_path}/approval_pendinglist/{i}") for i in item_ids}
+        context_refs = {i: self.db.document(f"{mandate_path}/approval_context/{i}") for i in item_ids}
+        snapshots = {}
+        if item_ids:
+            try:
+                for snap in self.db.get_all(list(pending_refs.values()) + list(context_refs.values())):
+                    snapshots[snap.reference.path] = snap
+            except Exception as e:
+                logger.error(f"[APPROVAL] Bulk read failed ({len(item_ids)} items): {e}")
+                errors.update((item_id, str(e)) for item_id in item_ids)
+                item_ids = []
+
+        # 2. Plan d'écriture par item
+        rejected_at = datetime.now(timezone.utc).isoformat()
+        plans: List[Tuple[str, list, list, Optional[dict]]] = []
+        for item_id in item_ids:
+            decision = decisions_by_id[item_id]
+            pending_ref, context_ref = pending_refs[item_id], context_refs[item_id]
+            snap = snapshots.get(pending_ref.path)
+            if snap is None or not snap.exists:
+                errors[item_id] = "Item not found"
+                continue
+            try:
+                context_snap = snapshots.get(context_ref.path)
+                context_exists = context_snap is not None and context_snap.exists
+
+                ops: list = []
+                publish: list = []
+                dispatch = None
+                if decision.get("approved"):
+                    item_data = snap.to_dict() or {}
+                    updated_data = decision.get("updated_data")
+                    if department == "apbookeeper" and updated_data:
+                        self._merge_apbookeeper_updates(item_data, updated_data)
+                    notification_data = self._build_approval_notification(
+                        department, mandate_path, item_id, item_data, user_id,
+                        instructions=decision.get("instructions"),
+                        selected_service=decision.get("selected_service", ""),
+                        selected_fiscal_year=decision.get("selected_fiscal_year", ""),
+                        approval_type=decision.get("approval_type") or "invoice",
+                        include_context=bool(updated_data),
+                    )
+                    ops.append(("set", notifications.document(item_id), notification_data))
+                    ops.append(("delete", pending_ref, None))
+                    if department == "apbookeeper":
+                        dispatch = self._build_apbookeeper_dispatch(
+                            mandate_path, item_id, item_data, user_id, notification_data
+                        )
+                    publish.append(("remove", None))
+                elif decision.get("close"):
+                    ops.append(("delete", pending_ref, None))
+                    publish.append(("remove", None))
+                else:
+                    rejection_reason = decision.get("rejection_reason", "")
+                    ops.append(("update", pending_ref, {
+                        "status": "rejected",
+                        "rejection_reason": rejection_reason,
+                        "instructions": decision.get("instructions") or "",
+                        "rejected_by": user_id,
+                        "rejected_at": rejected_at,
+                    }))
+                    publish.append(("update", {"status": "rejected", "rejection_reason": rejection_reason}))
+
+                if context_exists and (decision.get("approved") or decision.get("close")):
+                    ops.append(("delete", context_ref, None))
+                plans.append((item_id, ops, publish, dispatch))
+            except Exception as e:
+                logger.error(f"[APPROVAL] Bulk plan failed item={item_id}: {e}")
+                errors[item_id] = str(e)
+
+        # 3. Commits groupés
+        committed: List[Tuple[str, list, Optional[dict]]] = []
+        chunk: List[Tuple[str, list, list, Optional[dict]]] = []
+        writes = 0
+
+        def _commit(group) -> None:
+            batch = self.db.batch()
+            for _, ops, _, _ in group:
+                for op, ref, data in ops:
+                    if op == "set":
+                        batch.set(ref, data)
+                    elif op == "update":
+                        batch.update(ref, data)
+                    else:
+                        batch.delete(ref)
+            try:
+                batch.commit()
+                committed.extend((item_id, publish, dispatch) for item_id, _, publish, dispatch in group)
+            except Exception as e:
+                logger.error(f"[APPROVAL] Bulk batch commit failed ({len(group)} items): {e}")
+                if len(group) > 1:
+                    # Rejeu item par item: seul l'item fautif reste en échec
+                    for plan in group:
+                        _commit([plan])
+                    return
+                for item_id, _, _, _ in group:
+                    errors[item_id] = str(e)
+
+        for plan in plans:
+            if chunk and writes + len(plan[1]) > self.APPROVAL_BATCH_MAX_WRITES:
+                _commit(chunk)
+                chunk, writes = [], 0
+            chunk.append(plan)
+            writes += len(plan[1])
+        if chunk:
+            _commit(chunk)
+
+        # 4. Dispatch + deltas temps réel (un seul aller-retour Redis)
+        if committed:
+            try:
+                pipe = get_redis().pipeline(transaction=False)
+                for item_id, publish, dispatch in committed:
+                    if dispatch:
+                        pipe.lpush(APPROVAL_DISPATCH_QUEUE, json.dumps(dispatch, default=str))
+                    for action, data in publish:
+                        channel, message = self._pending_approval_message(
+                            user_id, company_id, item_id, action, data, redis_department
+                        )
+                        pipe.publish(channel, message)
+                pipe.execute()
+            except Exception as redis_err:
+                logger.warning(f"[APPROVAL] Bulk Redis dispatch/publish failed: {redis_err}")
+
+        logger.info(
+            f"[APPROVAL] Bulk {department} processed: committed={len(committed)} "
+            f"failed={len(errors)} mandate={mandate_path}"
+        )
+        results = []
+        for decision in decisions:
+            item_id = _item_id(decision)
+            if not item_id:
+                error = "Missing itemId"
+            elif decisions_by_id[item_id] is not decision:
+                error = "Duplicate decision"
+            else:
+                error = errors.get(item_id)
+            result = {"itemId": item_id, "success": error is None}
+            if error:
+                result["error"] = error
+            results.append(result)
+        return results
+
     # ════════════════════════════════════════════════════════════
     # Instruction Templates CRUD
     # Path: {mandate_path}/working_doc/instruction_templates/{page_name}/{template_id}
@@ -11054,6 +11294,218 @@ class FirebaseRealtimeChat:
         # Par défaut, utilisez 'job_chats'
         return f'{space_code}/job_chats/{thread_key}'
     
+    # ========== Index des threads ==========
+    #
+    # {space_code}/thread_index/{mode}/{thread_key} = {
+    #     thread_name, chat_mode, message_count, last_activity
+    # }
+    # Maintenu à chaque écriture passant par ce provider, il évite de
+    # télécharger tous les messages de tous les threads pour lister les
+    # sessions (get_all_threads / list_threads). Les écritures hors provider
+    # (worker, RTDB direct) sont rattrapées à la lecture: pour chaque thread
+    # de la page listée, le message le plus récent est comparé à l'entrée.
+
+    THREAD_INDEX_CHECK_CONCURRENCY = 8
+
+    def _get_thread_index_path(self, space_code: str, mode: str = 'job_chats') -> str:
+        """Chemin de l'index des threads d'un espace pour un mode."""
+        if mode not in ('chats', 'active_chats'):
+            mode = 'job_chats'
+        return f'{space_code}/thread_index/{mode}'
+
+    def _touch_thread_index(self, space_code: str, thread_key: str, mode: str, timestamp: Optional[str] = None, increment: int = 1) -> None:
+        """
+        Met à jour l'entrée d'index d'un thread après l'écriture d'un message.
+
+        Un seul PATCH: compteur incrémenté côté serveur (ServerValue.increment)
+        et last_activity. Ne doit jamais faire échouer l'envoi du message.
+        """
+        try:
+            entry_path = f'{self._get_thread_index_path(space_code, mode)}/{thread_key}'
+            self.db.child(entry_path).update({
+                'message_count': {'.sv': {'increment': increment}},
+                'last_activity': timestamp or datetime.now(timezone.utc).isoformat(),
+            })
+        except Exception as e:
+            logger.warning(f"⚠️ Index thread non mis à jour ({space_code}/{mode}/{thread_key}): {e}")
+
+    def touch_thread_index(self, space_code: str, thread_key: str, mode: str, timestamp: Optional[str] = None) -> None:
+        """Met à jour l'index après un message écrit directement dans la RTDB (hors provider)."""
+        self._touch_thread_index(space_code, thread_key, mode, timestamp)
+
+    def _get_thread_last_activity(self, space_code: str, thread_key: str, mode: str) -> str:
+        """
+        Timestamp du message le plus récent d'un thread ("" si aucun message).
+
+        L'ordre des clés ne suffit pas: les clés uuid (réponses de carte) sont
+        triées après tous les push IDs. On lit donc le dernier push ID et les
+        clés uuid (peu nombreuses), puis on compare les timestamps.
+        """
+        messages_ref = self.db.child(f'{self._get_thread_path(space_code, thread_key, mode)}/messages')
+        last = dict(messages_ref.order_by_key().end_at(self.PUSH_ID_END).limit_to_last(1).get() or {})
+        last.update(messages_ref.order_by_key().start_at(self.PUSH_ID_END).get() or {})
+        return self._get_last_activity(last)
+
+    def _thread_index_entry_is_stale(self, space_code: str, thread_key: str, mode: str, entry: dict) -> bool:
+        """
+        Une entrée est périmée si le message le plus récent du thread (par
+        timestamp) est plus récent que last_activity, ou si elle compte 0
+        message alors que le thread en contient (messages écrits hors provider).
+        """
+        last_activity = self._get_thread_last_activity(space_code, thread_key, mode)
+        if not last_activity:
+            return False
+        if not entry.get('message_count'):
+            return True
+        return last_activity > (entry.get('last_activity') or '')
+
+    def _build_thread_index_entry(self, space_code: str, thread_key: str, mode: str) -> dict:
+        """
+        Reconstruit l'entrée d'index d'un thread absent de l'index ou périmé
+        (thread créé ou alimenté hors de ce provider, ou antérieur à l'index).
+
+        Lectures ciblées: métadonnées, clés des messages (shallow) et
+        message le plus récent (voir _get_thread_last_activity).
+        """
+        thread_path = self._get_thread_path(space_code, thread_key, mode)
+        messages_ref = self.db.child(f'{thread_path}/messages')
+
+        message_keys = messages_ref.get(shallow=True) or {}
+        last_activity = ""
+        if message_keys:
+            last_activity = self._get_thread_last_activity(space_code, thread_key, mode)
+
+        return {
+            'thread_name': self.db.child(f'{thread_path}/thread_name').get() or thread_key,
+            'chat_mode': self.db.child(f'{thread_path}/chat_mode').get() or 'general_chat',
+            'message_count': len(message_keys) if isinstance(message_keys, dict) else 0,
+            'last_activity': last_activity,
+        }
+
+    def _persist_thread_index_patch(self, space_code: str, mode: str, patch: Dict[str, Optional[dict]]) -> None:
+        if not patch:
+            return
+        try:
+            self.db.child(self._get_thread_index_path(space_code, mode)).update(patch)
+            logger.info(f"📇 Index threads {space_code}/{mode} réconcilié ({len(patch)} entrée(s))")
+        except Exception as e:
+            logger.warning(f"⚠️ Échec persistance index threads {space_code}/{mode}: {e}")
+
+    def _load_thread_index(self, space_code: str, mode: str) -> Dict[str, Dict]:
+        """
+        Charge l'index des threads, réconcilié avec les clés des threads.
+
+        - Threads absents de l'index (ou sans métadonnées): entrée reconstruite puis persistée
+        - Entrées orphelines (thread supprimé hors provider): retirées
+
+        Les entrées périmées sont vérifiées par list_threads, pour la page
+        retournée uniquement.
+        """
+        index = self.db.child(self._get_thread_index_path(space_code, mode)).get() or {}
+        thread_keys = self.db.child(self._get_thread_path(space_code, '', mode).rstrip('/')).get(shallow=True) or {}
+
+        patch = {}
+        for thread_key in thread_keys:
+            # Entrée absente, ou créée par un simple incrément (sans métadonnées)
+            if not isinstance(index.get(thread_key), dict) or 'thread_name' not in index[thread_key]:
+                entry = self._build_thread_index_entry(space_code, thread_key, mode)
+                index[thread_key] = entry
+                patch[thread_key] = entry
+        for thread_key in [k for k in index if k not in thread_keys]:
+            del index[thread_key]
+            patch[thread_key] = None
+
+        self._persist_thread_index_patch(space_code, mode, patch)
+        return index
+
+    def _refresh_stale_thread_index_entries(self, space_code: str, mode: str, index: Dict[str, Dict], thread_keys: List[str]) -> Dict[str, dict]:
+        """
+        Vérifie les entrées données (messages écrits hors provider) et
+        reconstruit les périmées, en gardant la last_activity la plus récente.
+
+        Returns:
+            Dict[str, dict]: Entrées reconstruites (déjà reportées dans `index`)
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        def _check(thread_key: str) -> Optional[dict]:
+            try:
+                entry = index[thread_key]
+                if not self._thread_index_entry_is_stale(space_code, thread_key, mode, entry):
+                    return None
+                rebuilt = self._build_thread_index_entry(space_code, thread_key, mode)
+                rebuilt['last_activity'] = max(rebuilt['last_activity'], entry.get('last_activity') or '')
+                return rebuilt
+            except Exception as e:
+                logger.warning(f"⚠️ Vérification index thread {space_code}/{mode}/{thread_key}: {e}")
+                return None
+
+        refreshed = {}
+        if not thread_keys:
+            return refreshed
+        with ThreadPoolExecutor(max_workers=min(self.THREAD_INDEX_CHECK_CONCURRENCY, len(thread_keys))) as pool:
+            for thread_key, rebuilt in zip(thread_keys, pool.map(_check, thread_keys)):
+                if rebuilt is not None:
+                    index[thread_key] = rebuilt
+                    refreshed[thread_key] = rebuilt
+        return refreshed
+
+    def list_threads(self, space_code: str, mode: str = 'job_chats', limit: Optional[int] = None, before: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Liste les threads d'un espace depuis l'index, du plus récent au plus ancien.
+
+        Seules les entrées de la page retournée sont vérifiées contre les
+        messages (une lecture par thread de la page, pas par thread de l'espace).
+
+        Args:
+            space_code (str): Code de l'espace
+            mode (str): Mode de groupement ('job_chats', 'chats' ou 'active_chats')
+            limit (int, optional): Taille de la page
+            before (str, optional): Curseur "last_activity|thread_key" du dernier
+                thread de la page précédente (une last_activity seule est acceptée)
+
+        Returns:
+            Tuple[List[Dict], Optional[str]]: (threads, curseur de la page suivante ou None)
+        """
+        index = self._load_thread_index(space_code, mode)
+
+        bound = None
+        if before:
+            before_activity, _, before_key = before.partition('|')
+            bound = (before_activity, before_key)
+
+        def _thread(thread_key: str, entry: dict) -> Dict:
+            return {
+                'thread_key': thread_key,
+                'thread_name': entry.get('thread_name') or thread_key,
+                'chat_mode': entry.get('chat_mode') or 'general_chat',
+                'message_count': int(entry.get('message_count') or 0),
+                'last_activity': entry.get('last_activity') or '',
+            }
+
+        # Une entrée reconstruite peut changer de rang: on recalcule la page
+        # jusqu'à ce que toutes ses entrées aient été vérifiées
+        checked = set()
+        patch = {}
+        while True:
+            threads = [_thread(k, e) for k, e in index.items() if isinstance(e, dict)]
+            threads.sort(key=lambda t: (t['last_activity'], t['thread_key']), reverse=True)
+            if bound is not None:
+                threads = [t for t in threads if (t['last_activity'], t['thread_key']) < bound]
+            # Comme avant: un thread sans message n'est pas listé (une fois vérifié)
+            threads = [t for t in threads if t['message_count'] or t['thread_key'] not in checked]
+            page = threads[:limit] if limit else threads
+            pending = [t['thread_key'] for t in page if t['thread_key'] not in checked]
+            if not pending:
+                break
+            patch.update(self._refresh_stale_thread_index_entries(space_code, mode, index, pending))
+            checked.update(pending)
+
+        self._persist_thread_index_patch(space_code, mode, patch)
+        if limit and len(threads) > limit:
+            return page, f"{page[-1]['last_activity']}|{page[-1]['thread_key']}"
+        return page, None
+    
     def create_chat(self,user_id: str, space_code: str, thread_name: str, mode: str = 'chats', chat_mode: str = 'general_chat',thread_key:str=None) -> dict:
         """
         Crée un nouveau thread de chat dans Firebase Realtime Database.
@@ -11093,6 +11545,10 @@ class FirebaseRealtimeChat:
                     "created_by": user_id,
                 }
                 result = self.db.child(path).update(metadata)
+                self.db.child(f"{self._get_thread_index_path(space_code, mode)}/{thread_key}").update({
+                    "thread_name": thread_name,
+                    "chat_mode": chat_mode,
+                })
             else:
                 # New thread or empty thread — create with full structure
                 thread_data = {
@@ -11104,6 +11560,12 @@ class FirebaseRealtimeChat:
                     "messages": {}
                 }
                 result = self.db.child(path).set(thread_data)
+                self.db.child(f"{self._get_thread_index_path(space_code, mode)}/{thread_key}").set({
+                    "thread_name": thread_name,
+                    "chat_mode": chat_mode,
+                    "message_count": 0,
+                    "last_activity": thread_data["created_at"],
+                })
             
             # Vérifier si l'opération a réussi (Firebase renvoie None en cas de succès)
             success = result is None
@@ -11151,8 +11613,11 @@ class FirebaseRealtimeChat:
                 print(f"⚠️ Le thread {thread_key} n'existe pas")
                 return False
                 
-            # Supprimer le thread
+            # Supprimer le thread et son entrée d'index
             thread_ref.delete()
+            self.db.child(f"{self._get_thread_index_path(space_code, mode)}/{thread_key}").delete()
+            if mode == 'job_chats':
+                self._drop_job_replay_checkpoint(space_code, thread_key)
             print(f"✅ Chat {thread_key} supprimé avec succès")
             
             return True
@@ -11194,6 +11659,7 @@ class FirebaseRealtimeChat:
             
             # Mettre à jour le thread_name dans les métadonnées
             thread_ref.child("thread_name").set(new_name)
+            self.db.child(f"{self._get_thread_index_path(space_code, mode)}/{thread_key}").update({"thread_name": new_name})
             print(f"✅ Chat {thread_key} renommé avec succès en '{new_name}'")
             
             return True
@@ -11246,6 +11712,8 @@ class FirebaseRealtimeChat:
         """
         Récupère tous les threads disponibles dans un espace spécifique.
         
+        Lit l'index des threads (voir list_threads), sans télécharger les messages.
+        
         Args:
             space_code (str): Code de l'espace (typiquement le companies_search_id)
             mode (str): Mode de groupement ('job_chats' ou 'chats')
@@ -11257,35 +11725,9 @@ class FirebaseRealtimeChat:
         try:
             print(f"📚 Récupération de tous les threads pour l'espace: {space_code}, mode: {mode}")
             
-            # Référence au dossier contenant les threads selon le mode
-            if mode == 'chats':
-                threads_ref = self.db.child(f'{space_code}/chats')
-            elif mode == 'active_chats':
-                threads_ref = self.db.child(f'{space_code}/active_chats')
-            else:  # job_chats par défaut
-                threads_ref = self.db.child(f'{space_code}/job_chats')
-            
-            # Récupérer tous les nœuds enfants qui sont des threads
-            threads = threads_ref.get()
-            
-            if not threads:
-                print("ℹ️ Aucun thread trouvé dans cet espace")
-                return {}
-            
-            # Filtrer pour ne garder que les threads (ignorer les potentiels autres nœuds)
-            valid_threads = {}
-            for thread_key, thread_data in threads.items():
-                # Vérifier que c'est bien un thread (il devrait contenir un nœud 'messages')
-                if isinstance(thread_data, dict) and 'messages' in thread_data:
-                    # Ajouter des méta-informations utiles
-                    thread_info = {
-                        'thread_key': thread_key,
-                        'thread_name': thread_data.get('thread_name', thread_key),
-                        'chat_mode': thread_data.get('chat_mode', 'general_chat'),  # ✅ Récupérer le chat_mode
-                        'message_count': len(thread_data.get('messages', {})),
-                        'last_activity': self._get_last_activity(thread_data.get('messages', {}))
-                    }
-                    valid_threads[thread_key] = thread_info
+            # Lecture de l'index uniquement (pas des messages)
+            threads, _ = self.list_threads(space_code, mode)
+            valid_threads = {thread['thread_key']: thread for thread in threads}
             
             print(f"✅ {len(valid_threads)} threads récupérés")
             return valid_threads
@@ -11298,7 +11740,7 @@ class FirebaseRealtimeChat:
             print("  Traceback:")
             print(traceback.format_exc())
             return {}
-    def get_thread_messages(self, space_code: str, thread_key: str, mode: str = 'chats', limit: int = 100) -> List[Dict]:
+    def get_thread_messages(self, space_code: str, thread_key: str, mode: str = 'chats', limit: int = 100, before: Optional[str] = None) -> List[Dict]:
         """
         Récupère les messages d'un thread spécifique.
 
@@ -11307,10 +11749,46 @@ class FirebaseRealtimeChat:
             thread_key (str): Clé du thread
             mode (str): Mode de groupement ('job_chats' ou 'chats')
             limit (int): Nombre maximum de messages à récupérer
+            before (str, optional): message_id curseur, pour charger les messages plus anciens
 
         Returns:
             List[Dict]: Liste des messages triés par timestamp
         """
+        messages_list, _ = self.get_thread_messages_window(space_code, thread_key, mode, limit, before)
+        return messages_list
+
+    # Borne haute des push IDs (tous préfixés par "-"): les clés non
+    # chronologiques (uuid des réponses de carte) sont triées après elle.
+    PUSH_ID_END = "-\uf8ff"
+
+    def get_thread_messages_window(
+        self,
+        space_code: str,
+        thread_key: str,
+        mode: str = 'chats',
+        limit: int = 100,
+        before: Optional[str] = None,
+        ) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Récupère une fenêtre de messages côté serveur (orderByKey + limitToLast).
+
+        Les push IDs Firebase étant chronologiques, seule la fenêtre visible
+        est transférée, quelle que soit la taille de l'historique. Les clés
+        non chronologiques (uuid) sont lues à part et placées selon leur
+        timestamp: une ancienne réponse de carte ne remonte pas dans la
+        dernière fenêtre.
+
+        Args:
+            space_code (str): Code de l'espace
+            thread_key (str): Clé du thread
+            mode (str): Mode de groupement ('job_chats', 'chats' ou 'active_chats')
+            limit (int): Taille de la fenêtre (0/None = tous les messages)
+            before (str, optional): message_id (push ID) exclu, borne haute de la fenêtre ("charger plus ancien")
+
+        Returns:
+            Tuple[List[Dict], Optional[str]]: (messages triés par timestamp,
+            curseur pour la fenêtre précédente ou None s'il n'y en a plus)
+        """
         try:
             print(f"📨 Récupération des messages pour thread: {thread_key}, mode: {mode}")
 
@@ -11318,34 +11796,107 @@ class FirebaseRealtimeChat:
             thread_path = self._get_thread_path(space_code, thread_key, mode)
             messages_ref = self.db.child(f'{thread_path}/messages')
 
-            # Récupérer les messages
-            messages_data = messages_ref.get()
+            # Push IDs: fenêtre côté serveur
+            query = messages_ref.order_by_key().end_at(before or self.PUSH_ID_END)
+            if limit:
+                # +1 pour savoir s'il reste des messages, +1 pour le curseur (borne inclusive)
+                query = query.limit_to_last(limit + 1 + (1 if before else 0))
+            push_data = query.get() or {}
 
-            if not messages_data:
+            # Clés non chronologiques: peu nombreuses, filtrées par timestamp
+            late_data = messages_ref.order_by_key().start_at(self.PUSH_ID_END).get() or {}
+
+            if not push_data and not late_data:
                 print("ℹ️ Aucun message trouvé dans ce thread")
-                return []
+                return [], None
+
+            upper_ts = None
+            if before:
+                cursor_msg = push_data.pop(before, None)
+                upper_ts = cursor_msg.get('timestamp', '') if isinstance(cursor_msg, dict) else None
 
             # Convertir en liste avec les IDs
-            messages_list = []
-            for msg_id, msg_data in messages_data.items():
+            push_messages = []
+            for msg_id, msg_data in push_data.items():
                 if isinstance(msg_data, dict):
                     msg_data['message_id'] = msg_id
-                    messages_list.append(msg_data)
+                    push_messages.append(msg_data)
+            late_messages = []
+            for msg_id, msg_data in late_data.items():
+                if isinstance(msg_data, dict):
+                    msg_data['message_id'] = msg_id
+                    late_messages.append(msg_data)
+            if before:
+                # Fenêtre plus ancienne: seulement ce qui précède le curseur
+                # (curseur disparu: les clés uuid ne sont pas rattachables)
+                late_messages = [
+                    m for m in late_messages
+                    if upper_ts is not None and m.get('timestamp', '') < upper_ts
+                ]
 
             # Trier par timestamp (plus ancien en premier)
-            messages_list.sort(key=lambda x: x.get('timestamp', ''))
+            def _order(m):
+                return (m.get('timestamp', ''), m['message_id'])
 
-            # Limiter le nombre de messages
+            messages_list = sorted(push_messages + late_messages, key=_order)
+            push_truncated = bool(limit) and len(push_messages) > limit
+
+            next_cursor = None
             if limit and len(messages_list) > limit:
-                messages_list = messages_list[-limit:]  # Garder les plus récents
+                # Le curseur doit être un push ID: la fenêtre s'étend
+                # jusqu'au push ID qui précède ses clés uuid les plus anciennes
+                start = len(messages_list) - limit
+                while start > 0 and messages_list[start]['message_id'] >= self.PUSH_ID_END:
+                    start -= 1
+                cursor_msg = messages_list[start]
+                if cursor_msg['message_id'] < self.PUSH_ID_END:
+                    cursor = cursor_msg['message_id']
+                    window = [
+                        m for m in messages_list
+                        if (m['message_id'] >= cursor if m['message_id'] < self.PUSH_ID_END
+                            else _order(m) >= _order(cursor_msg))
+                    ]
+                    if push_truncated or len(window) < len(messages_list):
+                        next_cursor = cursor
+                    messages_list = window
 
             print(f"✅ {len(messages_list)} messages récupérés")
-            return messages_list
+            return messages_list, next_cursor
 
         except Exception as e:
             print(f"❌ Erreur lors de la récupération des messages: {e}")
             import traceback
             traceback.print_exc()
+            return [], None
+
+    def get_thread_messages_after(self, space_code: str, thread_key: str, mode: str = 'job_chats', after: Optional[str] = None) -> List[Dict]:
+        """
+        Récupère les messages postérieurs à un message_id (orderByKey + startAt).
+
+        Utilisé pour les rejeux incrémentaux (checkpoint): seuls les messages
+        nouveaux depuis `after` sont transférés.
+
+        Returns:
+            List[Dict]: Messages (avec message_id) triés par timestamp
+        """
+        try:
+            thread_path = self._get_thread_path(space_code, thread_key, mode)
+            query = self.db.child(f'{thread_path}/messages').order_by_key()
+            if after:
+                query = query.start_at(after)
+
+            messages_data = query.get() or {}
+
+            messages_list = []
+            for msg_id, msg_data in messages_data.items():
+                if msg_id != after and isinstance(msg_data, dict):
+                    msg_data['message_id'] = msg_id
+                    messages_list.append(msg_data)
+            messages_list.sort(key=lambda x: x.get('timestamp', ''))
+            return messages_list
+
+        except Exception as e:
+            print(f"❌ Erreur lors de la récupération des nouveaux messages: {e}")
             return []
 
     def _get_last_activity(self, messages: Dict) -> str:
@@ -11425,6 +11976,7 @@ class FirebaseRealtimeChat:
             
             # Envoyer le message
             messages_ref.push(message_data)
+            self._touch_thread_index(space_code, thread_key, mode, message_data['timestamp'])
             print(f"Action speeddial {action} envoyée avec succès")
             return True
 
@@ -11432,6 +11984,15 @@ class FirebaseRealtimeChat:
             print(f"Erreur lors de l'envoi de l'action speeddial: {e}")
             return False
 
+    def _drop_job_replay_checkpoint(self, space_code: str, thread_key: str) -> None:
+        """Supprime le checkpoint Redis du rejeu job_chats (messages effacés)."""
+        try:
+            from .redis_client import get_redis
+            from .llm_service.redis_namespaces import build_job_replay_key
+            get_redis().delete(build_job_replay_key(space_code, thread_key))
+        except Exception as e:
+            print(f"⚠️ Checkpoint de rejeu job_chats non supprimé pour {thread_key}: {e}")
+
     def erase_chat(self, space_code: str, thread_key: str, mode: str = 'job_chats') -> bool:
         """
         Supprime tous les messages d'un canal spécifique.
@@ -11453,6 +12014,9 @@ class FirebaseRealtimeChat:
             # Obtenir la référence au nœud des messages
             thread_path = self._get_thread_path(space_code, thread_key, mode)
             messages_ref = self.db.child(f'{thread_path}/messages')
+
+            if mode == 'job_chats':
+                self._drop_job_replay_checkpoint(space_code, thread_key)
             
             # Vérifier si le nœud existe
             if messages_ref.get() is None:
@@ -11465,6 +12029,7 @@ class FirebaseRealtimeChat:
             
             # Recréer le nœud des messages vide pour maintenir la structure
             messages_ref.set({})
+            self.db.child(f"{self._get_thread_index_path(space_code, mode)}/{thread_key}/message_count").set(0)
             print("✅ Structure du canal réinitialisée")
             
             return True
@@ -11673,6 +12238,7 @@ class FirebaseRealtimeChat:
             thread_path = self._get_thread_path(space_code, thread_key, mode)
             messages_ref = self.db.child(f'{thread_path}/messages')
             messages_ref.push(message_data)
+            self._touch_thread_index(space_code, thread_key, mode, message_data['timestamp'])
             
             print(f"Liste d'outils envoyée: {tool_names}")
             return True
@@ -11713,6 +12279,7 @@ class FirebaseRealtimeChat:
                 # Structure spécifique pour les cartes cliquées
                 messages_ref = self.db.child(f'{thread_path}/messages')
                 messages_ref.push(message_data)
+                self._touch_thread_index(space_code, thread_key, mode, (message_data or {}).get('timestamp'))
                 return True
             else:
                 if not message_data:
@@ -11728,6 +12295,7 @@ class FirebaseRealtimeChat:
                 messages_ref = self.db.child(f'{thread_path}/messages')
                 print(f"Envoi vers le chemin: {thread_path}/messages")
                 messages_ref.push(message_data)
+                self._touch_thread_index(space_code, thread_key, mode, message_data.get('timestamp'))
                 return True
         except Exception as e:
             print(f"Erreur lors de l'envoi du message structuré: {e}")
@@ -0,0 +1,242 @@
+"""
+Firebase ID Token Verifier - Shared, cached verification of Firebase ID tokens.
+
+Every WebSocket auth (auth.firebase_token) and every upload request used to
+call firebase_auth.verify_id_token() synchronously on the event loop: RS256
+signature check plus certificate handling, once per request. Reconnect storms
+after a deploy turn this into a CPU hotspot.
+
+Strategy:
+    - Verification runs off-loop (asyncio.to_thread)
+    - Decoded claims are cached by SHA-256 of the token until the token's
+      "exp" claim, in a bounded LRU (the raw token is never stored)
+    - Concurrent checks of the same token share a single verification,
+      run in its own task: a cancelled caller (WS disconnect) does not
+      cancel it for the others
+    - Google's public keys are pre-warmed at startup and refreshed in the
+      background, so a request never pays for the certificate download
+
+Errors raised by firebase_admin (InvalidIdTokenError, ExpiredIdTokenError,
+...) propagate unchanged; failures are never cached.
+
+Usage:
+    from app.firebase_token_verifier import get_token_verifier
+
+    claims = await get_token_verifier().verify(token)
+    uid = claims["uid"]
+"""
+
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger("firebase_token_verifier")
+
+CLOCK_SKEW_SECONDS = 5
+
+# Public URL of the ID token signing certificates (JWKS-like x509 map)
+ID_TOKEN_CERT_URI = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+
+# firebase-admin version whose private internals _fetch_public_keys relies on
+# (pinned in requirements.txt). Any other version fetches the keys directly.
+FIREBASE_ADMIN_INTERNALS_VERSION = "6.5.0"
+
+VerifyFunc = Callable[[str], Dict[str, Any]]
+
+
+def _verify_with_firebase(token: str) -> Dict[str, Any]:
+    """Full verification through the Firebase Admin SDK (blocking)."""
+    from firebase_admin import auth as firebase_auth
+    from .firebase_client import get_firebase_app
+
+    return firebase_auth.verify_id_token(
+        token,
+        app=get_firebase_app(),
+        clock_skew_seconds=CLOCK_SKEW_SECONDS,
+    )
+
+
+def _fetch_public_keys() -> int:
+    """
+    Fetch Google's ID token signing keys.
+
+    On the pinned firebase-admin version, the keys go through the SDK's own
+    cache-control aware transport (private internals), so later
+    verifications hit its cache. On any other version, or if those
+    internals moved, the certificates are fetched directly from the public
+    URL: no pre-warm, but rotation failures are still reported.
+
+    Returns:
+        Number of keys currently published.
+    """
+    import firebase_admin
+
+    if firebase_admin.__version__ == FIREBASE_ADMIN_INTERNALS_VERSION:
+        try:
+            from firebase_admin import auth as firebase_auth
+            from google.oauth2 import id_token
+            from .firebase_client import get_firebase_app
+
+            client = firebase_auth._get_client(get_firebase_app())
+            return len(id_token._fetch_certs(client._token_verifier.request, ID_TOKEN_CERT_URI))
+        except (ImportError, AttributeError) as e:
+            logger.warning(f"[AUTH_VERIFIER] SDK key cache unavailable, fetching keys directly: {e}")
+
+    import requests
+
+    response = requests.get(ID_TOKEN_CERT_URI, timeout=10)
+    response.raise_for_status()
+    return len(response.json())
+
+
+class FirebaseTokenVerifier:
+    """Verified-claims cache in front of firebase_auth.verify_id_token."""
+
+    KEY_REFRESH_SECONDS = 3600
+    KEY_RETRY_SECONDS = 60
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        verify_func: Optional[VerifyFunc] = None,
+        key_fetcher: Optional[Callable[[], int]] = None,
+    ):
+        self.max_entries = max_entries
+        self._verify_func = verify_func or _verify_with_firebase
+        self._key_fetcher = key_fetcher or _fetch_public_keys
+        # sha256(token) → (claims, exp)
+        self._cache: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.stats = {"hits": 0, "misses": 0, "verifications": 0}
+
+    # ═══════════════════════════════════════════════════════════════
+    # VERIFICATION
+    # ═══════════════════════════════════════════════════════════════
+
+    async def verify(self, token: str) -> Dict[str, Any]:
+        """
+        Decoded claims of a valid Firebase ID token.
+
+        Raises:
+            ValueError: Empty token.
+            firebase_admin.auth.InvalidIdTokenError: Invalid token.
+            firebase_admin.auth.ExpiredIdTokenError: Expired token.
+        """
+        if not token:
+            raise ValueError("Missing Firebase ID token")
+
+        key = hashlib.sha256(token.encode()).hexdigest()
+        claims = self._get_cached(key)
+        if claims is not None:
+            self.stats["hits"] += 1
+            return dict(claims)
+
+        self.stats["misses"] += 1
+        task = self._inflight.get(key)
+        if task is None:
+            self.stats["verifications"] += 1
+            task = asyncio.ensure_future(self._verify_and_store(key, token))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._verification_done(k, t))
+        # shield: cancelling one caller never cancels the shared verification
+        return dict(await asyncio.shield(task))
+
+    async def _verify_and_store(self, key: str, token: str) -> Dict[str, Any]:
+        claims = await asyncio.to_thread(self._verify_func, token)
+        self._store(key, claims)
+        return claims
+
+    def _verification_done(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark retrieved: if every caller was cancelled, nobody re-raises it
+            task.exception()
+
+    def invalidate(self, token: str) -> None:
+        """Forget a token (e.g. on logout)."""
+        with self._lock:
+            self._cache.pop(hashlib.sha256(token.encode()).hexdigest(), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    # ═══════════════════════════════════════════════════════════════
+    # PUBLIC KEYS (pre-warm + rotation)
+    # ═══════════════════════════════════════════════════════════════
+
+    async def start(self) -> None:
+        """Pre-warm the signing keys and keep them fresh in the background."""
+        if self._refresh_task and not self._refresh_task.done():
+            return
+        self._refresh_task = asyncio.create_task(self._refresh_keys_loop())
+
+    async def stop(self) -> None:
+        if self._refresh_task:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    async def refresh_keys(self) -> bool:
+        try:
+            count = await asyncio.to_thread(self._key_fetcher)
+            logger.info(f"[AUTH_VERIFIER] Public keys refreshed ({count} keys)")
+            return True
+        except Exception as e:
+            logger.warning(f"[AUTH_VERIFIER] Public key refresh failed: {e}")
+            return False
+
+    async def _refresh_keys_loop(self) -> None:
+        while True:
+            ok = await self.refresh_keys()
+            await asyncio.sleep(self.KEY_REFRESH_SECONDS if ok else self.KEY_RETRY_SECONDS)
+
+    # ═══════════════════════════════════════════════════════════════
+    # INTERNALS
+    # ═══════════════════════════════════════════════════════════════
+
+    def _get_cached(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            claims, exp = entry
+            if exp <= time.time():
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return claims
+
+    def _store(self, key: str, claims: Dict[str, Any]) -> None:
+        try:
+            exp = float(claims.get("exp") or 0)
+        except (TypeError, ValueError):
+            exp = 0
+        if exp <= time.time():
+            return
+        with self._lock:
+            self._cache[key] = (claims, exp)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+
+_verifier: Optional[FirebaseTokenVerifier] = None
+
+
+def get_token_verifier() -> FirebaseTokenVerifier:
+    """Singleton of the shared Firebase ID token verifier."""
+    global _verifier
+    if _verifier is None:
+        _verifier = FirebaseTokenVerifier()
+    return _verifier
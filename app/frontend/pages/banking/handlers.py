@@ -14,8 +14,10 @@ IMPORTANT: This handler uses the CENTRAL BUSINESS CACHE (firebase_cache_handlers
            to ensure consistency with Dashboard metrics.
 
 Cache Strategy:
-    - Transactions (to_process, in_process, pending, processed): from firebase_cache_handlers.get_bank_transactions()
+    - Transactions (to_process, in_process, pending): from firebase_cache_handlers.get_bank_transactions()
       → business:{uid}:{cid}:bank
+    - Processed: maintained projection (app.cache.bank_processed_projection)
+      → business:{uid}:{cid}:bank:processed (updated by RedisSubscriber task_manager events)
     - After any action (process/stop/delete): invalidate central cache
 
 Endpoints:
@@ -38,6 +40,8 @@ import logging
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
+from app.cache.bank_processed_projection import BankProcessedProjection, get_bank_processed_projection
+from app.cache.list_query import ListQuery, get_list_query_engine
 from app.cache.unified_cache_manager import get_firebase_cache_manager
 from app.firebase_providers import get_firebase_management
 from app.firebase_cache_handlers import get_firebase_cache_handlers
@@ -53,6 +57,12 @@ TTL_BANKING_LIST = 60           # 1 minute pour liste de transactions
 TTL_BANKING_FULL = 120          # 2 minutes pour donnees completes
 TTL_BANKING_ACCOUNTS = 300      # 5 minutes pour comptes bancaires
 
+# Champs indexés pour la recherche BANKING.list
+SEARCH_FIELDS = (
+    "description", "reference", "partner_name",
+    "account_name", "transaction_id", "payment_ref",
+)
+
 # ===============================================
 # SINGLETON
 # ===============================================
@@ -287,71 +297,42 @@ class BankingHandlers:
 
             from_cache = bank_result.get("source") == "cache"
             bank_data = bank_result.get("data", {})
-
-            # All categories now use universal names
-            to_process = bank_data.get("to_process", [])
-            in_process = bank_data.get("in_process", [])
-            pending = bank_data.get("pending", [])
-
-            # Format transactions for UI
-            to_process = [self._format_transaction(tx) for tx in to_process]
-            in_process = [self._format_transaction(tx) for tx in in_process]
-            pending = [self._format_transaction(tx) for tx in pending]
-
-            # Apply account filter if specified
-            if account_id:
-                to_process = [tx for tx in to_process if tx.get('account_id') == account_id]
-                in_process = [tx for tx in in_process if tx.get('account_id') == account_id]
-                pending = [tx for tx in pending if tx.get('account_id') == account_id]
+            version = bank_result.get("cached_at")
+
+            # All categories now use universal names.
+            # Formatting + account filter run only when the list-query index for
+            # this cache version is (re)built, not on every page request.
+            def _loader(cat: str):
+                def load() -> List[Dict[str, Any]]:
+                    items = [self._format_transaction(tx) for tx in bank_data.get(cat, [])]
+                    if account_id:
+                        items = [tx for tx in items if tx.get('account_id') == account_id]
+                    return items
+                return load
 
             logger.info(
                 f"[BANKING] Transactions from central cache: "
-                f"to_process={len(to_process)}, in_process={len(in_process)}, "
-                f"pending={len(pending)}, source={bank_result.get('source')}"
+                f"to_process={len(bank_data.get('to_process', []))}, "
+                f"in_process={len(bank_data.get('in_process', []))}, "
+                f"pending={len(bank_data.get('pending', []))}, source={bank_result.get('source')}"
             )
 
             # ═══════════════════════════════════════════════════════════════
-            # STEP 2: Fetch PROCESSED transactions from journal (separate source)
-            # Processed transactions are reconciled and stored in journal, not in
-            # the central bank cache. This is intentional - they are a different
-            # data source.
+            # STEP 2: PROCESSED transactions from the maintained projection
+            # Processed transactions are reconciled and stored in task_manager,
+            # not in the central bank cache. The projection
+            # (business:{uid}:{cid}:bank:processed) is built from Firestore once,
+            # then kept up to date by RedisSubscriber task_manager events.
             # ═══════════════════════════════════════════════════════════════
-            processed = []
-            batches = []
-
+            projection = get_bank_processed_projection()
             if category == "all" or category == "processed":
-                firebase_mgmt = get_firebase_management()
-                matched_docs = await asyncio.to_thread(
-                    firebase_mgmt.fetch_journal_entries_by_mandat_id_without_source,
-                    user_id,
-                    company_id,
-                    'Bankbookeeper'
+                processed_version = await self._ensure_processed_projection(
+                    projection, user_id, company_id, force_refresh=force_refresh
                 )
-
-                if matched_docs and isinstance(matched_docs, list):
-                    for doc in matched_docs:
-                        doc_data = doc.get('data', {}) if isinstance(doc, dict) else {}
-                        status = doc_data.get('status', '')
-                        if status in ['matched', 'completed', 'success', 'close']:
-                            # Filter by account if specified
-                            if account_id and doc_data.get('account_id') != account_id:
-                                continue
-                            processed.append({
-                                "id": doc.get('firebase_doc_id', ''),
-                                "transaction_id": doc_data.get('transaction_id', ''),
-                                "job_id": doc_data.get('job_id', ''),
-                                "account_id": doc_data.get('account_id', ''),
-                                "account_name": doc_data.get('account_name', ''),
-                                "date": doc_data.get('date', ''),
-                                "description": doc_data.get('description', ''),
-                                "reference": doc_data.get('reference', ''),
-                                "partner_name": doc_data.get('partner_name', ''),
-                                "amount": float(doc_data.get('amount', 0) or 0),
-                                "currency": doc_data.get('currency', 'CHF'),
-                                "status": 'processed',
-                                "matched_invoice": doc_data.get('matched_invoice', ''),
-                                "timestamp": str(doc_data.get('timestamp', '')),
-                            })
+            else:
+                # Other tabs only need the count: never build from Firestore here
+                processed_version = projection.get_version(user_id, company_id)
+            batches = []
 
             # ═══════════════════════════════════════════════════════════════
             # STEP 3: Compute active batches on-the-fly from in_process
@@ -360,7 +341,9 @@ class BankingHandlers:
             # ═══════════════════════════════════════════════════════════════
             if category == "all" or category == "in_process":
                 batches_map = {}
-                for tx in in_process:
+                for tx in bank_data.get("in_process", []):
+                    if account_id and str(tx.get('journal_id', tx.get('account_id', ''))) != account_id:
+                        continue
                     bid = tx.get("batch_id", "")
                     if bid:
                         batches_map.setdefault(bid, []).append(tx)
@@ -374,28 +357,38 @@ class BankingHandlers:
                     })
 
             # ═══════════════════════════════════════════════════════════════
-            # STEP 4: Build result
+            # STEP 4: Build result (requested page only)
+            # Sort / token indexes are built once per cache version (cached_at,
+            # projection version for processed).
             # ═══════════════════════════════════════════════════════════════
-            data = {
-                "to_process": to_process,
-                "in_process": in_process,
-                "pending": pending,
-                "processed": processed,
-                "batches": batches,
-                "counts": {
-                    "to_process": len(to_process),
-                    "in_process": len(in_process),
-                    "pending": len(pending),
-                    "processed": len(processed),
-                }
-            }
-
-            # Apply pagination/filtering and return
-            return self._apply_filters(
-                data, page, page_size, search, sort_column, sort_direction,
-                from_cache=from_cache
+            categories = {cat: _loader(cat) for cat in ("to_process", "in_process", "pending")}
+            categories["processed"] = (
+                (lambda: projection.get_entries(user_id, company_id, account_id))
+                if processed_version is not None else []
+            )
+            versions = {cat: version for cat in ("to_process", "in_process", "pending")}
+            versions["processed"] = processed_version
+
+            result = get_list_query_engine().query(
+                scope=("bank", user_id, company_id, account_id or ""),
+                categories=categories,
+                versions=versions,
+                query=ListQuery(category, page, page_size, search, sort_column, sort_direction),
+                search_fields=SEARCH_FIELDS,
             )
 
+            return {
+                "success": True,
+                "data": {
+                    **result["items"],
+                    "batches": batches,
+                    "counts": result["counts"],
+                    "totals": result["totals"],
+                    "pagination": result["pagination"],
+                },
+                "from_cache": from_cache,
+            }
+
         except Exception as e:
             logger.error(f"[BANKING] list_transactions error: {e}", exc_info=True)
             return {
@@ -403,6 +396,36 @@ class BankingHandlers:
                 "error": {"code": "BANKING_LIST_ERROR", "message": str(e)}
             }
 
+    async def _ensure_processed_projection(
+        self,
+        projection: BankProcessedProjection,
+        user_id: str,
+        company_id: str,
+        force_refresh: bool = False,
+    ) -> Optional[str]:
+        """
+        Return the processed projection version, building it if absent.
+
+        The Firestore read (full Bankbookeeper task_manager stream) only runs
+        on first access, after expiry, or on explicit refresh.
+        """
+        version = None if force_refresh else projection.get_version(user_id, company_id)
+        if version is not None:
+            return version
+
+        firebase_mgmt = get_firebase_management()
+        matched_docs = await asyncio.to_thread(
+            firebase_mgmt.fetch_journal_entries_by_mandat_id_without_source,
+            user_id,
+            company_id,
+            'Bankbookeeper'
+        )
+        if matched_docs is None:
+            # Fetch error: do not persist an empty projection
+            return None
+        projection.rebuild(user_id, company_id, matched_docs)
+        return projection.get_version(user_id, company_id)
+
     def _format_transaction(self, tx: Dict[str, Any]) -> Dict[str, Any]:
         """
         Format a transaction from central cache for UI.
@@ -434,34 +457,6 @@ class BankingHandlers:
             }
         return {}
 
-    def _apply_filters(
-        self,
-        data: Dict[str, Any],
-        page: int,
-        page_size: int,
-        search: Optional[str],
-        sort_column: Optional[str],
-        sort_direction: str,
-        from_cache: bool
-    ) -> Dict[str, Any]:
-        """Apply search, sort, and pagination to transaction data."""
-        total_items = sum(data["counts"].values())
-        total_pages = (total_items + page_size - 1) // page_size if page_size > 0 else 1
-
-        return {
-            "success": True,
-            "data": {
-                **data,
-                "pagination": {
-                    "page": page,
-                    "pageSize": page_size,
-                    "totalPages": total_pages,
-                    "totalItems": total_items,
-                }
-            },
-            "from_cache": from_cache
-        }
-
     # ===============================================
     # STOP PROCESSING
     # ===============================================
@@ -598,6 +593,8 @@ class BankingHandlers:
             # CRITICAL: Invalidate CENTRAL BUSINESS CACHE
             # ═══════════════════════════════════════════════════════════════
             await self._invalidate_central_cache(user_id, company_id)
+            if deleted:
+                get_bank_processed_projection().remove(user_id, company_id, deleted)
 
             return {
                 "success": True,
@@ -39,6 +39,7 @@ from typing import Any, Dict, List, Optional
 from app.ws_hub import hub
 from app.ws_events import WS_EVENTS
 from app.redis_client import get_redis
+from app.llm_service.redis_namespaces import build_business_key
 
 logger = logging.getLogger("banking.orchestration")
 
@@ -118,7 +119,7 @@ def _get_transactions_from_cache(
     """
     try:
         redis_client = get_redis()
-        cache_key = f"business:{uid}:{company_id}:bank"
+        cache_key = build_business_key(uid, company_id, "bank")
         cached = redis_client.get(cache_key)
 
         if not cached:
@@ -15,6 +15,7 @@ Usage:
 Event Mapping:
     chat.orchestrate_init  -> handle_orchestrate_init()
     chat.session_select    -> handle_session_select()
+    chat.history_load      -> handle_history_load()
     chat.session_create    -> handle_session_create()
     chat.session_delete    -> handle_session_delete()
     chat.session_rename    -> handle_session_rename()
@@ -28,6 +29,7 @@ from .handlers import (
 from .orchestration import (
     handle_orchestrate_init,
     handle_session_select,
+    handle_history_load,
     handle_session_create,
     handle_session_delete,
     handle_session_rename,
@@ -47,6 +49,7 @@ __all__ = [
     # Orchestration handlers
     "handle_orchestrate_init",
     "handle_session_select",
+    "handle_history_load",
     "handle_session_create",
     "handle_session_delete",
     "handle_session_rename",
@@ -23,6 +23,7 @@ from typing import Any, Dict, List, Optional
 
 from app.cache.unified_cache_manager import get_firebase_cache_manager
 from app.firebase_providers import get_firebase_management
+from app.llm_service.redis_namespaces import build_job_replay_key
 from app.redis_client import get_redis
 
 logger = logging.getLogger("chat.handlers")
@@ -31,6 +32,10 @@ logger = logging.getLogger("chat.handlers")
 TTL_SESSIONS_LIST = 60  # 1 minute for session list
 TTL_HISTORY = 120  # 2 minutes for message history
 TTL_TASKS = 300  # 5 minutes for task list
+TTL_JOB_REPLAY = 86400  # 24 hours for job_chats replay checkpoints
+
+# Job chat modes whose state (checklist, worker cards) is replayed from job_chats
+_JOB_CHAT_MODES = {"onboarding_chat", "router_chat", "apbookeeper_chat", "banker_chat"}
 
 
 # ============================================
@@ -75,28 +80,40 @@ class ChatHandlers:
         company_id: str,
         space_code: str,
         mode: str = "chats",
+        limit: Optional[int] = None,
+        before: Optional[str] = None,
     ) -> Dict[str, Any]:
         """
         CHAT.sessions_list - Fetch all chat sessions for user/company.
 
         This replaces ChatState.load_all_chat_titles().
 
+        Sessions come from the per-space thread index (name, chat_mode,
+        count, last_activity), never from the message trees.
+
         Args:
             uid: User ID
             company_id: Company ID (contact_space_id)
             space_code: Firebase space code (usually same as company_id)
             mode: Firebase mode ('chats' for user chats)
+            limit: Page size (None = all sessions)
+            before: Cursor, last_activity of the last session of the previous page
 
         Returns:
-            {"success": True, "sessions": [...], "total": int}
+            {"success": True, "sessions": [...], "total": int, "next_cursor": str|None}
         """
+        paginated = limit is not None or before is not None
+
         # 1. Check cache (use mode in cache key to separate chats vs active_chats)
+        # Only the full, unpaginated list is cached.
         cache_key = f"chat:sessions:{mode}"
-        cached = await self._cache_manager.get_cached_data(
-            user_id=uid,
-            company_id=company_id,
-            data_type=cache_key
-        )
+        cached = None
+        if not paginated:
+            cached = await self._cache_manager.get_cached_data(
+                user_id=uid,
+                company_id=company_id,
+                data_type=cache_key
+            )
         if cached:
             logger.info(f"[CHAT] Cache hit for sessions list (mode={mode})")
             sessions_data = cached.get("data", cached) if isinstance(cached, dict) else cached
@@ -107,17 +124,20 @@ class ChatHandlers:
             from app.firebase_providers import get_firebase_realtime
 
             realtime_service = get_firebase_realtime()
-            threads = realtime_service.get_all_threads(
+            threads, next_cursor = realtime_service.list_threads(
                 space_code=space_code,
-                mode=mode
+                mode=mode,
+                limit=limit,
+                before=before,
             )
 
             if not threads:
-                return {"success": True, "sessions": [], "total": 0}
+                return {"success": True, "sessions": [], "total": 0, "next_cursor": None}
 
             # 3. Transform to session list
             sessions = []
-            for thread_key, thread_data in threads.items():
+            for thread_data in threads:
+                thread_key = thread_data["thread_key"]
                 thread_name = thread_data.get("thread_name", thread_key)
 
                 # Skip "New chat" placeholder threads
@@ -134,20 +154,20 @@ class ChatHandlers:
                     "message_count": thread_data.get("message_count", 0),
                 })
 
-            # 4. Sort by last_activity (newest first)
-            sessions.sort(key=lambda x: x.get("last_activity", ""), reverse=True)
+            # 4. Already sorted by last_activity (newest first) by the index
 
             # 5. Cache result (use mode in cache key)
-            await self._cache_manager.set_cached_data(
-                user_id=uid,
-                company_id=company_id,
-                data_type=cache_key,
-                data=sessions,
-                ttl_seconds=TTL_SESSIONS_LIST
-            )
+            if not paginated:
+                await self._cache_manager.set_cached_data(
+                    user_id=uid,
+                    company_id=company_id,
+                    data_type=cache_key,
+                    data=sessions,
+                    ttl_seconds=TTL_SESSIONS_LIST
+                )
 
             logger.info(f"[CHAT] Loaded {len(sessions)} sessions for uid={uid}")
-            return {"success": True, "sessions": sessions, "total": len(sessions)}
+            return {"success": True, "sessions": sessions, "total": len(sessions), "next_cursor": next_cursor}
 
         except Exception as e:
             logger.error(f"[CHAT] Error loading sessions: {e}")
@@ -350,11 +370,11 @@ class ChatHandlers:
             ):
                 logger.info(f"[CHAT] Also deleted job_chats/{thread_key}")
 
-            # Clean Redis chat history cache
+            # Clean Redis chat history cache and job_chats replay checkpoint
             try:
                 r = get_redis()
                 redis_key = f"chat:{uid}:{company_id}:{thread_key}:history"
-                r.delete(redis_key)
+                r.delete(redis_key, build_job_replay_key(space_code, thread_key))
                 logger.debug(f"[CHAT] Redis chat history deleted: {redis_key}")
             except Exception as redis_err:
                 logger.warning(f"[CHAT] Failed to delete Redis chat history: {redis_err}")
@@ -741,62 +761,74 @@ class ChatHandlers:
         mode: str = "chats",
         limit: int = 100,
         chat_mode: str = "",
+        before: Optional[str] = None,
     ) -> Dict[str, Any]:
         """
         CHAT.history_load - Load message history for a chat session.
 
+        Only the visible window is fetched (server-side limit-to-last).
+        Pass `before` (the `next_cursor` of the previous window) to load older messages.
+
         Args:
             uid: User ID
             company_id: Company ID
             space_code: Firebase space code
             thread_key: Thread key to load
             mode: Firebase mode
-            limit: Max messages to load
+            limit: Window size
             chat_mode: Chat mode (e.g. "onboarding_chat") — used to load extra data
+            before: Cursor for "load older" paging (None = latest window)
 
         Returns:
-            {"success": True, "messages": [...], "total": int}
+            {"success": True, "messages": [...], "total": int, "next_cursor": str|None, "has_more": bool}
         """
         try:
-            # 1. Check cache for RAW messages (keyed by thread_key only - unique across compartments)
-            cached = await self._cache_manager.get_cached_data(
-                user_id=uid,
-                company_id=company_id,
-                data_type="chat:history:raw",
-                sub_type=thread_key
-            )
-
             raw_messages = None
+            next_cursor = None
             from_cache = False
             actual_mode = mode  # Track which mode actually has the data
 
-            if cached:
-                logger.info(f"[CHAT] Cache hit for history: {thread_key}")
-                raw_messages = cached.get("data", cached) if isinstance(cached, dict) else cached
-                from_cache = True
+            # 1. Check cache for the latest RAW window (keyed by thread_key only - unique across compartments)
+            if before is None:
+                cached = await self._cache_manager.get_cached_data(
+                    user_id=uid,
+                    company_id=company_id,
+                    data_type="chat:history:raw",
+                    sub_type=thread_key
+                )
+                if cached:
+                    logger.info(f"[CHAT] Cache hit for history: {thread_key}")
+                    cached_data = cached.get("data", cached) if isinstance(cached, dict) else cached
+                    if isinstance(cached_data, dict):
+                        raw_messages = cached_data.get("messages", [])
+                        next_cursor = cached_data.get("next_cursor")
+                    else:
+                        raw_messages = cached_data
+                    from_cache = True
 
-            # 2. Fetch from Firebase Realtime if not cached
+            # 2. Fetch the window from Firebase Realtime if not cached
             if raw_messages is None:
                 from app.firebase_providers import get_firebase_realtime
 
                 realtime_service = get_firebase_realtime()
-                raw_messages = realtime_service.get_thread_messages(
+                raw_messages, next_cursor = realtime_service.get_thread_messages_window(
                     space_code=space_code,
                     thread_key=thread_key,
                     mode=mode,
-                    limit=limit
+                    limit=limit,
+                    before=before,
                 )
 
                 # Fallback: if no messages found in requested mode, try the other compartment
                 # This handles cases where frontend sends wrong mode (e.g., page refresh without state)
-                if not raw_messages:
+                if not raw_messages and before is None:
                     alternate_mode = "active_chats" if mode == "chats" else "chats"
                     logger.info(f"[CHAT] No messages in '{mode}', trying '{alternate_mode}' for {thread_key}")
-                    raw_messages = realtime_service.get_thread_messages(
+                    raw_messages, next_cursor = realtime_service.get_thread_messages_window(
                         space_code=space_code,
                         thread_key=thread_key,
                         mode=alternate_mode,
-                        limit=limit
+                        limit=limit,
                     )
                     if raw_messages:
                         actual_mode = alternate_mode
@@ -805,59 +837,61 @@ class ChatHandlers:
                 if raw_messages is None:
                     raw_messages = []
 
-                # Only cache if we found messages (avoid caching empty results from wrong mode)
-                if raw_messages:
+                # Only cache the latest window, and only if we found messages
+                # (avoid caching empty results from wrong mode)
+                if raw_messages and before is None:
                     await self._cache_manager.set_cached_data(
                         user_id=uid,
                         company_id=company_id,
                         data_type="chat:history:raw",
                         sub_type=thread_key,
-                        data=raw_messages,
+                        data={"messages": raw_messages, "next_cursor": next_cursor},
                         ttl_seconds=TTL_HISTORY
                     )
 
             # 3. Transform messages to standard format (always, even from cache)
             formatted_messages = self._transform_messages(raw_messages)
 
+            # Older windows only carry messages: cards and checklist come from the latest one
+            if before is not None:
+                logger.info(f"[CHAT] Loaded {len(formatted_messages)} older messages for {thread_key}")
+                return {
+                    "success": True,
+                    "messages": formatted_messages,
+                    "total": len(formatted_messages),
+                    "next_cursor": next_cursor,
+                    "has_more": next_cursor is not None,
+                    "from_cache": False,
+                }
+
             # 4. Extract pending card (always recalculate to ensure freshness)
             # Pass thread_key so the card knows which chat it belongs to
             pending_card = self._extract_pending_card(raw_messages, thread_key)
 
-            # 5. Pour les modes job chat, charger aussi job_chats pour :
+            # 5. Pour les modes job chat, rejouer job_chats (checkpoint incrémental) pour :
             #    - Workflow checklist (onboarding)
             #    - Pending cards des workers externes (router, AP, bank)
             workflow_checklist = None
-            _JOB_CHAT_MODES = {"onboarding_chat", "router_chat", "apbookeeper_chat", "banker_chat"}
             # Normaliser le chat_mode (certains modes ont un point final parasite)
             normalized_chat_mode = (chat_mode or "").rstrip(".")
 
             if normalized_chat_mode in _JOB_CHAT_MODES:
-                job_messages = None
+                replay = None
                 try:
-                    from app.firebase_providers import get_firebase_realtime
-                    realtime_service = get_firebase_realtime()
-                    job_messages = realtime_service.get_thread_messages(
-                        space_code=space_code,
-                        thread_key=thread_key,
-                        mode="job_chats",
-                        limit=500
-                    )
+                    replay = self._replay_job_chat(space_code, thread_key)
                 except Exception as jc_err:
-                    logger.warning(f"[CHAT] Error loading job_chats: {jc_err}")
+                    logger.warning(f"[CHAT] Error replaying job_chats: {jc_err}")
 
-                if job_messages:
+                if replay:
                     # 5a. Workflow checklist (onboarding_chat only)
                     if normalized_chat_mode == "onboarding_chat":
-                        try:
-                            workflow_checklist = self._extract_workflow_checklist(job_messages)
-                            if workflow_checklist:
-                                logger.info(f"[CHAT] Restored workflow checklist for {thread_key}: {len(workflow_checklist.get('steps', []))} steps")
-                        except Exception as wf_err:
-                            logger.warning(f"[CHAT] Error extracting workflow checklist: {wf_err}")
+                        workflow_checklist = replay.get("workflow_checklist")
+                        if workflow_checklist:
+                            logger.info(f"[CHAT] Restored workflow checklist for {thread_key}: {len(workflow_checklist.get('steps', []))} steps")
 
                     # 5b. Pending card des workers externes dans job_chats
                     if not pending_card:
-                        pending_card = self._extract_pending_card(job_messages, thread_key)
+                        pending_card = replay.get("pending_card")
                         if pending_card:
                             logger.info(f"[CHAT] Pending card found in job_chats for {thread_key}: {pending_card.get('cardId', 'unknown')}")
 
@@ -866,6 +900,8 @@ class ChatHandlers:
                 "success": True,
                 "messages": formatted_messages,
                 "total": len(formatted_messages),
+                "next_cursor": next_cursor,
+                "has_more": next_cursor is not None,
                 "pending_card": pending_card,
                 "workflow_checklist": workflow_checklist,
                 "from_cache": from_cache,
@@ -875,20 +911,111 @@ class ChatHandlers:
             logger.error(f"[CHAT] Error loading history: {e}")
             return {"success": False, "error": str(e), "messages": [], "total": 0}
 
-    def _extract_workflow_checklist(self, raw_messages: List[Dict]) -> Optional[Dict[str, Any]]:
+    # ──────────────────────────────────────────
+    # JOB CHATS REPLAY (incremental checkpoint)
+    # ──────────────────────────────────────────
+
+    def _replay_job_chat(self, space_code: str, thread_key: str) -> Dict[str, Any]:
+        """
+        Replay job_chats/{thread_key} from a checkpoint stored in Redis.
+
+        Only messages after the checkpoint cursor are fetched and applied:
+        - CMMD messages update the workflow checklist
+        - Card candidates are reduced to the latest status-pending card,
+          the latest external card and the latest CARD_CLICKED_PINNOKIO,
+          which is all _extract_pending_card needs to reach the same result.
+
+        The cursor is the highest push ID applied. Keys that are not push IDs
+        (uuid card responses) sort after every push ID, so they come back on
+        each replay and are skipped through `late_keys`.
+
+        Returns:
+            {"workflow_checklist": {...}|None, "pending_card": {...}|None}
+        """
+        import json
+        from app.firebase_providers import get_firebase_realtime
+
+        redis_key = build_job_replay_key(space_code, thread_key)
+        state = None
+        try:
+            raw_state = self._redis.get(redis_key)
+            state = json.loads(raw_state) if raw_state else None
+        except Exception as e:
+            logger.warning(f"[CHAT] Invalid job replay checkpoint for {thread_key}: {e}")
+        if not isinstance(state, dict):
+            state = {"cursor": None, "late_keys": [], "checklist": None, "cards": {}}
+
+        new_messages = get_firebase_realtime().get_thread_messages_after(
+            space_code=space_code,
+            thread_key=thread_key,
+            mode="job_chats",
+            after=state["cursor"],
+        )
+        late_keys = set(state["late_keys"])
+        new_messages = [m for m in new_messages if m.get("message_id") not in late_keys]
+
+        if new_messages:
+            # Workflow checklist
+            state["checklist"] = self._extract_workflow_checklist(new_messages, state["checklist"])
+
+            # Card candidates
+            cards = state["cards"]
+            for msg in new_messages:
+                ts = msg.get("timestamp", "")
+                if msg.get("message_type") == "CARD_CLICKED_PINNOKIO":
+                    slot = "click"
+                elif self._extract_pending_card([msg], thread_key):
+                    is_external = not msg.get("status") and not msg.get("pinnokio_card_status")
+                    slot = "external" if is_external else "status"
+                else:
+                    continue
+                if cards.get(slot) is None or ts >= cards[slot].get("timestamp", ""):
+                    cards[slot] = msg
+
+            # Advance checkpoint
+            for msg in new_messages:
+                message_id = msg.get("message_id") or ""
+                if message_id.startswith("-"):
+                    if state["cursor"] is None or message_id > state["cursor"]:
+                        state["cursor"] = message_id
+                elif message_id:
+                    late_keys.add(message_id)
+            state["late_keys"] = sorted(late_keys)
+
+            try:
+                self._redis.set(redis_key, json.dumps(state), ex=TTL_JOB_REPLAY)
+            except Exception as e:
+                logger.warning(f"[CHAT] Failed to save job replay checkpoint for {thread_key}: {e}")
+
+        candidates = sorted(
+            (c for c in state["cards"].values() if c),
+            key=lambda m: m.get("timestamp", ""),
+        )
+        return {
+            "workflow_checklist": state["checklist"],
+            "pending_card": self._extract_pending_card(candidates, thread_key) if candidates else None,
+        }
+
+    def _extract_workflow_checklist(
+        self,
+        raw_messages: List[Dict],
+        checklist: Optional[Dict[str, Any]] = None,
+    ) -> Optional[Dict[str, Any]]:
         """
         Replay CMMD messages to reconstruct the workflow checklist state.
 
         Scans for SET_WORKFLOW_CHECKLIST (initial definition) then applies
         UPDATE_STEP_STATUS commands in order to get current step states.
 
+        Args:
+            raw_messages: Messages to apply, oldest first
+            checklist: State from a previous replay (incremental checkpoint)
+
         Returns:
             {"totalSteps": int, "steps": [{"id", "name", "status", "message"}]} or None
         """
         import json
 
-        checklist = None  # Will be set by SET_WORKFLOW_CHECKLIST
-
         for msg in raw_messages:
             if msg.get("message_type") != "CMMD":
                 continue
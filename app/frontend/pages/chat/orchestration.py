@@ -28,6 +28,7 @@ import logging
 from typing import Any, Dict, List, Optional
 
 from app.redis_client import get_redis
+from app.llm_service.redis_namespaces import build_business_key
 from app.ws_events import WS_EVENTS
 from app.ws_hub import hub
 from app.wrappers.page_state_manager import get_page_state_manager
@@ -351,6 +352,8 @@ async def handle_session_select(
             "thread_key": thread_key,
             "messages": history_result.get("messages", []),
             "total": history_result.get("total", 0),
+            "next_cursor": history_result.get("next_cursor"),
+            "has_more": history_result.get("has_more", False),
             "pending_card": history_result.get("pending_card"),
         }
         # Include workflow checklist if restored (onboarding_chat mode)
@@ -376,6 +379,45 @@ async def handle_session_select(
         }
 
 
+async def handle_history_load(
+    uid: str,
+    session_id: str,
+    payload: Dict[str, Any],
+) -> Dict[str, Any]:
+    """
+    Handle chat.history_load WebSocket event ("load older messages").
+
+    Payload: { thread_key, company_id, before, mode?, limit? }
+    `before` is the next_cursor of the window currently displayed.
+    """
+    thread_key = payload.get("thread_key")
+    company_id = payload.get("company_id")
+    before = payload.get("before")
+
+    if not thread_key or not company_id or not before:
+        return {
+            "type": WS_EVENTS.CHAT.HISTORY_LOAD,
+            "payload": {"success": False, "error": "Missing required fields"}
+        }
+
+    chat_handlers = get_chat_handlers()
+    result = await chat_handlers.load_history(
+        uid=uid,
+        company_id=company_id,
+        space_code=company_id,
+        thread_key=thread_key,
+        mode=payload.get("mode", "chats"),
+        limit=int(payload.get("limit") or 100),
+        before=before,
+    )
+    result["thread_key"] = thread_key
+
+    return {
+        "type": WS_EVENTS.CHAT.HISTORY_LOAD,
+        "payload": result
+    }
+
+
 # ============================================
 # SESSION CRUD HANDLERS
 # ============================================
@@ -462,9 +504,9 @@ async def _resolve_job_thread_name(
         redis = get_redis()
         # Try to find job info in business cache (routing, invoices, bank)
         cache_domains = {
-            "router_chat": f"business:{company_id}:routing",
-            "apbookeeper_chat": f"business:{company_id}:invoices",
-            "banker_chat": f"business:{company_id}:bank",
+            "router_chat": build_business_key(uid, company_id, "routing"),
+            "apbookeeper_chat": build_business_key(uid, company_id, "invoices"),
+            "banker_chat": build_business_key(uid, company_id, "bank"),
         }
         cache_key = cache_domains.get(chat_mode)
         if cache_key and redis:
@@ -472,6 +514,8 @@ async def _resolve_job_thread_name(
             cached_raw = redis.get(cache_key)
             if cached_raw:
                 cached_data = json.loads(cached_raw) if isinstance(cached_raw, (str, bytes)) else cached_raw
+                if isinstance(cached_data, dict) and "cache_version" in cached_data:
+                    cached_data = cached_data.get("data") or {}
                 # Search all lists for the job_id
                 for category_name, items in cached_data.items():
                     if not isinstance(items, list):
@@ -1053,6 +1097,11 @@ async def _handle_external_card_response(
         )
         rtdb_path = f"{company_id}/job_chats/{thread_key}/messages/{response_id}"
         rtdb.reference(rtdb_path, url=db_url, app=app).set(card_response_data)
+        try:
+            from app.firebase_providers import get_firebase_realtime
+            get_firebase_realtime().touch_thread_index(company_id, thread_key, "job_chats", timestamp)
+        except Exception as index_error:
+            logger.warning(f"[CHAT] thread index not updated for {thread_key}: {index_error}")
 
         # Publier sur Redis PubSub pour que le worker recoive la reponse
         try:
@@ -1856,6 +1856,7 @@ class CompanySettingsHandlers:
         mandate_path: str,
         confirmation_name: str,
         progress_callback=None,
+        loop=None,
     ) -> Dict[str, Any]:
         """
         Delete a company and all its associated data.
@@ -1866,33 +1867,47 @@ class CompanySettingsHandlers:
         Deletes: Firestore documents, Drive folders, ChromaDB collections,
         RTDB nodes, GCS files, scheduler jobs, ERP secrets, Telegram users.
 
+        The independent cleanup steps run in parallel, then the Firestore
+        tree is deleted last (ERP secrets are read from it). Step outcomes and
+        finished Firestore collections are checkpointed in Redis
+        (tools.bulk_deletion): re-running after a crash skips completed steps
+        and resumes the tree deletion where it stopped.
+
         Args:
             user_id: Firebase UID
             company_id: Company/Mandate ID
             mandate_path: Full Firebase path to mandate
             confirmation_name: Company name typed by user for confirmation
             progress_callback: Optional async callback(step_name, step_index, total_steps)
+            loop: Event loop owning progress_callback (this method runs in a worker thread)
 
         Returns:
             {"success": True/False, "message": str, "report": list}
         """
-        import asyncio
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+
+        from app.tools.bulk_deletion import DeletionCheckpoint
 
         report: List[Dict[str, str]] = []
-        total_steps = 13
+        total_steps = 12
+        progress = {"index": 0}
+        progress_lock = threading.Lock()
+        checkpoint = DeletionCheckpoint(f"company:{company_id}")
 
         def _report(name: str, status: str, reason: str = ""):
             report.append({"name": name, "status": status, "reason": reason})
 
-        def _notify(step_name: str, step_index: int):
-            """Fire progress callback if available (non-blocking)."""
-            if progress_callback:
+        def _notify(step_name: str):
+            """Fire progress callback on the caller's loop (best-effort, non-blocking)."""
+            with progress_lock:
+                progress["index"] += 1
+                step_index = progress["index"]
+            if progress_callback and loop is not None:
                 try:
-                    loop = asyncio.get_event_loop()
-                    if loop.is_running():
-                        asyncio.ensure_future(progress_callback(step_name, step_index, total_steps))
-                    else:
-                        loop.run_until_complete(progress_callback(step_name, step_index, total_steps))
+                    asyncio.run_coroutine_threadsafe(
+                        progress_callback(step_name, step_index, total_steps), loop
+                    )
                 except Exception:
                     pass  # Progress notification is best-effort
 
@@ -1903,13 +1918,24 @@ class CompanySettingsHandlers:
             )
 
             # ── Step 1: Validation ──────────────────────────
-            _notify("Validating confirmation", 1)
+            _notify("Validating confirmation")
 
             mandate_data = self._firebase.get_document(mandate_path)
-            if not mandate_data:
-                return {"success": False, "error": "Company not found", "report": report}
-
-            company_name = mandate_data.get("legal_name") or mandate_data.get("name", "")
+            if mandate_data:
+                company_name = mandate_data.get("legal_name") or mandate_data.get("name", "")
+                context = {
+                    "company_name": company_name,
+                    "drive_space_parent_id": mandate_data.get("drive_space_parent_id", ""),
+                    "contact_space_id": mandate_data.get("contact_space_id", ""),
+                    "client_name": mandate_data.get("client_name", company_name),
+                }
+            else:
+                # Mandate document already gone: resume an interrupted deletion
+                context = checkpoint.load_context()
+                if not context:
+                    return {"success": False, "error": "Company not found", "report": report}
+                company_name = context.get("company_name", "")
+                logger.info(f"delete_company: resuming interrupted deletion for {company_id}")
 
             if confirmation_name != company_name:
                 return {
@@ -1918,19 +1944,20 @@ class CompanySettingsHandlers:
                     "report": report,
                 }
 
+            checkpoint.save_context(context)
             _report("Validation", "success", "Confirmation name verified")
 
             # ── Step 2: Read mandate data ───────────────────
-            _notify("Reading company data", 2)
+            _notify("Reading company data")
 
-            drive_space_parent_id = mandate_data.get("drive_space_parent_id", "")
-            contact_space_id = mandate_data.get("contact_space_id", "")
-            client_name = mandate_data.get("client_name", company_name)
+            drive_space_parent_id = context.get("drive_space_parent_id", "")
+            contact_space_id = context.get("contact_space_id", "")
+            client_name = context.get("client_name", company_name)
 
             _report("Read Company Data", "success", f"Client: {client_name}")
 
             # ── Step 3: Verify contact_space_id ─────────────
-            _notify("Verifying identifiers", 3)
+            _notify("Verifying identifiers")
 
             if not contact_space_id:
                 logger.warning(
@@ -1941,9 +1968,10 @@ class CompanySettingsHandlers:
             else:
                 _report("Verify Identifiers", "success", f"contact_space_id={contact_space_id}")
 
-            # ── Step 4: Delete Scheduler Jobs ───────────────
-            _notify("Removing scheduled jobs", 4)
-            try:
+            # ── Cleanup steps (independent, run in parallel) ──
+            # Each returns (status, reason); exceptions are reported as failed.
+
+            def _scheduler_jobs():
                 job_types = ["apbookeeper", "banker", "router"]
                 deleted_jobs = 0
                 for jt in job_types:
@@ -1951,14 +1979,9 @@ class CompanySettingsHandlers:
                     job_id = mandate_path.replace("/", "_") + f"_{jt}"
                     if self._firebase.delete_scheduler_job_completely(job_id):
                         deleted_jobs += 1
-                _report("Scheduled Jobs", "success", f"Deleted {deleted_jobs}/{len(job_types)} jobs")
-            except Exception as e:
-                logger.warning(f"delete_company: scheduler jobs cleanup failed: {e}")
-                _report("Scheduled Jobs", "failed", str(e))
+                return "success", f"Deleted {deleted_jobs}/{len(job_types)} jobs"
 
-            # ── Step 5: Delete ERP Secrets ──────────────────
-            _notify("Removing security credentials", 5)
-            try:
+            def _erp_secrets():
                 from app.tools.g_cred import delete_secret
 
                 erp_types = ["gl_accounting_erp", "ap_erp", "ar_erp", "bank_erp"]
@@ -1971,89 +1994,45 @@ class CompanySettingsHandlers:
                             deleted_secrets += 1
                         except Exception as se:
                             logger.warning(f"delete_company: failed to delete secret for {erp_type}: {se}")
-                _report("Security Credentials", "success", f"Cleaned {deleted_secrets} ERP secrets")
-            except Exception as e:
-                logger.warning(f"delete_company: ERP secrets cleanup failed: {e}")
-                _report("Security Credentials", "failed", str(e))
-
-            # ── Step 6: Archive Drive Folder ────────────────
-            _notify("Archiving document management system", 6)
-            try:
-                if drive_space_parent_id:
-                    from app.driveClientService import get_drive_client_service
-
-                    drive_service = get_drive_client_service()
-                    archived = drive_service.Archived_Pinnokio_folder(user_id, drive_space_parent_id)
-                    if archived:
-                        _report("Document Management System", "success", "Drive folder archived")
-                    else:
-                        _report("Document Management System", "failed", "Archive operation returned False")
-                else:
-                    _report("Document Management System", "skipped", "No drive_space_parent_id")
-            except Exception as e:
-                logger.warning(f"delete_company: Drive archive failed: {e}")
-                _report("Document Management System", "failed", str(e))
-
-            # ── Step 7: Delete Firestore RAG data (indexed_files + document_chunks) ──
-            _notify("Cleaning vector database", 7)
-            try:
-                if mandate_path:
-                    from app.firebase_client import get_firestore
-                    import asyncio
-
-                    db = get_firestore()
-                    total_deleted = 0
-                    for col_name in ["document_chunks", "indexed_files"]:
-                        col_ref = db.collection(f"{mandate_path}/{col_name}")
-                        docs = list(col_ref.limit(500).stream())
-                        while docs:
-                            batch = db.batch()
-                            for doc in docs:
-                                batch.delete(doc.reference)
-                            batch.commit()
-                            total_deleted += len(docs)
-                            if len(docs) < 500:
-                                break
-                            docs = list(col_ref.limit(500).stream())
-                    _report("Vector Database", "success", f"Firestore RAG: {total_deleted} documents deleted")
-                else:
-                    _report("Vector Database", "skipped", "No mandate_path")
-            except Exception as e:
-                logger.warning(f"delete_company: Firestore RAG cleanup failed: {e}")
-                _report("Vector Database", "failed", str(e))
+                return "success", f"Cleaned {deleted_secrets} ERP secrets"
+
+            def _drive_archive():
+                if not drive_space_parent_id:
+                    return "skipped", "No drive_space_parent_id"
+                from app.driveClientService import get_drive_client_service
+
+                drive_service = get_drive_client_service()
+                if drive_service.Archived_Pinnokio_folder(user_id, drive_space_parent_id):
+                    return "success", "Drive folder archived"
+                return "failed", "Archive operation returned False"
+
+            def _rag_data():
+                # Firestore RAG data (indexed_files + document_chunks)
+                if not mandate_path:
+                    return "skipped", "No mandate_path"
+                from app.firebase_client import get_firestore
+                from app.tools.bulk_deletion import FirestoreTreeDeleter
+
+                db = get_firestore()
+                total_deleted = FirestoreTreeDeleter(db, checkpoint=checkpoint).delete_collections(
+                    [db.collection(f"{mandate_path}/{col_name}") for col_name in ("document_chunks", "indexed_files")]
+                )
+                return "success", f"Firestore RAG: {total_deleted} documents deleted"
 
-            # ── Step 8: Delete Scheduler Documents ──────────
-            _notify("Cleaning scheduled tasks", 8)
-            try:
-                result = self._firebase.delete_scheduler_documents_for_mandate(mandate_path)
-                if result:
-                    _report("Scheduled Tasks", "success", "Scheduler documents cleaned")
-                else:
-                    _report("Scheduled Tasks", "failed", "delete_scheduler_documents_for_mandate returned False")
-            except Exception as e:
-                logger.warning(f"delete_company: scheduler documents cleanup failed: {e}")
-                _report("Scheduled Tasks", "failed", str(e))
+            def _scheduler_documents():
+                if self._firebase.delete_scheduler_documents_for_mandate(mandate_path):
+                    return "success", "Scheduler documents cleaned"
+                return "failed", "delete_scheduler_documents_for_mandate returned False"
 
-            # ── Step 9: Clean Telegram Users ────────────────
-            _notify("Cleaning communication channels", 9)
-            try:
-                result = self._firebase.clean_telegram_users_for_mandate(mandate_path)
-                if result:
-                    _report("Communication Channels", "success", "Telegram users cleaned")
-                else:
-                    _report("Communication Channels", "failed", "clean_telegram_users_for_mandate returned False")
-            except Exception as e:
-                logger.warning(f"delete_company: Telegram cleanup failed: {e}")
-                _report("Communication Channels", "failed", str(e))
+            def _telegram_users():
+                if self._firebase.clean_telegram_users_for_mandate(mandate_path):
+                    return "success", "Telegram users cleaned"
+                return "failed", "clean_telegram_users_for_mandate returned False"
 
-            # ── Step 10: Delete PostgreSQL Neon HR Data ────
-            # NOTE: Cette étape est maintenant gérée de manière async dans orchestration.py
-            # pour utiliser correctement le pool de connexions asyncpg et garantir la scalabilité.
-            # Voir handle_delete_company() dans orchestration.py
+            # NOTE: PostgreSQL Neon HR data is deleted asynchronously in orchestration.py
+            # to use the asyncpg connection pool. See handle_delete_company().
 
-            # ── Step 11: Delete GCS Storage ─────────────────
-            _notify("Removing file storage", 11)
-            try:
+            def _gcs_storage():
                 from app.storage_client import get_storage_client
 
                 storage_client = get_storage_client()
@@ -2066,15 +2045,52 @@ class CompanySettingsHandlers:
                 for gcs_path in paths_to_delete:
                     result = storage_client.delete_path(gcs_path, recursive=True)
                     total_deleted += result.get("deleted_count", 0)
-                _report("File Storage", "success", f"Deleted {total_deleted} files from GCS")
-            except Exception as e:
-                logger.warning(f"delete_company: GCS cleanup failed: {e}")
-                _report("File Storage", "failed", str(e))
+                return "success", f"Deleted {total_deleted} files from GCS"
+
+            def _rtdb_space():
+                if not contact_space_id:
+                    return "skipped", "No contact_space_id"
+                from app.firebase_providers import get_firebase_realtime
+
+                if get_firebase_realtime().delete_space(contact_space_id):
+                    return "success", f"RTDB space '{contact_space_id}' deleted"
+                return "failed", "delete_space returned False"
+
+            cleanup_steps = [
+                ("Scheduled Jobs", "Removing scheduled jobs", _scheduler_jobs),
+                ("Security Credentials", "Removing security credentials", _erp_secrets),
+                ("Document Management System", "Archiving document management system", _drive_archive),
+                ("Vector Database", "Cleaning vector database", _rag_data),
+                ("Scheduled Tasks", "Cleaning scheduled tasks", _scheduler_documents),
+                ("Communication Channels", "Cleaning communication channels", _telegram_users),
+                ("File Storage", "Removing file storage", _gcs_storage),
+                ("Real-time Services", "Cleaning real-time services", _rtdb_space),
+            ]
 
-            # ── Step 12: Delete Firestore (CRITICAL) ────────
-            _notify("Removing company database", 12)
+            def _run_step(name: str, label: str, step) -> Dict[str, str]:
+                previous = checkpoint.get_step(name)
+                if previous and previous.get("status") in ("success", "skipped"):
+                    _notify(label)
+                    return {"name": name, "status": previous["status"], "reason": f"{previous.get('reason', '')} (resumed)"}
+                try:
+                    status, reason = step()
+                except Exception as e:
+                    logger.warning(f"delete_company: {name} cleanup failed: {e}")
+                    status, reason = "failed", str(e)
+                checkpoint.set_step(name, status, reason)
+                _notify(label)
+                return {"name": name, "status": status, "reason": reason}
+
+            with ThreadPoolExecutor(max_workers=len(cleanup_steps), thread_name_prefix="company-delete") as pool:
+                futures = [pool.submit(_run_step, *entry) for entry in cleanup_steps]
+                # Report order stays fixed regardless of completion order
+                report.extend(future.result() for future in futures)
+
+            # ── Final step: Delete Firestore (CRITICAL) ─────
+            # Last: the steps above read ERP config from the mandate tree
+            _notify("Removing company database")
             try:
-                result = self._firebase.delete_document_recursive(mandate_path)
+                result = self._firebase.delete_document_recursive(mandate_path, checkpoint=checkpoint)
                 if result:
                     _report("Company Database", "success", "Firestore documents deleted recursively")
                 else:
@@ -2089,29 +2105,13 @@ class CompanySettingsHandlers:
                     "report": report,
                 }
 
-            # ── Step 13: Delete RTDB Space ──────────────────
-            _notify("Cleaning real-time services", 13)
-            try:
-                if contact_space_id:
-                    from app.firebase_providers import get_firebase_realtime
-
-                    rtdb = get_firebase_realtime()
-                    result = rtdb.delete_space(contact_space_id)
-                    if result:
-                        _report("Real-time Services", "success", f"RTDB space '{contact_space_id}' deleted")
-                    else:
-                        _report("Real-time Services", "failed", "delete_space returned False")
-                else:
-                    _report("Real-time Services", "skipped", "No contact_space_id")
-            except Exception as e:
-                logger.warning(f"delete_company: RTDB cleanup failed: {e}")
-                _report("Real-time Services", "failed", str(e))
-
             # ── Final Result ────────────────────────────────
             failed_steps = [r for r in report if r["status"] == "failed"]
             has_critical_failure = any(
                 r["name"] == "Company Database" and r["status"] == "failed" for r in report
             )
+            if not failed_steps:
+                checkpoint.clear()
 
             logger.info(
                 f"COMPANY_SETTINGS.delete_company COMPLETE "
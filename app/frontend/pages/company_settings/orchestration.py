@@ -1130,6 +1130,7 @@ async def handle_delete_company(
             mandate_path=mandate_path,
             confirmation_name=confirmation_name,
             progress_callback=on_progress,
+            loop=asyncio.get_running_loop(),
         )
 
         # ─────────────────────────────────────────────────
@@ -30,6 +30,7 @@ from google.cloud.firestore_v1.base_query import FieldFilter
 from app.cache.unified_cache_manager import get_firebase_cache_manager
 from app.firebase_client import get_firestore
 from app.firebase_providers import get_firebase_management
+from app.llm_service.redis_namespaces import build_business_key
 from app.ws_events import WS_EVENTS
 
 logger = logging.getLogger("dashboard.handlers")
@@ -617,7 +618,7 @@ class DashboardHandlers:
                 import json as json_module
 
                 redis_client = get_redis()
-                expenses_cache_key = f"business:{user_id}:{company_id}:expenses"
+                expenses_cache_key = build_business_key(user_id, company_id, "expenses")
 
                 # 1. Try centralized business cache first
                 cached_expenses = redis_client.get(expenses_cache_key)
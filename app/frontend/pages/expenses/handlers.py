@@ -30,6 +30,7 @@ from datetime import datetime, timezone
 from typing import Any, Dict, List, Optional, Tuple
 
 from app.redis_client import get_redis
+from app.llm_service.redis_namespaces import build_business_key
 from app.domain_config import ListManager, get_domain_config
 
 logger = logging.getLogger("expenses.handlers")
@@ -109,7 +110,7 @@ class ExpensesHandlers:
                 "from_cache": bool
             }
         """
-        cache_key = f"business:{user_id}:{company_id}:expenses"
+        cache_key = build_business_key(user_id, company_id, "expenses")
 
         # 1. Check cache (unless force_refresh)
         if not force_refresh:
@@ -147,7 +148,7 @@ class ExpensesHandlers:
         EXPENSES.refresh - Invalidate cache and reload from source.
         Used by: widget refresh button, page refresh button.
         """
-        cache_key = f"business:{user_id}:{company_id}:expenses"
+        cache_key = build_business_key(user_id, company_id, "expenses")
 
         # 1. Invalidate cache
         try:
@@ -703,7 +704,7 @@ class ExpensesHandlers:
             - to_list: str
             - metrics: Dict with updated counts
         """
-        cache_key = f"business:{user_id}:{company_id}:expenses"
+        cache_key = build_business_key(user_id, company_id, "expenses")
 
         try:
             logger.info(f"[EXPENSES][FLOW] _apply_list_change START")
@@ -805,7 +806,7 @@ class ExpensesHandlers:
         Returns:
             Dict with success and metrics
         """
-        cache_key = f"business:{user_id}:{company_id}:expenses"
+        cache_key = build_business_key(user_id, company_id, "expenses")
 
         try:
             cached = self._redis.get(cache_key)
@@ -867,7 +868,7 @@ class ExpensesHandlers:
         Returns:
             Dict with success and updated metrics
         """
-        cache_key = f"business:{user_id}:{company_id}:expenses"
+        cache_key = build_business_key(user_id, company_id, "expenses")
 
         try:
             cached = self._redis.get(cache_key)
@@ -966,7 +967,7 @@ class ExpensesHandlers:
         expense_id: str,
     ) -> Optional[Dict[str, Any]]:
         """Find an item across all lists in the expenses cache."""
-        cache_key = f"business:{user_id}:{company_id}:expenses"
+        cache_key = build_business_key(user_id, company_id, "expenses")
         try:
             cached = self._redis.get(cache_key)
             if not cached:
@@ -989,7 +990,7 @@ class ExpensesHandlers:
         drive_file_id: str,
     ) -> None:
         """Add a deleted Drive doc back to the routing cache to_process list."""
-        cache_key = f"business:{user_id}:{company_id}:routing"
+        cache_key = build_business_key(user_id, company_id, "routing")
         try:
             cached = self._redis.get(cache_key)
             if not cached:
@@ -38,6 +38,7 @@ from typing import Any, Dict
 from app.ws_hub import hub
 from app.ws_events import WS_EVENTS
 from app.redis_client import get_redis
+from app.llm_service.redis_namespaces import build_business_key
 from .handlers import get_expenses_handlers
 
 logger = logging.getLogger("expenses.orchestration")
@@ -738,7 +739,7 @@ async def handle_expenses_delete(
             # Dashboard metrics update from cache
             try:
                 redis_client = get_redis()
-                cache_key = f"business:{uid}:{company_id}:expenses"
+                cache_key = build_business_key(uid, company_id, "expenses")
                 cached = redis_client.get(cache_key)
                 if cached:
                     import json
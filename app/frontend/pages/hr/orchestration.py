@@ -172,7 +172,8 @@ async def _resolve_hr_company_id(
     Resolution order:
     1. Explicit in payload (hr_company_id)
     2. From page_state:hr cache (set during orchestrate_init)
-    3. Fallback: ensure_company via mandate_path (creates if needed)
+    3. Shared mandate resolver (process LRU + Redis, no write)
+    4. Fallback: ensure_company via mandate_path (creates if needed)
 
     Returns:
         PostgreSQL company UUID string, or None if resolution failed.
@@ -202,12 +203,23 @@ async def _resolve_hr_company_id(
     except Exception as e:
         logger.debug("[HR] page_state lookup for hr_company_id failed: %s", e)
 
-    # 3. Fallback: resolve via ensure_company (mandate_path required)
     mandate_path = payload.get("mandate_path")
     if not mandate_path and company_id:
         context = _get_company_context(uid, company_id)
         mandate_path = context.get("mandate_path")
 
+    # 3. Shared resolver (cached lookup, no company creation)
+    if mandate_path:
+        try:
+            from app.tools.neon_hr_manager import get_neon_hr_manager
+
+            resolved = await get_neon_hr_manager().get_company_id_from_mandate_path(mandate_path)
+            if resolved:
+                return str(resolved)
+        except Exception as e:
+            logger.debug("[HR] resolver lookup for hr_company_id failed: %s", e)
+
+    # 4. Fallback: resolve via ensure_company (mandate_path required)
     if mandate_path:
         try:
             handlers = get_hr_rpc_handlers()
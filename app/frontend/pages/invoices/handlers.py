@@ -25,12 +25,16 @@ import logging
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
+from app.cache.list_query import LIST_CATEGORIES, ListQuery, get_list_query_engine
 from app.cache.unified_cache_manager import get_firebase_cache_manager
 from app.firebase_providers import get_firebase_management
 from app.ws_events import WS_EVENTS
 
 logger = logging.getLogger("invoices.handlers")
 
+# Champs indexés pour la recherche INVOICES.list
+SEARCH_FIELDS = ("file_name", "name", "job_id", "id", "status")
+
 # ===============================================
 # SINGLETON INSTANCE
 # ===============================================
@@ -99,13 +103,14 @@ class InvoicesHandlers:
                     "to_process": [...],
                     "in_process": [...],
                     "pending": [...],
-                    "processed": [...],
-                    "counts": {
+                    "processed": [...],          # page demandée uniquement
+                    "counts": {                  # correspondances (recherche incluse)
                         "to_process": 10,
                         "in_process": 5,
                         "pending": 3,
                         "processed": 25
                     },
+                    "totals": {...},             # items par catégorie (sans recherche)
                     "pagination": {
                         "page": 1,
                         "pageSize": 20,
@@ -147,38 +152,22 @@ class InvoicesHandlers:
                     "from_cache": False
                 }
 
+            # Page demandée uniquement (index de tri / recherche par version du cache)
             data = ap_result["data"]
-            to_process = data.get("to_process", [])
-            in_process = data.get("in_process", [])
-            pending = data.get("pending", [])
-            processed = data.get("processed", [])
-
-            # Apply search filter if provided
-            if search:
-                search_lower = search.lower()
-                to_process = [d for d in to_process if self._matches_search(d, search_lower)]
-                in_process = [d for d in in_process if self._matches_search(d, search_lower)]
-                pending = [d for d in pending if self._matches_search(d, search_lower)]
-                processed = [d for d in processed if self._matches_search(d, search_lower)]
-
-            # Build result
+            version = ap_result.get("cached_at")
+            result = get_list_query_engine().query(
+                scope=("apbookeeper", user_id, company_id),
+                categories={c: data.get(c, []) for c in LIST_CATEGORIES},
+                versions={c: version for c in LIST_CATEGORIES},
+                query=ListQuery(category, page, page_size, search, sort_column, sort_direction),
+                search_fields=SEARCH_FIELDS,
+            )
+
             result_data = {
-                "to_process": to_process,
-                "in_process": in_process,
-                "pending": pending,
-                "processed": processed,
-                "counts": {
-                    "to_process": len(to_process),
-                    "in_process": len(in_process),
-                    "pending": len(pending),
-                    "processed": len(processed),
-                },
-                "pagination": {
-                    "page": page,
-                    "pageSize": page_size,
-                    "totalPages": max(1, (len(to_process) + len(in_process) + len(pending) + len(processed)) // page_size),
-                    "totalItems": len(to_process) + len(in_process) + len(pending) + len(processed),
-                }
+                **result["items"],
+                "counts": result["counts"],
+                "totals": result["totals"],
+                "pagination": result["pagination"],
             }
 
             logger.info(f"[INVOICES] list_documents: category={category}, total={result_data['pagination']['totalItems']}")
@@ -199,15 +188,6 @@ class InvoicesHandlers:
                 }
             }
 
-    def _matches_search(self, doc: Dict, search_term: str) -> bool:
-        """Check if document matches search term."""
-        searchable_fields = ["file_name", "name", "job_id", "id", "status"]
-        for field in searchable_fields:
-            value = doc.get(field, "")
-            if value and search_term in str(value).lower():
-                return True
-        return False
-
     # ===============================================
     # REFRESH TAB
     # ===============================================
@@ -37,6 +37,7 @@ from app.ws_hub import hub
 from app.ws_events import WS_EVENTS
 from app.firebase_cache_handlers import get_firebase_cache_handlers
 from app.redis_client import get_redis
+from app.llm_service.redis_namespaces import build_business_key
 
 logger = logging.getLogger("invoices.orchestration")
 
@@ -320,7 +321,7 @@ async def handle_invoices_refresh(
     # Invalidate AP documents cache (new + legacy keys)
     try:
         redis_client = get_redis()
-        cache_key = f"business:{uid}:{company_id}:invoices"
+        cache_key = build_business_key(uid, company_id, "invoices")
         legacy_key = f"cache:{uid}:{company_id}:apbookeeper:documents"
         deleted = redis_client.delete(cache_key, legacy_key)
         logger.info(f"[INVOICES] AP cache invalidated: keys=[{cache_key}, {legacy_key}] deleted={deleted}")
@@ -23,6 +23,7 @@ import logging
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
+from app.cache.list_query import LIST_CATEGORIES, ListQuery, get_list_query_engine
 from app.cache.unified_cache_manager import get_firebase_cache_manager
 from app.firebase_providers import get_firebase_management
 from app.ws_events import WS_EVENTS
@@ -36,6 +37,9 @@ logger = logging.getLogger("routing.handlers")
 TTL_ROUTING_LIST = 60          # 1 minute pour liste de documents
 TTL_ROUTING_FULL = 120         # 2 minutes pour donnees completes
 
+# Champs indexés pour la recherche ROUTING.list
+SEARCH_FIELDS = ("name", "file_name", "id", "job_id", "status")
+
 # ===============================================
 # SINGLETON
 # ===============================================
@@ -137,10 +141,11 @@ class RoutingHandlers:
                     )
                     if cached and cached.get("data"):
                         logger.info(f"[ROUTING] Cache hit for list_{category}")
-                        # Apply client-side pagination/filtering to cached data
+                        # Server-side search/sort/pagination (indexes reused per cached_at)
                         return self._apply_filters(
-                            cached["data"],
-                            page, page_size, search, sort_column, sort_direction,
+                            user_id, company_id, cached["data"],
+                            ListQuery(category, page, page_size, search, sort_column, sort_direction),
+                            version=cached.get("cached_at"),
                             from_cache=True
                         )
                 except Exception as cache_err:
@@ -194,7 +199,9 @@ class RoutingHandlers:
 
             # 4. Apply pagination/filtering and return
             return self._apply_filters(
-                data, page, page_size, search, sort_column, sort_direction,
+                user_id, company_id, data,
+                ListQuery(category, page, page_size, search, sort_column, sort_direction),
+                version=None,
                 from_cache=False
             )
 
@@ -246,30 +253,35 @@ class RoutingHandlers:
 
     def _apply_filters(
         self,
+        user_id: str,
+        company_id: str,
         data: Dict[str, Any],
-        page: int,
-        page_size: int,
-        search: Optional[str],
-        sort_column: Optional[str],
-        sort_direction: str,
+        query: ListQuery,
+        version: Optional[str],
         from_cache: bool
     ) -> Dict[str, Any]:
-        """Apply search, sort, and pagination to document data."""
-        # Get the appropriate list based on current needs
-        # For now, return all data with pagination info
-        total_items = sum(data["counts"].values())
-        total_pages = (total_items + page_size - 1) // page_size if page_size > 0 else 1
+        """
+        Apply search, sort, and pagination to document data.
+
+        Only the requested page of each category is returned. Sort and token
+        indexes are kept by the list-query engine for a given cache version;
+        without version (fresh fetch) they are built for this request only.
+        """
+        result = get_list_query_engine().query(
+            scope=("routing", user_id, company_id),
+            categories={c: data.get(c, []) for c in LIST_CATEGORIES},
+            versions={c: version for c in LIST_CATEGORIES},
+            query=query,
+            search_fields=SEARCH_FIELDS,
+        )
 
         return {
             "success": True,
             "data": {
-                **data,
-                "pagination": {
-                    "page": page,
-                    "pageSize": page_size,
-                    "totalPages": total_pages,
-                    "totalItems": total_items,
-                }
+                **result["items"],
+                "counts": result["counts"],
+                "totals": result["totals"],
+                "pagination": result["pagination"],
             },
             "from_cache": from_cache
         }
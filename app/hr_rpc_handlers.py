@@ -163,6 +163,27 @@ class HRRPCHandlers:
         except Exception as e:
             logger.error(f"HR.get_company_id error={e}")
             return {"company_id": None, "error": str(e)}
+
+    async def get_company_ids(
+        self,
+        mandate_paths: List[str]
+    ) -> Dict[str, Any]:
+        """
+        Résolution batch mandate_path → company_id.
+
+        RPC: HR.get_company_ids
+        Args: mandate_paths (list[str])
+        Returns: { "company_ids": { mandate_path: "uuid" | null } }
+        """
+        try:
+            manager = get_neon_hr_manager()
+            mapping = await manager.get_company_ids_from_mandate_paths(mandate_paths or [])
+            return {
+                "company_ids": {path: str(cid) if cid else None for path, cid in mapping.items()}
+            }
+        except Exception as e:
+            logger.error(f"HR.get_company_ids error={e}")
+            return {"company_ids": {}, "error": str(e)}
     
     async def ensure_company(
         self,
@@ -1127,20 +1148,25 @@ class HRRPCHandlers:
         country_code: str = "CH",
         lang: str = "fr",
         firebase_user_id: str = None,
-        company_id: str = None
+        company_id: str = None,
+        version: str = None,
     ) -> Dict[str, Any]:
         """
         Récupère toutes les données de référence en un seul appel.
         
         RPC: HR.get_all_references
         
-        Optimal pour le chargement initial du module HR.
+        Optimal pour le chargement initial du module HR. Les tables ref_*
+        sont globales: elles sont servies par le tier de données de
+        référence (mémoire process, Redis partagé) par pays / langue,
+        quel que soit l'utilisateur ou la société.
         
         Args:
             country_code: Code pays (CH, FR, etc.)
             lang: Langue (fr, de, en, it)
-            firebase_user_id (str, optional): Firebase UID pour le cache
-            company_id (str, optional): Company ID pour la clé de cache
+            firebase_user_id (str, optional): conservé pour compatibilité (non utilisé)
+            company_id (str, optional): conservé pour compatibilité (non utilisé)
+            version (str, optional): Version déjà détenue par le client (ETag)
         
         Returns:
             {
@@ -1150,61 +1176,44 @@ class HRRPCHandlers:
                 "tax_status": [...],
                 "permit_types": [...],
                 "payroll_status": [...],
+                "version": "3f2a...",
                 "source": "cache"|"database"
             }
+            ou, si version est à jour: {"not_modified": True, "version": "...", "source": "cache"}
         """
         try:
-            # 1. Tentative cache si user_id et company_id fournis
-            if firebase_user_id and company_id:
-                cache = get_hr_cache_manager()
-                cache_sub_type = f"references:{country_code}:{lang}"
-                cached = await cache.get_cached_data(
-                    firebase_user_id,
-                    company_id,
-                    "hr",
-                    cache_sub_type,
-                    ttl_seconds=RedisTTL.HR_REFERENCES
-                )
-                if cached and cached.get("data"):
-                    logger.info(
-                        f"HR.get_all_references country={country_code} lang={lang} source=cache"
-                    )
-                    return {
-                        **cached["data"],
-                        "source": "cache"
-                    }
-            
-            # 2. Fallback via Neon direct queries (ref_* tables)
+            from .cache.reference_data import get_reference_data_store
             from .tools.neon_hr_manager import get_neon_hr_manager
 
-            manager = get_neon_hr_manager()
-            result = await manager.get_all_references(
-                country_code=country_code,
-                lang=lang,
+            async def _load() -> Dict[str, Any]:
+                result = await get_neon_hr_manager().get_all_references(
+                    country_code=country_code,
+                    lang=lang,
+                )
+                if not isinstance(result, dict) or "error" in result:
+                    raise RuntimeError(f"references load failed: {result}")
+                return result
+
+            ref = await get_reference_data_store().get(
+                f"refdata:hr:{country_code}:{lang}",
+                _load,
+                ttl=RedisTTL.HR_REFERENCES,
+                client_version=version,
             )
-            
+            source = "database" if ref.source == "loader" else "cache"
+
             logger.info(
                 f"HR.get_all_references country={country_code} lang={lang} "
-                f"keys={list(result.keys()) if isinstance(result, dict) else 'error'} source=database"
+                f"version={ref.version} not_modified={ref.not_modified} source={source}"
             )
-            
-            # 3. Sync vers Redis si user_id et company_id fournis
-            if firebase_user_id and company_id and isinstance(result, dict):
-                cache = get_hr_cache_manager()
-                cache_sub_type = f"references:{country_code}:{lang}"
-                await cache.set_cached_data(
-                    firebase_user_id,
-                    company_id,
-                    "hr",
-                    cache_sub_type,
-                    result,
-                    ttl_seconds=RedisTTL.HR_REFERENCES
-                )
-            
+
+            if ref.not_modified:
+                return {"not_modified": True, "version": ref.version, "source": source}
             return {
-                **result,
-                "source": "database"
-            } if isinstance(result, dict) else result
+                **ref.data,
+                "version": ref.version,
+                "source": source,
+            }
             
         except Exception as e:
             logger.error(f"HR.get_all_references error={e}")
@@ -328,8 +328,8 @@ class ListenersManager:
             should_broadcast_ws = True
             if space_code and thread_key:
                 try:
-                    from .llm_service.session_state_manager import SessionStateManager
-                    state_manager = SessionStateManager()
+                    from .llm_service.session_state_manager import get_session_state_manager
+                    state_manager = get_session_state_manager()
                     user_on_thread = state_manager.is_user_on_thread(uid, space_code, thread_key)
                     
                     if not user_on_thread:
@@ -380,8 +380,8 @@ class ListenersManager:
                 # Si l'utilisateur n'est pas sur ce thread, on est en mode BACKEND
                 # → Ne pas broadcaster WebSocket (économie ressources)
                 try:
-                    from .llm_service.session_state_manager import SessionStateManager
-                    state_manager = SessionStateManager()
+                    from .llm_service.session_state_manager import get_session_state_manager
+                    state_manager = get_session_state_manager()
                     user_on_thread = state_manager.is_user_on_thread(uid, sc, tk)
                     
                     if not user_on_thread:
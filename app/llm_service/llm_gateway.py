@@ -8,17 +8,30 @@ Architecture:
 - Frontend -> WebSocket -> API -> LLMGateway -> Redis Queue
 - Worker <- Redis Queue <- Traitement LLM
 - Worker -> Redis PubSub -> API -> WebSocket -> Frontend
+
+Les jobs sont répartis en lanes de priorité (interactive / callback /
+background, voir llm_queue) pour qu'une rafale de tâches planifiées ne
+retarde pas les réponses interactives.
 """
 
+import asyncio
 import json
+import time
 import uuid
 import logging
 from datetime import datetime, timezone
-from typing import Any, Optional
+from typing import Any, Iterable, Optional
 
 from ..redis_client import get_redis
 from ..config import get_settings
 from ..ecs_manager import ECSManager
+from .llm_queue import (
+    ENQUEUE_SUPERSEDING_LUA,
+    build_dedupe_key,
+    build_lane_key,
+    get_lane_stats,
+    lane_for_job_type,
+)
 
 logger = logging.getLogger("llm_service.gateway")
 
@@ -43,8 +56,16 @@ class LLMGateway:
         "onboarding_chat": "onboarding",
     }
 
+    # TTL de la clé de déduplication des jobs remplaçables
+    DEDUPE_TTL_SECONDS = 300
+
+    # Intervalle minimal entre deux vérifications ECS (cold start)
+    WORKER_CHECK_INTERVAL = 10.0
+
     def __init__(self):
         self._redis = None
+        self._enqueue_script = None
+        self._last_worker_check = 0.0
 
     @property
     def redis(self):
@@ -63,6 +84,80 @@ class LLMGateway:
         except Exception as e:
             logger.warning(f"[LLM_GATEWAY] Cold start check failed (non-blocking): {e}")
 
+    def _ensure_llm_worker_background(self) -> None:
+        """
+        Vérifie le worker hors event loop (appel boto3 bloquant), au plus
+        une fois par WORKER_CHECK_INTERVAL.
+        """
+        now = time.monotonic()
+        if now - self._last_worker_check < self.WORKER_CHECK_INTERVAL:
+            return
+        self._last_worker_check = now
+        try:
+            asyncio.get_running_loop().run_in_executor(None, self._ensure_llm_worker)
+        except RuntimeError:
+            self._ensure_llm_worker()
+
+    def _push_jobs(
+        self,
+        jobs: list[dict[str, Any]],
+        dedupe_key: Optional[str] = None,
+        extra_deletes: Iterable[str] = (),
+    ) -> int:
+        """
+        Pousse des jobs dans leur lane en un seul pipeline.
+
+        Returns:
+            Nombre de jobs en attente remplacés (déduplication)
+        """
+        pipe = self.redis.pipeline(transaction=False)
+        for job in jobs:
+            job.setdefault("lane", lane_for_job_type(job.get("type", "")))
+            lane_key = build_lane_key(job["lane"])
+            payload = json.dumps(job)
+            if dedupe_key:
+                if self._enqueue_script is None:
+                    self._enqueue_script = self.redis.register_script(ENQUEUE_SUPERSEDING_LUA)
+                self._enqueue_script(
+                    keys=[lane_key, dedupe_key],
+                    args=[payload, self.DEDUPE_TTL_SECONDS],
+                    client=pipe,
+                )
+            else:
+                pipe.lpush(lane_key, payload)
+        for key in extra_deletes:
+            pipe.delete(key)
+        results = pipe.execute()
+        return int(results[0] or 0) if dedupe_key else 0
+
+    async def _enqueue(
+        self,
+        job: dict[str, Any],
+        dedupe_key: Optional[str] = None,
+        extra_deletes: Iterable[str] = (),
+    ) -> int:
+        """Enqueue un job hors event loop, puis vérifie le worker."""
+        superseded = await asyncio.to_thread(self._push_jobs, [job], dedupe_key, list(extra_deletes))
+        self._ensure_llm_worker_background()
+        return superseded
+
+    async def enqueue_jobs(self, jobs: list[dict[str, Any]]) -> int:
+        """
+        Enqueue un lot de jobs déjà construits en un seul pipeline.
+
+        Args:
+            jobs: Jobs au format {"job_id", "type", "params", "queued_at"}
+
+        Returns:
+            Nombre de jobs enqueués
+        """
+        if not jobs:
+            return 0
+        await asyncio.to_thread(self._push_jobs, jobs)
+        self._ensure_llm_worker_background()
+        logger.info(f"[LLM_GATEWAY] Batch enqueued: count={len(jobs)}")
+        return len(jobs)
+
     async def enqueue_message(
         self,
         user_id: str,
@@ -114,27 +209,25 @@ class LLMGateway:
             "queued_at": datetime.now(timezone.utc).isoformat(),
         }
 
+        # Clear stale Telegram comm_thread mapping when Pinnokio session starts
+        # This prevents job_chat messages from being routed to an old tg_ thread
+        # (supprimé dans le même pipeline que l'enqueue)
+        extra_deletes = []
+        comm_type = kwargs.get("communication_chat_type", "pinnokio")
+        if comm_type == "pinnokio":
+            module = self._CHAT_MODE_TO_MODULE.get(chat_mode)
+            if module:
+                extra_deletes.append(f"comm_thread:{user_id}:{module}")
+
         try:
             # Enqueue le job (LPUSH pour FIFO avec BRPOP)
-            self.redis.lpush(self.QUEUE_NAME, json.dumps(job))
-            self._ensure_llm_worker()
+            await self._enqueue(job, extra_deletes=extra_deletes)
 
             logger.info(
                 f"[LLM_GATEWAY] Job enqueued: {job_id[:8]}... "
                 f"type=send_message user={user_id} thread={thread_key}"
             )
 
-            # Clear stale Telegram comm_thread mapping when Pinnokio session starts
-            # This prevents job_chat messages from being routed to an old tg_ thread
-            comm_type = kwargs.get("communication_chat_type", "pinnokio")
-            if comm_type == "pinnokio":
-                module = self._CHAT_MODE_TO_MODULE.get(chat_mode)
-                if module:
-                    try:
-                        self.redis.delete(f"comm_thread:{user_id}:{module}")
-                    except Exception:
-                        pass
-
             return {
                 "status": "queued",
                 "job_id": job_id,
@@ -183,8 +276,7 @@ class LLMGateway:
         }
 
         try:
-            self.redis.lpush(self.QUEUE_NAME, json.dumps(job))
-            self._ensure_llm_worker()
+            await self._enqueue(job)
 
             logger.info(
                 f"[LLM_GATEWAY] LPT callback enqueued: {job_id[:8]}... "
@@ -235,8 +327,7 @@ class LLMGateway:
         }
 
         try:
-            self.redis.lpush(self.QUEUE_NAME, json.dumps(job))
-            self._ensure_llm_worker()
+            await self._enqueue(job)
 
             logger.info(
                 f"[LLM_GATEWAY] Scheduled task enqueued: {job_id[:8]}... "
@@ -296,8 +387,7 @@ class LLMGateway:
         }
 
         try:
-            self.redis.lpush(self.QUEUE_NAME, json.dumps(job))
-            self._ensure_llm_worker()
+            await self._enqueue(job)
 
             logger.info(
                 f"[LLM_GATEWAY] Job enqueued: {job_id[:8]}... "
@@ -368,8 +458,7 @@ class LLMGateway:
         }
 
         try:
-            self.redis.lpush(self.QUEUE_NAME, json.dumps(job))
-            self._ensure_llm_worker()
+            await self._enqueue(job)
 
             logger.info(
                 f"[LLM_GATEWAY] Job enqueued: {job_id[:8]}... "
@@ -423,8 +512,7 @@ class LLMGateway:
         }
 
         try:
-            self.redis.lpush(self.QUEUE_NAME, json.dumps(job))
-            self._ensure_llm_worker()
+            await self._enqueue(job)
 
             logger.info(
                 f"[LLM_GATEWAY] Job enqueued: {job_id[:8]}... "
@@ -471,12 +559,16 @@ class LLMGateway:
         }
 
         try:
-            self.redis.lpush(self.QUEUE_NAME, json.dumps(job))
-            self._ensure_llm_worker()
+            # Une invalidation encore en attente pour la même company est remplacée
+            superseded = await self._enqueue(
+                job,
+                dedupe_key=build_dedupe_key("invalidate_context", user_id, collection_name),
+            )
 
             logger.info(
                 f"[LLM_GATEWAY] Job enqueued: {job_id[:8]}... "
-                f"type=invalidate_context user={user_id} company={collection_name}"
+                f"type=invalidate_context user={user_id} company={collection_name} "
+                f"superseded={superseded}"
             )
 
             return {
@@ -522,8 +614,7 @@ class LLMGateway:
         }
 
         try:
-            self.redis.lpush(self.QUEUE_NAME, json.dumps(job))
-            self._ensure_llm_worker()
+            await self._enqueue(job)
 
             logger.info(
                 f"[LLM_GATEWAY] Job enqueued: {job_id[:8]}... "
@@ -579,8 +670,7 @@ class LLMGateway:
         }
 
         try:
-            self.redis.lpush(self.QUEUE_NAME, json.dumps(job))
-            self._ensure_llm_worker()
+            await self._enqueue(job)
 
             logger.info(
                 f"[LLM_GATEWAY] Job enqueued: {queue_job_id[:8]}... "
@@ -598,14 +688,16 @@ class LLMGateway:
             raise
 
     def get_queue_length(self) -> int:
-        """Retourne le nombre de jobs dans la queue."""
-        return self.redis.llen(self.QUEUE_NAME)
+        """Retourne le nombre de jobs en attente (toutes lanes)."""
+        return sum(lane["depth"] for lane in get_lane_stats(self.redis).values())
 
     def get_queue_stats(self) -> dict[str, Any]:
-        """Retourne des statistiques sur la queue."""
+        """Retourne profondeur et âge du plus ancien job par lane."""
+        lanes = get_lane_stats(self.redis)
         return {
             "queue_name": self.QUEUE_NAME,
-            "length": self.get_queue_length(),
+            "length": sum(lane["depth"] for lane in lanes.values()),
+            "lanes": lanes,
         }
 
 
@@ -0,0 +1,212 @@
+"""
+Lanes de priorité de la queue LLM (queue:llm_jobs).
+
+Trois lanes, chacune une liste Redis (LPUSH côté gateway, RPOP côté worker):
+    queue:llm_jobs:interactive  → chat, cartes, enter_chat, stop_streaming
+    queue:llm_jobs:callback     → reprises LPT, messages de job chat
+    queue:llm_jobs:background   → tâches planifiées, invalidations, RAG
+
+Sémantique de consommation (worker):
+    Round-robin pondéré lissé (LANE_WEIGHTS, 6/3/1 par défaut). À chaque
+    dequeue, le sélecteur désigne la lane prioritaire pour ce tour; les
+    autres lanes servent de repli si elle est vide (un seul EVAL). Une
+    lane non vide reçoit donc toujours au moins sa part (pas de famine du
+    background), et une rafale de background ne retarde un job interactif
+    que de quelques jobs (un seul avec les poids par défaut).
+
+Activation: LLM_QUEUE_PRIORITY_LANES=1. Désactivé, toutes les lanes
+pointent sur la liste historique queue:llm_jobs (worker non migré).
+"""
+
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("llm_service.queue")
+
+
+# ═══════════════════════════════════════════════════════════════
+# LANES
+# ═══════════════════════════════════════════════════════════════
+
+QUEUE_NAME = "queue:llm_jobs"
+
+LANE_INTERACTIVE = "interactive"
+LANE_CALLBACK = "callback"
+LANE_BACKGROUND = "background"
+
+# Ordre de priorité (utilisé pour le repli et le BRPOP bloquant)
+LANES: Tuple[str, ...] = (LANE_INTERACTIVE, LANE_CALLBACK, LANE_BACKGROUND)
+
+LANE_WEIGHTS: Dict[str, int] = {
+    LANE_INTERACTIVE: 6,
+    LANE_CALLBACK: 3,
+    LANE_BACKGROUND: 1,
+}
+
+# type de job → lane
+JOB_TYPE_LANES: Dict[str, str] = {
+    "send_message": LANE_INTERACTIVE,
+    "enter_chat": LANE_INTERACTIVE,
+    "send_card_response": LANE_INTERACTIVE,
+    "start_onboarding_chat": LANE_INTERACTIVE,
+    "stop_streaming": LANE_INTERACTIVE,
+    "resume_workflow_after_lpt": LANE_CALLBACK,
+    "handle_job_chat_message": LANE_CALLBACK,
+    "execute_scheduled_task": LANE_BACKGROUND,
+    "invalidate_context": LANE_BACKGROUND,
+    "rag_operation": LANE_BACKGROUND,
+}
+
+
+def lanes_enabled() -> bool:
+    """True si les lanes de priorité sont activées (LLM_QUEUE_PRIORITY_LANES)."""
+    return os.getenv("LLM_QUEUE_PRIORITY_LANES", "").lower() in ("1", "true", "yes")
+
+
+def lane_for_job_type(job_type: str) -> str:
+    """Lane d'un type de job (background par défaut)."""
+    return JOB_TYPE_LANES.get(job_type, LANE_BACKGROUND)
+
+
+def build_lane_key(lane: str, enabled: Optional[bool] = None) -> str:
+    """Clé Redis d'une lane (liste historique si les lanes sont désactivées)."""
+    if enabled is None:
+        enabled = lanes_enabled()
+    return f"{QUEUE_NAME}:{lane}" if enabled else QUEUE_NAME
+
+
+def build_dedupe_key(job_type: str, *parts: str) -> str:
+    """Clé de déduplication d'un job remplaçable (ex: invalidate_context)."""
+    return f"{QUEUE_NAME}:dedupe:{job_type}:" + ":".join(str(p) for p in parts)
+
+
+# ═══════════════════════════════════════════════════════════════
+# SCRIPTS LUA
+# ═══════════════════════════════════════════════════════════════
+
+# KEYS[1] = lane, KEYS[2] = clé de dédup
+# ARGV[1] = job JSON, ARGV[2] = TTL dédup
+# Retire le job précédent encore en attente (remplacé), puis pousse le nouveau.
+ENQUEUE_SUPERSEDING_LUA = """
+local superseded = 0
+local previous = redis.call('GET', KEYS[2])
+if previous then
+    superseded = redis.call('LREM', KEYS[1], 1, previous)
+end
+redis.call('SET', KEYS[2], ARGV[1], 'EX', tonumber(ARGV[2]))
+redis.call('LPUSH', KEYS[1], ARGV[1])
+return superseded
+"""
+
+# KEYS = lanes dans l'ordre de préférence pour ce tour
+# Retourne {lane_key, job} ou nil
+DEQUEUE_LUA = """
+for _, key in ipairs(KEYS) do
+    local job = redis.call('RPOP', key)
+    if job then
+        return {key, job}
+    end
+end
+return nil
+"""
+
+
+# ═══════════════════════════════════════════════════════════════
+# CONSOMMATION (WORKER)
+# ═══════════════════════════════════════════════════════════════
+
+class WeightedLaneSelector:
+    """
+    Round-robin pondéré lissé (smooth weighted round-robin).
+
+    Sur un cycle de sum(weights) tours, chaque lane est désignée
+    exactement `weight` fois, de façon entrelacée.
+    """
+
+    def __init__(self, weights: Optional[Dict[str, int]] = None):
+        self._weights = dict(weights or LANE_WEIGHTS)
+        self._total = sum(self._weights.values())
+        self._current = {lane: 0 for lane in self._weights}
+
+    def preference(self) -> List[str]:
+        """Lane désignée pour ce tour, suivie des autres par priorité."""
+        for lane, weight in self._weights.items():
+            self._current[lane] += weight
+        chosen = max(self._weights, key=lambda lane: self._current[lane])
+        self._current[chosen] -= self._total
+        return [chosen] + [lane for lane in LANES if lane != chosen and lane in self._weights]
+
+
+class LLMJobConsumer:
+    """
+    Dequeue pondéré des jobs LLM (référence pour le worker).
+
+    Usage:
+        consumer = LLMJobConsumer(redis_client)
+        job = consumer.dequeue(timeout=5)
+    """
+
+    def __init__(self, redis_client, weights: Optional[Dict[str, int]] = None):
+        self._redis = redis_client
+        self._selector = WeightedLaneSelector(weights)
+        self._dequeue_script = redis_client.register_script(DEQUEUE_LUA)
+        self._enabled = lanes_enabled()
+
+    def dequeue(self, timeout: float = 0) -> Optional[Dict[str, Any]]:
+        """
+        Retire le prochain job selon le round-robin pondéré.
+
+        Si toutes les lanes sont vides et timeout > 0, attend (BRPOP sur
+        les lanes par ordre de priorité).
+        """
+        lanes = self._selector.preference()
+        keys = list(dict.fromkeys(build_lane_key(lane, self._enabled) for lane in lanes))
+        result = self._dequeue_script(keys=keys)
+        if not result and timeout > 0:
+            priority_keys = list(dict.fromkeys(build_lane_key(lane, self._enabled) for lane in LANES))
+            result = self._redis.brpop(priority_keys, timeout=timeout)
+        if not result:
+            return None
+        _, raw = result
+        if isinstance(raw, bytes):
+            raw = raw.decode("utf-8")
+        return json.loads(raw)
+
+
+# ═══════════════════════════════════════════════════════════════
+# GAUGES
+# ═══════════════════════════════════════════════════════════════
+
+def get_lane_stats(redis_client) -> Dict[str, Dict[str, Any]]:
+    """
+    Profondeur et âge du plus ancien job par lane (un seul pipeline).
+
+    Le plus ancien job est en queue de liste (LPUSH / RPOP): LINDEX -1.
+    """
+    enabled = lanes_enabled()
+    keys = list(dict.fromkeys(build_lane_key(lane, enabled) for lane in LANES))
+    pipe = redis_client.pipeline(transaction=False)
+    for key in keys:
+        pipe.llen(key)
+        pipe.lindex(key, -1)
+    results = pipe.execute()
+
+    now = time.time()
+    stats = {}
+    for i, key in enumerate(keys):
+        depth, oldest = results[2 * i], results[2 * i + 1]
+        age = 0.0
+        if oldest:
+            try:
+                queued_at = json.loads(oldest).get("queued_at")
+                if queued_at:
+                    age = max(0.0, now - datetime.fromisoformat(queued_at).timestamp())
+            except Exception:
+                pass
+        lane = key.rsplit(":", 1)[-1] if enabled else "all"
+        stats[lane] = {"key": key, "depth": int(depth or 0), "oldest_age_s": round(age, 3)}
+    return stats
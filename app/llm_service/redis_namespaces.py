@@ -38,24 +38,40 @@ NIVEAU 3 - BUSINESS (Logique Métier)
 UNE CLÉ PAR DOMAINE - Données métier, publiées SI company match ET page ouverte.
 Les METRICS sont CALCULÉES depuis ces données, pas stockées séparément.
 
-    business:{uid}:{cid}:bank       → { accounts, transactions, batches }
-    business:{uid}:{cid}:routing    → { documents, oauth }
-    business:{uid}:{cid}:invoices   → { items }
-    business:{uid}:{cid}:expenses   → { items }
-    business:{uid}:{cid}:coa        → { accounts, functions }
+Tier partagé société (données identiques pour tous les membres de l'équipe,
+chargées et stockées UNE fois par société):
+
+    business:shared:{cid}:bank      → { accounts, transactions, batches }
+    business:shared:{cid}:routing   → { documents }
+    business:shared:{cid}:invoices  → { items }
+    business:shared:{cid}:expenses  → { items }
+    business:shared:{cid}:coa       → { accounts, functions }
+    business:shared:{cid}:hr        → { employees, contracts }
+
+Tier utilisateur (données propres à l'utilisateur):
+
     business:{uid}:{cid}:dashboard  → { tasks, approvals, activity }
     business:{uid}:{cid}:chat       → { sessions, messages }
-    business:{uid}:{cid}:hr         → { employees, contracts }
+    business:{uid}:{cid}:tasks      → { scheduled tasks }
+
+Overlays utilisateur sur un domaine partagé (seulement ce qui diffère):
+
+    business:{uid}:{cid}:routing:overlay → { oauth }
 
     PubSub: business:{uid}:{cid}:{domain}:updates
 
 
 AUTRES CLÉS (Système)
 ─────────────────────
-    session:{uid}:{cid}:state       → État LLM session (2h TTL)
+    session:{uid}:{cid}:state       → État LLM session (HASH, 2h TTL)
+    session:{uid}:{cid}:tabs        → Présence multi-onglet (HASH session_id → thread)
+    session:{uid}:index             → Index des sessions de l'utilisateur (SET)
     chat:{uid}:{cid}:{thread}:history → Historique chat (24h TTL)
+    chat:job_replay:{space}:{thread} → Checkpoint du rejeu job_chats (24h TTL)
     lock:{type}:{resource_id}       → Locks distribués (5min TTL)
-    pending_ws_messages:{uid}:{thread} → Buffer WS (5min TTL)
+    pending_ws_messages:{uid}       → Buffer WS (STREAM, MAXLEN ~500, 5min TTL)
+    pending_ws_messages:{uid}:last_ack → Dernier buffer_id acquitté par le client
+    cache_gen:{uid|shared}:{cid}:{domain} → Génération du cache d'un domaine (INCR = invalidation)
 
 ═══════════════════════════════════════════════════════════════════════
 
@@ -94,6 +110,23 @@ class BusinessDomain(Enum):
     HR = "hr"               # Employés, contrats
 
 
+# Domaines dont les données sont celles de la société (pas de l'utilisateur):
+# une seule clé business:shared:{cid}:{domain} pour toute l'équipe.
+SHARED_BUSINESS_DOMAINS = frozenset({
+    BusinessDomain.BANK.value,
+    BusinessDomain.ROUTING.value,
+    BusinessDomain.INVOICES.value,
+    BusinessDomain.EXPENSES.value,
+    BusinessDomain.COA.value,
+    BusinessDomain.HR.value,
+})
+
+
+def is_shared_domain(domain: str) -> bool:
+    """True si le domaine est stocké dans le tier partagé société."""
+    return domain in SHARED_BUSINESS_DOMAINS
+
+
 # ═══════════════════════════════════════════════════════════════
 # PRÉFIXES DE NAMESPACES (NOUVELLE ARCHITECTURE)
 # ═══════════════════════════════════════════════════════════════
@@ -110,12 +143,14 @@ class RedisNamespace:
 
     # ─── NIVEAU 3: BUSINESS ───
     BUSINESS = "business"       # business:{uid}:{cid}:{domain}
+    SHARED_SCOPE = "shared"     # business:shared:{cid}:{domain} (tier société)
 
     # ─── SYSTÈME ───
     SESSION = "session"         # État session LLM (stateless architecture)
     CHAT = "chat"               # Historique chat (multi-instance)
     LOCK = "lock"               # Locks distribués
     WS_BUFFER = "pending_ws_messages"  # Buffer messages WebSocket
+    CACHE_GEN = "cache_gen"     # Générations de cache (invalidation O(1))
 
     # ─── LEGACY (pour rétro-compatibilité) ───
     # Ces namespaces sont dépréciés, utiliser les nouveaux ci-dessus
@@ -157,11 +192,15 @@ class RedisTTL:
     BUSINESS_CHAT = 86400       # 24 heures (sessions chat)
     BUSINESS_HR = 3600          # 1 heure (données RH)
 
+    BUSINESS_OVERLAY = 1800     # 30 minutes (overlay utilisateur, ex: oauth)
+    SHARED_WRITE_MARKER = 60    # 1 minute (dédoublonnage des fan-out)
+
     # ─── SYSTÈME ───
     SESSION = 7200              # 2 heures (prolongé à chaque activité)
     CHAT_HISTORY = 86400        # 24 heures (conversations actives)
     LOCK = 300                  # 5 minutes (évite locks orphelins)
     WS_BUFFER = 300             # 5 minutes
+    CACHE_GENERATION = 604800   # 7 jours (doit survivre aux entrées qu'elle valide)
 
     # ─── LEGACY TTLs ───
     CONTEXT = 3600
@@ -268,13 +307,54 @@ def build_business_key(uid: str, company_id: str, domain: str, item_key: str = N
     Returns:
         Clé Redis: business:{uid}:{company_id}:{domain}
         ou: business:{uid}:{company_id}:{domain}:{item_key} si item_key fourni
+
+        Pour un domaine partagé (SHARED_BUSINESS_DOMAINS), uid est ignoré:
+        business:shared:{company_id}:{domain}[:{item_key}]
     """
-    base_key = f"{RedisNamespace.BUSINESS}:{uid}:{company_id}:{domain}"
+    owner = RedisNamespace.SHARED_SCOPE if domain in SHARED_BUSINESS_DOMAINS else uid
+    base_key = f"{RedisNamespace.BUSINESS}:{owner}:{company_id}:{domain}"
     if item_key:
         return f"{base_key}:{item_key}"
     return base_key
 
 
+def build_business_overlay_key(uid: str, company_id: str, domain: str) -> str:
+    """
+    Clé de l'overlay utilisateur d'un domaine partagé.
+
+    Ne contient que ce qui diffère réellement par utilisateur (ex: statut
+    OAuth Drive pour routing); les données métier restent dans le tier
+    partagé.
+    """
+    return f"{RedisNamespace.BUSINESS}:{uid}:{company_id}:{domain}:overlay"
+
+
+def build_shared_write_marker_key(company_id: str, domain: str, fanout_id: str) -> str:
+    """
+    Marqueur "mise à jour déjà appliquée" au tier partagé.
+
+    Un même fan-out (fanout_id unique) reçu pour chaque membre de l'équipe
+    n'est écrit qu'une fois dans business:shared:{cid}:{domain}.
+    """
+    return (
+        f"{RedisNamespace.BUSINESS}:{RedisNamespace.SHARED_SCOPE}:{company_id}:"
+        f"{domain}:applied:{fanout_id}"
+    )
+
+
+def build_cache_generation_key(uid: str, company_id: str, domain: str) -> str:
+    """
+    Compteur de génération du cache d'un domaine.
+
+    Chaque entrée écrite par les cache managers porte la génération courante;
+    invalider le domaine = INCR du compteur (plus de SCAN du keyspace), les
+    entrées périmées sont ignorées à la lecture puis expirent par TTL.
+    Même portée que build_business_key: par société pour un domaine partagé.
+    """
+    owner = RedisNamespace.SHARED_SCOPE if domain in SHARED_BUSINESS_DOMAINS else uid
+    return f"{RedisNamespace.CACHE_GEN}:{owner}:{company_id}:{domain}"
+
+
 def build_bank_key(uid: str, company_id: str) -> str:
     """Clé pour les données bancaires (comptes, transactions, batches)."""
     return build_business_key(uid, company_id, BusinessDomain.BANK.value)
@@ -334,16 +414,31 @@ def build_chat_history_key(user_id: str, company_id: str, thread_key: str) -> st
     return f"{RedisNamespace.CHAT}:{user_id}:{company_id}:{thread_key}:history"
 
 
+def build_job_replay_key(space_code: str, thread_key: str) -> str:
+    """Construit la clé du checkpoint de rejeu job_chats d'un thread."""
+    return f"{RedisNamespace.CHAT}:job_replay:{space_code}:{thread_key}"
+
+
 def build_ws_channel(user_id: str, company_id: str, thread_key: str) -> str:
     """Construit le nom du canal WebSocket."""
     return f"{RedisNamespace.CHAT}:{user_id}:{company_id}:{thread_key}"
 
 
 def build_ws_buffer_key(user_id: str, thread_key: str) -> str:
-    """Construit la clé pour le buffer WebSocket."""
+    """[DEPRECATED] Ancienne liste par thread. Utiliser build_ws_stream_key()."""
     return f"{RedisNamespace.WS_BUFFER}:{user_id}:{thread_key}"
 
 
+def build_ws_stream_key(user_id: str) -> str:
+    """Construit la clé du stream de buffer WebSocket d'un utilisateur."""
+    return f"{RedisNamespace.WS_BUFFER}:{user_id}"
+
+
+def build_ws_ack_key(user_id: str) -> str:
+    """Construit la clé du dernier ID de buffer acquitté par le client."""
+    return f"{RedisNamespace.WS_BUFFER}:{user_id}:last_ack"
+
+
 def build_lock_key(lock_type: str, resource_id: str) -> str:
     """Construit la clé pour un lock distribué."""
     return f"{RedisNamespace.LOCK}:{lock_type}:{resource_id}"
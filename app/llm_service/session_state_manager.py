@@ -5,9 +5,24 @@ Ce module permet de rendre les LLMSession stateless en externalisant
 leur état dans Redis, permettant ainsi le scaling horizontal.
 
 Architecture:
-    - Clé Redis: session:{user_id}:{company_id}:state
+    - Clé Redis: session:{user_id}:{company_id}:state      (HASH, 1 champ JSON par donnée)
+    - Clé Redis: session:{user_id}:{company_id}:tabs       (HASH session_id → thread_key)
+    - Clé Redis: session:{user_id}:{company_id}:activity   (HASH thread_key → ISO datetime)
+    - Index:     session:{user_id}:index                   (SET des company_id)
+    - Index:     session:index:users                       (ZSET user_id → expiration,
+                                                             élagué à chaque écriture)
     - TTL: 2 heures (prolongé à chaque activité)
-    - Format: JSON sérialisé avec métadonnées
+
+Chaque donnée est un champ du hash: les champs "chauds" (current_active_thread,
+is_on_chat_page, updated_at) sont écrits individuellement via HSET / scripts Lua,
+sans load-modify-save du blob complet (plus de mises à jour perdues entre instances).
+
+Les vérifications de présence (is_user_on_thread*) lisent uniquement les champs
+nécessaires (HMGET/HVALS, quelques octets) et sont servies par un petit cache
+local au process (TTL court), invalidé à chaque écriture locale.
+
+Rétrocompatibilité: une ancienne clé au format blob JSON (STRING) est relue
+puis migrée automatiquement vers le format hash au premier chargement.
 
 Données externalisées:
     - user_context: Métadonnées company (mandate_path, client_uuid, etc.)
@@ -20,12 +35,80 @@ Données externalisées:
 
 import json
 import logging
+import time
 from datetime import datetime, timezone
-from typing import Dict, Optional, Any, Tuple
+from typing import Dict, List, Optional, Any, Tuple
+
+from redis.exceptions import ResponseError
 
 logger = logging.getLogger("llm_service.session_state")
 
 
+# ═══════════════════════════════════════════════════════════════
+# SCRIPTS LUA (mises à jour atomiques au niveau champ)
+# ═══════════════════════════════════════════════════════════════
+
+# KEYS[1]=state ; ARGV[1]=ttl (0 = pas de prolongation) ; ARGV[2..]=field, value, ...
+# Retourne 0 si la session n'existe pas.
+_UPDATE_FIELDS_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+for i = 2, #ARGV, 2 do
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+local ttl = tonumber(ARGV[1])
+if ttl > 0 then
+    redis.call('EXPIRE', KEYS[1], ttl)
+end
+return 1
+"""
+
+# KEYS[1]=state, KEYS[2]=tabs ; ARGV: ttl, session_id, thread_key, thread_json, updated_at_json
+_SET_TAB_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HSET', KEYS[2], ARGV[2], ARGV[3])
+redis.call('HSET', KEYS[1], 'is_on_chat_page', 'true', 'current_active_thread', ARGV[4], 'updated_at', ARGV[5])
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[1]))
+redis.call('EXPIRE', KEYS[2], tonumber(ARGV[1]))
+return 1
+"""
+
+# KEYS[1]=state, KEYS[2]=tabs ; ARGV: ttl, session_id, updated_at_json
+# Retourne {existe, thread_retiré, onglets_restants}
+_REMOVE_TAB_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    redis.call('DEL', KEYS[2])
+    return {0, false, 0}
+end
+local removed = redis.call('HGET', KEYS[2], ARGV[2])
+redis.call('HDEL', KEYS[2], ARGV[2])
+local remaining = redis.call('HLEN', KEYS[2])
+if remaining == 0 then
+    redis.call('HSET', KEYS[1], 'is_on_chat_page', 'false', 'current_active_thread', 'null', 'updated_at', ARGV[3])
+else
+    redis.call('HSET', KEYS[1], 'is_on_chat_page', 'true', 'updated_at', ARGV[3])
+    redis.call('EXPIRE', KEYS[2], tonumber(ARGV[1]))
+end
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[1]))
+return {1, removed, remaining}
+"""
+
+# KEYS[1]=state, KEYS[2]=activity ; ARGV: ttl, thread_key, iso_datetime, updated_at_json
+_TOUCH_ACTIVITY_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HSET', KEYS[2], ARGV[2], ARGV[3])
+redis.call('HSET', KEYS[1], 'updated_at', ARGV[4])
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[1]))
+redis.call('EXPIRE', KEYS[2], tonumber(ARGV[1]))
+return 1
+"""
+
+
 class SessionStateManager:
     """
     Gestionnaire d'état session externalisé dans Redis.
@@ -41,6 +124,14 @@ class SessionStateManager:
     # Préfixe pour les clés Redis
     KEY_PREFIX = "session"
     
+    # Cache local de présence (secondes / nombre max d'entrées)
+    PRESENCE_CACHE_TTL = 2.0
+    PRESENCE_CACHE_MAX_ENTRIES = 4096
+    
+    # Champs stockés dans des hashes dédiés (pas dans le hash d'état)
+    _TABS_FIELD = "active_threads_by_session"
+    _ACTIVITY_FIELD = "last_activity"
+    
     def __init__(self, redis_client=None):
         """
         Initialise le SessionStateManager.
@@ -49,6 +140,9 @@ class SessionStateManager:
             redis_client: Client Redis optionnel (utilise get_redis() si non fourni)
         """
         self._redis = redis_client
+        self._scripts: Dict[str, Any] = {}
+        # (user_id, company_id) → (expires_at, snapshot de présence)
+        self._presence_cache: Dict[Tuple[str, str], Tuple[float, Dict[str, Any]]] = {}
     
     @property
     def redis(self):
@@ -58,6 +152,38 @@ class SessionStateManager:
             self._redis = get_redis()
         return self._redis
     
+    @staticmethod
+    def _is_wrongtype(error: Exception) -> bool:
+        """True si l'erreur Redis vient d'une clé legacy (STRING) lue comme hash."""
+        return isinstance(error, ResponseError) and "WRONGTYPE" in str(error)
+    
+    def _run_script(
+        self,
+        name: str,
+        source: str,
+        user_id: str,
+        company_id: str,
+        keys: List[str],
+        args: List[Any]
+    ):
+        """
+        Exécute un script Lua (enregistré une seule fois).
+        
+        Si la session est encore au format blob JSON, elle est migrée
+        en hash puis le script est rejoué.
+        """
+        script = self._scripts.get(name)
+        if script is None:
+            script = self.redis.register_script(source)
+            self._scripts[name] = script
+        try:
+            return script(keys=keys, args=args)
+        except ResponseError as e:
+            if not self._is_wrongtype(e):
+                raise
+            self._migrate_legacy_state(user_id, company_id)
+            return script(keys=keys, args=args)
+    
     def _build_key(self, user_id: str, company_id: str) -> str:
         """
         Construit la clé Redis pour une session.
@@ -66,6 +192,29 @@ class SessionStateManager:
         """
         return f"{self.KEY_PREFIX}:{user_id}:{company_id}:state"
     
+    def _build_tabs_key(self, user_id: str, company_id: str) -> str:
+        """Format: session:{user_id}:{company_id}:tabs (session_id → thread_key)."""
+        return f"{self.KEY_PREFIX}:{user_id}:{company_id}:tabs"
+    
+    def _build_activity_key(self, user_id: str, company_id: str) -> str:
+        """Format: session:{user_id}:{company_id}:activity (thread_key → ISO datetime)."""
+        return f"{self.KEY_PREFIX}:{user_id}:{company_id}:activity"
+    
+    def _build_user_index_key(self, user_id: str) -> str:
+        """Format: session:{user_id}:index (SET des company_id avec une session)."""
+        return f"{self.KEY_PREFIX}:{user_id}:index"
+    
+    def _build_users_index_key(self) -> str:
+        """Format: session:index:users (ZSET user_id → timestamp d'expiration de sa dernière session)."""
+        return f"{self.KEY_PREFIX}:index:users"
+    
+    def _index_user(self, pipe, user_id: str, ttl_seconds: int) -> None:
+        """Inscrit user_id dans l'index global et en retire les utilisateurs expirés."""
+        now = time.time()
+        users_key = self._build_users_index_key()
+        pipe.zadd(users_key, {user_id: now + ttl_seconds}, gt=True)
+        pipe.zremrangebyscore(users_key, "-inf", now)
+    
     def _serialize_datetime(self, dt: datetime) -> str:
         """Convertit un datetime en string ISO."""
         if isinstance(dt, datetime):
@@ -81,6 +230,52 @@ class SessionStateManager:
         except (ValueError, TypeError):
             return None
     
+    @staticmethod
+    def _serialize_value(v):
+        """Encode récursivement les types spéciaux (datetime, set)."""
+        if isinstance(v, datetime):
+            return {"__type__": "datetime", "value": v.isoformat()}
+        elif isinstance(v, set):
+            return {"__type__": "set", "value": list(v)}
+        elif isinstance(v, dict):
+            return {k: SessionStateManager._serialize_value(val) for k, val in v.items()}
+        elif isinstance(v, list):
+            return [SessionStateManager._serialize_value(item) for item in v]
+        return v
+    
+    @staticmethod
+    def _deserialize_value(v):
+        """Décode récursivement les types spéciaux (datetime, set)."""
+        if isinstance(v, dict):
+            if v.get("__type__") == "datetime":
+                return datetime.fromisoformat(v["value"])
+            elif v.get("__type__") == "set":
+                return set(v["value"])
+            else:
+                return {k: SessionStateManager._deserialize_value(val) for k, val in v.items()}
+        elif isinstance(v, list):
+            return [SessionStateManager._deserialize_value(item) for item in v]
+        return v
+    
+    def _encode_field(self, value: Any) -> str:
+        """Sérialise la valeur d'un champ du hash d'état en JSON."""
+        return json.dumps(self._serialize_value(value), ensure_ascii=False, default=str)
+    
+    def _decode_field(self, raw: Any) -> Any:
+        """Désérialise la valeur JSON d'un champ du hash d'état."""
+        if raw is None:
+            return None
+        if isinstance(raw, bytes):
+            raw = raw.decode('utf-8')
+        return self._deserialize_value(json.loads(raw))
+    
+    @staticmethod
+    def _to_str(value: Any) -> Any:
+        """Décode bytes → str (clients sans decode_responses)."""
+        if isinstance(value, bytes):
+            return value.decode('utf-8')
+        return value
+    
     def _serialize_state(self, state: Dict[str, Any]) -> str:
         """
         Sérialise l'état de session en JSON.
@@ -89,18 +284,7 @@ class SessionStateManager:
         - datetime → ISO string
         - set → list
         """
-        def _serialize_value(v):
-            if isinstance(v, datetime):
-                return {"__type__": "datetime", "value": v.isoformat()}
-            elif isinstance(v, set):
-                return {"__type__": "set", "value": list(v)}
-            elif isinstance(v, dict):
-                return {k: _serialize_value(val) for k, val in v.items()}
-            elif isinstance(v, list):
-                return [_serialize_value(item) for item in v]
-            return v
-        
-        serialized = {k: _serialize_value(v) for k, v in state.items()}
+        serialized = {k: self._serialize_value(v) for k, v in state.items()}
         return json.dumps(serialized, ensure_ascii=False, default=str)
     
     def _deserialize_state(self, json_str: str) -> Dict[str, Any]:
@@ -111,20 +295,59 @@ class SessionStateManager:
         - datetime ISO string → datetime
         - set list → set
         """
-        def _deserialize_value(v):
-            if isinstance(v, dict):
-                if v.get("__type__") == "datetime":
-                    return datetime.fromisoformat(v["value"])
-                elif v.get("__type__") == "set":
-                    return set(v["value"])
-                else:
-                    return {k: _deserialize_value(val) for k, val in v.items()}
-            elif isinstance(v, list):
-                return [_deserialize_value(item) for item in v]
-            return v
-        
         data = json.loads(json_str)
-        return {k: _deserialize_value(v) for k, v in data.items()}
+        return {k: self._deserialize_value(v) for k, v in data.items()}
+    
+    def _now_field(self) -> str:
+        """Valeur encodée du champ updated_at."""
+        return self._encode_field(datetime.now(timezone.utc).isoformat())
+    
+    def _invalidate_presence(self, user_id: str, company_id: str) -> None:
+        """Invalide l'entrée locale du cache de présence."""
+        self._presence_cache.pop((user_id, company_id), None)
+    
+    def _write_full_state(
+        self,
+        user_id: str,
+        company_id: str,
+        state: Dict[str, Any],
+        ttl_seconds: int
+    ) -> None:
+        """
+        Écrit un état complet (remplace les clés existantes) en une transaction.
+        
+        Les champs active_threads_by_session et last_activity sont stockés
+        dans leurs hashes dédiés.
+        """
+        key = self._build_key(user_id, company_id)
+        tabs_key = self._build_tabs_key(user_id, company_id)
+        activity_key = self._build_activity_key(user_id, company_id)
+        
+        state = dict(state)
+        tabs = state.pop(self._TABS_FIELD, None) or {}
+        last_activity = state.pop(self._ACTIVITY_FIELD, None) or {}
+        
+        mapping = {field: self._encode_field(value) for field, value in state.items()}
+        
+        pipe = self.redis.pipeline(transaction=True)
+        pipe.delete(key, tabs_key, activity_key)
+        pipe.hset(key, mapping=mapping)
+        pipe.expire(key, ttl_seconds)
+        if tabs:
+            pipe.hset(tabs_key, mapping=tabs)
+            pipe.expire(tabs_key, ttl_seconds)
+        if last_activity:
+            pipe.hset(activity_key, mapping={
+                thread_key: self._serialize_datetime(dt)
+                for thread_key, dt in last_activity.items()
+            })
+            pipe.expire(activity_key, ttl_seconds)
+        pipe.sadd(self._build_user_index_key(user_id), company_id)
+        pipe.expire(self._build_user_index_key(user_id), ttl_seconds)
+        self._index_user(pipe, user_id, ttl_seconds)
+        pipe.execute()
+        
+        self._invalidate_presence(user_id, company_id)
     
     # ═══════════════════════════════════════════════════════════════
     # OPÉRATIONS CRUD PRINCIPALES
@@ -163,19 +386,13 @@ class SessionStateManager:
             thread_contexts: Cache contexte LPT par thread
             active_threads: Liste des threads actifs
             ttl: TTL personnalisé (défaut: 2h)
-            
+        
         Returns:
             True si sauvegarde réussie
         """
         try:
             key = self._build_key(user_id, company_id)
             
-            # Convertir last_activity (Dict[str, datetime]) en Dict[str, str]
-            last_activity_serialized = {}
-            if last_activity:
-                for thread_key, dt in last_activity.items():
-                    last_activity_serialized[thread_key] = self._serialize_datetime(dt)
-            
             state = {
                 "user_context": user_context or {},
                 "jobs_data": jobs_data or {},
@@ -184,28 +401,59 @@ class SessionStateManager:
                 "current_active_thread": current_active_thread,
                 "thread_states": thread_states or {},
                 "active_tasks": active_tasks or {},
-                "last_activity": last_activity_serialized,
+                "last_activity": last_activity or {},
                 "thread_contexts": thread_contexts or {},
                 "active_threads": active_threads or [],
                 "updated_at": datetime.now(timezone.utc).isoformat(),
-                "version": "1.0"
+                "version": "2.0"
             }
             
             ttl_seconds = ttl or self.DEFAULT_TTL
-            serialized = self._serialize_state(state)
-            
-            self.redis.setex(key, ttl_seconds, serialized)
+            self._write_full_state(user_id, company_id, state, ttl_seconds)
             
             logger.debug(
                 f"[SESSION_STATE] 💾 Session sauvegardée: {key} (TTL: {ttl_seconds}s)"
             )
             
             return True
-            
+        
         except Exception as e:
             logger.error(f"[SESSION_STATE] ❌ Erreur sauvegarde: {e}", exc_info=True)
             return False
     
+    def _migrate_legacy_state(
+        self,
+        user_id: str,
+        company_id: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Relit une session au format blob JSON (STRING) et la migre en hash.
+        
+        Returns:
+            L'état désérialisé (format load_session_state), ou None
+        """
+        key = self._build_key(user_id, company_id)
+        data = self.redis.get(key)
+        if not data:
+            return None
+        
+        state = self._deserialize_state(self._to_str(data))
+        last_activity = {}
+        for thread_key, dt_str in (state.get(self._ACTIVITY_FIELD) or {}).items():
+            dt = self._deserialize_datetime(dt_str)
+            if dt:
+                last_activity[thread_key] = dt
+        state[self._ACTIVITY_FIELD] = last_activity
+        state.setdefault(self._TABS_FIELD, {})
+        
+        ttl_seconds = self.redis.ttl(key)
+        if not ttl_seconds or ttl_seconds <= 0:
+            ttl_seconds = self.DEFAULT_TTL
+        self._write_full_state(user_id, company_id, state, ttl_seconds)
+        
+        logger.info(f"[SESSION_STATE] 🔁 Session legacy migrée en hash: {key}")
+        return state
+    
     def load_session_state(
         self,
         user_id: str,
@@ -217,38 +465,52 @@ class SessionStateManager:
         Args:
             user_id: ID Firebase de l'utilisateur
             company_id: ID de la société
-            
+        
         Returns:
             Dict avec l'état de session, ou None si non trouvé
         """
         try:
             key = self._build_key(user_id, company_id)
             
-            data = self.redis.get(key)
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hgetall(key)
+            pipe.hgetall(self._build_tabs_key(user_id, company_id))
+            pipe.hgetall(self._build_activity_key(user_id, company_id))
+            raw_state, raw_tabs, raw_activity = pipe.execute(raise_on_error=False)
+            
+            if isinstance(raw_state, Exception):
+                if not self._is_wrongtype(raw_state):
+                    raise raw_state
+                # Ancienne session au format blob JSON
+                return self._migrate_legacy_state(user_id, company_id)
             
-            if not data:
+            if not raw_state:
                 logger.debug(f"[SESSION_STATE] ❌ Session non trouvée: {key}")
                 return None
             
-            # Décoder bytes si nécessaire
-            if isinstance(data, bytes):
-                data = data.decode('utf-8')
-            
-            state = self._deserialize_state(data)
+            state = {
+                self._to_str(field): self._decode_field(value)
+                for field, value in raw_state.items()
+            }
             
-            # Reconvertir last_activity en Dict[str, datetime]
-            if "last_activity" in state:
-                last_activity_raw = state["last_activity"]
-                state["last_activity"] = {}
-                for thread_key, dt_str in last_activity_raw.items():
-                    dt = self._deserialize_datetime(dt_str)
+            state[self._TABS_FIELD] = {}
+            if not isinstance(raw_tabs, Exception):
+                state[self._TABS_FIELD] = {
+                    self._to_str(sid): self._to_str(thread)
+                    for sid, thread in raw_tabs.items()
+                }
+            
+            state[self._ACTIVITY_FIELD] = {}
+            if not isinstance(raw_activity, Exception):
+                for thread_key, dt_str in raw_activity.items():
+                    dt = self._deserialize_datetime(self._to_str(dt_str))
                     if dt:
-                        state["last_activity"][thread_key] = dt
+                        state[self._ACTIVITY_FIELD][self._to_str(thread_key)] = dt
             
             logger.debug(f"[SESSION_STATE] ✅ Session chargée: {key}")
             
             return state
-            
+        
         except Exception as e:
             logger.error(f"[SESSION_STATE] ❌ Erreur chargement: {e}", exc_info=True)
             return None
@@ -263,38 +525,47 @@ class SessionStateManager:
         """
         Met à jour partiellement l'état d'une session.
         
+        Seuls les champs fournis sont écrits (HSET atomique via Lua),
+        sans relire ni réécrire le reste de l'état.
+        
         Args:
             user_id: ID Firebase de l'utilisateur
             company_id: ID de la société
             updates: Dict des champs à mettre à jour
             extend_ttl: Prolonger le TTL à chaque update?
-            
+        
         Returns:
             True si mise à jour réussie
         """
         try:
-            # Charger l'état existant
-            state = self.load_session_state(user_id, company_id)
+            key = self._build_key(user_id, company_id)
             
-            if state is None:
+            updates = dict(updates)
+            tabs = updates.pop(self._TABS_FIELD, None)
+            last_activity = updates.pop(self._ACTIVITY_FIELD, None)
+            updates["updated_at"] = datetime.now(timezone.utc).isoformat()
+            
+            ttl_seconds = self.DEFAULT_TTL if extend_ttl else 0
+            args = [ttl_seconds]
+            for field, value in updates.items():
+                args.extend([field, self._encode_field(value)])
+            
+            updated = self._run_script(
+                "update_fields", _UPDATE_FIELDS_LUA, user_id, company_id,
+                keys=[key], args=args
+            )
+            
+            if not updated:
                 logger.warning(
                     f"[SESSION_STATE] ⚠️ Session inexistante pour update: "
                     f"{user_id}:{company_id}"
                 )
                 return False
             
-            # Appliquer les mises à jour
-            state.update(updates)
-            state["updated_at"] = datetime.now(timezone.utc).isoformat()
+            if tabs is not None or last_activity is not None:
+                self._replace_side_hashes(user_id, company_id, tabs, last_activity)
             
-            # Sauvegarder
-            key = self._build_key(user_id, company_id)
-            serialized = self._serialize_state(state)
-            
-            if extend_ttl:
-                self.redis.setex(key, self.DEFAULT_TTL, serialized)
-            else:
-                self.redis.set(key, serialized)
+            self._invalidate_presence(user_id, company_id)
             
             logger.debug(
                 f"[SESSION_STATE] 🔄 Session mise à jour: {key} "
@@ -302,11 +573,37 @@ class SessionStateManager:
             )
             
             return True
-            
+        
         except Exception as e:
             logger.error(f"[SESSION_STATE] ❌ Erreur update: {e}", exc_info=True)
             return False
     
+    def _replace_side_hashes(
+        self,
+        user_id: str,
+        company_id: str,
+        tabs: Optional[Dict[str, str]],
+        last_activity: Optional[Dict[str, datetime]]
+    ) -> None:
+        """Remplace les hashes tabs / activity (updates legacy passant le dict complet)."""
+        pipe = self.redis.pipeline(transaction=True)
+        if tabs is not None:
+            tabs_key = self._build_tabs_key(user_id, company_id)
+            pipe.delete(tabs_key)
+            if tabs:
+                pipe.hset(tabs_key, mapping=tabs)
+                pipe.expire(tabs_key, self.DEFAULT_TTL)
+        if last_activity is not None:
+            activity_key = self._build_activity_key(user_id, company_id)
+            pipe.delete(activity_key)
+            if last_activity:
+                pipe.hset(activity_key, mapping={
+                    thread_key: self._serialize_datetime(dt)
+                    for thread_key, dt in last_activity.items()
+                })
+                pipe.expire(activity_key, self.DEFAULT_TTL)
+        pipe.execute()
+    
     def delete_session_state(
         self,
         user_id: str,
@@ -318,13 +615,23 @@ class SessionStateManager:
         Args:
             user_id: ID Firebase de l'utilisateur
             company_id: ID de la société
-            
+        
         Returns:
             True si suppression réussie
         """
         try:
             key = self._build_key(user_id, company_id)
-            deleted = self.redis.delete(key)
+            
+            pipe = self.redis.pipeline(transaction=True)
+            pipe.delete(
+                key,
+                self._build_tabs_key(user_id, company_id),
+                self._build_activity_key(user_id, company_id)
+            )
+            pipe.srem(self._build_user_index_key(user_id), company_id)
+            deleted = pipe.execute()[0]
+            
+            self._invalidate_presence(user_id, company_id)
             
             if deleted:
                 logger.info(f"[SESSION_STATE] 🗑️ Session supprimée: {key}")
@@ -332,7 +639,7 @@ class SessionStateManager:
                 logger.debug(f"[SESSION_STATE] Session déjà absente: {key}")
             
             return True
-            
+        
         except Exception as e:
             logger.error(f"[SESSION_STATE] ❌ Erreur suppression: {e}", exc_info=True)
             return False
@@ -387,44 +694,41 @@ class SessionStateManager:
             session_id: ID unique de l'onglet/connexion WebSocket
             thread_key: Thread sur lequel l'utilisateur entre
             is_on_chat_page: True si sur la page chat
-            
+        
         Returns:
             True si mise à jour réussie
         """
         try:
-            state = self.load_session_state(user_id, company_id)
+            updated = self._run_script(
+                "set_tab", _SET_TAB_LUA, user_id, company_id,
+                keys=[
+                    self._build_key(user_id, company_id),
+                    self._build_tabs_key(user_id, company_id)
+                ],
+                args=[
+                    self.DEFAULT_TTL,
+                    session_id,
+                    thread_key,
+                    self._encode_field(thread_key),
+                    self._now_field()
+                ]
+            )
+            self._invalidate_presence(user_id, company_id)
             
-            if state is None:
+            if not updated:
                 logger.warning(
                     f"[SESSION_STATE] ⚠️ Session inexistante pour update_presence_multi_tab: "
                     f"{user_id}:{company_id}"
                 )
                 return False
             
-            # Récupérer ou initialiser le dictionnaire des threads actifs par session
-            active_threads_by_session = state.get("active_threads_by_session", {})
-            
-            # Mettre à jour le thread pour cette session/onglet
-            active_threads_by_session[session_id] = thread_key
-            
-            # Mettre à jour l'état
-            updates = {
-                "active_threads_by_session": active_threads_by_session,
-                "is_on_chat_page": True,  # Au moins un onglet est sur le chat
-                # Conserver current_active_thread pour rétrocompatibilité (dernier thread actif)
-                "current_active_thread": thread_key
-            }
-            
-            success = self.update_session_state(user_id, company_id, updates)
-            
-            if success:
-                logger.info(
-                    f"[SESSION_STATE] 📍 Multi-tab presence updated: "
-                    f"user={user_id}, session={session_id[:8]}..., thread={thread_key}"
-                )
-            
-            return success
+            logger.info(
+                f"[SESSION_STATE] 📍 Multi-tab presence updated: "
+                f"user={user_id}, session={session_id[:8]}..., thread={thread_key}"
+            )
             
+            return True
+        
         except Exception as e:
             logger.error(f"[SESSION_STATE] ❌ Erreur update_presence_multi_tab: {e}", exc_info=True)
             return False
@@ -442,48 +746,83 @@ class SessionStateManager:
             user_id: ID Firebase de l'utilisateur
             company_id: ID de la société
             session_id: ID unique de l'onglet qui se déconnecte
-            
+        
         Returns:
             True si mise à jour réussie
         """
         try:
-            state = self.load_session_state(user_id, company_id)
+            exists, removed_thread, remaining = self._run_script(
+                "remove_tab", _REMOVE_TAB_LUA, user_id, company_id,
+                keys=[
+                    self._build_key(user_id, company_id),
+                    self._build_tabs_key(user_id, company_id)
+                ],
+                args=[self.DEFAULT_TTL, session_id, self._now_field()]
+            )
+            self._invalidate_presence(user_id, company_id)
             
-            if state is None:
+            if not exists:
                 return True  # Session déjà supprimée, c'est OK
             
-            active_threads_by_session = state.get("active_threads_by_session", {})
-            
-            # Supprimer cette session du dictionnaire
-            removed_thread = active_threads_by_session.pop(session_id, None)
-            
-            # Déterminer le nouvel état
-            has_active_tabs = len(active_threads_by_session) > 0
-            
-            updates = {
-                "active_threads_by_session": active_threads_by_session,
-                "is_on_chat_page": has_active_tabs
-            }
-            
-            # Si plus aucun onglet actif, effacer current_active_thread
-            if not has_active_tabs:
-                updates["current_active_thread"] = None
-            
-            success = self.update_session_state(user_id, company_id, updates)
-            
-            if success:
-                logger.info(
-                    f"[SESSION_STATE] 🚪 Tab presence removed: "
-                    f"user={user_id}, session={session_id[:8]}..., "
-                    f"removed_thread={removed_thread}, remaining_tabs={len(active_threads_by_session)}"
-                )
-            
-            return success
+            logger.info(
+                f"[SESSION_STATE] 🚪 Tab presence removed: "
+                f"user={user_id}, session={session_id[:8]}..., "
+                f"removed_thread={self._to_str(removed_thread)}, remaining_tabs={remaining}"
+            )
             
+            return True
+        
         except Exception as e:
             logger.error(f"[SESSION_STATE] ❌ Erreur remove_tab_presence: {e}", exc_info=True)
             return False
     
+    def _get_presence_snapshot(self, user_id: str, company_id: str) -> Dict[str, Any]:
+        """
+        Retourne les champs de présence (servis par le cache local si frais).
+        
+        Une seule requête pipelinée: HVALS tabs + HMGET des 2 champs de présence.
+        
+        Returns:
+            Dict {exists, is_on_chat_page, current_active_thread, tab_threads}
+        """
+        cache_key = (user_id, company_id)
+        now = time.monotonic()
+        cached = self._presence_cache.get(cache_key)
+        if cached and cached[0] > now:
+            return cached[1]
+        
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hvals(self._build_tabs_key(user_id, company_id))
+        pipe.hmget(
+            self._build_key(user_id, company_id),
+            ["is_on_chat_page", "current_active_thread"]
+        )
+        tab_threads, presence = pipe.execute(raise_on_error=False)
+        if isinstance(presence, Exception):
+            if not self._is_wrongtype(presence):
+                raise presence
+            # Session legacy → migration puis relecture
+            state = self._migrate_legacy_state(user_id, company_id) or {}
+            tab_threads = list((state.get(self._TABS_FIELD) or {}).values())
+            presence = [
+                self._encode_field(state.get("is_on_chat_page", False)) if state else None,
+                self._encode_field(state.get("current_active_thread")),
+            ]
+        raw_on_chat, raw_thread = presence
+        
+        snapshot = {
+            "exists": raw_on_chat is not None,
+            "is_on_chat_page": bool(self._decode_field(raw_on_chat)),
+            "current_active_thread": self._decode_field(raw_thread),
+            "tab_threads": frozenset(self._to_str(t) for t in tab_threads),
+        }
+        
+        if len(self._presence_cache) >= self.PRESENCE_CACHE_MAX_ENTRIES:
+            self._presence_cache.clear()
+        self._presence_cache[cache_key] = (now + self.PRESENCE_CACHE_TTL, snapshot)
+        
+        return snapshot
+    
     def is_user_on_thread_multi_tab(
         self,
         user_id: str,
@@ -499,28 +838,23 @@ class SessionStateManager:
             user_id: ID de l'utilisateur
             company_id: ID de la société
             thread_key: Thread à vérifier
-            
+        
         Returns:
             True si au moins un onglet a ce thread ouvert
         """
         try:
-            state = self.load_session_state(user_id, company_id)
+            snapshot = self._get_presence_snapshot(user_id, company_id)
             
-            if not state:
+            if not snapshot["exists"]:
                 return False
             
-            # Vérifier dans le nouveau dictionnaire multi-tab
-            active_threads_by_session = state.get("active_threads_by_session", {})
-            
-            if active_threads_by_session:
-                return thread_key in active_threads_by_session.values()
+            # Vérifier dans le hash multi-tab
+            if snapshot["tab_threads"]:
+                return thread_key in snapshot["tab_threads"]
             
             # Fallback: utiliser l'ancien champ pour rétrocompatibilité
-            is_on_chat = state.get("is_on_chat_page", False)
-            current_thread = state.get("current_active_thread")
-            
-            return is_on_chat and current_thread == thread_key
-            
+            return snapshot["is_on_chat_page"] and snapshot["current_active_thread"] == thread_key
+        
         except Exception as e:
             logger.error(f"[SESSION_STATE] ❌ Erreur is_user_on_thread_multi_tab: {e}")
             return False
@@ -538,24 +872,19 @@ class SessionStateManager:
             user_id: ID de l'utilisateur
             company_id: ID de la société
             thread_key: Thread à vérifier
-            
+        
         Returns:
             Liste des session_ids avec ce thread ouvert
         """
         try:
-            state = self.load_session_state(user_id, company_id)
-            
-            if not state:
-                return []
-            
-            active_threads_by_session = state.get("active_threads_by_session", {})
+            active_threads_by_session = self.get_all_active_tabs(user_id, company_id)
             
             return [
-                session_id 
-                for session_id, thread in active_threads_by_session.items() 
+                session_id
+                for session_id, thread in active_threads_by_session.items()
                 if thread == thread_key
             ]
-            
+        
         except Exception as e:
             logger.error(f"[SESSION_STATE] ❌ Erreur get_active_tabs_for_thread: {e}")
             return []
@@ -571,18 +900,18 @@ class SessionStateManager:
         Args:
             user_id: ID de l'utilisateur
             company_id: ID de la société
-            
+        
         Returns:
             Dict {session_id: thread_key}
         """
         try:
-            state = self.load_session_state(user_id, company_id)
-            
-            if not state:
-                return {}
-            
-            return state.get("active_threads_by_session", {})
+            raw_tabs = self.redis.hgetall(self._build_tabs_key(user_id, company_id))
             
+            return {
+                self._to_str(session_id): self._to_str(thread)
+                for session_id, thread in raw_tabs.items()
+            }
+        
         except Exception as e:
             logger.error(f"[SESSION_STATE] ❌ Erreur get_all_active_tabs: {e}")
             return {}
@@ -601,19 +930,25 @@ class SessionStateManager:
             company_id: ID de la société
             thread_key: Thread sur lequel il y a eu activité
         """
-        state = self.load_session_state(user_id, company_id)
+        try:
+            updated = self._run_script(
+                "touch_activity", _TOUCH_ACTIVITY_LUA, user_id, company_id,
+                keys=[
+                    self._build_key(user_id, company_id),
+                    self._build_activity_key(user_id, company_id)
+                ],
+                args=[
+                    self.DEFAULT_TTL,
+                    thread_key,
+                    datetime.now(timezone.utc).isoformat(),
+                    self._now_field()
+                ]
+            )
+            return bool(updated)
         
-        if state is None:
+        except Exception as e:
+            logger.error(f"[SESSION_STATE] ❌ Erreur update_thread_activity: {e}", exc_info=True)
             return False
-        
-        last_activity = state.get("last_activity", {})
-        last_activity[thread_key] = datetime.now(timezone.utc)
-        
-        return self.update_session_state(
-            user_id, 
-            company_id, 
-            {"last_activity": last_activity}
-        )
     
     def update_jobs_data(
         self,
@@ -640,6 +975,29 @@ class SessionStateManager:
             }
         )
     
+    def _get_fields(self, user_id: str, company_id: str, *fields: str) -> Optional[list]:
+        """
+        Lit quelques champs du hash d'état (HMGET).
+        
+        Returns:
+            Liste des valeurs désérialisées, ou None si la session n'existe pas
+        """
+        key = self._build_key(user_id, company_id)
+        try:
+            raw_values = self.redis.hmget(key, list(fields))
+        except ResponseError as e:
+            if not self._is_wrongtype(e):
+                raise
+            # Session legacy → migration puis lecture
+            state = self._migrate_legacy_state(user_id, company_id)
+            if state is None:
+                return None
+            return [state.get(field) for field in fields]
+        
+        if all(value is None for value in raw_values):
+            return None
+        return [self._decode_field(value) for value in raw_values]
+    
     def get_user_context(
         self,
         user_id: str,
@@ -648,12 +1006,12 @@ class SessionStateManager:
         """
         Récupère uniquement le contexte utilisateur.
         
-        Optimisation: Évite de charger tout l'état si seul user_context est nécessaire.
+        Optimisation: HGET du seul champ user_context (pas de chargement complet).
         """
-        state = self.load_session_state(user_id, company_id)
+        values = self._get_fields(user_id, company_id, "user_context")
         
-        if state:
-            return state.get("user_context")
+        if values:
+            return values[0]
         return None
     
     def get_jobs_data(
@@ -667,10 +1025,10 @@ class SessionStateManager:
         Returns:
             Tuple (jobs_data, jobs_metrics)
         """
-        state = self.load_session_state(user_id, company_id)
+        values = self._get_fields(user_id, company_id, "jobs_data", "jobs_metrics")
         
-        if state:
-            return state.get("jobs_data"), state.get("jobs_metrics")
+        if values:
+            return values[0], values[1]
         return None, None
     
     def is_user_on_thread(
@@ -686,19 +1044,21 @@ class SessionStateManager:
             user_id: ID de l'utilisateur
             company_id: ID de la société
             thread_key: Thread à vérifier
-            
+        
         Returns:
             True si l'utilisateur est sur la page chat ET sur ce thread
         """
-        state = self.load_session_state(user_id, company_id)
+        try:
+            snapshot = self._get_presence_snapshot(user_id, company_id)
+            
+            if not snapshot["exists"]:
+                return False
+            
+            return snapshot["is_on_chat_page"] and snapshot["current_active_thread"] == thread_key
         
-        if not state:
+        except Exception as e:
+            logger.error(f"[SESSION_STATE] ❌ Erreur is_user_on_thread: {e}")
             return False
-        
-        is_on_chat = state.get("is_on_chat_page", False)
-        current_thread = state.get("current_active_thread")
-        
-        return is_on_chat and current_thread == thread_key
     
     def session_exists(
         self,
@@ -711,7 +1071,7 @@ class SessionStateManager:
         Args:
             user_id: ID de l'utilisateur
             company_id: ID de la société
-            
+        
         Returns:
             True si la session existe
         """
@@ -731,7 +1091,7 @@ class SessionStateManager:
             user_id: ID de l'utilisateur
             company_id: ID de la société
             ttl: Nouveau TTL en secondes (défaut: 2h)
-            
+        
         Returns:
             True si TTL prolongé
         """
@@ -739,13 +1099,19 @@ class SessionStateManager:
             key = self._build_key(user_id, company_id)
             ttl_seconds = ttl or self.DEFAULT_TTL
             
-            result = self.redis.expire(key, ttl_seconds)
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.expire(key, ttl_seconds)
+            pipe.expire(self._build_tabs_key(user_id, company_id), ttl_seconds)
+            pipe.expire(self._build_activity_key(user_id, company_id), ttl_seconds)
+            pipe.expire(self._build_user_index_key(user_id), ttl_seconds)
+            self._index_user(pipe, user_id, ttl_seconds)
+            result = pipe.execute()[0]
             
             if result:
                 logger.debug(f"[SESSION_STATE] ⏰ TTL prolongé: {key} ({ttl_seconds}s)")
             
             return bool(result)
-            
+        
         except Exception as e:
             logger.error(f"[SESSION_STATE] ❌ Erreur extend_ttl: {e}", exc_info=True)
             return False
@@ -758,27 +1124,33 @@ class SessionStateManager:
         """
         Liste toutes les sessions d'un utilisateur.
         
+        Lit l'index session:{user_id}:index (pas de SCAN) et retire
+        au passage les entrées dont la session a expiré.
+        
         Args:
             user_id: ID de l'utilisateur
-            
+        
         Returns:
             Liste des company_id pour lesquels une session existe
         """
         try:
-            pattern = f"{self.KEY_PREFIX}:{user_id}:*:state"
-            keys = list(self.redis.scan_iter(match=pattern))
-            
-            company_ids = []
-            for key in keys:
-                if isinstance(key, bytes):
-                    key = key.decode('utf-8')
-                # session:{user_id}:{company_id}:state
-                parts = key.split(":")
-                if len(parts) >= 3:
-                    company_ids.append(parts[2])
+            index_key = self._build_user_index_key(user_id)
+            candidates = [self._to_str(cid) for cid in self.redis.smembers(index_key)]
+            if not candidates:
+                return []
             
-            return company_ids
+            pipe = self.redis.pipeline(transaction=False)
+            for company_id in candidates:
+                pipe.exists(self._build_key(user_id, company_id))
+            exists_flags = pipe.execute()
+            
+            company_ids = [cid for cid, exists in zip(candidates, exists_flags) if exists]
+            stale = [cid for cid, exists in zip(candidates, exists_flags) if not exists]
+            if stale:
+                self.redis.srem(index_key, *stale)
             
+            return company_ids
+        
         except Exception as e:
             logger.error(f"[SESSION_STATE] ❌ Erreur list_user_sessions: {e}")
             return []
@@ -801,26 +1173,53 @@ class SessionStateManager:
         """
         Retourne des statistiques sur les sessions Redis.
         
+        Parcourt les index (session:index:users → session:{uid}:index),
+        sans SCAN du keyspace. Les utilisateurs expirés ou sans session
+        sont retirés de l'index global. La taille d'une session est la somme
+        des HSTRLEN de ses champs (équivalent du STRLEN de l'ancien blob JSON).
+        
         Returns:
-            Dict avec statistiques (count, memory, etc.)
+            Dict avec statistiques (count, taille, champs, etc.)
         """
         try:
-            pattern = f"{self.KEY_PREFIX}:*:state"
+            users_key = self._build_users_index_key()
+            self.redis.zremrangebyscore(users_key, "-inf", time.time())
+            user_ids = [self._to_str(uid) for uid in self.redis.zrange(users_key, 0, -1)]
             
             count = 0
+            total_fields = 0
             total_size = 0
-            
-            for key in self.redis.scan_iter(match=pattern):
-                count += 1
-                size = self.redis.strlen(key)
-                total_size += size
+            inactive_users = []
+            
+            for user_id in user_ids:
+                company_ids = self.list_user_sessions(user_id)
+                if not company_ids:
+                    inactive_users.append(user_id)
+                    continue
+                keys = [self._build_key(user_id, company_id) for company_id in company_ids]
+                pipe = self.redis.pipeline(transaction=False)
+                for key in keys:
+                    pipe.hkeys(key)
+                field_names = pipe.execute()
+                for key, fields in zip(keys, field_names):
+                    for field in fields:
+                        pipe.hstrlen(key, field)
+                sizes = pipe.execute() if any(field_names) else []
+                count += len(company_ids)
+                total_fields += sum(len(fields) for fields in field_names)
+                total_size += sum(sizes)
+            
+            if inactive_users:
+                self.redis.zrem(users_key, *inactive_users)
             
             return {
                 "total_sessions": count,
+                "total_users": len(user_ids) - len(inactive_users),
                 "total_size_bytes": total_size,
-                "avg_size_bytes": total_size // count if count > 0 else 0
+                "avg_size_bytes": total_size // count if count > 0 else 0,
+                "avg_fields": total_fields // count if count > 0 else 0
             }
-            
+        
         except Exception as e:
             logger.error(f"[SESSION_STATE] ❌ Erreur get_session_stats: {e}")
             return {"error": str(e)}
@@ -841,4 +1240,3 @@ def get_session_state_manager() -> SessionStateManager:
     if _session_state_manager is None:
         _session_state_manager = SessionStateManager()
     return _session_state_manager
-
@@ -0,0 +1,388 @@
+"""
+Moniteur de la boucle asyncio: détection des blocages et audit des appels bloquants.
+
+Un seul appel synchrone Firestore / RTDB / Redis exécuté sur la boucle
+(notif_ref.get(), get_thread_messages(), redis.get()...) fige toutes les
+connexions WebSocket de l'instance. Ce module rend ces blocages visibles.
+
+1. LoopStallMonitor (toujours actif, coût négligeable)
+    - Une tâche échantillonne le retard d'ordonnancement de la boucle
+      (sleep(interval) → écart entre réveil attendu et réel)
+    - Un thread watchdog surveille le battement de cette tâche: si la boucle
+      ne bat plus depuis `threshold_ms`, il capture la pile du thread de la
+      boucle PENDANT le blocage (le coupable est encore sur la pile) et le
+      nom de la tâche courante (ws:{msg_type} pour les handlers /ws)
+    - Chaque blocage ≥ threshold_ms est compté, journalisé et conservé
+      (derniers événements) dans les métriques
+
+2. BlockingCallAudit (opt-in: LOOP_BLOCKING_AUDIT=1)
+    - Enveloppe les méthodes bloquantes connues des SDK (Firestore, RTDB,
+      redis-py, requests); un appel exécuté SUR le thread de la boucle est
+      attribué au handler (tâche courante, donc type de message /ws) et au
+      site d'appel. Les appels faits via asyncio.to_thread ne sont pas comptés.
+
+Configuration (variables d'environnement):
+    LOOP_MONITOR_ENABLED       (défaut: true)
+    LOOP_MONITOR_INTERVAL_MS   (défaut: 50)
+    LOOP_STALL_THRESHOLD_MS    (défaut: 250)
+    LOOP_BLOCKING_AUDIT        (défaut: false)
+
+Métriques: endpoint /loop-metrics.
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("listeners.loop_monitor")
+
+STACK_DEPTH = 12
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.lower() in ("1", "true", "yes", "y", "on")
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def describe_task(task: Optional[asyncio.Task]) -> str:
+    """
+    Nom lisible d'une tâche: le nom explicite (ws:{msg_type}) s'il existe,
+    sinon la coroutine (ex: RedisSubscriber._listen_loop).
+    """
+    if task is None:
+        return "<no task>"
+    name = task.get_name()
+    if not name.startswith("Task-"):
+        return name
+    coro = task.get_coro()
+    return getattr(coro, "__qualname__", None) or name
+
+
+# ═══════════════════════════════════════════════════════════════
+# AUDIT DES APPELS BLOQUANTS
+# ═══════════════════════════════════════════════════════════════
+
+# (module, classe, méthodes) des SDK synchrones utilisés par les handlers
+DEFAULT_AUDIT_TARGETS: Tuple[Tuple[str, str, Tuple[str, ...]], ...] = (
+    ("google.cloud.firestore_v1.document", "DocumentReference",
+     ("get", "set", "update", "delete", "create")),
+    ("google.cloud.firestore_v1.collection", "CollectionReference",
+     ("get", "stream", "add")),
+    ("google.cloud.firestore_v1.query", "Query", ("get", "stream")),
+    ("google.cloud.firestore_v1.batch", "WriteBatch", ("commit",)),
+    ("firebase_admin.db", "Reference",
+     ("get", "set", "update", "delete", "push", "transaction")),
+    ("firebase_admin.db", "Query", ("get",)),
+    ("redis.client", "Redis", ("execute_command",)),
+    ("redis.client", "Pipeline", ("execute",)),
+    ("requests.sessions", "Session", ("request",)),
+)
+
+
+class BlockingCallAudit:
+    """
+    Attribue les appels bloquants exécutés sur la boucle au handler appelant.
+
+    Usage:
+        audit = BlockingCallAudit()
+        audit.install()                 # cibles SDK par défaut
+        audit.patch(MyClient, "get")    # ou une cible précise
+        ...
+        audit.get_summary()
+        audit.uninstall()
+    """
+
+    def __init__(self, min_ms: float = 1.0, max_callers: int = 5):
+        self.min_ms = min_ms
+        self.max_callers = max_callers
+        self._lock = threading.Lock()
+        # (owner, attr, original, défini sur owner lui-même)
+        self._patched: List[Tuple[Any, str, Any, bool]] = []
+        # handler → label → stats
+        self._stats: Dict[str, Dict[str, Dict[str, Any]]] = defaultdict(dict)
+
+    @property
+    def installed(self) -> bool:
+        return bool(self._patched)
+
+    def install(self, targets=DEFAULT_AUDIT_TARGETS) -> int:
+        """Enveloppe les cibles disponibles (SDK absents ignorés)."""
+        count = 0
+        for module_name, class_name, methods in targets:
+            try:
+                module = __import__(module_name, fromlist=[class_name])
+                owner = getattr(module, class_name)
+            except (ImportError, AttributeError):
+                continue
+            for method in methods:
+                if self.patch(owner, method, label=f"{class_name}.{method}"):
+                    count += 1
+        logger.info("loop_blocking_audit status=installed targets=%s", count)
+        return count
+
+    def patch(self, owner: Any, attr: str, label: Optional[str] = None) -> bool:
+        """Enveloppe owner.attr (classe ou objet)."""
+        own = vars(owner).get(attr) if hasattr(owner, "__dict__") else None
+        if own is not None and not callable(own):
+            return False  # staticmethod / classmethod / propriété: non enveloppé
+        original = getattr(owner, attr, None)
+        if original is None or getattr(original, "__loop_audit__", False):
+            return False
+
+        label = label or f"{getattr(owner, '__name__', type(owner).__name__)}.{attr}"
+        audit = self
+
+        @functools.wraps(original)
+        def wrapper(*args, **kwargs):
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = None
+            if loop is None:
+                return original(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                audit._record(label, (time.perf_counter() - start) * 1000, sys._getframe(1))
+
+        wrapper.__loop_audit__ = True
+        setattr(owner, attr, wrapper)
+        self._patched.append((owner, attr, original, own is not None))
+        return True
+
+    def uninstall(self) -> None:
+        """Restaure les méthodes d'origine."""
+        while self._patched:
+            owner, attr, original, own = self._patched.pop()
+            if own:
+                setattr(owner, attr, original)
+            else:
+                delattr(owner, attr)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+    def _record(self, label: str, duration_ms: float, frame) -> None:
+        if duration_ms < self.min_ms:
+            return
+        try:
+            handler = describe_task(asyncio.current_task())
+        except RuntimeError:
+            handler = "<no task>"
+        code = frame.f_code
+        caller = f"{os.path.basename(code.co_filename)}:{frame.f_lineno} {code.co_name}"
+        with self._lock:
+            stats = self._stats[handler].setdefault(
+                label, {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "callers": {}}
+            )
+            stats["count"] += 1
+            stats["total_ms"] += duration_ms
+            stats["max_ms"] = max(stats["max_ms"], duration_ms)
+            callers = stats["callers"]
+            if caller in callers or len(callers) < self.max_callers:
+                callers[caller] = callers.get(caller, 0) + 1
+
+    def get_summary(self) -> Dict[str, Any]:
+        """Temps bloquant par handler puis par appel (trié par temps cumulé)."""
+        with self._lock:
+            snapshot = {
+                handler: {label: dict(s, callers=dict(s["callers"])) for label, s in labels.items()}
+                for handler, labels in self._stats.items()
+            }
+
+        by_handler = {}
+        totals = {h: sum(s["total_ms"] for s in labels.values()) for h, labels in snapshot.items()}
+        for handler in sorted(snapshot, key=totals.get, reverse=True):
+            calls = {}
+            for label, s in sorted(snapshot[handler].items(), key=lambda x: x[1]["total_ms"], reverse=True):
+                calls[label] = {
+                    "count": s["count"],
+                    "total_ms": round(s["total_ms"], 2),
+                    "max_ms": round(s["max_ms"], 2),
+                    "callers": s["callers"],
+                }
+            by_handler[handler] = {"total_ms": round(totals[handler], 2), "calls": calls}
+        return {"enabled": self.installed, "by_handler": by_handler}
+
+
+# ═══════════════════════════════════════════════════════════════
+# DÉTECTEUR DE BLOCAGES
+# ═══════════════════════════════════════════════════════════════
+
+class LoopStallMonitor:
+    """Mesure le retard de la boucle et capture la pile des blocages."""
+
+    DEFAULT_INTERVAL_MS = 50.0
+    DEFAULT_THRESHOLD_MS = 250.0
+
+    def __init__(
+        self,
+        interval_ms: Optional[float] = None,
+        threshold_ms: Optional[float] = None,
+        max_events: int = 50,
+    ):
+        self.interval = (interval_ms or _env_float("LOOP_MONITOR_INTERVAL_MS", self.DEFAULT_INTERVAL_MS)) / 1000
+        self.threshold_ms = threshold_ms or _env_float("LOOP_STALL_THRESHOLD_MS", self.DEFAULT_THRESHOLD_MS)
+        self.audit = BlockingCallAudit()
+
+        self._lock = threading.Lock()
+        self._events: Deque[Dict[str, Any]] = deque(maxlen=max_events)
+        self._stats = {"samples": 0, "total_lag_ms": 0.0, "max_lag_ms": 0.0,
+                       "stalls": 0, "stall_total_ms": 0.0}
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._sampler: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._heartbeat = 0.0
+        self._capture: Optional[Dict[str, Any]] = None
+
+    @property
+    def running(self) -> bool:
+        return self._sampler is not None and not self._sampler.done()
+
+    async def start(self, audit: Optional[bool] = None) -> None:
+        """Démarre l'échantillonnage (et l'audit si demandé / LOOP_BLOCKING_AUDIT)."""
+        if self.running:
+            return
+        if audit if audit is not None else _env_bool("LOOP_BLOCKING_AUDIT", False):
+            self.audit.install()
+
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.perf_counter()
+        self._stop_event.clear()
+        self._sampler = asyncio.create_task(self._sample_loop(), name="loop_monitor")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info(
+            "loop_monitor status=started interval_ms=%s threshold_ms=%s audit=%s",
+            round(self.interval * 1000), self.threshold_ms, self.audit.installed,
+        )
+
+    async def stop(self) -> None:
+        self._stop_event.set()
+        if self._sampler:
+            self._sampler.cancel()
+            try:
+                await self._sampler
+            except asyncio.CancelledError:
+                pass
+            self._sampler = None
+        if self._watchdog:
+            await asyncio.to_thread(self._watchdog.join, 1.0)
+            self._watchdog = None
+        self.audit.uninstall()
+
+    # ─── Échantillonnage (sur la boucle) ───
+
+    async def _sample_loop(self) -> None:
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            self._heartbeat = now
+            self._record_lag(max(0.0, (now - expected) * 1000))
+
+    def _record_lag(self, lag_ms: float) -> None:
+        with self._lock:
+            self._stats["samples"] += 1
+            self._stats["total_lag_ms"] += lag_ms
+            self._stats["max_lag_ms"] = max(self._stats["max_lag_ms"], lag_ms)
+            capture, self._capture = self._capture, None
+            if lag_ms < self.threshold_ms:
+                return
+            self._stats["stalls"] += 1
+            self._stats["stall_total_ms"] += lag_ms
+            event = {
+                "at": time.time(),
+                "lag_ms": round(lag_ms, 2),
+                "task": capture["task"] if capture else None,
+                "stack": capture["stack"] if capture else [],
+            }
+            self._events.append(event)
+
+        logger.warning(
+            "loop_stall lag_ms=%s task=%s where=%s",
+            event["lag_ms"], event["task"], event["stack"][-1].strip() if event["stack"] else "unknown",
+        )
+
+    # ─── Watchdog (thread dédié) ───
+
+    def _watch(self) -> None:
+        captured_for = None
+        while not self._stop_event.wait(self.interval / 2):
+            beat = self._heartbeat
+            blocked_ms = (time.perf_counter() - beat - self.interval) * 1000
+            if blocked_ms < self.threshold_ms or captured_for == beat:
+                continue
+            captured_for = beat
+            capture = self._capture_loop_stack()
+            if capture:
+                with self._lock:
+                    self._capture = capture
+
+    def _capture_loop_stack(self) -> Optional[Dict[str, Any]]:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return None
+        try:
+            task = describe_task(asyncio.current_task(self._loop))
+        except Exception:
+            task = None
+        stack = traceback.format_stack(frame)[-STACK_DEPTH:]
+        return {"task": task, "stack": [line.rstrip() for line in stack]}
+
+    # ─── Métriques ───
+
+    def get_summary(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            events = list(self._events)
+        samples = stats["samples"]
+        return {
+            "running": self.running,
+            "interval_ms": round(self.interval * 1000, 2),
+            "threshold_ms": self.threshold_ms,
+            "samples": samples,
+            "avg_lag_ms": round(stats["total_lag_ms"] / samples, 2) if samples else 0.0,
+            "max_lag_ms": round(stats["max_lag_ms"], 2),
+            "stalls": stats["stalls"],
+            "stall_total_ms": round(stats["stall_total_ms"], 2),
+            "recent_stalls": events[-10:],
+            "audit": self.audit.get_summary(),
+        }
+
+
+_monitor: Optional[LoopStallMonitor] = None
+
+
+def get_loop_monitor() -> LoopStallMonitor:
+    """Singleton du moniteur de boucle."""
+    global _monitor
+    if _monitor is None:
+        _monitor = LoopStallMonitor()
+    return _monitor
+
+
+def loop_monitor_enabled() -> bool:
+    return _env_bool("LOOP_MONITOR_ENABLED", True)
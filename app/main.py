@@ -19,6 +19,8 @@ from .firebase_client import get_firestore
 from .listeners_manager import ListenersManager
 from .ws_hub import hub
 from .ws_events import WS_EVENTS
+from .ws_dispatcher import WSConnectionDispatcher, WSContext
+from .ws_routes import get_ws_router
 from . import runtime as runtime_state
 from google.cloud.firestore_v1 import SERVER_TIMESTAMP
 from .redis_client import get_redis
@@ -121,6 +123,23 @@ async def on_startup():
     except Exception as e:
         logger.error("agentic_dispatch_listener status=error error=%s", repr(e))
 
+    # Détecteur de blocages de la boucle asyncio (+ audit des appels bloquants si LOOP_BLOCKING_AUDIT)
+    try:
+        from .loop_monitor import get_loop_monitor, loop_monitor_enabled
+        if loop_monitor_enabled():
+            await get_loop_monitor().start()
+            logger.info("loop_monitor status=started")
+    except Exception as e:
+        logger.error("loop_monitor status=error error=%s", repr(e))
+
+    # Pré-chargement / rotation des clés publiques Firebase (vérification des ID tokens)
+    try:
+        from .firebase_token_verifier import get_token_verifier
+        await get_token_verifier().start()
+        logger.info("firebase_token_verifier status=started")
+    except Exception as e:
+        logger.error("firebase_token_verifier status=error error=%s", repr(e))
+
     # Démarrer le CommunicationResponseCollector (canaux externes)
     try:
         from .realtime.communication_response_collector import get_response_collector
@@ -185,6 +204,28 @@ async def on_shutdown():
     except Exception as e:
         logger.error("communication_response_collector_stop status=error error=%s", repr(e))
 
+    try:
+        from .firebase_token_verifier import get_token_verifier
+        await get_token_verifier().stop()
+        logger.info("firebase_token_verifier status=stopped")
+    except Exception as e:
+        logger.error("firebase_token_verifier_stop status=error error=%s", repr(e))
+
+    try:
+        from .loop_monitor import get_loop_monitor
+        await get_loop_monitor().stop()
+        logger.info("loop_monitor status=stopped")
+    except Exception as e:
+        logger.error("loop_monitor_stop status=error error=%s", repr(e))
+
+    # Publie les messages Telegram encore en file avant l'arrêt
+    try:
+        from .realtime.telegram_outbound_scheduler import get_telegram_outbound_scheduler
+        await get_telegram_outbound_scheduler().stop(flush=True)
+        logger.info("telegram_outbound_scheduler status=stopped")
+    except Exception as e:
+        logger.error("telegram_outbound_scheduler_stop status=error error=%s", repr(e))
+
 
 @app.get("/healthz")
 def healthz():
@@ -285,11 +326,14 @@ def debug():
 def ws_metrics():
     """Endpoint pour consulter les métriques de déconnexion WebSocket."""
     try:
-        from .ws_metrics import get_ws_metrics
+        from .ws_metrics import get_ws_metrics, get_ws_dispatch_metrics
+        from .realtime.worker_broadcast_listener import get_worker_broadcast_listener
         metrics = get_ws_metrics()
         return {
             "status": "ok",
-            "metrics": metrics.get_summary()
+            "metrics": metrics.get_summary(),
+            "dispatch": get_ws_dispatch_metrics().get_summary(),
+            "stream_relay": get_worker_broadcast_listener().relay.get_summary()
         }
     except Exception as e:
         logger.error("ws_metrics_error error=%s", repr(e))
@@ -299,6 +343,57 @@ def ws_metrics():
         }
 
 
+@app.get("/loop-metrics")
+def loop_metrics():
+    """Endpoint pour consulter le retard de la boucle, les blocages et l'audit des appels bloquants."""
+    try:
+        from .loop_monitor import get_loop_monitor
+        return {
+            "status": "ok",
+            "loop": get_loop_monitor().get_summary()
+        }
+    except Exception as e:
+        logger.error("loop_metrics_error error=%s", repr(e))
+        return {
+            "status": "error",
+            "error": repr(e)
+        }
+
+
+@app.get("/telegram-outbound-metrics")
+def telegram_outbound_metrics():
+    """Endpoint pour consulter la file sortante Telegram (profondeur par chat, délais, fusions)."""
+    try:
+        from .realtime.telegram_outbound_scheduler import get_telegram_outbound_scheduler
+        return {
+            "status": "ok",
+            "outbound": get_telegram_outbound_scheduler().get_summary()
+        }
+    except Exception as e:
+        logger.error("telegram_outbound_metrics_error error=%s", repr(e))
+        return {
+            "status": "error",
+            "error": repr(e)
+        }
+
+
+@app.get("/llm-queue-metrics")
+def llm_queue_metrics():
+    """Endpoint pour consulter la profondeur et l'âge des lanes de la queue LLM."""
+    try:
+        from .llm_service.llm_gateway import get_llm_gateway
+        return {
+            "status": "ok",
+            "queue": get_llm_gateway().get_queue_stats()
+        }
+    except Exception as e:
+        logger.error("llm_queue_metrics_error error=%s", repr(e))
+        return {
+            "status": "error",
+            "error": repr(e)
+        }
+
+
 # ═══════════════════════════════════════════════════════════════
 # GOOGLE AUTH CALLBACK (BACKEND)
 # ═══════════════════════════════════════════════════════════════
@@ -1470,6 +1565,17 @@ class CloudWatchDownloadRequest(BaseModel):
     end_date: Optional[str] = None
 
 
+class CloudWatchExportRequest(BaseModel):
+    """Requête pour exporter un log CloudWatch en streaming."""
+    log_stream_name: str = Field(..., description="Nom du stream de logs à exporter")
+    format: str = Field("ndjson", description="ndjson | text")
+    filter_pattern: Optional[str] = Field(None, description="Motif de filtre CloudWatch (filtrage côté serveur)")
+    minutes: Optional[int] = Field(None, description="Fenêtre: les N dernières minutes")
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    max_events: Optional[int] = None
+
+
 @app.post("/invalidate-context")
 async def invalidate_context(req: InvalidateContextRequest):
     """
@@ -2050,6 +2156,7 @@ async def hr_callback(
 @app.websocket("/ws")
 async def websocket_endpoint(ws: WebSocket):
     await ws.accept()
+    dispatcher = None
     try:
         # Backend Reflex passera le uid via query string ?uid=...
         uid = ws.query_params.get("uid")
@@ -2086,17 +2193,23 @@ async def websocket_endpoint(ws: WebSocket):
             logger.error("chat_watcher_attach_error uid=%s error=%s", uid, repr(e))
         
         # ⭐ NOUVEAU: Envoyer les messages bufferisés si le WebSocket du chat est connecté
-        if space_code and thread_key:
+        # Si le client fournit son dernier buffer_id acquitté, seule la queue
+        # manquée est rejouée (tous threads confondus, depuis n'importe quelle instance)
+        last_buffer_id = ws.query_params.get("last_buffer_id")
+        if last_buffer_id or (space_code and thread_key):
             try:
                 from .ws_message_buffer import get_message_buffer
                 buffer = get_message_buffer()
                 
-                # Récupérer les messages en attente (et les supprimer du buffer)
-                pending_messages = buffer.get_pending_messages(
-                    user_id=uid,
-                    thread_key=thread_key,
-                    delete_after=True
-                )
+                if last_buffer_id:
+                    pending_messages = buffer.replay_since(uid, last_id=last_buffer_id)
+                else:
+                    # Récupérer les messages en attente (et les supprimer du buffer)
+                    pending_messages = buffer.get_pending_messages(
+                        user_id=uid,
+                        thread_key=thread_key,
+                        delete_after=True
+                    )
                 
                 if pending_messages:
                     logger.info(
@@ -2124,6 +2237,13 @@ async def websocket_endpoint(ws: WebSocket):
                     exc_info=True
                 )
         
+        # Dispatcher de la connexion: les handlers tournent en tâches,
+        # la boucle de réception n'est jamais bloquée par un handler lent
+        dispatcher = WSConnectionDispatcher(
+            get_ws_router(),
+            WSContext(ws=ws, uid=uid, session_id=session_id),
+        )
+        
         while True:
             # Reception et traitement des messages WebSocket du client
             try:
@@ -2137,1636 +2257,8 @@ async def websocket_endpoint(ws: WebSocket):
 
                     logger.info(f"[WS] Message reçu - uid={uid} type={msg_type}")
 
-                    # Routage des messages vers les handlers appropriés
-                    if msg_type == "auth.firebase_token":
-                        # Handler d'authentification Firebase
-                        from .wrappers.auth_handlers import handle_firebase_token
-                        response = await handle_firebase_token(msg_payload)
-
-                        # Envoyer la réponse au client
-                        await ws.send_text(_json.dumps(response))
-                        logger.info(
-                            f"[WS] Auth response sent - uid={uid} "
-                            f"type={response.get('type')} "
-                            f"success={response.get('payload', {}).get('success')}"
-                        )
-
-                    elif msg_type == "dashboard.orchestrate_init":
-                        # Handler d'orchestration du dashboard (après auth)
-                        from .wrappers.dashboard_orchestration_handlers import handle_orchestrate_init
-                        response = await handle_orchestrate_init(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        await ws.send_text(_json.dumps(response))
-                        logger.info(f"[WS] Orchestration init response sent - uid={uid}")
-
-                    elif msg_type == "dashboard.company_change":
-                        # Handler de changement de société
-                        from .wrappers.dashboard_orchestration_handlers import handle_company_change
-                        response = await handle_company_change(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        await ws.send_text(_json.dumps(response))
-                        logger.info(f"[WS] Company change response sent - uid={uid}")
-
-                    elif msg_type == "dashboard.refresh":
-                        # Handler de rafraîchissement forcé
-                        from .wrappers.dashboard_orchestration_handlers import handle_refresh
-                        response = await handle_refresh(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        await ws.send_text(_json.dumps(response))
-                        logger.info(f"[WS] Dashboard refresh response sent - uid={uid}")
-
-                    elif msg_type == "dashboard.billing_refresh":
-                        # Targeted billing_history refresh (not full dashboard)
-                        from .wrappers.dashboard_orchestration_handlers import handle_billing_refresh
-                        response = await handle_billing_refresh(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        await ws.send_text(_json.dumps(response))
-                        logger.info(f"[WS] Billing refresh response sent - uid={uid}")
-
-                    elif msg_type == "page.context_change":
-                        # Handler de changement de contexte de page
-                        from .realtime.contextual_publisher import update_page_context
-                        page = msg_payload.get("page")
-                        if page:
-                            update_page_context(uid, page)
-                            logger.info(f"[WS] Page context updated - uid={uid} page={page}")
-                        await ws.send_text(_json.dumps({
-                            "type": "page.context_updated",
-                            "payload": {"success": True, "page": page}
-                        }))
-
-                    # ============================================
-                    # TASK EVENTS
-                    # ============================================
-                    elif msg_type == "task.list":
-                        from .wrappers.task_handlers import handle_task_list
-                        response = await handle_task_list(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        await ws.send_text(_json.dumps(response))
-                        logger.info(f"[WS] Task list response sent - uid={uid}")
-
-                    elif msg_type == "task.execute":
-                        from .wrappers.task_handlers import handle_task_execute
-                        response = await handle_task_execute(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        await ws.send_text(_json.dumps(response))
-                        logger.info(f"[WS] Task execute response sent - uid={uid}")
-
-                    elif msg_type == "task.toggle_enabled":
-                        from .wrappers.task_handlers import handle_task_toggle
-                        response = await handle_task_toggle(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        await ws.send_text(_json.dumps(response))
-                        logger.info(f"[WS] Task toggle response sent - uid={uid}")
-
-                    elif msg_type == "task.update":
-                        from .wrappers.task_handlers import handle_task_update
-                        response = await handle_task_update(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        await ws.send_text(_json.dumps(response))
-                        logger.info(f"[WS] Task update response sent - uid={uid}")
-
-                    # ============================================
-                    # APPROVAL EVENTS
-                    # ============================================
-                    elif msg_type == "approval.list":
-                        from .wrappers.approval_handlers import handle_approval_list
-                        response = await handle_approval_list(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        await ws.send_text(_json.dumps(response))
-                        logger.info(f"[WS] Approval list response sent - uid={uid}")
-
-                    elif msg_type == "approval.send_router":
-                        from .wrappers.approval_handlers import handle_send_router
-                        response = await handle_send_router(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        await ws.send_text(_json.dumps(response))
-                        logger.info(f"[WS] Approval send_router response sent - uid={uid}")
-
-                    elif msg_type == "approval.send_banker":
-                        from .wrappers.approval_handlers import handle_send_banker
-                        response = await handle_send_banker(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        await ws.send_text(_json.dumps(response))
-                        logger.info(f"[WS] Approval send_banker response sent - uid={uid}")
-
-                    elif msg_type == "approval.send_apbookeeper":
-                        from .wrappers.approval_handlers import handle_send_apbookeeper
-                        response = await handle_send_apbookeeper(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        await ws.send_text(_json.dumps(response))
-                        logger.info(f"[WS] Approval send_apbookeeper response sent - uid={uid}")
-
-                    elif msg_type == "approval.save_changes":
-                        from .wrappers.approval_handlers import handle_save_approval_changes
-                        response = await handle_save_approval_changes(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        await ws.send_text(_json.dumps(response))
-                        logger.info(f"[WS] Approval save_changes response sent - uid={uid}")
-
-                    # ============================================
-                    # BALANCE EVENTS (account top-up and refresh)
-                    # ============================================
-                    elif msg_type == "balance.top_up":
-                        from .wrappers.balance_handlers import handle_top_up
-                        await handle_top_up(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Balance top-up initiated - uid={uid}")
-
-                    elif msg_type == "balance.refresh":
-                        from .wrappers.balance_handlers import handle_refresh_balance
-                        await handle_refresh_balance(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Balance refresh completed - uid={uid}")
-
-                    # ============================================
-                    # CHAT EVENTS (session management)
-                    # ============================================
-                    elif msg_type == "chat.orchestrate_init":
-                        from .frontend.pages.chat import handle_orchestrate_init
-                        response = await handle_orchestrate_init(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        await ws.send_text(_json.dumps(response))
-                        logger.info(f"[WS] Chat orchestrate_init response sent - uid={uid}")
-
-                    elif msg_type == "chat.session_select":
-                        from .frontend.pages.chat import handle_session_select
-                        response = await handle_session_select(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        await ws.send_text(_json.dumps(response))
-                        logger.info(f"[WS] Chat session_select response sent - uid={uid}")
-
-                    elif msg_type == "chat.session_create":
-                        from .frontend.pages.chat import handle_session_create
-                        response = await handle_session_create(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        await ws.send_text(_json.dumps(response))
-                        logger.info(f"[WS] Chat session_create response sent - uid={uid}")
-
-                    elif msg_type == "chat.session_delete":
-                        from .frontend.pages.chat import handle_session_delete
-                        response = await handle_session_delete(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        await ws.send_text(_json.dumps(response))
-                        logger.info(f"[WS] Chat session_delete response sent - uid={uid}")
-
-                    elif msg_type == "chat.session_rename":
-                        from .frontend.pages.chat import handle_session_rename
-                        response = await handle_session_rename(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        await ws.send_text(_json.dumps(response))
-                        logger.info(f"[WS] Chat session_rename response sent - uid={uid}")
-
-                    elif msg_type == "chat.mode_change":
-                        from .frontend.pages.chat import handle_mode_change
-                        response = await handle_mode_change(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        await ws.send_text(_json.dumps(response))
-                        logger.info(f"[WS] Chat mode_change response sent - uid={uid}")
-
-                    elif msg_type == "chat.send_message":
-                        # ⭐ ARCHITECTURE QUEUE: Route message via LLMGateway → Worker
-                        # Le Worker traite le message et publie le streaming via Redis PubSub
-                        # Le WorkerBroadcastListener transmet au frontend via WebSocket
-                        from .llm_service.llm_gateway import get_llm_gateway
-
-                        thread_key = msg_payload.get("thread_key") or msg_payload.get("session_id")
-                        content = msg_payload.get("content", "")
-                        company_id = msg_payload.get("company_id")
-                        chat_mode = msg_payload.get("chat_mode", "general_chat")
-                        attachments = msg_payload.get("attachments")  # list[dict] from frontend upload
-
-                        logger.info(f"[WS] Chat send_message - uid={uid} thread={thread_key} content_len={len(content)} attachments={len(attachments) if attachments else 0}")
-
-                        # ── Balance check before enqueue ──
-                        try:
-                            from .balance_service import (
-                                get_balance_service,
-                                CHAT_COST_PER_TURN,
-                                CHAT_ZERO_BALANCE_THRESHOLD,
-                                CHAT_LOW_BALANCE_THRESHOLD,
-                            )
-
-                            _bal_svc = get_balance_service()
-
-                            # Resolve mandate_path from company context cache
-                            _chat_mandate_path = None
-                            try:
-                                from .llm_service.redis_namespaces import build_company_context_key
-                                _ctx_key = build_company_context_key(uid, company_id)
-                                _ctx_raw = get_redis().get(_ctx_key)
-                                if _ctx_raw:
-                                    _chat_mandate_path = _json.loads(_ctx_raw).get("mandatePath")
-                            except Exception:
-                                pass
-
-                            _bal_result = await _bal_svc.check_balance(
-                                uid=uid,
-                                mandate_path=_chat_mandate_path,
-                                estimated_cost=CHAT_COST_PER_TURN,
-                                operation="chat",
-                            )
-
-                            if _bal_result.current_balance <= CHAT_ZERO_BALANCE_THRESHOLD:
-                                # HARD BLOCK: balance <= 0
-                                response = {
-                                    "type": "chat.message_error",
-                                    "payload": {
-                                        "success": False,
-                                        "error": "insufficient_balance",
-                                        "code": "INSUFFICIENT_BALANCE",
-                                        "message": _bal_result.message,
-                                        "balance_info": {
-                                            "currentBalance": _bal_result.current_balance,
-                                            "requiredBalance": _bal_result.required_balance,
-                                        },
-                                    },
-                                }
-                                await ws.send_text(_json.dumps(response))
-                                logger.warning(f"[WS] Chat BLOCKED (zero balance) uid={uid}")
-                                continue
-
-                            if _bal_result.current_balance < CHAT_LOW_BALANCE_THRESHOLD:
-                                # SOFT WARNING: low balance — let the message through
-                                await hub.send_to_user(uid, {
-                                    "type": "balance.balance_update",
-                                    "payload": {
-                                        "action": "warning",
-                                        "data": {
-                                            "currentBalance": _bal_result.current_balance,
-                                            "warning": True,
-                                            "message": "Your balance is running low. Please top up to continue using services.",
-                                        },
-                                    },
-                                })
-                        except Exception as _bal_err:
-                            # Failsafe: never block chat on balance check failure
-                            logger.warning(f"[WS] Chat balance check error (failsafe): {_bal_err}")
-
-                        try:
-                            # Enqueue message for Worker processing
-                            # Worker will handle streaming via Redis PubSub → WorkerBroadcastListener → WebSocket
-                            gateway = get_llm_gateway()
-                            enqueue_kwargs = {}
-                            if attachments:
-                                enqueue_kwargs["attachments"] = attachments
-                            queue_result = await gateway.enqueue_message(
-                                user_id=uid,
-                                collection_name=company_id,
-                                thread_key=thread_key,
-                                message=content,
-                                chat_mode=chat_mode,
-                                **enqueue_kwargs,
-                            )
-
-                            logger.info(f"[WS] Chat send_message enqueued: job_id={queue_result.get('job_id', 'unknown')[:8]}...")
-
-                            response = {
-                                "type": "chat.message_sent",
-                                "payload": {
-                                    "success": True,
-                                    "status": "queued",
-                                    "job_id": queue_result.get("job_id"),
-                                }
-                            }
-                        except Exception as e:
-                            logger.error(f"[WS] Chat send_message error: {e}")
-                            response = {
-                                "type": "chat.error",
-                                "payload": {
-                                    "error": str(e),
-                                    "source": "send_message"
-                                }
-                            }
-                        await ws.send_text(_json.dumps(response))
-                        logger.info(f"[WS] Chat send_message response sent - uid={uid}")
-
-                    elif msg_type == "chat.card_clicked":
-                        # Handle interactive card click (approve/reject)
-                        from .frontend.pages.chat import handle_card_clicked
-                        response = await handle_card_clicked(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        await ws.send_text(_json.dumps(response))
-                        logger.info(f"[WS] Chat card_clicked response sent - uid={uid}")
-
-                    elif msg_type == "chat.onboarding_job_stop":
-                        from .frontend.pages.chat.orchestration import handle_onboarding_job_stop
-                        response = await handle_onboarding_job_stop(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        await ws.send_text(_json.dumps(response))
-                        logger.info(f"[WS] Chat onboarding_job_stop response sent - uid={uid}")
-
-                    elif msg_type == "chat.start_onboarding":
-                        # Start onboarding chat after company creation
-                        # Triggered when user lands on /chat/{thread_key}?action=create
-                        from .frontend.pages.chat.handlers import get_chat_handlers
-                        # Note: hub and WS_EVENTS are already imported at module level
-
-                        thread_key = msg_payload.get("thread_key")
-                        company_id = msg_payload.get("company_id")
-
-                        logger.info(f"[WS] Chat start_onboarding - uid={uid} thread={thread_key} company={company_id}")
-
-                        try:
-                            handlers = get_chat_handlers()
-                            result = await handlers.start_onboarding_chat(
-                                uid=uid,
-                                company_id=company_id,
-                                thread_key=thread_key,
-                            )
-
-                            # Broadcast onboarding_started event
-                            await hub.broadcast(uid, {
-                                "type": WS_EVENTS.CHAT.ONBOARDING_STARTED,
-                                "payload": result
-                            })
-                            logger.info(f"[WS] Chat start_onboarding completed - uid={uid} success={result.get('success')}")
-
-                        except Exception as e:
-                            logger.error(f"[WS] Chat start_onboarding error: {e}")
-                            await hub.broadcast(uid, {
-                                "type": WS_EVENTS.CHAT.ERROR,
-                                "payload": {
-                                    "error": str(e),
-                                    "source": "start_onboarding"
-                                }
-                            })
-
-                    # ============================================
-                    # ROUTING EVENTS (document routing management)
-                    # ============================================
-                    elif msg_type == "routing.orchestrate_init":
-                        from .frontend.pages.routing import handle_routing_orchestrate_init
-                        await handle_routing_orchestrate_init(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Routing orchestrate_init handled - uid={uid}")
-
-                    elif msg_type == "routing.refresh":
-                        from .frontend.pages.routing.orchestration import handle_routing_refresh
-                        await handle_routing_refresh(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Routing refresh handled - uid={uid}")
-
-                    elif msg_type == "routing.process":
-                        from .frontend.pages.routing.orchestration import handle_routing_process
-                        await handle_routing_process(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Routing process handled - uid={uid}")
-
-                    elif msg_type == "routing.restart":
-                        from .frontend.pages.routing.orchestration import handle_routing_restart
-                        await handle_routing_restart(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Routing restart handled - uid={uid}")
-
-                    elif msg_type == "routing.stop":
-                        from .frontend.pages.routing.orchestration import handle_routing_stop
-                        await handle_routing_stop(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Routing stop handled - uid={uid}")
-
-                    elif msg_type == "routing.delete":
-                        from .frontend.pages.routing.orchestration import handle_routing_delete
-                        await handle_routing_delete(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Routing delete handled - uid={uid}")
-
-                    elif msg_type == "routing.oauth_init":
-                        from .frontend.pages.routing.orchestration import handle_routing_oauth_init
-                        await handle_routing_oauth_init(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Routing oauth_init handled - uid={uid}")
-
-                    elif msg_type == "routing.upload":
-                        # ── Upload files to Google Drive (input_drive_doc_id) ──
-                        import base64 as _b64
-                        from .ws_hub import hub as _hub
-                        company_id = msg_payload.get("company_id", "")
-                        ws_files = msg_payload.get("files", [])
-                        logger.info(f"[WS] Routing upload - uid={uid} company={company_id} files={len(ws_files)}")
-
-                        async def _ws_drive_upload(_uid, _company_id, _files):
-                            """Background: decode base64, lookup Drive folder, upload each file."""
-                            try:
-                                from .redis_client import get_redis as _get_redis
-                                _r = _get_redis()
-                                ctx_key = f"company:{_uid}:{_company_id}:context"
-                                raw_ctx = _r.get(ctx_key)
-                                if not raw_ctx:
-                                    logger.error(f"[ROUTING_UPLOAD_WS] Context not found: {ctx_key}")
-                                    await _hub.broadcast(_uid, {"type": "routing.error", "payload": {"error": "Company context not found", "file_name": ""}})
-                                    return
-                                ctx = _json.loads(raw_ctx) if isinstance(raw_ctx, str) else raw_ctx
-                                input_drive_id = ctx.get("input_drive_doc_id") or ctx.get("inputDriveDocId")
-                                mandate_path = ctx.get("mandatePath", ctx.get("mandate_path", ""))
-                                if not input_drive_id:
-                                    logger.error(f"[ROUTING_UPLOAD_WS] input_drive_doc_id missing in context")
-                                    await _hub.broadcast(_uid, {"type": "routing.error", "payload": {"error": "input_drive_doc_id not found in company context", "file_name": ""}})
-                                    return
-
-                                from .driveClientService import DriveClientServiceSingleton
-                                drive = DriveClientServiceSingleton()
-
-                                for f in _files:
-                                    fname = f.get("name", "unknown")
-                                    ftype = f.get("type", "application/octet-stream")
-                                    fdata = f.get("data", "")
-                                    try:
-                                        file_bytes = _b64.b64decode(fdata)
-                                    except Exception as dec_err:
-                                        logger.error(f"[ROUTING_UPLOAD_WS] base64 decode failed for {fname}: {dec_err}")
-                                        await _hub.broadcast(_uid, {"type": "routing.error", "payload": {"error": f"Decode error: {fname}", "file_name": fname}})
-                                        continue
-
-                                    result = await drive.upload_file_to_drive(
-                                        user_id=_uid,
-                                        file_bytes=file_bytes,
-                                        file_name=fname,
-                                        folder_id=input_drive_id,
-                                        mime_type=ftype,
-                                    )
-                                    if not result.get("success"):
-                                        err = result.get("error", "Drive upload failed")
-                                        logger.error(f"[ROUTING_UPLOAD_WS] Drive failed for {fname}: {err}")
-                                        await _hub.broadcast(_uid, {
-                                            "type": "routing.error",
-                                            "payload": {"error": err, "file_name": fname, "oauth_reauth_required": result.get("oauth_reauth_required", False)},
-                                        })
-                                        continue
-
-                                    logger.info(f"[ROUTING_UPLOAD_WS] ✅ Uploaded {fname} → file_id={result.get('file_id')}")
-                                    await _hub.broadcast(_uid, {
-                                        "type": "routing.uploaded",
-                                        "payload": {
-                                            "file_id": result.get("file_id"),
-                                            "file_name": result.get("file_name", fname),
-                                            "web_view_link": result.get("web_view_link"),
-                                            "company_id": _company_id,
-                                        },
-                                    })
-
-                                # Refresh Drive cache after all uploads
-                                try:
-                                    from .drive_cache_handlers import drive_cache_handlers
-                                    await drive_cache_handlers.refresh_documents(
-                                        user_id=_uid,
-                                        company_id=_company_id,
-                                        input_drive_id=input_drive_id,
-                                        mandate_path=mandate_path,
-                                    )
-                                    logger.info(f"[ROUTING_UPLOAD_WS] Cache refreshed uid={_uid}")
-                                except Exception as cache_err:
-                                    logger.warning(f"[ROUTING_UPLOAD_WS] Cache refresh failed: {cache_err}")
-                            except Exception as exc:
-                                logger.error(f"[ROUTING_UPLOAD_WS] Background task failed: {exc}", exc_info=True)
-                                try:
-                                    await _hub.broadcast(_uid, {"type": "routing.error", "payload": {"error": str(exc), "file_name": ""}})
-                                except Exception:
-                                    pass
-
-                        import asyncio as _aio_upload
-                        _aio_upload.create_task(_ws_drive_upload(uid, company_id, ws_files))
-                        logger.info(f"[WS] Routing upload task launched - uid={uid}")
-
-                    # ============================================
-                    # INVOICES EVENTS (APBookkeeper)
-                    # ============================================
-                    elif msg_type == "invoices.orchestrate_init":
-                        from .frontend.pages.invoices.orchestration import handle_invoices_orchestrate_init
-                        await handle_invoices_orchestrate_init(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Invoices orchestrate_init handled - uid={uid}")
-
-                    elif msg_type == "invoices.refresh":
-                        from .frontend.pages.invoices.orchestration import handle_invoices_refresh
-                        await handle_invoices_refresh(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Invoices refresh handled - uid={uid}")
-
-                    elif msg_type == "invoices.process":
-                        from .frontend.pages.invoices.orchestration import handle_invoices_process
-                        await handle_invoices_process(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Invoices process handled - uid={uid}")
-
-                    elif msg_type == "invoices.stop":
-                        from .frontend.pages.invoices.orchestration import handle_invoices_stop
-                        await handle_invoices_stop(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Invoices stop handled - uid={uid}")
-
-                    elif msg_type == "invoices.delete":
-                        from .frontend.pages.invoices.orchestration import handle_invoices_delete
-                        await handle_invoices_delete(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Invoices delete handled - uid={uid}")
-
-                    elif msg_type == "invoices.restart":
-                        from .frontend.pages.invoices.orchestration import handle_invoices_restart
-                        await handle_invoices_restart(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Invoices restart handled - uid={uid}")
-
-                    elif msg_type == "invoices.instructions_save":
-                        from .frontend.pages.invoices.orchestration import handle_invoices_instructions_save
-                        await handle_invoices_instructions_save(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Invoices instructions_save handled - uid={uid}")
-
-                    # ============================================
-                    # COMPANY SETTINGS EVENTS
-                    # ============================================
-                    elif msg_type == "company_settings.orchestrate_init":
-                        from .frontend.pages.company_settings import handle_orchestrate_init
-                        await handle_orchestrate_init(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Company settings orchestrate_init handled - uid={uid}")
-
-                    elif msg_type == "company_settings.fetch_additional":
-                        # NEW: Optimized handler - only fetches telegram/erp data
-                        from .frontend.pages.company_settings import handle_fetch_additional
-                        await handle_fetch_additional(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Company settings fetch_additional handled - uid={uid}")
-
-                    elif msg_type == "company_settings.delete_company":
-                        from .frontend.pages.company_settings import handle_delete_company
-                        await handle_delete_company(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Company settings delete_company handled - uid={uid}")
-
-                    elif msg_type == "company_settings.save_company_info":
-                        from .frontend.pages.company_settings import handle_save_company_info
-                        await handle_save_company_info(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Company settings save_company_info handled - uid={uid}")
-
-                    elif msg_type == "company_settings.save_settings":
-                        from .frontend.pages.company_settings import handle_save_settings
-                        await handle_save_settings(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Company settings save_settings handled - uid={uid}")
-
-                    elif msg_type == "company_settings.save_workflow":
-                        from .frontend.pages.company_settings import handle_save_workflow
-                        await handle_save_workflow(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Company settings save_workflow handled - uid={uid}")
-
-                    elif msg_type == "company_settings.save_context":
-                        from .frontend.pages.company_settings import handle_save_context
-                        await handle_save_context(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Company settings save_context handled - uid={uid}")
-
-                    elif msg_type == "company_settings.save_asset_config":
-                        from .frontend.pages.company_settings import handle_save_asset_config
-                        await handle_save_asset_config(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Company settings save_asset_config handled - uid={uid}")
-
-                    elif msg_type == "company_settings.list_asset_models":
-                        from .frontend.pages.company_settings import handle_list_asset_models
-                        await handle_list_asset_models(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Company settings list_asset_models handled - uid={uid}")
-
-                    elif msg_type == "company_settings.create_asset_model":
-                        from .frontend.pages.company_settings import handle_create_asset_model
-                        await handle_create_asset_model(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Company settings create_asset_model handled - uid={uid}")
-
-                    elif msg_type == "company_settings.update_asset_model":
-                        from .frontend.pages.company_settings import handle_update_asset_model
-                        await handle_update_asset_model(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Company settings update_asset_model handled - uid={uid}")
-
-                    elif msg_type == "company_settings.delete_asset_model":
-                        from .frontend.pages.company_settings import handle_delete_asset_model
-                        await handle_delete_asset_model(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Company settings delete_asset_model handled - uid={uid}")
-
-                    elif msg_type == "company_settings.load_asset_accounts":
-                        from .frontend.pages.company_settings import handle_load_asset_accounts
-                        await handle_load_asset_accounts(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Company settings load_asset_accounts handled - uid={uid}")
-
-                    elif msg_type == "company_settings.create_fiscal_folders":
-                        from .frontend.pages.company_settings import handle_create_fiscal_folders
-                        await handle_create_fiscal_folders(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Company settings create_fiscal_folders handled - uid={uid}")
-
-                    elif msg_type == "company_settings.save_email_settings":
-                        from .frontend.pages.company_settings import handle_save_email_settings
-                        await handle_save_email_settings(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Company settings save_email_settings handled - uid={uid}")
-
-                    elif msg_type == "company_settings.email_approve_draft":
-                        from .frontend.pages.company_settings.orchestration import handle_email_approve_draft
-                        await handle_email_approve_draft(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Company settings email_approve_draft handled - uid={uid}")
-
-                    elif msg_type == "company_settings.save_email_type":
-                        from .frontend.pages.company_settings import handle_save_email_type
-                        await handle_save_email_type(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Company settings save_email_type handled - uid={uid}")
-
-                    elif msg_type == "company_settings.initiate_email_auth":
-                        from .frontend.pages.company_settings import handle_initiate_email_auth
-                        await handle_initiate_email_auth(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Company settings initiate_email_auth handled - uid={uid}")
-
-                    elif msg_type == "company_settings.telegram_start_registration":
-                        from .frontend.pages.company_settings.telegram_handler import handle_telegram_start_registration
-                        await handle_telegram_start_registration(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Company settings telegram_start_registration handled - uid={uid}")
-
-                    elif msg_type == "company_settings.telegram_remove_user":
-                        from .frontend.pages.company_settings.telegram_handler import handle_telegram_remove_user
-                        await handle_telegram_remove_user(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Company settings telegram_remove_user handled - uid={uid}")
-
-                    elif msg_type == "company_settings.telegram_reset_room":
-                        from .frontend.pages.company_settings.telegram_handler import handle_telegram_reset_room
-                        await handle_telegram_reset_room(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Company settings telegram_reset_room handled - uid={uid}")
-
-                    # ============================================
-                    # COA EVENTS (Chart of Accounts)
-                    # ============================================
-                    elif msg_type == "coa.orchestrate_init":
-                        from .frontend.pages.coa import handle_orchestrate_init as handle_coa_orchestrate_init
-                        await handle_coa_orchestrate_init(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] COA orchestrate_init handled - uid={uid}")
-
-                    elif msg_type == "coa.load_accounts":
-                        from .frontend.pages.coa import handle_load_accounts
-                        await handle_load_accounts(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] COA load_accounts handled - uid={uid}")
-
-                    elif msg_type == "coa.load_functions":
-                        from .frontend.pages.coa import handle_load_functions
-                        await handle_load_functions(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] COA load_functions handled - uid={uid}")
-
-                    elif msg_type == "coa.save_changes":
-                        from .frontend.pages.coa import handle_save_changes
-                        await handle_save_changes(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] COA save_changes handled - uid={uid}")
-
-                    elif msg_type == "coa.sync_erp":
-                        from .frontend.pages.coa import handle_sync_erp
-                        await handle_sync_erp(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] COA sync_erp handled - uid={uid}")
-
-                    elif msg_type == "coa.toggle_function":
-                        from .frontend.pages.coa import handle_toggle_function
-                        await handle_toggle_function(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] COA toggle_function handled - uid={uid}")
-
-                    elif msg_type == "coa.create_function":
-                        from .frontend.pages.coa import handle_create_function
-                        await handle_create_function(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] COA create_function handled - uid={uid}")
-
-                    elif msg_type == "coa.update_function":
-                        from .frontend.pages.coa import handle_update_function
-                        await handle_update_function(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] COA update_function handled - uid={uid}")
-
-                    elif msg_type == "coa.delete_function":
-                        from .frontend.pages.coa import handle_delete_function
-                        await handle_delete_function(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] COA delete_function handled - uid={uid}")
-
-                    elif msg_type == "coa.create_account":
-                        from .frontend.pages.coa import handle_create_account
-                        await handle_create_account(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] COA create_account handled - uid={uid}")
-
-                    elif msg_type == "coa.update_account":
-                        from .frontend.pages.coa import handle_update_account
-                        await handle_update_account(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] COA update_account handled - uid={uid}")
-
-                    # ============================================
-                    # EXPENSES EVENTS (Notes de Frais)
-                    # ============================================
-                    elif msg_type == "expenses.orchestrate_init":
-                        from .frontend.pages.expenses import handle_expenses_orchestrate_init
-                        await handle_expenses_orchestrate_init(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Expenses orchestrate_init handled - uid={uid}")
-
-                    elif msg_type == "expenses.refresh":
-                        from .frontend.pages.expenses import handle_expenses_refresh
-                        await handle_expenses_refresh(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Expenses refresh handled - uid={uid}")
-
-                    elif msg_type == "expenses.close":
-                        from .frontend.pages.expenses import handle_expenses_close
-                        await handle_expenses_close(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Expenses close handled - uid={uid}")
-
-                    elif msg_type == "expenses.reopen":
-                        from .frontend.pages.expenses import handle_expenses_reopen
-                        await handle_expenses_reopen(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Expenses reopen handled - uid={uid}")
-
-                    elif msg_type == "expenses.update":
-                        from .frontend.pages.expenses import handle_expenses_update
-                        await handle_expenses_update(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Expenses update handled - uid={uid}")
-
-                    elif msg_type == "expenses.delete":
-                        from .frontend.pages.expenses import handle_expenses_delete
-                        await handle_expenses_delete(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Expenses delete handled - uid={uid}")
-
-                    # ============================================
-                    # BANKING EVENTS (Bank transactions management)
-                    # ============================================
-                    elif msg_type == "banking.orchestrate_init":
-                        from .frontend.pages.banking import handle_banking_orchestrate_init
-                        await handle_banking_orchestrate_init(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Banking orchestrate_init handled - uid={uid}")
-
-                    elif msg_type == "banking.refresh":
-                        from .frontend.pages.banking import handle_banking_refresh
-                        await handle_banking_refresh(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Banking refresh handled - uid={uid}")
-
-                    elif msg_type == "banking.process":
-                        from .frontend.pages.banking import handle_banking_process
-                        await handle_banking_process(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Banking process handled - uid={uid}")
-
-                    elif msg_type == "banking.stop":
-                        from .frontend.pages.banking import handle_banking_stop
-                        await handle_banking_stop(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Banking stop handled - uid={uid}")
-
-                    elif msg_type == "banking.delete":
-                        from .frontend.pages.banking import handle_banking_delete
-                        await handle_banking_delete(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Banking delete handled - uid={uid}")
-
-                    # ============================================
-                    # INSTRUCTION TEMPLATES CRUD (shared handler, 3 pages)
-                    # ============================================
-                    elif msg_type in ("routing.templates_list", "invoices.templates_list", "banking.templates_list"):
-                        page_name = msg_type.split(".")[0]
-                        from .frontend.pages.shared.instruction_templates_handlers import handle_templates_list
-                        await handle_templates_list(uid, session_id, msg_payload, page_name)
-                        logger.info(f"[WS] {page_name}.templates_list handled - uid={uid}")
-
-                    elif msg_type in ("routing.templates_create", "invoices.templates_create", "banking.templates_create"):
-                        page_name = msg_type.split(".")[0]
-                        from .frontend.pages.shared.instruction_templates_handlers import handle_templates_create
-                        await handle_templates_create(uid, session_id, msg_payload, page_name)
-                        logger.info(f"[WS] {page_name}.templates_create handled - uid={uid}")
-
-                    elif msg_type in ("routing.templates_update", "invoices.templates_update", "banking.templates_update"):
-                        page_name = msg_type.split(".")[0]
-                        from .frontend.pages.shared.instruction_templates_handlers import handle_templates_update
-                        await handle_templates_update(uid, session_id, msg_payload, page_name)
-                        logger.info(f"[WS] {page_name}.templates_update handled - uid={uid}")
-
-                    elif msg_type in ("routing.templates_delete", "invoices.templates_delete", "banking.templates_delete"):
-                        page_name = msg_type.split(".")[0]
-                        from .frontend.pages.shared.instruction_templates_handlers import handle_templates_delete
-                        await handle_templates_delete(uid, session_id, msg_payload, page_name)
-                        logger.info(f"[WS] {page_name}.templates_delete handled - uid={uid}")
-
-                    # ============================================
-                    # HR EVENTS (Human Resources - PostgreSQL Neon)
-                    # ============================================
-                    elif msg_type == "hr.orchestrate_init":
-                        from .frontend.pages.hr.orchestration import handle_orchestrate_init as handle_hr_orchestrate_init
-                        await handle_hr_orchestrate_init(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] HR orchestrate_init handled - uid={uid}")
-
-                    elif msg_type == "hr.refresh":
-                        from .frontend.pages.hr.orchestration import handle_refresh as handle_hr_refresh
-                        await handle_hr_refresh(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] HR refresh handled - uid={uid}")
-
-                    elif msg_type == "hr.employees_list":
-                        from .frontend.pages.hr.orchestration import handle_employees_list
-                        await handle_employees_list(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] HR employees_list handled - uid={uid}")
-
-                    elif msg_type == "hr.employee_get":
-                        from .frontend.pages.hr.orchestration import handle_employee_get
-                        await handle_employee_get(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] HR employee_get handled - uid={uid}")
-
-                    elif msg_type == "hr.employee_create":
-                        from .frontend.pages.hr.orchestration import handle_employee_create
-                        await handle_employee_create(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] HR employee_create handled - uid={uid}")
-
-                    elif msg_type == "hr.employee_update":
-                        from .frontend.pages.hr.orchestration import handle_employee_update
-                        await handle_employee_update(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] HR employee_update handled - uid={uid}")
-
-                    elif msg_type == "hr.employee_delete":
-                        from .frontend.pages.hr.orchestration import handle_employee_delete
-                        await handle_employee_delete(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] HR employee_delete handled - uid={uid}")
-
-                    elif msg_type == "hr.payroll_calculate":
-                        from .frontend.pages.hr.orchestration import handle_payroll_calculate
-                        await handle_payroll_calculate(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] HR payroll_calculate handled - uid={uid}")
-
-                    elif msg_type == "hr.settings_update":
-                        from .frontend.pages.hr.orchestration import handle_settings_update
-                        await handle_settings_update(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] HR settings_update handled - uid={uid}")
-
-                    # ============================================
-                    # COCKPIT DASHBOARD EVENTS
-                    # ============================================
-                    elif msg_type == "cockpit.generate":
-                        from .frontend.pages.cockpit import handle_cockpit_generate
-                        response = await handle_cockpit_generate(
-                            uid=uid, session_id=session_id, payload=msg_payload
-                        )
-                        await ws.send_text(_json.dumps(response))
-                        logger.info(f"[WS] Cockpit generate handled - uid={uid}")
-
-                    elif msg_type == "cockpit.list_widgets":
-                        from .frontend.pages.cockpit import handle_cockpit_list_widgets
-                        response = await handle_cockpit_list_widgets(
-                            uid=uid, session_id=session_id, payload=msg_payload
-                        )
-                        await ws.send_text(_json.dumps(response))
-                        logger.info(f"[WS] Cockpit list_widgets handled - uid={uid}")
-
-                    elif msg_type == "cockpit.pin_widget":
-                        from .frontend.pages.cockpit import handle_cockpit_pin_widget
-                        response = await handle_cockpit_pin_widget(
-                            uid=uid, session_id=session_id, payload=msg_payload
-                        )
-                        await ws.send_text(_json.dumps(response))
-                        logger.info(f"[WS] Cockpit pin_widget handled - uid={uid}")
-
-                    elif msg_type == "cockpit.delete_widget":
-                        from .frontend.pages.cockpit import handle_cockpit_delete_widget
-                        response = await handle_cockpit_delete_widget(
-                            uid=uid, session_id=session_id, payload=msg_payload
-                        )
-                        await ws.send_text(_json.dumps(response))
-                        logger.info(f"[WS] Cockpit delete_widget handled - uid={uid}")
-
-                    elif msg_type == "cockpit.refresh_widget":
-                        from .frontend.pages.cockpit import handle_cockpit_refresh_widget
-                        response = await handle_cockpit_refresh_widget(
-                            uid=uid, session_id=session_id, payload=msg_payload
-                        )
-                        await ws.send_text(_json.dumps(response))
-                        logger.info(f"[WS] Cockpit refresh_widget handled - uid={uid}")
-
-                    elif msg_type == "cockpit.update_layout":
-                        from .frontend.pages.cockpit import handle_cockpit_update_layout
-                        response = await handle_cockpit_update_layout(
-                            uid=uid, session_id=session_id, payload=msg_payload
-                        )
-                        await ws.send_text(_json.dumps(response))
-                        logger.info(f"[WS] Cockpit update_layout handled - uid={uid}")
-
-                    # ============================================
-                    # LLM STREAMING EVENTS
-                    # ============================================
-                    elif msg_type == "llm.stop_streaming":
-                        # Stop the current LLM streaming response - delegue au worker
-                        from .llm_service.llm_gateway import get_llm_gateway
-
-                        session_id = msg_payload.get("session_id")  # thread_key from frontend
-                        company_id = msg_payload.get("company_id")
-
-                        logger.info(f"[WS] LLM stop_streaming request - uid={uid} company={company_id} thread={session_id}")
-
-                        try:
-                            gateway = get_llm_gateway()
-                            result = await gateway.enqueue_stop_streaming(
-                                user_id=uid,
-                                collection_name=company_id,
-                                thread_key=session_id,  # session_id from frontend is the thread_key
-                            )
-                            # Note: Le worker enverra la reponse via Redis PubSub -> WebSocket
-                            # On envoie une confirmation immediate que le job est enqueue
-                            response = {
-                                "type": "llm.stop_streaming_queued",
-                                "payload": {
-                                    "success": True,
-                                    "session_id": session_id,
-                                    "job_id": result.get("job_id"),
-                                    "message": "Stop streaming request queued",
-                                }
-                            }
-                        except Exception as e:
-                            logger.error(f"[WS] LLM stop_streaming error: {e}")
-                            response = {
-                                "type": "llm.stream_interrupted",
-                                "payload": {
-                                    "success": False,
-                                    "session_id": session_id,
-                                    "accumulated_content": "",
-                                    "reason": "error",
-                                    "error": str(e),
-                                }
-                            }
-                        await ws.send_text(_json.dumps(response))
-                        logger.info(f"[WS] LLM stop_streaming response sent - uid={uid}")
-
-                    # ============================================
-                    # PAGE STATE EVENTS (for fast page recovery)
-                    # ============================================
-                    elif msg_type == "page.restore_state":
-                        from .wrappers.page_state_manager import get_page_state_manager
-                        from .ws_events import WS_EVENTS
-
-                        page = msg_payload.get("page")
-                        company_id = msg_payload.get("company_id")
-
-                        if not company_id:
-                            response = {
-                                "type": WS_EVENTS.PAGE_STATE.NOT_FOUND,
-                                "payload": {
-                                    "page": page,
-                                    "reason": "invalid_company",
-                                    "message": "company_id is required for page state recovery"
-                                }
-                            }
-                            logger.warning(f"[WS] Page state restore failed - no company_id - uid={uid} page={page}")
-                        else:
-                            manager = get_page_state_manager()
-
-                            # TEMP: Invalidate stale chat cache to force fresh orchestration
-                            if page == "chat":
-                                manager.invalidate_page_state(uid=uid, company_id=company_id, page="chat")
-                                logger.info(f"[WS] TEMP: Invalidated stale chat cache - uid={uid}")
-
-                            state = manager.get_page_state(
-                                uid=uid,
-                                company_id=company_id,
-                                page=page
-                            )
-
-                            if state:
-                                # Synchroniser le contexte de page pour le Contextual Publisher
-                                from .realtime.contextual_publisher import update_page_context
-                                update_page_context(uid, page)
-
-                                response = {
-                                    "type": WS_EVENTS.PAGE_STATE.RESTORED,
-                                    "payload": {
-                                        "success": True,
-                                        "page": page,
-                                        "data": state.get("data", {}),
-                                        "loaded_at": state.get("loaded_at"),
-                                        "company_id": state.get("company_id"),
-                                        "mandate_path": state.get("mandate_path"),
-                                    }
-                                }
-                                logger.info(f"[WS] Page state restored - uid={uid} page={page} company={company_id}")
-                            else:
-                                response = {
-                                    "type": WS_EVENTS.PAGE_STATE.NOT_FOUND,
-                                    "payload": {
-                                        "page": page,
-                                        "reason": "not_cached",
-                                    }
-                                }
-                                logger.info(f"[WS] Page state not found - uid={uid} page={page} company={company_id}")
-
-                        await ws.send_text(_json.dumps(response))
-
-                        # Dashboard: recalculer les metrics fraîches depuis le business cache
-                        # Le page_state contient un snapshot figé, mais le business cache est
-                        # à jour (mis à jour par PubSub subscriber). On envoie un event
-                        # dashboard.metrics_update immédiatement après le restore pour corriger.
-                        if page == "dashboard" and state:
-                            try:
-                                from .cache.metrics_calculator import MetricsCalculator
-                                from .llm_service.redis_namespaces import build_business_key
-                                calculator = MetricsCalculator(get_redis())
-                                fresh_metrics = calculator.get_all_metrics(uid, company_id)
-
-                                # Lire le billing_history frais depuis le cache Redis
-                                # (mis à jour par PubSub subscriber en temps réel)
-                                # Fallback sur les données du page_state snapshot
-                                billing_history_payload = None
-                                try:
-                                    billing_key = build_business_key(uid, company_id, "billing_history")
-                                    raw_billing = get_redis().get(billing_key)
-                                    if raw_billing:
-                                        billing_data = _json.loads(raw_billing if isinstance(raw_billing, str) else raw_billing.decode())
-                                        # Gérer le format enveloppé (unified_cache_manager) et brut
-                                        if "data" in billing_data and isinstance(billing_data["data"], dict):
-                                            billing_history_payload = billing_data["data"]
-                                        elif "items" in billing_data:
-                                            billing_history_payload = billing_data
-                                        if billing_history_payload:
-                                            logger.info(
-                                                f"[WS] billing_history from Redis cache: "
-                                                f"items={len(billing_history_payload.get('items', []))}"
-                                            )
-                                except Exception as bh_err:
-                                    logger.warning(f"[WS] Could not read billing_history from cache: {bh_err}")
-
-                                # Fallback: utiliser les données du page_state snapshot
-                                if not billing_history_payload:
-                                    expenses_snapshot = state.get("data", {}).get("expenses")
-                                    if expenses_snapshot and expenses_snapshot.get("items"):
-                                        billing_history_payload = expenses_snapshot
-                                        logger.info(
-                                            f"[WS] billing_history from page_state snapshot: "
-                                            f"items={len(billing_history_payload.get('items', []))}"
-                                        )
-
-                                metrics_payload = {
-                                    "metrics": fresh_metrics,
-                                    "action": "full"
-                                }
-                                if billing_history_payload:
-                                    metrics_payload["expenses"] = billing_history_payload
-
-                                metrics_event = {
-                                    "type": WS_EVENTS.DASHBOARD.METRICS_UPDATE,
-                                    "payload": metrics_payload
-                                }
-                                await ws.send_text(_json.dumps(metrics_event))
-                                logger.info(
-                                    f"[WS] Fresh metrics+billing_history sent after dashboard restore - "
-                                    f"uid={uid} has_expenses={bool(billing_history_payload)}"
-                                )
-                            except Exception as metrics_err:
-                                logger.error(f"[WS] Failed to send fresh metrics after dashboard restore: {metrics_err}")
-
-                            # Re-peupler le cache billing_history depuis les données du page_state
-                            # Le page_state (TTL 1800s) survit au billing_history cache (TTL 1800s),
-                            # donc on re-écrit le cache pour que les PubSub puissent le mettre à jour
-                            try:
-                                expenses_data = state.get("data", {}).get("expenses")
-                                if expenses_data and expenses_data.get("items"):
-                                    billing_key = build_business_key(uid, company_id, "billing_history")
-                                    # Vérifier si le cache existe déjà (écrit par PubSub subscriber)
-                                    existing = get_redis().exists(billing_key)
-                                    if not existing:
-                                        get_redis().setex(billing_key, 1800, _json.dumps(expenses_data))
-                                        logger.info(f"[WS] billing_history cache re-populated from page_state - uid={uid}")
-                                    else:
-                                        logger.info(f"[WS] billing_history cache already exists, skipping re-populate - uid={uid}")
-                            except Exception as exp_err:
-                                logger.error(f"[WS] Failed to re-populate billing_history cache: {exp_err}")
-
-                    elif msg_type == "page.invalidate_state":
-                        from .wrappers.page_state_manager import get_page_state_manager
-
-                        page = msg_payload.get("page")  # None = invalidate all
-                        company_id = msg_payload.get("company_id")
-
-                        if company_id:
-                            manager = get_page_state_manager()
-                            manager.invalidate_page_state(
-                                uid=uid,
-                                company_id=company_id,
-                                page=page
-                            )
-
-                            response = {
-                                "type": "page.state_invalidated",
-                                "payload": {
-                                    "success": True,
-                                    "page": page or "all",
-                                    "company_id": company_id,
-                                }
-                            }
-                            await ws.send_text(_json.dumps(response))
-                            logger.info(f"[WS] Page state invalidated - uid={uid} company={company_id} page={page or 'all'}")
-                        else:
-                            response = {
-                                "type": "page.state_invalidated",
-                                "payload": {
-                                    "success": False,
-                                    "error": "company_id is required",
-                                }
-                            }
-                            await ws.send_text(_json.dumps(response))
-                            logger.warning(f"[WS] Page state invalidate failed - no company_id - uid={uid}")
-
-                    # ============================================
-                    # PENDING ACTION EVENTS (OAuth/payments)
-                    # ============================================
-                    elif msg_type == "pending_action.save":
-                        from .wrappers.pending_action_manager import get_pending_action_manager
-                        from .ws_events import WS_EVENTS
-
-                        manager = get_pending_action_manager()
-                        try:
-                            state_token = manager.save_pending_action(
-                                uid=uid,
-                                session_id=msg_payload.get("session_id", session_id),
-                                action_type=msg_payload.get("action_type"),
-                                provider=msg_payload.get("provider"),
-                                return_page=msg_payload.get("return_page"),
-                                return_path=msg_payload.get("return_path"),
-                                context=msg_payload.get("context", {}),
-                            )
-
-                            # Build OAuth state for redirect URL
-                            oauth_state = manager.build_oauth_state(
-                                uid=uid,
-                                session_id=msg_payload.get("session_id", session_id),
-                                state_token=state_token
-                            )
-
-                            response = {
-                                "type": WS_EVENTS.PENDING_ACTION.SAVED,
-                                "payload": {
-                                    "success": True,
-                                    "state_token": state_token,
-                                    "oauth_state": oauth_state,
-                                }
-                            }
-                            logger.info(
-                                f"[WS] Pending action saved - uid={uid} "
-                                f"action={msg_payload.get('action_type')} "
-                                f"provider={msg_payload.get('provider')}"
-                            )
-                        except Exception as e:
-                            response = {
-                                "type": WS_EVENTS.PENDING_ACTION.SAVED,
-                                "payload": {
-                                    "success": False,
-                                    "error": str(e),
-                                }
-                            }
-                            logger.error(f"[WS] Pending action save error - uid={uid} error={e}")
-
-                        await ws.send_text(_json.dumps(response))
-
-                    elif msg_type == "pending_action.cancel":
-                        from .wrappers.pending_action_manager import get_pending_action_manager
-
-                        manager = get_pending_action_manager()
-                        cancelled = manager.cancel_pending_action(
-                            uid=uid,
-                            session_id=msg_payload.get("session_id", session_id)
-                        )
-
-                        response = {
-                            "type": "pending_action.cancelled",
-                            "payload": {
-                                "success": cancelled,
-                            }
-                        }
-                        await ws.send_text(_json.dumps(response))
-                        logger.info(f"[WS] Pending action cancelled - uid={uid} success={cancelled}")
-
-                    # ============================================
-                    # NOTIFICATION EVENTS (realtime notifications)
-                    # ============================================
-                    elif msg_type == "notification.mark_read":
-                        from .frontend.pages.notifications import handle_notification_mark_read
-                        await handle_notification_mark_read(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Notification mark_read handled - uid={uid}")
-
-                    elif msg_type == "notification.click":
-                        from .frontend.pages.notifications import handle_notification_click
-                        await handle_notification_click(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Notification click handled - uid={uid}")
-
-                    # ============================================
-                    # MESSENGER EVENTS (direct messages)
-                    # ============================================
-                    elif msg_type == "messenger.mark_read":
-                        from .frontend.pages.messenger import handle_messenger_mark_read
-                        await handle_messenger_mark_read(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Messenger mark_read handled - uid={uid}")
-
-                    elif msg_type == "messenger.click":
-                        from .frontend.pages.messenger import handle_messenger_click
-                        await handle_messenger_click(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Messenger click handled - uid={uid}")
-
-                    # ============================================
-                    # METRICS EVENTS (shared metrics stores)
-                    # ============================================
-                    elif msg_type == "metrics.refresh":
-                        from .frontend.pages.metrics import handle_metrics_refresh
-                        await handle_metrics_refresh(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Metrics refresh handled - uid={uid}")
-
-                    elif msg_type == "metrics.refresh_module":
-                        from .frontend.pages.metrics import handle_metrics_refresh_module
-                        await handle_metrics_refresh_module(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Metrics refresh_module handled - uid={uid}")
-
-                    # ============================================
-                    # ONBOARDING EVENTS (Company onboarding and setup)
-                    # ============================================
-                    elif msg_type == "onboarding.test_erp_connection":
-                        from .frontend.pages.onboarding.orchestration import handle_test_erp_connection
-                        await handle_test_erp_connection(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Onboarding test_erp_connection handled - uid={uid}")
-
-                    elif msg_type == "onboarding.load_clients":
-                        from .frontend.pages.onboarding.orchestration import handle_load_clients
-                        await handle_load_clients(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Onboarding load_clients handled - uid={uid}")
-
-                    elif msg_type == "onboarding.save_client":
-                        from .frontend.pages.onboarding.orchestration import handle_save_client
-                        await handle_save_client(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Onboarding save_client handled - uid={uid}")
-
-                    elif msg_type == "onboarding.update_client":
-                        from .frontend.pages.onboarding.orchestration import handle_update_client
-                        await handle_update_client(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Onboarding update_client handled - uid={uid}")
-
-                    elif msg_type == "onboarding.delete_client":
-                        from .frontend.pages.onboarding.orchestration import handle_delete_client
-                        await handle_delete_client(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Onboarding delete_client handled - uid={uid}")
-
-                    elif msg_type == "onboarding.submit":
-                        from .frontend.pages.onboarding.orchestration import handle_submit
-                        await handle_submit(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Onboarding submit handled - uid={uid}")
-
-                    elif msg_type == "onboarding.oauth_complete":
-                        from .frontend.pages.onboarding.orchestration import handle_oauth_complete
-                        await handle_oauth_complete(
-                            uid=uid,
-                            session_id=session_id,
-                            payload=msg_payload
-                        )
-                        logger.info(f"[WS] Onboarding oauth_complete handled - uid={uid}")
-
-                    else:
+                    # Routage via la table ws_routes (exécution concurrente, voir ws_dispatcher)
+                    if not dispatcher.dispatch(msg_type, msg_payload):
                         # Messages non gérés (pour future extension)
                         logger.debug(
                             f"[WS] Unhandled message type - uid={uid} type={msg_type}"
@@ -3838,6 +2330,10 @@ async def websocket_endpoint(ws: WebSocket):
                 
                 await hub.unregister(uid, ws)
                 
+                # Annuler les handlers encore attachés à cette connexion
+                if dispatcher is not None:
+                    await dispatcher.close()
+                
                 # ⭐ MULTI-ONGLET: Nettoyer la présence de cet onglet dans SessionStateManager
                 # Permet aux autres onglets de continuer à fonctionner correctement
                 try:
@@ -4180,25 +2676,23 @@ async def cloudwatch_download_log(req: CloudWatchDownloadRequest, authorization:
                 req.output_file = tmp_file.name
                 temp_file_created = True
         
-        # Télécharger le log
-        if req.json_format:
-            output_file = extractor.download_log_json(
-                log_stream_name=req.log_stream_name,
-                output_file=req.output_file,
-                start_time=start_time,
-                end_time=end_time
-            )
-        else:
-            output_file = extractor.download_log(
-                log_stream_name=req.log_stream_name,
-                output_file=req.output_file,
-                start_time=start_time,
-                end_time=end_time
-            )
+        # Télécharger le log (boto3 bloquant → thread; pour les gros streams,
+        # préférer /cloudwatch/logs/export)
+        download = extractor.download_log_json if req.json_format else extractor.download_log
+        output_file = await asyncio.to_thread(
+            download,
+            log_stream_name=req.log_stream_name,
+            output_file=req.output_file,
+            start_time=start_time,
+            end_time=end_time
+        )
         
         # Lire le contenu du fichier
-        with open(output_file, 'r', encoding='utf-8') as f:
-            content = f.read()
+        def _read_output() -> str:
+            with open(output_file, 'r', encoding='utf-8') as f:
+                return f.read()
+        
+        content = await asyncio.to_thread(_read_output)
         
         # Nettoyer le fichier temporaire si créé
         if temp_file_created:
@@ -4219,6 +2713,76 @@ async def cloudwatch_download_log(req: CloudWatchDownloadRequest, authorization:
         raise HTTPException(status_code=500, detail=f"Erreur lors du téléchargement du log: {str(e)}")
 
 
+@app.post("/cloudwatch/logs/export")
+async def cloudwatch_export_log(req: CloudWatchExportRequest, authorization: str | None = Header(default=None, alias="Authorization")):
+    """
+    Exporte un log CloudWatch en streaming (NDJSON ou texte).
+    
+    Les pages get_log_events / filter_log_events sont lues dans un thread et
+    envoyées au client au fur et à mesure via une file bornée: ni la boucle
+    ni la mémoire ne dépendent de la taille du stream. filter_pattern et la
+    fenêtre temporelle (minutes ou start_date/end_date) sont appliqués par
+    CloudWatch.
+    """
+    from fastapi.responses import StreamingResponse
+    from .tools.cloudwatch_logs import CloudWatchLogsExtractor, stream_log_export
+    from datetime import datetime, timedelta
+    
+    _require_auth(authorization)
+    
+    if req.format not in ("ndjson", "text"):
+        raise HTTPException(status_code=400, detail="format doit être 'ndjson' ou 'text'")
+    
+    try:
+        start_time = datetime.fromisoformat(req.start_date) if req.start_date else None
+        end_time = datetime.fromisoformat(req.end_date) if req.end_date else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Date invalide: {e}")
+    if req.minutes:
+        start_time = datetime.now() - timedelta(minutes=req.minutes)
+    
+    try:
+        extractor = CloudWatchLogsExtractor(
+            region_name=settings.aws_region_name,
+            log_group_name='/ecs/pinnokio_microservice'
+        )
+        chunks = stream_log_export(
+            extractor,
+            req.log_stream_name,
+            fmt=req.format,
+            start_time=start_time,
+            end_time=end_time,
+            filter_pattern=req.filter_pattern,
+            max_events=req.max_events,
+        )
+        # Premier chunk attendu avant la réponse: une erreur AWS (stream
+        # introuvable, credentials) devient une erreur HTTP, pas un flux tronqué
+        first_chunk = await anext(chunks, b"")
+    except Exception as e:
+        logger.error("cloudwatch_export_log_error stream=%s error=%s", req.log_stream_name, repr(e))
+        status_code = 404 if type(e).__name__ == "ResourceNotFoundException" else 500
+        raise HTTPException(status_code=status_code, detail=f"Erreur lors de l'export du log: {str(e)}")
+    
+    async def _body():
+        try:
+            if first_chunk:
+                yield first_chunk
+            async for chunk in chunks:
+                yield chunk
+        except Exception as e:
+            logger.error("cloudwatch_export_log_stream_error stream=%s error=%s", req.log_stream_name, repr(e))
+        finally:
+            await chunks.aclose()
+    
+    safe_stream_name = req.log_stream_name.replace('/', '_').replace('\\', '_')
+    extension = "ndjson" if req.format == "ndjson" else "log"
+    return StreamingResponse(
+        _body(),
+        media_type="application/x-ndjson" if req.format == "ndjson" else "text/plain; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="{safe_stream_name}.{extension}"'},
+    )
+
+
 @app.get("/cloudwatch/logs/info")
 async def cloudwatch_logs_info(authorization: str | None = Header(default=None, alias="Authorization")):
     """
@@ -505,7 +505,25 @@ class CommunicationDispatcher:
         )
 
     async def _publish_outbound(self, channel: str, message: Dict[str, Any]) -> None:
-        """Publie vers le microservice du canal via PubSubTransport."""
+        """
+        Publie vers le microservice du canal via PubSubTransport.
+
+        Telegram: passe par le TelegramOutboundScheduler (cadence par chat,
+        cartes prioritaires, fragments texte fusionnes).
+        """
+        if channel == "telegram":
+            from app.realtime.telegram_outbound_scheduler import (
+                get_telegram_outbound_scheduler,
+                telegram_outbound_scheduler_enabled,
+            )
+            if telegram_outbound_scheduler_enabled():
+                get_telegram_outbound_scheduler().enqueue(message)
+                logger.info(
+                    "[COMM_DISPATCHER] outbound queued action=%s chat_id=%s",
+                    message.get("action"), message.get("chat_id"),
+                )
+                return
+
         from app.realtime.pubsub_transport import get_pubsub_transport, TELEGRAM_OUTBOUND_TOPIC
 
         transport = get_pubsub_transport()
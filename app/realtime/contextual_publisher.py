@@ -19,7 +19,9 @@ CACHE:
 - Format:
   - USER: user:{uid}:{subkey}
   - COMPANY: company:{uid}:{cid}:{subkey}
-  - BUSINESS: business:{uid}:{cid}:{domain}
+  - BUSINESS: business:{uid}:{cid}:{domain}, ou business:shared:{cid}:{domain}
+    pour les domaines société (écrit une seule fois par fan-out, voir
+    claim_shared_write)
 
 PRINCIPE CLÉ:
 - Les METRICS sont CALCULÉES depuis les données business, pas stockées séparément
@@ -50,6 +52,8 @@ from app.llm_service.redis_namespaces import (
     build_company_settings_key,
     # Helpers Niveau 3 - BUSINESS
     build_business_key,
+    build_shared_write_marker_key,
+    is_shared_domain,
     build_bank_key,
     build_routing_key,
     build_invoices_key,
@@ -277,6 +281,31 @@ def _update_cache(
         logger.error(f"[CACHE] Failed to update cache {cache_key}: {e}")
 
 
+def claim_shared_write(company_id: str, domain: str, fanout_id: Optional[str]) -> bool:
+    """
+    Réserve l'écriture d'un fan-out dans le tier partagé société.
+
+    Un même événement métier peut être reçu une fois par membre de l'équipe
+    (fan-out par uid). L'émetteur attribue un fanout_id unique au fan-out
+    (uuid4, une fois avant la boucle sur les membres); seul le premier
+    appel portant ce fanout_id renvoie True, les suivants renvoient False.
+
+    Sans fanout_id, l'écriture a toujours lieu: deux événements au contenu
+    identique (statut A→B→A, item retiré puis ré-ajouté) sont des mises à
+    jour distinctes et doivent toutes deux être appliquées.
+
+    Domaines non partagés: toujours True (une clé par utilisateur).
+    """
+    if not company_id or not fanout_id or not is_shared_domain(domain):
+        return True
+    try:
+        marker = build_shared_write_marker_key(company_id, domain, fanout_id)
+        return bool(get_redis().set(marker, "1", nx=True, ex=RedisTTL.SHARED_WRITE_MARKER))
+    except Exception as e:
+        logger.debug(f"[CACHE] Shared write claim failed (writing anyway): {e}")
+        return True
+
+
 # ============================================
 # Vérification de Contexte
 # ============================================
@@ -363,7 +392,8 @@ async def publish_contextual_event(
     cache_subkey: Optional[str] = None,
     cache_ttl: Optional[int] = None,
     skip_connection_check: bool = False,
-    skip_cache_update: bool = False
+    skip_cache_update: bool = False,
+    fanout_id: Optional[str] = None
 ) -> bool:
     """
     Publie un événement selon le niveau de granularité.
@@ -380,6 +410,8 @@ async def publish_contextual_event(
         cache_ttl: TTL du cache en secondes (auto-déterminé si non fourni)
         skip_connection_check: Si True, publie même si non connecté
         skip_cache_update: Si True, ne met pas à jour le cache
+        fanout_id: Identifiant unique du fan-out (même valeur pour chaque
+            membre): le tier partagé n'est écrit qu'une fois par fanout_id
 
     Returns:
         True si publié, False sinon
@@ -419,11 +451,17 @@ async def publish_contextual_event(
         context = _get_user_context(uid, session_id)
 
         # 2. Mettre à jour le cache (TOUJOURS, même si pas publié)
+        #    Domaine partagé: une seule écriture par événement pour toute l'équipe
         if not skip_cache_update:
             try:
                 cache_key = _get_cache_key(level, uid, target_company_id, target_domain, cache_subkey)
                 ttl = cache_ttl or _get_ttl_for_cache(level, target_domain)
-                _update_cache(level, cache_key, payload, ttl)
+                if level != CacheLevel.BUSINESS or claim_shared_write(
+                    target_company_id, target_domain, fanout_id
+                ):
+                    _update_cache(level, cache_key, payload, ttl)
+                else:
+                    logger.debug(f"[PUBLISH] Shared cache already updated: {cache_key}")
             except ValueError as e:
                 logger.warning(f"[PUBLISH] Cache update skipped: {e}")
 
@@ -527,13 +565,15 @@ async def publish_business_event(
     event_type: str,
     payload: Dict[str, Any],
     session_id: Optional[str] = None,
-    cache_ttl: Optional[int] = None
+    cache_ttl: Optional[int] = None,
+    fanout_id: Optional[str] = None
 ) -> bool:
     """
     Helper pour publier un événement BUSINESS (par domaine métier).
 
     Args:
         domain: Domaine métier (bank, routing, invoices, expenses, coa, dashboard, chat, hr)
+        fanout_id: Identifiant du fan-out vers les membres (voir claim_shared_write)
 
     Exemples:
         # Transaction bancaire
@@ -553,7 +593,8 @@ async def publish_business_event(
         target_company_id=company_id,
         target_domain=domain,
         session_id=session_id,
-        cache_ttl=cache_ttl or get_ttl_for_domain(domain)
+        cache_ttl=cache_ttl or get_ttl_for_domain(domain),
+        fanout_id=fanout_id
     )
 
 
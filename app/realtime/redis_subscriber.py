@@ -927,7 +927,7 @@ class RedisSubscriber:
         job_id: str,
         item_data: Dict[str, Any],
         is_new: bool = False
-    ) -> None:
+    ) -> Optional[Dict[str, Any]]:
         """
         Met à jour un item dans le cache business, en respectant le format réel du cache.
 
@@ -941,7 +941,10 @@ class RedisSubscriber:
         2. Le retirer de l'ancienne liste
         3. MERGER le delta avec l'item original (préserver les champs existants)
         4. L'ajouter dans la nouvelle liste (basée sur le nouveau status)
+
+        Retourne l'item mergé (format pré-catégorisé), sinon None.
         """
+        merged_item = None
         try:
             redis = get_redis()
             cache_key = build_business_key(uid, company_id, domain)
@@ -1081,6 +1084,8 @@ class RedisSubscriber:
             # Reconstruire avec wrapper si nécessaire
             if is_wrapped:
                 cache_data["data"] = inner_data
+                # Nouvelle version du contenu (index list_query par cached_at)
+                cache_data["cached_at"] = datetime.now().isoformat()
             else:
                 cache_data = inner_data
 
@@ -1093,6 +1098,7 @@ class RedisSubscriber:
                 "[REDIS_SUBSCRIBER] business_cache_update_failed uid=%s domain=%s error=%s",
                 uid, domain, str(e), exc_info=True
             )
+        return merged_item
 
     # ── Cross-domain: Router → target department cache ADD ──────────────
     _TARGET_DEPT_KEYS = ["EXbookeeper", "exbookeeper", "APbookeeper", "Apbookeeper", "apbookeeper"]
@@ -1939,7 +1945,7 @@ class RedisSubscriber:
                     if short_key and short_key not in item_data:
                         item_data[short_key] = item_data[dk]
 
-            self._update_business_cache_item(
+            merged_item = self._update_business_cache_item(
                 uid=uid,
                 company_id=company_id,
                 domain=domain,
@@ -1948,6 +1954,18 @@ class RedisSubscriber:
                 is_new=is_new
             )
 
+            # Étape 1-bank: Projection des transactions traitées (onglet processed)
+            if domain in ("bank", "banking"):
+                try:
+                    from app.cache.bank_processed_projection import get_bank_processed_projection
+                    outcome = get_bank_processed_projection().apply_event(
+                        uid, company_id, job_id, merged_item or item_data, status=raw_status
+                    )
+                    if outcome:
+                        logger.info("[REDIS_SUBSCRIBER] → bank processed projection %s job_id=%s", outcome, job_id)
+                except Exception as proj_err:
+                    logger.warning("[REDIS_SUBSCRIBER] → bank processed projection error: %s", proj_err)
+
             # Étape 1-cross: Cross-domain ADD when Router completes a routed item
             # The Router writes department_data.{APbookeeper|EXbookeeper} in Firebase
             # but the Redis notification only says department="Router".
@@ -2033,7 +2051,8 @@ class RedisSubscriber:
                             company_id=company_id,
                             domain=domain,
                             event_type=event_type,
-                            payload=payload
+                            payload=payload,
+                            fanout_id=message_data.get("fanout_id"),
                         )
 
                         if published:
@@ -2142,6 +2161,7 @@ class RedisSubscriber:
                                 domain=target_domain,
                                 event_type=f"{target_domain}.task_manager_update",
                                 payload=cross_payload,
+                                fanout_id=message_data.get("fanout_id"),
                             )
                             if cross_published:
                                 logger.info(
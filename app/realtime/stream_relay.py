@@ -0,0 +1,313 @@
+"""
+Stream Relay - Relais basse latence des frames de streaming LLM du worker.
+
+Chaque chunk publie sur ws:stream:{uid} passait par json.loads dans le
+listener puis par hub.broadcast (sanitize + safe_json_dumps), et etait
+bufferise un par un dans Redis quand l'utilisateur etait hors ligne.
+
+PRINCIPE:
+    - Frames non fusionnables (stream_start, stream_end, tool_use...):
+      transmises telles quelles (texte pre-encode du worker), seul le champ
+      "type" d'en-tete est reecrit (normalisation EVENT_TYPE_NORMALIZATION)
+    - Chunks (llm_stream_chunk, thinking_delta...): regroupes par
+      (uid, channel, type, message_id) pendant STREAM_RELAY_WINDOW_MS.
+      Une fenetre d'un seul chunk part telle quelle; sinon un seul frame
+      est encode: "chunk" concatene, "accumulated" / "is_final" du dernier
+    - Ordre: une frame non fusionnable vide d'abord les chunks en attente
+      du meme utilisateur
+    - Hors ligne: les chunks d'un meme message sont compactes en memoire
+      en un seul message cumule, ecrit dans le buffer WS a la fin du stream
+      (frame suivante) ou apres STREAM_RELAY_OFFLINE_FLUSH_S
+
+    Les frames destinees a un canal externe (communication_chat_type) et
+    les frames illisibles repartent sur le chemin standard du listener.
+    Le json.dumps du worker peut emettre NaN / Infinity (JSON invalide pour
+    le navigateur): un texte contenant ces jetons n'est jamais transmis tel
+    quel, il est re-encode par safe_json_dumps (valeurs → null).
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import weakref
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger("realtime.stream_relay")
+
+STREAM_RELAY_WINDOW_MS = float(os.getenv("STREAM_RELAY_WINDOW_MS", "5"))
+STREAM_RELAY_OFFLINE_FLUSH_S = float(os.getenv("STREAM_RELAY_OFFLINE_FLUSH_S", "1.0"))
+
+# Types fusionnables (noms worker + noms normalises)
+COALESCIBLE_TYPES = {
+    "llm_stream_chunk", "llm_stream_delta", "llm.stream_delta",
+    "thinking_delta", "thinking_chunk", "llm.thinking_delta",
+}
+
+# En-tete {"type": "..."} produit par json.dumps cote worker
+_TYPE_HEADER = re.compile(r'\{\s*"type"\s*:\s*"([^"\\]+)"')
+
+# Jetons emis par json.dumps pour nan / inf (hors JSON strict)
+_NON_JSON_TOKENS = ("NaN", "Infinity")
+
+# (channel, type, message_id)
+StreamKey = Tuple[str, str, Optional[str]]
+
+
+def stream_relay_enabled() -> bool:
+    return os.getenv("STREAM_RELAY_ENABLED", "true").lower() == "true"
+
+
+def _is_strict_json(data: str) -> bool:
+    """Faux si le texte peut contenir NaN / Infinity (simple recherche de sous-chaine)."""
+    return not any(token in data for token in _NON_JSON_TOKENS)
+
+
+def _dumps(frame: Dict[str, Any]) -> str:
+    """json.dumps, avec repli sur safe_json_dumps si nan / inf sont presents."""
+    data = json.dumps(frame)
+    if _is_strict_json(data):
+        return data
+    from ..ws_hub import safe_json_dumps
+    return safe_json_dumps(frame)
+
+
+def _thread_key(channel: str) -> Optional[str]:
+    """Meme extraction que WebSocketHub.broadcast (format "chat:{thread_key}")."""
+    if channel and ":" in channel:
+        return channel.split(":", 1)[1]
+    return None
+
+
+class StreamRelay:
+    """Relais des frames ws:stream vers le WebSocketHub, sans aller-retour JSON."""
+
+    def __init__(
+        self,
+        hub,
+        window_ms: float = STREAM_RELAY_WINDOW_MS,
+        offline_flush_s: float = STREAM_RELAY_OFFLINE_FLUSH_S,
+        message_buffer=None,
+    ):
+        from ..ws_hub import EVENT_TYPE_NORMALIZATION
+
+        self.hub = hub
+        self.window = window_ms / 1000.0
+        self.offline_flush_s = offline_flush_s
+        self._normalization = EVENT_TYPE_NORMALIZATION
+        self._message_buffer = message_buffer
+
+        # uid → {StreamKey: [(raw, frame)]} (fenetre en cours)
+        self._pending: Dict[str, Dict[StreamKey, List[Tuple[str, Dict[str, Any]]]]] = {}
+        # uid → {StreamKey: frame cumule} (utilisateur hors ligne)
+        self._offline: Dict[str, Dict[StreamKey, Dict[str, Any]]] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._sweeps: Dict[str, asyncio.TimerHandle] = {}
+        self._tasks: set = set()
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+        self._frames_in = 0
+        self._raw_forwards = 0
+        self._coalesced_frames = 0
+        self._encoded_frames = 0
+        self._offline_compacted = 0
+        self._offline_written = 0
+
+    @property
+    def message_buffer(self):
+        if self._message_buffer is None:
+            from ..ws_message_buffer import get_message_buffer
+            self._message_buffer = get_message_buffer()
+        return self._message_buffer
+
+    def _lock_for(self, uid: str) -> asyncio.Lock:
+        lock = self._locks.get(uid)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[uid] = lock
+        return lock
+
+    # ─── Entree ───
+
+    async def relay(self, uid: str, raw: str) -> bool:
+        """
+        Prend en charge une frame ws:stream brute.
+
+        Returns:
+            False si la frame doit suivre le chemin standard du listener
+            (json.loads + hub.broadcast / dispatch externe).
+        """
+        self._frames_in += 1
+        header = _TYPE_HEADER.match(raw)
+        msg_type = header.group(1) if header else None
+
+        if msg_type in COALESCIBLE_TYPES:
+            try:
+                frame = json.loads(raw)
+            except ValueError:
+                return False
+            if not isinstance(frame, dict):
+                return False
+            payload = frame.get("payload")
+            if (
+                frame.get("communication_chat_type", "pinnokio") != "pinnokio"
+                or not isinstance(payload, dict)
+                or not isinstance(payload.get("chunk"), str)
+            ):
+                await self.flush(uid, final=True)
+                return False
+            key = (frame.get("channel", ""), msg_type, payload.get("message_id"))
+            self._add(uid, key, raw, frame)
+            return True
+
+        # Frame non fusionnable: elle passe derriere les chunks en attente
+        await self.flush(uid, final=True)
+        if (
+            msg_type is None
+            or '"communication_chat_type"' in raw
+            or not _is_strict_json(raw)
+            or not self.hub.is_user_connected(uid)
+        ):
+            return False
+
+        async with self._lock_for(uid):
+            sent = await self.hub.send_text_to_user(uid, self._normalize_raw(raw, header))
+        if not sent:
+            return False  # connexions mortes: le chemin standard bufferise
+        self._raw_forwards += 1
+        return True
+
+    def _add(self, uid: str, key: StreamKey, raw: str, frame: Dict[str, Any]) -> None:
+        groups = self._pending.get(uid)
+        if groups is None:
+            groups = self._pending[uid] = {}
+            self._timers[uid] = asyncio.get_running_loop().call_later(
+                self.window, self._spawn, self.flush, uid
+            )
+        groups.setdefault(key, []).append((raw, frame))
+
+    # ─── Sortie ───
+
+    async def flush(self, uid: str, final: bool = False) -> None:
+        """
+        Envoie la fenetre en cours de uid.
+
+        final=True (frame de fin / autre frame / sweep): les chunks compactes
+        hors ligne sont aussi ecrits dans le buffer WS.
+        """
+        timer = self._timers.pop(uid, None)
+        if timer is not None:
+            timer.cancel()
+        groups = self._pending.pop(uid, None)
+        if not groups and not self._offline.get(uid):
+            return
+
+        async with self._lock_for(uid):
+            # Utilisateur revenu: le cumul hors ligne part d'abord, en direct
+            if self._offline.get(uid) and self.hub.is_user_connected(uid):
+                for key, frame in self._pop_offline(uid):
+                    if not await self.hub.send_text_to_user(uid, _dumps(frame)):
+                        self._store_offline(uid, frame, key)
+
+            for key, frames in (groups or {}).items():
+                data, frame = self._merge(frames)
+                if self.hub.is_user_connected(uid) and await self.hub.send_text_to_user(uid, data):
+                    continue
+                self._store_offline(uid, frame, key)
+
+            if final and self._offline.get(uid):
+                self._write_offline(uid)
+
+    def _merge(self, frames: List[Tuple[str, Dict[str, Any]]]) -> Tuple[str, Dict[str, Any]]:
+        """Fusionne une fenetre de chunks: (texte a envoyer, frame equivalent)."""
+        raw, last = frames[-1]
+        msg_type = last.get("type")
+        normalized = self._normalization.get(msg_type, msg_type)
+        if len(frames) == 1:
+            frame = {**last, "type": normalized}
+            if not _is_strict_json(raw):
+                return _dumps(frame), frame
+            return self._normalize_raw(raw, _TYPE_HEADER.match(raw)), frame
+
+        merged = {
+            **last,
+            "type": normalized,
+            "payload": {**last["payload"], "chunk": "".join(f["payload"]["chunk"] for _, f in frames)},
+        }
+        self._coalesced_frames += len(frames) - 1
+        self._encoded_frames += 1
+        return _dumps(merged), merged
+
+    def _normalize_raw(self, raw: str, header) -> str:
+        msg_type = header.group(1)
+        normalized = self._normalization.get(msg_type, msg_type)
+        if normalized == msg_type:
+            return raw
+        return raw[:header.start(1)] + normalized + raw[header.end(1):]
+
+    # ─── Hors ligne ───
+
+    def _store_offline(self, uid: str, frame: Dict[str, Any], key: StreamKey) -> None:
+        entries = self._offline.setdefault(uid, {})
+        previous = entries.get(key)
+        if previous is None:
+            entries[key] = frame
+        else:
+            self._offline_compacted += 1
+            entries[key] = {
+                **frame,
+                "payload": {
+                    **frame["payload"],
+                    "chunk": previous["payload"]["chunk"] + frame["payload"]["chunk"],
+                },
+            }
+
+        if uid not in self._sweeps:
+            self._sweeps[uid] = asyncio.get_running_loop().call_later(
+                self.offline_flush_s, self._spawn, self._sweep, uid
+            )
+
+    def _pop_offline(self, uid: str) -> List[Tuple[StreamKey, Dict[str, Any]]]:
+        sweep = self._sweeps.pop(uid, None)
+        if sweep is not None:
+            sweep.cancel()
+        return list((self._offline.pop(uid, None) or {}).items())
+
+    async def _sweep(self, uid: str) -> None:
+        self._sweeps.pop(uid, None)
+        await self.flush(uid, final=True)
+
+    def _write_offline(self, uid: str) -> None:
+        """Ecrit un message cumule par stream dans le buffer WS (replay a la reconnexion)."""
+        for _, frame in self._pop_offline(uid):
+            thread_key = _thread_key(frame.get("channel", ""))
+            if not thread_key:
+                continue
+            self.message_buffer.buffer_message(uid, thread_key, frame)
+            self._offline_written += 1
+
+    def _spawn(self, func, *args) -> None:
+        task = asyncio.get_running_loop().create_task(func(*args))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def close(self) -> None:
+        """Vide toutes les fenetres et ecrit les cumuls hors ligne (arret du listener)."""
+        for uid in set(self._pending) | set(self._offline):
+            await self.flush(uid, final=True)
+
+    # ─── Metriques ───
+
+    def get_summary(self) -> Dict[str, Any]:
+        return {
+            "frames_in": self._frames_in,
+            "raw_forwards": self._raw_forwards,
+            "coalesced_frames": self._coalesced_frames,
+            "encoded_frames": self._encoded_frames,
+            "offline_compacted": self._offline_compacted,
+            "offline_written": self._offline_written,
+            "pending_users": len(self._pending),
+            "offline_users": len(self._offline),
+            "window_ms": self.window * 1000,
+        }
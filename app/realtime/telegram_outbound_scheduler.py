@@ -0,0 +1,330 @@
+"""
+TelegramOutboundScheduler — File sortante Telegram cadencee par chat.
+
+Les messages sortants du CommunicationDispatcher partaient directement sur
+le topic telegram-outbound, un par evenement worker, sans tenir compte des
+limites Telegram par chat (~20 messages/minute dans un groupe). Les rooms
+router/banker chargees recevaient des rafales que le bot sortant devait
+ralentir ou perdre.
+
+PRINCIPE:
+    - Une file par chat_id, cadencee par token bucket
+      (TELEGRAM_CHAT_RATE_PER_MIN, TELEGRAM_CHAT_BURST), plus un bucket
+      global (TELEGRAM_GLOBAL_RATE_PER_SEC)
+    - Priorite: cartes / etapes wizard (messages a boutons) avant le texte
+    - Coalescence: un fragment texte qui suit un autre fragment texte encore
+      en file pour le meme chat y est fusionne (un seul send_message, dans
+      la limite de 4096 caracteres), seulement si tous ses autres champs
+      (mandate_path, parse_mode, reply_to...) sont identiques
+    - Metriques: profondeur par chat, delai d'attente moyen / max,
+      envoyes, fusionnes, echecs
+
+    L'horloge et la fonction de publication sont injectables (tests:
+    horloge virtuelle + faux transport, pump() pilote a la main).
+
+    Pas d'edition de message: le bot sortant ne renvoie pas les message_id
+    au backend, la fusion se fait donc tant que le message est en file.
+
+USAGE:
+    from app.realtime.telegram_outbound_scheduler import get_telegram_outbound_scheduler
+
+    get_telegram_outbound_scheduler().enqueue({"action": "send_message", "chat_id": -49, "text": "..."})
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger("realtime.telegram_outbound_scheduler")
+
+TELEGRAM_CHAT_RATE_PER_MIN = float(os.getenv("TELEGRAM_CHAT_RATE_PER_MIN", "20"))
+TELEGRAM_CHAT_BURST = int(os.getenv("TELEGRAM_CHAT_BURST", "3"))
+TELEGRAM_GLOBAL_RATE_PER_SEC = float(os.getenv("TELEGRAM_GLOBAL_RATE_PER_SEC", "25"))
+TELEGRAM_MAX_TEXT_LEN = 4096
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_TEXT = 1
+
+INTERACTIVE_ACTIONS = {"send_message_with_buttons"}
+TEXT_ACTIONS = {"send_message"}
+
+
+def telegram_outbound_scheduler_enabled() -> bool:
+    return os.getenv("TELEGRAM_OUTBOUND_SCHEDULER_ENABLED", "true").lower() == "true"
+
+
+class TokenBucket:
+    """Token bucket classique: `rate` jetons/seconde, au plus `capacity`."""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: int, now: float):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.tokens = float(self.capacity)
+        self.updated = now
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Secondes avant qu'un jeton soit disponible (0 = maintenant)."""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class _OutboundEntry:
+    __slots__ = ("priority", "seq", "message", "enqueued_at", "pending")
+
+    def __init__(self, priority: int, seq: int, message: Dict[str, Any], enqueued_at: float):
+        self.priority = priority
+        self.seq = seq
+        self.message = message
+        self.enqueued_at = enqueued_at
+        self.pending = True
+
+    def __lt__(self, other: "_OutboundEntry") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class _ChatQueue:
+    __slots__ = ("bucket", "heap", "last")
+
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        self.heap: List[_OutboundEntry] = []
+        self.last: Optional[_OutboundEntry] = None
+
+
+class TelegramOutboundScheduler:
+    """File sortante Telegram: token bucket par chat, priorites, coalescence."""
+
+    def __init__(
+        self,
+        publish: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+        clock: Callable[[], float] = time.monotonic,
+        chat_rate_per_min: float = TELEGRAM_CHAT_RATE_PER_MIN,
+        chat_burst: int = TELEGRAM_CHAT_BURST,
+        global_rate_per_sec: float = TELEGRAM_GLOBAL_RATE_PER_SEC,
+        max_text_len: int = TELEGRAM_MAX_TEXT_LEN,
+    ):
+        self._publish = publish or self._publish_transport
+        self._clock = clock
+        self.chat_rate = chat_rate_per_min / 60.0
+        self.chat_burst = chat_burst
+        self.max_text_len = max_text_len
+        self._global = TokenBucket(global_rate_per_sec, max(1, int(global_rate_per_sec)), clock())
+        self._chats: Dict[str, _ChatQueue] = {}
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self._enqueued = 0
+        self._sent = 0
+        self._coalesced = 0
+        self._failed = 0
+        self._delay_total = 0.0
+        self._delay_max = 0.0
+
+    # ─── File ───
+
+    def enqueue(self, message: Dict[str, Any]) -> None:
+        """Ajoute un message sortant (format topic telegram-outbound) a la file de son chat."""
+        now = self._clock()
+        chat_key = str(message.get("chat_id"))
+        chat = self._chats.get(chat_key)
+        if chat is None:
+            chat = self._chats[chat_key] = _ChatQueue(TokenBucket(self.chat_rate, self.chat_burst, now))
+
+        self._enqueued += 1
+        if self._coalesce(chat, message):
+            self._coalesced += 1
+        else:
+            priority = PRIORITY_INTERACTIVE if message.get("action") in INTERACTIVE_ACTIONS else PRIORITY_TEXT
+            entry = _OutboundEntry(priority, next(self._seq), dict(message), now)
+            heapq.heappush(chat.heap, entry)
+            chat.last = entry
+
+        self._ensure_running()
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    @staticmethod
+    def _coalesce_key(message: Dict[str, Any]) -> Dict[str, Any]:
+        """Tous les champs hors texte: deux fragments fusionnables doivent les partager."""
+        return {key: value for key, value in message.items() if key != "text"}
+
+    def _coalesce(self, chat: _ChatQueue, message: Dict[str, Any]) -> bool:
+        """Fusionne un fragment texte dans le fragment texte precedent encore en file."""
+        last = chat.last
+        if (
+            last is None
+            or not last.pending
+            or message.get("action") not in TEXT_ACTIONS
+            or self._coalesce_key(last.message) != self._coalesce_key(message)
+        ):
+            return False
+        text = message.get("text", "")
+        merged = f"{last.message.get('text', '')}\n\n{text}" if text else last.message.get("text", "")
+        if len(merged) > self.max_text_len:
+            return False
+        last.message["text"] = merged
+        return True
+
+    async def pump(self) -> Optional[float]:
+        """
+        Envoie tout ce que les buckets autorisent maintenant.
+
+        Returns:
+            Secondes avant le prochain envoi possible, None si la file est vide.
+        """
+        while True:
+            now = self._clock()
+            ready: Optional[_ChatQueue] = None
+            next_delay: Optional[float] = None
+
+            for chat_key in list(self._chats):
+                chat = self._chats[chat_key]
+                if not chat.heap:
+                    if chat.bucket.is_full(now):
+                        del self._chats[chat_key]
+                    continue
+                delay = chat.bucket.delay(now)
+                if delay > 0:
+                    next_delay = delay if next_delay is None else min(next_delay, delay)
+                elif ready is None or chat.heap[0] < ready.heap[0]:
+                    ready = chat
+
+            if ready is None:
+                return next_delay
+
+            global_delay = self._global.delay(now)
+            if global_delay > 0:
+                return global_delay
+
+            ready.bucket.take(now)
+            self._global.take(now)
+            entry = heapq.heappop(ready.heap)
+            entry.pending = False
+            await self._send(entry, now)
+
+    async def _send(self, entry: _OutboundEntry, now: float) -> None:
+        waited = max(0.0, now - entry.enqueued_at)
+        try:
+            await self._publish(entry.message)
+            self._sent += 1
+            self._delay_total += waited
+            self._delay_max = max(self._delay_max, waited)
+        except Exception as e:
+            self._failed += 1
+            logger.error(
+                "[TG_OUTBOUND] publish failed chat_id=%s action=%s error=%s",
+                entry.message.get("chat_id"), entry.message.get("action"), e,
+            )
+
+    @staticmethod
+    async def _publish_transport(message: Dict[str, Any]) -> None:
+        from app.realtime.pubsub_transport import get_pubsub_transport, TELEGRAM_OUTBOUND_TOPIC
+
+        # publish() est bloquant en mode Pub/Sub (future.result)
+        await asyncio.to_thread(get_pubsub_transport().publish, TELEGRAM_OUTBOUND_TOPIC, message)
+
+    # ─── Boucle ───
+
+    def _ensure_running(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # Pas de boucle: pump() pilote a la main (tests)
+        self._wakeup = asyncio.Event()
+        self._task = loop.create_task(self._run(), name="telegram-outbound-scheduler")
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                delay = await self.pump()
+            except Exception as e:
+                logger.error("[TG_OUTBOUND] pump error: %s", e)
+                delay = 1.0
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def stop(self, flush: bool = True) -> None:
+        """Arrete la boucle; flush=True publie ce qui reste en file (sans cadence)."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        if not flush:
+            return
+        entries = sorted(entry for chat in self._chats.values() for entry in chat.heap)
+        self._chats.clear()
+        now = self._clock()
+        for entry in entries:
+            entry.pending = False
+            await self._send(entry, now)
+        if entries:
+            logger.info("[TG_OUTBOUND] flushed %d queued message(s) on stop", len(entries))
+
+    # ─── Metriques ───
+
+    def get_summary(self) -> Dict[str, Any]:
+        now = self._clock()
+        depths = {key: len(chat.heap) for key, chat in self._chats.items() if chat.heap}
+        oldest = min(
+            (entry.enqueued_at for chat in self._chats.values() for entry in chat.heap),
+            default=None,
+        )
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "queued": sum(depths.values()),
+            "chats": dict(sorted(depths.items(), key=lambda kv: kv[1], reverse=True)[:20]),
+            "oldest_wait_ms": round((now - oldest) * 1000, 1) if oldest is not None else 0.0,
+            "enqueued": self._enqueued,
+            "sent": self._sent,
+            "coalesced": self._coalesced,
+            "failed": self._failed,
+            "delay_avg_ms": round(self._delay_total / self._sent * 1000, 1) if self._sent else 0.0,
+            "delay_max_ms": round(self._delay_max * 1000, 1),
+            "config": {
+                "chat_rate_per_min": self.chat_rate * 60,
+                "chat_burst": self.chat_burst,
+                "global_rate_per_sec": self._global.rate,
+            },
+        }
+
+
+# Singleton
+_scheduler: Optional[TelegramOutboundScheduler] = None
+
+
+def get_telegram_outbound_scheduler() -> TelegramOutboundScheduler:
+    """Retourne l'instance singleton du TelegramOutboundScheduler."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = TelegramOutboundScheduler()
+    return _scheduler
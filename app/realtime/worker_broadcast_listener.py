@@ -9,7 +9,7 @@ Architecture:
 
 Channels ecoutes (per-user dynamic subscribe):
 - ws:broadcast:{uid} - Evenements generaux (llm_response, tool_execution, etc.)
-- ws:stream:{uid}    - Streaming LLM chunks
+- ws:stream:{uid}    - Streaming LLM chunks (relais pre-encode, voir stream_relay)
 - ws:notification:{uid} - Notifications utilisateur
 
 Compatible ElastiCache Serverless (no psubscribe).
@@ -52,6 +52,7 @@ class WorkerBroadcastListener:
         self._hub = None
         self._subscribed_uids: Set[str] = set()
         self._sub_lock = asyncio.Lock()
+        self._relay = None
 
     @property
     def redis(self):
@@ -68,6 +69,14 @@ class WorkerBroadcastListener:
             self._hub = hub
         return self._hub
 
+    @property
+    def relay(self):
+        """Lazy load du StreamRelay (frames ws:stream)."""
+        if self._relay is None:
+            from .stream_relay import StreamRelay
+            self._relay = StreamRelay(self.hub)
+        return self._relay
+
     def _channels_for_uid(self, uid: str) -> list[str]:
         """Return the 3 channels for a given user."""
         return [f"{prefix}:{uid}" for prefix in CHANNEL_PREFIXES]
@@ -144,6 +153,12 @@ class WorkerBroadcastListener:
             except asyncio.CancelledError:
                 pass
 
+        if self._relay is not None:
+            try:
+                await self._relay.close()
+            except Exception as e:
+                logger.error("worker_broadcast_relay_close_error error=%s", repr(e))
+
         if self._pubsub:
             try:
                 await asyncio.to_thread(self._pubsub.unsubscribe)
@@ -214,6 +229,16 @@ class WorkerBroadcastListener:
         if isinstance(data, bytes):
             data = data.decode("utf-8")
 
+        # Streaming: relais pre-encode (chunks fusionnes, pas de decode/encode)
+        from .stream_relay import stream_relay_enabled
+        if stream_relay_enabled():
+            if channel_type == "stream":
+                if await self.relay.relay(user_id, data):
+                    return
+            elif self._relay is not None:
+                # Garder l'ordre: les chunks en attente partent avant cet evenement
+                await self._relay.flush(user_id, final=True)
+
         try:
             payload = json.loads(data)
         except json.JSONDecodeError as e:
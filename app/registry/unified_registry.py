@@ -1,6 +1,22 @@
 """
 Service de registre unifié pour la gestion centralisée des utilisateurs, sociétés et tâches.
 Compatible avec l'infrastructure existante, fonctionne en parallèle sans impact.
+
+Index Redis (maintenus à l'enregistrement / désenregistrement):
+    registry:heartbeats              ZSET  user_id → timestamp du dernier heartbeat
+    registry:sessions                HASH  session_id → user_id
+    registry:company:{id}:users      SET   utilisateurs actifs de la société
+    registry:user_refs               HASH  user_id → {session_id, company_id}
+                                           (survit au hash utilisateur, pour le nettoyage)
+    registry:tasks:created           ZSET  task_id → timestamp de création
+
+Le heartbeat n'écrit plus le blob JSON: un score ZSET et un champ
+`last_heartbeat` du hash utilisateur (un seul EVAL). Les lectures du blob
+réinjectent ce champ (get_user_registry).
+
+Les utilisateurs et tâches enregistrés avant l'introduction des index sont
+repris par backfill_indexes() (appelé par cleanup_expired_entries tant
+qu'il reste des entrées legacy).
 """
 
 import json
@@ -11,12 +27,77 @@ from datetime import datetime, timezone
 from ..redis_client import get_redis
 from ..firebase_client import get_firestore
 
+# KEYS[1] = registry:unified:{uid}, KEYS[2] = registry:heartbeats
+# ARGV[1] = user_id, ARGV[2] = timestamp, ARGV[3] = ISO, ARGV[4] = TTL
+# Ne recrée pas un utilisateur désenregistré (retourne 0).
+# Le TTL du SET société est prolongé avec celui du hash (clé dérivée du champ
+# company_id: Redis non cluster, comme le reste du registre).
+HEARTBEAT_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'last_heartbeat', ARGV[3], 'last_update', ARGV[2])
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[4]))
+redis.call('ZADD', KEYS[2], tonumber(ARGV[2]), ARGV[1])
+local company_id = redis.call('HGET', KEYS[1], 'company_id')
+if company_id and company_id ~= '' then
+    redis.call('EXPIRE', 'registry:company:' .. company_id .. ':users', tonumber(ARGV[4]))
+end
+return 1
+"""
+
+# KEYS[1] = registry:heartbeats, KEYS[2] = registry:sessions, KEYS[3] = registry:user_refs
+# ARGV[1] = cutoff (timestamp), ARGV[2] = taille du lot
+# Sélection et suppression dans le même EVAL: un heartbeat ne peut pas
+# s'intercaler entre la lecture du score et le nettoyage de l'utilisateur.
+PRUNE_USERS_LUA = """
+local users = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+for _, user_id in ipairs(users) do
+    local raw = redis.call('HGET', KEYS[3], user_id)
+    if raw then
+        local ref = cjson.decode(raw)
+        if type(ref.session_id) == 'string' and ref.session_id ~= '' then
+            redis.call('HDEL', KEYS[2], ref.session_id)
+        end
+        if type(ref.company_id) == 'string' and ref.company_id ~= '' then
+            redis.call('SREM', 'registry:company:' .. ref.company_id .. ':users', user_id)
+        end
+    end
+    redis.call('DEL', 'registry:unified:' .. user_id)
+    redis.call('HDEL', KEYS[3], user_id)
+    redis.call('ZREM', KEYS[1], user_id)
+end
+return #users
+"""
+
+
 class UnifiedRegistryService:
     """Service de gestion du registre unifié pour utilisateurs, sociétés et tâches."""
     
-    def __init__(self):
-        self.redis = get_redis()
-        self.db = get_firestore()
+    USER_TTL = 24 * 3600             # TTL du hash utilisateur
+    CONNECTED_WINDOW = 300           # heartbeat < 5 min → connecté (mode UI)
+    TASK_RETENTION = 7200            # tâches purgées après 2h
+    
+    HEARTBEATS_KEY = "registry:heartbeats"
+    SESSIONS_KEY = "registry:sessions"
+    USER_REFS_KEY = "registry:user_refs"
+    TASKS_CREATED_KEY = "registry:tasks:created"
+    BACKFILL_DONE_KEY = "registry:indexes:backfilled"
+    PRUNE_BATCH = 500                # utilisateurs supprimés par EVAL
+    
+    def __init__(self, redis_client=None, firestore_client=None):
+        self.redis = redis_client if redis_client is not None else get_redis()
+        self.db = firestore_client if firestore_client is not None else get_firestore()
+        self._heartbeat_script = self.redis.register_script(HEARTBEAT_LUA)
+        self._prune_users_script = self.redis.register_script(PRUNE_USERS_LUA)
+    
+    @staticmethod
+    def _user_key(user_id: str) -> str:
+        return f"registry:unified:{user_id}"
+    
+    @staticmethod
+    def _company_users_key(company_id: str) -> str:
+        return f"registry:company:{company_id}:users"
         
     # ========== Gestion des utilisateurs ==========
     
@@ -60,13 +141,34 @@ class UnifiedRegistryService:
                 }
             }
             
-            # Enregistrer dans Redis
-            key = f"registry:unified:{user_id}"
-            self.redis.hset(key, mapping={
+            # Enregistrer dans Redis (blob + index, un seul pipeline)
+            key = self._user_key(user_id)
+            now = time.time()
+            previous = self.redis.hmget(key, "session_id", "company_id")
+            
+            pipe = self.redis.pipeline(transaction=False)
+            if previous[0] and previous[0] != session_id:
+                pipe.hdel(self.SESSIONS_KEY, previous[0])
+            if previous[1] and previous[1] != company_id:
+                pipe.srem(self._company_users_key(previous[1]), user_id)
+            pipe.hset(key, mapping={
                 "data": json.dumps(registry_data),
-                "last_update": str(time.time())
+                "last_update": str(now),
+                "last_heartbeat": registry_data["heartbeat"]["last_heartbeat"],
+                "session_id": session_id,
+                "company_id": company_id or "",
             })
-            self.redis.expire(key, 24 * 3600)  # TTL 24h
+            pipe.expire(key, self.USER_TTL)  # TTL 24h
+            pipe.zadd(self.HEARTBEATS_KEY, {user_id: now})
+            pipe.hset(self.SESSIONS_KEY, session_id, user_id)
+            pipe.hset(self.USER_REFS_KEY, user_id, json.dumps({
+                "session_id": session_id,
+                "company_id": company_id or "",
+            }))
+            if company_id:
+                pipe.sadd(self._company_users_key(company_id), user_id)
+                pipe.expire(self._company_users_key(company_id), self.USER_TTL)
+            pipe.execute()
             
             # Enregistrer dans le registre société
             self._register_user_to_company(user_id, company_id, session_id)
@@ -81,70 +183,51 @@ class UnifiedRegistryService:
             raise
     
     def update_user_heartbeat(self, user_id: str) -> bool:
-        """Met à jour le heartbeat utilisateur."""
+        """
+        Met à jour le heartbeat utilisateur.
+        
+        Un seul aller-retour: score ZSET + champ `last_heartbeat` du hash,
+        sans relire ni réécrire le blob JSON.
+        """
         try:
-            key = f"registry:unified:{user_id}"
-            if not self.redis.exists(key):
-                return False
-                
-            # Récupérer les données actuelles
-            data_json = self.redis.hget(key, "data")
-            if not data_json:
-                return False
-                
-            registry_data = json.loads(data_json)
-            
-            # Mettre à jour le heartbeat
-            now = datetime.now(timezone.utc).isoformat()
-            registry_data["user_info"]["last_seen_at"] = now
-            registry_data["heartbeat"]["last_heartbeat"] = now
-            
-            # Sauvegarder
-            self.redis.hset(key, mapping={
-                "data": json.dumps(registry_data),
-                "last_update": str(time.time())
-            })
-            self.redis.expire(key, 24 * 3600)
-            
-            return True
+            now = time.time()
+            iso = datetime.fromtimestamp(now, timezone.utc).isoformat()
+            updated = self._heartbeat_script(
+                keys=[self._user_key(user_id), self.HEARTBEATS_KEY],
+                args=[user_id, now, iso, self.USER_TTL],
+            )
+            return bool(updated)
         except Exception as e:
             print(f"❌ Erreur heartbeat utilisateur {user_id}: {e}")
             return False
     
     def unregister_user_session(self, session_id: str) -> bool:
-        """Désenregistre une session utilisateur."""
+        """Désenregistre une session utilisateur (lookup via l'index session → user)."""
         try:
-            # Trouver l'utilisateur par session_id
-            pattern = "registry:unified:*"
-            cursor = 0
-            removed = False
+            user_id = self.redis.hget(self.SESSIONS_KEY, session_id)
+            if not user_id:
+                return False
             
-            while True:
-                cursor, keys = self.redis.scan(cursor=cursor, match=pattern, count=200)
-                for key in keys:
-                    try:
-                        data_json = self.redis.hget(key, "data")
-                        if data_json:
-                            registry_data = json.loads(data_json)
-                            if registry_data.get("user_info", {}).get("session_id") == session_id:
-                                user_id = registry_data["user_info"]["user_id"]
-                                company_id = registry_data["companies"]["current_company_id"]
-                                
-                                # Supprimer de Redis
-                                self.redis.delete(key)
-                                
-                                # Supprimer du registre société
-                                self._unregister_user_from_company(user_id, company_id)
-                                
-                                removed = True
-                                break
-                    except Exception:
-                        continue
-                
-                if cursor == 0 or removed:
-                    break
+            key = self._user_key(user_id)
+            current_session, company_id = self.redis.hmget(key, "session_id", "company_id")
+            
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hdel(self.SESSIONS_KEY, session_id)
+            # Session remplacée entre-temps: seul l'index est nettoyé
+            if current_session and current_session != session_id:
+                pipe.execute()
+                return False
+            pipe.delete(key)
+            pipe.zrem(self.HEARTBEATS_KEY, user_id)
+            pipe.hdel(self.USER_REFS_KEY, user_id)
+            if company_id:
+                pipe.srem(self._company_users_key(company_id), user_id)
+            pipe.execute()
             
-            return removed
+            if company_id:
+                self._unregister_user_from_company(user_id, company_id)
+            
+            return True
         except Exception as e:
             print(f"❌ Erreur unregister_user_session pour {session_id}: {e}")
             return False
@@ -221,11 +304,15 @@ class UnifiedRegistryService:
             
             # Enregistrer la tâche
             task_key = f"registry:task:{task_id}"
-            self.redis.hset(task_key, mapping={
+            now = time.time()
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hset(task_key, mapping={
                 "data": json.dumps(task_data),
-                "created_at": str(time.time())
+                "created_at": str(now)
             })
-            self.redis.expire(task_key, max_duration + 300)  # TTL = durée max + buffer
+            pipe.expire(task_key, max_duration + 300)  # TTL = durée max + buffer
+            pipe.zadd(self.TASKS_CREATED_KEY, {task_id: now})
+            pipe.execute()
             
             # Ajouter à la liste des tâches utilisateur
             self._add_task_to_user_registry(user_id, task_id)
@@ -277,9 +364,17 @@ class UnifiedRegistryService:
     def get_user_registry(self, user_id: str) -> Optional[dict]:
         """Récupère le registre complet d'un utilisateur."""
         try:
-            key = f"registry:unified:{user_id}"
-            data_json = self.redis.hget(key, "data")
-            return json.loads(data_json) if data_json else None
+            data_json, last_heartbeat = self.redis.hmget(
+                self._user_key(user_id), "data", "last_heartbeat"
+            )
+            if not data_json:
+                return None
+            registry_data = json.loads(data_json)
+            # Le heartbeat vit hors du blob (champ dédié)
+            if last_heartbeat:
+                registry_data.setdefault("user_info", {})["last_seen_at"] = last_heartbeat
+                registry_data.setdefault("heartbeat", {})["last_heartbeat"] = last_heartbeat
+            return registry_data
         except Exception:
             return None
     
@@ -295,20 +390,20 @@ class UnifiedRegistryService:
     def get_company_active_users(self, company_id: str) -> List[str]:
         """Récupère la liste des utilisateurs actifs d'une société."""
         try:
-            key = f"registry:company:{company_id}"
-            data_json = self.redis.hget(key, "data")
-            if data_json:
-                company_data = json.loads(data_json)
-                return list(company_data.get("active_users", {}).keys())
-            return []
+            return list(self.redis.smembers(self._company_users_key(company_id)))
         except Exception:
             return []
     
+    def get_user_last_heartbeat(self, user_id: str) -> Optional[float]:
+        """Timestamp du dernier heartbeat (None si inconnu)."""
+        score = self.redis.zscore(self.HEARTBEATS_KEY, user_id)
+        return float(score) if score is not None else None
+    
     def is_user_connected(self, user_id: str) -> bool:
         """
         Vérifie si un utilisateur est actuellement connecté.
         
-        Critère : Présence dans le registre avec heartbeat récent (< 5 minutes).
+        Critère : heartbeat récent (< 5 minutes) dans l'index registry:heartbeats.
         Utilisé pour déterminer le mode UI (connecté) vs Backend (déconnecté).
         
         Args:
@@ -318,38 +413,10 @@ class UnifiedRegistryService:
             True si user connecté (Mode UI), False sinon (Mode Backend)
         """
         try:
-            registry_data = self.get_user_registry(user_id)
-            
-            if not registry_data:
-                return False
-            
-            # Vérifier si le heartbeat est récent (< 5 minutes)
-            last_heartbeat = registry_data.get("heartbeat", {}).get("last_heartbeat")
-            if not last_heartbeat:
-                return False
-            
-            # Parser le timestamp ISO
-            from datetime import datetime, timezone, timedelta
-            try:
-                # Support des deux formats datetime
-                if isinstance(last_heartbeat, str):
-                    # Format ISO string
-                    if last_heartbeat.endswith('Z'):
-                        last_heartbeat = last_heartbeat[:-1] + '+00:00'
-                    last_heartbeat_dt = datetime.fromisoformat(last_heartbeat)
-                else:
-                    return False
-                
-                now = datetime.now(timezone.utc)
-                age_seconds = (now - last_heartbeat_dt).total_seconds()
-                
-                # Considérer connecté si heartbeat < 5 minutes (300 secondes)
-                return age_seconds < 300
-                
-            except (ValueError, AttributeError) as e:
-                print(f"⚠️ Erreur parsing heartbeat pour {user_id}: {e}")
+            last_heartbeat = self.get_user_last_heartbeat(user_id)
+            if last_heartbeat is None:
                 return False
-        
+            return (time.time() - last_heartbeat) < self.CONNECTED_WINDOW
         except Exception as e:
             print(f"❌ Erreur is_user_connected {user_id}: {e}")
             return False
@@ -367,28 +434,107 @@ class UnifiedRegistryService:
         """
         return "UI" if self.is_user_connected(user_id) else "BACKEND"
     
-    def cleanup_expired_entries(self):
-        """Nettoie les entrées expirées (tâche de maintenance)."""
+    def cleanup_expired_entries(self) -> Dict[str, int]:
+        """
+        Nettoie les entrées expirées (tâche de maintenance).
+        
+        Sélection par score au lieu d'un SCAN de toutes les clés:
+        - utilisateurs sans heartbeat depuis USER_TTL (hash déjà expiré):
+          sélection et suppression atomiques (PRUNE_USERS_LUA, par lots);
+          session et société lues dans registry:user_refs, qui lui survit
+        - tâches créées depuis plus de TASK_RETENTION (score de création fixe)
+        """
         # Cette méthode sera appelée périodiquement par Celery Beat
+        stats = {"users": 0, "tasks": 0}
         try:
-            # Nettoyer les tâches expirées
-            pattern = "registry:task:*"
-            cursor = 0
+            if not self.redis.exists(self.BACKFILL_DONE_KEY):
+                backfilled = self.backfill_indexes()
+                if backfilled:
+                    stats["backfilled"] = backfilled
             
+            now = time.time()
+            
+            # Utilisateurs expirés: retirer des index
+            user_cutoff = now - self.USER_TTL
             while True:
-                cursor, keys = self.redis.scan(cursor=cursor, match=pattern, count=100)
-                for key in keys:
-                    try:
-                        created_at = self.redis.hget(key, "created_at")
-                        if created_at and (time.time() - float(created_at)) > 7200:  # 2h
-                            self.redis.delete(key)
-                    except Exception:
-                        continue
-                
-                if cursor == 0:
+                pruned = self._prune_users_script(
+                    keys=[self.HEARTBEATS_KEY, self.SESSIONS_KEY, self.USER_REFS_KEY],
+                    args=[user_cutoff, self.PRUNE_BATCH],
+                )
+                stats["users"] += pruned
+                if pruned < self.PRUNE_BATCH:
                     break
+            
+            # Tâches expirées
+            task_cutoff = now - self.TASK_RETENTION
+            expired_tasks = self.redis.zrangebyscore(self.TASKS_CREATED_KEY, "-inf", task_cutoff)
+            if expired_tasks:
+                pipe = self.redis.pipeline(transaction=False)
+                pipe.delete(*[f"registry:task:{task_id}" for task_id in expired_tasks])
+                pipe.zrem(self.TASKS_CREATED_KEY, *expired_tasks)
+                pipe.execute()
+                stats["tasks"] = len(expired_tasks)
         except Exception as e:
             print(f"❌ Erreur cleanup_expired_entries: {e}")
+        return stats
+    
+    def backfill_indexes(self) -> int:
+        """
+        Reprend dans les index les utilisateurs et tâches enregistrés avant eux.
+        
+        Un hash utilisateur sans champ `session_id` a été écrit par l'ancien
+        code: session et société sont relues dans le blob, le score de
+        heartbeat est son `last_update`. Écritures en NX uniquement, pour ne
+        jamais écraser un enregistrement plus récent.
+        
+        SCAN ponctuel: le marqueur BACKFILL_DONE_KEY est posé au premier
+        passage qui ne trouve plus d'entrée legacy (fin du déploiement).
+        
+        Returns:
+            Nombre d'utilisateurs et de tâches repris
+        """
+        backfilled = 0
+        now = time.time()
+        
+        for key in self.redis.scan_iter(match="registry:unified:*", count=200):
+            raw, last_update, session_id = self.redis.hmget(key, "data", "last_update", "session_id")
+            if session_id is not None or not raw:
+                continue
+            try:
+                data = json.loads(raw)
+            except (TypeError, ValueError):
+                continue
+            user_id = key[len("registry:unified:"):]
+            session_id = (data.get("user_info") or {}).get("session_id") or ""
+            company_id = (data.get("companies") or {}).get("current_company_id") or ""
+            
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hsetnx(key, "session_id", session_id)
+            pipe.hsetnx(key, "company_id", company_id)
+            pipe.zadd(self.HEARTBEATS_KEY, {user_id: float(last_update or now)}, nx=True)
+            pipe.hsetnx(self.USER_REFS_KEY, user_id, json.dumps({
+                "session_id": session_id,
+                "company_id": company_id,
+            }))
+            if session_id:
+                pipe.hsetnx(self.SESSIONS_KEY, session_id, user_id)
+            if company_id:
+                pipe.sadd(self._company_users_key(company_id), user_id)
+                pipe.expire(self._company_users_key(company_id), self.USER_TTL)
+            pipe.execute()
+            backfilled += 1
+        
+        for key in self.redis.scan_iter(match="registry:task:*", count=200):
+            task_id = key[len("registry:task:"):]
+            if self.redis.zscore(self.TASKS_CREATED_KEY, task_id) is not None:
+                continue
+            created_at = self.redis.hget(key, "created_at")
+            self.redis.zadd(self.TASKS_CREATED_KEY, {task_id: float(created_at or now)}, nx=True)
+            backfilled += 1
+        
+        if backfilled == 0:
+            self.redis.set(self.BACKFILL_DONE_KEY, str(now))
+        return backfilled
     
     # ========== Méthodes privées ==========
     
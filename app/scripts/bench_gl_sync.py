@@ -0,0 +1,119 @@
+"""
+Benchmark: synchronisation GL (Odoo → Neon), chargement complet vs pipeline par pages.
+
+Usage:
+    python -m app.scripts.bench_gl_sync [--lines 200000] [--page-size 5000]
+
+What it does:
+    1. Génère N lignes account.move.line au format search_read d'Odoo
+    2. Ancien chemin: DataFrame complète + iterrows + _odoo_gl_to_neon_entry,
+       liste complète remise à l'upsert
+    3. Nouveau chemin: _do_gl_sync (pages keyset, transformation colonne par
+       colonne, upsert page par page) avec un manager Neon factice
+    4. Affiche lignes/s et pic mémoire Python (tracemalloc) pour chacun
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+import tracemalloc
+
+
+def make_lines(n: int):
+    return [
+        {
+            "id": i,
+            "date": f"2025-{1 + i % 12:02d}-15",
+            "account_type": "asset_cash",
+            "currency_id": [2, "EUR"] if i % 3 == 0 else False,
+            "parent_state": "posted",
+            "amount_currency": -12.5 if i % 3 == 0 else 0.0,
+            "currency_rate": 1.09 if i % 3 == 0 else False,
+            "name": f"Ligne {i}",
+            "debit": float(i % 97),
+            "credit": 0.0,
+            "balance": float(i % 97),
+            "account_id": [10 + i % 40, f"{1000 + i % 40} Compte"],
+            "journal_id": [3, "Banque BNK1"],
+            "move_id": [100000 + i // 2, f"BNK1/2025/{i // 2:06d}"],
+            "company_id": [1, "ACME"],
+            "write_date": "2025-06-01 10:00:00",
+            "full_reconcile_id": False,
+            "partner_id": [7, "Client SA"] if i % 2 else False,
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+class FakeOdoo:
+    company_name = "ACME"
+
+    def __init__(self, lines):
+        self.lines = lines
+
+    def execute_kw(self, model, method, args, kwargs=None):
+        after_id = next(v for f, op, v in args[0] if f == "id" and op == ">")
+        # ids contigus: la page commence à l'index after_id
+        return [dict(r) for r in self.lines[after_id:after_id + kwargs["limit"]]]
+
+
+class FakeManager:
+    async def get_sync_metadata(self, company_id, sync_type):
+        return None
+
+    async def incremental_sync_gl_entries(self, company_id, entries):
+        return {"added": len(entries), "modified": 0, "unchanged": 0}
+
+    async def period_balances_stale(self, company_id):
+        return False
+
+
+def run_legacy(lines, mapping) -> dict:
+    import pandas as pd
+    from app.tools.accounting_sync_service import _odoo_gl_to_neon_entry
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    df = pd.DataFrame([dict(r) for r in lines])
+    entries = [_odoo_gl_to_neon_entry(row.to_dict(), mapping) for _, row in df.iterrows()]
+    asyncio.run(FakeManager().incremental_sync_gl_entries(None, entries))
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"rows_per_s": len(entries) / elapsed, "peak_mb": peak / 1e6}
+
+
+def run_pipeline(lines, mapping, page_size: int) -> dict:
+    from app.tools import accounting_sync_service as sync_service
+
+    sync_service.GL_SYNC_PAGE_SIZE = page_size
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = asyncio.run(sync_service._do_gl_sync(FakeManager(), FakeOdoo(lines), None, False, mapping))
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"rows_per_s": result["gl"]["total_fetched"] / elapsed, "peak_mb": peak / 1e6}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=200000)
+    parser.add_argument("--page-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    lines = make_lines(args.lines)
+    mapping = {3: "BNK1"}
+    print(f"lines={args.lines} page_size={args.page_size}")
+    # Le pic mesuré exclut les lignes source (déjà en mémoire côté ERP)
+    for label, result in (
+        ("full load", run_legacy(lines, mapping)),
+        ("pipeline", run_pipeline(lines, mapping, args.page_size)),
+    ):
+        print(f"  {label:>9}: {result['rows_per_s']:>10.0f} rows/s | peak {result['peak_mb']:>8.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
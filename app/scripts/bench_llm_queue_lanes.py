@@ -0,0 +1,106 @@
+"""
+Benchmark: attente des jobs interactifs sous une rafale de background.
+
+Usage:
+    python -m app.scripts.bench_llm_queue_lanes [--background 5000] [--interactive 200]
+    python -m app.scripts.bench_llm_queue_lanes --redis-url redis://localhost:6379/15
+
+What it does:
+    1. Remplit la queue LLM avec N jobs background (tâches planifiées)
+    2. Injecte un job interactif tous les K dequeues
+    3. Consomme un job par tick (temps virtuel) et mesure l'attente
+       des jobs interactifs, en mode FIFO historique puis avec les lanes
+
+Sans --redis-url, utilise fakeredis (pip install "fakeredis[lua]").
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+from datetime import datetime, timezone
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def run(redis_client, background: int, interactive: int, every: int, lanes: bool) -> dict:
+    from app.llm_service.llm_gateway import LLMGateway
+    from app.llm_service.llm_queue import LLMJobConsumer
+
+    os.environ["LLM_QUEUE_PRIORITY_LANES"] = "1" if lanes else "0"
+    redis_client.flushdb()
+
+    gateway = LLMGateway()
+    gateway._redis = redis_client
+    gateway._ensure_llm_worker_background = lambda: None
+
+    def job(job_type, n):
+        return {
+            "job_id": f"{job_type}-{n}",
+            "type": job_type,
+            "params": {"n": n},
+            "queued_at": datetime.now(timezone.utc).isoformat(),
+        }
+
+    await gateway.enqueue_jobs([job("execute_scheduled_task", i) for i in range(background)])
+
+    consumer = LLMJobConsumer(redis_client)
+    enqueued_at = {}
+    waits = []
+    sent = 0
+    tick = 0
+    while True:
+        if sent < interactive and tick % every == 0:
+            await gateway.enqueue_jobs([job("send_message", sent)])
+            enqueued_at[f"send_message-{sent}"] = tick
+            sent += 1
+        item = consumer.dequeue()
+        if item is None:
+            break
+        if item["type"] == "send_message":
+            waits.append(tick - enqueued_at[item["job_id"]])
+        tick += 1
+
+    return {
+        "mode": "lanes" if lanes else "fifo",
+        "ticks": tick,
+        "p50": statistics.median(waits) if waits else 0,
+        "p99": _percentile(waits, 99),
+        "max": max(waits) if waits else 0,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--background", type=int, default=5000)
+    parser.add_argument("--interactive", type=int, default=200)
+    parser.add_argument("--every", type=int, default=10, help="un job interactif tous les N dequeues")
+    parser.add_argument("--redis-url", default=None)
+    args = parser.parse_args()
+
+    if args.redis_url:
+        import redis
+        client = redis.Redis.from_url(args.redis_url, decode_responses=True)
+    else:
+        import fakeredis
+        client = fakeredis.FakeRedis(decode_responses=True)
+
+    print(f"background={args.background} interactive={args.interactive} every={args.every}")
+    for lanes in (False, True):
+        result = asyncio.run(run(client, args.background, args.interactive, args.every, lanes))
+        print(
+            f"  {result['mode']:>5}: interactive wait (ticks) "
+            f"p50={result['p50']} p99={result['p99']} max={result['max']} "
+            f"total_ticks={result['ticks']}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
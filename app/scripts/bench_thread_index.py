@@ -0,0 +1,226 @@
+"""
+Benchmark: coût du listing des sessions de chat vs volume de messages.
+
+Usage:
+    python -m app.scripts.bench_thread_index [--threads 50] [--messages 10,100,1000]
+
+What it does:
+    1. Remplit une RTDB en mémoire (InMemoryRTDB) via FirebaseRealtimeChat:
+       N threads, M messages par thread (send_realtime_message_structured)
+    2. Mesure les octets lus pour lister les threads:
+       - ancien chemin: GET complet de {space}/chats (tous les messages)
+       - nouveau chemin: list_threads (index + clés shallow)
+    3. Répète pour plusieurs M: le nouveau chemin reste constant
+
+InMemoryRTDB imite le sous-ensemble de firebase_admin.db.Reference utilisé
+par le provider (child, get(shallow), set, update multi-chemins avec
+ServerValue.increment, push, delete, order_by_key() avec start_at / end_at /
+limit_to_last).
+"""
+
+import argparse
+import contextlib
+import copy
+import io
+import itertools
+import json
+import sys
+import time
+
+
+# ═══════════════════════════════════════════════════════════════
+# RTDB EN MÉMOIRE
+# ═══════════════════════════════════════════════════════════════
+
+class InMemoryRTDB:
+    """Référence racine d'une RTDB en mémoire (compte les octets lus)."""
+
+    def __init__(self):
+        self.data = {}
+        self.bytes_read = 0
+        self._push_ids = itertools.count()
+
+    def child(self, path):
+        return _Ref(self, [p for p in path.strip("/").split("/") if p])
+
+    def reset_counters(self):
+        self.bytes_read = 0
+
+
+class _Ref:
+    def __init__(self, db, parts):
+        self._db = db
+        self._parts = parts
+
+    def child(self, path):
+        return _Ref(self._db, self._parts + [p for p in path.strip("/").split("/") if p])
+
+    # ─── lecture ───
+
+    def _node(self):
+        node = self._db.data
+        for part in self._parts:
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return node
+
+    def _read(self, value):
+        if value is not None:
+            self._db.bytes_read += len(json.dumps(value))
+        return value
+
+    def get(self, etag=False, shallow=False):
+        node = self._node()
+        if shallow and isinstance(node, dict):
+            return self._read({key: True for key in node})
+        return self._read(copy.deepcopy(node))
+
+    def order_by_key(self):
+        return _Query(self)
+
+    # ─── écriture ───
+
+    def _parent(self, create=True):
+        node = self._db.data
+        for part in self._parts[:-1]:
+            if not isinstance(node.get(part), dict):
+                if not create:
+                    return None
+                node[part] = {}
+            node = node[part]
+        return node
+
+    def set(self, value):
+        if value is None or value == {}:
+            self.delete()
+            return None
+        self._parent()[self._parts[-1]] = copy.deepcopy(value)
+        return None
+
+    def update(self, value):
+        for path, item in value.items():
+            ref = self.child(path)
+            if isinstance(item, dict) and ".sv" in item:
+                current = ref._node()
+                item = (current if isinstance(current, (int, float)) else 0) + item[".sv"]["increment"]
+            if item is None:
+                ref.delete()
+            else:
+                ref.set(item)
+        return None
+
+    def push(self, value=""):
+        # Push IDs chronologiques (comme Firebase)
+        push_id = f"-N{next(self._db._push_ids):012d}"
+        ref = self.child(push_id)
+        ref.set(value)
+        return ref
+
+    def delete(self):
+        parent = self._parent(create=False)
+        if parent is not None:
+            parent.pop(self._parts[-1], None)
+
+
+class _Query:
+    def __init__(self, ref):
+        self._ref = ref
+        self._limit_last = None
+        self._start = None
+        self._end = None
+
+    def limit_to_last(self, n):
+        self._limit_last = n
+        return self
+
+    def start_at(self, key):
+        self._start = key
+        return self
+
+    def end_at(self, key):
+        self._end = key
+        return self
+
+    def get(self):
+        node = self._ref._node()
+        if not isinstance(node, dict):
+            return None
+        keys = sorted(node)
+        if self._start is not None:
+            keys = [k for k in keys if k >= self._start]
+        if self._end is not None:
+            keys = [k for k in keys if k <= self._end]
+        if self._limit_last:
+            keys = keys[-self._limit_last:]
+        return self._ref._read({key: copy.deepcopy(node[key]) for key in keys})
+
+
+def make_realtime_chat(db):
+    """FirebaseRealtimeChat branché sur une RTDB en mémoire (sans Firebase)."""
+    from app.firebase_providers import FirebaseRealtimeChat
+
+    chat = object.__new__(FirebaseRealtimeChat)
+    chat.db = db
+    return chat
+
+
+# ═══════════════════════════════════════════════════════════════
+# BENCHMARK
+# ═══════════════════════════════════════════════════════════════
+
+def run(threads: int, messages: int) -> dict:
+    db = InMemoryRTDB()
+    chat = make_realtime_chat(db)
+
+    # Le provider est verbeux (print par message)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for t in range(threads):
+            thread_key = f"thread_{t}"
+            chat.create_chat("u1", "space", f"Chat {t}", mode="chats", thread_key=thread_key)
+            for m in range(messages):
+                chat.send_realtime_message_structured(
+                    "u1", "space", thread_key, text=f"message {m} " + "x" * 200, mode="chats"
+                )
+
+    db.reset_counters()
+    start = time.perf_counter()
+    db.child("space/chats").get()
+    legacy_ms = (time.perf_counter() - start) * 1000
+    legacy_bytes = db.bytes_read
+
+    db.reset_counters()
+    start = time.perf_counter()
+    listed, _ = chat.list_threads("space", mode="chats")
+    index_ms = (time.perf_counter() - start) * 1000
+    index_bytes = db.bytes_read
+
+    assert len(listed) == threads
+    return {
+        "messages": messages,
+        "legacy_bytes": legacy_bytes,
+        "legacy_ms": legacy_ms,
+        "index_bytes": index_bytes,
+        "index_ms": index_ms,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=50)
+    parser.add_argument("--messages", default="10,100,1000", help="messages par thread (liste)")
+    args = parser.parse_args()
+
+    print(f"threads={args.threads}")
+    for messages in (int(m) for m in args.messages.split(",")):
+        r = run(args.threads, messages)
+        print(
+            f"  messages/thread={r['messages']:>5}: "
+            f"full subtree {r['legacy_bytes']:>10} B ({r['legacy_ms']:.1f} ms) | "
+            f"index {r['index_bytes']:>7} B ({r['index_ms']:.1f} ms)"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -19,11 +19,18 @@ import threading
 import logging
 from typing import Optional
 
+from concurrent.futures import ThreadPoolExecutor
+
+from google.api_core.exceptions import NotFound
 from google.cloud import storage
 from .tools.g_cred import get_secret
 
 logger = logging.getLogger("storage_client")
 
+# Recursive deletes: blobs per GCS batch request (API max 100), batches in flight
+DELETE_BATCH_SIZE = 100
+DELETE_CONCURRENCY = 8
+
 _STORAGE_CLIENT_SINGLETON: Optional["StorageClientSingleton"] = None
 
 
@@ -92,21 +99,32 @@ class StorageClientSingleton:
                 bucket = self._bucket
 
             if recursive:
-                blobs = list(bucket.list_blobs(prefix=clean_path))
-                if not blobs:
+                # Paged listing → chunks of DELETE_BATCH_SIZE sent as GCS batch
+                # requests, DELETE_CONCURRENCY chunks in flight. Re-running an
+                # interrupted delete resumes naturally (listing only returns
+                # what is left).
+                total = 0
+                deleted = 0
+                with ThreadPoolExecutor(max_workers=DELETE_CONCURRENCY, thread_name_prefix="gcs-delete") as pool:
+                    futures = []
+                    chunk = []
+                    for blob in bucket.list_blobs(prefix=clean_path, page_size=1000):
+                        chunk.append(blob)
+                        if len(chunk) >= DELETE_BATCH_SIZE:
+                            futures.append(pool.submit(self._delete_blob_batch, chunk))
+                            total += len(chunk)
+                            chunk = []
+                    if chunk:
+                        futures.append(pool.submit(self._delete_blob_batch, chunk))
+                        total += len(chunk)
+                    for future in futures:
+                        deleted += future.result()
+
+                if not total:
                     logger.info(f"[GCS] No blobs found at prefix: {bucket_name or self._bucket.name}/{clean_path}")
                     return {"success": True, "deleted_count": 0}
 
-                # Delete in batches
-                deleted = 0
-                for blob in blobs:
-                    try:
-                        blob.delete()
-                        deleted += 1
-                    except Exception as e:
-                        logger.warning(f"[GCS] Failed to delete blob {blob.name}: {e}")
-
-                logger.info(f"[GCS] Deleted {deleted}/{len(blobs)} blobs at prefix: {bucket_name or self._bucket.name}/{clean_path}")
+                logger.info(f"[GCS] Deleted {deleted}/{total} blobs at prefix: {bucket_name or self._bucket.name}/{clean_path}")
                 return {"success": True, "deleted_count": deleted}
             else:
                 # Delete single blob
@@ -123,6 +141,32 @@ class StorageClientSingleton:
             logger.error(f"[GCS] delete_path failed for '{path}': {e}")
             return {"success": False, "deleted_count": 0, "error": str(e)}
 
+    def _delete_blob_batch(self, blobs: list) -> int:
+        """
+        Delete up to DELETE_BATCH_SIZE blobs in one GCS batch request.
+
+        Falls back to one-by-one deletes if the batch fails, so a single bad
+        blob does not fail the whole chunk. Returns the number deleted.
+        """
+        try:
+            with self._client.batch():
+                for blob in blobs:
+                    blob.delete()
+            return len(blobs)
+        except Exception as e:
+            logger.warning(f"[GCS] Batch delete failed ({len(blobs)} blobs), retrying one by one: {e}")
+
+        deleted = 0
+        for blob in blobs:
+            try:
+                blob.delete()
+                deleted += 1
+            except NotFound:
+                deleted += 1
+            except Exception as e:
+                logger.warning(f"[GCS] Failed to delete blob {blob.name}: {e}")
+        return deleted
+
     def download_blob(self, bucket_name: str, blob_name: str):
         """
         Download a blob from GCS and return it as a file-like object.
@@ -161,15 +205,30 @@ class StorageClientSingleton:
             logger.error(f"[GCS] download_blob failed for '{bucket_name}/{blob_name}': {e}")
             raise
 
-    def upload_blob(self, bucket_name: str, blob_name: str, data, content_type: str = None):
+    def upload_blob(
+        self,
+        bucket_name: str,
+        blob_name: str,
+        data,
+        content_type: str = None,
+        chunk_size: int = None,
+        size: int = None,
+        metadata: dict = None,
+    ):
         """
         Upload data to a blob in GCS.
 
+        Blocking: call through asyncio.to_thread from async code.
+
         Args:
             bucket_name: The GCS bucket name.
             blob_name: The path/name for the blob.
             data: The data to upload (bytes, string, or file-like object).
             content_type: Optional content type (e.g., 'application/json').
+            chunk_size: If set (multiple of 256 KB), file-like data is sent as
+                a resumable upload in chunks of this size.
+            size: Optional byte size of file-like data.
+            metadata: Optional custom metadata (e.g. {"sha256": ...}).
 
         Returns:
             {"success": True/False, "blob_path": str, "error": str (if failed)}
@@ -181,7 +240,9 @@ class StorageClientSingleton:
             else:
                 bucket = self._bucket
 
-            blob = bucket.blob(blob_name)
+            blob = bucket.blob(blob_name, chunk_size=chunk_size)
+            if metadata:
+                blob.metadata = metadata
 
             # Handle different data types
             if isinstance(data, bytes):
@@ -190,7 +251,7 @@ class StorageClientSingleton:
                 blob.upload_from_string(data.encode('utf-8'), content_type=content_type)
             elif hasattr(data, 'read'):
                 # File-like object
-                blob.upload_from_file(data, content_type=content_type)
+                blob.upload_from_file(data, size=size, content_type=content_type)
             else:
                 raise ValueError(f"Unsupported data type: {type(data)}")
 
@@ -201,6 +262,24 @@ class StorageClientSingleton:
             logger.error(f"[GCS] upload_blob failed for '{bucket_name}/{blob_name}': {e}")
             return {"success": False, "error": str(e)}
 
+    def blob_exists(self, blob_name: str, bucket_name: str = None) -> bool:
+        """
+        Check whether a blob exists (metadata request only).
+
+        Args:
+            blob_name: Path of the blob.
+            bucket_name: Optional bucket name (uses default if not specified).
+        """
+        try:
+            if bucket_name and bucket_name != self._bucket.name:
+                bucket = self._client.bucket(bucket_name)
+            else:
+                bucket = self._bucket
+            return bucket.blob(blob_name).exists()
+        except Exception as e:
+            logger.warning(f"[GCS] blob_exists failed for '{blob_name}': {e}")
+            return False
+
     def list_blobs(self, prefix: str = None, bucket_name: str = None) -> list:
         """
         List blobs in the bucket with optional prefix filter.
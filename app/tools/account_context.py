@@ -301,6 +301,9 @@ async def ensure_account_context(
             company_id = company["id"]
             is_new_company = company["is_new"]
 
+            from .company_resolver import get_company_resolver
+            get_company_resolver().remember(mandate_path, company_id)
+
             logger.info(f"[CONTEXT] Company: {company_id} ({company_name}, new={is_new_company})")
 
             # =================================================================
@@ -0,0 +1,228 @@
+"""
+Planificateur des requetes de soldes (period_balances + gl_entries).
+
+PRINCIPE:
+    accounting.period_balances contient les agregats mensuels (annee, mois,
+    compte) maintenus par delta a chaque sync GL. Une requete sur une periode
+    [date_from, date_to] est decoupee en:
+
+        - mois complets   → lus dans period_balances (une ligne par compte/mois)
+        - mois partiels   → ecritures brutes de gl_entries (debut / fin de periode)
+
+    Les deux sources sont unies (UNION ALL) dans une sous-requete au format
+    commun (account_number, account_name, period 'YYYY-MM', debit, credit,
+    entry_count) sur laquelle les handlers appliquent jointure COA et GROUP BY.
+
+    Si les soldes ne refletent pas la dataset_version GL courante
+    (sync_metadata 'period_balances' != 'gl'), toute la periode est lue
+    dans gl_entries.
+
+CACHE:
+    Les resultats sont memorises par (societe, requete, versions des donnees):
+    un appel repete de l'agent avec les memes parametres ne touche pas Neon
+    tant que le GL / COA n'a pas change.
+
+Usage:
+    from app.tools.accounting_balance_planner import plan_period, build_source_sql
+
+    plan = plan_period(date(2025, 1, 15), date(2025, 6, 30), use_balances=True)
+    params = [company_id]
+    source = build_source_sql(plan, params, account_prefix="6")
+    rows = await conn.fetch(f"SELECT ... FROM ({source}) src ...", *params)
+"""
+
+import calendar
+import copy
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+
+# ===================================================================
+# PLAN
+# ===================================================================
+
+@dataclass(frozen=True)
+class PeriodPlan:
+    """
+    Decoupage d'une periode.
+
+    Les mois sont indexes par annee * 12 + (mois - 1). month_from None =
+    depuis l'origine; month_to None = aucun mois complet (lecture brute).
+    """
+
+    month_from: Optional[int] = None
+    month_to: Optional[int] = None
+    raw_ranges: Tuple[Tuple[Optional[date], date], ...] = ()
+
+    @property
+    def uses_balances(self) -> bool:
+        return self.month_to is not None
+
+
+def _month_index(d: date) -> int:
+    return d.year * 12 + d.month - 1
+
+
+def _month_start(index: int) -> date:
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _month_end(index: int) -> date:
+    year, month = index // 12, index % 12 + 1
+    return date(year, month, calendar.monthrange(year, month)[1])
+
+
+def plan_period(date_from: Optional[date], date_to: date, use_balances: bool = True) -> PeriodPlan:
+    """
+    Decoupe [date_from, date_to] en mois complets (soldes) et bornes partielles (brut).
+
+    date_from None = depuis l'origine (solde a date).
+    """
+    if not use_balances or (date_from is not None and date_from > date_to):
+        return PeriodPlan(raw_ranges=((date_from, date_to),))
+
+    first = None
+    if date_from is not None:
+        first = _month_index(date_from) if date_from.day == 1 else _month_index(date_from) + 1
+    last = _month_index(date_to)
+    if date_to != _month_end(last):
+        last -= 1
+
+    if first is not None and first > last:
+        return PeriodPlan(raw_ranges=((date_from, date_to),))
+
+    ranges = []
+    if date_from is not None and date_from < _month_start(first):
+        ranges.append((date_from, _month_start(first) - timedelta(days=1)))
+    if date_to > _month_end(last):
+        ranges.append((_month_end(last) + timedelta(days=1), date_to))
+    return PeriodPlan(month_from=first, month_to=last, raw_ranges=tuple(ranges))
+
+
+def build_source_sql(plan: PeriodPlan, params: List[Any], account_prefix: Optional[str] = None) -> str:
+    """
+    Sous-requete (account_number, account_name, period, debit, credit, entry_count).
+
+    params contient deja company_id en $1; les parametres du plan y sont ajoutes.
+    """
+
+    def _param(value: Any) -> str:
+        params.append(value)
+        return f"${len(params)}"
+
+    prefix = _param(account_prefix) if account_prefix else None
+    branches = []
+
+    if plan.uses_balances:
+        conditions = [
+            "pb.company_id = $1",
+            f"pb.fiscal_year * 12 + pb.fiscal_month - 1 <= {_param(plan.month_to)}",
+        ]
+        if plan.month_from is not None:
+            conditions.append(f"pb.fiscal_year * 12 + pb.fiscal_month - 1 >= {_param(plan.month_from)}")
+        if prefix:
+            conditions.append(f"pb.account_number LIKE {prefix} || '%'")
+        branches.append(f"""
+            SELECT pb.account_number, pb.account_name,
+                   pb.fiscal_year::TEXT || '-' || LPAD(pb.fiscal_month::TEXT, 2, '0') AS period,
+                   pb.total_debit AS debit, pb.total_credit AS credit, pb.entry_count
+            FROM accounting.period_balances pb
+            WHERE {' AND '.join(conditions)}
+        """)
+
+    for start, end in plan.raw_ranges:
+        conditions = [
+            "gl.company_id = $1",
+            f"gl.entry_date <= {_param(end)}",
+            "NOT gl.is_deleted",
+            "gl.entry_state = 'posted'",
+        ]
+        if start is not None:
+            conditions.append(f"gl.entry_date >= {_param(start)}")
+        if prefix:
+            conditions.append(f"gl.account_number LIKE {prefix} || '%'")
+        branches.append(f"""
+            SELECT gl.account_number, MAX(gl.account_name) AS account_name,
+                   TO_CHAR(gl.entry_date, 'YYYY-MM') AS period,
+                   SUM(gl.debit) AS debit, SUM(gl.credit) AS credit, COUNT(*) AS entry_count
+            FROM accounting.gl_entries gl
+            WHERE {' AND '.join(conditions)}
+            GROUP BY gl.account_number, TO_CHAR(gl.entry_date, 'YYYY-MM')
+        """)
+
+    return "\n            UNION ALL\n".join(branches)
+
+
+# ===================================================================
+# VERSIONS
+# ===================================================================
+
+def _version(versions: Dict[str, Dict[str, Any]], sync_type: str, field: str = "dataset_version") -> Any:
+    return (versions.get(sync_type) or {}).get(field)
+
+
+def balances_fresh(versions: Dict[str, Dict[str, Any]]) -> bool:
+    """True si period_balances reflete la dataset_version GL courante."""
+    balances_version = _version(versions, "period_balances")
+    return balances_version is not None and balances_version == (_version(versions, "gl") or 0)
+
+
+def versions_key(versions: Dict[str, Dict[str, Any]]) -> Tuple:
+    """
+    Cle de version des donnees lues par les requetes de soldes.
+
+    Le COA est aussi versionne par last_sync_time: l'upsert depuis Firebase
+    ne fait pas evoluer sa dataset_version.
+    """
+    return (
+        _version(versions, "gl"),
+        _version(versions, "period_balances"),
+        _version(versions, "coa"),
+        str(_version(versions, "coa", "last_sync_time")),
+    )
+
+
+# ===================================================================
+# CACHE
+# ===================================================================
+
+class BalanceQueryCache:
+    """LRU des resultats par (societe, requete, versions)."""
+
+    def __init__(self, max_entries: int = 512):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                return None
+            self._entries.move_to_end(key)
+        return copy.deepcopy(value)
+
+    def put(self, key: Hashable, value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = copy.deepcopy(value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_balance_query_cache: Optional[BalanceQueryCache] = None
+
+
+def get_balance_query_cache() -> BalanceQueryCache:
+    """Singleton du cache des requetes de soldes."""
+    global _balance_query_cache
+    if _balance_query_cache is None:
+        _balance_query_cache = BalanceQueryCache()
+    return _balance_query_cache
@@ -6,23 +6,43 @@ Orchestre le flux complet:
 2. Connexion Odoo (XML-RPC)
 3. Fetch account.move.line (GL) + account.journal
 4. Transformation + hash SHA-256
-5. Persistence via NeonAccountingManager (incremental upsert)
-6. Refresh period_balances
+5. Persistence via NeonAccountingManager (incremental upsert; period_balances
+   ajustés par delta dans la même transaction)
+6. Recompute complet de period_balances seulement si les soldes ne sont pas
+   à jour (jamais maintenus par delta) ou lors d'un full sync (réparation)
+
+Pipeline GL (étapes 3-5):
+    Les lignes sont lues par pages (keyset sur id, GL_SYNC_PAGE_SIZE) dans un
+    thread, transformées colonne par colonne (une DataFrame par page), puis
+    envoyées page par page à l'upsert COPY/staging. La lecture de la page
+    N+1 chevauche l'upsert de la page N (queue bornée): la mémoire reste
+    bornée à quelques pages quelle que soit la taille du grand livre.
+    Débit (lignes/s) et pic RSS sont reportés dans les stats "gl".
 
 Déclenché par:
 - Event Redis gl_sync_requested (depuis SYNC_GL_FROM_ERP tool Worker)
 - Futur cron nocturne
 """
 
+import asyncio
 import hashlib
 import json
 import logging
+import os
+import sys
+import time
 from datetime import datetime, timezone
 from typing import Any, Dict, List, Optional
 from uuid import UUID
 
 logger = logging.getLogger(__name__)
 
+# Taille des pages account.move.line (lecture Odoo + upsert Neon)
+GL_SYNC_PAGE_SIZE = int(os.getenv("GL_SYNC_PAGE_SIZE", "5000"))
+
+# Pages lues d'avance pendant l'upsert de la page courante
+GL_SYNC_PREFETCH_PAGES = 2
+
 # Champs GL renvoyés par Odoo account.move.line
 _GL_FIELDS = [
     "id", "date", "account_type", "currency_id", "parent_state",
@@ -143,6 +163,86 @@ def _map_parent_state(state) -> str:
     return mapping.get(str(state or ""), "posted")
 
 
+def _tuple_part(values: List[Any], index: int) -> List[Any]:
+    """Élément `index` des champs tuple Odoo d'une colonne (None si vide / False)."""
+    return [
+        v[index] if isinstance(v, (list, tuple)) and len(v) > index else None
+        for v in values
+    ]
+
+
+def _odoo_gl_page_to_neon_entries(
+    records: List[Dict[str, Any]],
+    journal_id_to_code: Optional[Dict[int, str]] = None,
+    company_name: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Version colonne par colonne de _odoo_gl_to_neon_entry pour une page
+    d'enregistrements account.move.line bruts (search_read).
+
+    Même résultat que la transformation ligne à ligne (document_ref depuis
+    move_id, cf. fetch_financial_records), sans iterrows ni dict intermédiaire
+    par ligne. Filtre optionnel sur le nom de société (company_id[1]).
+    """
+    import pandas as pd
+
+    if not records:
+        return []
+
+    df = pd.DataFrame.from_records(records, columns=_GL_FIELDS)
+    # Champs absents d'un enregistrement: NaN → None (comme record.get())
+    df = df.astype(object).where(df.notna(), None)
+
+    if company_name is not None:
+        df = df[[c == company_name for c in _tuple_part(df["company_id"].tolist(), 1)]]
+        if df.empty:
+            return []
+
+    # Colonnes en listes Python (pas d'inférence de dtype: None reste None)
+    journal_col = df["journal_id"].tolist()
+    journal_ids = _tuple_part(journal_col, 0)
+    journal_names = _tuple_part(journal_col, 1)
+    mapping = journal_id_to_code or {}
+    account_names = _tuple_part(df["account_id"].tolist(), 1)
+    currency_col = df["currency_id"].tolist()
+
+    amount_currency = df["amount_currency"].map(_safe_float).astype(float)
+    rate = df["currency_rate"].map(lambda v: _safe_float(v, default=0.0)).astype(float)
+
+    columns = {
+        "entry_id": df["id"].astype(str).tolist(),
+        "entry_date": df["date"].tolist(),
+        "last_update_date": df["write_date"].tolist(),
+        # mapping id → code, sinon libellé du tuple tronqué
+        "journal_code": [
+            (mapping.get(int(jid), "") if jid is not None and mapping else "")
+            or str(name if isinstance(raw, (list, tuple)) else (raw or ""))[:10]
+            for jid, name, raw in zip(journal_ids, journal_names, journal_col)
+        ],
+        "document_ref": _tuple_part(df["move_id"].tolist(), 1),
+        "account_number": [str(n).split(" ")[0] if n is not None else "" for n in account_names],
+        "account_name": [n if n is not None else "" for n in account_names],
+        "description": [v or "" for v in df["name"].tolist()],
+        "partner_name": _tuple_part(df["partner_id"].tolist(), 1),
+        "debit": df["debit"].map(_safe_float).astype(float).tolist(),
+        "credit": df["credit"].map(_safe_float).astype(float).tolist(),
+        "reconciliation_ref": [
+            str(v)[:20] if v else None for v in _tuple_part(df["full_reconcile_id"].tolist(), 1)
+        ],
+        "entry_state": [_map_parent_state(v) for v in df["parent_state"].tolist()],
+        "currency": [
+            (v[1] if len(v) > 1 else None) if isinstance(v, (list, tuple)) else "CHF"
+            for v in currency_col
+        ],
+        "currency_erp_id": [int(v[0]) if isinstance(v, (list, tuple)) and v else None for v in currency_col],
+        "amount_currency_value": [a if a != 0.0 else None for a in amount_currency.tolist()],
+        "exchange_rate": rate.where(rate > 0, 1.0).tolist(),
+    }
+
+    names = list(columns)
+    return [dict(zip(names, row)) for row in zip(*columns.values())]
+
+
 def _odoo_journal_to_neon(record: Dict[str, Any]) -> Dict[str, Any]:
     """Transform an Odoo account.journal record for NeonAccountingManager.upsert_journals()."""
     return {
@@ -189,8 +289,8 @@ async def sync_gl_from_erp(
         logger.error("[GL_SYNC] %s", msg)
         return {"success": False, "error": msg}
 
-    # 2. Obtenir la connexion ERP
-    erp_connection = _get_erp_connection(uid, collection_id)
+    # 2. Obtenir la connexion ERP (XML-RPC bloquant → thread)
+    erp_connection = await asyncio.to_thread(_get_erp_connection, uid, collection_id)
     if not erp_connection:
         msg = f"ERP connection failed for uid={uid} collection={collection_id}"
         logger.error("[GL_SYNC] %s", msg)
@@ -256,9 +356,59 @@ def _get_erp_connection(uid: str, collection_id: str):
         return None
 
 
+def _fetch_gl_page(erp_connection, domain: List[Any], after_id: int, limit: int) -> List[Dict[str, Any]]:
+    """
+    Page account.move.line (keyset sur id: coût constant quelle que soit la
+    profondeur, stable si des lignes sont créées pendant la sync).
+    """
+    return erp_connection.execute_kw(
+        "account.move.line", "search_read",
+        [list(domain) + [("id", ">", after_id)]],
+        {"fields": _GL_FIELDS, "limit": limit, "order": "id asc"},
+    ) or []
+
+
+def _peak_rss_mb() -> float:
+    """Pic de mémoire résidente du process (Mo)."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux: Ko, macOS: octets
+        return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    except Exception:
+        return 0.0
+
+
+async def _stream_gl_pages(erp_connection, domain: List[Any], page_size: int, queue: "asyncio.Queue") -> None:
+    """
+    Producteur: lit les pages dans un thread et les pousse dans la queue (None = fin).
+
+    Le marqueur de fin n'attend jamais de place (annulation sur file pleine):
+    s'il n'entre pas, le consommateur s'arrête sur file vide + producteur terminé.
+    """
+    after_id = 0
+    try:
+        while True:
+            page = await asyncio.to_thread(_fetch_gl_page, erp_connection, domain, after_id, page_size)
+            if not page:
+                break
+            after_id = max(int(r.get("id") or 0) for r in page)
+            await queue.put(page)
+            if len(page) < page_size:
+                break
+    finally:
+        try:
+            queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+
+
 async def _do_gl_sync(manager, erp_connection, company_id: UUID, force_full: bool, journal_id_to_code: Optional[Dict[int, str]] = None) -> Dict[str, Any]:
     """
     Fetch GL entries from Odoo and persist via NeonAccountingManager.
+
+    Pipeline par pages: lecture Odoo (thread) → transformation colonne par
+    colonne (thread) → upsert COPY/staging, page par page.
     """
     result = {}
 
@@ -278,31 +428,67 @@ async def _do_gl_sync(manager, erp_connection, company_id: UUID, force_full: boo
             domain.append(("write_date", ">=", safe_date))
             logger.info("[GL_SYNC] Incremental since %s (safe_date=%s)", last_sync, safe_date)
 
-    # Fetch GL entries from Odoo
-    logger.info("[GL_SYNC] Fetching account.move.line with domain=%s", domain)
-    gl_df, _coa_df = erp_connection.fetch_financial_records(domain=domain)
+    page_size = GL_SYNC_PAGE_SIZE
+    company_name = getattr(erp_connection, "company_name", None)
+    logger.info("[GL_SYNC] Streaming account.move.line domain=%s page_size=%d", domain, page_size)
+
+    gl_stats = {"added": 0, "modified": 0, "unchanged": 0, "total_fetched": 0, "pages": 0}
+    active_ids: List[str] = []
+    started = time.perf_counter()
 
-    if gl_df is None or gl_df.empty:
+    queue: asyncio.Queue = asyncio.Queue(maxsize=GL_SYNC_PREFETCH_PAGES)
+    producer = asyncio.create_task(_stream_gl_pages(erp_connection, domain, page_size, queue))
+    try:
+        while True:
+            if queue.empty() and producer.done():
+                break
+            page = await queue.get()
+            if page is None:
+                break
+
+            entries = await asyncio.to_thread(
+                _odoo_gl_page_to_neon_entries, page, journal_id_to_code, company_name
+            )
+            del page
+            if not entries:
+                continue
+
+            page_stats = await manager.incremental_sync_gl_entries(company_id, entries)
+            for key in ("added", "modified", "unchanged"):
+                gl_stats[key] += page_stats.get(key, 0)
+            gl_stats["total_fetched"] += len(entries)
+            gl_stats["pages"] += 1
+
+            if force_full:
+                active_ids.extend(e["entry_id"] for e in entries if e.get("entry_id"))
+        await producer
+    finally:
+        if not producer.done():
+            producer.cancel()
+        try:
+            await producer
+        except (asyncio.CancelledError, Exception):
+            pass
+
+    elapsed = time.perf_counter() - started
+    gl_stats["duration_s"] = round(elapsed, 3)
+    gl_stats["rows_per_s"] = round(gl_stats["total_fetched"] / elapsed, 1) if elapsed > 0 else 0.0
+    gl_stats["peak_rss_mb"] = _peak_rss_mb()
+
+    if not gl_stats["total_fetched"]:
         logger.info("[GL_SYNC] No GL entries returned from ERP")
-        result["gl"] = {"added": 0, "modified": 0, "unchanged": 0, "total_fetched": 0}
+        result["gl"] = gl_stats
+        await _rebuild_period_balances_if_needed(manager, company_id, gl_stats, force_full=False)
         return result
 
-    logger.info("[GL_SYNC] Fetched %d GL entries from ERP", len(gl_df))
-
-    # Transform Odoo records → Neon format (with journal_id→code mapping)
-    entries = []
-    for _, row in gl_df.iterrows():
-        entry = _odoo_gl_to_neon_entry(row.to_dict(), journal_id_to_code)
-        entries.append(entry)
-
-    # Persist via incremental sync
-    gl_stats = await manager.incremental_sync_gl_entries(company_id, entries)
-    gl_stats["total_fetched"] = len(entries)
+    logger.info(
+        "[GL_SYNC] Streamed %d GL entries in %d pages (%.1f rows/s, peak_rss=%.1f MB)",
+        gl_stats["total_fetched"], gl_stats["pages"], gl_stats["rows_per_s"], gl_stats["peak_rss_mb"],
+    )
 
     # Reconciliation des suppressions: lors d'un full sync, marquer comme
     # is_deleted=True les ecritures Neon absentes de l'ERP.
-    if force_full and entries:
-        active_ids = [e["entry_id"] for e in entries if e.get("entry_id")]
+    if force_full and active_ids:
         deleted_count = await manager.mark_deleted_entries(company_id, active_ids)
         gl_stats["deleted"] = deleted_count
         if deleted_count:
@@ -310,28 +496,25 @@ async def _do_gl_sync(manager, erp_connection, company_id: UUID, force_full: boo
 
     result["gl"] = gl_stats
 
-    # Refresh period_balances for impacted years
-    if gl_stats.get("added", 0) > 0 or gl_stats.get("modified", 0) > 0:
-        impacted_years = set()
-        for entry in entries:
-            date_val = entry.get("entry_date") or entry.get("date_ecriture")
-            if date_val:
-                try:
-                    if isinstance(date_val, str):
-                        year = int(date_val[:4])
-                    else:
-                        year = date_val.year
-                    impacted_years.add(year)
-                except (ValueError, AttributeError):
-                    pass
-
-        for year in impacted_years:
-            rows = await manager.refresh_period_balances(company_id, year)
-            logger.info("[GL_SYNC] Refreshed period_balances year=%d rows=%d", year, rows)
-
+    await _rebuild_period_balances_if_needed(manager, company_id, gl_stats, force_full)
     return result
 
 
+async def _rebuild_period_balances_if_needed(
+    manager, company_id: UUID, gl_stats: Dict[str, Any], force_full: bool
+) -> None:
+    """
+    period_balances: maintenus par delta dans l'upsert, qui n'avance leur
+    version que s'ils étaient déjà à jour. Recompute complet s'ils sont
+    encore en retard après la sync (même sans écriture rapatriée), ou en
+    full sync.
+    """
+    if force_full or await manager.period_balances_stale(company_id):
+        rebuilt = await manager.rebuild_period_balances(company_id)
+        logger.info("[GL_SYNC] Rebuilt period_balances years=%s", sorted(rebuilt))
+        gl_stats["balances_rebuilt"] = True
+
+
 async def sync_gl_from_erp_async_journals(
     manager, erp_connection, company_id: UUID
 ) -> Optional[Dict[str, Any]]:
@@ -342,7 +525,8 @@ async def sync_gl_from_erp_async_journals(
     try:
         # 1. Always fetch ALL journals for id→code mapping (used by GL transform)
         full_domain = [["company_id", "=", erp_connection.company_id]]
-        all_journal_records = erp_connection.execute_kw(
+        all_journal_records = await asyncio.to_thread(
+            erp_connection.execute_kw,
             "account.journal", "search_read",
             [full_domain],
             {"fields": _JOURNAL_FIELDS},
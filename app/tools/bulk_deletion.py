@@ -0,0 +1,254 @@
+"""
+Bulk Deletion - Suppression parallele et reprenable d'arborescences Firestore.
+
+PRINCIPE:
+    La suppression d'une societe parcourait l'arbre Firestore en profondeur,
+    un reference.delete() a la fois. Le moteur parallelise le parcours:
+
+    - Fan-out: chaque collection est une tache d'un pool borne (max_workers);
+      les sous-collections decouvertes sont planifiees des qu'elles sont vues
+    - Ecritures groupees: BulkWriter (ou WriteBatch de 500 a defaut)
+    - Decouverte par list_documents(): inclut les documents "absents" qui ont
+      encore des sous-collections, donc un parcours relance depuis la racine
+      retrouve tout ce qui reste apres un crash
+    - Checkpoint Redis (optionnel): une collection dont tout le sous-arbre est
+      supprime est marquee terminee et n'est plus parcourue a la reprise;
+      l'etat des etapes d'un teardown y est aussi conserve
+
+    deletion:{job_id}:steps   HASH  etape → {"status", "reason"}
+    deletion:{job_id}:done    SET   chemins de collections terminees
+    deletion:{job_id}:meta    HASH  context (JSON) de la suppression
+
+USAGE:
+    from app.tools.bulk_deletion import DeletionCheckpoint, FirestoreTreeDeleter
+
+    checkpoint = DeletionCheckpoint(f"company:{company_id}")
+    deleter = FirestoreTreeDeleter(db, checkpoint=checkpoint)
+    deleted = deleter.delete_document(mandate_path)
+"""
+
+import json
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger("tools.bulk_deletion")
+
+
+def _collection_path(coll_ref) -> str:
+    """Chemin complet d'une CollectionReference (le SDK n'expose que le tuple _path)."""
+    parts = getattr(coll_ref, "_path", None)
+    return "/".join(parts) if isinstance(parts, tuple) else coll_ref.path
+
+
+class DeletionCheckpoint:
+    """Progression d'une suppression longue, persistee dans Redis (best-effort)."""
+
+    KEY_PREFIX = "deletion"
+    TTL = 7 * 86400
+
+    def __init__(self, job_id: str, redis_client=None):
+        self.job_id = job_id
+        self._redis = redis_client
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            from app.redis_client import get_redis
+            self._redis = get_redis()
+        return self._redis
+
+    def _key(self, suffix: str) -> str:
+        return f"{self.KEY_PREFIX}:{self.job_id}:{suffix}"
+
+    def _touch(self, pipe) -> None:
+        for suffix in ("steps", "done", "meta"):
+            pipe.expire(self._key(suffix), self.TTL)
+
+    # ─── Etapes ───
+
+    def get_step(self, name: str) -> Optional[Dict[str, str]]:
+        try:
+            raw = self.redis.hget(self._key("steps"), name)
+            return json.loads(raw) if raw else None
+        except Exception as e:
+            logger.warning(f"[DELETION] checkpoint read failed job={self.job_id}: {e}")
+            return None
+
+    def set_step(self, name: str, status: str, reason: str = "") -> None:
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hset(self._key("steps"), name, json.dumps({"status": status, "reason": reason}))
+            self._touch(pipe)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"[DELETION] checkpoint write failed job={self.job_id}: {e}")
+
+    # ─── Unites terminees (collections) ───
+
+    def is_done(self, unit: str) -> bool:
+        try:
+            return bool(self.redis.sismember(self._key("done"), unit))
+        except Exception:
+            return False
+
+    def mark_done(self, unit: str) -> None:
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.sadd(self._key("done"), unit)
+            self._touch(pipe)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"[DELETION] checkpoint write failed job={self.job_id}: {e}")
+
+    # ─── Contexte ───
+
+    def save_context(self, context: Dict[str, Any]) -> None:
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hset(self._key("meta"), "context", json.dumps(context, default=str))
+            self._touch(pipe)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"[DELETION] checkpoint write failed job={self.job_id}: {e}")
+
+    def load_context(self) -> Optional[Dict[str, Any]]:
+        try:
+            raw = self.redis.hget(self._key("meta"), "context")
+            return json.loads(raw) if raw else None
+        except Exception:
+            return None
+
+    def clear(self) -> None:
+        try:
+            self.redis.delete(self._key("steps"), self._key("done"), self._key("meta"))
+        except Exception as e:
+            logger.warning(f"[DELETION] checkpoint clear failed job={self.job_id}: {e}")
+
+
+class FirestoreTreeDeleter:
+    """Suppression parallele d'arborescences Firestore (sous-collections incluses)."""
+
+    BATCH_MAX_WRITES = 500
+    BULK_MAX_ATTEMPTS = 15  # defaut du SDK
+
+    def __init__(
+        self,
+        db,
+        max_workers: int = 8,
+        page_size: int = 500,
+        checkpoint: Optional[DeletionCheckpoint] = None,
+    ):
+        self.db = db
+        self.max_workers = max(1, max_workers)
+        self.page_size = max(1, page_size)
+        self.checkpoint = checkpoint
+
+    def delete_document(self, doc_path: str) -> int:
+        """Supprime un document et tout son sous-arbre. Retourne le nombre de documents supprimes."""
+        doc_ref = self.db.document(doc_path)
+        deleted = self.delete_collections(list(doc_ref.collections()))
+        doc_ref.delete()
+        return deleted + 1
+
+    def delete_collections(self, coll_refs: Iterable[Any]) -> int:
+        """
+        Supprime des collections et leurs sous-arbres en parallele.
+
+        Une collection n'est marquee terminee (checkpoint) que lorsque ses
+        documents ET toutes ses sous-collections sont supprimes.
+        """
+        # chemin → [parent, taches restantes (docs propres + sous-collections)]
+        nodes: Dict[str, List[Any]] = {}
+        deleted_total = 0
+
+        def _complete(path: str) -> None:
+            while path is not None:
+                node = nodes[path]
+                node[1] -= 1
+                if node[1] > 0:
+                    return
+                if self.checkpoint:
+                    self.checkpoint.mark_done(path)
+                path = node[0]
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="fs-delete") as pool:
+            futures = {}
+
+            def _schedule(coll_ref, parent: Optional[str]) -> None:
+                path = _collection_path(coll_ref)
+                if parent is not None:
+                    nodes[parent][1] += 1
+                if self.checkpoint and self.checkpoint.is_done(path):
+                    if parent is not None:
+                        _complete(parent)
+                    return
+                nodes[path] = [parent, 1]
+                futures[pool.submit(self._delete_collection_docs, coll_ref)] = path
+
+            for coll_ref in coll_refs:
+                _schedule(coll_ref, None)
+
+            while futures:
+                done, _ = wait(list(futures), return_when=FIRST_COMPLETED)
+                for future in done:
+                    path = futures.pop(future)
+                    deleted, children = future.result()
+                    deleted_total += deleted
+                    for child in children:
+                        _schedule(child, path)
+                    _complete(path)
+
+        return deleted_total
+
+    def _delete_collection_docs(self, coll_ref) -> Tuple[int, List[Any]]:
+        """Supprime les documents d'une collection; retourne (nb, sous-collections)."""
+        children: List[Any] = []
+        deleted = 0
+        page: List[Any] = []
+        for doc_ref in coll_ref.list_documents(page_size=self.page_size):
+            children.extend(doc_ref.collections())
+            page.append(doc_ref)
+            if len(page) >= self.page_size:
+                deleted += self._delete_refs(page)
+                page = []
+        if page:
+            deleted += self._delete_refs(page)
+        return deleted, children
+
+    def _delete_refs(self, refs: List[Any]) -> int:
+        """
+        Supprime un lot de documents; leve une exception si une suppression
+        echoue, afin que la collection ne soit pas marquee terminee.
+        """
+        bulk_writer = getattr(self.db, "bulk_writer", None)
+        if bulk_writer is not None:
+            writer = bulk_writer()
+            failures: List[Any] = []
+
+            # Le BulkWriter abandonne une ecriture apres ses tentatives sans
+            # lever: l'echec n'est visible que par ce callback.
+            def _on_write_error(error, _writer) -> bool:
+                if error.attempts < self.BULK_MAX_ATTEMPTS:
+                    return True
+                failures.append(error)
+                return False
+
+            writer.on_write_error(_on_write_error)
+            for ref in refs:
+                writer.delete(ref)
+            writer.close()  # flush + attente des ecritures
+            if failures:
+                first = failures[0]
+                raise RuntimeError(
+                    f"{len(failures)}/{len(refs)} suppressions en echec "
+                    f"(ex: {first.operation.reference.path}: {first.message})"
+                )
+            return len(refs)
+
+        for start in range(0, len(refs), self.BATCH_MAX_WRITES):
+            batch = self.db.batch()
+            for ref in refs[start:start + self.BATCH_MAX_WRITES]:
+                batch.delete(ref)
+            batch.commit()
+        return len(refs)
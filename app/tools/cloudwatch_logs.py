@@ -4,15 +4,24 @@ Module pour extraire les logs CloudWatch du groupe de journaux ECS.
 Ce module fournit une interface pour:
 - Lister les streams de logs avec leurs dates
 - Télécharger un log complet
+- Exporter un log en streaming (NDJSON / texte), page par page, avec
+  filtre côté serveur (filterPattern) et fenêtre temporelle
 """
 
+import asyncio
 import boto3
+import concurrent.futures
+import threading
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import AsyncIterator, Dict, Iterator, List, Optional
 import os
 import json
 
 
+# Export streaming: pages en attente entre le thread boto3 et la réponse HTTP
+EXPORT_QUEUE_MAXSIZE = 4
+
+
 class CloudWatchLogsExtractor:
     """
     Classe pour extraire les logs depuis CloudWatch Logs.
@@ -139,36 +148,6 @@ class CloudWatchLogsExtractor:
             Le chemin du fichier créé
         """
         try:
-            kwargs = {
-                'logGroupName': self.log_group_name,
-                'logStreamName': log_stream_name
-            }
-            
-            if start_time:
-                kwargs['startTime'] = int(start_time.timestamp() * 1000)
-            if end_time:
-                kwargs['endTime'] = int(end_time.timestamp() * 1000)
-            
-            # Récupérer tous les événements (avec pagination)
-            all_events = []
-            next_token = None
-            
-            while True:
-                if next_token:
-                    kwargs['nextToken'] = next_token
-                
-                response = self.client.get_log_events(**kwargs)
-                events = response.get('events', [])
-                all_events.extend(events)
-                
-                next_token = response.get('nextForwardToken')
-                if not next_token or not events:
-                    break
-                
-                # Éviter la boucle infinie si le token ne change pas
-                if 'nextToken' in kwargs and kwargs['nextToken'] == next_token:
-                    break
-            
             # Générer le nom de fichier si non fourni
             if not output_file:
                 safe_stream_name = log_stream_name.replace('/', '_').replace('\\', '_')
@@ -178,14 +157,14 @@ class CloudWatchLogsExtractor:
             # Créer le répertoire si nécessaire
             os.makedirs(os.path.dirname(output_file) if os.path.dirname(output_file) else '.', exist_ok=True)
             
-            # Écrire les logs dans le fichier
+            # Écrire les logs page par page (pas d'accumulation en mémoire)
+            total_events = 0
             with open(output_file, 'w', encoding='utf-8') as f:
-                for event in all_events:
-                    timestamp = self._format_timestamp(event.get('timestamp'))
-                    message = event.get('message', '')
-                    f.write(f"[{timestamp}] {message}\n")
+                for events in self.iter_log_event_pages(log_stream_name, start_time=start_time, end_time=end_time):
+                    f.write(''.join(self.format_event(event, 'text') for event in events))
+                    total_events += len(events)
             
-            print(f"Log téléchargé: {output_file} ({len(all_events)} événements)")
+            print(f"Log téléchargé: {output_file} ({total_events} événements)")
             return output_file
         
         except self.client.exceptions.ResourceNotFoundException:
@@ -212,35 +191,10 @@ class CloudWatchLogsExtractor:
             Le chemin du fichier créé
         """
         try:
-            kwargs = {
-                'logGroupName': self.log_group_name,
-                'logStreamName': log_stream_name
-            }
-            
-            if start_time:
-                kwargs['startTime'] = int(start_time.timestamp() * 1000)
-            if end_time:
-                kwargs['endTime'] = int(end_time.timestamp() * 1000)
-            
             # Récupérer tous les événements (avec pagination)
             all_events = []
-            next_token = None
-            
-            while True:
-                if next_token:
-                    kwargs['nextToken'] = next_token
-                
-                response = self.client.get_log_events(**kwargs)
-                events = response.get('events', [])
+            for events in self.iter_log_event_pages(log_stream_name, start_time=start_time, end_time=end_time):
                 all_events.extend(events)
-                
-                next_token = response.get('nextForwardToken')
-                if not next_token or not events:
-                    break
-                
-                # Éviter la boucle infinie
-                if 'nextToken' in kwargs and kwargs['nextToken'] == next_token:
-                    break
             
             # Générer le nom de fichier si non fourni
             if not output_file:
@@ -277,6 +231,77 @@ class CloudWatchLogsExtractor:
             print(f"Erreur lors du téléchargement du log JSON: {e}")
             raise
     
+    def iter_log_event_pages(self,
+                             log_stream_name: str,
+                             start_time: Optional[datetime] = None,
+                             end_time: Optional[datetime] = None,
+                             filter_pattern: Optional[str] = None,
+                             max_events: Optional[int] = None) -> Iterator[List[Dict]]:
+        """
+        Parcourt les événements d'un stream page par page (appels boto3 bloquants).
+        
+        Sans filtre: get_log_events depuis le début du stream (startFromHead).
+        Avec filter_pattern: filter_log_events, le filtrage est fait par
+        CloudWatch et seules les lignes retenues transitent.
+        
+        Args:
+            log_stream_name: Le nom du stream de logs
+            start_time: Événements après cette date (optionnel)
+            end_time: Événements avant cette date (optionnel)
+            filter_pattern: Motif de filtre CloudWatch (ex: "ERROR", '"job_id=42"')
+            max_events: Arrêter après ce nombre d'événements (optionnel)
+        
+        Yields:
+            Listes d'événements ({"timestamp", "message", ...}), une par page non vide
+        """
+        kwargs = {'logGroupName': self.log_group_name}
+        if start_time:
+            kwargs['startTime'] = int(start_time.timestamp() * 1000)
+        if end_time:
+            kwargs['endTime'] = int(end_time.timestamp() * 1000)
+        
+        if filter_pattern:
+            kwargs['logStreamNames'] = [log_stream_name]
+            kwargs['filterPattern'] = filter_pattern
+            fetch, token_key = self.client.filter_log_events, 'nextToken'
+        else:
+            kwargs['logStreamName'] = log_stream_name
+            kwargs['startFromHead'] = True
+            fetch, token_key = self.client.get_log_events, 'nextForwardToken'
+        
+        remaining = max_events
+        while True:
+            response = fetch(**kwargs)
+            events = response.get('events', [])
+            if remaining is not None:
+                events = events[:remaining]
+                remaining -= len(events)
+            if events:
+                yield events
+            
+            next_token = response.get(token_key)
+            if not next_token or remaining == 0:
+                return
+            # get_log_events: fin du stream quand le token renvoyé est celui envoyé
+            # (les pages vides ne signifient pas la fin, filtre ou fenêtre temporelle)
+            if next_token == kwargs.get('nextToken'):
+                return
+            kwargs['nextToken'] = next_token
+    
+    def format_event(self, event: Dict, fmt: str = 'ndjson') -> str:
+        """
+        Sérialise un événement pour l'export: une ligne NDJSON ou "[date] message".
+        """
+        if fmt == 'text':
+            message = event.get('message', '').rstrip('\n')
+            return f"[{self._format_timestamp(event.get('timestamp'))}] {message}\n"
+        return json.dumps({
+            'timestamp': event.get('timestamp'),
+            'timestampFormatted': self._format_timestamp(event.get('timestamp')),
+            'logStreamName': event.get('logStreamName'),
+            'message': event.get('message', ''),
+        }, ensure_ascii=False) + '\n'
+    
     def _format_timestamp(self, timestamp_ms: Optional[int]) -> str:
         """
         Formate un timestamp en millisecondes en chaîne lisible.
@@ -361,3 +386,70 @@ class CloudWatchLogsExtractor:
             print(f"✗ Erreur de vérification: {e}")
             return False
 
+
+async def stream_log_export(extractor: CloudWatchLogsExtractor,
+                            log_stream_name: str,
+                            fmt: str = 'ndjson',
+                            start_time: Optional[datetime] = None,
+                            end_time: Optional[datetime] = None,
+                            filter_pattern: Optional[str] = None,
+                            max_events: Optional[int] = None,
+                            queue_size: int = EXPORT_QUEUE_MAXSIZE) -> AsyncIterator[bytes]:
+    """
+    Exporte un stream CloudWatch en chunks (une page encodée par chunk).
+    
+    La pagination boto3 tourne dans un thread; les pages passent par une
+    file asyncio bornée (queue_size): si le client lit lentement, le thread
+    attend au lieu d'accumuler le log en mémoire. Si le client se déconnecte
+    (générateur fermé), le thread s'arrête à la page suivante.
+    
+    Les erreurs AWS (stream introuvable, credentials...) sont relancées dans
+    le générateur: le premier chunk peut être attendu avant d'envoyer la
+    réponse pour les transformer en erreur HTTP.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, queue_size))
+    stop = threading.Event()
+    done = object()
+    
+    def _put(item) -> bool:
+        future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+        while True:
+            try:
+                future.result(timeout=0.5)
+                return True
+            except concurrent.futures.TimeoutError:  # != TimeoutError avant Python 3.11
+                if stop.is_set():
+                    future.cancel()
+                    return False
+    
+    def _produce() -> None:
+        try:
+            pages = extractor.iter_log_event_pages(
+                log_stream_name,
+                start_time=start_time,
+                end_time=end_time,
+                filter_pattern=filter_pattern,
+                max_events=max_events,
+            )
+            for events in pages:
+                chunk = ''.join(extractor.format_event(event, fmt) for event in events).encode('utf-8')
+                if stop.is_set() or not _put(chunk):
+                    return
+            _put(done)
+        except Exception as e:
+            if not stop.is_set():
+                _put(e)
+    
+    producer = threading.Thread(target=_produce, name="cloudwatch-export", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
@@ -0,0 +1,243 @@
+"""
+Company Resolver - Resolution mandate_path → company_id (core.companies) partagee.
+
+PRINCIPE:
+    Presque chaque appel ACCOUNTING / HR commence par resoudre le mandate_path
+    Firebase en company_id Neon. Chaque manager avait son propre dict (sans
+    borne, sans cache negatif, perdu a chaque redemarrage). Le resolver est
+    commun aux managers Neon, a deux niveaux:
+
+        L1  LRU en memoire du process      (positif: 1h, negatif: 60s)
+        L2  Redis  neon:company:{mandate}  (positif: 24h, negatif: 60s)
+
+    - Negatif: un mandate inconnu est memorise "" pour ne pas refaire la
+      requete a chaque tool call de l'agent
+    - Creation (get_or_create_company, ensure_account_context): remember()
+      remplace immediatement une entree negative
+    - Suppression (delete_company): invalidate() retire l'entree des deux
+      niveaux et incremente neon:company:generation; les autres process
+      relisent ce compteur au plus toutes les GENERATION_CHECK_INTERVAL
+      secondes et vident leur L1 s'il a change
+    - Batch: resolve_many() resout N mandates en une seule requete
+
+USAGE:
+    from app.tools.company_resolver import get_company_resolver
+
+    resolver = get_company_resolver()
+    company_id = await resolver.resolve(mandate_path, manager.get_pool)
+    mapping = await resolver.resolve_many(mandate_paths, manager.get_pool)
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+from uuid import UUID
+
+logger = logging.getLogger("tools.company_resolver")
+
+PoolGetter = Callable[[], Awaitable[Any]]
+
+_MISSING = object()
+
+
+class CompanyResolver:
+    """Cache mandate_path → company_id (L1 process + L2 Redis, negatif inclus)."""
+
+    KEY_PREFIX = "neon:company"
+    LOCAL_TTL = 3600
+    REDIS_TTL = 86400
+    NEGATIVE_TTL = 60
+    GENERATION_KEY = "neon:company:generation"
+    GENERATION_CHECK_INTERVAL = 2.0
+
+    def __init__(self, redis_client=None, max_entries: int = 4096):
+        self._redis = redis_client
+        self.max_entries = max_entries
+        # mandate_path → (company_id | None, expires_at)
+        self._local: "OrderedDict[str, Tuple[Optional[UUID], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Generation des invalidations vue par ce process (None: jamais lue)
+        self._generation: Optional[str] = None
+        self._next_generation_check = 0.0
+
+    @property
+    def redis(self):
+        if self._redis is None:
+            from app.redis_client import get_redis
+            self._redis = get_redis()
+        return self._redis
+
+    @classmethod
+    def _key(cls, mandate_path: str) -> str:
+        return f"{cls.KEY_PREFIX}:{mandate_path}"
+
+    @property
+    def local_entries(self) -> "OrderedDict[str, Tuple[Optional[UUID], float]]":
+        """Niveau L1 (expose pour les managers: _company_cache)."""
+        return self._local
+
+    # ═══════════════════════════════════════════════════════════════
+    # RESOLUTION
+    # ═══════════════════════════════════════════════════════════════
+
+    async def resolve(self, mandate_path: str, get_pool: PoolGetter) -> Optional[UUID]:
+        """company_id du mandate, None si la societe n'existe pas (encore)."""
+        if not mandate_path:
+            return None
+        return (await self.resolve_many([mandate_path], get_pool)).get(mandate_path)
+
+    async def resolve_many(
+        self, mandate_paths: Iterable[str], get_pool: PoolGetter
+    ) -> Dict[str, Optional[UUID]]:
+        """Resout plusieurs mandates: L1, puis un MGET Redis, puis une seule requete Neon."""
+        paths = [p for p in dict.fromkeys(mandate_paths) if p]
+        result: Dict[str, Optional[UUID]] = {}
+        self._check_generation()
+
+        missing = []
+        for path in paths:
+            cached = self._get_local(path)
+            if cached is _MISSING:
+                missing.append(path)
+            else:
+                result[path] = cached
+        if not missing:
+            return result
+
+        missing = self._resolve_from_redis(missing, result)
+        if not missing:
+            return result
+
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT firebase_mandate_path, id FROM core.companies WHERE firebase_mandate_path = ANY($1::text[])",
+                missing,
+            )
+        found = {row["firebase_mandate_path"]: row["id"] for row in rows}
+        for path in missing:
+            company_id = found.get(path)
+            result[path] = company_id
+            self._store(path, company_id)
+
+        logger.debug(
+            "[COMPANY_RESOLVER] Neon lookup: %d mandates (%d found)", len(missing), len(found)
+        )
+        return result
+
+    # ═══════════════════════════════════════════════════════════════
+    # MAINTENANCE
+    # ═══════════════════════════════════════════════════════════════
+
+    def remember(self, mandate_path: str, company_id: UUID) -> None:
+        """Societe creee / confirmee: remplace une eventuelle entree negative."""
+        if mandate_path and company_id:
+            self._store(mandate_path, company_id)
+
+    def invalidate(self, mandate_path: str) -> None:
+        """Societe supprimee: retire le mandate des deux niveaux et previent les autres process."""
+        with self._lock:
+            self._local.pop(mandate_path, None)
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.delete(self._key(mandate_path))
+            pipe.incr(self.GENERATION_KEY)
+            _, generation = pipe.execute()
+            with self._lock:
+                self._generation = str(generation)
+        except Exception as e:
+            logger.warning("[COMPANY_RESOLVER] Redis invalidate failed for %s: %s", mandate_path, e)
+
+    def clear_local(self) -> None:
+        with self._lock:
+            self._local.clear()
+
+    # ═══════════════════════════════════════════════════════════════
+    # INTERNES
+    # ═══════════════════════════════════════════════════════════════
+
+    def _check_generation(self) -> None:
+        """Vide le L1 si un autre process a invalide un mandate (lecture bornee dans le temps)."""
+        now = time.monotonic()
+        if now < self._next_generation_check:
+            return
+        self._next_generation_check = now + self.GENERATION_CHECK_INTERVAL
+        try:
+            generation = self.redis.get(self.GENERATION_KEY)
+        except Exception as e:
+            logger.debug("[COMPANY_RESOLVER] Redis generation read failed: %s", e)
+            return
+        if isinstance(generation, bytes):
+            generation = generation.decode()
+        generation = generation or "0"
+        with self._lock:
+            if self._generation is not None and generation != self._generation:
+                self._local.clear()
+            self._generation = generation
+
+    def _get_local(self, mandate_path: str):
+        with self._lock:
+            entry = self._local.get(mandate_path)
+            if entry is None:
+                return _MISSING
+            if not isinstance(entry, tuple):
+                # Valeur posee directement (compatibilite _company_cache)
+                self._local.move_to_end(mandate_path)
+                return entry
+            company_id, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._local[mandate_path]
+                return _MISSING
+            self._local.move_to_end(mandate_path)
+            return company_id
+
+    def _set_local(self, mandate_path: str, company_id: Optional[UUID]) -> None:
+        ttl = self.LOCAL_TTL if company_id else self.NEGATIVE_TTL
+        with self._lock:
+            self._local[mandate_path] = (company_id, time.monotonic() + ttl)
+            self._local.move_to_end(mandate_path)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+
+    def _store(self, mandate_path: str, company_id: Optional[UUID]) -> None:
+        self._set_local(mandate_path, company_id)
+        try:
+            if company_id:
+                self.redis.set(self._key(mandate_path), str(company_id), ex=self.REDIS_TTL)
+            else:
+                self.redis.set(self._key(mandate_path), "", ex=self.NEGATIVE_TTL)
+        except Exception as e:
+            logger.warning("[COMPANY_RESOLVER] Redis write failed for %s: %s", mandate_path, e)
+
+    def _resolve_from_redis(self, paths: list, result: Dict[str, Optional[UUID]]) -> list:
+        """Complete result depuis Redis; retourne les mandates encore inconnus."""
+        try:
+            values = self.redis.mget([self._key(p) for p in paths])
+        except Exception as e:
+            logger.warning("[COMPANY_RESOLVER] Redis read failed: %s", e)
+            return paths
+
+        missing = []
+        for path, value in zip(paths, values):
+            if value is None:
+                missing.append(path)
+                continue
+            if isinstance(value, bytes):
+                value = value.decode()
+            company_id = UUID(value) if value else None
+            result[path] = company_id
+            self._set_local(path, company_id)
+        return missing
+
+
+_resolver: Optional[CompanyResolver] = None
+
+
+def get_company_resolver() -> CompanyResolver:
+    """Singleton du resolver mandate_path → company_id."""
+    global _resolver
+    if _resolver is None:
+        _resolver = CompanyResolver()
+    return _resolver
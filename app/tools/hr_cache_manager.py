@@ -8,6 +8,7 @@ Architecture:
     - Cache-first: Tentative de lecture depuis Redis avant PostgreSQL
     - Write-through: Mise à jour du cache après écriture PostgreSQL
     - Invalidation sélective: Suppression ciblée après modifications
+    - Invalidation société: génération HR (INCR), pas de SCAN du keyspace
 
 Structure des clés Redis:
     - cache:{user_id}:{company_id}:hr:employees
@@ -15,6 +16,11 @@ Structure des clés Redis:
     - cache:{user_id}:{company_id}:hr:references
     - cache:{user_id}:{company_id}:hr:clusters
 
+Génération (partagée avec UnifiedCacheManager, domaine "hr"):
+    - cache_gen:shared:{company_id}:hr
+    Chaque entrée porte "generation"; une entrée d'une génération
+    précédente est ignorée à la lecture et expire par TTL.
+
 TTLs recommandés:
     - employees: 3600s (1h)
     - contracts: 3600s (1h)
@@ -29,6 +35,8 @@ from typing import Optional, Dict, Any
 import redis.asyncio as redis
 import os
 
+from ..llm_service.redis_namespaces import RedisTTL, build_cache_generation_key
+
 logger = logging.getLogger("hr.cache_manager")
 
 
@@ -110,6 +118,10 @@ class HRCacheManager:
             key += f":{sub_type}"
         return key
     
+    def _build_generation_key(self, user_id: str, company_id: str, data_type: str) -> str:
+        """Compteur de génération du module (ex: hr) pour la société."""
+        return build_cache_generation_key(user_id, company_id, data_type)
+    
     async def get_cached_data(
         self,
         user_id: str,
@@ -138,11 +150,17 @@ class HRCacheManager:
         try:
             redis_client = await self._get_redis_client()
             
-            # Tentative de récupération depuis le cache
-            cached_data = await redis_client.get(cache_key)
+            # Entrée + génération courante en un seul aller-retour
+            cached_data, raw_generation = await redis_client.mget(
+                cache_key, self._build_generation_key(user_id, company_id, data_type)
+            )
             
             if cached_data:
                 data = json.loads(cached_data)
+                generation = int(raw_generation or 0)
+                if data.get("generation", 0) != generation:
+                    logger.info(f"❌ [HR_CACHE] STALE: {cache_key} | generation={generation}")
+                    return None
                 cache_info = data.get("cached_at", "unknown")
                 data_content = data.get("data", {})
                 
@@ -220,12 +238,17 @@ class HRCacheManager:
             data_size = len(str(data)) if data else 0
             logger.debug(f"📊 [HR_CACHE] Taille des données: {data_size} caractères")
             
+            generation = await redis_client.get(
+                self._build_generation_key(user_id, company_id, data_type)
+            )
+            
             # Ajouter des métadonnées de cache
             cached_payload = {
                 "data": data,
                 "cached_at": datetime.now().isoformat(),
                 "ttl_seconds": ttl_seconds,
-                "source": f"{data_type}.{sub_type}" if sub_type else data_type
+                "source": f"{data_type}.{sub_type}" if sub_type else data_type,
+                "generation": int(generation or 0),
             }
             
             # Stocker avec TTL
@@ -285,9 +308,11 @@ class HRCacheManager:
         company_id: str
     ) -> bool:
         """
-        Invalide tout le cache HR d'une société pour un utilisateur.
+        Invalide tout le cache HR d'une société.
         
-        Utilise SCAN pour éviter de bloquer Redis avec KEYS.
+        Incrémente la génération HR (un INCR au lieu d'un SCAN + DELETE par
+        lots): les entrées existantes sont ignorées à la lecture et expirent
+        par TTL. Le domaine HR étant partagé, tous les membres sont concernés.
         
         Args:
             user_id: Firebase UID de l'utilisateur
@@ -296,55 +321,24 @@ class HRCacheManager:
         Returns:
             True si succès, False sinon
         """
-        pattern = f"cache:{user_id}:{company_id}:hr:*"
-        logger.info(f"🗑️ [HR_CACHE] Invalidation HR complète: {pattern}")
+        generation_key = self._build_generation_key(user_id, company_id, "hr")
+        logger.info(f"🗑️ [HR_CACHE] Invalidation HR complète: {generation_key}")
         
         try:
             redis_client = await self._get_redis_client()
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.incr(generation_key)
+            pipe.expire(generation_key, RedisTTL.CACHE_GENERATION)
+            generation, _ = await pipe.execute()
             
-            # SCAN au lieu de KEYS - ne bloque pas Redis
-            cursor = 0
-            keys_to_delete = []
-            
-            while True:
-                # Scanner par lots de 100 clés à la fois
-                cursor, batch = await redis_client.scan(
-                    cursor=cursor,
-                    match=pattern,
-                    count=100
-                )
-                
-                keys_to_delete.extend(batch)
-                
-                # Si cursor revient à 0, on a tout scanné
-                if cursor == 0:
-                    break
-            
-            logger.info(f"🔍 [HR_CACHE] Clés trouvées pour invalidation: {len(keys_to_delete)}")
-            
-            if keys_to_delete:
-                # Supprimer par lots de 1000 max
-                batch_size = 1000
-                total_deleted = 0
-                for i in range(0, len(keys_to_delete), batch_size):
-                    batch = keys_to_delete[i:i+batch_size]
-                    await redis_client.delete(*batch)
-                    total_deleted += len(batch)
-                    logger.debug(
-                        f"🗑️ [HR_CACHE] Supprimé lot {i//batch_size + 1}: {len(batch)} clés"
-                    )
-                
-                logger.info(
-                    f"✅ [HR_CACHE] Invalidation réussie: {total_deleted} clés supprimées "
-                    f"pour user={user_id}, company={company_id}"
-                )
-            else:
-                logger.info(f"ℹ️ [HR_CACHE] Aucune clé à invalider pour: {pattern}")
-            
+            logger.info(
+                f"✅ [HR_CACHE] Invalidation réussie: generation={generation} "
+                f"pour user={user_id}, company={company_id}"
+            )
             return True
             
         except Exception as e:
-            logger.error(f"❌ [HR_CACHE] Erreur d'invalidation: {pattern} | Error: {e}")
+            logger.error(f"❌ [HR_CACHE] Erreur d'invalidation: {generation_key} | Error: {e}")
             return False
     
     async def get_cache_stats(
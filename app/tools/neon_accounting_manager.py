@@ -95,6 +95,13 @@ def _to_datetime(value: Union[str, datetime, None]) -> Optional[datetime]:
     raise ValueError(f"Cannot convert {type(value)} to datetime")
 
 
+def _merge_stats(row: Optional[Dict[str, Any]], staged: int) -> Dict[str, int]:
+    """Compteurs added / modified / unchanged d'un merge depuis staging."""
+    added = int(row["added"] or 0) if row else 0
+    modified = int(row["modified"] or 0) if row else 0
+    return {"added": added, "modified": modified, "unchanged": staged - added - modified}
+
+
 class NeonAccountingManager:
     """
     Gestionnaire Neon Accounting avec pattern Singleton thread-safe.
@@ -114,8 +121,11 @@ class NeonAccountingManager:
     _pool: Optional["asyncpg.Pool"] = None
     _pool_lock: Optional[asyncio.Lock] = None
 
-    # Cache mandate_path -> company_id
-    _company_cache: Dict[str, UUID] = {}
+    @property
+    def _company_cache(self):
+        """Cache mandate_path -> company_id (niveau L1 du resolver partage)."""
+        from .company_resolver import get_company_resolver
+        return get_company_resolver().local_entries
 
     def __new__(cls):
         """Implementation thread-safe du pattern Singleton."""
@@ -183,21 +193,16 @@ class NeonAccountingManager:
     async def get_company_id_from_mandate_path(
         self, mandate_path: str
     ) -> Optional[UUID]:
-        """Recupere le company_id PostgreSQL depuis un mandate_path Firebase."""
-        if mandate_path in self._company_cache:
-            return self._company_cache[mandate_path]
+        """Recupere le company_id PostgreSQL depuis un mandate_path Firebase (resolver partage)."""
+        from .company_resolver import get_company_resolver
+        return await get_company_resolver().resolve(mandate_path, self.get_pool)
 
-        pool = await self.get_pool()
-        async with pool.acquire() as conn:
-            row = await conn.fetchrow(
-                "SELECT id FROM core.companies WHERE firebase_mandate_path = $1",
-                mandate_path,
-            )
-            if row:
-                company_id = row["id"]
-                self._company_cache[mandate_path] = company_id
-                return company_id
-            return None
+    async def get_company_ids_from_mandate_paths(
+        self, mandate_paths: List[str]
+    ) -> Dict[str, Optional[UUID]]:
+        """Resolution batch mandate_path -> company_id (une seule requete pour les inconnus)."""
+        from .company_resolver import get_company_resolver
+        return await get_company_resolver().resolve_many(mandate_paths, self.get_pool)
 
     # ===================================================================
     # CHART OF ACCOUNTS (COA)
@@ -209,6 +214,10 @@ class NeonAccountingManager:
         """
         Insere ou met a jour le plan comptable enrichi.
 
+        Bulk: COPY dans une table de staging puis un seul INSERT ... ON
+        CONFLICT (mise a jour seulement si sync_hash change), dont le
+        RETURNING distingue ajouts et modifications.
+
         Args:
             company_id: UUID de la societe
             coa_data: Liste de dicts avec les champs COA enrichis par DF_ANALYSER
@@ -219,37 +228,77 @@ class NeonAccountingManager:
         if not coa_data:
             return {"added": 0, "modified": 0, "unchanged": 0}
 
-        pool = await self.get_pool()
-        stats = {"added": 0, "modified": 0, "unchanged": 0}
+        # Une ligne par compte (la derniere occurrence gagne, comme l'upsert ligne a ligne)
+        records_by_account: Dict[str, tuple] = {}
+        for item in coa_data:
+            account_number = str(item.get("account_number") or item.get("code", ""))
+            if not account_number:
+                continue
+
+            raw_is_active = item.get("isactive", item.get("is_active", True))
+            is_active = bool(raw_is_active) if raw_is_active is not None else True
+
+            sync_hash = _compute_hash({
+                "account_number": account_number,
+                "account_name": item.get("account_name") or item.get("name", ""),
+                "erp_account_type": item.get("erp_account_type") or item.get("account_type") or item.get("type", ""),
+                "account_nature": item.get("account_nature") or item.get("klk_account_nature", ""),
+                "account_function": item.get("account_function") or item.get("klk_account_function", ""),
+                "is_active": is_active,
+            })
+
+            records_by_account[account_number] = (
+                account_number,
+                item.get("account_name") or item.get("name", "Unknown"),
+                item.get("erp_account_type") or item.get("account_type") or item.get("type"),
+                item.get("account_nature") or item.get("klk_account_nature"),
+                item.get("account_function") or item.get("klk_account_function"),
+                item.get("parent_account_number") or item.get("parent_code"),
+                str(item.get("firebase_account_id", "")) or None,
+                str(item.get("erp_account_id") or item.get("erp_id") or ""),
+                account_number[0],  # account_class: premier chiffre
+                sync_hash,
+                item.get("erp_source"),
+                is_active,
+            )
+
+        records = list(records_by_account.values())
+        if not records:
+            return {"added": 0, "modified": 0, "unchanged": 0}
 
+        pool = await self.get_pool()
         async with pool.acquire() as conn:
             async with conn.transaction():
-                for item in coa_data:
-                    account_number = str(item.get("account_number") or item.get("code", ""))
-                    if not account_number:
-                        continue
-
-                    raw_is_active = item.get("isactive", item.get("is_active", True))
-
-                    sync_hash = _compute_hash({
-                        "account_number": account_number,
-                        "account_name": item.get("account_name") or item.get("name", ""),
-                        "erp_account_type": item.get("erp_account_type") or item.get("account_type") or item.get("type", ""),
-                        "account_nature": item.get("account_nature") or item.get("klk_account_nature", ""),
-                        "account_function": item.get("account_function") or item.get("klk_account_function", ""),
-                        "is_active": bool(raw_is_active) if raw_is_active is not None else True,
-                    })
-
-                    # Determine account_class from first digit(s)
-                    account_class = account_number[0] if account_number else None
-
-                    # erp_source from transformer or fallback
-                    erp_source = item.get("erp_source")
-
-                    is_active = bool(raw_is_active) if raw_is_active is not None else True
+                await conn.execute("""
+                    CREATE TEMP TABLE _coa_staging (
+                        account_number TEXT,
+                        account_name TEXT,
+                        erp_account_type TEXT,
+                        account_nature TEXT,
+                        account_function TEXT,
+                        parent_account_number TEXT,
+                        firebase_account_id TEXT,
+                        erp_account_id TEXT,
+                        account_class TEXT,
+                        sync_hash TEXT,
+                        erp_source TEXT,
+                        is_active BOOLEAN
+                    ) ON COMMIT DROP
+                """)
+                await conn.copy_records_to_table(
+                    "_coa_staging",
+                    records=records,
+                    columns=[
+                        "account_number", "account_name", "erp_account_type",
+                        "account_nature", "account_function", "parent_account_number",
+                        "firebase_account_id", "erp_account_id", "account_class",
+                        "sync_hash", "erp_source", "is_active",
+                    ],
+                )
 
-                    result = await conn.execute(
-                        """
+                row = await conn.fetchrow(
+                    """
+                    WITH upserted AS (
                         INSERT INTO core.chart_of_accounts (
                             company_id, account_number, account_name,
                             erp_account_type, account_nature, account_function,
@@ -257,7 +306,12 @@ class NeonAccountingManager:
                             erp_account_id, account_class, sync_hash,
                             erp_source, is_active
                         )
-                        VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13)
+                        SELECT $1, s.account_number, s.account_name,
+                               s.erp_account_type, s.account_nature, s.account_function,
+                               s.parent_account_number, s.firebase_account_id,
+                               s.erp_account_id, s.account_class, s.sync_hash,
+                               s.erp_source, s.is_active
+                        FROM _coa_staging s
                         ON CONFLICT (company_id, account_number) DO UPDATE
                         SET account_name = EXCLUDED.account_name,
                             erp_account_type = EXCLUDED.erp_account_type,
@@ -271,30 +325,16 @@ class NeonAccountingManager:
                             erp_source = EXCLUDED.erp_source,
                             is_active = EXCLUDED.is_active
                         WHERE core.chart_of_accounts.sync_hash IS DISTINCT FROM EXCLUDED.sync_hash
-                        """,
-                        company_id,
-                        account_number,
-                        item.get("account_name") or item.get("name", "Unknown"),
-                        item.get("erp_account_type") or item.get("account_type") or item.get("type"),
-                        item.get("account_nature") or item.get("klk_account_nature"),
-                        item.get("account_function") or item.get("klk_account_function"),
-                        item.get("parent_account_number") or item.get("parent_code"),
-                        str(item.get("firebase_account_id", "")) or None,
-                        str(item.get("erp_account_id") or item.get("erp_id") or ""),
-                        account_class,
-                        sync_hash,
-                        erp_source,
-                        is_active,
+                        RETURNING (xmax = 0) AS is_insert
                     )
+                    SELECT COUNT(*) FILTER (WHERE is_insert) AS added,
+                           COUNT(*) FILTER (WHERE NOT is_insert) AS modified
+                    FROM upserted
+                    """,
+                    company_id,
+                )
 
-                    tag = result  # "INSERT 0 1" or "INSERT 0 0" or "UPDATE 1"
-                    if "INSERT 0 1" in tag:
-                        stats["added"] += 1
-                    elif "UPDATE 1" in tag:
-                        stats["modified"] += 1
-                    else:
-                        stats["unchanged"] += 1
-
+        stats = _merge_stats(row, len(records))
         logger.info(
             "COA upsert company=%s: added=%d modified=%d unchanged=%d",
             company_id, stats["added"], stats["modified"], stats["unchanged"],
@@ -311,6 +351,9 @@ class NeonAccountingManager:
         """
         Insere ou met a jour les journaux comptables.
 
+        Bulk: COPY dans une table de staging puis un seul INSERT ... ON
+        CONFLICT; seuls les journaux dont un champ change sont mis a jour.
+
         Args:
             company_id: UUID de la societe
             journals: Liste de dicts avec journal_code, journal_name, etc.
@@ -321,24 +364,58 @@ class NeonAccountingManager:
         if not journals:
             return {"added": 0, "modified": 0, "unchanged": 0}
 
-        pool = await self.get_pool()
-        stats = {"added": 0, "modified": 0, "unchanged": 0}
+        records_by_code: Dict[str, tuple] = {}
+        for j in journals:
+            journal_code = str(j.get("journal_code") or j.get("code", ""))
+            if not journal_code:
+                continue
+            records_by_code[journal_code] = (
+                journal_code,
+                j.get("journal_name") or j.get("name", journal_code),
+                j.get("journal_type") or j.get("journal_category") or j.get("type"),
+                str(j.get("erp_journal_id") or j.get("erp_id") or ""),
+                j.get("erp_source"),
+                j.get("sync_hash"),
+            )
 
+        records = list(records_by_code.values())
+        if not records:
+            return {"added": 0, "modified": 0, "unchanged": 0}
+
+        pool = await self.get_pool()
         async with pool.acquire() as conn:
             async with conn.transaction():
-                for j in journals:
-                    journal_code = str(j.get("journal_code") or j.get("code", ""))
-                    if not journal_code:
-                        continue
+                await conn.execute("""
+                    CREATE TEMP TABLE _journals_staging (
+                        journal_code TEXT,
+                        journal_name TEXT,
+                        journal_type TEXT,
+                        erp_journal_id TEXT,
+                        erp_source TEXT,
+                        sync_hash TEXT
+                    ) ON COMMIT DROP
+                """)
+                await conn.copy_records_to_table(
+                    "_journals_staging",
+                    records=records,
+                    columns=[
+                        "journal_code", "journal_name", "journal_type",
+                        "erp_journal_id", "erp_source", "sync_hash",
+                    ],
+                )
 
-                    result = await conn.execute(
-                        """
+                row = await conn.fetchrow(
+                    """
+                    WITH upserted AS (
                         INSERT INTO accounting.journals (
                             company_id, journal_code, journal_name,
                             journal_type, erp_journal_id, erp_source,
                             sync_hash, is_active
                         )
-                        VALUES ($1, $2, $3, $4, $5, $6, $7, TRUE)
+                        SELECT $1, s.journal_code, s.journal_name,
+                               s.journal_type, s.erp_journal_id, s.erp_source,
+                               s.sync_hash, TRUE
+                        FROM _journals_staging s
                         ON CONFLICT (company_id, journal_code) DO UPDATE
                         SET journal_name = EXCLUDED.journal_name,
                             journal_type = EXCLUDED.journal_type,
@@ -346,23 +423,23 @@ class NeonAccountingManager:
                             erp_source = EXCLUDED.erp_source,
                             sync_hash = EXCLUDED.sync_hash,
                             is_active = TRUE
-                        """,
-                        company_id,
-                        journal_code,
-                        j.get("journal_name") or j.get("name", journal_code),
-                        j.get("journal_type") or j.get("journal_category") or j.get("type"),
-                        str(j.get("erp_journal_id") or j.get("erp_id") or ""),
-                        j.get("erp_source"),
-                        j.get("sync_hash"),
+                        WHERE (accounting.journals.journal_name, accounting.journals.journal_type,
+                               accounting.journals.erp_journal_id, accounting.journals.erp_source,
+                               accounting.journals.sync_hash, accounting.journals.is_active)
+                          IS DISTINCT FROM
+                              (EXCLUDED.journal_name, EXCLUDED.journal_type,
+                               EXCLUDED.erp_journal_id, EXCLUDED.erp_source,
+                               EXCLUDED.sync_hash, TRUE)
+                        RETURNING (xmax = 0) AS is_insert
                     )
+                    SELECT COUNT(*) FILTER (WHERE is_insert) AS added,
+                           COUNT(*) FILTER (WHERE NOT is_insert) AS modified
+                    FROM upserted
+                    """,
+                    company_id,
+                )
 
-                    if "INSERT 0 1" in result:
-                        stats["added"] += 1
-                    elif "UPDATE 1" in result:
-                        stats["modified"] += 1
-                    else:
-                        stats["unchanged"] += 1
-
+        stats = _merge_stats(row, len(records))
         logger.info(
             "Journals upsert company=%s: added=%d modified=%d unchanged=%d",
             company_id, stats["added"], stats["modified"], stats["unchanged"],
@@ -383,6 +460,12 @@ class NeonAccountingManager:
         avec comparaison de hash SHA-256 pour ne mettre a jour que les
         ecritures modifiees.
 
+        Les soldes periodiques sont maintenus dans la meme transaction:
+        les contributions (compte, mois, debit, credit) des lignes modifiees
+        sont retirees avant l'upsert, celles des lignes ecrites ajoutees
+        apres, et seules les cellules touchees de period_balances sont
+        ajustees (cout proportionnel au nombre de lignes changees).
+
         Args:
             company_id: UUID de la societe
             entries: Liste de dicts avec les champs GL
@@ -480,8 +563,26 @@ class NeonAccountingManager:
                     ],
                 )
 
-                # 3. Upsert depuis staging (English column names)
+                # 3. Contributions actuelles des lignes qui vont changer (retirees des soldes)
+                await self._create_balance_delta_table(conn)
+                await conn.execute("""
+                    INSERT INTO _pb_delta
+                    SELECT EXTRACT(YEAR FROM g.entry_date)::INTEGER,
+                           EXTRACT(MONTH FROM g.entry_date)::INTEGER,
+                           g.account_number, g.account_name, g.currency,
+                           -g.debit, -g.credit, -1
+                    FROM accounting.gl_entries g
+                    JOIN _gl_staging s ON s.entry_id = g.entry_id
+                    WHERE g.company_id = $1
+                      AND g.pinnokio_hash IS DISTINCT FROM s.pinnokio_hash
+                      AND NOT g.is_deleted
+                      AND g.entry_state = 'posted'
+                      AND g.entry_date IS NOT NULL
+                """, company_id)
+
+                # 4. Upsert depuis staging (English column names) + nouvelles contributions
                 result = await conn.fetch("""
+                    WITH upserted AS (
                     INSERT INTO accounting.gl_entries (
                         company_id, entry_id, entry_date, last_update_date,
                         journal_code, document_ref, account_number, account_name,
@@ -521,7 +622,19 @@ class NeonAccountingManager:
                         pinnokio_checked_time = NOW(),
                         is_deleted = FALSE
                     WHERE accounting.gl_entries.pinnokio_hash IS DISTINCT FROM EXCLUDED.pinnokio_hash
-                    RETURNING (xmax = 0) AS is_insert
+                    RETURNING (xmax = 0) AS is_insert, entry_date, account_number,
+                              account_name, currency, debit, credit, entry_state
+                    ),
+                    contributions AS (
+                        INSERT INTO _pb_delta
+                        SELECT EXTRACT(YEAR FROM entry_date)::INTEGER,
+                               EXTRACT(MONTH FROM entry_date)::INTEGER,
+                               account_number, account_name, currency,
+                               debit, credit, 1
+                        FROM upserted
+                        WHERE entry_state = 'posted' AND entry_date IS NOT NULL
+                    )
+                    SELECT is_insert FROM upserted
                 """, company_id)
 
                 for row in result:
@@ -532,6 +645,10 @@ class NeonAccountingManager:
 
                 stats["unchanged"] = len(entries) - stats["added"] - stats["modified"]
 
+                # 5. Ajustement des cellules period_balances touchees
+                if stats["added"] or stats["modified"]:
+                    stats["balance_cells"] = await self._apply_period_balance_delta(conn, company_id)
+
         logger.info(
             "GL sync company=%s: added=%d modified=%d unchanged=%d (total=%d)",
             company_id, stats["added"], stats["modified"],
@@ -545,7 +662,9 @@ class NeonAccountingManager:
         """
         Marque comme supprimees les ecritures absentes de la liste active.
 
-        Utilisee lors de la reconciliation hebdomadaire.
+        Utilisee lors de la reconciliation hebdomadaire. Les ids actifs sont
+        charges par COPY dans une table de staging; la suppression est un
+        anti-join (pas de tableau de centaines de milliers d'ids en parametre).
 
         Args:
             company_id: UUID de la societe
@@ -559,21 +678,49 @@ class NeonAccountingManager:
 
         pool = await self.get_pool()
         async with pool.acquire() as conn:
-            result = await conn.execute(
-                """
-                UPDATE accounting.gl_entries
-                SET is_deleted = TRUE, updated_at = NOW()
-                WHERE company_id = $1
-                  AND NOT is_deleted
-                  AND entry_id != ALL($2::varchar[])
-                """,
-                company_id,
-                active_entry_ids,
-            )
-            count = int(result.split()[-1]) if "UPDATE" in result else 0
-            if count:
-                logger.info("Marked %d entries as deleted for company=%s", count, company_id)
-            return count
+            async with conn.transaction():
+                await conn.execute(
+                    "CREATE TEMP TABLE _gl_active (entry_id VARCHAR(100) PRIMARY KEY) ON COMMIT DROP"
+                )
+                await conn.copy_records_to_table(
+                    "_gl_active",
+                    records=[(entry_id,) for entry_id in dict.fromkeys(map(str, active_entry_ids))],
+                    columns=["entry_id"],
+                )
+                await conn.execute("ANALYZE _gl_active")
+
+                # Les contributions des lignes supprimees sont retirees des soldes
+                await self._create_balance_delta_table(conn)
+                count = await conn.fetchval(
+                    """
+                    WITH removed AS (
+                        UPDATE accounting.gl_entries g
+                        SET is_deleted = TRUE, updated_at = NOW()
+                        WHERE g.company_id = $1
+                          AND NOT g.is_deleted
+                          AND NOT EXISTS (
+                              SELECT 1 FROM _gl_active a WHERE a.entry_id = g.entry_id
+                          )
+                        RETURNING g.entry_date, g.account_number, g.account_name,
+                                  g.currency, g.debit, g.credit, g.entry_state
+                    ),
+                    contributions AS (
+                        INSERT INTO _pb_delta
+                        SELECT EXTRACT(YEAR FROM entry_date)::INTEGER,
+                               EXTRACT(MONTH FROM entry_date)::INTEGER,
+                               account_number, account_name, currency,
+                               -debit, -credit, -1
+                        FROM removed
+                        WHERE entry_state = 'posted' AND entry_date IS NOT NULL
+                    )
+                    SELECT COUNT(*) FROM removed
+                    """,
+                    company_id,
+                ) or 0
+                if count:
+                    await self._apply_period_balance_delta(conn, company_id)
+                    logger.info("Marked %d entries as deleted for company=%s", count, company_id)
+                return count
 
     # ===================================================================
     # SYNC METADATA
@@ -646,6 +793,9 @@ class NeonAccountingManager:
         Recompute les soldes periodiques pour une annee fiscale.
 
         Supprime et recalcule tous les soldes mensuels depuis gl_entries.
+        Les syncs maintiennent les soldes par delta (cf.
+        incremental_sync_gl_entries): ce recalcul complet sert de chemin
+        de reparation.
 
         Args:
             company_id: UUID de la societe
@@ -657,62 +807,323 @@ class NeonAccountingManager:
         pool = await self.get_pool()
         async with pool.acquire() as conn:
             async with conn.transaction():
-                # Supprimer les soldes existants
-                await conn.execute(
-                    """
-                    DELETE FROM accounting.period_balances
-                    WHERE company_id = $1 AND fiscal_year = $2
-                    """,
-                    company_id, fiscal_year,
+                count = await self._recompute_period_balances(conn, company_id, fiscal_year)
+                logger.info(
+                    "Period balances refreshed company=%s year=%d: %d rows",
+                    company_id, fiscal_year, count,
                 )
+                return count
+
+    async def rebuild_period_balances(self, company_id: UUID) -> Dict[str, int]:
+        """
+        Recompute complet des soldes periodiques (toutes les annees).
 
-                # Recalculer depuis gl_entries (English column names)
-                result = await conn.execute(
+        Utilise a l'initialisation (soldes jamais maintenus par delta) ou
+        apres une verification en echec. Marque les soldes comme a jour
+        de la dataset_version GL courante.
+
+        Returns:
+            Dict annee → nombre de lignes
+        """
+        pool = await self.get_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                years = await conn.fetch(
                     """
-                    INSERT INTO accounting.period_balances (
-                        company_id, fiscal_year, fiscal_month,
-                        account_number, account_name,
-                        total_debit, total_credit, balance,
-                        entry_count, currency, computed_at,
-                        source_version
+                    SELECT DISTINCT EXTRACT(YEAR FROM entry_date)::INTEGER AS fiscal_year
+                    FROM accounting.gl_entries
+                    WHERE company_id = $1 AND entry_date IS NOT NULL
+                    UNION
+                    SELECT DISTINCT fiscal_year FROM accounting.period_balances
+                    WHERE company_id = $1
+                    """,
+                    company_id,
+                )
+                counts = {}
+                for row in years:
+                    counts[row["fiscal_year"]] = await self._recompute_period_balances(
+                        conn, company_id, row["fiscal_year"]
                     )
-                    SELECT
-                        gl.company_id,
-                        $2,
-                        EXTRACT(MONTH FROM gl.entry_date)::INTEGER,
-                        gl.account_number,
-                        MAX(COALESCE(coa.account_name, gl.account_name)),
-                        SUM(gl.debit),
-                        SUM(gl.credit),
-                        SUM(gl.debit) - SUM(gl.credit),
-                        COUNT(*),
-                        MODE() WITHIN GROUP (ORDER BY gl.currency),
-                        NOW(),
-                        COALESCE(
-                            (SELECT dataset_version FROM accounting.sync_metadata
-                             WHERE company_id = $1 AND sync_type = 'gl'),
-                            0
-                        )
-                    FROM accounting.gl_entries gl
-                    LEFT JOIN core.chart_of_accounts coa
-                        ON coa.company_id = gl.company_id
-                        AND coa.account_number = gl.account_number
-                    WHERE gl.company_id = $1
-                      AND EXTRACT(YEAR FROM gl.entry_date)::INTEGER = $2
-                      AND NOT gl.is_deleted
-                      AND gl.entry_state = 'posted'
-                    GROUP BY gl.company_id, EXTRACT(MONTH FROM gl.entry_date),
-                             gl.account_number
+                version = await conn.fetchval(
+                    """
+                    SELECT COALESCE(MAX(dataset_version), 0) FROM accounting.sync_metadata
+                    WHERE company_id = $1 AND sync_type = 'gl'
                     """,
-                    company_id, fiscal_year,
+                    company_id,
                 )
+                await self._mark_period_balances_version(conn, company_id, version)
 
-                count = int(result.split()[-1]) if "INSERT" in result else 0
-                logger.info(
-                    "Period balances refreshed company=%s year=%d: %d rows",
-                    company_id, fiscal_year, count,
+        logger.info(
+            "Period balances rebuilt company=%s years=%s version=%s",
+            company_id, sorted(counts), version,
+        )
+        return counts
+
+    async def verify_period_balances(
+        self, company_id: UUID, fiscal_year: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Compare les soldes stockes a un recalcul depuis gl_entries.
+
+        Returns:
+            Cellules divergentes (mois, compte, stocke vs attendu), vide si
+            les soldes maintenus par delta sont exacts.
+        """
+        pool = await self.get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                WITH expected AS (
+                    SELECT EXTRACT(MONTH FROM entry_date)::INTEGER AS fiscal_month,
+                           account_number,
+                           SUM(debit) AS total_debit,
+                           SUM(credit) AS total_credit,
+                           COUNT(*) AS entry_count
+                    FROM accounting.gl_entries
+                    WHERE company_id = $1
+                      AND EXTRACT(YEAR FROM entry_date)::INTEGER = $2
+                      AND NOT is_deleted
+                      AND entry_state = 'posted'
+                    GROUP BY 1, 2
+                ),
+                stored AS (
+                    SELECT fiscal_month, account_number, total_debit, total_credit, entry_count
+                    FROM accounting.period_balances
+                    WHERE company_id = $1 AND fiscal_year = $2
                 )
-                return count
+                SELECT COALESCE(e.fiscal_month, s.fiscal_month) AS fiscal_month,
+                       COALESCE(e.account_number, s.account_number) AS account_number,
+                       s.total_debit AS stored_debit, e.total_debit AS expected_debit,
+                       s.total_credit AS stored_credit, e.total_credit AS expected_credit,
+                       s.entry_count AS stored_count, e.entry_count AS expected_count
+                FROM expected e
+                FULL OUTER JOIN stored s
+                    ON s.fiscal_month = e.fiscal_month AND s.account_number = e.account_number
+                WHERE s.total_debit IS DISTINCT FROM e.total_debit
+                   OR s.total_credit IS DISTINCT FROM e.total_credit
+                   OR s.entry_count IS DISTINCT FROM e.entry_count
+                ORDER BY 1, 2
+                """,
+                company_id, fiscal_year,
+            )
+            mismatches = [dict(r) for r in rows]
+            if mismatches:
+                logger.warning(
+                    "Period balances drift company=%s year=%d: %d cells",
+                    company_id, fiscal_year, len(mismatches),
+                )
+            return mismatches
+
+    async def get_dataset_versions(self, company_id: UUID) -> Dict[str, Dict[str, Any]]:
+        """Versions des jeux de donnees (gl, coa, period_balances) par sync_type."""
+        pool = await self.get_pool()
+        async with pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT sync_type, dataset_version, last_sync_time
+                FROM accounting.sync_metadata
+                WHERE company_id = $1 AND sync_type IN ('gl', 'coa', 'period_balances')
+                """,
+                company_id,
+            )
+            return {
+                r["sync_type"]: {"dataset_version": r["dataset_version"], "last_sync_time": r["last_sync_time"]}
+                for r in rows
+            }
+
+    async def period_balances_stale(self, company_id: UUID) -> bool:
+        """True si les soldes ne refletent pas la dataset_version GL courante."""
+        from .accounting_balance_planner import balances_fresh
+        return not balances_fresh(await self.get_dataset_versions(company_id))
+
+    @staticmethod
+    async def _recompute_period_balances(conn, company_id: UUID, fiscal_year: int) -> int:
+        """DELETE + INSERT ... GROUP BY d'une annee (dans la transaction appelante)."""
+        await conn.execute(
+            """
+            DELETE FROM accounting.period_balances
+            WHERE company_id = $1 AND fiscal_year = $2
+            """,
+            company_id, fiscal_year,
+        )
+
+        # Recalculer depuis gl_entries (English column names)
+        result = await conn.execute(
+            """
+            INSERT INTO accounting.period_balances (
+                company_id, fiscal_year, fiscal_month,
+                account_number, account_name,
+                total_debit, total_credit, balance,
+                entry_count, currency, computed_at,
+                source_version
+            )
+            SELECT
+                gl.company_id,
+                $2,
+                EXTRACT(MONTH FROM gl.entry_date)::INTEGER,
+                gl.account_number,
+                MAX(COALESCE(coa.account_name, gl.account_name)),
+                SUM(gl.debit),
+                SUM(gl.credit),
+                SUM(gl.debit) - SUM(gl.credit),
+                COUNT(*),
+                MODE() WITHIN GROUP (ORDER BY gl.currency),
+                NOW(),
+                COALESCE(
+                    (SELECT dataset_version FROM accounting.sync_metadata
+                     WHERE company_id = $1 AND sync_type = 'gl'),
+                    0
+                )
+            FROM accounting.gl_entries gl
+            LEFT JOIN core.chart_of_accounts coa
+                ON coa.company_id = gl.company_id
+                AND coa.account_number = gl.account_number
+            WHERE gl.company_id = $1
+              AND EXTRACT(YEAR FROM gl.entry_date)::INTEGER = $2
+              AND NOT gl.is_deleted
+              AND gl.entry_state = 'posted'
+            GROUP BY gl.company_id, EXTRACT(MONTH FROM gl.entry_date),
+                     gl.account_number
+            """,
+            company_id, fiscal_year,
+        )
+        return int(result.split()[-1]) if "INSERT" in result else 0
+
+    @staticmethod
+    async def _create_balance_delta_table(conn) -> None:
+        """Table temporaire des contributions (+/-) aux soldes, videe au commit."""
+        await conn.execute("""
+            CREATE TEMP TABLE _pb_delta (
+                fiscal_year INTEGER,
+                fiscal_month INTEGER,
+                account_number VARCHAR(20),
+                account_name VARCHAR(255),
+                currency CHAR(3),
+                debit NUMERIC(15,2),
+                credit NUMERIC(15,2),
+                entry_count INTEGER
+            ) ON COMMIT DROP
+        """)
+
+    async def _apply_period_balance_delta(self, conn, company_id: UUID) -> int:
+        """
+        Applique _pb_delta aux cellules period_balances (meme transaction).
+
+        Incremente la dataset_version GL; les cellules touchees portent
+        cette nouvelle version. Le marqueur de fraicheur des soldes
+        ('period_balances' dans sync_metadata) n'avance que s'il etait a
+        jour de la version precedente: un delta applique a des soldes deja
+        en retard ne les rend pas exacts, ils restent a reconstruire.
+
+        Returns:
+            Nombre de cellules (annee, mois, compte) ajustees
+        """
+        await conn.execute("""
+            CREATE TEMP TABLE _pb_cells ON COMMIT DROP AS
+            SELECT fiscal_year, fiscal_month, account_number,
+                   SUM(debit) AS debit,
+                   SUM(credit) AS credit,
+                   SUM(entry_count) AS entry_count,
+                   MAX(account_name) FILTER (WHERE entry_count > 0) AS account_name,
+                   MAX(currency) FILTER (WHERE entry_count > 0) AS currency
+            FROM _pb_delta
+            GROUP BY fiscal_year, fiscal_month, account_number
+            HAVING SUM(entry_count) <> 0 OR SUM(debit) <> 0 OR SUM(credit) <> 0
+        """)
+
+        version = await conn.fetchval("""
+            INSERT INTO accounting.sync_metadata (company_id, sync_type, dataset_version)
+            VALUES ($1, 'gl', 1)
+            ON CONFLICT (company_id, sync_type) DO UPDATE
+            SET dataset_version = COALESCE(accounting.sync_metadata.dataset_version, 0) + 1
+            RETURNING dataset_version
+        """, company_id)
+
+        updated = await conn.execute("""
+            UPDATE accounting.period_balances pb
+            SET total_debit = pb.total_debit + c.debit,
+                total_credit = pb.total_credit + c.credit,
+                balance = (pb.total_debit + c.debit) - (pb.total_credit + c.credit),
+                entry_count = pb.entry_count + c.entry_count,
+                computed_at = NOW(),
+                source_version = $2
+            FROM _pb_cells c
+            WHERE pb.company_id = $1
+              AND pb.fiscal_year = c.fiscal_year
+              AND pb.fiscal_month = c.fiscal_month
+              AND pb.account_number = c.account_number
+        """, company_id, version)
+
+        inserted = await conn.execute("""
+            INSERT INTO accounting.period_balances (
+                company_id, fiscal_year, fiscal_month,
+                account_number, account_name,
+                total_debit, total_credit, balance,
+                entry_count, currency, computed_at,
+                source_version
+            )
+            SELECT $1, c.fiscal_year, c.fiscal_month,
+                   c.account_number, COALESCE(coa.account_name, c.account_name),
+                   c.debit, c.credit, c.debit - c.credit,
+                   c.entry_count, COALESCE(c.currency, 'CHF'), NOW(),
+                   $2
+            FROM _pb_cells c
+            LEFT JOIN core.chart_of_accounts coa
+                ON coa.company_id = $1
+                AND coa.account_number = c.account_number
+            WHERE c.entry_count > 0
+              AND NOT EXISTS (
+                  SELECT 1 FROM accounting.period_balances pb
+                  WHERE pb.company_id = $1
+                    AND pb.fiscal_year = c.fiscal_year
+                    AND pb.fiscal_month = c.fiscal_month
+                    AND pb.account_number = c.account_number
+              )
+        """, company_id, version)
+
+        # Cellules videes (plus aucune ecriture comptabilisee)
+        await conn.execute("""
+            DELETE FROM accounting.period_balances pb
+            USING _pb_cells c
+            WHERE pb.company_id = $1
+              AND pb.fiscal_year = c.fiscal_year
+              AND pb.fiscal_month = c.fiscal_month
+              AND pb.account_number = c.account_number
+              AND pb.entry_count <= 0
+        """, company_id)
+
+        await self._advance_period_balances_version(conn, company_id, version)
+
+        cells = (int(updated.split()[-1]) if "UPDATE" in updated else 0) + \
+                (int(inserted.split()[-1]) if "INSERT" in inserted else 0)
+        logger.info(
+            "Period balances delta company=%s: %d cells adjusted (version=%s)",
+            company_id, cells, version,
+        )
+        return cells
+
+    @staticmethod
+    async def _mark_period_balances_version(conn, company_id: UUID, version: int) -> None:
+        """Les soldes refletent la dataset_version GL donnee."""
+        await conn.execute("""
+            INSERT INTO accounting.sync_metadata (company_id, sync_type, dataset_version, last_sync_time)
+            VALUES ($1, 'period_balances', $2, NOW())
+            ON CONFLICT (company_id, sync_type) DO UPDATE
+            SET dataset_version = EXCLUDED.dataset_version,
+                last_sync_time = EXCLUDED.last_sync_time
+        """, company_id, version)
+
+    @staticmethod
+    async def _advance_period_balances_version(conn, company_id: UUID, version: int) -> None:
+        """Avance le marqueur des soldes a version, seulement s'il etait a version - 1."""
+        await conn.execute("""
+            UPDATE accounting.sync_metadata
+            SET dataset_version = $2,
+                last_sync_time = NOW()
+            WHERE company_id = $1
+              AND sync_type = 'period_balances'
+              AND dataset_version = $2 - 1
+        """, company_id, version)
 
     # ===================================================================
     # QUERY HELPERS (pour le cron et les outils agent)
@@ -84,8 +84,11 @@ class NeonHRManager:
     _pool: Optional["asyncpg.Pool"] = None
     _pool_lock: Optional[asyncio.Lock] = None
     
-    # Cache mandate_path → company_id
-    _company_cache: Dict[str, UUID] = {}
+    @property
+    def _company_cache(self):
+        """Cache mandate_path → company_id (niveau L1 du resolver partagé)."""
+        from .company_resolver import get_company_resolver
+        return get_company_resolver().local_entries
     
     def __new__(cls):
         """Implémentation thread-safe du pattern Singleton."""
@@ -222,22 +225,21 @@ class NeonHRManager:
         Returns:
             UUID de l'entreprise ou None si non trouvée
         """
-        # Vérifier le cache
-        if mandate_path in self._company_cache:
-            return self._company_cache[mandate_path]
-        
-        pool = await self.get_pool()
-        async with pool.acquire() as conn:
-            row = await conn.fetchrow(
-                "SELECT id FROM core.companies WHERE firebase_mandate_path = $1",
-                mandate_path
-            )
-            if row:
-                company_id = row["id"]
-                self._company_cache[mandate_path] = company_id
-                return company_id
-            return None
-    
+        from .company_resolver import get_company_resolver
+        return await get_company_resolver().resolve(mandate_path, self.get_pool)
+
+    async def get_company_ids_from_mandate_paths(
+        self,
+        mandate_paths: List[str]
+    ) -> Dict[str, Optional[UUID]]:
+        """
+        Résolution batch mandate_path → company_id.
+
+        Les mandates absents des caches sont résolus en une seule requête.
+        """
+        from .company_resolver import get_company_resolver
+        return await get_company_resolver().resolve_many(mandate_paths, self.get_pool)
+
     async def get_or_create_company(
         self,
         account_firebase_uid: str,
@@ -297,7 +299,8 @@ class NeonHRManager:
             )
             
             company_id = result["id"]
-            self._company_cache[mandate_path] = company_id
+            from .company_resolver import get_company_resolver
+            get_company_resolver().remember(mandate_path, company_id)
             logger.info(f"✅ Entreprise créée: {company_name} ({company_id})")
             return company_id
 
@@ -371,9 +374,9 @@ class NeonHRManager:
                     # 5. Supprimer la societe (cascade auto: accounting.*, core.company_settings, etc.)
                     await conn.execute("DELETE FROM core.companies WHERE id = $1", company_id)
 
-            # Nettoyer le cache
-            if mandate_path in self._company_cache:
-                del self._company_cache[mandate_path]
+            # Nettoyer le cache (process + Redis)
+            from .company_resolver import get_company_resolver
+            get_company_resolver().invalidate(mandate_path)
 
             logger.info(f"✅ Company deleted from Neon: {company_id} {deleted_counts}")
             return {"success": True, "company_id": str(company_id), "deleted_counts": deleted_counts}
@@ -24,7 +24,7 @@ Created: 2026-01-18
 import asyncio
 import logging
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 
 from ..firebase_providers import FirebaseManagement
 from ..redis_client import get_redis
@@ -40,6 +40,10 @@ logger = logging.getLogger("approval.handlers")
 
 TTL_APPROVALS_CACHE = 30  # 30 seconds
 
+# Envoi groupé: décisions par lot (get_all + WriteBatch) et lots en parallèle
+APPROVAL_CHUNK_SIZE = 50
+APPROVAL_MAX_CONCURRENCY = 4
+
 
 # ============================================
 # HELPERS
@@ -70,6 +74,18 @@ def _serialize_value(value: Any) -> Any:
     return value
 
 
+def _index_by_id(entries: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Index id → entrée d'une liste de dropdown (clé str: "7" et 7 se valent).
+    La première entrée d'un id l'emporte, comme l'ancien parcours linéaire.
+    """
+    index: Dict[str, Dict[str, Any]] = {}
+    for entry in entries or []:
+        if isinstance(entry, dict) and entry.get("id") is not None:
+            index.setdefault(str(entry["id"]), entry)
+    return index
+
+
 # ============================================
 # SINGLETON
 # ============================================
@@ -411,21 +427,24 @@ class ApprovalHandlers:
             if "invoice_date_due" in invoice_details and "due_date" not in invoice_details:
                 invoice_details["due_date"] = invoice_details.pop("invoice_date_due")
 
+            # Index id → entrée des dropdowns (construits une fois par item,
+            # au lieu d'un parcours des listes pour chaque ligne)
+            accounts_by_id = _index_by_id(available_accounts)
+            taxes_by_id = _index_by_id(available_taxes)
+
             # Resolve partner_name from dropdowns if missing
             partner_id = invoice_details.get("partner_id")
             if partner_id and not invoice_details.get("partner_name"):
-                for s in available_suppliers:
-                    if s.get("id") == partner_id or str(s.get("id")) == str(partner_id):
-                        invoice_details["partner_name"] = s.get("name", "")
-                        break
+                supplier = _index_by_id(available_suppliers).get(str(partner_id))
+                if supplier is not None:
+                    invoice_details["partner_name"] = supplier.get("name", "")
 
             # Resolve currency_name from dropdowns if missing
             currency_id = invoice_details.get("currency_id")
             if currency_id and not invoice_details.get("currency_name"):
-                for c in available_currencies:
-                    if c.get("id") == currency_id or str(c.get("id")) == str(currency_id):
-                        invoice_details["currency_name"] = c.get("name", "")
-                        break
+                currency = _index_by_id(available_currencies).get(str(currency_id))
+                if currency is not None:
+                    invoice_details["currency_name"] = currency.get("name", "")
 
             # --- Normalize accounting lines: resolve names from dropdowns ---
             for line in accounting_lines:
@@ -435,20 +454,17 @@ class ApprovalHandlers:
                 # Resolve account_name/account_code from dropdowns if missing
                 acc_id = line.get("account_id")
                 if acc_id and not line.get("account_name"):
-                    for a in available_accounts:
-                        if a.get("id") == acc_id or str(a.get("id")) == str(acc_id):
-                            line["account_name"] = a.get("name", "")
-                            line["account_code"] = a.get("code", "")
-                            break
+                    account = accounts_by_id.get(str(acc_id))
+                    if account is not None:
+                        line["account_name"] = account.get("name", "")
+                        line["account_code"] = account.get("code", "")
                 # Resolve tax_names from dropdowns if missing
                 tax_ids = line.get("tax_ids") or []
                 if tax_ids and not line.get("tax_names"):
-                    tax_names = []
-                    for tid in tax_ids:
-                        for t in available_taxes:
-                            if t.get("id") == tid or str(t.get("id")) == str(tid):
-                                tax_names.append(t.get("name", ""))
-                                break
+                    tax_names = [
+                        taxes_by_id[str(tid)].get("name", "")
+                        for tid in tax_ids if str(tid) in taxes_by_id
+                    ]
                     if tax_names:
                         line["tax_names"] = tax_names
 
@@ -544,88 +560,15 @@ class ApprovalHandlers:
             }]
 
         Returns:
-            {"success": True, "data": {"processed": N, "failed": N}}
+            {"success": True, "data": {"processed": N, "failed": N, "results": [...]}}
         """
-        try:
-            logger.info(
-                f"APPROVAL.send_router_approvals user_id={user_id} "
-                f"count={len(approvals)}"
-            )
-
-            firebase = FirebaseManagement()
-            processed = 0
-            failed = 0
-            errors = []
-
-            for decision in approvals:
-                item_id = decision.get("itemId", "")
-                approved = decision.get("approved", False)
-
-                try:
-                    if approved:
-                        # Process approval - move to appropriate service folder
-                        result = await asyncio.to_thread(
-                            firebase.process_router_approval,
-                            mandate_path=mandate_path,
-                            item_id=item_id,
-                            selected_service=decision.get("selectedService", ""),
-                            selected_fiscal_year=decision.get("selectedFiscalYear", ""),
-                            user_id=user_id
-                        )
-                    else:
-                        # Process rejection
-                        result = await asyncio.to_thread(
-                            firebase.process_router_rejection,
-                            mandate_path=mandate_path,
-                            item_id=item_id,
-                            rejection_reason=decision.get("rejectionReason", ""),
-                            instructions=decision.get("instructions", ""),
-                            close=decision.get("close", False),
-                            user_id=user_id
-                        )
-
-                    if result:
-                        processed += 1
-                    else:
-                        failed += 1
-                        errors.append({"itemId": item_id, "error": "Processing failed"})
-
-                except Exception as item_err:
-                    failed += 1
-                    errors.append({"itemId": item_id, "error": str(item_err)})
-                    logger.error(f"Router approval error item={item_id}: {item_err}")
-
-            # Invalidate approvals cache
-            redis = get_redis()
-            redis.delete(f"approvals:{company_id}")
-
-            # Broadcast result
-            await hub.broadcast(user_id, {
-                "type": "approval.result",
-                "payload": {
-                    "department": "router",
-                    "processed": processed,
-                    "failed": failed,
-                    "errors": errors if failed > 0 else []
-                }
-            })
-
-            logger.info(
-                f"APPROVAL.send_router_approvals complete "
-                f"processed={processed} failed={failed}"
-            )
-
-            return {
-                "success": True,
-                "data": {"processed": processed, "failed": failed, "errors": errors}
-            }
-
-        except Exception as e:
-            logger.error(f"APPROVAL.send_router_approvals error: {e}", exc_info=True)
-            return {
-                "success": False,
-                "error": {"code": "APPROVAL_SEND_ERROR", "message": str(e)}
-            }
+        return await self._send_approvals(
+            "router", user_id, company_id, mandate_path, approvals,
+            lambda d: {
+                "selected_service": d.get("selectedService", ""),
+                "selected_fiscal_year": d.get("selectedFiscalYear", ""),
+            },
+        )
 
     # ============================================
     # SEND BANKER APPROVALS
@@ -650,85 +593,9 @@ class ApprovalHandlers:
             approvals: Liste des décisions
 
         Returns:
-            {"success": True, "data": {"processed": N, "failed": N}}
+            {"success": True, "data": {"processed": N, "failed": N, "results": [...]}}
         """
-        try:
-            logger.info(
-                f"APPROVAL.send_banker_approvals user_id={user_id} "
-                f"count={len(approvals)}"
-            )
-
-            firebase = FirebaseManagement()
-            processed = 0
-            failed = 0
-            errors = []
-
-            for decision in approvals:
-                item_id = decision.get("itemId", "")
-                approved = decision.get("approved", False)
-
-                try:
-                    if approved:
-                        result = await asyncio.to_thread(
-                            firebase.process_banker_approval,
-                            mandate_path=mandate_path,
-                            item_id=item_id,
-                            batch_id=decision.get("batchId", ""),
-                            user_id=user_id
-                        )
-                    else:
-                        result = await asyncio.to_thread(
-                            firebase.process_banker_rejection,
-                            mandate_path=mandate_path,
-                            item_id=item_id,
-                            rejection_reason=decision.get("rejectionReason", ""),
-                            instructions=decision.get("instructions", ""),
-                            close=decision.get("close", False),
-                            user_id=user_id
-                        )
-
-                    if result:
-                        processed += 1
-                    else:
-                        failed += 1
-                        errors.append({"itemId": item_id, "error": "Processing failed"})
-
-                except Exception as item_err:
-                    failed += 1
-                    errors.append({"itemId": item_id, "error": str(item_err)})
-                    logger.error(f"Banker approval error item={item_id}: {item_err}")
-
-            # Invalidate cache
-            redis = get_redis()
-            redis.delete(f"approvals:{company_id}")
-
-            # Broadcast result
-            await hub.broadcast(user_id, {
-                "type": "approval.result",
-                "payload": {
-                    "department": "banker",
-                    "processed": processed,
-                    "failed": failed,
-                    "errors": errors if failed > 0 else []
-                }
-            })
-
-            logger.info(
-                f"APPROVAL.send_banker_approvals complete "
-                f"processed={processed} failed={failed}"
-            )
-
-            return {
-                "success": True,
-                "data": {"processed": processed, "failed": failed, "errors": errors}
-            }
-
-        except Exception as e:
-            logger.error(f"APPROVAL.send_banker_approvals error: {e}", exc_info=True)
-            return {
-                "success": False,
-                "error": {"code": "APPROVAL_SEND_ERROR", "message": str(e)}
-            }
+        return await self._send_approvals("banker", user_id, company_id, mandate_path, approvals)
 
     # ============================================
     # SAVE APPROVAL CHANGES (LOCAL)
@@ -815,89 +682,139 @@ class ApprovalHandlers:
             approvals: Liste des décisions
 
         Returns:
-            {"success": True, "data": {"processed": N, "failed": N}}
+            {"success": True, "data": {"processed": N, "failed": N, "results": [...]}}
         """
-        try:
-            logger.info(
-                f"APPROVAL.send_apbookeeper_approvals user_id={user_id} "
-                f"count={len(approvals)}"
-            )
+        return await self._send_approvals(
+            "apbookeeper", user_id, company_id, mandate_path, approvals,
+            lambda d: {
+                "updated_data": d.get("updatedData", {}),
+                "approval_type": d.get("selectedMode", "invoice"),
+            },
+        )
 
-            firebase = FirebaseManagement()
-            processed = 0
-            failed = 0
-            errors = []
+    # ============================================
+    # BULK EXECUTOR
+    # ============================================
+
+    async def _send_approvals(
+        self,
+        department: str,
+        user_id: str,
+        company_id: str,
+        mandate_path: str,
+        approvals: List[Dict[str, Any]],
+        extra_fields: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Applique les décisions d'un département en lots concurrents.
+
+        Les décisions sont découpées en lots de APPROVAL_CHUNK_SIZE, chacun
+        traité par FirebaseManagement.process_approvals_bulk (1 get_all +
+        WriteBatch + pipeline Redis) dans un thread; au plus
+        APPROVAL_MAX_CONCURRENCY lots en parallèle. Une décision invalide
+        ou un lot en erreur n'échoue que pour ses propres items: un
+        résultat est renvoyé pour chaque décision, dans l'ordre.
 
-            for decision in approvals:
-                item_id = decision.get("itemId", "")
-                approved = decision.get("approved", False)
+        Returns:
+            {"success": True, "data": {"processed": N, "failed": N,
+                                        "errors": [...], "results": [...]}}
+        """
+        method = f"APPROVAL.send_{department}_approvals"
+        try:
+            logger.info(f"{method} user_id={user_id} count={len(approvals)}")
 
+            # Résultat par position; les décisions invalides sont rapportées sans être envoyées
+            results: List[Optional[Dict[str, Any]]] = [None] * len(approvals)
+            positions: List[int] = []
+            decisions = []
+            for index, decision in enumerate(approvals):
                 try:
-                    if approved:
-                        result = await asyncio.to_thread(
-                            firebase.process_apbookeeper_approval,
+                    normalized = {
+                        "item_id": decision.get("itemId", ""),
+                        "approved": decision.get("approved", False),
+                        "instructions": decision.get("instructions", ""),
+                        "rejection_reason": decision.get("rejectionReason", ""),
+                        "close": decision.get("close", False),
+                    }
+                    if extra_fields:
+                        normalized.update(extra_fields(decision))
+                except Exception as decision_err:
+                    item_id = decision.get("itemId", "") if isinstance(decision, dict) else ""
+                    results[index] = {"itemId": item_id, "success": False, "error": f"Invalid decision: {decision_err}"}
+                    continue
+                positions.append(index)
+                decisions.append(normalized)
+
+            firebase = FirebaseManagement()
+            semaphore = asyncio.Semaphore(APPROVAL_MAX_CONCURRENCY)
+
+            async def _run_chunk(chunk: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+                async with semaphore:
+                    try:
+                        return await asyncio.to_thread(
+                            firebase.process_approvals_bulk,
                             mandate_path=mandate_path,
-                            item_id=item_id,
+                            department=department,
+                            decisions=chunk,
                             user_id=user_id,
-                            instructions=decision.get("instructions", ""),
-                            updated_data=decision.get("updatedData", {}),
-                            approval_type=decision.get("selectedMode", "invoice"),
-                        )
-                    else:
-                        result = await asyncio.to_thread(
-                            firebase.process_apbookeeper_rejection,
-                            mandate_path=mandate_path,
-                            item_id=item_id,
-                            rejection_reason=decision.get("rejectionReason", ""),
-                            instructions=decision.get("instructions", ""),
-                            close=decision.get("close", False),
-                            user_id=user_id
                         )
+                    except Exception as chunk_err:
+                        logger.error(f"{method} chunk error: {chunk_err}")
+                        return [
+                            {"itemId": d["item_id"], "success": False, "error": str(chunk_err)}
+                            for d in chunk
+                        ]
+
+            chunks = [
+                decisions[i:i + APPROVAL_CHUNK_SIZE]
+                for i in range(0, len(decisions), APPROVAL_CHUNK_SIZE)
+            ]
+            chunk_results = [
+                result
+                for chunk_result in await asyncio.gather(*(_run_chunk(c) for c in chunks))
+                for result in chunk_result
+            ]
+            for index, result in zip(positions, chunk_results):
+                results[index] = result
+
+            processed = sum(1 for r in results if r["success"])
+            failed = len(results) - processed
+            errors = [
+                {"itemId": r["itemId"], "error": r.get("error") or "Processing failed"}
+                for r in results if not r["success"]
+            ]
+
+            # Les décisions sont appliquées: cache et notification sont non bloquants
+            try:
+                redis = get_redis()
+                redis.delete(f"approvals:{company_id}")
 
-                    if result:
-                        processed += 1
-                    else:
-                        failed += 1
-                        errors.append({"itemId": item_id, "error": "Processing failed"})
-
-                except Exception as item_err:
-                    failed += 1
-                    errors.append({"itemId": item_id, "error": str(item_err)})
-                    logger.error(f"APbookeeper approval error item={item_id}: {item_err}")
-
-            # Invalidate cache
-            redis = get_redis()
-            redis.delete(f"approvals:{company_id}")
-
-            # Broadcast result
-            await hub.broadcast(user_id, {
-                "type": "approval.result",
-                "payload": {
-                    "department": "apbookeeper",
-                    "processed": processed,
-                    "failed": failed,
-                    "errors": errors if failed > 0 else []
-                }
-            })
+                await hub.broadcast(user_id, {
+                    "type": "approval.result",
+                    "payload": {
+                        "department": department,
+                        "processed": processed,
+                        "failed": failed,
+                        "errors": errors if failed > 0 else []
+                    }
+                })
+            except Exception as notify_err:
+                logger.warning(f"{method} cache/broadcast failed: {notify_err}")
 
-            logger.info(
-                f"APPROVAL.send_apbookeeper_approvals complete "
-                f"processed={processed} failed={failed}"
-            )
+            logger.info(f"{method} complete processed={processed} failed={failed}")
 
             return {
                 "success": True,
-                "data": {"processed": processed, "failed": failed, "errors": errors}
+                "data": {"processed": processed, "failed": failed, "errors": errors, "results": results}
             }
 
         except Exception as e:
-            logger.error(f"APPROVAL.send_apbookeeper_approvals error: {e}", exc_info=True)
+            logger.error(f"{method} error: {e}", exc_info=True)
             return {
                 "success": False,
                 "error": {"code": "APPROVAL_SEND_ERROR", "message": str(e)}
             }
 
-
 # ============================================
 # WEBSOCKET EVENT HANDLERS
 # ============================================
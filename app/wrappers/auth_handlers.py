@@ -16,7 +16,7 @@ Events Handled:
     - auth.firebase_token: Verify Firebase ID token and create session
 
 Dependencies (Existing Services - DO NOT MODIFY):
-    - firebase_client.get_firebase_app(): Firebase Admin SDK
+    - firebase_token_verifier.get_token_verifier(): cached Firebase Admin SDK verification
     - redis_client.get_redis(): Redis connection
     - ws_events.WS_EVENTS: Event type constants
 
@@ -31,9 +31,8 @@ from typing import Dict, Any, Optional
 
 # Import existing services (READ-ONLY)
 import firebase_admin.auth
-from firebase_admin import auth as firebase_auth
 
-from ..firebase_client import get_firebase_app
+from ..firebase_token_verifier import get_token_verifier
 from ..redis_client import get_redis
 from ..ws_events import WS_EVENTS
 
@@ -98,14 +97,10 @@ async def handle_firebase_token(payload: Dict[str, Any]) -> Dict[str, Any]:
         # 2. Verify token using existing Firebase Admin SDK
         # clock_skew_seconds=5 allows for minor clock differences between client and server
         # This prevents "Token used too early" errors when clocks are slightly out of sync
+        # Verification runs off-loop and is cached per token until its exp
+        # (shared verifier, see app/firebase_token_verifier.py)
         try:
-            # Call existing Firebase service (READ-ONLY operation)
-            firebase_app = get_firebase_app()
-            decoded_token = firebase_auth.verify_id_token(
-                token,
-                app=firebase_app,
-                clock_skew_seconds=5  # Allow 5 seconds tolerance for clock skew
-            )
+            decoded_token = await get_token_verifier().verify(token)
 
             logger.info(f"[AUTH] Token verified successfully for uid={uid}")
 
@@ -347,11 +347,15 @@ async def handle_orchestrate_init(
     if target_company_id:
         logger.info(f"[ORCHESTRATION] Init with target_company_id={target_company_id}")
 
+    # Version of static data already held by the client (skip re-shipping it)
+    static_data_version = payload.get("static_data_version")
+
     # Start orchestration in background
     asyncio.create_task(
         _run_orchestration(
             uid, session_id, orchestration_id, user_data,
-            target_company_id=target_company_id
+            target_company_id=target_company_id,
+            static_data_version=static_data_version,
         )
     )
 
@@ -715,7 +719,8 @@ async def _run_orchestration(
     user_data: Dict[str, Any],
     skip_user_setup: bool = False,
     skip_company_phase: bool = False,
-    target_company_id: Optional[str] = None
+    target_company_id: Optional[str] = None,
+    static_data_version: Optional[str] = None,
 ):
     """
     Run the full orchestration sequence.
@@ -735,7 +740,8 @@ async def _run_orchestration(
             await _notify_phase_start(uid, "user_setup")
 
             user_setup_result = await _run_user_setup_phase(
-                uid, session_id, orchestration_id, user_data
+                uid, session_id, orchestration_id, user_data,
+                static_data_version=static_data_version,
             )
 
             if state_manager.is_cancelled(uid, session_id, orchestration_id):
@@ -904,7 +910,8 @@ async def _run_user_setup_phase(
     uid: str,
     session_id: str,
     orchestration_id: str,
-    user_data: Dict[str, Any]
+    user_data: Dict[str, Any],
+    static_data_version: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
     Phase 0: User setup - mirrors AuthState.process_post_authentication phases 1-3.
@@ -1064,13 +1071,20 @@ async def _run_user_setup_phase(
             from app.wrappers.static_data_handlers import get_static_data_handlers
 
             static_handlers = get_static_data_handlers()
-            static_result = await static_handlers.load_all_static_data()
+            static_result = await static_handlers.load_all_static_data(
+                client_version=static_data_version,
+            )
 
-            if static_result.get("success"):
-                # Broadcast static data to frontend
+            if static_result.get("not_modified"):
+                # Client store already holds this version: nothing to ship
+                logger.info(
+                    f"[ORCHESTRATION] Static data not modified (version={static_result.get('version')})"
+                )
+            elif static_result.get("success"):
+                # Broadcast static data to frontend (version = ETag for next login)
                 await hub.broadcast(uid, {
                     "type": WS_EVENTS.STATIC_DATA.LOADED,
-                    "payload": static_result.get("data", {})
+                    "payload": {**static_result.get("data", {}), "version": static_result.get("version")}
                 })
                 logger.info(
                     f"[ORCHESTRATION] Static data broadcasted: "
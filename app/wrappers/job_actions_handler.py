@@ -46,6 +46,7 @@ from ..realtime.contextual_publisher import (
 from ..realtime.pubsub_helper import publish_notification_new
 from ..active_job_manager import ActiveJobManager
 from ..redis_client import get_redis
+from ..llm_service.redis_namespaces import build_business_key
 from ..ws_events import WS_EVENTS
 from ..ws_hub import hub
 from ..domain_config import ListManager, get_domain_config
@@ -219,7 +220,7 @@ async def _apply_optimistic_list_change(
 
         # Get business cache
         redis = get_redis()
-        cache_key = f"business:{uid}:{company_id}:{domain}"
+        cache_key = build_business_key(uid, company_id, domain)
         cached = redis.get(cache_key)
 
         if not cached:
@@ -1372,7 +1373,7 @@ async def handle_job_delete(
             # 8b: Broadcast routing.item_update (cross-domain WSS notification)
             try:
                 redis_r = get_redis()
-                routing_cache_key = f"business:{uid}:{company_id}:routing"
+                routing_cache_key = build_business_key(uid, company_id, "routing")
                 routing_cached = redis_r.get(routing_cache_key)
                 routing_counts = {}
                 if routing_cached:
@@ -1402,7 +1403,7 @@ async def handle_job_delete(
             logger.info(f"[JOB_ACTIONS] → Step 9: Broadcasting item_update for delete...")
             try:
                 redis = get_redis()
-                cache_key = f"business:{uid}:{company_id}:{config['domain']}"
+                cache_key = build_business_key(uid, company_id, config['domain'])
                 cached = redis.get(cache_key)
                 counts = {}
                 if cached:
@@ -1566,7 +1567,7 @@ async def _get_documents_from_cache(
 
     try:
         redis = get_redis()
-        cache_key = f"business:{uid}:{company_id}:{domain}"
+        cache_key = build_business_key(uid, company_id, domain)
         cached = redis.get(cache_key)
 
         if not cached:
@@ -1959,9 +1960,6 @@ async def _delete_job_chat_threads(
 # RAG VECTOR CLEANUP
 # ============================================
 
-_RAG_QUEUE = "queue:llm_jobs"
-
-
 async def _dispatch_rag_delete(mandate_path: str, job_id: str) -> None:
     """
     Dispatch RAG vector cleanup for a deleted job (fire-and-forget).
@@ -1977,9 +1975,10 @@ async def _dispatch_rag_delete(mandate_path: str, job_id: str) -> None:
     file_ids = [job_id, f"journal_{job_id}", f"chat_{job_id}"]
 
     try:
-        redis = get_redis()
-        for file_id in file_ids:
-            payload = json.dumps({
+        from ..llm_service.llm_gateway import get_llm_gateway
+        # Un seul pipeline vers la lane background de la queue LLM
+        await get_llm_gateway().enqueue_jobs([
+            {
                 "job_id": f"rag_del_{uuid.uuid4().hex[:8]}",
                 "type": "rag_operation",
                 "params": {
@@ -1990,8 +1989,9 @@ async def _dispatch_rag_delete(mandate_path: str, job_id: str) -> None:
                     }
                 },
                 "queued_at": datetime.now(timezone.utc).isoformat(),
-            })
-            redis.lpush(_RAG_QUEUE, payload)
+            }
+            for file_id in file_ids
+        ])
 
         logger.debug(
             f"[JOB_ACTIONS] →   Step 3b: RAG delete dispatched for "
@@ -2173,7 +2173,7 @@ async def _update_cache_after_delete(
 
     try:
         redis = get_redis()
-        cache_key = f"business:{uid}:{company_id}:{domain}"
+        cache_key = build_business_key(uid, company_id, domain)
 
         # Get current cached data
         cached = redis.get(cache_key)
@@ -2430,7 +2430,7 @@ async def _add_to_routing_todo(
 
     try:
         redis = get_redis()
-        cache_key = f"business:{uid}:{company_id}:routing"
+        cache_key = build_business_key(uid, company_id, "routing")
 
         cached = redis.get(cache_key)
         if not cached:
@@ -2543,7 +2543,7 @@ async def _move_to_list_in_cache(
 
     try:
         redis = get_redis()
-        cache_key = f"business:{uid}:{company_id}:{domain}"
+        cache_key = build_business_key(uid, company_id, domain)
         cached = redis.get(cache_key)
         if not cached:
             return
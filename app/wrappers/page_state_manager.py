@@ -18,6 +18,13 @@ Redis Key Pattern:
 
 TTL: 30 minutes (PAGE_STATE_TTL)
 
+Invalidation (no KEYS/SCAN):
+    page_state_gen:{uid}             -> user generation, stamped into each state;
+                                        invalidate_all_for_user() is one INCR
+    page_state_index:{uid}:{company_id} -> SET of cached page names
+                                        (get_cached_pages listing)
+    A company-wide invalidation deletes the VALID_PAGES keys directly.
+
 Usage:
     # Save page state after orchestration
     manager = get_page_state_manager()
@@ -56,6 +63,9 @@ logger = logging.getLogger("page_state")
 
 PAGE_STATE_TTL = 1800  # 30 minutes
 PAGE_STATE_PREFIX = "page_state"
+PAGE_STATE_INDEX_PREFIX = "page_state_index"
+PAGE_STATE_GEN_PREFIX = "page_state_gen"
+PAGE_STATE_GEN_TTL = 604800  # 7 days (must outlive the states it validates)
 
 # Valid page names (for validation)
 VALID_PAGES = [
@@ -102,6 +112,18 @@ class PageStateManager:
         """Build Redis key for page state."""
         return f"{PAGE_STATE_PREFIX}:{uid}:{company_id}:{page}"
 
+    def _build_index_key(self, uid: str, company_id: str) -> str:
+        """Build Redis key for the set of pages cached for a company."""
+        return f"{PAGE_STATE_INDEX_PREFIX}:{uid}:{company_id}"
+
+    def _build_generation_key(self, uid: str) -> str:
+        """Build Redis key for the user's page state generation."""
+        return f"{PAGE_STATE_GEN_PREFIX}:{uid}"
+
+    @staticmethod
+    def _decode(raw) -> str:
+        return raw if isinstance(raw, str) else raw.decode()
+
     def _validate_page(self, page: str) -> bool:
         """Validate page name."""
         return page in VALID_PAGES
@@ -138,19 +160,26 @@ class PageStateManager:
             return False
 
         key = self._build_key(uid, company_id, page)
+        index_key = self._build_index_key(uid, company_id)
         now = datetime.now(timezone.utc)
 
-        state = {
-            "version": "1.0",
-            "page": page,
-            "company_id": company_id,
-            "mandate_path": mandate_path,
-            "loaded_at": now.isoformat(),
-            "data": data
-        }
-
         try:
-            self.redis.setex(key, ttl, json.dumps(state, default=str))
+            generation = int(self.redis.get(self._build_generation_key(uid)) or 0)
+            state = {
+                "version": "1.0",
+                "page": page,
+                "company_id": company_id,
+                "mandate_path": mandate_path,
+                "loaded_at": now.isoformat(),
+                "generation": generation,
+                "data": data
+            }
+
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.setex(key, ttl, json.dumps(state, default=str))
+            pipe.sadd(index_key, page)
+            pipe.expire(index_key, max(ttl, PAGE_STATE_TTL))
+            pipe.execute()
             logger.info(
                 f"[PAGE_STATE] Saved: page={page} uid={uid} "
                 f"company={company_id} ttl={ttl}s"
@@ -203,12 +232,15 @@ class PageStateManager:
         key = self._build_key(uid, company_id, page)
 
         try:
-            raw = self.redis.get(key)
+            raw, raw_generation = self.redis.mget(key, self._build_generation_key(uid))
             if not raw:
                 logger.info(f"[PAGE_STATE] Cache MISS: page={page} uid={uid} company={company_id}")
                 return None
 
-            state = json.loads(raw if isinstance(raw, str) else raw.decode())
+            state = json.loads(self._decode(raw))
+            if state.get("generation", 0) != int(raw_generation or 0):
+                logger.info(f"[PAGE_STATE] Cache STALE: page={page} uid={uid} company={company_id}")
+                return None
 
             logger.info(
                 f"[PAGE_STATE] Cache HIT: page={page} uid={uid} company={company_id} "
@@ -277,17 +309,13 @@ class PageStateManager:
                     f"deleted={deleted}"
                 )
             else:
-                # Invalidate all pages for this company
-                pattern = f"{PAGE_STATE_PREFIX}:{uid}:{company_id}:*"
-                keys = self.redis.keys(pattern)
-                if keys:
-                    deleted = self.redis.delete(*keys)
-                    logger.info(
-                        f"[PAGE_STATE] Invalidated ALL pages for company: uid={uid} "
-                        f"company={company_id} count={deleted}"
-                    )
-                else:
-                    logger.info(f"[PAGE_STATE] No pages to invalidate: uid={uid} company={company_id}")
+                # Invalidate all pages for this company (bounded key list, no KEYS)
+                keys = [self._build_key(uid, company_id, name) for name in VALID_PAGES]
+                deleted = self.redis.delete(*keys, self._build_index_key(uid, company_id))
+                logger.info(
+                    f"[PAGE_STATE] Invalidated ALL pages for company: uid={uid} "
+                    f"company={company_id} count={deleted}"
+                )
             return True
 
         except Exception as e:
@@ -298,16 +326,20 @@ class PageStateManager:
         """
         Invalidate all page states for all companies of a user.
         Use when user logs out or changes critical settings.
+
+        Bumps the user generation: existing states are ignored on read
+        and expire through their TTL.
         """
         try:
-            pattern = f"{PAGE_STATE_PREFIX}:{uid}:*"
-            keys = self.redis.keys(pattern)
-            if keys:
-                deleted = self.redis.delete(*keys)
-                logger.info(
-                    f"[PAGE_STATE] Invalidated ALL for user: uid={uid} "
-                    f"count={deleted}"
-                )
+            generation_key = self._build_generation_key(uid)
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.incr(generation_key)
+            pipe.expire(generation_key, PAGE_STATE_GEN_TTL)
+            generation, _ = pipe.execute()
+            logger.info(
+                f"[PAGE_STATE] Invalidated ALL for user: uid={uid} "
+                f"generation={generation}"
+            )
             return True
         except Exception as e:
             logger.error(f"[PAGE_STATE] Invalidate all error: {e}", exc_info=True)
@@ -320,15 +352,23 @@ class PageStateManager:
     def get_cached_pages(self, uid: str, company_id: str) -> List[str]:
         """Get list of pages currently cached for a company."""
         try:
-            pattern = f"{PAGE_STATE_PREFIX}:{uid}:{company_id}:*"
-            keys = self.redis.keys(pattern)
-            pages = []
-            for key in keys:
-                key_str = key if isinstance(key, str) else key.decode()
-                # Extract page name from key
-                parts = key_str.split(":")
-                if len(parts) >= 4:
-                    pages.append(parts[3])
+            index_key = self._build_index_key(uid, company_id)
+            candidates = sorted(self._decode(name) for name in self.redis.smembers(index_key))
+            if not candidates:
+                return []
+
+            keys = [self._build_key(uid, company_id, name) for name in candidates]
+            *states, raw_generation = self.redis.mget(*keys, self._build_generation_key(uid))
+            generation = int(raw_generation or 0)
+
+            pages, expired = [], []
+            for name, raw in zip(candidates, states):
+                if raw and json.loads(self._decode(raw)).get("generation", 0) == generation:
+                    pages.append(name)
+                elif not raw:
+                    expired.append(name)
+            if expired:
+                self.redis.srem(index_key, *expired)
             return pages
         except Exception as e:
             logger.error(f"[PAGE_STATE] Get cached pages error: {e}")
@@ -344,8 +384,8 @@ class PageStateManager:
         """Extend TTL of existing page state without modifying data."""
         try:
             key = self._build_key(uid, company_id, page)
-            if self.redis.exists(key):
-                self.redis.expire(key, ttl)
+            if self.redis.expire(key, ttl):
+                self.redis.expire(self._build_index_key(uid, company_id), max(ttl, PAGE_STATE_TTL))
                 logger.debug(f"[PAGE_STATE] Extended TTL: page={page}")
                 return True
             return False
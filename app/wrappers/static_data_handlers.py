@@ -25,15 +25,17 @@ Events Handled:
     - static_data.refresh: Force refresh cached data
 
 Cache Strategy:
-    - Backend: Redis cache with 24h TTL (static data rarely changes)
-    - Frontend: Zustand store (permanent until app reload)
+    - Backend: global reference-data tier (app.cache.reference_data):
+      process memory, Redis as shared layer (24h TTL), content version (ETag)
+    - Frontend: Zustand store (permanent until app reload). A client that
+      sends its version receives {"not_modified": True, "version"} instead
+      of the full payload
 
 Author: Lead Migration Architect
 Created: 2026-01-22
 """
 
 import asyncio
-import json
 import logging
 from typing import Any, Dict, List, Optional
 
@@ -51,7 +53,10 @@ logger = logging.getLogger("static_data.handlers")
 
 # Redis cache TTL: 24 hours (static data rarely changes)
 STATIC_DATA_CACHE_TTL = 86400
-STATIC_DATA_CACHE_KEY = "static_data:global"
+# Versioned envelope {version, data, built_at}. Distinct from the legacy
+# "static_data:global" key (raw data) so processes still running the previous
+# release never read an envelope as reference data during a rolling deploy.
+STATIC_DATA_CACHE_KEY = "static_data:global:v2"
 
 
 # ============================================
@@ -101,21 +106,25 @@ class StaticDataHandlers:
 
     async def load_all_static_data(
         self,
-        force_refresh: bool = False
+        force_refresh: bool = False,
+        client_version: Optional[str] = None,
     ) -> Dict[str, Any]:
         """
         Load all static data for dropdowns.
 
         This is called during Phase 0 (user_setup) of orchestration.
-        Data is cached in Redis for 24 hours.
+        Data is served from the global reference-data tier (memory, then
+        Redis with 24h TTL, then Firebase).
 
         Args:
             force_refresh: If True, bypass cache and fetch fresh data
+            client_version: Version already held by the client (ETag)
 
         Returns:
             Dict containing all static data:
             {
                 "success": True,
+                "version": "3f2a...",
                 "data": {
                     "languages": [...],
                     "countries": [...],
@@ -127,97 +136,33 @@ class StaticDataHandlers:
                     "emailTypes": [...]
                 }
             }
+            or, when client_version is current:
+            {"success": True, "not_modified": True, "version": "3f2a..."}
         """
         try:
-            # Check cache first (unless force refresh)
-            if not force_refresh:
-                cached = self.redis.get(STATIC_DATA_CACHE_KEY)
-                if cached:
-                    data = json.loads(cached if isinstance(cached, str) else cached.decode())
-                    logger.info("[STATIC_DATA] Returning cached data")
-                    return {
-                        "success": True,
-                        "data": data,
-                        "from_cache": True
-                    }
-
-            logger.info("[STATIC_DATA] Fetching fresh data from Firebase...")
-
-            # Fetch all data in parallel using asyncio.to_thread (non-blocking)
-            languages_task = asyncio.to_thread(self._load_languages)
-            countries_task = asyncio.to_thread(self._load_countries)
-            erps_task = asyncio.to_thread(self._load_erps)
-            dms_task = asyncio.to_thread(self._load_dms)
-            currencies_task = asyncio.to_thread(self._load_currencies)
-            communication_task = asyncio.to_thread(self._load_communication_types)
-            email_task = asyncio.to_thread(self._load_email_types)
-
-            # Wait for all tasks
-            results = await asyncio.gather(
-                languages_task,
-                countries_task,
-                erps_task,
-                dms_task,
-                currencies_task,
-                communication_task,
-                email_task,
-                return_exceptions=True
-            )
-
-            # Unpack results
-            languages = results[0] if not isinstance(results[0], Exception) else []
-            countries_data = results[1] if not isinstance(results[1], Exception) else ({}, [])
-            erps = results[2] if not isinstance(results[2], Exception) else []
-            dms = results[3] if not isinstance(results[3], Exception) else []
-            currencies = results[4] if not isinstance(results[4], Exception) else []
-            communication_types = results[5] if not isinstance(results[5], Exception) else []
-            email_types = results[6] if not isinstance(results[6], Exception) else []
-
-            # countries_data is a tuple (country_id_map, countries_list)
-            country_id_map, countries_list = countries_data
-
-            # Load legal forms for all countries
-            legal_forms = await asyncio.to_thread(
-                self._load_all_legal_forms,
-                countries_list,
-                country_id_map
-            )
+            from ..cache.reference_data import get_reference_data_store
 
-            # Build response data
-            data = {
-                "languages": languages,
-                "countries": countries_list,
-                "countryIdMap": country_id_map,  # Needed for legal forms lookup
-                "legalForms": legal_forms,  # Map: country_name -> [forms]
-                "erps": erps,
-                "dms": dms,
-                "currencies": currencies,
-                "communicationTypes": communication_types,
-                "emailTypes": email_types
-            }
-
-            # Cache in Redis
-            self.redis.setex(
+            result = await get_reference_data_store().get(
                 STATIC_DATA_CACHE_KEY,
-                STATIC_DATA_CACHE_TTL,
-                json.dumps(data)
+                self._fetch_static_data,
+                ttl=STATIC_DATA_CACHE_TTL,
+                client_version=client_version,
+                force_refresh=force_refresh,
             )
 
-            logger.info(
-                f"[STATIC_DATA] Loaded: "
-                f"languages={len(languages)}, "
-                f"countries={len(countries_list)}, "
-                f"erps={len(erps)}, "
-                f"dms={len(dms)}, "
-                f"currencies={len(currencies)}, "
-                f"communicationTypes={len(communication_types)}, "
-                f"emailTypes={len(email_types)}"
-            )
+            if result.not_modified:
+                logger.info(f"[STATIC_DATA] Not modified (version={result.version})")
+                return {
+                    "success": True,
+                    "not_modified": True,
+                    "version": result.version,
+                }
 
             return {
                 "success": True,
-                "data": data,
-                "from_cache": False
+                "data": result.data,
+                "version": result.version,
+                "from_cache": result.source != "loader",
             }
 
         except Exception as e:
@@ -227,6 +172,64 @@ class StaticDataHandlers:
                 "error": str(e)
             }
 
+    async def _fetch_static_data(self) -> Dict[str, Any]:
+        """Fetch all static data from Firebase (parallel, non-blocking)."""
+        logger.info("[STATIC_DATA] Fetching fresh data from Firebase...")
+
+        # Fetch all data in parallel using asyncio.to_thread (non-blocking)
+        results = await asyncio.gather(
+            asyncio.to_thread(self._load_languages),
+            asyncio.to_thread(self._load_countries),
+            asyncio.to_thread(self._load_erps),
+            asyncio.to_thread(self._load_dms),
+            asyncio.to_thread(self._load_currencies),
+            asyncio.to_thread(self._load_communication_types),
+            asyncio.to_thread(self._load_email_types),
+            return_exceptions=True
+        )
+
+        # Unpack results
+        languages = results[0] if not isinstance(results[0], Exception) else []
+        countries_data = results[1] if not isinstance(results[1], Exception) else ({}, [])
+        erps = results[2] if not isinstance(results[2], Exception) else []
+        dms = results[3] if not isinstance(results[3], Exception) else []
+        currencies = results[4] if not isinstance(results[4], Exception) else []
+        communication_types = results[5] if not isinstance(results[5], Exception) else []
+        email_types = results[6] if not isinstance(results[6], Exception) else []
+
+        # countries_data is a tuple (country_id_map, countries_list)
+        country_id_map, countries_list = countries_data
+
+        # Load legal forms for all countries
+        legal_forms = await asyncio.to_thread(
+            self._load_all_legal_forms,
+            countries_list,
+            country_id_map
+        )
+
+        logger.info(
+            f"[STATIC_DATA] Loaded: "
+            f"languages={len(languages)}, "
+            f"countries={len(countries_list)}, "
+            f"erps={len(erps)}, "
+            f"dms={len(dms)}, "
+            f"currencies={len(currencies)}, "
+            f"communicationTypes={len(communication_types)}, "
+            f"emailTypes={len(email_types)}"
+        )
+
+        return {
+            "languages": languages,
+            "countries": countries_list,
+            "countryIdMap": country_id_map,  # Needed for legal forms lookup
+            "legalForms": legal_forms,  # Map: country_name -> [forms]
+            "erps": erps,
+            "dms": dms,
+            "currencies": currencies,
+            "communicationTypes": communication_types,
+            "emailTypes": email_types
+        }
+
     def _load_languages(self) -> List[Dict[str, Any]]:
         """Load languages from Firebase."""
         try:
@@ -438,7 +441,7 @@ async def handle_static_data_load(
     Args:
         uid: Firebase user ID
         session_id: WebSocket session ID
-        payload: Optional payload (can include force_refresh flag)
+        payload: Optional payload (force_refresh flag, version held by the client)
 
     Returns:
         Response dict with static data
@@ -448,7 +451,10 @@ async def handle_static_data_load(
     handlers = get_static_data_handlers()
     force_refresh = payload.get("force_refresh", False)
 
-    result = await handlers.load_all_static_data(force_refresh=force_refresh)
+    result = await handlers.load_all_static_data(
+        force_refresh=force_refresh,
+        client_version=payload.get("version"),
+    )
 
     # Broadcast to user
     await hub.broadcast(uid, {
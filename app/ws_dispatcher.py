@@ -0,0 +1,306 @@
+"""
+Dispatcher des messages WebSocket entrants (/ws).
+
+Remplace la chaîne if/elif de websocket_endpoint par une table de routage:
+chaque type de message est associé à un handler et à une classe de concurrence.
+
+Classes de concurrence:
+    - SERIAL          : exécuté dans l'ordre d'arrivée au sein de sa "lane"
+                        (lane déclarée + thread_key du payload). Deux lanes
+                        différentes s'exécutent en parallèle.
+    - PARALLEL        : exécuté dès qu'un slot est disponible, sans ordre garanti.
+                        Avec une lane déclarée, attend d'abord la tâche SERIAL
+                        en attente de cette lane (barrière), sans s'y inscrire:
+                        les lectures restent parallèles entre elles mais voient
+                        l'état écrit par la lane (ex: changement de société).
+    - FIRE_AND_FORGET : tâche détachée de la connexion (non annulée à la
+                        déconnexion, hors sémaphore). Pour les mutations qui
+                        ne doivent pas être interrompues (suppression, process...).
+
+Barrière: quelle que soit sa classe, une route peut déclarer une lane
+"barrière" (barrier) dont elle attend la tâche SERIAL en attente avant de
+démarrer, sans s'y inscrire (ex: toute route dépendant de la société active
+attend un dashboard.company_change en cours). Le routeur peut fournir une
+barrière par défaut par type de message (barrier_for).
+
+Les handlers SERIAL / PARALLEL tournent comme tâches asyncio sous un sémaphore
+borné par connexion, et sont annulés à la déconnexion. La boucle de réception
+n'attend donc plus jamais un handler lent (orchestration, Drive, ERP...).
+
+Les latences et profondeurs de file par type sont exposées via ws_metrics
+(endpoint /ws-metrics). Les tâches sont nommées ws:{msg_type}: le moniteur de
+boucle (loop_monitor) attribue ainsi blocages et appels bloquants au handler.
+"""
+
+import asyncio
+import importlib
+import logging
+import os
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+import json as _json
+
+from .ws_metrics import get_ws_dispatch_metrics
+
+logger = logging.getLogger("listeners.ws_dispatcher")
+
+
+class WSConcurrency(Enum):
+    """Classe de concurrence d'un type de message WebSocket."""
+    SERIAL = "serial"
+    PARALLEL = "parallel"
+    FIRE_AND_FORGET = "fire_and_forget"
+
+
+@dataclass
+class WSContext:
+    """Contexte de connexion passé à chaque handler."""
+    ws: Any
+    uid: str
+    session_id: str
+    msg_type: str = ""
+
+    async def send(self, response: Dict[str, Any]) -> None:
+        """Envoie une réponse JSON sur cette connexion."""
+        await self.ws.send_text(_json.dumps(response))
+
+
+WSHandler = Callable[[WSContext, Dict[str, Any]], Awaitable[None]]
+
+
+@dataclass(frozen=True)
+class WSRoute:
+    """Entrée de la table de routage."""
+    msg_type: str
+    handler: WSHandler
+    concurrency: WSConcurrency = WSConcurrency.SERIAL
+    lane: Optional[str] = None
+    barrier: Optional[str] = None
+
+    @property
+    def barrier_lane(self) -> Optional[str]:
+        """Lane attendue avant de démarrer (une lane sur une route PARALLEL est une barrière)."""
+        if self.barrier:
+            return self.barrier
+        return self.lane if self.concurrency is WSConcurrency.PARALLEL else None
+
+    def lane_key(self, payload: Dict[str, Any]) -> str:
+        """Clé d'ordonnancement SERIAL: lane (défaut: domaine) + thread éventuel."""
+        lane = self.lane or self.msg_type.split(".", 1)[0]
+        thread_key = payload.get("thread_key") if isinstance(payload, dict) else None
+        return f"{lane}:{thread_key}" if thread_key else lane
+
+
+class WSMessageRouter:
+    """
+    Table de routage msg_type → WSRoute.
+
+    barrier_for(msg_type) donne la barrière par défaut des routes qui n'en
+    déclarent pas (None = aucune).
+    """
+
+    def __init__(self, barrier_for: Optional[Callable[[str], Optional[str]]] = None) -> None:
+        self._routes: Dict[str, WSRoute] = {}
+        self._barrier_for = barrier_for
+
+    def add(
+        self,
+        msg_type: str,
+        handler: WSHandler,
+        concurrency: WSConcurrency = WSConcurrency.SERIAL,
+        lane: Optional[str] = None,
+        barrier: Optional[str] = None,
+    ) -> None:
+        """Enregistre un handler pour un type de message."""
+        if msg_type in self._routes:
+            raise ValueError(f"WS route already registered: {msg_type}")
+        if barrier is None and self._barrier_for is not None:
+            barrier = self._barrier_for(msg_type)
+        self._routes[msg_type] = WSRoute(msg_type, handler, concurrency, lane, barrier)
+
+    def route(
+        self,
+        *msg_types: str,
+        concurrency: WSConcurrency = WSConcurrency.SERIAL,
+        lane: Optional[str] = None,
+        barrier: Optional[str] = None,
+    ) -> Callable[[WSHandler], WSHandler]:
+        """Décorateur: enregistre le handler pour un ou plusieurs types."""
+        def decorator(handler: WSHandler) -> WSHandler:
+            for msg_type in msg_types:
+                self.add(msg_type, handler, concurrency, lane, barrier)
+            return handler
+        return decorator
+
+    def add_lazy(
+        self,
+        msg_type: str,
+        module: str,
+        attr: str,
+        reply: bool = False,
+        concurrency: WSConcurrency = WSConcurrency.SERIAL,
+        lane: Optional[str] = None,
+        barrier: Optional[str] = None,
+        package: str = __package__,
+    ) -> None:
+        """
+        Enregistre un handler standard `attr(uid=, session_id=, payload=)`.
+
+        Le module est importé au premier message (import paresseux, comme
+        l'ancienne chaîne if/elif). Si reply=True, la valeur retournée est
+        renvoyée au client sur la connexion.
+        """
+        async def _lazy_handler(ctx: WSContext, payload: Dict[str, Any]) -> None:
+            func = getattr(importlib.import_module(module, package=package), attr)
+            response = await func(uid=ctx.uid, session_id=ctx.session_id, payload=payload)
+            if reply:
+                await ctx.send(response)
+            logger.info(f"[WS] {ctx.msg_type} handled - uid={ctx.uid}")
+
+        _lazy_handler.__name__ = attr
+        self.add(msg_type, _lazy_handler, concurrency, lane, barrier)
+
+    def get(self, msg_type: Optional[str]) -> Optional[WSRoute]:
+        return self._routes.get(msg_type) if msg_type else None
+
+    def __contains__(self, msg_type: str) -> bool:
+        return msg_type in self._routes
+
+    def __len__(self) -> int:
+        return len(self._routes)
+
+
+# Tâches FIRE_AND_FORGET en cours (références fortes pour éviter le GC)
+_detached_tasks: Set[asyncio.Task] = set()
+
+
+class WSConnectionDispatcher:
+    """
+    Ordonnanceur des messages d'UNE connexion WebSocket.
+
+    dispatch() ne bloque jamais la boucle de réception: chaque message
+    devient une tâche, ordonnée selon la classe de concurrence de sa route.
+    """
+
+    DEFAULT_MAX_CONCURRENCY = 8
+
+    def __init__(
+        self,
+        router: WSMessageRouter,
+        ctx: WSContext,
+        max_concurrency: Optional[int] = None,
+    ) -> None:
+        if max_concurrency is None:
+            try:
+                max_concurrency = int(os.getenv("WS_MAX_CONCURRENT_HANDLERS", self.DEFAULT_MAX_CONCURRENCY))
+            except ValueError:
+                max_concurrency = self.DEFAULT_MAX_CONCURRENCY
+        self._router = router
+        self._ctx = ctx
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self._tasks: Set[asyncio.Task] = set()
+        self._lane_tails: Dict[str, asyncio.Task] = {}
+        self._metrics = get_ws_dispatch_metrics()
+        self._closed = False
+
+    @property
+    def pending_count(self) -> int:
+        """Nombre de handlers attachés à la connexion (en cours ou en attente)."""
+        return len(self._tasks)
+
+    def dispatch(self, msg_type: Optional[str], payload: Dict[str, Any]) -> bool:
+        """
+        Planifie le traitement d'un message.
+
+        Returns:
+            False si le type de message n'est pas routé
+        """
+        route = self._router.get(msg_type)
+        if route is None or self._closed:
+            return False
+
+        ctx = WSContext(ws=self._ctx.ws, uid=self._ctx.uid, session_id=self._ctx.session_id, msg_type=msg_type)
+        self._metrics.record_queued(msg_type)
+        barrier = self._lane_tails.get(route.barrier_lane) if route.barrier_lane else None
+
+        if route.concurrency is WSConcurrency.FIRE_AND_FORGET:
+            task = asyncio.create_task(
+                self._run(route, ctx, payload, after=(barrier,), use_semaphore=False), name=f"ws:{msg_type}"
+            )
+            _detached_tasks.add(task)
+            task.add_done_callback(_detached_tasks.discard)
+            return True
+
+        if route.concurrency is WSConcurrency.SERIAL:
+            key = route.lane_key(payload)
+            previous = self._lane_tails.get(key)
+            task = asyncio.create_task(self._run(route, ctx, payload, after=(previous, barrier)), name=f"ws:{msg_type}")
+            self._lane_tails[key] = task
+            task.add_done_callback(lambda t, k=key: self._release_lane(k, t))
+        else:
+            task = asyncio.create_task(self._run(route, ctx, payload, after=(barrier,)), name=f"ws:{msg_type}")
+
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+
+    def _release_lane(self, key: str, task: asyncio.Task) -> None:
+        if self._lane_tails.get(key) is task:
+            del self._lane_tails[key]
+
+    async def _run(
+        self,
+        route: WSRoute,
+        ctx: WSContext,
+        payload: Dict[str, Any],
+        after: Tuple[Optional[asyncio.Task], ...] = (),
+        use_semaphore: bool = True,
+    ) -> None:
+        msg_type = route.msg_type
+        queued_at = time.perf_counter()
+        started = False
+        try:
+            pending = {t for t in after if t is not None and not t.done()}
+            if pending:
+                # Ordre préservé dans la lane / derrière la barrière
+                # (les erreurs des tâches attendues sont ignorées)
+                await asyncio.wait(pending)
+            if use_semaphore:
+                await self._semaphore.acquire()
+            started = True
+            self._metrics.record_started(msg_type, (time.perf_counter() - queued_at) * 1000)
+            t0 = time.perf_counter()
+            ok = cancelled = False
+            try:
+                await route.handler(ctx, payload)
+                ok = True
+            except asyncio.CancelledError:
+                cancelled = True
+                raise
+            except Exception as e:
+                logger.error(
+                    f"[WS] Handler error - uid={ctx.uid} type={msg_type} error={e}",
+                    exc_info=True
+                )
+            finally:
+                if use_semaphore:
+                    self._semaphore.release()
+                self._metrics.record_finished(
+                    msg_type, (time.perf_counter() - t0) * 1000, ok, cancelled=cancelled
+                )
+        finally:
+            if not started:
+                self._metrics.record_dropped(msg_type)
+
+    async def close(self) -> None:
+        """Annule les handlers attachés à la connexion (déconnexion)."""
+        self._closed = True
+        tasks = list(self._tasks)
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._lane_tails.clear()
@@ -193,10 +193,11 @@ class WebSocketHub:
             
             if thread_key:
                 # Buffering du message dans Redis pour replay après reconnexion
+                # (écriture regroupée en pipeline, voir ws_message_buffer)
                 try:
                     from .ws_message_buffer import get_message_buffer
                     buffer = get_message_buffer()
-                    buffer.store_pending_message(uid, thread_key, message)
+                    buffer.buffer_message(uid, thread_key, message, data=data)
                     self._logger.info(
                         "ws_broadcast_buffered uid=%s thread=%s type=%s (no_active_connection)", 
                         uid, thread_key, msg_type
@@ -226,17 +227,7 @@ class WebSocketHub:
 
         # Nettoyer les connexions mortes et bufferiser si plus aucune connexion active
         if dead_conns:
-            async with self._lock:
-                uid_conns = self._uid_to_conns.get(uid)
-                if uid_conns:
-                    for dead_ws in dead_conns:
-                        uid_conns.discard(dead_ws)
-                    if not uid_conns:
-                        self._uid_to_conns.pop(uid, None)
-            self._logger.warning(
-                "ws_dead_connections_cleaned uid=%s removed=%s remaining=%s",
-                uid, len(dead_conns), sent_count
-            )
+            await self._drop_dead_connections(uid, dead_conns, sent_count)
             # Si aucun envoi n'a réussi, bufferiser les messages critiques
             if sent_count == 0:
                 thread_key = None
@@ -249,7 +240,7 @@ class WebSocketHub:
                     try:
                         from .ws_message_buffer import get_message_buffer
                         buffer = get_message_buffer()
-                        buffer.store_pending_message(uid, thread_key, message)
+                        buffer.buffer_message(uid, thread_key, message, data=data)
                         self._logger.info(
                             "ws_broadcast_buffered_after_failure uid=%s thread=%s type=%s",
                             uid, thread_key, msg_type
@@ -269,6 +260,44 @@ class WebSocketHub:
         else:
             self._logger.info("ws_broadcast uid=%s type=%s channel=%s connections=%s", uid, msg_type, channel, sent_count)
 
+    async def _drop_dead_connections(self, uid: str, dead_conns: list, sent_count: int) -> None:
+        async with self._lock:
+            uid_conns = self._uid_to_conns.get(uid)
+            if uid_conns:
+                for dead_ws in dead_conns:
+                    uid_conns.discard(dead_ws)
+                if not uid_conns:
+                    self._uid_to_conns.pop(uid, None)
+        self._logger.warning(
+            "ws_dead_connections_cleaned uid=%s removed=%s remaining=%s",
+            uid, len(dead_conns), sent_count
+        )
+
+    async def send_text_to_user(self, uid: str, data: str) -> int:
+        """
+        Send an already-encoded JSON text frame to every connection of uid.
+
+        No type normalization, sanitizing or offline buffering: used by the
+        stream relay (realtime.stream_relay), which handles those itself.
+        data must be strict JSON (no NaN / Infinity tokens).
+        Returns the number of connections that received the frame.
+        """
+        async with self._lock:
+            conns = list(self._uid_to_conns.get(uid, set()))
+
+        sent_count = 0
+        dead_conns = []
+        for ws in conns:
+            try:
+                await ws.send_text(data)
+                sent_count += 1
+            except Exception as e:
+                self._logger.error("ws_send_error uid=%s error=%s", uid, repr(e))
+                dead_conns.append(ws)
+        if dead_conns:
+            await self._drop_dead_connections(uid, dead_conns, sent_count)
+        return sent_count
+
     async def send_to_user(self, uid: str, message: dict) -> None:
         """Alias for broadcast — sends message to all WS connections for a user."""
         await self.broadcast(uid, message)
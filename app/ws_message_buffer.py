@@ -3,19 +3,62 @@ Buffer Redis pour stocker temporairement les messages WebSocket en attente.
 
 Ce module gère le problème de timing où les messages d'intermédiation sont envoyés
 avant que le WebSocket spécifique du chat soit connecté.
+
+Stockage: un Redis Stream par utilisateur (pending_ws_messages:{uid}), borné
+par MAXLEN. Chaque entrée porte le thread_key et le message JSON. L'ID de
+l'entrée est exposé au client (champ "buffer_id") lors du replay:
+    - le client acquitte le dernier ID reçu (ws.ack → acknowledge)
+    - à la reconnexion, seule la queue manquée est rejouée (un seul XRANGE),
+      quelle que soit l'instance qui accepte la connexion.
+
+Les écritures depuis WebSocketHub.broadcast sont regroupées (buffer_message):
+une rafale de messages pendant une reconnexion donne un seul pipeline
+(XADD... + EXPIRE) au lieu d'un RPUSH + EXPIRE par message. Un flush en
+cours (thread de l'executor) et un replay sont sérialisés: le replay
+attend que le lot en vol soit écrit avant de lire le stream, puis ne
+rejoue que les entrées postérieures au dernier ack.
 """
 
+import asyncio
 import json
 import logging
-from typing import List, Dict, Any, Optional
-from datetime import timedelta
+import threading
+from typing import List, Dict, Any, Optional, Tuple
 
 
 logger = logging.getLogger("ws.buffer")
 
 
+def _parse_stream_id(stream_id: Optional[str]) -> Tuple[int, int]:
+    """Convertit un ID de stream "ms-seq" en tuple comparable."""
+    if not stream_id:
+        return (0, 0)
+    try:
+        ms, _, seq = str(stream_id).partition("-")
+        return (int(ms), int(seq or 0))
+    except ValueError:
+        return (0, 0)
+
+
+def _next_stream_id(stream_id: Optional[str]) -> str:
+    """Plus petit ID strictement postérieur (borne exclusive pour XRANGE)."""
+    if not stream_id:
+        return "-"
+    ms, seq = _parse_stream_id(stream_id)
+    return f"{ms}-{seq + 1}"
+
+
 class WebSocketMessageBuffer:
-    """Gère le buffering de messages WebSocket dans Redis."""
+    """Gère le buffering de messages WebSocket dans Redis (Streams)."""
+    
+    # Nombre max d'entrées conservées par utilisateur (trim MAXLEN ~)
+    MAX_LEN = 500
+    # Délai de regroupement des écritures issues de broadcast (secondes)
+    FLUSH_DELAY = 0.02
+    # Taille de lot déclenchant un flush immédiat
+    MAX_BATCH = 200
+    # Entrées lues par XRANGE lors d'une vérification has_pending_messages
+    SCAN_COUNT = 50
     
     def __init__(self, redis_client=None):
         """
@@ -28,6 +71,13 @@ class WebSocketMessageBuffer:
         # ⭐ AUGMENTÉ: TTL passé de 30s à 300s (5 minutes)
         # Permet de gérer les traitements longs comme l'onboarding
         self.ttl_seconds = 300  # TTL pour les messages bufferisés
+        
+        # Lot d'écritures en attente: [(user_id, thread_key, message_json)]
+        self._batch: List[Tuple[str, str, str]] = []
+        self._batch_lock = threading.Lock()
+        self._flush_scheduled = False
+        # Tenu pendant l'écriture d'un lot: une lecture qui flush attend le lot en vol
+        self._flush_lock = threading.Lock()
     
     def _get_redis_client(self):
         """Récupère le client Redis (lazy loading)."""
@@ -36,18 +86,44 @@ class WebSocketMessageBuffer:
             self._redis_client = get_redis()
         return self._redis_client
     
-    def _generate_key(self, user_id: str, thread_key: str) -> str:
+    def _generate_key(self, user_id: str) -> str:
         """
-        Génère la clé Redis pour stocker les messages bufferisés.
+        Génère la clé du stream des messages bufferisés d'un utilisateur.
         
-        Args:
-            user_id: ID de l'utilisateur
-            thread_key: Clé du thread de chat
-            
         Returns:
-            Clé Redis au format: pending_ws_messages:{user_id}:{thread_key}
+            Clé Redis au format: pending_ws_messages:{user_id}
         """
-        return f"pending_ws_messages:{user_id}:{thread_key}"
+        from .llm_service.redis_namespaces import build_ws_stream_key
+        return build_ws_stream_key(user_id)
+    
+    def _generate_ack_key(self, user_id: str) -> str:
+        """Clé du dernier ID acquitté par le client."""
+        from .llm_service.redis_namespaces import build_ws_ack_key
+        return build_ws_ack_key(user_id)
+    
+    # ═══════════════════════════════════════════════════════════════
+    # ÉCRITURE
+    # ═══════════════════════════════════════════════════════════════
+    
+    def _write_entries(self, entries: List[Tuple[str, str, str]]) -> List[str]:
+        """Écrit un lot d'entrées en un seul pipeline (XADD + EXPIRE par stream)."""
+        redis_client = self._get_redis_client()
+        pipe = redis_client.pipeline(transaction=False)
+        user_ids = []
+        for user_id, thread_key, message_json in entries:
+            pipe.xadd(
+                self._generate_key(user_id),
+                {"thread": thread_key, "data": message_json},
+                maxlen=self.MAX_LEN,
+                approximate=True,
+            )
+            if user_id not in user_ids:
+                user_ids.append(user_id)
+        for user_id in user_ids:
+            pipe.expire(self._generate_key(user_id), self.ttl_seconds)
+            pipe.expire(self._generate_ack_key(user_id), self.ttl_seconds)
+        results = pipe.execute()
+        return [str(r) for r in results[:len(entries)]]
     
     def store_pending_message(
         self,
@@ -56,28 +132,18 @@ class WebSocketMessageBuffer:
         message: Dict[str, Any]
     ) -> bool:
         """
-        Stocke un message WebSocket en attente dans Redis.
+        Stocke un message WebSocket en attente dans Redis (écriture immédiate).
         
         Args:
             user_id: ID de l'utilisateur
             thread_key: Clé du thread de chat
             message: Message WebSocket à stocker (format hub.broadcast)
-            
+        
         Returns:
             True si succès, False sinon
         """
         try:
-            redis_client = self._get_redis_client()
-            key = self._generate_key(user_id, thread_key)
-            
-            # Sérialiser le message en JSON
-            message_json = json.dumps(message)
-            
-            # Ajouter le message à une liste Redis (RPUSH)
-            redis_client.rpush(key, message_json)
-            
-            # Définir le TTL (expire après 30 secondes)
-            redis_client.expire(key, self.ttl_seconds)
+            self._write_entries([(user_id, thread_key, json.dumps(message))])
             
             message_type = message.get("type", "unknown")
             logger.info(
@@ -86,7 +152,7 @@ class WebSocketMessageBuffer:
             )
             
             return True
-            
+        
         except Exception as e:
             logger.error(
                 f"[WS_BUFFER] ❌ Erreur stockage message - "
@@ -95,6 +161,175 @@ class WebSocketMessageBuffer:
             )
             return False
     
+    # Alias utilisé par le callback HR
+    add_message = store_pending_message
+    
+    def buffer_message(
+        self,
+        user_id: str,
+        thread_key: str,
+        message: Dict[str, Any],
+        data: Optional[str] = None
+    ) -> None:
+        """
+        Ajoute un message au lot d'écriture (non bloquant depuis la loop).
+        
+        Le lot est écrit en un seul pipeline après FLUSH_DELAY (ou dès
+        MAX_BATCH messages). Hors event loop, l'écriture est immédiate.
+        
+        Args:
+            data: Message déjà sérialisé (évite un second json.dumps)
+        """
+        message_json = data if data is not None else json.dumps(message)
+        with self._batch_lock:
+            self._batch.append((user_id, thread_key, message_json))
+            batch_full = len(self._batch) >= self.MAX_BATCH
+            should_schedule = not self._flush_scheduled
+            if should_schedule:
+                self._flush_scheduled = True
+        
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        
+        if batch_full:
+            loop.run_in_executor(None, self.flush)
+        elif should_schedule:
+            loop.call_later(self.FLUSH_DELAY, lambda: loop.run_in_executor(None, self.flush))
+    
+    def flush(self) -> int:
+        """
+        Écrit le lot en attente dans Redis.
+        
+        Les appels sont sérialisés: au retour, tout lot pris par un autre
+        flush (executor) est aussi écrit, ce qui garantit qu'un replay lit
+        toutes les entrées bufferisées avant lui.
+        
+        Returns:
+            Nombre de messages écrits
+        """
+        with self._flush_lock:
+            with self._batch_lock:
+                entries, self._batch = self._batch, []
+                self._flush_scheduled = False
+            if not entries:
+                return 0
+            try:
+                self._write_entries(entries)
+                logger.info(
+                    f"[WS_BUFFER] 📦 Lot bufferisé - count={len(entries)} "
+                    f"users={len({e[0] for e in entries})}"
+                )
+                return len(entries)
+            except Exception as e:
+                logger.error(
+                    f"[WS_BUFFER] ❌ Erreur écriture lot - count={len(entries)} error={e}",
+                    exc_info=True
+                )
+                return 0
+    
+    # ═══════════════════════════════════════════════════════════════
+    # LECTURE / REPLAY
+    # ═══════════════════════════════════════════════════════════════
+    
+    @staticmethod
+    def _decode_entry(entry_id: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Reconstruit le message (avec buffer_id) depuis une entrée du stream."""
+        try:
+            raw = fields.get("data")
+            if isinstance(raw, bytes):
+                raw = raw.decode("utf-8")
+            message = json.loads(raw)
+            if isinstance(message, dict):
+                message["buffer_id"] = entry_id if isinstance(entry_id, str) else entry_id.decode()
+            return message
+        except Exception as e:
+            logger.error(
+                f"[WS_BUFFER] ⚠️ Erreur désérialisation message: {e}"
+            )
+            return None
+    
+    def replay_since(
+        self,
+        user_id: str,
+        last_id: Optional[str] = None,
+        thread_key: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Retourne les messages postérieurs au dernier ID vu par le client.
+        
+        Un seul aller-retour: GET du dernier ack + XRANGE à partir de
+        last_id. Le plus récent des deux (ack serveur / ID client) borne
+        le replay.
+        
+        Args:
+            user_id: ID de l'utilisateur
+            last_id: Dernier buffer_id reçu par le client (None = tout)
+            thread_key: Filtre optionnel sur un thread
+        
+        Returns:
+            Messages manqués, dans l'ordre, avec leur buffer_id
+        """
+        self.flush()
+        try:
+            redis_client = self._get_redis_client()
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.get(self._generate_ack_key(user_id))
+            pipe.xrange(self._generate_key(user_id), min=last_id or "-", max="+")
+            acked_id, entries = pipe.execute()
+            
+            floor = max(_parse_stream_id(last_id), _parse_stream_id(acked_id))
+            messages = []
+            for entry_id, fields in entries or []:
+                if _parse_stream_id(entry_id) <= floor:
+                    continue
+                if thread_key and fields.get("thread") != thread_key:
+                    continue
+                message = self._decode_entry(entry_id, fields)
+                if message is not None:
+                    messages.append(message)
+            
+            if messages:
+                logger.info(
+                    f"[WS_BUFFER] 📬 Replay - user={user_id} "
+                    f"since={last_id or acked_id or '-'} count={len(messages)}"
+                )
+            return messages
+        except Exception as e:
+            logger.error(
+                f"[WS_BUFFER] ❌ Erreur replay - user={user_id} error={e}",
+                exc_info=True
+            )
+            return []
+    
+    def acknowledge(self, user_id: str, last_id: str) -> bool:
+        """
+        Enregistre le dernier ID reçu par le client et élague le stream.
+        
+        L'ack n'avance jamais en arrière (ordre des acks non garanti entre
+        onglets / instances).
+        """
+        if not last_id:
+            return False
+        try:
+            redis_client = self._get_redis_client()
+            ack_key = self._generate_ack_key(user_id)
+            current = redis_client.get(ack_key)
+            if _parse_stream_id(current) >= _parse_stream_id(last_id):
+                return True
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.set(ack_key, last_id, ex=self.ttl_seconds)
+            pipe.xtrim(self._generate_key(user_id), minid=last_id, approximate=True)
+            pipe.execute(raise_on_error=False)
+            return True
+        except Exception as e:
+            logger.error(
+                f"[WS_BUFFER] ❌ Erreur ack - user={user_id} id={last_id} error={e}"
+            )
+            return False
+    
     def get_pending_messages(
         self,
         user_id: str,
@@ -102,49 +337,43 @@ class WebSocketMessageBuffer:
         delete_after: bool = True
     ) -> List[Dict[str, Any]]:
         """
-        Récupère les messages WebSocket en attente depuis Redis.
+        Récupère les messages WebSocket en attente pour un thread.
         
         Args:
             user_id: ID de l'utilisateur
             thread_key: Clé du thread de chat
             delete_after: Si True, supprime les messages après lecture
-            
+        
         Returns:
             Liste des messages bufferisés (format hub.broadcast)
         """
+        self.flush()
         try:
             redis_client = self._get_redis_client()
-            key = self._generate_key(user_id, thread_key)
+            key = self._generate_key(user_id)
             
-            # Récupérer tous les messages de la liste
-            message_jsons = redis_client.lrange(key, 0, -1)
+            entries = redis_client.xrange(key, min="-", max="+")
+            matched = [(eid, f) for eid, f in entries or [] if f.get("thread") == thread_key]
             
-            if not message_jsons:
+            if not matched:
                 logger.debug(
                     f"[WS_BUFFER] ℹ️ Aucun message en attente - "
                     f"user={user_id} thread={thread_key}"
                 )
                 return []
             
-            # Désérialiser les messages
             messages = []
-            for msg_json in message_jsons:
-                try:
-                    if isinstance(msg_json, bytes):
-                        msg_json = msg_json.decode('utf-8')
-                    message = json.loads(msg_json)
+            for entry_id, fields in matched:
+                message = self._decode_entry(entry_id, fields)
+                if message is not None:
                     messages.append(message)
-                except Exception as e:
-                    logger.error(
-                        f"[WS_BUFFER] ⚠️ Erreur désérialisation message: {e}"
-                    )
             
-            # Supprimer la clé après lecture si demandé
-            if delete_after and messages:
-                redis_client.delete(key)
+            # Supprimer les entrées du thread après lecture si demandé
+            if delete_after:
+                redis_client.xdel(key, *[eid for eid, _ in matched])
                 logger.info(
                     f"[WS_BUFFER] 🗑️ Messages supprimés après récupération - "
-                    f"user={user_id} thread={thread_key} count={len(messages)}"
+                    f"user={user_id} thread={thread_key} count={len(matched)}"
                 )
             
             logger.info(
@@ -153,7 +382,7 @@ class WebSocketMessageBuffer:
             )
             
             return messages
-            
+        
         except Exception as e:
             logger.error(
                 f"[WS_BUFFER] ❌ Erreur récupération messages - "
@@ -166,18 +395,36 @@ class WebSocketMessageBuffer:
         """
         Vérifie s'il y a des messages en attente pour un thread.
         
+        XLEN d'abord (stream vide: aucune lecture), puis XRANGE par pages
+        de SCAN_COUNT après le dernier ack, arrêté à la première entrée
+        du thread.
+        
         Args:
             user_id: ID de l'utilisateur
             thread_key: Clé du thread de chat
-            
+        
         Returns:
             True si des messages sont en attente, False sinon
         """
+        self.flush()
         try:
             redis_client = self._get_redis_client()
-            key = self._generate_key(user_id, thread_key)
-            count = redis_client.llen(key)
-            return count > 0
+            key = self._generate_key(user_id)
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.get(self._generate_ack_key(user_id))
+            pipe.xlen(key)
+            acked_id, length = pipe.execute()
+            if not length:
+                return False
+            
+            start = _next_stream_id(acked_id)
+            while True:
+                entries = redis_client.xrange(key, min=start, max="+", count=self.SCAN_COUNT) or []
+                if any(fields.get("thread") == thread_key for _, fields in entries):
+                    return True
+                if len(entries) < self.SCAN_COUNT:
+                    return False
+                start = _next_stream_id(entries[-1][0])
         except Exception as e:
             logger.error(
                 f"[WS_BUFFER] ❌ Erreur vérification messages: {e}"
@@ -191,17 +438,21 @@ class WebSocketMessageBuffer:
         Args:
             user_id: ID de l'utilisateur
             thread_key: Clé du thread de chat
-            
+        
         Returns:
             True si succès, False sinon
         """
+        self.flush()
         try:
             redis_client = self._get_redis_client()
-            key = self._generate_key(user_id, thread_key)
-            redis_client.delete(key)
+            key = self._generate_key(user_id)
+            entries = redis_client.xrange(key, min="-", max="+")
+            ids = [eid for eid, fields in entries or [] if fields.get("thread") == thread_key]
+            if ids:
+                redis_client.xdel(key, *ids)
             logger.info(
                 f"[WS_BUFFER] 🗑️ Messages supprimés - "
-                f"user={user_id} thread={thread_key}"
+                f"user={user_id} thread={thread_key} count={len(ids)}"
             )
             return True
         except Exception as e:
@@ -221,4 +472,3 @@ def get_message_buffer() -> WebSocketMessageBuffer:
     if _message_buffer is None:
         _message_buffer = WebSocketMessageBuffer()
     return _message_buffer
-
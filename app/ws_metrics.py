@@ -87,3 +87,94 @@ def get_ws_metrics() -> WebSocketMetrics:
     """Retourne l'instance du collecteur de métriques."""
     return _metrics
 
+
+
+class WSDispatchMetrics:
+    """
+    Métriques du dispatcher WebSocket (par type de message).
+    
+    Suit le nombre de messages, les erreurs, la latence d'exécution,
+    l'attente en file et la profondeur (en attente / en cours).
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = defaultdict(lambda: {
+            "count": 0,
+            "errors": 0,
+            "cancelled": 0,
+            "total_ms": 0.0,
+            "max_ms": 0.0,
+            "total_wait_ms": 0.0,
+            "max_wait_ms": 0.0,
+            "queued": 0,
+            "in_flight": 0,
+        })
+    
+    def record_queued(self, msg_type: str) -> None:
+        """Message accepté par le dispatcher (en attente de slot / de lane)."""
+        with self._lock:
+            self._stats[msg_type]["queued"] += 1
+    
+    def record_dropped(self, msg_type: str) -> None:
+        """Message annulé avant exécution (déconnexion)."""
+        with self._lock:
+            stats = self._stats[msg_type]
+            stats["queued"] -= 1
+            stats["cancelled"] += 1
+    
+    def record_started(self, msg_type: str, wait_ms: float) -> None:
+        """Début d'exécution du handler après `wait_ms` d'attente."""
+        with self._lock:
+            stats = self._stats[msg_type]
+            stats["queued"] -= 1
+            stats["in_flight"] += 1
+            stats["total_wait_ms"] += wait_ms
+            stats["max_wait_ms"] = max(stats["max_wait_ms"], wait_ms)
+    
+    def record_finished(self, msg_type: str, duration_ms: float, ok: bool, cancelled: bool = False) -> None:
+        """Fin d'exécution du handler (succès, erreur ou annulation)."""
+        with self._lock:
+            stats = self._stats[msg_type]
+            stats["in_flight"] -= 1
+            stats["count"] += 1
+            if cancelled:
+                stats["cancelled"] += 1
+            elif not ok:
+                stats["errors"] += 1
+            stats["total_ms"] += duration_ms
+            stats["max_ms"] = max(stats["max_ms"], duration_ms)
+    
+    def get_summary(self) -> Dict:
+        """Retourne les métriques par type (triées par latence cumulée)."""
+        with self._lock:
+            items = [(msg_type, dict(stats)) for msg_type, stats in self._stats.items()]
+        
+        by_type = {}
+        for msg_type, stats in sorted(items, key=lambda x: x[1]["total_ms"], reverse=True):
+            count = stats["count"]
+            started = count + stats["in_flight"]
+            by_type[msg_type] = {
+                "count": int(count),
+                "errors": int(stats["errors"]),
+                "cancelled": int(stats["cancelled"]),
+                "avg_ms": round(stats["total_ms"] / count, 2) if count else 0.0,
+                "max_ms": round(stats["max_ms"], 2),
+                "avg_wait_ms": round(stats["total_wait_ms"] / started, 2) if started else 0.0,
+                "max_wait_ms": round(stats["max_wait_ms"], 2),
+                "queued": int(stats["queued"]),
+                "in_flight": int(stats["in_flight"]),
+            }
+        return {
+            "queued": sum(s["queued"] for s in by_type.values()),
+            "in_flight": sum(s["in_flight"] for s in by_type.values()),
+            "by_type": by_type,
+        }
+
+
+_dispatch_metrics = WSDispatchMetrics()
+
+
+def get_ws_dispatch_metrics() -> WSDispatchMetrics:
+    """Retourne l'instance des métriques du dispatcher WebSocket."""
+    return _dispatch_metrics
@@ -0,0 +1,883 @@
+"""
+Table de routage des messages WebSocket entrants (/ws).
+
+Chaque type de message est déclaré une seule fois avec sa classe de
+concurrence (voir ws_dispatcher):
+    - Lectures (orchestrate_init, refresh, list, load...) → PARALLEL
+    - Écritures → SERIAL par domaine (et par thread_key si présent)
+    - Mutations longues / destructives (process, delete, sync_erp...)
+      → FIRE_AND_FORGET (non annulées à la déconnexion)
+    - auth + dashboard partagent la lane "session" (ordre login → init)
+    - Toute route dépendant de la société active (pages, chat, tâches,
+      approbations, cockpit, métriques, page.*...) attend la lane "session"
+      (barrière, après un company_change) sans changer sa classe; seuls les
+      domaines utilisateur (_USER_SCOPED_DOMAINS) y échappent
+    - page.* partagent la lane "page"
+
+Les handlers "standard" (signature uid/session_id/payload) sont importés
+paresseusement au premier message. Les handlers spécifiques sont définis
+ci-dessous.
+"""
+
+import logging
+from typing import Any, Dict, Optional
+
+import json as _json
+
+from .redis_client import get_redis
+from .ws_dispatcher import WSConcurrency, WSContext, WSMessageRouter
+from .ws_events import WS_EVENTS
+from .ws_hub import hub
+
+logger = logging.getLogger("listeners.ws_routes")
+
+SERIAL = WSConcurrency.SERIAL
+PARALLEL = WSConcurrency.PARALLEL
+FIRE_AND_FORGET = WSConcurrency.FIRE_AND_FORGET
+
+SESSION_LANE = "session"
+
+# Domaines indépendants de la société active: pas de barrière "session"
+# (auth / dashboard sont dans la lane, llm.stop_streaming et ws.ack
+# doivent passer immédiatement)
+_USER_SCOPED_DOMAINS = frozenset({
+    "auth", "dashboard", "balance", "notification", "messenger", "ws", "llm",
+})
+
+
+def _session_barrier(msg_type: str) -> Optional[str]:
+    """Barrière par défaut: la lane "session" pour les routes liées à la société."""
+    return None if msg_type.split(".", 1)[0] in _USER_SCOPED_DOMAINS else SESSION_LANE
+
+
+router = WSMessageRouter(barrier_for=_session_barrier)
+
+
+# ═══════════════════════════════════════════════════════════════
+# HANDLERS STANDARD (import paresseux)
+# ═══════════════════════════════════════════════════════════════
+
+# (msg_type, module, handler, reply, concurrency[, lane])
+# reply=True: la valeur retournée par le handler est renvoyée au client
+# barrière "session" appliquée par défaut (voir _session_barrier)
+_LAZY_ROUTES = [
+    # ── dashboard ──
+    ("dashboard.orchestrate_init", ".wrappers.dashboard_orchestration_handlers", "handle_orchestrate_init", True, SERIAL, SESSION_LANE),
+    ("dashboard.company_change", ".wrappers.dashboard_orchestration_handlers", "handle_company_change", True, SERIAL, SESSION_LANE),
+    ("dashboard.refresh", ".wrappers.dashboard_orchestration_handlers", "handle_refresh", True, SERIAL, SESSION_LANE),
+    ("dashboard.billing_refresh", ".wrappers.dashboard_orchestration_handlers", "handle_billing_refresh", True, SERIAL, SESSION_LANE),
+
+    # ── task ──
+    ("task.list", ".wrappers.task_handlers", "handle_task_list", True, PARALLEL),
+    ("task.execute", ".wrappers.task_handlers", "handle_task_execute", True, SERIAL),
+    ("task.toggle_enabled", ".wrappers.task_handlers", "handle_task_toggle", True, SERIAL),
+    ("task.update", ".wrappers.task_handlers", "handle_task_update", True, SERIAL),
+
+    # ── approval ──
+    ("approval.list", ".wrappers.approval_handlers", "handle_approval_list", True, PARALLEL),
+    ("approval.send_router", ".wrappers.approval_handlers", "handle_send_router", True, SERIAL),
+    ("approval.send_banker", ".wrappers.approval_handlers", "handle_send_banker", True, SERIAL),
+    ("approval.send_apbookeeper", ".wrappers.approval_handlers", "handle_send_apbookeeper", True, SERIAL),
+    ("approval.save_changes", ".wrappers.approval_handlers", "handle_save_approval_changes", True, SERIAL),
+
+    # ── balance ──
+    ("balance.top_up", ".wrappers.balance_handlers", "handle_top_up", False, SERIAL),
+    ("balance.refresh", ".wrappers.balance_handlers", "handle_refresh_balance", False, PARALLEL),
+
+    # ── chat ──
+    ("chat.orchestrate_init", ".frontend.pages.chat", "handle_orchestrate_init", True, SERIAL),
+    ("chat.session_select", ".frontend.pages.chat", "handle_session_select", True, SERIAL),
+    ("chat.history_load", ".frontend.pages.chat", "handle_history_load", True, PARALLEL),
+    ("chat.session_create", ".frontend.pages.chat", "handle_session_create", True, SERIAL),
+    ("chat.session_delete", ".frontend.pages.chat", "handle_session_delete", True, SERIAL),
+    ("chat.session_rename", ".frontend.pages.chat", "handle_session_rename", True, SERIAL),
+    ("chat.mode_change", ".frontend.pages.chat", "handle_mode_change", True, SERIAL),
+    ("chat.card_clicked", ".frontend.pages.chat", "handle_card_clicked", True, SERIAL),
+    ("chat.onboarding_job_stop", ".frontend.pages.chat.orchestration", "handle_onboarding_job_stop", True, PARALLEL),
+
+    # ── routing ──
+    ("routing.orchestrate_init", ".frontend.pages.routing", "handle_routing_orchestrate_init", False, PARALLEL),
+    ("routing.refresh", ".frontend.pages.routing.orchestration", "handle_routing_refresh", False, PARALLEL),
+    ("routing.process", ".frontend.pages.routing.orchestration", "handle_routing_process", False, FIRE_AND_FORGET),
+    ("routing.restart", ".frontend.pages.routing.orchestration", "handle_routing_restart", False, SERIAL),
+    ("routing.stop", ".frontend.pages.routing.orchestration", "handle_routing_stop", False, SERIAL),
+    ("routing.delete", ".frontend.pages.routing.orchestration", "handle_routing_delete", False, FIRE_AND_FORGET),
+    ("routing.oauth_init", ".frontend.pages.routing.orchestration", "handle_routing_oauth_init", False, SERIAL),
+
+    # ── invoices ──
+    ("invoices.orchestrate_init", ".frontend.pages.invoices.orchestration", "handle_invoices_orchestrate_init", False, PARALLEL),
+    ("invoices.refresh", ".frontend.pages.invoices.orchestration", "handle_invoices_refresh", False, PARALLEL),
+    ("invoices.process", ".frontend.pages.invoices.orchestration", "handle_invoices_process", False, FIRE_AND_FORGET),
+    ("invoices.stop", ".frontend.pages.invoices.orchestration", "handle_invoices_stop", False, SERIAL),
+    ("invoices.delete", ".frontend.pages.invoices.orchestration", "handle_invoices_delete", False, FIRE_AND_FORGET),
+    ("invoices.restart", ".frontend.pages.invoices.orchestration", "handle_invoices_restart", False, SERIAL),
+    ("invoices.instructions_save", ".frontend.pages.invoices.orchestration", "handle_invoices_instructions_save", False, SERIAL),
+
+    # ── company_settings ──
+    ("company_settings.orchestrate_init", ".frontend.pages.company_settings", "handle_orchestrate_init", False, PARALLEL),
+    ("company_settings.fetch_additional", ".frontend.pages.company_settings", "handle_fetch_additional", False, PARALLEL),
+    ("company_settings.delete_company", ".frontend.pages.company_settings", "handle_delete_company", False, FIRE_AND_FORGET),
+    ("company_settings.save_company_info", ".frontend.pages.company_settings", "handle_save_company_info", False, SERIAL),
+    ("company_settings.save_settings", ".frontend.pages.company_settings", "handle_save_settings", False, SERIAL),
+    ("company_settings.save_workflow", ".frontend.pages.company_settings", "handle_save_workflow", False, SERIAL),
+    ("company_settings.save_context", ".frontend.pages.company_settings", "handle_save_context", False, SERIAL),
+    ("company_settings.save_asset_config", ".frontend.pages.company_settings", "handle_save_asset_config", False, SERIAL),
+    ("company_settings.list_asset_models", ".frontend.pages.company_settings", "handle_list_asset_models", False, PARALLEL),
+    ("company_settings.create_asset_model", ".frontend.pages.company_settings", "handle_create_asset_model", False, SERIAL),
+    ("company_settings.update_asset_model", ".frontend.pages.company_settings", "handle_update_asset_model", False, SERIAL),
+    ("company_settings.delete_asset_model", ".frontend.pages.company_settings", "handle_delete_asset_model", False, SERIAL),
+    ("company_settings.load_asset_accounts", ".frontend.pages.company_settings", "handle_load_asset_accounts", False, PARALLEL),
+    ("company_settings.create_fiscal_folders", ".frontend.pages.company_settings", "handle_create_fiscal_folders", False, SERIAL),
+    ("company_settings.save_email_settings", ".frontend.pages.company_settings", "handle_save_email_settings", False, SERIAL),
+    ("company_settings.email_approve_draft", ".frontend.pages.company_settings.orchestration", "handle_email_approve_draft", False, SERIAL),
+    ("company_settings.save_email_type", ".frontend.pages.company_settings", "handle_save_email_type", False, SERIAL),
+    ("company_settings.initiate_email_auth", ".frontend.pages.company_settings", "handle_initiate_email_auth", False, SERIAL),
+    ("company_settings.telegram_start_registration", ".frontend.pages.company_settings.telegram_handler", "handle_telegram_start_registration", False, SERIAL),
+    ("company_settings.telegram_remove_user", ".frontend.pages.company_settings.telegram_handler", "handle_telegram_remove_user", False, SERIAL),
+    ("company_settings.telegram_reset_room", ".frontend.pages.company_settings.telegram_handler", "handle_telegram_reset_room", False, SERIAL),
+
+    # ── coa ──
+    ("coa.orchestrate_init", ".frontend.pages.coa", "handle_orchestrate_init", False, PARALLEL),
+    ("coa.load_accounts", ".frontend.pages.coa", "handle_load_accounts", False, PARALLEL),
+    ("coa.load_functions", ".frontend.pages.coa", "handle_load_functions", False, PARALLEL),
+    ("coa.save_changes", ".frontend.pages.coa", "handle_save_changes", False, SERIAL),
+    ("coa.sync_erp", ".frontend.pages.coa", "handle_sync_erp", False, FIRE_AND_FORGET),
+    ("coa.toggle_function", ".frontend.pages.coa", "handle_toggle_function", False, SERIAL),
+    ("coa.create_function", ".frontend.pages.coa", "handle_create_function", False, SERIAL),
+    ("coa.update_function", ".frontend.pages.coa", "handle_update_function", False, SERIAL),
+    ("coa.delete_function", ".frontend.pages.coa", "handle_delete_function", False, SERIAL),
+    ("coa.create_account", ".frontend.pages.coa", "handle_create_account", False, SERIAL),
+    ("coa.update_account", ".frontend.pages.coa", "handle_update_account", False, SERIAL),
+
+    # ── expenses ──
+    ("expenses.orchestrate_init", ".frontend.pages.expenses", "handle_expenses_orchestrate_init", False, PARALLEL),
+    ("expenses.refresh", ".frontend.pages.expenses", "handle_expenses_refresh", False, PARALLEL),
+    ("expenses.close", ".frontend.pages.expenses", "handle_expenses_close", False, SERIAL),
+    ("expenses.reopen", ".frontend.pages.expenses", "handle_expenses_reopen", False, SERIAL),
+    ("expenses.update", ".frontend.pages.expenses", "handle_expenses_update", False, SERIAL),
+    ("expenses.delete", ".frontend.pages.expenses", "handle_expenses_delete", False, FIRE_AND_FORGET),
+
+    # ── banking ──
+    ("banking.orchestrate_init", ".frontend.pages.banking", "handle_banking_orchestrate_init", False, PARALLEL),
+    ("banking.refresh", ".frontend.pages.banking", "handle_banking_refresh", False, PARALLEL),
+    ("banking.process", ".frontend.pages.banking", "handle_banking_process", False, FIRE_AND_FORGET),
+    ("banking.stop", ".frontend.pages.banking", "handle_banking_stop", False, SERIAL),
+    ("banking.delete", ".frontend.pages.banking", "handle_banking_delete", False, FIRE_AND_FORGET),
+
+    # ── hr ──
+    ("hr.orchestrate_init", ".frontend.pages.hr.orchestration", "handle_orchestrate_init", False, PARALLEL),
+    ("hr.refresh", ".frontend.pages.hr.orchestration", "handle_refresh", False, PARALLEL),
+    ("hr.employees_list", ".frontend.pages.hr.orchestration", "handle_employees_list", False, PARALLEL),
+    ("hr.employee_get", ".frontend.pages.hr.orchestration", "handle_employee_get", False, PARALLEL),
+    ("hr.employee_create", ".frontend.pages.hr.orchestration", "handle_employee_create", False, SERIAL),
+    ("hr.employee_update", ".frontend.pages.hr.orchestration", "handle_employee_update", False, SERIAL),
+    ("hr.employee_delete", ".frontend.pages.hr.orchestration", "handle_employee_delete", False, FIRE_AND_FORGET),
+    ("hr.payroll_calculate", ".frontend.pages.hr.orchestration", "handle_payroll_calculate", False, SERIAL),
+    ("hr.settings_update", ".frontend.pages.hr.orchestration", "handle_settings_update", False, SERIAL),
+
+    # ── cockpit ──
+    ("cockpit.generate", ".frontend.pages.cockpit", "handle_cockpit_generate", True, SERIAL),
+    ("cockpit.list_widgets", ".frontend.pages.cockpit", "handle_cockpit_list_widgets", True, PARALLEL),
+    ("cockpit.pin_widget", ".frontend.pages.cockpit", "handle_cockpit_pin_widget", True, SERIAL),
+    ("cockpit.delete_widget", ".frontend.pages.cockpit", "handle_cockpit_delete_widget", True, SERIAL),
+    ("cockpit.refresh_widget", ".frontend.pages.cockpit", "handle_cockpit_refresh_widget", True, SERIAL),
+    ("cockpit.update_layout", ".frontend.pages.cockpit", "handle_cockpit_update_layout", True, SERIAL),
+
+    # ── notification ──
+    ("notification.mark_read", ".frontend.pages.notifications", "handle_notification_mark_read", False, SERIAL),
+    ("notification.click", ".frontend.pages.notifications", "handle_notification_click", False, SERIAL),
+
+    # ── messenger ──
+    ("messenger.mark_read", ".frontend.pages.messenger", "handle_messenger_mark_read", False, SERIAL),
+    ("messenger.click", ".frontend.pages.messenger", "handle_messenger_click", False, SERIAL),
+
+    # ── metrics ──
+    ("metrics.refresh", ".frontend.pages.metrics", "handle_metrics_refresh", False, PARALLEL),
+    ("metrics.refresh_module", ".frontend.pages.metrics", "handle_metrics_refresh_module", False, PARALLEL),
+
+    # ── onboarding ──
+    ("onboarding.test_erp_connection", ".frontend.pages.onboarding.orchestration", "handle_test_erp_connection", False, PARALLEL),
+    ("onboarding.load_clients", ".frontend.pages.onboarding.orchestration", "handle_load_clients", False, PARALLEL),
+    ("onboarding.save_client", ".frontend.pages.onboarding.orchestration", "handle_save_client", False, SERIAL),
+    ("onboarding.update_client", ".frontend.pages.onboarding.orchestration", "handle_update_client", False, SERIAL),
+    ("onboarding.delete_client", ".frontend.pages.onboarding.orchestration", "handle_delete_client", False, FIRE_AND_FORGET),
+    ("onboarding.submit", ".frontend.pages.onboarding.orchestration", "handle_submit", False, FIRE_AND_FORGET),
+    ("onboarding.oauth_complete", ".frontend.pages.onboarding.orchestration", "handle_oauth_complete", False, SERIAL),
+]
+
+for _entry in _LAZY_ROUTES:
+    _msg_type, _module, _attr, _reply, _concurrency = _entry[:5]
+    router.add_lazy(
+        _msg_type, _module, _attr,
+        reply=_reply,
+        concurrency=_concurrency,
+        lane=_entry[5] if len(_entry) > 5 else None,
+    )
+
+
+# ═══════════════════════════════════════════════════════════════
+# AUTH & PAGE CONTEXT
+# ═══════════════════════════════════════════════════════════════
+
+@router.route("auth.firebase_token", lane=SESSION_LANE)
+async def _handle_auth_firebase_token(ctx: WSContext, msg_payload: Dict[str, Any]) -> None:
+    ws, uid = ctx.ws, ctx.uid
+    # Handler d'authentification Firebase
+    from .wrappers.auth_handlers import handle_firebase_token
+    response = await handle_firebase_token(msg_payload)
+
+    # Envoyer la réponse au client
+    await ws.send_text(_json.dumps(response))
+    logger.info(
+        f"[WS] Auth response sent - uid={uid} "
+        f"type={response.get('type')} "
+        f"success={response.get('payload', {}).get('success')}"
+    )
+
+
+@router.route("page.context_change", lane="page")
+async def _handle_page_context_change(ctx: WSContext, msg_payload: Dict[str, Any]) -> None:
+    ws, uid = ctx.ws, ctx.uid
+    # Handler de changement de contexte de page
+    from .realtime.contextual_publisher import update_page_context
+    page = msg_payload.get("page")
+    if page:
+        update_page_context(uid, page)
+        logger.info(f"[WS] Page context updated - uid={uid} page={page}")
+    await ws.send_text(_json.dumps({
+        "type": "page.context_updated",
+        "payload": {"success": True, "page": page}
+    }))
+
+
+@router.route("page.restore_state", lane="page")
+async def _handle_page_restore_state(ctx: WSContext, msg_payload: Dict[str, Any]) -> None:
+    ws, uid = ctx.ws, ctx.uid
+    from .wrappers.page_state_manager import get_page_state_manager
+    from .ws_events import WS_EVENTS
+
+    page = msg_payload.get("page")
+    company_id = msg_payload.get("company_id")
+    state = None
+
+    if not company_id:
+        response = {
+            "type": WS_EVENTS.PAGE_STATE.NOT_FOUND,
+            "payload": {
+                "page": page,
+                "reason": "invalid_company",
+                "message": "company_id is required for page state recovery"
+            }
+        }
+        logger.warning(f"[WS] Page state restore failed - no company_id - uid={uid} page={page}")
+    else:
+        manager = get_page_state_manager()
+
+        # TEMP: Invalidate stale chat cache to force fresh orchestration
+        if page == "chat":
+            manager.invalidate_page_state(uid=uid, company_id=company_id, page="chat")
+            logger.info(f"[WS] TEMP: Invalidated stale chat cache - uid={uid}")
+
+        state = manager.get_page_state(
+            uid=uid,
+            company_id=company_id,
+            page=page
+        )
+
+        if state:
+            # Synchroniser le contexte de page pour le Contextual Publisher
+            from .realtime.contextual_publisher import update_page_context
+            update_page_context(uid, page)
+
+            response = {
+                "type": WS_EVENTS.PAGE_STATE.RESTORED,
+                "payload": {
+                    "success": True,
+                    "page": page,
+                    "data": state.get("data", {}),
+                    "loaded_at": state.get("loaded_at"),
+                    "company_id": state.get("company_id"),
+                    "mandate_path": state.get("mandate_path"),
+                }
+            }
+            logger.info(f"[WS] Page state restored - uid={uid} page={page} company={company_id}")
+        else:
+            response = {
+                "type": WS_EVENTS.PAGE_STATE.NOT_FOUND,
+                "payload": {
+                    "page": page,
+                    "reason": "not_cached",
+                }
+            }
+            logger.info(f"[WS] Page state not found - uid={uid} page={page} company={company_id}")
+
+    await ws.send_text(_json.dumps(response))
+
+    # Dashboard: recalculer les metrics fraîches depuis le business cache
+    # Le page_state contient un snapshot figé, mais le business cache est
+    # à jour (mis à jour par PubSub subscriber). On envoie un event
+    # dashboard.metrics_update immédiatement après le restore pour corriger.
+    if page == "dashboard" and state:
+        try:
+            from .cache.metrics_calculator import MetricsCalculator
+            from .llm_service.redis_namespaces import build_business_key
+            calculator = MetricsCalculator(get_redis())
+            fresh_metrics = calculator.get_all_metrics(uid, company_id)
+
+            # Lire le billing_history frais depuis le cache Redis
+            # (mis à jour par PubSub subscriber en temps réel)
+            # Fallback sur les données du page_state snapshot
+            billing_history_payload = None
+            try:
+                billing_key = build_business_key(uid, company_id, "billing_history")
+                raw_billing = get_redis().get(billing_key)
+                if raw_billing:
+                    billing_data = _json.loads(raw_billing if isinstance(raw_billing, str) else raw_billing.decode())
+                    # Gérer le format enveloppé (unified_cache_manager) et brut
+                    if "data" in billing_data and isinstance(billing_data["data"], dict):
+                        billing_history_payload = billing_data["data"]
+                    elif "items" in billing_data:
+                        billing_history_payload = billing_data
+                    if billing_history_payload:
+                        logger.info(
+                            f"[WS] billing_history from Redis cache: "
+                            f"items={len(billing_history_payload.get('items', []))}"
+                        )
+            except Exception as bh_err:
+                logger.warning(f"[WS] Could not read billing_history from cache: {bh_err}")
+
+            # Fallback: utiliser les données du page_state snapshot
+            if not billing_history_payload:
+                expenses_snapshot = state.get("data", {}).get("expenses")
+                if expenses_snapshot and expenses_snapshot.get("items"):
+                    billing_history_payload = expenses_snapshot
+                    logger.info(
+                        f"[WS] billing_history from page_state snapshot: "
+                        f"items={len(billing_history_payload.get('items', []))}"
+                    )
+
+            metrics_payload = {
+                "metrics": fresh_metrics,
+                "action": "full"
+            }
+            if billing_history_payload:
+                metrics_payload["expenses"] = billing_history_payload
+
+            metrics_event = {
+                "type": WS_EVENTS.DASHBOARD.METRICS_UPDATE,
+                "payload": metrics_payload
+            }
+            await ws.send_text(_json.dumps(metrics_event))
+            logger.info(
+                f"[WS] Fresh metrics+billing_history sent after dashboard restore - "
+                f"uid={uid} has_expenses={bool(billing_history_payload)}"
+            )
+        except Exception as metrics_err:
+            logger.error(f"[WS] Failed to send fresh metrics after dashboard restore: {metrics_err}")
+
+        # Re-peupler le cache billing_history depuis les données du page_state
+        # Le page_state (TTL 1800s) survit au billing_history cache (TTL 1800s),
+        # donc on re-écrit le cache pour que les PubSub puissent le mettre à jour
+        try:
+            expenses_data = state.get("data", {}).get("expenses")
+            if expenses_data and expenses_data.get("items"):
+                billing_key = build_business_key(uid, company_id, "billing_history")
+                # Vérifier si le cache existe déjà (écrit par PubSub subscriber)
+                existing = get_redis().exists(billing_key)
+                if not existing:
+                    get_redis().setex(billing_key, 1800, _json.dumps(expenses_data))
+                    logger.info(f"[WS] billing_history cache re-populated from page_state - uid={uid}")
+                else:
+                    logger.info(f"[WS] billing_history cache already exists, skipping re-populate - uid={uid}")
+        except Exception as exp_err:
+            logger.error(f"[WS] Failed to re-populate billing_history cache: {exp_err}")
+
+
+@router.route("page.invalidate_state", lane="page")
+async def _handle_page_invalidate_state(ctx: WSContext, msg_payload: Dict[str, Any]) -> None:
+    ws, uid = ctx.ws, ctx.uid
+    from .wrappers.page_state_manager import get_page_state_manager
+
+    page = msg_payload.get("page")  # None = invalidate all
+    company_id = msg_payload.get("company_id")
+
+    if company_id:
+        manager = get_page_state_manager()
+        manager.invalidate_page_state(
+            uid=uid,
+            company_id=company_id,
+            page=page
+        )
+
+        response = {
+            "type": "page.state_invalidated",
+            "payload": {
+                "success": True,
+                "page": page or "all",
+                "company_id": company_id,
+            }
+        }
+        await ws.send_text(_json.dumps(response))
+        logger.info(f"[WS] Page state invalidated - uid={uid} company={company_id} page={page or 'all'}")
+    else:
+        response = {
+            "type": "page.state_invalidated",
+            "payload": {
+                "success": False,
+                "error": "company_id is required",
+            }
+        }
+        await ws.send_text(_json.dumps(response))
+        logger.warning(f"[WS] Page state invalidate failed - no company_id - uid={uid}")
+
+
+@router.route("ws.ack", concurrency=PARALLEL)
+async def _handle_ws_ack(ctx: WSContext, msg_payload: Dict[str, Any]) -> None:
+    # Acquittement du dernier buffer_id reçu (replay à la reconnexion)
+    from .ws_message_buffer import get_message_buffer
+    last_id = msg_payload.get("last_id")
+    if last_id:
+        get_message_buffer().acknowledge(ctx.uid, str(last_id))
+
+
+@router.route("pending_action.save")
+async def _handle_pending_action_save(ctx: WSContext, msg_payload: Dict[str, Any]) -> None:
+    ws, uid, session_id = ctx.ws, ctx.uid, ctx.session_id
+    from .wrappers.pending_action_manager import get_pending_action_manager
+    from .ws_events import WS_EVENTS
+
+    manager = get_pending_action_manager()
+    try:
+        state_token = manager.save_pending_action(
+            uid=uid,
+            session_id=msg_payload.get("session_id", session_id),
+            action_type=msg_payload.get("action_type"),
+            provider=msg_payload.get("provider"),
+            return_page=msg_payload.get("return_page"),
+            return_path=msg_payload.get("return_path"),
+            context=msg_payload.get("context", {}),
+        )
+
+        # Build OAuth state for redirect URL
+        oauth_state = manager.build_oauth_state(
+            uid=uid,
+            session_id=msg_payload.get("session_id", session_id),
+            state_token=state_token
+        )
+
+        response = {
+            "type": WS_EVENTS.PENDING_ACTION.SAVED,
+            "payload": {
+                "success": True,
+                "state_token": state_token,
+                "oauth_state": oauth_state,
+            }
+        }
+        logger.info(
+            f"[WS] Pending action saved - uid={uid} "
+            f"action={msg_payload.get('action_type')} "
+            f"provider={msg_payload.get('provider')}"
+        )
+    except Exception as e:
+        response = {
+            "type": WS_EVENTS.PENDING_ACTION.SAVED,
+            "payload": {
+                "success": False,
+                "error": str(e),
+            }
+        }
+        logger.error(f"[WS] Pending action save error - uid={uid} error={e}")
+
+    await ws.send_text(_json.dumps(response))
+
+
+@router.route("pending_action.cancel")
+async def _handle_pending_action_cancel(ctx: WSContext, msg_payload: Dict[str, Any]) -> None:
+    ws, uid, session_id = ctx.ws, ctx.uid, ctx.session_id
+    from .wrappers.pending_action_manager import get_pending_action_manager
+
+    manager = get_pending_action_manager()
+    cancelled = manager.cancel_pending_action(
+        uid=uid,
+        session_id=msg_payload.get("session_id", session_id)
+    )
+
+    response = {
+        "type": "pending_action.cancelled",
+        "payload": {
+            "success": cancelled,
+        }
+    }
+    await ws.send_text(_json.dumps(response))
+    logger.info(f"[WS] Pending action cancelled - uid={uid} success={cancelled}")
+
+
+# ═══════════════════════════════════════════════════════════════
+# CHAT / LLM
+# ═══════════════════════════════════════════════════════════════
+
+@router.route("chat.send_message")
+async def _handle_chat_send_message(ctx: WSContext, msg_payload: Dict[str, Any]) -> None:
+    ws, uid, session_id = ctx.ws, ctx.uid, ctx.session_id
+    # ⭐ ARCHITECTURE QUEUE: Route message via LLMGateway → Worker
+    # Le Worker traite le message et publie le streaming via Redis PubSub
+    # Le WorkerBroadcastListener transmet au frontend via WebSocket
+    from .llm_service.llm_gateway import get_llm_gateway
+
+    thread_key = msg_payload.get("thread_key") or msg_payload.get("session_id")
+    content = msg_payload.get("content", "")
+    company_id = msg_payload.get("company_id")
+    chat_mode = msg_payload.get("chat_mode", "general_chat")
+    attachments = msg_payload.get("attachments")  # list[dict] from frontend upload
+
+    logger.info(f"[WS] Chat send_message - uid={uid} thread={thread_key} content_len={len(content)} attachments={len(attachments) if attachments else 0}")
+
+    # ── Balance check before enqueue ──
+    try:
+        from .balance_service import (
+            get_balance_service,
+            CHAT_COST_PER_TURN,
+            CHAT_ZERO_BALANCE_THRESHOLD,
+            CHAT_LOW_BALANCE_THRESHOLD,
+        )
+
+        _bal_svc = get_balance_service()
+
+        # Resolve mandate_path from company context cache
+        _chat_mandate_path = None
+        try:
+            from .llm_service.redis_namespaces import build_company_context_key
+            _ctx_key = build_company_context_key(uid, company_id)
+            _ctx_raw = get_redis().get(_ctx_key)
+            if _ctx_raw:
+                _chat_mandate_path = _json.loads(_ctx_raw).get("mandatePath")
+        except Exception:
+            pass
+
+        _bal_result = await _bal_svc.check_balance(
+            uid=uid,
+            mandate_path=_chat_mandate_path,
+            estimated_cost=CHAT_COST_PER_TURN,
+            operation="chat",
+        )
+
+        if _bal_result.current_balance <= CHAT_ZERO_BALANCE_THRESHOLD:
+            # HARD BLOCK: balance <= 0
+            response = {
+                "type": "chat.message_error",
+                "payload": {
+                    "success": False,
+                    "error": "insufficient_balance",
+                    "code": "INSUFFICIENT_BALANCE",
+                    "message": _bal_result.message,
+                    "balance_info": {
+                        "currentBalance": _bal_result.current_balance,
+                        "requiredBalance": _bal_result.required_balance,
+                    },
+                },
+            }
+            await ws.send_text(_json.dumps(response))
+            logger.warning(f"[WS] Chat BLOCKED (zero balance) uid={uid}")
+            return
+
+        if _bal_result.current_balance < CHAT_LOW_BALANCE_THRESHOLD:
+            # SOFT WARNING: low balance — let the message through
+            await hub.send_to_user(uid, {
+                "type": "balance.balance_update",
+                "payload": {
+                    "action": "warning",
+                    "data": {
+                        "currentBalance": _bal_result.current_balance,
+                        "warning": True,
+                        "message": "Your balance is running low. Please top up to continue using services.",
+                    },
+                },
+            })
+    except Exception as _bal_err:
+        # Failsafe: never block chat on balance check failure
+        logger.warning(f"[WS] Chat balance check error (failsafe): {_bal_err}")
+
+    try:
+        # Enqueue message for Worker processing
+        # Worker will handle streaming via Redis PubSub → WorkerBroadcastListener → WebSocket
+        gateway = get_llm_gateway()
+        enqueue_kwargs = {}
+        if attachments:
+            enqueue_kwargs["attachments"] = attachments
+        queue_result = await gateway.enqueue_message(
+            user_id=uid,
+            collection_name=company_id,
+            thread_key=thread_key,
+            message=content,
+            chat_mode=chat_mode,
+            **enqueue_kwargs,
+        )
+
+        logger.info(f"[WS] Chat send_message enqueued: job_id={queue_result.get('job_id', 'unknown')[:8]}...")
+
+        response = {
+            "type": "chat.message_sent",
+            "payload": {
+                "success": True,
+                "status": "queued",
+                "job_id": queue_result.get("job_id"),
+            }
+        }
+    except Exception as e:
+        logger.error(f"[WS] Chat send_message error: {e}")
+        response = {
+            "type": "chat.error",
+            "payload": {
+                "error": str(e),
+                "source": "send_message"
+            }
+        }
+    await ws.send_text(_json.dumps(response))
+    logger.info(f"[WS] Chat send_message response sent - uid={uid}")
+
+
+@router.route("chat.start_onboarding")
+async def _handle_chat_start_onboarding(ctx: WSContext, msg_payload: Dict[str, Any]) -> None:
+    uid = ctx.uid
+    # Start onboarding chat after company creation
+    # Triggered when user lands on /chat/{thread_key}?action=create
+    from .frontend.pages.chat.handlers import get_chat_handlers
+    # Note: hub and WS_EVENTS are already imported at module level
+
+    thread_key = msg_payload.get("thread_key")
+    company_id = msg_payload.get("company_id")
+
+    logger.info(f"[WS] Chat start_onboarding - uid={uid} thread={thread_key} company={company_id}")
+
+    try:
+        handlers = get_chat_handlers()
+        result = await handlers.start_onboarding_chat(
+            uid=uid,
+            company_id=company_id,
+            thread_key=thread_key,
+        )
+
+        # Broadcast onboarding_started event
+        await hub.broadcast(uid, {
+            "type": WS_EVENTS.CHAT.ONBOARDING_STARTED,
+            "payload": result
+        })
+        logger.info(f"[WS] Chat start_onboarding completed - uid={uid} success={result.get('success')}")
+
+    except Exception as e:
+        logger.error(f"[WS] Chat start_onboarding error: {e}")
+        await hub.broadcast(uid, {
+            "type": WS_EVENTS.CHAT.ERROR,
+            "payload": {
+                "error": str(e),
+                "source": "start_onboarding"
+            }
+        })
+
+
+@router.route("llm.stop_streaming", concurrency=PARALLEL)
+async def _handle_llm_stop_streaming(ctx: WSContext, msg_payload: Dict[str, Any]) -> None:
+    ws, uid = ctx.ws, ctx.uid
+    # Stop the current LLM streaming response - delegue au worker
+    from .llm_service.llm_gateway import get_llm_gateway
+
+    thread_key = msg_payload.get("session_id")  # thread_key from frontend
+    company_id = msg_payload.get("company_id")
+
+    logger.info(f"[WS] LLM stop_streaming request - uid={uid} company={company_id} thread={thread_key}")
+
+    try:
+        gateway = get_llm_gateway()
+        result = await gateway.enqueue_stop_streaming(
+            user_id=uid,
+            collection_name=company_id,
+            thread_key=thread_key,  # session_id from frontend is the thread_key
+        )
+        # Note: Le worker enverra la reponse via Redis PubSub -> WebSocket
+        # On envoie une confirmation immediate que le job est enqueue
+        response = {
+            "type": "llm.stop_streaming_queued",
+            "payload": {
+                "success": True,
+                "session_id": thread_key,
+                "job_id": result.get("job_id"),
+                "message": "Stop streaming request queued",
+            }
+        }
+    except Exception as e:
+        logger.error(f"[WS] LLM stop_streaming error: {e}")
+        response = {
+            "type": "llm.stream_interrupted",
+            "payload": {
+                "success": False,
+                "session_id": thread_key,
+                "accumulated_content": "",
+                "reason": "error",
+                "error": str(e),
+            }
+        }
+    await ws.send_text(_json.dumps(response))
+    logger.info(f"[WS] LLM stop_streaming response sent - uid={uid}")
+
+
+# ═══════════════════════════════════════════════════════════════
+# ROUTING UPLOAD & INSTRUCTION TEMPLATES
+# ═══════════════════════════════════════════════════════════════
+
+@router.route("routing.upload")
+async def _handle_routing_upload(ctx: WSContext, msg_payload: Dict[str, Any]) -> None:
+    uid = ctx.uid
+    # ── Upload files to Google Drive (input_drive_doc_id) ──
+    import base64 as _b64
+    from .ws_hub import hub as _hub
+    company_id = msg_payload.get("company_id", "")
+    ws_files = msg_payload.get("files", [])
+    logger.info(f"[WS] Routing upload - uid={uid} company={company_id} files={len(ws_files)}")
+
+    async def _ws_drive_upload(_uid, _company_id, _files):
+        """Background: decode base64, lookup Drive folder, upload each file."""
+        try:
+            from .redis_client import get_redis as _get_redis
+            _r = _get_redis()
+            ctx_key = f"company:{_uid}:{_company_id}:context"
+            raw_ctx = _r.get(ctx_key)
+            if not raw_ctx:
+                logger.error(f"[ROUTING_UPLOAD_WS] Context not found: {ctx_key}")
+                await _hub.broadcast(_uid, {"type": "routing.error", "payload": {"error": "Company context not found", "file_name": ""}})
+                return
+            company_ctx = _json.loads(raw_ctx) if isinstance(raw_ctx, str) else raw_ctx
+            input_drive_id = company_ctx.get("input_drive_doc_id") or company_ctx.get("inputDriveDocId")
+            mandate_path = company_ctx.get("mandatePath", company_ctx.get("mandate_path", ""))
+            if not input_drive_id:
+                logger.error(f"[ROUTING_UPLOAD_WS] input_drive_doc_id missing in context")
+                await _hub.broadcast(_uid, {"type": "routing.error", "payload": {"error": "input_drive_doc_id not found in company context", "file_name": ""}})
+                return
+
+            from .driveClientService import DriveClientServiceSingleton
+            drive = DriveClientServiceSingleton()
+
+            for f in _files:
+                fname = f.get("name", "unknown")
+                ftype = f.get("type", "application/octet-stream")
+                fdata = f.get("data", "")
+                try:
+                    file_bytes = _b64.b64decode(fdata)
+                except Exception as dec_err:
+                    logger.error(f"[ROUTING_UPLOAD_WS] base64 decode failed for {fname}: {dec_err}")
+                    await _hub.broadcast(_uid, {"type": "routing.error", "payload": {"error": f"Decode error: {fname}", "file_name": fname}})
+                    continue
+
+                result = await drive.upload_file_to_drive(
+                    user_id=_uid,
+                    file_bytes=file_bytes,
+                    file_name=fname,
+                    folder_id=input_drive_id,
+                    mime_type=ftype,
+                )
+                if not result.get("success"):
+                    err = result.get("error", "Drive upload failed")
+                    logger.error(f"[ROUTING_UPLOAD_WS] Drive failed for {fname}: {err}")
+                    await _hub.broadcast(_uid, {
+                        "type": "routing.error",
+                        "payload": {"error": err, "file_name": fname, "oauth_reauth_required": result.get("oauth_reauth_required", False)},
+                    })
+                    continue
+
+                logger.info(f"[ROUTING_UPLOAD_WS] ✅ Uploaded {fname} → file_id={result.get('file_id')}")
+                await _hub.broadcast(_uid, {
+                    "type": "routing.uploaded",
+                    "payload": {
+                        "file_id": result.get("file_id"),
+                        "file_name": result.get("file_name", fname),
+                        "web_view_link": result.get("web_view_link"),
+                        "company_id": _company_id,
+                    },
+                })
+
+            # Refresh Drive cache after all uploads
+            try:
+                from .drive_cache_handlers import drive_cache_handlers
+                await drive_cache_handlers.refresh_documents(
+                    user_id=_uid,
+                    company_id=_company_id,
+                    input_drive_id=input_drive_id,
+                    mandate_path=mandate_path,
+                )
+                logger.info(f"[ROUTING_UPLOAD_WS] Cache refreshed uid={_uid}")
+            except Exception as cache_err:
+                logger.warning(f"[ROUTING_UPLOAD_WS] Cache refresh failed: {cache_err}")
+        except Exception as exc:
+            logger.error(f"[ROUTING_UPLOAD_WS] Background task failed: {exc}", exc_info=True)
+            try:
+                await _hub.broadcast(_uid, {"type": "routing.error", "payload": {"error": str(exc), "file_name": ""}})
+            except Exception:
+                pass
+
+    import asyncio as _aio_upload
+    _aio_upload.create_task(_ws_drive_upload(uid, company_id, ws_files))
+    logger.info(f"[WS] Routing upload task launched - uid={uid}")
+
+
+@router.route(
+    "routing.templates_list",
+    "invoices.templates_list",
+    "banking.templates_list",
+    concurrency=PARALLEL,
+    lane="templates",
+)
+async def _handle_templates_list(ctx: WSContext, msg_payload: Dict[str, Any]) -> None:
+    uid, session_id, msg_type = ctx.uid, ctx.session_id, ctx.msg_type
+    page_name = msg_type.split(".")[0]
+    from .frontend.pages.shared.instruction_templates_handlers import handle_templates_list
+    await handle_templates_list(uid, session_id, msg_payload, page_name)
+    logger.info(f"[WS] {page_name}.templates_list handled - uid={uid}")
+
+
+@router.route(
+    "routing.templates_create",
+    "invoices.templates_create",
+    "banking.templates_create",
+    concurrency=SERIAL,
+    lane="templates",
+)
+async def _handle_templates_create(ctx: WSContext, msg_payload: Dict[str, Any]) -> None:
+    uid, session_id, msg_type = ctx.uid, ctx.session_id, ctx.msg_type
+    page_name = msg_type.split(".")[0]
+    from .frontend.pages.shared.instruction_templates_handlers import handle_templates_create
+    await handle_templates_create(uid, session_id, msg_payload, page_name)
+    logger.info(f"[WS] {page_name}.templates_create handled - uid={uid}")
+
+
+@router.route(
+    "routing.templates_update",
+    "invoices.templates_update",
+    "banking.templates_update",
+    concurrency=SERIAL,
+    lane="templates",
+)
+async def _handle_templates_update(ctx: WSContext, msg_payload: Dict[str, Any]) -> None:
+    uid, session_id, msg_type = ctx.uid, ctx.session_id, ctx.msg_type
+    page_name = msg_type.split(".")[0]
+    from .frontend.pages.shared.instruction_templates_handlers import handle_templates_update
+    await handle_templates_update(uid, session_id, msg_payload, page_name)
+    logger.info(f"[WS] {page_name}.templates_update handled - uid={uid}")
+
+
+@router.route(
+    "routing.templates_delete",
+    "invoices.templates_delete",
+    "banking.templates_delete",
+    concurrency=SERIAL,
+    lane="templates",
+)
+async def _handle_templates_delete(ctx: WSContext, msg_payload: Dict[str, Any]) -> None:
+    uid, session_id, msg_type = ctx.uid, ctx.session_id, ctx.msg_type
+    page_name = msg_type.split(".")[0]
+    from .frontend.pages.shared.instruction_templates_handlers import handle_templates_delete
+    await handle_templates_delete(uid, session_id, msg_payload, page_name)
+    logger.info(f"[WS] {page_name}.templates_delete handled - uid={uid}")
+
+
+def get_ws_router() -> WSMessageRouter:
+    """Retourne la table de routage WebSocket."""
+    return router
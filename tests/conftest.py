@@ -0,0 +1,164 @@
+"""
+Fixtures partagées des tests.
+
+InMemoryRTDB imite le sous-ensemble de firebase_admin.db.Reference utilisé
+par FirebaseRealtimeChat (child, get(shallow), set, update multi-chemins avec
+ServerValue.increment, push, delete, order_by_key() avec start_at / end_at /
+limit_to_last) et compte les octets lus.
+"""
+
+import copy
+import itertools
+import json
+
+import pytest
+
+
+# ═══════════════════════════════════════════════════════════════
+# RTDB EN MÉMOIRE
+# ═══════════════════════════════════════════════════════════════
+
+class InMemoryRTDB:
+    """Référence racine d'une RTDB en mémoire (compte les octets lus)."""
+
+    def __init__(self):
+        self.data = {}
+        self.bytes_read = 0
+        self._push_ids = itertools.count()
+
+    def child(self, path):
+        return _Ref(self, [p for p in path.strip("/").split("/") if p])
+
+    def reset_counters(self):
+        self.bytes_read = 0
+
+
+class _Ref:
+    def __init__(self, db, parts):
+        self._db = db
+        self._parts = parts
+
+    def child(self, path):
+        return _Ref(self._db, self._parts + [p for p in path.strip("/").split("/") if p])
+
+    # ─── lecture ───
+
+    def _node(self):
+        node = self._db.data
+        for part in self._parts:
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return node
+
+    def _read(self, value):
+        if value is not None:
+            self._db.bytes_read += len(json.dumps(value))
+        return value
+
+    def get(self, etag=False, shallow=False):
+        node = self._node()
+        if shallow and isinstance(node, dict):
+            return self._read({key: True for key in node})
+        return self._read(copy.deepcopy(node))
+
+    def order_by_key(self):
+        return _Query(self)
+
+    # ─── écriture ───
+
+    def _parent(self, create=True):
+        node = self._db.data
+        for part in self._parts[:-1]:
+            if not isinstance(node.get(part), dict):
+                if not create:
+                    return None
+                node[part] = {}
+            node = node[part]
+        return node
+
+    def set(self, value):
+        if value is None or value == {}:
+            self.delete()
+            return None
+        self._parent()[self._parts[-1]] = copy.deepcopy(value)
+        return None
+
+    def update(self, value):
+        for path, item in value.items():
+            ref = self.child(path)
+            if isinstance(item, dict) and ".sv" in item:
+                current = ref._node()
+                item = (current if isinstance(current, (int, float)) else 0) + item[".sv"]["increment"]
+            if item is None:
+                ref.delete()
+            else:
+                ref.set(item)
+        return None
+
+    def push(self, value=""):
+        # Push IDs chronologiques (comme Firebase)
+        push_id = f"-N{next(self._db._push_ids):012d}"
+        ref = self.child(push_id)
+        ref.set(value)
+        return ref
+
+    @property
+    def key(self):
+        return self._parts[-1] if self._parts else None
+
+    def delete(self):
+        parent = self._parent(create=False)
+        if parent is not None:
+            parent.pop(self._parts[-1], None)
+
+
+class _Query:
+    def __init__(self, ref):
+        self._ref = ref
+        self._limit_last = None
+        self._start = None
+        self._end = None
+
+    def limit_to_last(self, n):
+        self._limit_last = n
+        return self
+
+    def start_at(self, key):
+        self._start = key
+        return self
+
+    def end_at(self, key):
+        self._end = key
+        return self
+
+    def get(self):
+        node = self._ref._node()
+        if not isinstance(node, dict):
+            return None
+        keys = sorted(node)
+        if self._start is not None:
+            keys = [k for k in keys if k >= self._start]
+        if self._end is not None:
+            keys = [k for k in keys if k <= self._end]
+        if self._limit_last:
+            keys = keys[-self._limit_last:]
+        return self._ref._read({key: copy.deepcopy(node[key]) for key in keys})
+
+
+@pytest.fixture
+def rtdb():
+    return InMemoryRTDB()
+
+
+@pytest.fixture
+def make_realtime_chat():
+    """Fabrique de FirebaseRealtimeChat branché sur une RTDB en mémoire (sans Firebase)."""
+    from app.firebase_providers import FirebaseRealtimeChat
+
+    def _make(db):
+        chat = object.__new__(FirebaseRealtimeChat)
+        chat.db = db
+        return chat
+
+    return _make
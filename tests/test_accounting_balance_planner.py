@@ -0,0 +1,156 @@
+"""
+Tests unitaires pour le planificateur des requetes de soldes (period_balances).
+
+Ces tests valident:
+1. Le decoupage mois complets (period_balances) / bornes partielles (gl_entries)
+2. La lecture brute integrale quand les soldes sont en retard sur le GL
+3. La sous-requete generee (parametres, filtre de prefixe de compte)
+4. Le cache par (societe, requete, versions) dans AccountingRPCHandlers
+
+Usage:
+    python -m pytest tests/test_accounting_balance_planner.py -v
+"""
+
+from datetime import date
+
+import pytest
+
+from app.tools.accounting_balance_planner import (
+    BalanceQueryCache,
+    PeriodPlan,
+    balances_fresh,
+    build_source_sql,
+    plan_period,
+)
+
+
+# ═══════════════════════════════════════════════════════════════
+# FIXTURES
+# ═══════════════════════════════════════════════════════════════
+
+def _idx(year, month):
+    return year * 12 + month - 1
+
+
+class FakeConn:
+    def __init__(self, queries):
+        self.queries = queries
+
+    async def fetch(self, sql, *params):
+        self.queries.append((sql, params))
+        return [{"group_key": "6000", "label": "Charges", "total_debit": 10, "total_credit": 0,
+                 "balance": 10, "entry_count": 2}]
+
+
+class FakeAcquire:
+    def __init__(self, conn):
+        self.conn = conn
+
+    async def __aenter__(self):
+        return self.conn
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakePool:
+    def __init__(self):
+        self.queries = []
+
+    def acquire(self):
+        return FakeAcquire(FakeConn(self.queries))
+
+
+class FakeManager:
+    def __init__(self):
+        self.pool = FakePool()
+        self.versions = {
+            "gl": {"dataset_version": 7, "last_sync_time": None},
+            "period_balances": {"dataset_version": 7, "last_sync_time": None},
+        }
+
+    async def get_company_id_from_mandate_path(self, mandate_path):
+        return "company-uuid"
+
+    async def get_pool(self):
+        return self.pool
+
+    async def get_dataset_versions(self, company_id):
+        return self.versions
+
+
+# ═══════════════════════════════════════════════════════════════
+# TESTS
+# ═══════════════════════════════════════════════════════════════
+
+def test_plan_splits_full_months_and_partial_bounds():
+    plan = plan_period(date(2025, 1, 15), date(2025, 6, 10))
+    assert (plan.month_from, plan.month_to) == (_idx(2025, 2), _idx(2025, 5))
+    assert plan.raw_ranges == (
+        (date(2025, 1, 15), date(2025, 1, 31)),
+        (date(2025, 6, 1), date(2025, 6, 10)),
+    )
+
+    # Bornes alignees: aucune lecture brute
+    plan = plan_period(date(2024, 1, 1), date(2024, 12, 31))
+    assert (plan.month_from, plan.month_to, plan.raw_ranges) == (_idx(2024, 1), _idx(2024, 12), ())
+
+    # Solde a date: tous les mois complets + debut du mois courant
+    plan = plan_period(None, date(2025, 3, 20))
+    assert (plan.month_from, plan.month_to) == (None, _idx(2025, 2))
+    assert plan.raw_ranges == ((date(2025, 3, 1), date(2025, 3, 20)),)
+
+    # Periode a l'interieur d'un mois: brut uniquement
+    plan = plan_period(date(2025, 2, 3), date(2025, 2, 20))
+    assert not plan.uses_balances and plan.raw_ranges == ((date(2025, 2, 3), date(2025, 2, 20)),)
+
+
+def test_stale_balances_fall_back_to_raw_scan():
+    assert plan_period(date(2025, 1, 1), date(2025, 12, 31), use_balances=False) == PeriodPlan(
+        raw_ranges=((date(2025, 1, 1), date(2025, 12, 31)),)
+    )
+    assert balances_fresh({"gl": {"dataset_version": 3}, "period_balances": {"dataset_version": 3}})
+    assert not balances_fresh({"gl": {"dataset_version": 4}, "period_balances": {"dataset_version": 3}})
+    assert not balances_fresh({"gl": {"dataset_version": 4}})
+
+
+def test_source_sql_params():
+    params = ["company-uuid"]
+    sql = build_source_sql(plan_period(date(2025, 1, 15), date(2025, 3, 31)), params, account_prefix="6")
+
+    assert "accounting.period_balances" in sql and "accounting.gl_entries" in sql
+    assert sql.count("UNION ALL") == 1
+    assert params == ["company-uuid", "6", _idx(2025, 3), _idx(2025, 2), date(2025, 1, 31), date(2025, 1, 15)]
+
+    params = ["company-uuid"]
+    sql = build_source_sql(plan_period(date(2025, 1, 15), date(2025, 3, 31), use_balances=False), params)
+    assert "period_balances" not in sql and "LIKE" not in sql
+
+
+@pytest.mark.asyncio
+async def test_handlers_cache_per_dataset_version(monkeypatch):
+    from app import accounting_rpc_handlers as rpc
+    import app.tools.accounting_balance_planner as planner
+
+    manager = FakeManager()
+    monkeypatch.setattr(rpc, "get_neon_accounting_manager", lambda: manager)
+    monkeypatch.setattr(planner, "_balance_query_cache", BalanceQueryCache())
+    handlers = rpc.AccountingRPCHandlers()
+
+    first = await handlers.get_account_balance("mandate/path", "6", as_of="2025-06-30")
+    again = await handlers.get_account_balance("mandate/path", "6", as_of="2025-06-30")
+
+    assert first == again and first["balances"][0]["group_key"] == "6000"
+    assert len(manager.pool.queries) == 1
+    assert "accounting.period_balances" in manager.pool.queries[0][0]
+
+    # Nouvelle version GL, soldes pas encore a jour → lecture brute
+    manager.versions["gl"]["dataset_version"] = 8
+    await handlers.get_account_balance("mandate/path", "6", as_of="2025-06-30")
+    assert len(manager.pool.queries) == 2
+    assert "accounting.period_balances" not in manager.pool.queries[1][0]
+
+    result = await handlers.compare_periods(
+        "mandate/path", "2025-01-01", "2025-03-31", "2024-01-01", "2024-03-31", metric="revenue",
+    )
+    assert result["success"] and len(manager.pool.queries) == 4
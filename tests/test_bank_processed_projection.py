@@ -0,0 +1,133 @@
+"""
+Tests unitaires pour la projection des transactions bancaires traitées.
+
+Ces tests valident:
+1. La construction depuis les documents task_manager (statuts traités seuls)
+2. L'application des événements (upsert mergé, suppression, ignorés sans projection)
+3. Le filtrage par compte
+4. BANKING.list: une seule lecture Firestore, puis lecture de la projection
+   (événements et pagination inclus)
+
+Usage:
+    python -m pytest tests/test_bank_processed_projection.py -v
+"""
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.cache.bank_processed_projection import BankProcessedProjection
+
+
+# ═══════════════════════════════════════════════════════════════
+# FIXTURES
+# ═══════════════════════════════════════════════════════════════
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+@pytest.fixture
+def projection(redis_client):
+    return BankProcessedProjection(redis_client)
+
+
+def _doc(doc_id, status="matched", account_id="10", amount=100.0, date="2026-01-01"):
+    return {
+        "firebase_doc_id": doc_id,
+        "data": {
+            "status": status,
+            "transaction_id": doc_id.split("_")[-1],
+            "account_id": account_id,
+            "account_name": f"Compte {account_id}",
+            "description": f"Paiement {doc_id}",
+            "amount": amount,
+            "date": date,
+        },
+    }
+
+
+# ═══════════════════════════════════════════════════════════════
+# TESTS
+# ═══════════════════════════════════════════════════════════════
+
+def test_rebuild_keeps_processed_statuses_only(projection):
+    docs = [_doc("job_1"), _doc("job_2", status="close"), _doc("job_3", status="in_queue"), _doc("job_4", status="rejection")]
+
+    assert projection.get_version("u1", "c1") is None
+    assert projection.rebuild("u1", "c1", docs) == 2
+
+    entries = projection.get_entries("u1", "c1")
+    assert sorted(e["id"] for e in entries) == ["job_1", "job_2"]
+    assert all(e["status"] == "processed" for e in entries)
+    assert projection.get_version("u1", "c1") is not None
+
+
+def test_events_upsert_merge_and_remove(projection):
+    # Sans projection construite: ignoré
+    assert projection.apply_event("u1", "c1", "job_9", {"status": "completed"}) is None
+
+    projection.rebuild("u1", "c1", [_doc("job_1")])
+    version = projection.get_version("u1", "c1")
+
+    # Item du cache bank (format ERP) qui passe à traité
+    erp_item = {"id": "577", "name": "Virement ACME", "journal_id": 12, "amount": -42.5, "status": "completed"}
+    assert projection.apply_event("u1", "c1", "job_577", erp_item, status="success") == "upsert"
+    # Delta partiel sans status: merge sans écraser les champs connus
+    assert projection.apply_event("u1", "c1", "job_577", {"partner_name": "ACME", "amount": None}) == "upsert"
+
+    entry = {e["id"]: e for e in projection.get_entries("u1", "c1")}["job_577"]
+    assert entry["description"] == "Virement ACME"
+    assert entry["account_id"] == "12"
+    assert entry["partner_name"] == "ACME"
+    assert entry["amount"] == -42.5
+    assert projection.get_version("u1", "c1") != version
+
+    # Relance: sortie de l'onglet processed
+    assert projection.apply_event("u1", "c1", "job_1", {}, status="in_queue") == "remove"
+    assert [e["id"] for e in projection.get_entries("u1", "c1")] == ["job_577"]
+
+
+def test_account_filter(projection):
+    projection.rebuild("u1", "c1", [_doc("job_1", account_id="10"), _doc("job_2", account_id="20")])
+
+    assert [e["id"] for e in projection.get_entries("u1", "c1", account_id="20")] == ["job_2"]
+
+
+@pytest.mark.asyncio
+async def test_banking_list_reads_projection_after_first_build(redis_client, monkeypatch):
+    import app.cache.bank_processed_projection as projection_module
+    from app.frontend.pages.banking import handlers as banking_handlers
+
+    monkeypatch.setattr(projection_module, "_projection", BankProcessedProjection(redis_client))
+
+    class FakeCacheHandlers:
+        async def get_bank_transactions(self, **kwargs):
+            return {"data": {"to_process": [], "in_process": [], "pending": []}, "source": "cache", "cached_at": "t0"}
+
+    class FakeFirebaseManagement:
+        calls = 0
+
+        def fetch_journal_entries_by_mandat_id_without_source(self, user_id, mandat_id, departement):
+            FakeFirebaseManagement.calls += 1
+            return [_doc(f"job_{i}", date=f"2026-01-{i + 1:02d}") for i in range(25)]
+
+    monkeypatch.setattr(banking_handlers, "get_firebase_cache_handlers", lambda: FakeCacheHandlers())
+    monkeypatch.setattr(banking_handlers, "get_firebase_management", lambda: FakeFirebaseManagement())
+
+    handlers = banking_handlers.BankingHandlers()
+    first = await handlers.list_transactions("u1", "c1", "mandate/path", category="processed", page=1, page_size=10)
+    second = await handlers.list_transactions("u1", "c1", "mandate/path", category="processed", page=3, page_size=10)
+
+    assert FakeFirebaseManagement.calls == 1
+    assert len(first["data"]["processed"]) == 10
+    assert len(second["data"]["processed"]) == 5
+    assert first["data"]["counts"]["processed"] == 25
+
+    # Événement task_manager → visible sans relecture Firestore
+    projection_module._projection.apply_event("u1", "c1", "job_new", {"name": "Nouveau", "amount": 5}, status="matched")
+    third = await handlers.list_transactions("u1", "c1", "mandate/path", category="processed", search="nouveau")
+
+    assert FakeFirebaseManagement.calls == 1
+    assert [tx["id"] for tx in third["data"]["processed"]] == ["job_new"]
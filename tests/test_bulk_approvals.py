@@ -0,0 +1,308 @@
+"""
+Tests unitaires pour l'envoi groupé des approbations (Router/Banker/APbookeeper).
+
+Ces tests valident:
+1. 200 approbations: une lecture get_all et un commit WriteBatch par lot,
+   lots exécutés en parallèle, résultat par item
+2. Rejets (statut / fermeture), item introuvable et décision en double
+   rapportés par item sans bloquer le reste du lot
+3. APBookkeeper: merge des modifications et dispatch worker en pipeline Redis
+4. Un commit en échec est rejoué item par item: seul l'item fautif échoue
+5. Une décision invalide ou un item corrompu n'échoue que pour lui-même
+6. _format_apbookeeper_item: résolution des noms via index id → entrée
+
+Usage:
+    python -m pytest tests/test_bulk_approvals.py -v
+"""
+
+import json
+import threading
+import time
+from unittest.mock import AsyncMock
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app import firebase_providers
+from app.firebase_providers import FirebaseManagement
+from app.wrappers import approval_handlers
+from app.wrappers.approval_handlers import ApprovalHandlers
+
+MANDATE = "bo_clients/client-1/mandates/company-1"
+
+
+# ═══════════════════════════════════════════════════════════════
+# FIXTURES
+# ═══════════════════════════════════════════════════════════════
+
+class FakeSnapshot:
+    def __init__(self, ref, data):
+        self.reference = ref
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return json.loads(json.dumps(self._data))
+
+
+class FakeRef:
+    def __init__(self, db, path):
+        self._db = db
+        self.path = path
+
+    def document(self, doc_id):
+        return FakeRef(self._db, f"{self.path}/{doc_id}")
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self._db = db
+        self._ops = []
+
+    def set(self, ref, data):
+        self._ops.append(("set", ref.path, data))
+
+    def update(self, ref, data):
+        self._ops.append(("update", ref.path, data))
+
+    def delete(self, ref):
+        self._ops.append(("delete", ref.path, None))
+
+    def commit(self):
+        self._db.commit_started()
+        try:
+            time.sleep(self._db.commit_delay)
+            if self._db.fail_commits:
+                self._db.fail_commits -= 1
+                raise RuntimeError("commit failed")
+            if any(path == self._db.fail_path for _, path, _ in self._ops):
+                raise RuntimeError("invalid document")
+            for op, path, data in self._ops:
+                if op == "set":
+                    self._db.docs[path] = data
+                elif op == "update":
+                    self._db.docs[path] = {**self._db.docs[path], **data}
+                else:
+                    self._db.docs.pop(path, None)
+            self._db.commits.append(len(self._ops))
+        finally:
+            self._db.commit_finished()
+
+
+class FakeFirestore:
+    def __init__(self, commit_delay=0.0):
+        self.docs = {}
+        self.commits = []
+        self.get_all_calls = 0
+        self.commit_delay = commit_delay
+        self.fail_commits = 0
+        self.fail_path = None
+        self._lock = threading.Lock()
+        self._active = 0
+        self.max_parallel_commits = 0
+
+    def document(self, path):
+        return FakeRef(self, path)
+
+    def collection(self, path):
+        return FakeRef(self, path)
+
+    def get_all(self, refs):
+        self.get_all_calls += 1
+        return [FakeSnapshot(ref, self.docs.get(ref.path)) for ref in refs]
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def commit_started(self):
+        with self._lock:
+            self._active += 1
+            self.max_parallel_commits = max(self.max_parallel_commits, self._active)
+
+    def commit_finished(self):
+        with self._lock:
+            self._active -= 1
+
+
+@pytest.fixture
+def env(monkeypatch):
+    import app.redis_client as redis_client
+
+    db = FakeFirestore()
+    firebase = object.__new__(FirebaseManagement)
+    firebase.db = db
+    redis = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(redis_client, "get_redis", lambda: redis)
+    monkeypatch.setattr(approval_handlers, "get_redis", lambda: redis)
+    monkeypatch.setattr(approval_handlers, "FirebaseManagement", lambda: firebase)
+    monkeypatch.setattr(approval_handlers.hub, "broadcast", AsyncMock())
+    return db, redis
+
+
+def _pending(db, item_id, data=None, context=False):
+    db.docs[f"{MANDATE}/approval_pendinglist/{item_id}"] = data or {"file_name": f"{item_id}.pdf"}
+    if context:
+        db.docs[f"{MANDATE}/approval_context/{item_id}"] = {"ctx": True}
+
+
+# ═══════════════════════════════════════════════════════════════
+# TESTS
+# ═══════════════════════════════════════════════════════════════
+
+@pytest.mark.asyncio
+async def test_200_router_approvals_batched_and_concurrent(env):
+    db, redis = env
+    db.commit_delay = 0.05
+    for i in range(200):
+        _pending(db, f"router_{i}", {"context_payload": {"drive_file_id": f"drive-{i}"}}, context=i % 2 == 0)
+    approvals = [
+        {"itemId": f"router_{i}", "approved": True, "selectedService": "invoices", "selectedFiscalYear": "2026"}
+        for i in range(200)
+    ]
+
+    start = time.perf_counter()
+    result = await ApprovalHandlers().send_router_approvals("u1", "company-1", MANDATE, approvals)
+    elapsed = time.perf_counter() - start
+
+    data = result["data"]
+    assert result["success"] and data["processed"] == 200 and data["failed"] == 0
+    assert [r["itemId"] for r in data["results"]] == [f"router_{i}" for i in range(200)]
+    assert db.get_all_calls == len(db.commits) == 4
+    assert db.max_parallel_commits > 1 and elapsed < 0.2 * 4
+
+    notification = db.docs["clients/u1/notifications/router_7"]
+    assert notification["file_id"] == "drive-7" and notification["selected_service"] == "invoices"
+    assert notification["approval_response_mode"] and notification["collection_id"] == "company-1"
+    assert not any("approval_pendinglist" in path or "approval_context" in path for path in db.docs)
+
+
+@pytest.mark.asyncio
+async def test_rejections_missing_and_duplicates_reported_per_item(env):
+    db, _ = env
+    for item_id in ("banker_1", "banker_2", "banker_3"):
+        _pending(db, item_id, context=True)
+
+    result = await ApprovalHandlers().send_banker_approvals("u1", "company-1", MANDATE, [
+        {"itemId": "banker_1", "approved": False, "rejectionReason": "wrong account"},
+        {"itemId": "banker_2", "approved": False, "close": True},
+        {"itemId": "banker_missing", "approved": True},
+        {"itemId": "banker_3", "approved": True},
+        {"itemId": "banker_3", "approved": False},
+    ])
+
+    data = result["data"]
+    assert (data["processed"], data["failed"]) == (3, 2)
+    assert [r["success"] for r in data["results"]] == [True, True, False, True, False]
+    assert data["results"][2]["error"] == "Item not found"
+    assert data["results"][4]["error"] == "Duplicate decision"
+
+    rejected = db.docs[f"{MANDATE}/approval_pendinglist/banker_1"]
+    assert rejected["status"] == "rejected" and rejected["rejection_reason"] == "wrong account"
+    assert f"{MANDATE}/approval_context/banker_1" in db.docs
+    assert f"{MANDATE}/approval_pendinglist/banker_2" not in db.docs
+    assert f"{MANDATE}/approval_context/banker_2" not in db.docs
+    assert db.docs["clients/u1/notifications/banker_3"]["function_name"] == "Bankbookeeper"
+
+
+@pytest.mark.asyncio
+async def test_apbookeeper_merges_updates_and_dispatches(env):
+    db, redis = env
+    _pending(db, "apbookeeper_1", {
+        "file_id": "f1",
+        "context_payload": {"invoice_details": {"ref": "INV-1", "amount_total": 100}},
+    })
+    pubsub = redis.pubsub()
+    pubsub.subscribe("user:u1/pending_approval")
+    pubsub.get_message(timeout=0.1)
+
+    result = await ApprovalHandlers().send_apbookeeper_approvals("u1", "company-1", MANDATE, [{
+        "itemId": "apbookeeper_1",
+        "approved": True,
+        "selectedMode": "invoice",
+        "updatedData": {"amount_total": 120, "accounting_lines": [{"account_id": 7}]},
+    }])
+
+    assert result["data"]["processed"] == 1
+    dispatch = json.loads(redis.rpop(firebase_providers.APPROVAL_DISPATCH_QUEUE))
+    assert dispatch["job_id"] == "apbookeeper_1" and dispatch["collection_id"] == "company-1"
+    assert dispatch["context_payload"]["invoice_details"] == {"ref": "INV-1", "amount_total": 120}
+    assert dispatch["context_payload"]["accounting_lines"] == [{"account_id": 7}]
+    notification = db.docs["clients/u1/notifications/apbookeeper_1"]
+    assert notification["context_payload"] == dispatch["context_payload"]
+
+    message = json.loads(pubsub.get_message(timeout=0.5)["data"])
+    assert message["action"] == "remove" and message["department"] == "invoices"
+
+
+@pytest.mark.asyncio
+async def test_failed_commit_only_fails_the_bad_item(env, monkeypatch):
+    db, _ = env
+    monkeypatch.setattr(approval_handlers, "APPROVAL_CHUNK_SIZE", 10)
+    monkeypatch.setattr(approval_handlers, "APPROVAL_MAX_CONCURRENCY", 1)
+    for i in range(30):
+        _pending(db, f"router_{i}")
+    db.fail_commits = 1
+    db.fail_path = f"{MANDATE}/approval_pendinglist/router_4"
+
+    result = await ApprovalHandlers().send_router_approvals(
+        "u1", "company-1", MANDATE, [{"itemId": f"router_{i}", "approved": True} for i in range(30)]
+    )
+
+    data = result["data"]
+    assert (data["processed"], data["failed"]) == (29, 1)
+    assert data["errors"] == [{"itemId": "router_4", "error": "invalid document"}]
+    assert f"{MANDATE}/approval_pendinglist/router_4" in db.docs
+    assert "clients/u1/notifications/router_4" not in db.docs
+    assert "clients/u1/notifications/router_5" in db.docs
+
+
+@pytest.mark.asyncio
+async def test_bad_decision_or_item_does_not_abort_batch(env):
+    db, _ = env
+    _pending(db, "apbookeeper_1", {"context_payload": {"invoice_details": {"ref": "INV-1"}}})
+    _pending(db, "apbookeeper_2", {"context_payload": "corrupted"})
+    _pending(db, "apbookeeper_3", {"context_payload": {"invoice_details": {"ref": "INV-3"}}})
+
+    result = await ApprovalHandlers().send_apbookeeper_approvals("u1", "company-1", MANDATE, [
+        {"itemId": "apbookeeper_1", "approved": True},
+        None,
+        {"itemId": "apbookeeper_2", "approved": True, "updatedData": {"accounting_lines": []}},
+        {"itemId": "apbookeeper_3", "approved": True},
+    ])
+
+    data = result["data"]
+    assert result["success"] and (data["processed"], data["failed"]) == (2, 2)
+    assert [r["success"] for r in data["results"]] == [True, False, False, True]
+    assert data["results"][1]["error"].startswith("Invalid decision")
+    assert data["results"][2]["itemId"] == "apbookeeper_2"
+    assert f"{MANDATE}/approval_pendinglist/apbookeeper_2" in db.docs
+    assert f"{MANDATE}/approval_pendinglist/apbookeeper_3" not in db.docs
+
+
+def test_format_apbookeeper_item_resolves_names_by_id():
+    item = {
+        "id": "apbookeeper_1",
+        "context_payload": {
+            "invoice_details": {"partner_id": 3, "currency_id": "1"},
+            "accounting_lines": [
+                {"name": "Loyer", "account_id": "610", "tax_ids": [1, "2", 9]},
+                {"account_id": 999},
+            ],
+        },
+        "dropdown_options": {
+            "suppliers": [{"id": "3", "name": "Swisscom"}],
+            "currencies": [{"id": 1, "name": "CHF"}],
+            "accounts": [{"id": 610, "name": "Loyers", "code": "6100"}],
+            "taxes": [{"id": 1, "name": "TVA 8.1%"}, {"id": 2, "name": "TVA 2.6%"}],
+        },
+    }
+
+    formatted = ApprovalHandlers()._format_apbookeeper_item(item)
+
+    details = formatted["invoiceDetails"]
+    assert details["partner_name"] == "Swisscom" and details["currency_name"] == "CHF"
+    first, second = formatted["accountingLines"]
+    assert (first["account_name"], first["account_code"]) == ("Loyers", "6100")
+    assert first["tax_names"] == ["TVA 8.1%", "TVA 2.6%"] and first["description"] == "Loyer"
+    assert "account_name" not in second
@@ -0,0 +1,398 @@
+"""
+Tests unitaires pour le moteur de suppression en masse (bulk_deletion).
+
+Ces tests valident:
+1. Suppression d'un arbre Firestore (sous-collections imbriquées) en
+   parallèle, par lots, sans rien laisser derrière
+2. Reprise après crash: les collections terminées (checkpoint Redis) ne
+   sont pas reparcourues, le reste de l'arbre est supprimé
+3. GCS: suppression récursive par requêtes batch (≤ 100 blobs), repli
+   blob par blob si un batch échoue
+4. delete_company: étapes indépendantes en parallèle, rapport dans l'ordre,
+   reprise d'une suppression interrompue (document mandat déjà supprimé)
+5. BulkWriter: une suppression abandonnée après ses tentatives lève une
+   erreur et la collection n'est pas marquée terminée
+
+Usage:
+    python -m pytest tests/test_bulk_deletion.py -v
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.storage_client import StorageClientSingleton
+from app.tools.bulk_deletion import DeletionCheckpoint, FirestoreTreeDeleter
+
+MANDATE = "bo_clients/client-1/mandates/company-1"
+
+
+# ═══════════════════════════════════════════════════════════════
+# FIXTURES
+# ═══════════════════════════════════════════════════════════════
+
+class FakeDocRef:
+    def __init__(self, db, path):
+        self._db = db
+        self.path = path
+
+    def collections(self):
+        depth = self.path.count("/") + 2
+        names = {
+            "/".join(p.split("/")[:depth])
+            for p in self._db.snapshot()
+            if p.startswith(self.path + "/") and p.count("/") >= depth
+        }
+        return [FakeCollRef(self._db, name) for name in sorted(names)]
+
+    def delete(self):
+        self._db.delete(self.path)
+
+
+class FakeCollRef:
+    def __init__(self, db, path):
+        self._db = db
+        self._path = tuple(path.split("/"))
+
+    def list_documents(self, page_size=None):
+        path = "/".join(self._path)
+        self._db.listed.append(path)
+        depth = path.count("/") + 1
+        ids = {
+            "/".join(p.split("/")[:depth + 1])
+            for p in self._db.snapshot()
+            if p.startswith(path + "/")
+        }
+        return [FakeDocRef(self._db, doc) for doc in sorted(ids)]
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self._db = db
+        self._refs = []
+
+    def delete(self, ref):
+        self._refs.append(ref)
+
+    def commit(self):
+        self._db.commit_started()
+        try:
+            time.sleep(self._db.commit_delay)
+            for ref in self._refs:
+                if ref.path.startswith(self._db.fail_prefix or "\0"):
+                    raise RuntimeError("commit failed")
+            for ref in self._refs:
+                self._db.delete(ref.path)
+            self._db.commits.append(len(self._refs))
+        finally:
+            self._db.commit_finished()
+
+
+class FakeFirestore:
+    """Arbre Firestore en mémoire (chemins de documents), sans BulkWriter."""
+
+    def __init__(self, paths=(), commit_delay=0.0):
+        self.docs = set(paths)
+        self.commits = []
+        self.listed = []
+        self.commit_delay = commit_delay
+        self.fail_prefix = None
+        self._lock = threading.Lock()
+        self._active = 0
+        self.max_parallel_commits = 0
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.docs)
+
+    def delete(self, path):
+        with self._lock:
+            self.docs.discard(path)
+
+    def document(self, path):
+        return FakeDocRef(self, path)
+
+    def collection(self, path):
+        return FakeCollRef(self, path)
+
+    def batch(self):
+        return FakeBatch(self)
+
+    def commit_started(self):
+        with self._lock:
+            self._active += 1
+            self.max_parallel_commits = max(self.max_parallel_commits, self._active)
+
+    def commit_finished(self):
+        with self._lock:
+            self._active -= 1
+
+
+class FakeBulkWriter:
+    """BulkWriter: rejoue les échecs tant que le callback le demande, sans lever."""
+
+    def __init__(self, db):
+        self._db = db
+        self._refs = []
+        self._on_error = None
+
+    def on_write_error(self, callback):
+        self._on_error = callback
+
+    def delete(self, ref):
+        self._refs.append(ref)
+
+    def close(self):
+        for ref in self._refs:
+            operation = SimpleNamespace(reference=ref, attempts=0)
+            while ref.path.startswith(self._db.fail_prefix or "\0"):
+                operation.attempts += 1
+                failure = SimpleNamespace(operation=operation, attempts=operation.attempts, code=14, message="unavailable")
+                if not self._on_error(failure, self):
+                    break
+            else:
+                self._db.delete(ref.path)
+
+
+class FakeBulkFirestore(FakeFirestore):
+    def bulk_writer(self):
+        return FakeBulkWriter(self)
+
+
+def _company_tree(jobs=6, items=3):
+    paths = {MANDATE}
+    for i in range(jobs):
+        job = f"{MANDATE}/jobs/job-{i}"
+        paths.add(job)
+        paths.update(f"{job}/items/item-{j}" for j in range(items))
+    paths.update(f"{MANDATE}/setup/{name}" for name in ("erp", "dms", "context"))
+    return paths
+
+
+class FakeBlob:
+    def __init__(self, bucket, name):
+        self._bucket = bucket
+        self.name = name
+
+    def delete(self):
+        if getattr(self._bucket.client.in_batch, "active", False):
+            self._bucket.client.pending.append(self)
+        else:
+            self._bucket.remove(self.name)
+
+
+class FakeBucket:
+    name = "pinnokio-test"
+
+    def __init__(self, client, names):
+        self.client = client
+        self.names = set(names)
+        self._lock = threading.Lock()
+
+    def list_blobs(self, prefix="", page_size=None):
+        return [FakeBlob(self, n) for n in sorted(self.names) if n.startswith(prefix)]
+
+    def remove(self, name):
+        with self._lock:
+            self.names.discard(name)
+
+
+class FakeStorageClient:
+    def __init__(self):
+        self.in_batch = threading.local()
+        self.pending = []
+        self.batches = []
+        self.fail_batches = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def batch(self):
+        self.in_batch.active = True
+        start = len(self.pending)
+        try:
+            yield
+        finally:
+            self.in_batch.active = False
+        with self._lock:
+            blobs = self.pending[start:]
+            if self.fail_batches:
+                self.fail_batches -= 1
+                raise RuntimeError("batch failed")
+            self.batches.append(len(blobs))
+        for blob in blobs:
+            blob._bucket.remove(blob.name)
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    import app.redis_client as redis_client
+
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(redis_client, "get_redis", lambda: client)
+    return client
+
+
+@pytest.fixture
+def storage():
+    client = object.__new__(StorageClientSingleton)
+    client._client = FakeStorageClient()
+    client._bucket = FakeBucket(client._client, [])
+    return client
+
+
+# ═══════════════════════════════════════════════════════════════
+# TESTS
+# ═══════════════════════════════════════════════════════════════
+
+def test_tree_deleted_in_parallel_batches():
+    db = FakeFirestore(_company_tree(), commit_delay=0.02)
+
+    deleted = FirestoreTreeDeleter(db, max_workers=8).delete_document(MANDATE)
+
+    assert deleted == len(_company_tree())
+    assert db.docs == set()
+    assert db.max_parallel_commits > 1
+    # Un lot par collection (les collections tiennent dans une page)
+    assert len(db.commits) == 2 + 6
+
+
+def test_resume_skips_finished_collections(redis):
+    db = FakeFirestore(_company_tree())
+    checkpoint = DeletionCheckpoint("company:company-1")
+    db.fail_prefix = f"{MANDATE}/jobs/job-3/items/"
+
+    with pytest.raises(RuntimeError):
+        FirestoreTreeDeleter(db, max_workers=1, checkpoint=checkpoint).delete_document(MANDATE)
+
+    assert checkpoint.is_done(f"{MANDATE}/setup")
+    assert checkpoint.is_done(f"{MANDATE}/jobs/job-0/items")
+    assert not checkpoint.is_done(f"{MANDATE}/jobs")
+    assert f"{MANDATE}/jobs/job-3/items/item-0" in db.docs
+
+    db.fail_prefix = None
+    db.listed.clear()
+    FirestoreTreeDeleter(db, max_workers=4, checkpoint=checkpoint).delete_document(MANDATE)
+
+    assert db.docs == set()
+    assert f"{MANDATE}/setup" not in db.listed
+    assert f"{MANDATE}/jobs/job-0/items" not in db.listed
+    assert f"{MANDATE}/jobs/job-3/items" in db.listed
+
+
+def test_bulk_writer_failures_not_checkpointed(redis):
+    db = FakeBulkFirestore(_company_tree())
+    checkpoint = DeletionCheckpoint("company:company-1")
+    db.fail_prefix = f"{MANDATE}/setup/dms"
+
+    with pytest.raises(RuntimeError, match="1/3"):
+        FirestoreTreeDeleter(db, max_workers=1, checkpoint=checkpoint).delete_document(MANDATE)
+
+    assert f"{MANDATE}/setup/dms" in db.docs
+    assert not checkpoint.is_done(f"{MANDATE}/setup")
+
+    db.fail_prefix = None
+    FirestoreTreeDeleter(db, max_workers=4, checkpoint=checkpoint).delete_document(MANDATE)
+    assert db.docs == set()
+
+
+def test_gcs_recursive_delete_uses_batches(storage):
+    storage._bucket.names = {f"companies/c1/file-{i}.pdf" for i in range(250)} | {"companies/c2/keep.pdf"}
+    storage._client.fail_batches = 1
+
+    result = storage.delete_path("/companies/c1/", recursive=True)
+
+    assert result == {"success": True, "deleted_count": 250}
+    assert storage._bucket.names == {"companies/c2/keep.pdf"}
+    # 3 lots (100 + 100 + 50); le lot en échec est rejoué blob par blob
+    assert sorted(storage._client.batches) in ([50, 100], [100, 100])
+    assert storage.delete_path("companies/c1/") == {"success": True, "deleted_count": 0}
+
+
+class FakeFirebaseManagement:
+    def __init__(self, db, mandate):
+        self.db = db
+        self.mandate = mandate
+        self.calls = {}
+        self.fail_scheduler_documents = True
+
+    def _call(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def get_document(self, path):
+        return self.mandate if path in self.db.docs else None
+
+    def get_erp_path(self, mandate_path, erp_type):
+        self._call("get_erp_path")
+        return None
+
+    def delete_scheduler_job_completely(self, job_id):
+        self._call("delete_scheduler_job_completely")
+        time.sleep(0.05)
+        return True
+
+    def delete_scheduler_documents_for_mandate(self, mandate_path):
+        self._call("delete_scheduler_documents_for_mandate")
+        if self.fail_scheduler_documents:
+            raise RuntimeError("scheduler unavailable")
+        return True
+
+    def clean_telegram_users_for_mandate(self, mandate_path):
+        self._call("clean_telegram_users_for_mandate")
+        time.sleep(0.05)
+        return True
+
+    def delete_document_recursive(self, doc_path, checkpoint=None):
+        FirestoreTreeDeleter(self.db, checkpoint=checkpoint).delete_document(doc_path)
+        return True
+
+
+def test_delete_company_parallel_steps_and_resume(redis, storage, monkeypatch):
+    import app.firebase_client as firebase_client
+    import app.storage_client as storage_client
+    from app.frontend.pages.company_settings.handlers import CompanySettingsHandlers
+
+    db = FakeFirestore(_company_tree() | {f"{MANDATE}/document_chunks/chunk-{i}" for i in range(5)})
+    storage._bucket.names = {f"companies/company-1/f{i}" for i in range(3)}
+    monkeypatch.setattr(firebase_client, "get_firestore", lambda: db)
+    monkeypatch.setattr(storage_client, "get_storage_client", lambda: storage)
+
+    handlers = object.__new__(CompanySettingsHandlers)
+    handlers._firebase = FakeFirebaseManagement(db, {"legal_name": "Acme SA"})
+
+    start = time.perf_counter()
+    result = handlers.delete_company("u1", "company-1", MANDATE, "Acme SA")
+    elapsed = time.perf_counter() - start
+
+    names = [r["name"] for r in result["report"]]
+    assert names == [
+        "Validation", "Read Company Data", "Verify Identifiers", "Scheduled Jobs",
+        "Security Credentials", "Document Management System", "Vector Database",
+        "Scheduled Tasks", "Communication Channels", "File Storage",
+        "Real-time Services", "Company Database",
+    ]
+    by_name = {r["name"]: r for r in result["report"]}
+    assert result["success"] and by_name["Scheduled Tasks"]["status"] == "failed"
+    assert by_name["Vector Database"]["reason"] == "Firestore RAG: 5 documents deleted"
+    assert by_name["File Storage"]["reason"] == "Deleted 3 files from GCS"
+    assert db.docs == set() and storage._bucket.names == set()
+    # Jobs (3 × 50 ms) et Telegram (50 ms) en parallèle
+    assert elapsed < 0.25
+
+    # Relance: mandat déjà supprimé → contexte du checkpoint, seule l'étape en échec est rejouée
+    handlers._firebase.fail_scheduler_documents = False
+    result = handlers.delete_company("u1", "company-1", MANDATE, "Acme SA")
+
+    by_name = {r["name"]: r for r in result["report"]}
+    assert result["success"]
+    assert by_name["Scheduled Tasks"]["status"] == "success"
+    assert by_name["Scheduled Jobs"]["reason"].endswith("(resumed)")
+    assert handlers._firebase.calls["delete_scheduler_job_completely"] == 3
+    assert handlers._firebase.calls["delete_scheduler_documents_for_mandate"] == 2
+    assert not redis.keys("deletion:*")
+
+    assert handlers.delete_company("u1", "company-1", MANDATE, "Acme SA")["error"] == "Company not found"
@@ -0,0 +1,143 @@
+"""
+Tests unitaires pour l'invalidation des caches par génération.
+
+Ces tests valident:
+1. UnifiedCacheManager.invalidate_module_cache: un INCR de génération
+   invalide la clé de base, les entrées par item et les clés legacy,
+   sans SCAN; une nouvelle écriture est de nouveau servie
+2. Les entrées non marquées écrites par d'autres modules restent lisibles
+3. HRCacheManager.invalidate_company_hr_cache: génération partagée avec
+   UnifiedCacheManager (domaine hr), sans SCAN
+4. PageStateManager: listing par index, invalidation société et
+   utilisateur sans KEYS
+
+Usage:
+    python -m pytest tests/test_cache_generations.py -v
+"""
+
+import json
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.cache.unified_cache_manager import UnifiedCacheManager
+from app.llm_service.redis_namespaces import build_business_key
+from app.tools.hr_cache_manager import HRCacheManager
+from app.wrappers.page_state_manager import PageStateManager
+
+
+# ═══════════════════════════════════════════════════════════════
+# FIXTURES
+# ═══════════════════════════════════════════════════════════════
+
+def _forbid_keyspace_walks(client):
+    def _forbidden(*args, **kwargs):
+        raise AssertionError("keyspace walk (KEYS/SCAN) on the invalidation path")
+
+    for name in ("keys", "scan", "scan_iter"):
+        setattr(client, name, _forbidden)
+    return client
+
+
+@pytest.fixture
+def async_redis():
+    return _forbid_keyspace_walks(fakeredis.aioredis.FakeRedis(decode_responses=True))
+
+
+@pytest.fixture
+def unified(async_redis):
+    manager = UnifiedCacheManager()
+    manager.redis_client = async_redis
+    return manager
+
+
+@pytest.fixture
+def hr(async_redis):
+    manager = HRCacheManager()
+    manager.redis_client = async_redis
+    return manager
+
+
+@pytest.fixture
+def pages():
+    return PageStateManager(_forbid_keyspace_walks(fakeredis.FakeRedis(decode_responses=True)))
+
+
+# ═══════════════════════════════════════════════════════════════
+# TESTS
+# ═══════════════════════════════════════════════════════════════
+
+@pytest.mark.asyncio
+async def test_module_invalidation_bumps_generation(unified, async_redis):
+    await unified.set_cached_data("u1", "c1", "chat", None, data={"sessions": [1]})
+    await async_redis.setex("cache:u1:c1:chat:old", 600, json.dumps({"data": {"x": 1}}))
+    for thread in ("thread-1", "thread-2"):
+        await unified.set_cached_data("u1", "c1", "chat:history:raw", thread, data={"messages": [thread]})
+
+    assert await unified.invalidate_module_cache("u1", "c1", "chat")
+    assert await unified.invalidate_module_cache("u1", "c1", "chat:history:raw")
+
+    assert await async_redis.get("cache_gen:u1:c1:chat") == "1"
+    assert await unified.get_cached_data("u1", "c1", "chat") is None
+    assert await unified.get_cached_data("u1", "c1", "chat", "old") is None
+    for thread in ("thread-1", "thread-2"):
+        assert await unified.get_cached_data("u1", "c1", "chat:history:raw", thread) is None
+
+    await unified.set_cached_data("u1", "c1", "chat", None, data={"sessions": [2]})
+    assert (await unified.get_cached_data("u1", "c1", "chat"))["data"] == {"sessions": [2]}
+
+
+@pytest.mark.asyncio
+async def test_shared_domain_generation_and_unstamped_entries(unified, async_redis):
+    await unified.set_cached_data("u1", "c1", "bank", None, data={"accounts": [1]})
+    assert await unified.invalidate_module_cache("u2", "c1", "bank")
+    assert await async_redis.get("cache_gen:shared:c1:bank") == "1"
+    assert await unified.get_cached_data("u1", "c1", "bank") is None
+
+    # Entrée écrite directement par un autre module (sans génération)
+    key = build_business_key("u1", "c1", "bank")
+    await async_redis.setex(key, 600, json.dumps({"data": {"accounts": [3]}}))
+    assert (await unified.get_cached_data("u1", "c1", "bank"))["data"] == {"accounts": [3]}
+
+
+@pytest.mark.asyncio
+async def test_hr_company_invalidation_without_scan(hr, unified):
+    await hr.set_cached_data("u1", "c1", "hr", "employees", data=[{"id": 1}])
+    await hr.set_cached_data("u1", "c1", "hr", "contracts:emp1", data=[{"id": 2}])
+    assert (await unified.get_cached_data("u1", "c1", "hr", "employees"))["data"] == [{"id": 1}]
+
+    assert await hr.invalidate_company_hr_cache("u1", "c1")
+
+    assert await hr.get_cached_data("u1", "c1", "hr", "employees") is None
+    assert await hr.get_cached_data("u2", "c1", "hr", "contracts:emp1") is None
+    assert await unified.get_cached_data("u1", "c1", "hr", "employees") is None
+
+    await hr.set_cached_data("u1", "c1", "hr", "employees", data=[{"id": 3}])
+    assert (await hr.get_cached_data("u1", "c1", "hr", "employees"))["data"] == [{"id": 3}]
+
+
+def test_page_state_listing_and_invalidation(pages, monkeypatch):
+    from app.realtime import contextual_publisher
+
+    monkeypatch.setattr(contextual_publisher, "update_page_context", lambda uid, page: None)
+    for page in ("dashboard", "hr"):
+        assert pages.save_page_state("u1", "c1", page, "m/1", {"page": page})
+    assert pages.save_page_state("u1", "c2", "invoices", "m/2", {"page": "invoices"})
+
+    assert pages.get_cached_pages("u1", "c1") == ["dashboard", "hr"]
+    pages.redis.delete(pages._build_key("u1", "c1", "hr"))  # expiration TTL
+    assert pages.get_cached_pages("u1", "c1") == ["dashboard"]
+    assert pages.redis.smembers(pages._build_index_key("u1", "c1")) == {"dashboard"}
+
+    assert pages.invalidate_page_state("u1", "c1")
+    assert pages.get_page_state("u1", "c1", "dashboard") is None
+    assert pages.get_cached_pages("u1", "c1") == []
+
+    assert pages.get_page_state("u1", "c2", "invoices")["data"] == {"page": "invoices"}
+    assert pages.invalidate_all_for_user("u1")
+    assert pages.get_page_state("u1", "c2", "invoices") is None
+    assert pages.get_cached_pages("u1", "c2") == []
+
+    assert pages.save_page_state("u1", "c2", "invoices", "m/2", {"page": "invoices", "v": 2})
+    assert pages.get_page_state("u1", "c2", "invoices")["data"]["v"] == 2
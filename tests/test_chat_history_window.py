@@ -0,0 +1,204 @@
+"""
+Tests unitaires pour le chargement fenêtré de l'historique chat.
+
+Ces tests valident:
+1. La fenêtre limit-to-last côté serveur (seule la fenêtre est transférée)
+2. La pagination "charger plus ancien" par curseur
+3. Le rejeu incrémental de job_chats (checklist) depuis un checkpoint Redis
+4. L'équivalence du rejeu incrémental des cartes avec un scan complet
+5. Les clés uuid (hors push IDs) sont placées selon leur timestamp:
+   une ancienne n'apparaît que dans la fenêtre qui la contient
+6. erase_chat sur job_chats supprime le checkpoint de rejeu
+
+Usage:
+    python -m pytest tests/test_chat_history_window.py -v
+"""
+
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.frontend.pages.chat.handlers import ChatHandlers
+
+
+# ═══════════════════════════════════════════════════════════════
+# FIXTURES
+# ═══════════════════════════════════════════════════════════════
+
+@pytest.fixture
+def realtime(rtdb, make_realtime_chat, monkeypatch):
+    chat = make_realtime_chat(rtdb)
+    monkeypatch.setattr("app.firebase_providers.get_firebase_realtime", lambda: chat)
+    return chat
+
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    from app import redis_client as redis_module
+
+    client = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(redis_module, "get_redis", lambda: client)
+    return client
+
+
+@pytest.fixture
+def handlers(realtime, redis_client):
+    """ChatHandlers sans cache (toujours miss) et branché sur fakeredis."""
+    h = object.__new__(ChatHandlers)
+    h._cache_manager = MagicMock(get_cached_data=AsyncMock(return_value=None), set_cached_data=AsyncMock())
+    h._firebase = MagicMock()
+    h._redis = redis_client
+    return h
+
+
+_ts = iter(range(10**6))
+
+
+def _push(rtdb, mode, thread_key, message_type, content, **extra):
+    message = {
+        "message_type": message_type,
+        "content": content if isinstance(content, str) else json.dumps(content),
+        "timestamp": f"2026-01-01T00:00:{next(_ts):06d}",
+        "sender_id": "worker",
+        **extra,
+    }
+    return rtdb.child(f"space/{mode}/{thread_key}/messages").push(message)
+
+
+def _card(card_id="approval_card", **extra):
+    return {"cardsV2": [{"cardId": card_id}], "message": {"cardParams": {"title": card_id}}, **extra}
+
+
+# ═══════════════════════════════════════════════════════════════
+# TESTS
+# ═══════════════════════════════════════════════════════════════
+
+@pytest.mark.asyncio
+async def test_latest_window_transfers_only_visible_messages(handlers, rtdb):
+    for i in range(30):
+        _push(rtdb, "chats", "t1", "MESSAGE_PINNOKIO", f"m{i}" + "x" * 500)
+
+    rtdb.reset_counters()
+    result = await handlers.load_history("u1", "space", "space", "t1", mode="chats", limit=10)
+
+    assert [m["content"][:3] for m in result["messages"]] == [f"m{i}" for i in range(20, 30)]
+    assert result["has_more"] is True
+    # 11 messages lus (fenêtre + 1 pour has_more), pas 30
+    assert rtdb.bytes_read < 12 * 600
+
+
+@pytest.mark.asyncio
+async def test_load_older_pages_by_cursor(handlers, rtdb):
+    for i in range(25):
+        _push(rtdb, "chats", "t1", "MESSAGE_PINNOKIO", f"m{i}")
+
+    seen = []
+    result = await handlers.load_history("u1", "space", "space", "t1", mode="chats", limit=10)
+    seen = [m["content"] for m in result["messages"]] + seen
+    while result["has_more"]:
+        result = await handlers.load_history(
+            "u1", "space", "space", "t1", mode="chats", limit=10, before=result["next_cursor"]
+        )
+        seen = [m["content"] for m in result["messages"]] + seen
+
+    assert seen == [f"m{i}" for i in range(25)]
+
+
+@pytest.mark.asyncio
+async def test_uuid_keys_are_windowed_by_timestamp(handlers, rtdb):
+    for i in range(25):
+        if i == 3:
+            ts = f"2026-01-01T00:00:{next(_ts):06d}"
+            rtdb.child("space/chats/t1/messages/0b5e-uuid").set(
+                {"message_type": "MESSAGE_PINNOKIO", "content": "m3", "timestamp": ts}
+            )
+        else:
+            _push(rtdb, "chats", "t1", "MESSAGE_PINNOKIO", f"m{i}")
+
+    pages = []
+    result = await handlers.load_history("u1", "space", "space", "t1", mode="chats", limit=10)
+    pages.append([m["content"] for m in result["messages"]])
+    while result["has_more"]:
+        result = await handlers.load_history(
+            "u1", "space", "space", "t1", mode="chats", limit=10, before=result["next_cursor"]
+        )
+        pages.insert(0, [m["content"] for m in result["messages"]])
+
+    assert pages[-1] == [f"m{i}" for i in range(15, 25)]
+    assert [c for page in pages for c in page] == [f"m{i}" for i in range(25)]
+
+
+@pytest.mark.asyncio
+async def test_erase_chat_drops_job_replay_checkpoint(handlers, rtdb, realtime, redis_client):
+    _push(rtdb, "chats", "t1", "MESSAGE_PINNOKIO", "hello")
+    _push(rtdb, "job_chats", "t1", "CARD", _card("klk_router_card"))
+    result = await handlers.load_history("u1", "space", "space", "t1", chat_mode="router_chat")
+    assert result["pending_card"]["cardId"] == "klk_router_card"
+    assert redis_client.exists("chat:job_replay:space:t1")
+
+    assert realtime.erase_chat("space", "t1", mode="job_chats")
+
+    assert not redis_client.exists("chat:job_replay:space:t1")
+    result = await handlers.load_history("u1", "space", "space", "t1", chat_mode="router_chat")
+    assert result["pending_card"] is None
+
+
+@pytest.mark.asyncio
+async def test_job_chat_checklist_replay_is_incremental(handlers, rtdb, realtime, redis_client, monkeypatch):
+    _push(rtdb, "chats", "t1", "MESSAGE_PINNOKIO", "hello")
+    _push(rtdb, "job_chats", "t1", "CMMD", {
+        "action": "SET_WORKFLOW_CHECKLIST",
+        "params": {"checklist": {"steps": [{"id": "a", "name": "A"}, {"id": "b", "name": "B"}]}},
+    })
+    for i in range(20):
+        _push(rtdb, "job_chats", "t1", "MESSAGE", f"log {i}")
+    _push(rtdb, "job_chats", "t1", "CMMD", {"action": "UPDATE_STEP_STATUS", "params": {"step_id": "a", "status": "completed"}})
+
+    result = await handlers.load_history("u1", "space", "space", "t1", chat_mode="onboarding_chat")
+    assert [s["status"] for s in result["workflow_checklist"]["steps"]] == ["completed", "pending"]
+    assert redis_client.exists("chat:job_replay:space:t1")
+
+    _push(rtdb, "job_chats", "t1", "CMMD", {"action": "UPDATE_STEP_STATUS", "params": {"step_id": "b", "status": "in_progress"}})
+
+    fetched = []
+    real_after = realtime.get_thread_messages_after
+
+    def spying_after(*args, **kwargs):
+        messages = real_after(*args, **kwargs)
+        fetched.extend(messages)
+        return messages
+
+    monkeypatch.setattr(realtime, "get_thread_messages_after", spying_after)
+
+    result = await handlers.load_history("u1", "space", "space", "t1", chat_mode="onboarding_chat")
+    assert len(fetched) == 1
+    assert [s["status"] for s in result["workflow_checklist"]["steps"]] == ["completed", "in_progress"]
+
+
+@pytest.mark.asyncio
+async def test_job_chat_card_replay_matches_full_scan(handlers, rtdb, realtime):
+    _push(rtdb, "chats", "t1", "MESSAGE_PINNOKIO", "hello")
+
+    async def pending_card():
+        result = await handlers.load_history("u1", "space", "space", "t1", chat_mode="router_chat")
+        full_scan = handlers._extract_pending_card(
+            realtime.get_thread_messages("space", "t1", mode="job_chats", limit=0), "t1"
+        )
+        incremental = result["pending_card"]
+        assert incremental == full_scan
+        return incremental
+
+    _push(rtdb, "job_chats", "t1", "CARD", _card("klk_router_card"))
+    assert (await pending_card())["cardId"] == "klk_router_card"
+
+    # Réponse écrite avec une clé uuid (hors push IDs): revient à chaque rejeu
+    ts = f"2026-01-01T00:00:{next(_ts):06d}"
+    rtdb.child("space/job_chats/t1/messages/0b5e-uuid").set({"message_type": "CARD_CLICKED_PINNOKIO", "timestamp": ts})
+    assert await pending_card() is None
+    assert await pending_card() is None
+
+    _push(rtdb, "job_chats", "t1", "CARD", _card("approval_card"), status="pending_approval")
+    assert (await pending_card())["cardId"] == "approval_card"
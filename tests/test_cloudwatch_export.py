@@ -0,0 +1,162 @@
+"""
+Tests unitaires pour l'export streaming des logs CloudWatch.
+
+Ces tests valident:
+1. get_log_events: lecture depuis le début du stream (startFromHead), pages
+   vides traversées, arrêt quand le token ne change plus, fenêtre temporelle
+2. filter_pattern: filter_log_events côté serveur, limité au stream,
+   max_events respecté
+3. stream_log_export: NDJSON / texte, file bornée (le thread boto3 ne prend
+   pas d'avance sur un client lent), arrêt du thread à la déconnexion;
+   un client plus lent que le délai d'attente du thread reçoit tout l'export
+4. Une erreur AWS est relancée dans le générateur
+
+Usage:
+    python -m pytest tests/test_cloudwatch_export.py -v
+"""
+
+import asyncio
+import json
+import threading
+from datetime import datetime
+
+import pytest
+
+from app.tools.cloudwatch_logs import CloudWatchLogsExtractor, stream_log_export
+
+
+# ═══════════════════════════════════════════════════════════════
+# FIXTURES
+# ═══════════════════════════════════════════════════════════════
+
+class ResourceNotFoundException(Exception):
+    pass
+
+
+class FakeLogsClient:
+    """Stream de N pages de `per_page` événements; tokens f"f{page}"."""
+
+    def __init__(self, pages=5, per_page=3, empty_pages=()):
+        self.pages = pages
+        self.per_page = per_page
+        self.empty_pages = set(empty_pages)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def _page(self, index):
+        if index >= self.pages or index in self.empty_pages:
+            return []
+        return [
+            {"timestamp": 1_700_000_000_000 + index * 1000 + i, "message": f"p{index} e{i}", "logStreamName": "ecs/1"}
+            for i in range(self.per_page)
+        ]
+
+    def get_log_events(self, **kwargs):
+        with self._lock:
+            self.calls.append(("get_log_events", kwargs))
+        if kwargs["logStreamName"] == "missing":
+            raise ResourceNotFoundException("The specified log stream does not exist.")
+        token = kwargs.get("nextToken", "f0")
+        index = int(token[1:])
+        if index >= self.pages:
+            return {"events": [], "nextForwardToken": token}
+        return {"events": self._page(index), "nextForwardToken": f"f{index + 1}"}
+
+    def filter_log_events(self, **kwargs):
+        with self._lock:
+            self.calls.append(("filter_log_events", kwargs))
+        index = int(kwargs.get("nextToken", "f0")[1:])
+        events = [e for e in self._page(index) if kwargs["filterPattern"] in e["message"]]
+        response = {"events": events}
+        if index + 1 < self.pages:
+            response["nextToken"] = f"f{index + 1}"
+        return response
+
+
+def _extractor(client):
+    extractor = object.__new__(CloudWatchLogsExtractor)
+    extractor.region_name = "us-east-1"
+    extractor.log_group_name = "/ecs/pinnokio_microservice"
+    extractor.client = client
+    return extractor
+
+
+# ═══════════════════════════════════════════════════════════════
+# TESTS
+# ═══════════════════════════════════════════════════════════════
+
+def test_get_log_events_pages_from_head_until_token_repeats():
+    client = FakeLogsClient(pages=4, empty_pages={1})
+    start = datetime(2026, 1, 1)
+
+    pages = list(_extractor(client).iter_log_event_pages("ecs/1", start_time=start))
+
+    assert [len(p) for p in pages] == [3, 3, 3]
+    assert pages[-1][0]["message"] == "p3 e0"
+    first = client.calls[0][1]
+    assert first["startFromHead"] is True and first["startTime"] == int(start.timestamp() * 1000)
+    assert "nextToken" not in first
+    # 4 pages + l'appel qui renvoie le même token
+    assert len(client.calls) == 5
+
+
+def test_filter_pattern_uses_server_side_filter_and_max_events():
+    client = FakeLogsClient(pages=6, per_page=3)
+
+    pages = list(_extractor(client).iter_log_event_pages("ecs/1", filter_pattern="e1", max_events=4))
+
+    assert [e["message"] for page in pages for e in page] == ["p0 e1", "p1 e1", "p2 e1", "p3 e1"]
+    name, kwargs = client.calls[0]
+    assert name == "filter_log_events"
+    assert kwargs["logStreamNames"] == ["ecs/1"] and kwargs["filterPattern"] == "e1"
+    assert len(client.calls) == 4
+
+
+@pytest.mark.asyncio
+async def test_stream_export_ndjson_and_text():
+    extractor = _extractor(FakeLogsClient(pages=3, per_page=2))
+
+    chunks = [chunk async for chunk in stream_log_export(extractor, "ecs/1")]
+    lines = b"".join(chunks).decode().splitlines()
+    assert len(chunks) == 3 and len(lines) == 6
+    assert json.loads(lines[0])["message"] == "p0 e0" and json.loads(lines[0])["logStreamName"] == "ecs/1"
+
+    text = b"".join([c async for c in stream_log_export(extractor, "ecs/1", fmt="text", max_events=3)]).decode()
+    assert text.splitlines()[2].endswith("] p1 e0") and text.count("\n") == 3
+
+
+@pytest.mark.asyncio
+async def test_stream_export_bounded_and_stops_on_disconnect():
+    client = FakeLogsClient(pages=1000, per_page=1)
+    chunks = stream_log_export(_extractor(client), "ecs/1", queue_size=2)
+
+    assert await anext(chunks)
+    await asyncio.sleep(0.2)
+    # 1 page consommée + 2 en file + 1 en attente d'insertion
+    assert len(client.calls) <= 5
+
+    await chunks.aclose()
+    await asyncio.sleep(0.7)
+    calls = len(client.calls)
+    await asyncio.sleep(0.2)
+    assert len(client.calls) == calls <= 6
+
+
+@pytest.mark.asyncio
+async def test_stream_export_slow_consumer_gets_every_page():
+    extractor = _extractor(FakeLogsClient(pages=3, per_page=1))
+
+    chunks = []
+    async for chunk in stream_log_export(extractor, "ecs/1", queue_size=1):
+        chunks.append(chunk)
+        await asyncio.sleep(0.7)  # plus lent que le result(timeout=0.5) du thread
+
+    assert [json.loads(c)["message"] for c in chunks] == ["p0 e0", "p1 e0", "p2 e0"]
+
+
+@pytest.mark.asyncio
+async def test_stream_export_raises_aws_errors():
+    chunks = stream_log_export(_extractor(FakeLogsClient()), "missing")
+
+    with pytest.raises(ResourceNotFoundException):
+        await anext(chunks)
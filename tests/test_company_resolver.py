@@ -0,0 +1,157 @@
+"""
+Tests unitaires pour le resolver partage mandate_path → company_id.
+
+Ces tests valident:
+1. Une seule requete Neon par mandate (L1), partagee entre instances via Redis (L2)
+2. Le cache negatif, remplace immediatement par remember() a la creation
+3. La resolution batch: une requete pour tous les mandates inconnus
+4. L'invalidation (suppression de societe), propagee au L1 des autres
+   instances via le compteur de generation
+
+Usage:
+    python -m pytest tests/test_company_resolver.py -v
+"""
+
+from uuid import uuid4
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.tools.company_resolver import CompanyResolver
+
+
+# ═══════════════════════════════════════════════════════════════
+# FIXTURES
+# ═══════════════════════════════════════════════════════════════
+
+COMPANIES = {f"clients/u1/bo_clients/u1/mandates/m{i}": uuid4() for i in range(5)}
+
+
+class FakeConn:
+    def __init__(self, queries):
+        self.queries = queries
+
+    async def fetch(self, sql, paths):
+        self.queries.append(list(paths))
+        return [{"firebase_mandate_path": p, "id": COMPANIES[p]} for p in paths if p in COMPANIES]
+
+
+class FakeAcquire:
+    def __init__(self, conn):
+        self.conn = conn
+
+    async def __aenter__(self):
+        return self.conn
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakePool:
+    def __init__(self):
+        self.queries = []
+
+    def acquire(self):
+        return FakeAcquire(FakeConn(self.queries))
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+@pytest.fixture
+def pool():
+    return FakePool()
+
+
+@pytest.fixture
+def get_pool(pool):
+    async def _get_pool():
+        return pool
+    return _get_pool
+
+
+# ═══════════════════════════════════════════════════════════════
+# TESTS
+# ═══════════════════════════════════════════════════════════════
+
+@pytest.mark.asyncio
+async def test_resolve_hits_neon_once_and_shares_via_redis(redis_client, pool, get_pool):
+    path = "clients/u1/bo_clients/u1/mandates/m1"
+    resolver = CompanyResolver(redis_client)
+
+    for _ in range(3):
+        assert await resolver.resolve(path, get_pool) == COMPANIES[path]
+    assert pool.queries == [[path]]
+
+    # Autre instance (L1 vide): servie par Redis
+    other = CompanyResolver(redis_client)
+    assert await other.resolve(path, get_pool) == COMPANIES[path]
+    assert len(pool.queries) == 1
+
+
+@pytest.mark.asyncio
+async def test_negative_cache_and_remember_on_creation(redis_client, pool, get_pool):
+    path = "clients/u1/bo_clients/u1/mandates/new"
+    resolver = CompanyResolver(redis_client)
+
+    assert await resolver.resolve(path, get_pool) is None
+    assert await resolver.resolve(path, get_pool) is None
+    assert len(pool.queries) == 1
+    assert redis_client.get(f"neon:company:{path}") == ""
+
+    created = uuid4()
+    resolver.remember(path, created)
+    assert await CompanyResolver(redis_client).resolve(path, get_pool) == created
+    assert len(pool.queries) == 1
+
+
+@pytest.mark.asyncio
+async def test_resolve_many_single_query(redis_client, pool, get_pool):
+    resolver = CompanyResolver(redis_client)
+    paths = list(COMPANIES)
+    await resolver.resolve(paths[0], get_pool)
+
+    mapping = await resolver.resolve_many(paths + ["unknown", paths[1]], get_pool)
+
+    assert mapping == {**COMPANIES, "unknown": None}
+    assert len(pool.queries) == 2
+    assert sorted(pool.queries[1]) == sorted(paths[1:] + ["unknown"])
+
+
+@pytest.mark.asyncio
+async def test_invalidate_removes_both_tiers(redis_client, pool, get_pool):
+    path = "clients/u1/bo_clients/u1/mandates/m2"
+    resolver = CompanyResolver(redis_client)
+    await resolver.resolve(path, get_pool)
+
+    resolver.invalidate(path)
+
+    assert path not in resolver.local_entries
+    assert redis_client.get(f"neon:company:{path}") is None
+    await resolver.resolve(path, get_pool)
+    assert len(pool.queries) == 2
+
+
+@pytest.mark.asyncio
+async def test_invalidate_reaches_other_instances(redis_client, pool, get_pool):
+    path = "clients/u1/bo_clients/u1/mandates/m3"
+    deleter, other = CompanyResolver(redis_client), CompanyResolver(redis_client)
+    await deleter.resolve(path, get_pool)
+    await other.resolve(path, get_pool)
+    assert len(pool.queries) == 1
+
+    deleter.invalidate(path)
+    assert redis_client.get(CompanyResolver.GENERATION_KEY) == "1"
+
+    # Dans l'intervalle de verification: L1 encore servi
+    await other.resolve(path, get_pool)
+    assert len(pool.queries) == 1
+
+    # Generation relue: L1 vide, le mandate est resolu a nouveau depuis Neon
+    other._next_generation_check = 0.0
+    await other.resolve(path, get_pool)
+    assert path in other.local_entries
+    assert len(pool.queries) == 2
@@ -0,0 +1,187 @@
+"""
+Tests unitaires pour les uploads en streaming (spool + hash + dedupe).
+
+Ces tests valident:
+1. spool_upload: lecture par blocs bornés, SHA-256 calculé au fil de l'eau
+2. Arrêt dès que la taille maximale est dépassée (sans tout lire)
+3. upload_chat_file: upload GCS resumable hors boucle, puis dedupe du même
+   contenu pour la même société / conversation (pas de second upload)
+4. upload_routing_file: dedupe seulement tant que le fichier Drive est
+   encore dans le dossier d'entrée (re-upload accepté une fois déplacé)
+
+Usage:
+    python -m pytest tests/test_file_upload_streaming.py -v
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from unittest.mock import AsyncMock
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app import firebase_token_verifier
+from app.file_upload_utils import FileTooLargeError, spool_upload
+
+
+# ═══════════════════════════════════════════════════════════════
+# FIXTURES
+# ═══════════════════════════════════════════════════════════════
+
+class FakeUploadFile:
+    """UploadFile minimal: enregistre la taille de chaque lecture."""
+
+    def __init__(self, content: bytes, filename="facture.pdf", content_type="application/pdf"):
+        self._content = content
+        self._pos = 0
+        self.filename = filename
+        self.content_type = content_type
+        self.reads = []
+
+    async def read(self, size=-1):
+        self.reads.append(size)
+        if size is None or size < 0:
+            size = len(self._content) - self._pos
+        chunk = self._content[self._pos:self._pos + size]
+        self._pos += len(chunk)
+        return chunk
+
+
+class FakeRequest:
+    headers = {"Authorization": "Bearer u1:token"}
+
+
+class FakeStorage:
+    def __init__(self):
+        self.uploads = []
+        self.blobs = set()
+
+    def upload_blob(self, bucket_name, blob_name, data, content_type=None, chunk_size=None,
+                    size=None, metadata=None):
+        body = data.read()
+        self.uploads.append({"blob": blob_name, "size": len(body), "chunk_size": chunk_size,
+                             "metadata": metadata})
+        self.blobs.add(blob_name)
+        return {"success": True, "blob_path": f"gs://{bucket_name}/{blob_name}"}
+
+    def blob_exists(self, blob_name, bucket_name=None):
+        return blob_name in self.blobs
+
+    def generate_signed_url(self, blob_name, expiration_hours=168):
+        return f"https://signed/{blob_name}"
+
+
+class FakeDrive:
+    """Dossiers Drive en mémoire: file_id → dossier parent."""
+
+    def __init__(self):
+        self.uploads = []
+        self.parents = {}
+
+    async def upload_file_to_drive(self, user_id, file_name=None, folder_id=None, file_obj=None, **kwargs):
+        file_id = f"drive-{len(self.uploads)}"
+        self.uploads.append(file_id)
+        self.parents[file_id] = folder_id
+        return {"success": True, "file_id": file_id, "file_name": file_name}
+
+    async def file_in_folder(self, user_id, file_id, folder_id):
+        return self.parents.get(file_id) == folder_id
+
+
+@pytest.fixture
+def upload_env(monkeypatch):
+    import app.redis_client as redis_client
+    import app.storage_client as storage_client
+
+    redis = fakeredis.FakeRedis(decode_responses=True)
+    storage = FakeStorage()
+    monkeypatch.setattr(redis_client, "get_redis", lambda: redis)
+    monkeypatch.setattr(storage_client, "get_storage_client", lambda: storage)
+    monkeypatch.setattr(
+        firebase_token_verifier,
+        "_verifier",
+        firebase_token_verifier.FirebaseTokenVerifier(
+            verify_func=lambda token: {"uid": token.split(":")[0], "exp": time.time() + 3600}
+        ),
+    )
+    return storage
+
+
+# ═══════════════════════════════════════════════════════════════
+# TESTS
+# ═══════════════════════════════════════════════════════════════
+
+@pytest.mark.asyncio
+async def test_spool_reads_bounded_chunks_and_hashes():
+    content = b"%PDF" + bytes(range(256)) * 20000  # ~5 MB
+    upload = FakeUploadFile(content)
+
+    spooled = await spool_upload(upload, max_size=10 * 1024 * 1024, chunk_size=64 * 1024)
+    try:
+        assert spooled.size == len(content)
+        assert spooled.sha256 == hashlib.sha256(content).hexdigest()
+        assert set(upload.reads) == {64 * 1024}
+        assert spooled.file.read() == content
+    finally:
+        spooled.close()
+
+
+@pytest.mark.asyncio
+async def test_spool_stops_when_too_large():
+    upload = FakeUploadFile(b"x" * (5 * 1024 * 1024))
+
+    with pytest.raises(FileTooLargeError):
+        await spool_upload(upload, max_size=1024 * 1024, chunk_size=256 * 1024)
+
+    assert len(upload.reads) == 5
+
+
+@pytest.mark.asyncio
+async def test_chat_upload_streams_then_dedupes(upload_env):
+    from app.endpoints.file_upload_endpoints import upload_chat_file
+
+    content = b"%PDF-1.7 " + b"0" * (3 * 1024 * 1024)
+
+    first = await upload_chat_file(FakeRequest(), FakeUploadFile(content), "thread-1", "company-1")
+    second = await upload_chat_file(FakeRequest(), FakeUploadFile(content), "thread-1", "company-1")
+
+    assert first["success"] and not first["file"]["deduplicated"]
+    assert second["file"]["deduplicated"]
+    assert second["file"]["gcs_path"] == first["file"]["gcs_path"]
+    assert len(upload_env.uploads) == 1
+    upload = upload_env.uploads[0]
+    assert upload["size"] == len(content) and upload["chunk_size"] % (256 * 1024) == 0
+    assert upload["metadata"] == {"sha256": hashlib.sha256(content).hexdigest()}
+
+    # Autre conversation: nouvel upload
+    other = await upload_chat_file(FakeRequest(), FakeUploadFile(content), "thread-2", "company-1")
+    assert not other["file"]["deduplicated"] and len(upload_env.uploads) == 2
+
+
+@pytest.mark.asyncio
+async def test_routing_dedupe_only_while_file_in_input_folder(upload_env, monkeypatch):
+    from app import driveClientService, redis_client
+    from app.drive_cache_handlers import drive_cache_handlers
+    from app.endpoints.file_upload_endpoints import upload_routing_file
+
+    drive = FakeDrive()
+    monkeypatch.setattr(driveClientService, "DriveClientServiceSingleton", lambda: drive)
+    monkeypatch.setattr(drive_cache_handlers, "refresh_documents", AsyncMock())
+    redis_client.get_redis().set("company:u1:company-1:context", json.dumps({"input_drive_doc_id": "inbox"}))
+    content = b"%PDF-1.7 facture"
+
+    async def upload():
+        result = await upload_routing_file(FakeRequest(), FakeUploadFile(content), "company-1")
+        await asyncio.sleep(0.05)  # upload Drive en arrière-plan
+        return result
+
+    assert not (await upload()).get("duplicate")
+    assert (await upload())["duplicate"] and drive.uploads == ["drive-0"]
+
+    # Le router a sorti le fichier du dossier d'entrée: nouvel upload
+    drive.parents["drive-0"] = "processed"
+    assert not (await upload()).get("duplicate")
+    assert drive.uploads == ["drive-0", "drive-1"]
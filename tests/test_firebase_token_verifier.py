@@ -0,0 +1,144 @@
+"""
+Tests unitaires pour le vérificateur partagé des Firebase ID tokens.
+
+Ces tests valident:
+1. Une seule vérification par token (claims en cache jusqu'à exp)
+2. Les appels concurrents sur un même token partagent la vérification;
+   l'annulation du premier appelant (déconnexion WS) n'atteint pas les autres
+3. Les échecs ne sont jamais mis en cache, les tokens expirés sont re-vérifiés
+4. La borne LRU et le rafraîchissement des clés publiques
+5. verify_firebase_id_token (uploads) passe par le vérificateur partagé
+
+Usage:
+    python -m pytest tests/test_firebase_token_verifier.py -v
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from app import firebase_token_verifier
+from app.firebase_token_verifier import FirebaseTokenVerifier
+
+
+# ═══════════════════════════════════════════════════════════════
+# FIXTURES
+# ═══════════════════════════════════════════════════════════════
+
+class InvalidToken(Exception):
+    pass
+
+
+class FakeFirebase:
+    """verify_id_token bloquant: compte les vérifications complètes."""
+
+    def __init__(self, ttl=3600, delay=0.0):
+        self.ttl = ttl
+        self.delay = delay
+        self.calls = []
+
+    def __call__(self, token):
+        self.calls.append(token)
+        if self.delay:
+            time.sleep(self.delay)
+        if token.startswith("bad"):
+            raise InvalidToken(token)
+        return {"uid": token.split(":")[0], "exp": time.time() + self.ttl}
+
+
+# ═══════════════════════════════════════════════════════════════
+# TESTS
+# ═══════════════════════════════════════════════════════════════
+
+@pytest.mark.asyncio
+async def test_claims_cached_until_exp():
+    firebase = FakeFirebase()
+    verifier = FirebaseTokenVerifier(verify_func=firebase)
+
+    for _ in range(5):
+        assert (await verifier.verify("u1:token"))["uid"] == "u1"
+
+    assert firebase.calls == ["u1:token"]
+    assert verifier.stats == {"hits": 4, "misses": 1, "verifications": 1}
+    # Le token brut n'est pas conservé
+    assert "u1:token" not in verifier._cache
+
+
+@pytest.mark.asyncio
+async def test_concurrent_checks_share_one_verification():
+    firebase = FakeFirebase(delay=0.05)
+    verifier = FirebaseTokenVerifier(verify_func=firebase)
+
+    results = await asyncio.gather(*(verifier.verify("u2:token") for _ in range(20)))
+
+    assert {r["uid"] for r in results} == {"u2"}
+    assert len(firebase.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_first_caller_does_not_cancel_waiters():
+    firebase = FakeFirebase(delay=0.1)
+    verifier = FirebaseTokenVerifier(verify_func=firebase)
+
+    first = asyncio.create_task(verifier.verify("u5:token"))
+    await asyncio.sleep(0.01)
+    waiters = [asyncio.create_task(verifier.verify("u5:token")) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    first.cancel()
+
+    results = await asyncio.gather(*waiters)
+    assert {r["uid"] for r in results} == {"u5"}
+    assert first.cancelled() and len(firebase.calls) == 1
+    assert (await verifier.verify("u5:token"))["uid"] == "u5"
+    assert len(firebase.calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_failures_and_expired_tokens_not_cached():
+    firebase = FakeFirebase(ttl=-1)
+    verifier = FirebaseTokenVerifier(verify_func=firebase)
+
+    for _ in range(2):
+        with pytest.raises(InvalidToken):
+            await verifier.verify("bad:token")
+    await verifier.verify("u3:token")
+    await verifier.verify("u3:token")
+
+    assert len(firebase.calls) == 4
+    with pytest.raises(ValueError):
+        await verifier.verify("")
+
+
+@pytest.mark.asyncio
+async def test_lru_bound_and_key_refresh():
+    firebase = FakeFirebase()
+    fetches = []
+    verifier = FirebaseTokenVerifier(
+        max_entries=3, verify_func=firebase, key_fetcher=lambda: fetches.append(1) or 2,
+    )
+
+    for i in range(5):
+        await verifier.verify(f"u{i}:token")
+    assert len(verifier._cache) == 3
+    await verifier.verify("u0:token")
+    assert len(firebase.calls) == 6
+
+    await verifier.start()
+    await asyncio.sleep(0.05)
+    await verifier.stop()
+    assert fetches == [1]
+
+
+@pytest.mark.asyncio
+async def test_upload_auth_uses_shared_verifier(monkeypatch):
+    from app.file_upload_utils import verify_firebase_id_token
+
+    firebase = FakeFirebase()
+    monkeypatch.setattr(firebase_token_verifier, "_verifier", FirebaseTokenVerifier(verify_func=firebase))
+
+    assert await verify_firebase_id_token("Bearer u4:token") == "u4"
+    assert await verify_firebase_id_token("Bearer u4:token") == "u4"
+    assert len(firebase.calls) == 1
+    with pytest.raises(ValueError):
+        await verify_firebase_id_token("Basic abc")
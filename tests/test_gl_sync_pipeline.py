@@ -0,0 +1,216 @@
+"""
+Tests unitaires pour le pipeline de synchronisation GL (Odoo → Neon).
+
+Ces tests valident:
+1. La transformation colonne par colonne == la transformation ligne à ligne
+2. La lecture par pages (keyset sur id) et l'upsert page par page
+3. La mémoire bornée: pages lues d'avance limitées pendant l'upsert
+4. La réconciliation full sync; period_balances recalculés seulement si
+   les soldes ne sont pas à jour ou en full sync (sinon maintenus par delta),
+   y compris quand l'ERP ne renvoie aucune écriture
+5. Le report débit / pic RSS dans les stats
+6. Échec de l'upsert: le producteur (file pleine) est annulé et attendu,
+   sans tâche orpheline
+
+Usage:
+    python -m pytest tests/test_gl_sync_pipeline.py -v
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from app.tools import accounting_sync_service as sync_service
+from app.tools.accounting_sync_service import _odoo_gl_page_to_neon_entries, _odoo_gl_to_neon_entry
+
+
+# ═══════════════════════════════════════════════════════════════
+# FIXTURES
+# ═══════════════════════════════════════════════════════════════
+
+def _line(i, company="ACME"):
+    return {
+        "id": i,
+        "date": f"{2024 + i % 2}-0{1 + i % 9}-15",
+        "account_type": "asset_cash",
+        "currency_id": [2, "EUR"] if i % 3 == 0 else False,
+        "parent_state": ["posted", "draft", "cancel", False][i % 4],
+        "amount_currency": -12.5 if i % 3 == 0 else 0.0,
+        "currency_rate": 1.09 if i % 3 == 0 else False,
+        "name": f"Ligne {i}" if i % 5 else False,
+        "debit": float(i % 7),
+        "credit": False,
+        "balance": float(i % 7),
+        "account_id": [10 + i % 4, f"10{i % 4}0 Compte {i % 4}"],
+        "journal_id": [3, "Banque BNK1"] if i % 2 else [8, "Opérations diverses"],
+        "move_id": [100 + i, f"MOVE/{i:05d}"],
+        "company_id": [1, company],
+        "write_date": "2025-01-01 10:00:00",
+        "full_reconcile_id": [4, "A" * 30] if i % 6 == 0 else False,
+        "partner_id": [7, "Client SA"] if i % 2 else False,
+    }
+
+
+class FakeOdoo:
+    """Sous-ensemble d'ODOO_KLK_VISION: execute_kw search_read (domain, limit, order)."""
+
+    company_name = "ACME"
+
+    def __init__(self, lines):
+        self.lines = sorted(lines, key=lambda r: r["id"])
+        self.calls = []
+        self.threads = set()
+        self.fetched_pages = 0
+
+    def execute_kw(self, model, method, args, kwargs=None):
+        self.threads.add(threading.current_thread().name)
+        domain = args[0]
+        after_id = next(v for f, op, v in domain if f == "id" and op == ">")
+        self.calls.append((after_id, kwargs.get("limit")))
+        page = [r for r in self.lines if r["id"] > after_id][: kwargs["limit"]]
+        if page:
+            self.fetched_pages += 1
+        return page
+
+
+class FakeManager:
+    def __init__(self, odoo=None):
+        self.odoo = odoo
+        self.batches = []
+        self.max_ahead = 0
+        self.deleted_with = None
+        self.balances_stale = False
+        self.rebuilds = 0
+
+    async def get_sync_metadata(self, company_id, sync_type):
+        return None
+
+    async def incremental_sync_gl_entries(self, company_id, entries):
+        if self.odoo is not None:
+            self.max_ahead = max(self.max_ahead, self.odoo.fetched_pages - len(self.batches))
+        await asyncio.sleep(0.01)
+        self.batches.append([e["entry_id"] for e in entries])
+        return {"added": len(entries), "modified": 0, "unchanged": 0}
+
+    async def mark_deleted_entries(self, company_id, active_ids):
+        self.deleted_with = list(active_ids)
+        return 0
+
+    async def period_balances_stale(self, company_id):
+        return self.balances_stale
+
+    async def rebuild_period_balances(self, company_id):
+        self.rebuilds += 1
+        self.balances_stale = False
+        return {2024: 1, 2025: 1}
+
+
+# ═══════════════════════════════════════════════════════════════
+# TESTS
+# ═══════════════════════════════════════════════════════════════
+
+def test_columnwise_transform_matches_row_transform():
+    lines = [_line(i) for i in range(1, 60)] + [{"id": 999, "date": "2025-01-01", "journal_id": False}]
+    mapping = {3: "BNK1"}
+
+    expected = [_odoo_gl_to_neon_entry(r, mapping) for r in lines]
+    assert _odoo_gl_page_to_neon_entries(lines, mapping) == expected
+
+    # Filtre société (comme fetch_financial_records)
+    mixed = [_line(1), _line(2, company="OTHER"), _line(3)]
+    assert [e["entry_id"] for e in _odoo_gl_page_to_neon_entries(mixed, mapping, "ACME")] == ["1", "3"]
+
+
+@pytest.mark.asyncio
+async def test_pages_are_streamed_into_upsert(monkeypatch):
+    monkeypatch.setattr(sync_service, "GL_SYNC_PAGE_SIZE", 100)
+    odoo = FakeOdoo([_line(i) for i in range(1, 1051)] + [_line(5000, company="OTHER")])
+    manager = FakeManager(odoo)
+
+    result = await sync_service._do_gl_sync(manager, odoo, "company-uuid", force_full=False, journal_id_to_code={3: "BNK1"})
+
+    stats = result["gl"]
+    assert stats["total_fetched"] == 1050
+    assert stats["added"] == 1050
+    assert stats["pages"] == 11
+    assert all(len(batch) <= 100 for batch in manager.batches)
+    # Keyset: chaque page repart du dernier id lu
+    assert [after for after, _ in odoo.calls[:3]] == [0, 100, 200]
+    # Lectures Odoo hors de la boucle d'événements
+    assert threading.current_thread().name not in odoo.threads
+    # Mémoire bornée: au plus quelques pages lues d'avance
+    assert manager.max_ahead <= sync_service.GL_SYNC_PREFETCH_PAGES + 2
+    assert stats["rows_per_s"] > 0
+    assert "peak_rss_mb" in stats and "duration_s" in stats
+    # Soldes maintenus par delta dans l'upsert: pas de recompute
+    assert manager.rebuilds == 0
+
+
+@pytest.mark.asyncio
+async def test_full_sync_reconciles_all_streamed_ids(monkeypatch):
+    monkeypatch.setattr(sync_service, "GL_SYNC_PAGE_SIZE", 50)
+    odoo = FakeOdoo([_line(i) for i in range(1, 121)])
+    manager = FakeManager()
+
+    await sync_service._do_gl_sync(manager, odoo, "company-uuid", force_full=True)
+
+    assert manager.deleted_with == [str(i) for i in range(1, 121)]
+    assert manager.rebuilds == 1
+
+
+@pytest.mark.asyncio
+async def test_stale_balances_rebuilt_once(monkeypatch):
+    odoo = FakeOdoo([_line(i) for i in range(1, 11)])
+    manager = FakeManager()
+    manager.balances_stale = True
+
+    first = await sync_service._do_gl_sync(manager, odoo, "company-uuid", force_full=False)
+    await sync_service._do_gl_sync(manager, odoo, "company-uuid", force_full=False)
+
+    assert first["gl"]["balances_rebuilt"] is True
+    assert manager.rebuilds == 1
+
+
+@pytest.mark.asyncio
+async def test_empty_ledger(monkeypatch):
+    odoo = FakeOdoo([])
+    manager = FakeManager()
+
+    result = await sync_service._do_gl_sync(manager, odoo, "company-uuid", force_full=True)
+
+    assert result["gl"]["total_fetched"] == 0
+    assert manager.batches == [] and manager.deleted_with is None
+    assert manager.rebuilds == 0
+
+
+@pytest.mark.asyncio
+async def test_stale_balances_rebuilt_without_new_entries(monkeypatch):
+    manager = FakeManager()
+    manager.balances_stale = True
+
+    result = await sync_service._do_gl_sync(manager, FakeOdoo([]), "company-uuid", force_full=False)
+
+    assert result["gl"]["total_fetched"] == 0
+    assert result["gl"]["balances_rebuilt"] is True
+    assert manager.rebuilds == 1
+
+
+@pytest.mark.asyncio
+async def test_upsert_failure_does_not_leak_producer(monkeypatch):
+    monkeypatch.setattr(sync_service, "GL_SYNC_PAGE_SIZE", 10)
+    odoo = FakeOdoo([_line(i) for i in range(1, 201)])
+    manager = FakeManager()
+
+    async def failing_upsert(company_id, entries):
+        await asyncio.sleep(0.05)  # le producteur remplit la file
+        raise RuntimeError("neon down")
+
+    manager.incremental_sync_gl_entries = failing_upsert
+
+    with pytest.raises(RuntimeError):
+        await sync_service._do_gl_sync(manager, odoo, "company-uuid", force_full=False)
+
+    await asyncio.sleep(0.05)
+    producers = [t for t in asyncio.all_tasks() if t.get_coro().__name__ == "_stream_gl_pages"]
+    assert producers == []
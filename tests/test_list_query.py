@@ -0,0 +1,149 @@
+"""
+Tests unitaires pour la couche de requêtes de liste (recherche / tri / pagination).
+
+Ces tests valident:
+1. Seule la page demandée est renvoyée, avec les compteurs par catégorie
+2. Le tri asc / desc (valeurs vides en dernier) et la pagination
+3. La recherche par tokens (sous-chaîne, ET entre termes)
+4. La réutilisation de l'index pour une même version du cache
+5. Le branchement dans INVOICES.list (payload réduit à une page)
+
+Usage:
+    python -m pytest tests/test_list_query.py -v
+"""
+
+import json
+
+import pytest
+
+from app.cache.list_query import ListQuery, ListQueryEngine
+
+
+# ═══════════════════════════════════════════════════════════════
+# FIXTURES
+# ═══════════════════════════════════════════════════════════════
+
+SEARCH_FIELDS = ("name", "job_id")
+
+
+@pytest.fixture
+def engine():
+    return ListQueryEngine()
+
+
+def _docs(n, prefix="doc"):
+    return [
+        {"id": f"{prefix}_{i}", "name": f"{prefix} invoice {i:04d}", "job_id": f"job-{i}", "amount": i % 7}
+        for i in range(n)
+    ]
+
+
+# ═══════════════════════════════════════════════════════════════
+# TESTS
+# ═══════════════════════════════════════════════════════════════
+
+def test_only_requested_page_is_returned(engine):
+    categories = {"to_process": _docs(45), "processed": _docs(10, "old")}
+
+    result = engine.query(
+        scope=("ap", "u1", "c1"),
+        categories=categories,
+        query=ListQuery(category="to_process", page=3, page_size=20),
+        search_fields=SEARCH_FIELDS,
+    )
+
+    assert [d["id"] for d in result["items"]["to_process"]] == [f"doc_{i}" for i in range(40, 45)]
+    assert result["items"]["processed"] == []
+    assert result["counts"] == {"to_process": 45, "processed": 10}
+    assert result["pagination"] == {"page": 3, "pageSize": 20, "totalPages": 3, "totalItems": 45}
+
+    # category="all": une page par catégorie
+    result = engine.query(
+        scope=("ap", "u1", "c1"),
+        categories=categories,
+        query=ListQuery(category="all", page=1, page_size=20),
+        search_fields=SEARCH_FIELDS,
+    )
+    assert len(result["items"]["to_process"]) == 20
+    assert len(result["items"]["processed"]) == 10
+    assert result["pagination"]["totalPages"] == 3
+
+
+def test_sort_asc_desc_with_empty_values_last(engine):
+    items = [{"id": "a", "amount": 5}, {"id": "b", "amount": None}, {"id": "c", "amount": -2}, {"id": "d", "amount": 10}]
+
+    asc = engine.query(("s",), {"pending": items}, ListQuery("pending", sort_column="amount"), SEARCH_FIELDS)
+    desc = engine.query(
+        ("s",), {"pending": items}, ListQuery("pending", sort_column="amount", sort_direction="desc"), SEARCH_FIELDS
+    )
+
+    assert [d["id"] for d in asc["items"]["pending"]] == ["c", "a", "d", "b"]
+    assert [d["id"] for d in desc["items"]["pending"]] == ["d", "a", "c", "b"]
+
+
+def test_token_search_substring_and_terms(engine):
+    items = [
+        {"id": "1", "name": "Facture ACME SA", "job_id": "j1"},
+        {"id": "2", "name": "Facture Globex", "job_id": "j2"},
+        {"id": "3", "name": "Avoir ACME", "job_id": "j3"},
+    ]
+
+    def search(term):
+        result = engine.query(("s",), {"to_process": items}, ListQuery("to_process", search=term), SEARCH_FIELDS)
+        return [d["id"] for d in result["items"]["to_process"]], result["counts"]["to_process"]
+
+    assert search("acm") == (["1", "3"], 2)
+    assert search("fact acme") == (["1"], 1)
+    assert search("J2") == (["2"], 1)
+    assert search("initech") == ([], 0)
+    assert search("  ") == (["1", "2", "3"], 3)
+
+
+def test_index_reused_per_cache_version(engine):
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return _docs(30)
+
+    for page in (1, 2):
+        engine.query(
+            ("bank", "u1", "c1"), {"to_process": loader}, ListQuery("to_process", page=page),
+            SEARCH_FIELDS, versions={"to_process": "2026-01-01T00:00:00"},
+        )
+    assert len(loads) == 1
+
+    # Nouvelle version du cache → reconstruction, l'ancienne est évincée
+    engine.query(
+        ("bank", "u1", "c1"), {"to_process": loader}, ListQuery("to_process"),
+        SEARCH_FIELDS, versions={"to_process": "2026-01-01T00:05:00"},
+    )
+    assert len(loads) == 2
+    assert len(engine._indexes) == 1
+
+
+@pytest.mark.asyncio
+async def test_invoices_list_returns_one_page(monkeypatch):
+    from app.frontend.pages.invoices import handlers as invoices_handlers
+
+    data = {"to_process": _docs(3000), "in_process": [], "pending": [], "processed": _docs(2000, "old")}
+
+    class FakeCacheHandlers:
+        async def get_ap_documents(self, **kwargs):
+            return {"data": data, "source": "cache", "cached_at": "2026-01-01T00:00:00"}
+
+    import app.firebase_cache_handlers as fch
+    monkeypatch.setattr(fch, "get_firebase_cache_handlers", lambda: FakeCacheHandlers())
+    monkeypatch.setattr(invoices_handlers, "get_firebase_cache_manager", lambda: object())
+
+    result = await invoices_handlers.InvoicesHandlers().list_documents(
+        "u1", "c1", "mandate/path", category="to_process", page=2, page_size=50,
+        sort_column="name", sort_direction="desc",
+    )
+
+    page = result["data"]
+    assert result["success"] and result["from_cache"]
+    assert len(page["to_process"]) == 50
+    assert page["to_process"][0]["name"] == "doc invoice 2949"
+    assert page["counts"] == {"to_process": 3000, "in_process": 0, "pending": 0, "processed": 2000}
+    assert len(json.dumps(page)) < len(json.dumps(data)) / 50
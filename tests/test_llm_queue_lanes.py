@@ -0,0 +1,148 @@
+"""
+Tests unitaires pour les lanes de priorité de la queue LLM.
+
+Ces tests valident:
+1. Le routage des jobs par lane (et le mode historique sans lanes)
+2. La déduplication des invalidations encore en attente
+3. Le dequeue pondéré (parts respectées, pas de famine)
+4. L'attente bornée des jobs interactifs sous une rafale de background
+5. Les gauges de profondeur / âge par lane
+
+Usage:
+    python -m pytest tests/test_llm_queue_lanes.py -v
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.llm_service.llm_gateway import LLMGateway
+from app.llm_service.llm_queue import LLMJobConsumer, WeightedLaneSelector
+
+
+# ═══════════════════════════════════════════════════════════════
+# FIXTURES
+# ═══════════════════════════════════════════════════════════════
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+@pytest.fixture
+def lanes_on(monkeypatch):
+    monkeypatch.setenv("LLM_QUEUE_PRIORITY_LANES", "1")
+
+
+@pytest.fixture
+def gateway(redis_client, monkeypatch):
+    """LLMGateway branché sur fakeredis, sans appel ECS."""
+    monkeypatch.setattr(LLMGateway, "_ensure_llm_worker", staticmethod(lambda: None))
+    gw = LLMGateway()
+    gw._redis = redis_client
+    return gw
+
+
+def _job(job_type, n, queued_at=None):
+    return {
+        "job_id": f"{job_type}-{n}",
+        "type": job_type,
+        "params": {},
+        "queued_at": (queued_at or datetime.now(timezone.utc)).isoformat(),
+    }
+
+
+# ═══════════════════════════════════════════════════════════════
+# TESTS
+# ═══════════════════════════════════════════════════════════════
+
+@pytest.mark.asyncio
+async def test_jobs_are_routed_to_lanes(gateway, redis_client, lanes_on):
+    redis_client.set("comm_thread:u1:general", "tg_old")
+
+    await gateway.enqueue_message("u1", "c1", "t1", "hello")
+    await gateway.enqueue_lpt_callback("u1", "c1", "t1", {"status": "done"})
+    await gateway.enqueue_scheduled_task("u1", "c1", "t1", {"task": "x"})
+
+    assert redis_client.llen("queue:llm_jobs:interactive") == 1
+    assert redis_client.llen("queue:llm_jobs:callback") == 1
+    assert redis_client.llen("queue:llm_jobs:background") == 1
+    # Nettoyage comm_thread exécuté dans le même pipeline
+    assert redis_client.exists("comm_thread:u1:general") == 0
+
+
+@pytest.mark.asyncio
+async def test_legacy_single_queue_without_lanes(gateway, redis_client, monkeypatch):
+    monkeypatch.delenv("LLM_QUEUE_PRIORITY_LANES", raising=False)
+
+    await gateway.enqueue_message("u1", "c1", "t1", "hello")
+    await gateway.enqueue_scheduled_task("u1", "c1", "t1", {})
+
+    assert redis_client.llen("queue:llm_jobs") == 2
+    assert gateway.get_queue_length() == 2
+
+
+@pytest.mark.asyncio
+async def test_pending_invalidate_context_is_superseded(gateway, redis_client, lanes_on):
+    await gateway.enqueue_invalidate_context("u1", "c1")
+    await gateway.enqueue_invalidate_context("u1", "c1")
+    await gateway.enqueue_invalidate_context("u1", "c2")
+
+    assert redis_client.llen("queue:llm_jobs:background") == 2
+
+    # Une fois consommée, une nouvelle invalidation est bien enqueuée
+    consumer = LLMJobConsumer(redis_client)
+    while consumer.dequeue():
+        pass
+    await gateway.enqueue_invalidate_context("u1", "c1")
+    assert redis_client.llen("queue:llm_jobs:background") == 1
+
+
+def test_weighted_selector_shares_and_no_starvation():
+    selector = WeightedLaneSelector({"interactive": 6, "callback": 3, "background": 1})
+    picks = [selector.preference()[0] for _ in range(100)]
+
+    assert picks.count("interactive") == 60
+    assert picks.count("callback") == 30
+    assert picks.count("background") == 10
+    # Jamais deux tours consécutifs sans la lane interactive
+    assert all("interactive" in picks[i:i + 2] for i in range(len(picks) - 1))
+
+
+@pytest.mark.asyncio
+async def test_interactive_wait_bounded_under_background_flood(gateway, redis_client, lanes_on):
+    await gateway.enqueue_jobs([_job("execute_scheduled_task", i) for i in range(500)])
+
+    consumer = LLMJobConsumer(redis_client)
+    waits, enqueued_at, tick, sent = [], {}, 0, 0
+    while True:
+        if sent < 50 and tick % 5 == 0:
+            await gateway.enqueue_jobs([_job("send_message", sent)])
+            enqueued_at[f"send_message-{sent}"] = tick
+            sent += 1
+        job = consumer.dequeue()
+        if job is None:
+            break
+        if job["type"] == "send_message":
+            waits.append(tick - enqueued_at[job["job_id"]])
+        tick += 1
+
+    assert len(waits) == 50
+    assert max(waits) <= 1
+    # Le background est tout de même entièrement consommé
+    assert tick == 550
+
+
+@pytest.mark.asyncio
+async def test_queue_stats_report_depth_and_age(gateway, redis_client, lanes_on):
+    old = datetime.now(timezone.utc) - timedelta(seconds=30)
+    await gateway.enqueue_jobs([_job("execute_scheduled_task", 0, queued_at=old)])
+    await gateway.enqueue_jobs([_job("execute_scheduled_task", 1)])
+
+    stats = gateway.get_queue_stats()
+    assert stats["length"] == 2
+    assert stats["lanes"]["background"]["depth"] == 2
+    assert stats["lanes"]["background"]["oldest_age_s"] >= 29
+    assert stats["lanes"]["interactive"]["depth"] == 0
@@ -0,0 +1,132 @@
+"""
+Tests unitaires pour le moniteur de boucle (loop_monitor).
+
+Ces tests valident:
+1. Un appel bloquant sur la boucle est détecté comme blocage, avec la pile
+   du coupable et la tâche (handler /ws) en cours
+2. Le retard nominal reste sous le seuil (pas de faux positif)
+3. Le mode audit attribue l'appel bloquant au type de message /ws et au
+   site d'appel; un appel fait via asyncio.to_thread n'est pas compté
+4. uninstall() restaure les méthodes d'origine
+
+Usage:
+    python -m pytest tests/test_loop_monitor.py -v
+"""
+
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.loop_monitor import BlockingCallAudit, LoopStallMonitor
+from app.ws_dispatcher import WSConnectionDispatcher, WSContext, WSMessageRouter
+
+
+# ═══════════════════════════════════════════════════════════════
+# FIXTURES
+# ═══════════════════════════════════════════════════════════════
+
+class BlockingDocumentRef:
+    """Faux client synchrone (type Firestore): get() bloque le thread."""
+
+    delay = 0.3
+
+    def get(self):
+        time.sleep(self.delay)
+        return {"read": False}
+
+
+def handle_mark_read(ref):
+    return ref.get()
+
+
+@pytest.fixture
+def dispatcher():
+    ws = MagicMock()
+    ws.send_text = AsyncMock()
+    router = WSMessageRouter()
+
+    @router.route("notification.mark_read")
+    async def _mark_read(ctx, payload):
+        handle_mark_read(BlockingDocumentRef())
+
+    @router.route("chat.list_sessions")
+    async def _list_sessions(ctx, payload):
+        await asyncio.to_thread(BlockingDocumentRef().get)
+
+    return WSConnectionDispatcher(router, WSContext(ws=ws, uid="u1", session_id="s1"))
+
+
+# ═══════════════════════════════════════════════════════════════
+# TESTS
+# ═══════════════════════════════════════════════════════════════
+
+@pytest.mark.asyncio
+async def test_stall_captured_with_stack_and_handler(dispatcher):
+    monitor = LoopStallMonitor(interval_ms=20, threshold_ms=150)
+    await monitor.start(audit=False)
+    try:
+        await asyncio.sleep(0.1)
+        dispatcher.dispatch("notification.mark_read", {})
+        await asyncio.sleep(0.15)
+    finally:
+        await monitor.stop()
+        await dispatcher.close()
+
+    summary = monitor.get_summary()
+    assert summary["stalls"] == 1
+    stall = summary["recent_stalls"][0]
+    assert stall["lag_ms"] >= 150
+    assert stall["task"] == "ws:notification.mark_read"
+    assert any("handle_mark_read" in line for line in stall["stack"])
+    assert any("time.sleep" in line for line in stall["stack"])
+
+
+@pytest.mark.asyncio
+async def test_no_stall_when_loop_is_free():
+    monitor = LoopStallMonitor(interval_ms=10, threshold_ms=150)
+    await monitor.start(audit=False)
+    await asyncio.sleep(0.2)
+    await monitor.stop()
+
+    summary = monitor.get_summary()
+    assert summary["samples"] > 5
+    assert summary["stalls"] == 0 and summary["recent_stalls"] == []
+    assert not summary["running"]
+
+
+@pytest.mark.asyncio
+async def test_audit_attributes_blocking_call_to_message_type(dispatcher):
+    BlockingDocumentRef.delay = 0.02
+    audit = BlockingCallAudit()
+    assert audit.patch(BlockingDocumentRef, "get", label="DocumentReference.get")
+    try:
+        dispatcher.dispatch("notification.mark_read", {})
+        dispatcher.dispatch("chat.list_sessions", {})
+        await asyncio.sleep(0.1)
+    finally:
+        audit.uninstall()
+        BlockingDocumentRef.delay = 0.3
+        await dispatcher.close()
+
+    by_handler = audit.get_summary()["by_handler"]
+    calls = by_handler["ws:notification.mark_read"]["calls"]["DocumentReference.get"]
+    assert calls["count"] == 1 and calls["max_ms"] >= 20
+    assert any("handle_mark_read" in caller for caller in calls["callers"])
+    # Exécuté dans un thread (to_thread): non bloquant pour la boucle
+    assert "ws:chat.list_sessions" not in by_handler
+
+
+def test_uninstall_restores_original_methods():
+    original = BlockingDocumentRef.get
+    audit = BlockingCallAudit()
+    instance = BlockingDocumentRef()
+
+    assert audit.patch(BlockingDocumentRef, "get")
+    assert audit.patch(instance, "get") is False  # déjà enveloppé (via la classe)
+    assert not audit.patch(BlockingDocumentRef, "missing")
+    audit.uninstall()
+
+    assert BlockingDocumentRef.get is original
+    assert not audit.installed
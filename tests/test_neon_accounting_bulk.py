@@ -0,0 +1,157 @@
+"""
+Tests unitaires pour les chemins bulk de NeonAccountingManager (COPY + merge).
+
+Ces tests valident:
+1. upsert_chart_of_accounts: un COPY + un merge, doublons dedupliques,
+   compteurs added / modified / unchanged depuis le RETURNING
+2. upsert_journals: meme chemin, journaux sans code ignores
+3. mark_deleted_entries: ids actifs charges par COPY, anti-join (pas de
+   tableau d'ids en parametre), nombre de round trips constant
+4. _apply_period_balance_delta: le marqueur des soldes n'avance que s'il
+   etait a jour de la version GL precedente (UPDATE conditionnel)
+
+Usage:
+    python -m pytest tests/test_neon_accounting_bulk.py -v
+"""
+
+from uuid import uuid4
+
+import pytest
+
+
+# ═══════════════════════════════════════════════════════════════
+# FIXTURES
+# ═══════════════════════════════════════════════════════════════
+
+class FakeTransaction:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeConn:
+    """Enregistre chaque round trip (execute / copy / fetch*)."""
+
+    def __init__(self, merge_row=None, fetchval_result=0):
+        self.calls = []
+        self.copied = {}
+        self.merge_row = merge_row
+        self.fetchval_result = fetchval_result
+
+    def transaction(self):
+        return FakeTransaction()
+
+    async def execute(self, sql, *params):
+        self.calls.append(("execute", sql, params))
+        return "OK"
+
+    async def copy_records_to_table(self, table, records, columns):
+        self.calls.append(("copy", table, len(records)))
+        self.copied[table] = list(records)
+
+    async def fetchrow(self, sql, *params):
+        self.calls.append(("fetchrow", sql, params))
+        return self.merge_row
+
+    async def fetchval(self, sql, *params):
+        self.calls.append(("fetchval", sql, params))
+        return self.fetchval_result
+
+
+class FakeAcquire:
+    def __init__(self, conn):
+        self.conn = conn
+
+    async def __aenter__(self):
+        return self.conn
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakePool:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def acquire(self):
+        return FakeAcquire(self.conn)
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    from app.tools.neon_accounting_manager import NeonAccountingManager
+
+    monkeypatch.setenv("NEON_DATABASE_URL", "postgresql://test")
+    NeonAccountingManager._instance = None
+    NeonAccountingManager._initialized = False
+    instance = NeonAccountingManager()
+    yield instance
+    NeonAccountingManager._instance = None
+    NeonAccountingManager._initialized = False
+    NeonAccountingManager._pool = None
+
+
+def _use_conn(manager, conn):
+    manager._pool = FakePool(conn)
+    return conn
+
+
+# ═══════════════════════════════════════════════════════════════
+# TESTS
+# ═══════════════════════════════════════════════════════════════
+
+@pytest.mark.asyncio
+async def test_coa_upsert_single_copy_and_merge(manager):
+    conn = _use_conn(manager, FakeConn(merge_row={"added": 1200, "modified": 300}))
+    coa = [{"account_number": f"{1000 + i}", "account_name": f"Compte {i}"} for i in range(2000)]
+    coa.append({"account_number": "1000", "account_name": "Compte renomme"})
+    coa.append({"account_name": "sans numero"})
+
+    stats = await manager.upsert_chart_of_accounts(uuid4(), coa)
+
+    assert stats == {"added": 1200, "modified": 300, "unchanged": 500}
+    assert [c[0] for c in conn.calls] == ["execute", "copy", "fetchrow"]
+    staged = conn.copied["_coa_staging"]
+    assert len(staged) == 2000
+    assert staged[0][:2] == ("1000", "Compte renomme")
+    assert staged[0][8] == "1"  # account_class
+
+
+@pytest.mark.asyncio
+async def test_journals_upsert_bulk(manager):
+    conn = _use_conn(manager, FakeConn(merge_row={"added": 0, "modified": 1}))
+    journals = [{"code": "BNK1", "name": "Banque"}, {"journal_code": "VEN", "erp_id": 4}, {"name": "sans code"}]
+
+    stats = await manager.upsert_journals(uuid4(), journals)
+
+    assert stats == {"added": 0, "modified": 1, "unchanged": 1}
+    assert [c[0] for c in conn.calls] == ["execute", "copy", "fetchrow"]
+    assert conn.copied["_journals_staging"][1][:4] == ("VEN", "VEN", None, "4")
+
+
+@pytest.mark.asyncio
+async def test_mark_deleted_uses_staged_anti_join(manager):
+    conn = _use_conn(manager, FakeConn(fetchval_result=0))
+    active_ids = [str(i) for i in range(200000)] + ["7"]
+
+    assert await manager.mark_deleted_entries(uuid4(), active_ids) == 0
+
+    assert len(conn.copied["_gl_active"]) == 200000
+    update = next(c for c in conn.calls if c[0] == "fetchval")
+    assert "NOT EXISTS" in update[1] and len(update[2]) == 1
+    assert len(conn.calls) <= 6
+
+
+@pytest.mark.asyncio
+async def test_balance_delta_advances_marker_conditionally(manager):
+    conn = FakeConn(fetchval_result=8)
+
+    await manager._apply_period_balance_delta(conn, uuid4())
+
+    marker = [c for c in conn.calls if c[0] == "execute" and "sync_metadata" in c[1]]
+    assert len(marker) == 1
+    sql, params = marker[0][1], marker[0][2]
+    assert "INSERT" not in sql and "dataset_version = $2 - 1" in sql
+    assert params[1] == 8
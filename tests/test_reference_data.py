@@ -0,0 +1,163 @@
+"""
+Tests unitaires pour le tier global des données de référence versionnées.
+
+Ces tests valident:
+1. Un seul chargement (loader) partagé entre instances via Redis
+2. La réponse "not modified" quand le client détient la version courante
+3. La revalidation: une nouvelle version publiée est reprise par les autres process
+4. Les appels concurrents sur une clé froide ne déclenchent qu'un chargement
+5. HR.get_all_references et static_data: version / not_modified bout en bout
+6. L'enveloppe static_data ne réutilise pas la clé legacy (déploiement progressif)
+
+Usage:
+    python -m pytest tests/test_reference_data.py -v
+"""
+
+import asyncio
+import json
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.cache import reference_data
+from app.cache.reference_data import ReferenceDataStore, compute_version
+
+
+# ═══════════════════════════════════════════════════════════════
+# FIXTURES
+# ═══════════════════════════════════════════════════════════════
+
+class CountingLoader:
+    def __init__(self, data):
+        self.data = data
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(0)
+        return self.data
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+@pytest.fixture
+def store(redis_client, monkeypatch):
+    instance = ReferenceDataStore(redis_client)
+    monkeypatch.setattr(reference_data, "_store", instance)
+    return instance
+
+
+# ═══════════════════════════════════════════════════════════════
+# TESTS
+# ═══════════════════════════════════════════════════════════════
+
+@pytest.mark.asyncio
+async def test_loader_runs_once_across_instances(redis_client, store):
+    loader = CountingLoader({"languages": ["fr", "de"]})
+
+    first = await store.get("refdata:test", loader, ttl=60)
+    again = await store.get("refdata:test", loader, ttl=60)
+    other = await ReferenceDataStore(redis_client).get("refdata:test", loader, ttl=60)
+
+    assert loader.calls == 1
+    assert (first.source, again.source, other.source) == ("loader", "memory", "redis")
+    assert first.version == other.version == compute_version({"languages": ["fr", "de"]})
+    assert other.data == {"languages": ["fr", "de"]}
+
+
+@pytest.mark.asyncio
+async def test_client_version_not_modified(store):
+    loader = CountingLoader({"currencies": ["CHF"]})
+    version = (await store.get("refdata:test", loader, ttl=60)).version
+
+    result = await store.get("refdata:test", loader, ttl=60, client_version=version)
+    assert result.not_modified and result.data is None and result.version == version
+
+    stale = await store.get("refdata:test", loader, ttl=60, client_version="old")
+    assert not stale.not_modified and stale.data == {"currencies": ["CHF"]}
+
+
+@pytest.mark.asyncio
+async def test_revalidation_picks_up_new_version(redis_client, store, monkeypatch):
+    await store.get("refdata:test", CountingLoader({"v": 1}), ttl=60)
+
+    publisher = ReferenceDataStore(redis_client)
+    new = await publisher.get("refdata:test", CountingLoader({"v": 2}), ttl=60, force_refresh=True)
+
+    # Copie locale encore fraîche: pas de relecture Redis
+    assert (await store.get("refdata:test", CountingLoader({}), ttl=60)).data == {"v": 1}
+
+    monkeypatch.setattr(ReferenceDataStore, "LOCAL_REVALIDATE_SECONDS", 0)
+    result = await store.get("refdata:test", CountingLoader({}), ttl=60)
+    assert result.version == new.version and result.data == {"v": 2}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_cold_requests_single_load(store):
+    loader = CountingLoader({"erps": ["odoo"]})
+
+    results = await asyncio.gather(*(store.get("refdata:test", loader, ttl=60) for _ in range(20)))
+
+    assert loader.calls == 1
+    assert len({r.version for r in results}) == 1
+
+
+@pytest.mark.asyncio
+async def test_handlers_return_version_and_not_modified(store, monkeypatch):
+    from app import hr_rpc_handlers
+    from app.tools import neon_hr_manager
+    from app.wrappers import static_data_handlers
+
+    class FakeHRManager:
+        calls = 0
+
+        async def get_all_references(self, country_code, lang):
+            FakeHRManager.calls += 1
+            return {"contract_types": [{"code": "CDI"}], "tax_status": []}
+
+    monkeypatch.setattr(neon_hr_manager, "get_neon_hr_manager", lambda: FakeHRManager())
+    hr = hr_rpc_handlers.HRRPCHandlers()
+
+    full = await hr.get_all_references(country_code="CH", lang="fr")
+    assert full["contract_types"] == [{"code": "CDI"}] and full["source"] == "database"
+
+    cached = await hr.get_all_references(country_code="CH", lang="fr", version=full["version"])
+    assert cached == {"not_modified": True, "version": full["version"], "source": "cache"}
+    assert FakeHRManager.calls == 1
+
+    handlers = static_data_handlers.StaticDataHandlers()
+
+    async def _fetch():
+        return {"languages": ["fr"], "currencies": ["CHF"]}
+
+    monkeypatch.setattr(handlers, "_fetch_static_data", _fetch)
+    loaded = await handlers.load_all_static_data()
+    assert loaded["success"] and loaded["data"]["languages"] == ["fr"] and not loaded["from_cache"]
+
+    again = await handlers.load_all_static_data(client_version=loaded["version"])
+    assert again == {"success": True, "not_modified": True, "version": loaded["version"]}
+
+
+@pytest.mark.asyncio
+async def test_static_data_envelope_does_not_reuse_legacy_key(store, redis_client, monkeypatch):
+    from app.wrappers import static_data_handlers
+
+    legacy = json.dumps({"languages": ["en"]})
+    redis_client.set("static_data:global", legacy)
+
+    handlers = static_data_handlers.StaticDataHandlers()
+
+    async def _fetch():
+        return {"languages": ["fr"]}
+
+    monkeypatch.setattr(handlers, "_fetch_static_data", _fetch)
+    loaded = await handlers.load_all_static_data()
+
+    assert loaded["data"] == {"languages": ["fr"]}
+    assert redis_client.get("static_data:global") == legacy
+    envelope = json.loads(redis_client.get(static_data_handlers.STATIC_DATA_CACHE_KEY))
+    assert envelope["version"] == loaded["version"]
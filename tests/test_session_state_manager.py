@@ -0,0 +1,192 @@
+"""
+Tests unitaires pour SessionStateManager (état session en hash Redis).
+
+Ces tests valident:
+1. Le stockage champ par champ (hash) et le rechargement complet
+2. Les mises à jour concurrentes sans perte (pas de load-modify-save)
+3. La présence multi-onglet et le cache local de présence
+4. L'index par utilisateur (list_user_sessions / get_session_stats sans SCAN,
+   tailles total_size_bytes / avg_size_bytes conservées);
+   l'index global des utilisateurs est élagué à l'écriture (expiration)
+5. La migration des sessions legacy (blob JSON)
+6. is_user_on_thread retourne False sur erreur Redis
+
+Usage:
+    python -m pytest tests/test_session_state_manager.py -v
+"""
+
+import json
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+# ═══════════════════════════════════════════════════════════════
+# FIXTURES
+# ═══════════════════════════════════════════════════════════════
+
+@pytest.fixture
+def redis_client():
+    """Client Redis en mémoire (avec support Lua)."""
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+@pytest.fixture
+def manager(redis_client):
+    """SessionStateManager branché sur fakeredis."""
+    from app.llm_service.session_state_manager import SessionStateManager
+    return SessionStateManager(redis_client=redis_client)
+
+
+# ═══════════════════════════════════════════════════════════════
+# TESTS
+# ═══════════════════════════════════════════════════════════════
+
+def test_save_and_load_roundtrip(manager, redis_client):
+    """L'état est stocké en hash et rechargé à l'identique."""
+    assert manager.save_session_state(
+        "u1", "c1",
+        user_context={"mandate_path": "clients/x"},
+        active_tasks={"t1": {"a", "b"}},
+        current_active_thread="t1",
+        is_on_chat_page=True,
+    )
+
+    assert redis_client.type("session:u1:c1:state") == "hash"
+    assert json.loads(redis_client.hget("session:u1:c1:state", "current_active_thread")) == "t1"
+
+    state = manager.load_session_state("u1", "c1")
+    assert state["user_context"] == {"mandate_path": "clients/x"}
+    assert state["active_tasks"] == {"t1": {"a", "b"}}
+    assert state["active_threads_by_session"] == {}
+    assert manager.get_user_context("u1", "c1") == {"mandate_path": "clients/x"}
+
+
+def test_updates_do_not_overwrite_other_fields(manager):
+    """Deux écritures de champs différents ne s'écrasent pas."""
+    manager.save_session_state("u1", "c1")
+
+    manager.update_session_state("u1", "c1", {"chat_mode": "onboarding"})
+    manager.update_jobs_data("u1", "c1", {"ROUTER": []}, {"total": 3})
+    manager.update_thread_activity("u1", "c1", "t1")
+
+    state = manager.load_session_state("u1", "c1")
+    assert state["chat_mode"] == "onboarding"
+    assert state["jobs_metrics"] == {"total": 3}
+    assert "t1" in state["last_activity"]
+
+
+def test_update_missing_session_returns_false(manager):
+    assert manager.update_session_state("u1", "missing", {"chat_mode": "x"}) is False
+    assert manager.update_presence_multi_tab("u1", "missing", "s1", "t1") is False
+
+
+def test_multi_tab_presence(manager):
+    """Présence par onglet: ajout, retrait, fallback legacy."""
+    manager.save_session_state("u1", "c1")
+    manager.update_presence_multi_tab("u1", "c1", "tab-A", "t1")
+    manager.update_presence_multi_tab("u1", "c1", "tab-B", "t2")
+
+    assert manager.is_user_on_thread_multi_tab("u1", "c1", "t1")
+    assert manager.is_user_on_thread_multi_tab("u1", "c1", "t2")
+    assert manager.get_active_tabs_for_thread("u1", "c1", "t2") == ["tab-B"]
+
+    manager.remove_tab_presence("u1", "c1", "tab-B")
+    assert not manager.is_user_on_thread_multi_tab("u1", "c1", "t2")
+
+    manager.remove_tab_presence("u1", "c1", "tab-A")
+    state = manager.load_session_state("u1", "c1")
+    assert state["is_on_chat_page"] is False
+    assert state["current_active_thread"] is None
+
+    # Fallback legacy (aucun onglet enregistré)
+    manager.update_presence("u1", "c1", True, "t3")
+    assert manager.is_user_on_thread("u1", "c1", "t3")
+    assert manager.is_user_on_thread_multi_tab("u1", "c1", "t3")
+
+
+def test_presence_checks_served_from_local_cache(manager, redis_client):
+    """Les checks répétés ne refont pas d'aller-retour Redis."""
+    manager.save_session_state("u1", "c1", is_on_chat_page=True, current_active_thread="t1")
+    assert manager.is_user_on_thread("u1", "c1", "t1")
+
+    # Écriture faite par une autre instance: invisible tant que le cache est frais
+    redis_client.hset("session:u1:c1:state", "current_active_thread", json.dumps("t2"))
+    assert manager.is_user_on_thread("u1", "c1", "t1")
+
+    # Une écriture locale invalide le cache
+    manager.update_presence("u1", "c1", True, "t2")
+    assert manager.is_user_on_thread("u1", "c1", "t2")
+    assert not manager.is_user_on_thread("u1", "c1", "t1")
+
+
+def test_user_index_replaces_scan(manager, redis_client):
+    manager.save_session_state("u1", "c1")
+    manager.save_session_state("u1", "c2")
+    manager.save_session_state("u2", "c1")
+
+    assert sorted(manager.list_user_sessions("u1")) == ["c1", "c2"]
+
+    manager.delete_session_state("u1", "c2")
+    # Expiration simulée: l'entrée d'index orpheline est nettoyée
+    redis_client.delete("session:u2:c1:state")
+
+    assert manager.list_user_sessions("u1") == ["c1"]
+    assert manager.list_user_sessions("u2") == []
+
+    stats = manager.get_session_stats()
+    assert stats["total_sessions"] == 1
+    assert stats["total_users"] == 1
+
+    key = "session:u1:c1:state"
+    expected = sum(redis_client.hstrlen(key, f) for f in redis_client.hkeys(key))
+    assert expected > 0
+    assert stats["total_size_bytes"] == expected
+    assert stats["avg_size_bytes"] == expected
+
+
+def test_is_user_on_thread_returns_false_on_redis_error(manager, monkeypatch):
+    import redis
+
+    def _fail(user_id, company_id):
+        raise redis.exceptions.ConnectionError("down")
+
+    monkeypatch.setattr(manager, "_get_presence_snapshot", _fail)
+
+    assert manager.is_user_on_thread("u1", "c1", "t1") is False
+    assert manager.is_user_on_thread_multi_tab("u1", "c1", "t1") is False
+
+
+def test_users_index_pruned_on_write(manager, redis_client):
+    import time
+
+    manager.save_session_state("u1", "c1")
+    score = redis_client.zscore("session:index:users", "u1")
+    assert time.time() + manager.DEFAULT_TTL - 5 < score <= time.time() + manager.DEFAULT_TTL
+
+    # Utilisateur dont la dernière session a expiré sans delete explicite
+    redis_client.zadd("session:index:users", {"gone": time.time() - 1})
+    manager.save_session_state("u2", "c1")
+
+    assert redis_client.zrange("session:index:users", 0, -1) == ["u1", "u2"]
+
+
+def test_legacy_blob_is_migrated(manager, redis_client):
+    """Une session au format blob JSON est relue puis convertie en hash."""
+    legacy = {
+        "user_context": {"mandate_path": "legacy"},
+        "is_on_chat_page": True,
+        "current_active_thread": "t1",
+        "active_threads_by_session": {"tab-A": "t1"},
+        "last_activity": {"t1": "2026-01-01T00:00:00+00:00"},
+    }
+    redis_client.setex("session:u1:c1:state", 600, json.dumps(legacy))
+
+    assert manager.is_user_on_thread_multi_tab("u1", "c1", "t1")
+    state = manager.load_session_state("u1", "c1")
+    assert state["user_context"] == {"mandate_path": "legacy"}
+    assert state["active_threads_by_session"] == {"tab-A": "t1"}
+    assert redis_client.type("session:u1:c1:state") == "hash"
+
+    assert manager.update_session_state("u1", "c1", {"chat_mode": "x"})
@@ -0,0 +1,119 @@
+"""
+Tests unitaires pour le tier partagé société des caches business.
+
+Ces tests valident:
+1. build_business_key: domaines société → business:shared:{cid}:{domain},
+   domaines propres à l'utilisateur → business:{uid}:{cid}:{domain}
+2. L'overlay utilisateur (état OAuth routing) lu / écrit / effacé à part
+3. Le fan-out d'un même événement vers plusieurs membres n'écrit qu'une
+   fois dans le tier partagé (marqueur write-once par fanout_id)
+4. Des événements successifs au contenu identique (retrait puis ré-ajout)
+   sont tous appliqués au tier partagé
+
+Usage:
+    python -m pytest tests/test_shared_business_tier.py -v
+"""
+
+import json
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.llm_service.redis_namespaces import (
+    build_business_key,
+    build_business_overlay_key,
+    is_shared_domain,
+)
+
+
+# ═══════════════════════════════════════════════════════════════
+# FIXTURES
+# ═══════════════════════════════════════════════════════════════
+
+@pytest.fixture
+def publisher(monkeypatch):
+    from app.realtime import contextual_publisher
+
+    redis = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(contextual_publisher, "get_redis", lambda: redis)
+    monkeypatch.setattr(contextual_publisher.hub, "is_user_connected", lambda uid: False)
+    return contextual_publisher, redis
+
+
+# ═══════════════════════════════════════════════════════════════
+# TESTS
+# ═══════════════════════════════════════════════════════════════
+
+def test_shared_and_user_keys():
+    assert build_business_key("u1", "c1", "bank") == "business:shared:c1:bank"
+    assert build_business_key("u2", "c1", "bank") == "business:shared:c1:bank"
+    assert build_business_key("u1", "c1", "bank", item_key="processed") == "business:shared:c1:bank:processed"
+    assert build_business_key("u1", "c1", "dashboard") == "business:u1:c1:dashboard"
+    assert build_business_key("u1", "c1", "chat") == "business:u1:c1:chat"
+    assert build_business_overlay_key("u1", "c1", "routing") == "business:u1:c1:routing:overlay"
+    assert is_shared_domain("invoices") and not is_shared_domain("tasks")
+
+
+@pytest.mark.asyncio
+async def test_user_overlay_roundtrip():
+    from app.cache.unified_cache_manager import UnifiedCacheManager
+
+    manager = UnifiedCacheManager()
+    manager.redis_client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    overlay = {"oauth": {"connected": False, "reauth_required": True}}
+
+    assert await manager.get_user_overlay("u1", "c1", "routing") is None
+    assert await manager.set_user_overlay("u1", "c1", "routing", overlay)
+    assert await manager.get_user_overlay("u1", "c1", "routing") == overlay
+    assert await manager.get_user_overlay("u2", "c1", "routing") is None
+
+    await manager.set_cached_data("u1", "c1", "routing", "documents", data={"to_process": [1]})
+    shared = await manager.get_cached_data("u2", "c1", "routing", "documents")
+    assert shared["data"] == {"to_process": [1]}
+
+    assert await manager.clear_user_overlay("u1", "c1", "routing")
+    assert await manager.get_user_overlay("u1", "c1", "routing") is None
+
+
+@pytest.mark.asyncio
+async def test_fan_out_writes_shared_tier_once(publisher):
+    module, redis = publisher
+    payload = {"action": "add", "item": {"id": "job-1", "status": "to_process"}}
+
+    for uid in ("u1", "u2", "u3"):
+        await module.publish_business_event(
+            uid, "c1", "invoices", "invoices.item_update", payload, fanout_id="fan-1"
+        )
+
+    cache = json.loads(redis.get("business:shared:c1:invoices"))
+    assert [item["id"] for item in cache["items"]] == ["job-1"]
+
+    # Domaine utilisateur: chaque membre garde sa copie
+    for uid in ("u1", "u2"):
+        await module.publish_business_event(uid, "c1", "dashboard", "dashboard.item_update", payload)
+    assert redis.exists("business:u1:c1:dashboard") and redis.exists("business:u2:c1:dashboard")
+
+
+@pytest.mark.asyncio
+async def test_identical_successive_events_all_applied(publisher):
+    module, redis = publisher
+    add = {"action": "add", "item": {"id": "job-1", "status": "to_process"}}
+    remove = {"action": "remove", "id": "job-1"}
+
+    # Ajout, retrait puis ré-ajout identique, sans fanout_id
+    for payload in (add, remove, add):
+        await module.publish_business_event("u1", "c1", "invoices", "invoices.item_update", payload)
+    cache = json.loads(redis.get("business:shared:c1:invoices"))
+    assert [item["id"] for item in cache["items"]] == ["job-1"]
+
+    # Même contenu, fan-out distincts: chacun est appliqué
+    for fanout_id in ("fan-2", "fan-3"):
+        await module.publish_business_event(
+            "u2", "c1", "invoices", "invoices.item_update", remove, fanout_id=fanout_id
+        )
+        await module.publish_business_event(
+            "u2", "c1", "invoices", "invoices.item_update", add, fanout_id=f"{fanout_id}-add"
+        )
+    cache = json.loads(redis.get("business:shared:c1:invoices"))
+    assert [item["id"] for item in cache["items"]] == ["job-1"]
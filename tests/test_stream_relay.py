@@ -0,0 +1,236 @@
+"""
+Tests unitaires pour le relais de streaming LLM (StreamRelay).
+
+Ces tests valident:
+1. Une rafale de chunks d'un même message est fusionnée dans la fenêtre:
+   un seul frame WS, "chunk" concaténé, "accumulated" du dernier
+2. Une frame seule est transmise telle quelle (seul le type est
+   normalisé), sans passer par safe_json_dumps
+3. Ordre: une frame de fin vide d'abord les chunks en attente
+4. Utilisateur hors ligne: les chunks sont compactés en un seul message
+   cumulé dans le buffer WS, suivi de la frame de fin
+5. WorkerBroadcastListener._handle_message passe ws:stream par le relais;
+   les frames d'un canal externe gardent le chemin standard
+6. NaN / Infinity du worker: jamais transmis tels quels, re-encodés par
+   safe_json_dumps (JSON strict côté navigateur)
+
+Usage:
+    python -m pytest tests/test_stream_relay.py -v
+"""
+
+import asyncio
+import json
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app import ws_hub, ws_message_buffer
+from app.realtime.stream_relay import StreamRelay
+from app.realtime.worker_broadcast_listener import WorkerBroadcastListener
+from app.ws_hub import WebSocketHub
+from app.ws_message_buffer import WebSocketMessageBuffer
+
+CHANNEL = "chat:thread-1"
+
+
+# ═══════════════════════════════════════════════════════════════
+# FIXTURES
+# ═══════════════════════════════════════════════════════════════
+
+class FakeWebSocket:
+    def __init__(self):
+        self.frames = []
+
+    async def send_text(self, data):
+        self.frames.append(data)
+
+
+def _chunk(text, accumulated, message_id="msg-1", msg_type="llm_stream_chunk", **extra):
+    return json.dumps({
+        "type": msg_type,
+        "channel": CHANNEL,
+        "payload": {
+            "message_id": message_id,
+            "thread_key": "thread-1",
+            "chunk": text,
+            "accumulated": accumulated,
+            "is_final": False,
+        },
+        **extra,
+    })
+
+
+def _stream(words, message_id="msg-1"):
+    accumulated = ""
+    frames = []
+    for word in words:
+        accumulated += word
+        frames.append(_chunk(word, accumulated, message_id))
+    return frames
+
+
+_safe_dumps = ws_hub.safe_json_dumps
+
+
+@pytest.fixture
+def env(monkeypatch):
+    hub = WebSocketHub()
+    buffer = WebSocketMessageBuffer(redis_client=fakeredis.FakeRedis(decode_responses=True))
+    relay = StreamRelay(hub, window_ms=5, offline_flush_s=0.05, message_buffer=buffer)
+
+    def _no_dumps(obj):
+        raise AssertionError("safe_json_dumps called on the stream path")
+
+    monkeypatch.setattr(ws_hub, "safe_json_dumps", _no_dumps)
+    return hub, relay, buffer
+
+
+# ═══════════════════════════════════════════════════════════════
+# TESTS
+# ═══════════════════════════════════════════════════════════════
+
+@pytest.mark.asyncio
+async def test_burst_of_chunks_coalesced_in_window(env):
+    hub, relay, _ = env
+    ws = FakeWebSocket()
+    await hub.register("u1", ws)
+    words = ["Bon", "jour", ",", " comment", " puis", "-je", " aider", " ?"]
+
+    for raw in _stream(words):
+        assert await relay.relay("u1", raw)
+    assert ws.frames == []
+    await asyncio.sleep(0.03)
+
+    assert len(ws.frames) == 1
+    frame = json.loads(ws.frames[0])
+    assert frame["type"] == "llm.stream_delta"
+    assert frame["payload"]["chunk"] == "".join(words)
+    assert frame["payload"]["accumulated"] == "".join(words)
+    summary = relay.get_summary()
+    assert summary["coalesced_frames"] == len(words) - 1 and summary["encoded_frames"] == 1
+
+
+@pytest.mark.asyncio
+async def test_single_frames_forwarded_verbatim(env):
+    hub, relay, _ = env
+    ws = FakeWebSocket()
+    await hub.register("u1", ws)
+    start = json.dumps({"type": "llm_stream_start", "channel": CHANNEL, "payload": {"message_id": "msg-1", "score": 0.5}})
+    chunk = _chunk("Salut", "Salut")
+
+    assert await relay.relay("u1", start)
+    assert await relay.relay("u1", chunk)
+    await asyncio.sleep(0.03)
+
+    assert ws.frames == [
+        start.replace('"llm_stream_start"', '"llm.stream_start"', 1),
+        chunk.replace('"llm_stream_chunk"', '"llm.stream_delta"', 1),
+    ]
+    assert relay.get_summary()["raw_forwards"] == 1
+
+
+@pytest.mark.asyncio
+async def test_end_frame_flushes_pending_chunks_first(env):
+    hub, relay, _ = env
+    ws = FakeWebSocket()
+    await hub.register("u1", ws)
+    end = json.dumps({"type": "llm_stream_complete", "channel": CHANNEL, "payload": {"message_id": "msg-1", "full_content": "ab"}})
+
+    for raw in _stream(["a", "b"]):
+        await relay.relay("u1", raw)
+    assert await relay.relay("u1", end)
+
+    assert [json.loads(f)["type"] for f in ws.frames] == ["llm.stream_delta", "llm.stream_end"]
+    assert json.loads(ws.frames[0])["payload"]["chunk"] == "ab"
+
+
+@pytest.mark.asyncio
+async def test_offline_chunks_compacted_into_one_buffered_message(env, monkeypatch):
+    hub, relay, buffer = env
+    monkeypatch.setattr(ws_hub, "safe_json_dumps", json.dumps)
+    monkeypatch.setattr(ws_message_buffer, "get_message_buffer", lambda: buffer)
+    words = [f"w{i} " for i in range(50)]
+
+    for i, raw in enumerate(_stream(words)):
+        await relay.relay("u1", raw)
+        if i % 10 == 9:
+            await asyncio.sleep(0.01)  # plusieurs fenêtres
+    end = json.dumps({"type": "llm_stream_complete", "channel": CHANNEL, "payload": {"message_id": "msg-1"}})
+    assert not await relay.relay("u1", end)
+    await hub.broadcast("u1", json.loads(end))  # chemin standard du listener
+
+    messages = buffer.replay_since("u1")
+    assert [m["type"] for m in messages] == ["llm.stream_delta", "llm.stream_end"]
+    assert messages[0]["payload"]["chunk"] == "".join(words)
+    assert messages[0]["payload"]["accumulated"] == "".join(words)
+    assert relay.get_summary()["offline_written"] == 1
+
+
+@pytest.mark.asyncio
+async def test_offline_sweep_writes_without_end_frame(env):
+    _, relay, buffer = env
+
+    for raw in _stream(["x", "y", "z"]):
+        await relay.relay("u1", raw)
+    await asyncio.sleep(0.15)
+
+    messages = buffer.replay_since("u1")
+    assert len(messages) == 1 and messages[0]["payload"]["chunk"] == "xyz"
+
+
+def _strict_loads(data):
+    def _reject(token):
+        raise AssertionError(f"invalid JSON token {token}")
+    return json.loads(data, parse_constant=_reject)
+
+
+@pytest.mark.asyncio
+async def test_non_json_tokens_never_forwarded_raw(env, monkeypatch):
+    hub, relay, _ = env
+    monkeypatch.setattr(ws_hub, "safe_json_dumps", _safe_dumps)
+    ws = FakeWebSocket()
+    await hub.register("u1", ws)
+    start = json.dumps({"type": "llm_stream_start", "channel": CHANNEL, "payload": {"score": float("nan")}})
+
+    # Frame non fusionnable: chemin standard du listener (parse + safe_json_dumps)
+    assert not await relay.relay("u1", start)
+
+    # Chunk seul, puis rafale: re-encodés en JSON strict
+    assert await relay.relay("u1", _chunk("a", "a", confidence=float("inf")))
+    await asyncio.sleep(0.03)
+    for raw in _stream(["b", "c"], message_id="msg-2"):
+        await relay.relay("u1", raw.replace('"is_final": false', '"is_final": false, "p": NaN'))
+    await asyncio.sleep(0.03)
+
+    frames = [_strict_loads(f) for f in ws.frames]
+    assert [f["type"] for f in frames] == ["llm.stream_delta", "llm.stream_delta"]
+    assert frames[0]["confidence"] is None
+    assert frames[1]["payload"]["chunk"] == "bc" and frames[1]["payload"]["p"] is None
+
+
+@pytest.mark.asyncio
+async def test_listener_routes_stream_channel_through_relay(env):
+    hub, relay, _ = env
+    ws = FakeWebSocket()
+    await hub.register("u1", ws)
+    listener = WorkerBroadcastListener()
+    listener._hub = hub
+    listener._relay = relay
+    dispatched = []
+
+    async def _forward(user_id, payload, channel_type):
+        dispatched.append(payload["type"])
+
+    listener._forward_to_websocket = _forward
+
+    for raw in _stream(["a", "b"]):
+        await listener._handle_message({"type": "message", "channel": b"ws:stream:u1", "data": raw.encode()})
+    external = _chunk("c", "abc", communication_chat_type="telegram")
+    await listener._handle_message({"type": "message", "channel": "ws:stream:u1", "data": external})
+    await listener._handle_message({
+        "type": "message", "channel": "ws:broadcast:u1", "data": json.dumps({"type": "tool_use_start"}),
+    })
+
+    assert len(ws.frames) == 1 and json.loads(ws.frames[0])["payload"]["chunk"] == "ab"
+    assert dispatched == ["llm_stream_chunk", "tool_use_start"]
@@ -0,0 +1,216 @@
+"""
+Tests unitaires pour la file sortante Telegram (TelegramOutboundScheduler).
+
+Ces tests valident:
+1. Token bucket par chat: rafale limitée à chat_burst, puis un envoi par
+   intervalle; un chat chargé ne retarde pas les autres
+2. Coalescence des fragments texte consécutifs (limite 4096 caractères),
+   cartes / étapes wizard envoyées avant le texte; un fragment dont un
+   autre champ diffère (parse_mode, reply_to...) n'est jamais fusionné
+3. Bucket global partagé entre les chats
+4. Métriques: profondeur par chat, délais d'attente, fusions
+5. CommunicationDispatcher._publish_outbound passe par la file et la
+   boucle publie en arrière-plan; stop() publie ce qui reste
+
+Usage:
+    python -m pytest tests/test_telegram_outbound_scheduler.py -v
+"""
+
+import asyncio
+
+import pytest
+
+from app.realtime import telegram_outbound_scheduler
+from app.realtime.communication_dispatcher import CommunicationDispatcher
+from app.realtime.telegram_outbound_scheduler import TelegramOutboundScheduler
+
+
+# ═══════════════════════════════════════════════════════════════
+# FIXTURES
+# ═══════════════════════════════════════════════════════════════
+
+class VirtualClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class FakeTransport:
+    def __init__(self, clock=None):
+        self.clock = clock
+        self.sent = []
+
+    async def publish(self, message):
+        self.sent.append((self.clock() if self.clock else None, message))
+
+
+def _scheduler(clock, transport, **kwargs):
+    kwargs.setdefault("chat_rate_per_min", 60)
+    kwargs.setdefault("chat_burst", 2)
+    kwargs.setdefault("global_rate_per_sec", 100)
+    return TelegramOutboundScheduler(publish=transport.publish, clock=clock, **kwargs)
+
+
+def _card(chat_id, n):
+    return {"action": "send_message_with_buttons", "chat_id": chat_id, "text": f"card {n}", "buttons": []}
+
+
+def _text(chat_id, text, mandate_path="m/1"):
+    return {"action": "send_message", "chat_id": chat_id, "text": text, "mandate_path": mandate_path}
+
+
+# ═══════════════════════════════════════════════════════════════
+# TESTS
+# ═══════════════════════════════════════════════════════════════
+
+@pytest.mark.asyncio
+async def test_per_chat_token_bucket_pacing():
+    clock = VirtualClock()
+    transport = FakeTransport(clock)
+    scheduler = _scheduler(clock, transport)
+
+    for n in range(5):
+        scheduler.enqueue(_card(-100, n))
+    scheduler.enqueue(_card(-200, 0))
+
+    assert await scheduler.pump() == pytest.approx(1.0)
+    assert [m["text"] for _, m in transport.sent] == ["card 0", "card 1", "card 0"]
+
+    for _ in range(3):
+        clock.advance(1.0)
+        await scheduler.pump()
+
+    chat_100 = [(t - 1000.0, m["text"]) for t, m in transport.sent if m["chat_id"] == -100]
+    assert chat_100 == [(0, "card 0"), (0, "card 1"), (1, "card 2"), (2, "card 3"), (3, "card 4")]
+    assert await scheduler.pump() is None
+
+
+@pytest.mark.asyncio
+async def test_text_fragments_coalesced_and_cards_first():
+    clock = VirtualClock()
+    transport = FakeTransport(clock)
+    scheduler = _scheduler(clock, transport, chat_burst=1, max_text_len=50)
+
+    scheduler.enqueue(_text(-1, "fragment 1"))
+    scheduler.enqueue(_text(-1, "fragment 2"))
+    scheduler.enqueue(_card(-1, 0))
+    scheduler.enqueue(_text(-1, "fragment 3"))
+    scheduler.enqueue(_text(-1, "x" * 40))  # dépasserait max_text_len
+    scheduler.enqueue(_text(-1, "other mandate", mandate_path="m/2"))
+
+    for _ in range(5):
+        await scheduler.pump()
+        clock.advance(1.0)
+
+    assert [m["text"] for _, m in transport.sent] == [
+        "card 0",
+        "fragment 1\n\nfragment 2",
+        "fragment 3",
+        "x" * 40,
+        "other mandate",
+    ]
+    summary = scheduler.get_summary()
+    assert summary["coalesced"] == 1 and summary["sent"] == 5 and summary["enqueued"] == 6
+
+
+@pytest.mark.asyncio
+async def test_fragment_not_merged_into_sent_message():
+    clock = VirtualClock()
+    transport = FakeTransport(clock)
+    scheduler = _scheduler(clock, transport)
+
+    scheduler.enqueue(_text(-1, "a"))
+    await scheduler.pump()
+    scheduler.enqueue(_text(-1, "b"))
+    await scheduler.pump()
+
+    assert [m["text"] for _, m in transport.sent] == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_fragments_differing_outside_text_not_merged():
+    clock = VirtualClock()
+    transport = FakeTransport(clock)
+    scheduler = _scheduler(clock, transport, chat_burst=1)
+
+    scheduler.enqueue(_text(-1, "a"))
+    scheduler.enqueue({**_text(-1, "b"), "parse_mode": "Markdown"})
+    scheduler.enqueue({**_text(-1, "c"), "parse_mode": "Markdown"})
+    scheduler.enqueue({**_text(-1, "d"), "parse_mode": "Markdown", "reply_to_message_id": 7})
+
+    for _ in range(4):
+        await scheduler.pump()
+        clock.advance(1.0)
+
+    assert [(m["text"], m.get("parse_mode"), m.get("reply_to_message_id")) for _, m in transport.sent] == [
+        ("a", None, None),
+        ("b\n\nc", "Markdown", None),
+        ("d", "Markdown", 7),
+    ]
+    assert scheduler.get_summary()["coalesced"] == 1
+
+
+@pytest.mark.asyncio
+async def test_global_bucket_shared_across_chats():
+    clock = VirtualClock()
+    transport = FakeTransport(clock)
+    scheduler = _scheduler(clock, transport, global_rate_per_sec=2)
+
+    for chat_id in range(6):
+        scheduler.enqueue(_card(chat_id, chat_id))
+
+    assert await scheduler.pump() == pytest.approx(0.5)
+    assert len(transport.sent) == 2
+    clock.advance(1.0)
+    await scheduler.pump()
+    assert len(transport.sent) == 4
+    # Ordre d'arrivée respecté entre chats
+    assert [m["chat_id"] for _, m in transport.sent] == [0, 1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_metrics_depth_and_delay():
+    clock = VirtualClock()
+    transport = FakeTransport(clock)
+    scheduler = _scheduler(clock, transport, chat_burst=1)
+
+    for n in range(4):
+        scheduler.enqueue(_card(-7, n))
+    await scheduler.pump()
+    clock.advance(0.5)
+
+    summary = scheduler.get_summary()
+    assert summary["queued"] == 3 and summary["chats"] == {"-7": 3}
+    assert summary["oldest_wait_ms"] == 500.0
+
+    clock.advance(0.5)
+    await scheduler.pump()
+    summary = scheduler.get_summary()
+    assert summary["sent"] == 2 and summary["delay_max_ms"] == 1000.0
+    assert summary["delay_avg_ms"] == 500.0
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_queues_and_background_loop_publishes(monkeypatch):
+    transport = FakeTransport()
+    scheduler = TelegramOutboundScheduler(publish=transport.publish, chat_rate_per_min=60, chat_burst=1)
+    monkeypatch.setattr(telegram_outbound_scheduler, "_scheduler", scheduler)
+    monkeypatch.setenv("TELEGRAM_OUTBOUND_SCHEDULER_ENABLED", "true")
+    dispatcher = CommunicationDispatcher()
+
+    await dispatcher._publish_outbound("telegram", _text(-5, "hello"))
+    await dispatcher._publish_outbound("telegram", _card(-5, 1))
+    await asyncio.sleep(0.05)
+
+    # Carte prioritaire sur le texte en file; le texte attend le prochain jeton
+    assert [m["text"] for _, m in transport.sent] == ["card 1"]
+    assert scheduler.get_summary()["running"]
+
+    await scheduler.stop(flush=True)
+    assert [m["text"] for _, m in transport.sent] == ["card 1", "hello"]
+    assert not scheduler.get_summary()["running"]
@@ -0,0 +1,220 @@
+"""
+Tests unitaires pour l'index des threads de chat (FirebaseRealtimeChat).
+
+Ces tests valident:
+1. La mise à jour incrémentale de l'index à chaque message écrit
+2. Le listing sans lecture des messages (coût indépendant de l'historique)
+3. La pagination par curseur composite (last_activity, thread_key), sans
+   perte aux égalités; seuls les threads de la page sont vérifiés
+4. La réconciliation des threads créés hors provider / supprimés, et des
+   threads alimentés hors provider (entrée à 0 message, last_activity
+   périmée, y compris derrière une clé uuid triée après les push IDs)
+5. Le maintien de l'index sur rename / erase / delete
+
+Usage:
+    python -m pytest tests/test_thread_index.py -v
+"""
+
+import pytest
+
+
+
+# ═══════════════════════════════════════════════════════════════
+# FIXTURES
+# ═══════════════════════════════════════════════════════════════
+
+@pytest.fixture
+def chat(rtdb, make_realtime_chat):
+    return make_realtime_chat(rtdb)
+
+
+def _send(chat, thread_key, n, mode="chats"):
+    for i in range(n):
+        chat.send_realtime_message_structured("u1", "space", thread_key, text=f"m{i}", mode=mode)
+
+
+# ═══════════════════════════════════════════════════════════════
+# TESTS
+# ═══════════════════════════════════════════════════════════════
+
+def test_index_tracks_count_and_last_activity(chat, rtdb):
+    chat.create_chat("u1", "space", "Budget", mode="chats", thread_key="t1")
+    _send(chat, "t1", 3)
+
+    entry = rtdb.child("space/thread_index/chats/t1").get()
+    assert entry["thread_name"] == "Budget"
+    assert entry["chat_mode"] == "general_chat"
+    assert entry["message_count"] == 3
+
+    messages = rtdb.child("space/chats/t1/messages").get()
+    assert entry["last_activity"] == max(m["timestamp"] for m in messages.values())
+
+    threads = chat.get_all_threads("space", mode="chats")
+    assert threads["t1"]["message_count"] == 3
+
+
+def test_listing_cost_independent_of_history(chat, rtdb):
+    for t in range(5):
+        chat.create_chat("u1", "space", f"Chat {t}", mode="chats", thread_key=f"t{t}")
+        _send(chat, f"t{t}", 2)
+
+    rtdb.reset_counters()
+    chat.list_threads("space", mode="chats")
+    small = rtdb.bytes_read
+
+    for t in range(5):
+        _send(chat, f"t{t}", 50)
+
+    rtdb.reset_counters()
+    threads, _ = chat.list_threads("space", mode="chats")
+    assert [t["message_count"] for t in threads] == [52] * 5
+    # Index + dernier message de chaque thread: seuls le compteur (2 → 52)
+    # et le texte du dernier message (m1 → m49) prennent un chiffre
+    assert rtdb.bytes_read <= small + 10
+
+
+def test_pagination_by_last_activity(chat):
+    for t in range(5):
+        chat.create_chat("u1", "space", f"Chat {t}", mode="chats", thread_key=f"t{t}")
+        _send(chat, f"t{t}", 1)
+
+    page1, cursor = chat.list_threads("space", mode="chats", limit=2)
+    assert [t["thread_key"] for t in page1] == ["t4", "t3"]
+
+    page2, cursor = chat.list_threads("space", mode="chats", limit=2, before=cursor)
+    assert [t["thread_key"] for t in page2] == ["t2", "t1"]
+
+    page3, cursor = chat.list_threads("space", mode="chats", limit=2, before=cursor)
+    assert [t["thread_key"] for t in page3] == ["t0"]
+    assert cursor is None
+
+
+def test_pagination_cursor_keeps_ties(chat, rtdb):
+    for t in range(5):
+        chat.create_chat("u1", "space", f"Chat {t}", mode="chats", thread_key=f"t{t}")
+        _send(chat, f"t{t}", 1)
+        rtdb.child(f"space/thread_index/chats/t{t}/last_activity").set("2026-01-01T00:00:00+00:00")
+        rtdb.child(f"space/chats/t{t}/messages").set({"-a": {"timestamp": "2026-01-01T00:00:00+00:00"}})
+
+    seen, cursor = chat.list_threads("space", mode="chats", limit=2)
+    while cursor:
+        page, cursor = chat.list_threads("space", mode="chats", limit=2, before=cursor)
+        seen += page
+
+    assert [t["thread_key"] for t in seen] == ["t4", "t3", "t2", "t1", "t0"]
+
+
+def test_paginated_listing_checks_only_page_threads(chat, rtdb, monkeypatch):
+    for t in range(6):
+        chat.create_chat("u1", "space", f"Chat {t}", mode="chats", thread_key=f"t{t}")
+        _send(chat, f"t{t}", 1)
+
+    checked = []
+    real_last_activity = chat._get_thread_last_activity
+
+    def _spy(space_code, thread_key, mode):
+        checked.append(thread_key)
+        return real_last_activity(space_code, thread_key, mode)
+
+    monkeypatch.setattr(chat, "_get_thread_last_activity", _spy)
+
+    page, cursor = chat.list_threads("space", mode="chats", limit=2)
+    assert [t["thread_key"] for t in page] == ["t5", "t4"]
+    assert sorted(checked) == ["t4", "t5"]
+
+
+def test_reconciles_unindexed_and_orphan_threads(chat, rtdb):
+    # Thread écrit directement (worker, données antérieures à l'index)
+    rtdb.child("space/active_chats/klk_1").set({
+        "thread_name": "Facture",
+        "chat_mode": "apbookeeper_chat",
+        "messages": {
+            "-a": {"timestamp": "2026-01-01T00:00:00+00:00", "content": "x"},
+            "-b": {"timestamp": "2026-01-02T00:00:00+00:00", "content": "y"},
+        },
+    })
+    # Entrée orpheline (thread supprimé hors provider)
+    rtdb.child("space/thread_index/active_chats/gone").set({"thread_name": "gone", "message_count": 1})
+
+    threads, _ = chat.list_threads("space", mode="active_chats")
+    assert threads == [{
+        "thread_key": "klk_1",
+        "thread_name": "Facture",
+        "chat_mode": "apbookeeper_chat",
+        "message_count": 2,
+        "last_activity": "2026-01-02T00:00:00+00:00",
+    }]
+
+    index = rtdb.child("space/thread_index/active_chats").get()
+    assert set(index) == {"klk_1"}
+
+
+def test_rename_erase_delete_maintain_index(chat, rtdb):
+    chat.create_chat("u1", "space", "Old", mode="chats", thread_key="t1")
+    _send(chat, "t1", 2)
+
+    chat.rename_chat("space", "t1", "New", mode="chats")
+    assert chat.get_all_threads("space", mode="chats")["t1"]["thread_name"] == "New"
+
+    chat.erase_chat("space", "t1", mode="chats")
+    assert chat.get_all_threads("space", mode="chats") == {}
+
+    _send(chat, "t1", 1)
+    assert chat.get_all_threads("space", mode="chats")["t1"]["message_count"] == 1
+
+    chat.delete_chat("space", "t1", mode="chats")
+    assert rtdb.child("space/thread_index/chats/t1").get() is None
+
+
+def test_reconciles_messages_written_outside_provider(chat, rtdb):
+    chat.create_chat("u1", "space", "Nouveau", mode="job_chats", thread_key="job_1")
+    chat.create_chat("u1", "space", "Ancien", mode="job_chats", thread_key="job_2")
+    chat.send_realtime_message_structured("u1", "space", "job_2", text="x", mode="job_chats")
+
+    # Écritures du worker, directement dans la RTDB (index non touché)
+    messages = rtdb.child("space/job_chats/job_1/messages")
+    messages.push({"timestamp": "2099-01-01T00:00:00+00:00", "content": "a"})
+    messages.push({"timestamp": "2099-01-02T00:00:00+00:00", "content": "b"})
+    rtdb.child("space/job_chats/job_2/messages").push({"timestamp": "2099-01-03T00:00:00+00:00", "content": "c"})
+
+    threads, cursor = chat.list_threads("space", mode="job_chats")
+    assert cursor is None
+    assert [(t["thread_key"], t["thread_name"], t["message_count"], t["last_activity"]) for t in threads] == [
+        ("job_2", "Ancien", 2, "2099-01-03T00:00:00+00:00"),
+        ("job_1", "Nouveau", 2, "2099-01-02T00:00:00+00:00"),
+    ]
+    # Entrées corrigées persistées: la lecture suivante ne reconstruit plus rien
+    assert rtdb.child("space/thread_index/job_chats/job_1/message_count").get() == 2
+
+
+def test_external_write_site_touches_index(chat):
+    chat.create_chat("u1", "space", "Carte", mode="job_chats", thread_key="job_3")
+    chat.db.child("space/job_chats/job_3/messages/0f8c-uuid").set(
+        {"timestamp": "2099-02-01T00:00:00+00:00", "content": "card"}
+    )
+    chat.touch_thread_index("space", "job_3", "job_chats", "2099-02-01T00:00:00+00:00")
+
+    threads, _ = chat.list_threads("space", mode="job_chats")
+    assert [(t["thread_key"], t["message_count"], t["last_activity"]) for t in threads] == [
+        ("job_3", 1, "2099-02-01T00:00:00+00:00"),
+    ]
+
+
+def test_push_messages_after_uuid_key_mark_entry_stale(chat, rtdb):
+    chat.create_chat("u1", "space", "Carte", mode="job_chats", thread_key="job_4")
+    chat.send_realtime_message_structured("u1", "space", "job_4", text="x", mode="job_chats")
+    # Clic de carte sous une clé uuid (triée après tous les push IDs)
+    rtdb.child("space/job_chats/job_4/messages/0b5e-uuid").set(
+        {"timestamp": "2099-01-01T00:00:00+00:00", "content": "click"}
+    )
+    chat.touch_thread_index("space", "job_4", "job_chats", "2099-01-01T00:00:00+00:00")
+
+    # Messages du worker (push IDs) écrits ensuite, hors provider
+    messages = rtdb.child("space/job_chats/job_4/messages")
+    for day in (2, 3, 4):
+        messages.push({"timestamp": f"2099-01-0{day}T00:00:00+00:00", "content": "w"})
+
+    threads, _ = chat.list_threads("space", mode="job_chats")
+    assert [(t["message_count"], t["last_activity"]) for t in threads] == [
+        (5, "2099-01-04T00:00:00+00:00"),
+    ]
@@ -0,0 +1,221 @@
+"""
+Tests unitaires pour les index Redis de UnifiedRegistryService.
+
+Ces tests valident:
+1. Le heartbeat en un seul EVAL (score ZSET + champ dédié, blob intact)
+2. is_user_connected via ZSCORE
+3. Le désenregistrement O(1) via l'index session → user
+4. L'index société → utilisateurs actifs
+5. Le nettoyage par score (utilisateurs et tâches expirés), y compris
+   quand le hash utilisateur a déjà expiré
+6. Le heartbeat prolonge le TTL du SET société
+7. Un heartbeat concurrent du nettoyage ne laisse pas d'utilisateur à moitié élagué
+8. Le backfill des index pour les entrées enregistrées avant eux
+
+Usage:
+    python -m pytest tests/test_unified_registry.py -v
+"""
+
+import json
+import time
+from unittest.mock import MagicMock
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.registry.unified_registry import UnifiedRegistryService
+
+
+# ═══════════════════════════════════════════════════════════════
+# FIXTURES
+# ═══════════════════════════════════════════════════════════════
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+@pytest.fixture
+def registry(redis_client):
+    return UnifiedRegistryService(redis_client=redis_client, firestore_client=MagicMock())
+
+
+# ═══════════════════════════════════════════════════════════════
+# TESTS
+# ═══════════════════════════════════════════════════════════════
+
+def test_heartbeat_is_a_single_eval_and_keeps_blob(registry, redis_client, monkeypatch):
+    registry.register_user_session("u1", "s1", "c1", ["c1"])
+    blob_before = redis_client.hget("registry:unified:u1", "data")
+    registry.update_user_heartbeat("u1")  # SCRIPT LOAD initial
+
+    calls = []
+    real_execute_command = redis_client.execute_command
+
+    def counting(*args, **kwargs):
+        calls.append(args[0])
+        return real_execute_command(*args, **kwargs)
+
+    monkeypatch.setattr(redis_client, "execute_command", counting)
+    assert registry.update_user_heartbeat("u1") is True
+    monkeypatch.undo()
+
+    assert calls == ["EVALSHA"]
+    assert redis_client.hget("registry:unified:u1", "data") == blob_before
+    last = redis_client.hget("registry:unified:u1", "last_heartbeat")
+    assert registry.get_user_registry("u1")["heartbeat"]["last_heartbeat"] == last
+
+    # Utilisateur inconnu: pas de recréation
+    assert registry.update_user_heartbeat("ghost") is False
+    assert redis_client.exists("registry:unified:ghost") == 0
+    assert redis_client.zscore("registry:heartbeats", "ghost") is None
+
+
+def test_is_user_connected_uses_heartbeat_score(registry, redis_client):
+    assert registry.is_user_connected("u1") is False
+
+    registry.register_user_session("u1", "s1", "c1", ["c1"])
+    assert registry.is_user_connected("u1") is True
+    assert registry.get_user_connection_mode("u1") == "UI"
+
+    redis_client.zadd("registry:heartbeats", {"u1": time.time() - 600})
+    assert registry.is_user_connected("u1") is False
+
+
+def test_unregister_uses_session_index(registry, redis_client, monkeypatch):
+    registry.register_user_session("u1", "s1", "c1", ["c1"])
+    registry.register_user_session("u2", "s2", "c1", ["c1"])
+    assert sorted(registry.get_company_active_users("c1")) == ["u1", "u2"]
+
+    monkeypatch.setattr(redis_client, "scan", MagicMock(side_effect=AssertionError("SCAN")))
+    assert registry.unregister_user_session("s1") is True
+    assert registry.unregister_user_session("s1") is False
+
+    assert redis_client.exists("registry:unified:u1") == 0
+    assert redis_client.zscore("registry:heartbeats", "u1") is None
+    assert registry.get_company_active_users("c1") == ["u2"]
+    company = json.loads(redis_client.hget("registry:company:c1", "data"))
+    assert list(company["active_users"]) == ["u2"]
+
+
+def test_reregister_replaces_session_and_company(registry, redis_client):
+    registry.register_user_session("u1", "s1", "c1", ["c1", "c2"])
+    registry.register_user_session("u1", "s2", "c2", ["c1", "c2"])
+
+    assert redis_client.hget("registry:sessions", "s1") is None
+    assert registry.get_company_active_users("c1") == []
+    assert registry.get_company_active_users("c2") == ["u1"]
+
+    # L'ancienne session ne désenregistre pas la nouvelle
+    assert registry.unregister_user_session("s1") is False
+    assert registry.unregister_user_session("s2") is True
+
+
+def test_cleanup_expires_by_score(registry, redis_client):
+    registry.register_user_session("old", "s-old", "c1", ["c1"])
+    registry.register_user_session("fresh", "s-fresh", "c1", ["c1"])
+    redis_client.zadd("registry:heartbeats", {"old": time.time() - registry.USER_TTL - 1})
+
+    registry.register_task("t-old", "sync", "fresh", "c1")
+    registry.register_task("t-new", "sync", "fresh", "c1")
+    redis_client.zadd("registry:tasks:created", {"t-old": time.time() - registry.TASK_RETENTION - 1})
+
+    assert registry.cleanup_expired_entries() == {"users": 1, "tasks": 1}
+
+    assert redis_client.zrange("registry:heartbeats", 0, -1) == ["fresh"]
+    assert redis_client.hget("registry:sessions", "s-old") is None
+    assert registry.get_company_active_users("c1") == ["fresh"]
+    assert redis_client.exists("registry:task:t-old") == 0
+    assert redis_client.exists("registry:task:t-new") == 1
+
+
+def test_cleanup_prunes_indexes_after_user_hash_expired(registry, redis_client):
+    registry.register_user_session("gone", "s-gone", "c1", ["c1"])
+    registry.register_user_session("fresh", "s-fresh", "c1", ["c1"])
+    # Hash utilisateur expiré (TTL 24h) avant le passage du nettoyage
+    redis_client.delete("registry:unified:gone")
+    redis_client.zadd("registry:heartbeats", {"gone": time.time() - registry.USER_TTL - 1})
+
+    assert registry.cleanup_expired_entries()["users"] == 1
+
+    assert redis_client.hgetall("registry:sessions") == {"s-fresh": "fresh"}
+    assert registry.get_company_active_users("c1") == ["fresh"]
+    assert redis_client.hkeys("registry:user_refs") == ["fresh"]
+
+
+def test_heartbeat_refreshes_company_set_ttl(registry, redis_client):
+    registry.register_user_session("u1", "s1", "c1", ["c1"])
+    redis_client.expire("registry:company:c1:users", 10)
+
+    assert registry.update_user_heartbeat("u1") is True
+    assert redis_client.ttl("registry:company:c1:users") > registry.USER_TTL - 5
+
+
+def test_heartbeat_during_cleanup_leaves_no_half_pruned_user(registry, redis_client, monkeypatch):
+    registry.register_user_session("u1", "s1", "c1", ["c1"])
+    registry.update_user_heartbeat("u1")  # SCRIPT LOAD initial
+    redis_client.zadd("registry:heartbeats", {"u1": time.time() - registry.USER_TTL - 1})
+
+    # Heartbeat reçu juste après la commande qui lit les scores expirés
+    real_execute_command = redis_client.execute_command
+    fired = []
+
+    def heartbeat_after_read(*args, **kwargs):
+        result = real_execute_command(*args, **kwargs)
+        if not fired and args[0] in ("ZRANGEBYSCORE", "EVALSHA") and "registry:heartbeats" in args:
+            fired.append(args[0])
+            registry.update_user_heartbeat("u1")
+        return result
+
+    monkeypatch.setattr(redis_client, "execute_command", heartbeat_after_read)
+    registry.cleanup_expired_entries()
+    monkeypatch.undo()
+
+    assert fired
+    # Soit l'utilisateur est entièrement retiré, soit entièrement présent
+    exists = redis_client.exists("registry:unified:u1") == 1
+    assert (redis_client.zscore("registry:heartbeats", "u1") is not None) == exists
+    assert (redis_client.hget("registry:sessions", "s1") == "u1") == exists
+    assert (registry.get_company_active_users("c1") == ["u1"]) == exists
+
+
+def test_cleanup_batches_user_prune(registry, redis_client, monkeypatch):
+    monkeypatch.setattr(registry, "PRUNE_BATCH", 2)
+    expired = time.time() - registry.USER_TTL - 1
+    for i in range(5):
+        registry.register_user_session(f"u{i}", f"s{i}", "c1", ["c1"])
+        redis_client.zadd("registry:heartbeats", {f"u{i}": expired})
+
+    assert registry.cleanup_expired_entries()["users"] == 5
+    assert redis_client.zcard("registry:heartbeats") == 0
+    assert redis_client.hlen("registry:sessions") == 0
+
+
+def test_backfill_indexes_for_users_registered_before_them(registry, redis_client):
+    # Entrées écrites par l'ancien code: blob seul, aucun index
+    legacy = {
+        "user_info": {"user_id": "old", "session_id": "s-old"},
+        "companies": {"current_company_id": "c1"},
+    }
+    redis_client.hset("registry:unified:old", mapping={
+        "data": json.dumps(legacy),
+        "last_update": str(time.time() - 60),
+    })
+    redis_client.hset("registry:task:t-old", mapping={"data": "{}", "created_at": "100"})
+    registry.register_user_session("new", "s-new", "c2", ["c2"])
+
+    stats = registry.cleanup_expired_entries()
+
+    assert stats["backfilled"] == 2
+    assert stats["tasks"] == 1  # tâche legacy reprise puis purgée (créée à t=100)
+    assert registry.is_user_connected("old")
+    assert redis_client.hget("registry:sessions", "s-old") == "old"
+    assert registry.get_company_active_users("c1") == ["old"]
+    assert registry.unregister_user_session("s-old") is True
+    assert registry.get_company_active_users("c1") == []
+
+    # Plus d'entrée legacy: le marqueur arrête les SCAN suivants
+    assert redis_client.exists(registry.BACKFILL_DONE_KEY) == 0
+    assert "backfilled" not in registry.cleanup_expired_entries()
+    assert redis_client.exists(registry.BACKFILL_DONE_KEY) == 1
@@ -0,0 +1,304 @@
+"""
+Tests unitaires pour le dispatcher WebSocket (ws_dispatcher).
+
+Ces tests valident:
+1. Un handler lent ne retarde plus un message sans rapport
+2. L'ordre d'arrivée est conservé au sein d'une lane SERIAL; une route
+   PARALLEL avec lane attend la lane (changement de société → init page);
+   une barrière fait de même pour une route SERIAL / FIRE_AND_FORGET
+3. L'annulation des handlers à la déconnexion (sauf FIRE_AND_FORGET)
+4. Les métriques par type de message
+5. La table de routage de production (ws_routes): toute route liée à la
+   société active est derrière la barrière "session"
+
+Usage:
+    python -m pytest tests/test_ws_dispatcher.py -v
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.ws_dispatcher import (
+    WSConcurrency,
+    WSConnectionDispatcher,
+    WSContext,
+    WSMessageRouter,
+)
+
+
+# ═══════════════════════════════════════════════════════════════
+# FIXTURES
+# ═══════════════════════════════════════════════════════════════
+
+@pytest.fixture
+def ws():
+    """WebSocket factice."""
+    ws_mock = MagicMock()
+    ws_mock.send_text = AsyncMock()
+    return ws_mock
+
+
+@pytest.fixture
+def router():
+    return WSMessageRouter()
+
+
+def make_dispatcher(router, ws, max_concurrency=4):
+    return WSConnectionDispatcher(
+        router,
+        WSContext(ws=ws, uid="u1", session_id="s1"),
+        max_concurrency=max_concurrency,
+    )
+
+
+# ═══════════════════════════════════════════════════════════════
+# TESTS
+# ═══════════════════════════════════════════════════════════════
+
+@pytest.mark.asyncio
+async def test_slow_handler_does_not_block_unrelated_message(router, ws):
+    """Un chargement lent ne retarde pas un message d'un autre domaine."""
+    release = asyncio.Event()
+    done = []
+
+    @router.route("coa.sync", concurrency=WSConcurrency.SERIAL)
+    async def slow(ctx, payload):
+        await release.wait()
+        done.append("slow")
+
+    @router.route("page.context_change", concurrency=WSConcurrency.PARALLEL)
+    async def fast(ctx, payload):
+        done.append("fast")
+
+    dispatcher = make_dispatcher(router, ws)
+    assert dispatcher.dispatch("coa.sync", {})
+    assert dispatcher.dispatch("page.context_change", {})
+
+    await asyncio.wait_for(_until(lambda: "fast" in done), timeout=1)
+    assert done == ["fast"]
+
+    release.set()
+    await asyncio.wait_for(_until(lambda: "slow" in done), timeout=1)
+    await dispatcher.close()
+
+
+@pytest.mark.asyncio
+async def test_serial_lane_preserves_order(router, ws):
+    """Même lane: ordre d'arrivée conservé, même si le premier est plus lent."""
+    order = []
+
+    @router.route("chat.send_message")
+    async def send(ctx, payload):
+        await asyncio.sleep(payload["delay"])
+        order.append(payload["n"])
+
+    dispatcher = make_dispatcher(router, ws)
+    dispatcher.dispatch("chat.send_message", {"thread_key": "t1", "n": 1, "delay": 0.05})
+    dispatcher.dispatch("chat.send_message", {"thread_key": "t1", "n": 2, "delay": 0})
+    # Autre thread: lane distincte, passe devant
+    dispatcher.dispatch("chat.send_message", {"thread_key": "t2", "n": 3, "delay": 0})
+
+    await asyncio.wait_for(_until(lambda: len(order) == 3), timeout=1)
+    assert order == [3, 1, 2]
+    await dispatcher.close()
+
+
+@pytest.mark.asyncio
+async def test_parallel_route_waits_for_pending_lane(router, ws):
+    """Init de page après company_change: attend la lane session, reste parallèle."""
+    release = asyncio.Event()
+    order = []
+
+    @router.route("dashboard.company_change", lane="session")
+    async def company_change(ctx, payload):
+        await release.wait()
+        order.append("company_change")
+
+    @router.route("routing.orchestrate_init", "invoices.orchestrate_init",
+                  concurrency=WSConcurrency.PARALLEL, lane="session")
+    async def page_init(ctx, payload):
+        order.append(ctx.msg_type)
+        await release.wait()
+
+    dispatcher = make_dispatcher(router, ws)
+    dispatcher.dispatch("dashboard.company_change", {})
+    dispatcher.dispatch("routing.orchestrate_init", {})
+    dispatcher.dispatch("invoices.orchestrate_init", {})
+    await asyncio.sleep(0.01)
+    assert order == []
+
+    release.set()
+    await asyncio.wait_for(_until(lambda: dispatcher.pending_count == 0), timeout=1)
+    assert order[0] == "company_change" and len(order) == 3
+
+    # Lane vide: pas d'attente
+    release.clear()
+    dispatcher.dispatch("routing.orchestrate_init", {})
+    await asyncio.wait_for(_until(lambda: len(order) == 4), timeout=1)
+    await dispatcher.close()
+
+
+@pytest.mark.asyncio
+async def test_barrier_holds_serial_and_detached_routes(ws):
+    """Barrière par défaut du routeur: SERIAL et FIRE_AND_FORGET attendent la lane session."""
+    router = WSMessageRouter(barrier_for=lambda msg_type: None if msg_type.startswith("dashboard.") else "session")
+    release = asyncio.Event()
+    order = []
+
+    @router.route("dashboard.company_change", lane="session")
+    async def company_change(ctx, payload):
+        await release.wait()
+        order.append(ctx.msg_type)
+
+    @router.route("chat.orchestrate_init")
+    @router.route("coa.sync_erp", concurrency=WSConcurrency.FIRE_AND_FORGET)
+    async def company_scoped(ctx, payload):
+        order.append(ctx.msg_type)
+
+    assert router.get("chat.orchestrate_init").barrier_lane == "session"
+    dispatcher = make_dispatcher(router, ws)
+    dispatcher.dispatch("dashboard.company_change", {})
+    dispatcher.dispatch("chat.orchestrate_init", {})
+    dispatcher.dispatch("coa.sync_erp", {})
+    await asyncio.sleep(0.01)
+    assert order == []
+
+    release.set()
+    await asyncio.wait_for(_until(lambda: len(order) == 3), timeout=1)
+    assert order[0] == "dashboard.company_change"
+    await dispatcher.close()
+
+
+@pytest.mark.asyncio
+async def test_handler_error_does_not_break_lane(router, ws):
+    order = []
+
+    @router.route("task.update")
+    async def update(ctx, payload):
+        if payload.get("fail"):
+            raise RuntimeError("boom")
+        order.append(payload["n"])
+
+    dispatcher = make_dispatcher(router, ws)
+    dispatcher.dispatch("task.update", {"fail": True})
+    dispatcher.dispatch("task.update", {"n": 2})
+
+    await asyncio.wait_for(_until(lambda: order == [2]), timeout=1)
+    await dispatcher.close()
+
+
+@pytest.mark.asyncio
+async def test_close_cancels_attached_but_not_detached(router, ws):
+    """À la déconnexion: SERIAL/PARALLEL annulés, FIRE_AND_FORGET conservé."""
+    release = asyncio.Event()
+    finished = []
+
+    @router.route("coa.load_accounts", concurrency=WSConcurrency.PARALLEL)
+    async def load(ctx, payload):
+        await release.wait()
+        finished.append("load")
+
+    @router.route("company_settings.delete_company", concurrency=WSConcurrency.FIRE_AND_FORGET)
+    async def delete(ctx, payload):
+        await release.wait()
+        finished.append("delete")
+
+    dispatcher = make_dispatcher(router, ws)
+    dispatcher.dispatch("coa.load_accounts", {})
+    dispatcher.dispatch("company_settings.delete_company", {})
+    await asyncio.sleep(0)
+
+    await dispatcher.close()
+    assert dispatcher.pending_count == 0
+    assert not dispatcher.dispatch("coa.load_accounts", {})
+
+    release.set()
+    await asyncio.wait_for(_until(lambda: "delete" in finished), timeout=1)
+    assert finished == ["delete"]
+
+
+@pytest.mark.asyncio
+async def test_semaphore_bounds_concurrency(router, ws):
+    running = {"now": 0, "max": 0}
+
+    @router.route("metrics.refresh", concurrency=WSConcurrency.PARALLEL)
+    async def refresh(ctx, payload):
+        running["now"] += 1
+        running["max"] = max(running["max"], running["now"])
+        await asyncio.sleep(0.01)
+        running["now"] -= 1
+
+    dispatcher = make_dispatcher(router, ws, max_concurrency=2)
+    for _ in range(6):
+        dispatcher.dispatch("metrics.refresh", {})
+
+    await asyncio.wait_for(_until(lambda: dispatcher.pending_count == 0), timeout=1)
+    assert running["max"] == 2
+
+
+@pytest.mark.asyncio
+async def test_lazy_route_replies_and_records_metrics(router, ws, monkeypatch):
+    """Handler standard importé paresseusement: réponse renvoyée + métriques."""
+    import sys
+    import types
+
+    module = types.ModuleType("app._ws_test_handlers")
+    module.handle_ping = AsyncMock(return_value={"type": "ping.ok"})
+    monkeypatch.setitem(sys.modules, "app._ws_test_handlers", module)
+
+    router.add_lazy("test.ping", "._ws_test_handlers", "handle_ping", reply=True,
+                    concurrency=WSConcurrency.PARALLEL)
+
+    dispatcher = make_dispatcher(router, ws)
+    dispatcher.dispatch("test.ping", {"x": 1})
+    await asyncio.wait_for(_until(lambda: ws.send_text.await_count == 1), timeout=1)
+
+    module.handle_ping.assert_awaited_once_with(uid="u1", session_id="s1", payload={"x": 1})
+    ws.send_text.assert_awaited_once_with('{"type": "ping.ok"}')
+
+    from app.ws_metrics import get_ws_dispatch_metrics
+    await asyncio.wait_for(_until(lambda: dispatcher.pending_count == 0), timeout=1)
+    stats = get_ws_dispatch_metrics().get_summary()["by_type"]["test.ping"]
+    assert stats["count"] >= 1
+    assert stats["in_flight"] == 0
+    assert stats["queued"] == 0
+
+
+def test_production_routes_registered():
+    """La table de production couvre les types historiques de /ws."""
+    from app.ws_routes import get_ws_router
+
+    ws_router = get_ws_router()
+    for msg_type in (
+        "auth.firebase_token",
+        "dashboard.orchestrate_init",
+        "chat.send_message",
+        "llm.stop_streaming",
+        "banking.templates_list",
+        "hr.refresh",
+        "page.restore_state",
+        "onboarding.oauth_complete",
+    ):
+        assert msg_type in ws_router
+
+    assert ws_router.get("llm.stop_streaming").concurrency is WSConcurrency.PARALLEL
+    assert ws_router.get("coa.sync_erp").concurrency is WSConcurrency.FIRE_AND_FORGET
+    assert ws_router.get("dashboard.refresh").lane_key({}) == ws_router.get("auth.firebase_token").lane_key({})
+    for msg_type in ("routing.orchestrate_init", "invoices.refresh", "banking.orchestrate_init", "hr.refresh"):
+        route = ws_router.get(msg_type)
+        assert route.concurrency is WSConcurrency.PARALLEL and route.barrier_lane == "session"
+    for msg_type in (
+        "chat.orchestrate_init", "task.list", "approval.list", "coa.load_accounts",
+        "cockpit.generate", "cockpit.list_widgets", "metrics.refresh", "page.restore_state",
+        "chat.send_message", "routing.templates_list", "coa.sync_erp",
+    ):
+        assert ws_router.get(msg_type).barrier_lane == "session", msg_type
+    for msg_type in ("llm.stop_streaming", "ws.ack", "auth.firebase_token", "balance.refresh"):
+        assert ws_router.get(msg_type).barrier_lane is None, msg_type
+
+
+async def _until(predicate):
+    while not predicate():
+        await asyncio.sleep(0.001)
@@ -0,0 +1,190 @@
+"""
+Tests unitaires pour WebSocketMessageBuffer (buffer WS en Redis Stream).
+
+Ces tests valident:
+1. Le replay de la queue manquée à partir du dernier ID vu / acquitté
+2. Le regroupement des écritures issues de broadcast (un pipeline par lot)
+3. La borne MAXLEN du stream
+4. La compatibilité de l'API par thread (get_pending_messages);
+   has_pending_messages sans lecture complète du stream
+5. Un replay concurrent d'un flush en vol attend l'écriture du lot
+
+Usage:
+    python -m pytest tests/test_ws_message_buffer.py -v
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+# ═══════════════════════════════════════════════════════════════
+# FIXTURES
+# ═══════════════════════════════════════════════════════════════
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+@pytest.fixture
+def buffer(redis_client):
+    from app.ws_message_buffer import WebSocketMessageBuffer
+    return WebSocketMessageBuffer(redis_client=redis_client)
+
+
+# ═══════════════════════════════════════════════════════════════
+# TESTS
+# ═══════════════════════════════════════════════════════════════
+
+def test_replay_only_missed_tail(buffer, redis_client):
+    for i in range(5):
+        buffer.store_pending_message("u1", "t1", {"type": "llm.stream_delta", "n": i})
+
+    assert redis_client.type("pending_ws_messages:u1") == "stream"
+    assert redis_client.ttl("pending_ws_messages:u1") > 0
+
+    all_messages = buffer.replay_since("u1")
+    assert [m["n"] for m in all_messages] == [0, 1, 2, 3, 4]
+
+    # Le client a vu jusqu'au 3e message
+    last_seen = all_messages[2]["buffer_id"]
+    assert [m["n"] for m in buffer.replay_since("u1", last_id=last_seen)] == [3, 4]
+
+    # Ack serveur: visible depuis n'importe quelle instance (nouveau buffer)
+    from app.ws_message_buffer import WebSocketMessageBuffer
+    other_instance = WebSocketMessageBuffer(redis_client=redis_client)
+    other_instance.acknowledge("u1", all_messages[3]["buffer_id"])
+    assert [m["n"] for m in other_instance.replay_since("u1")] == [4]
+
+    # Un ack plus ancien ne fait pas reculer la position
+    buffer.acknowledge("u1", all_messages[0]["buffer_id"])
+    assert [m["n"] for m in buffer.replay_since("u1")] == [4]
+
+
+def test_replay_filters_thread(buffer):
+    buffer.store_pending_message("u1", "t1", {"type": "a"})
+    buffer.store_pending_message("u1", "t2", {"type": "b"})
+
+    assert [m["type"] for m in buffer.replay_since("u1", thread_key="t2")] == ["b"]
+
+
+def test_stream_is_capped(buffer, redis_client, monkeypatch):
+    """Chaque XADD est borné par MAXLEN (trim approximatif côté Redis)."""
+    calls = []
+    real_pipeline = redis_client.pipeline
+
+    def spying_pipeline(*args, **kwargs):
+        pipe = real_pipeline(*args, **kwargs)
+        real_xadd = pipe.xadd
+
+        def xadd(name, fields, **kw):
+            calls.append(kw)
+            return real_xadd(name, fields, **kw)
+
+        pipe.xadd = xadd
+        return pipe
+
+    monkeypatch.setattr(redis_client, "pipeline", spying_pipeline)
+    buffer.MAX_LEN = 10
+    buffer.store_pending_message("u1", "t1", {"n": 1})
+
+    assert calls == [{"maxlen": 10, "approximate": True}]
+
+
+@pytest.mark.asyncio
+async def test_broadcast_writes_are_batched(buffer, redis_client, monkeypatch):
+    """Une rafale depuis la loop donne un seul pipeline."""
+    executed = []
+    real_pipeline = redis_client.pipeline
+
+    def counting_pipeline(*args, **kwargs):
+        pipe = real_pipeline(*args, **kwargs)
+        real_execute = pipe.execute
+
+        def execute(*a, **kw):
+            executed.append(len(pipe.command_stack))
+            return real_execute(*a, **kw)
+
+        pipe.execute = execute
+        return pipe
+
+    monkeypatch.setattr(redis_client, "pipeline", counting_pipeline)
+
+    for i in range(20):
+        buffer.buffer_message("u1", "t1", {"n": i})
+
+    assert redis_client.exists("pending_ws_messages:u1") == 0
+    for _ in range(100):
+        if executed:
+            break
+        await asyncio.sleep(0.01)
+
+    assert len(executed) == 1
+    assert [m["n"] for m in buffer.replay_since("u1")] == list(range(20))
+
+
+def test_get_pending_messages_by_thread(buffer):
+    buffer.store_pending_message("u1", "t1", {"type": "a"})
+    buffer.store_pending_message("u1", "t2", {"type": "b"})
+    buffer.store_pending_message("u1", "t1", {"type": "c"})
+
+    assert buffer.has_pending_messages("u1", "t1")
+    messages = buffer.get_pending_messages("u1", "t1", delete_after=True)
+    assert [m["type"] for m in messages] == ["a", "c"]
+
+    assert not buffer.has_pending_messages("u1", "t1")
+    assert buffer.has_pending_messages("u1", "t2")
+
+    assert buffer.clear_pending_messages("u1", "t2")
+    assert buffer.replay_since("u1") == []
+
+
+def test_has_pending_messages_reads_after_ack_by_pages(buffer, redis_client, monkeypatch):
+    assert not buffer.has_pending_messages("u1", "t1")
+
+    buffer.store_pending_message("u1", "t1", {"type": "a"})
+    for i in range(120):
+        buffer.store_pending_message("u1", "t2", {"type": "b", "n": i})
+    ranges = []
+    real_xrange = redis_client.xrange
+
+    def xrange(name, min="-", max="+", count=None):
+        entries = real_xrange(name, min=min, max=max, count=count)
+        ranges.append((count, len(entries)))
+        return entries
+
+    monkeypatch.setattr(redis_client, "xrange", xrange)
+    assert buffer.has_pending_messages("u1", "t1")
+    assert ranges == [(buffer.SCAN_COUNT, buffer.SCAN_COUNT)]
+
+    # Entrée du thread acquittée: plus en attente, pages de SCAN_COUNT
+    first = buffer.replay_since("u1", thread_key="t1")[0]["buffer_id"]
+    buffer.acknowledge("u1", first)
+    ranges.clear()
+    assert not buffer.has_pending_messages("u1", "t1")
+    assert [n for _, n in ranges] == [50, 50, 20]
+
+
+def test_replay_waits_for_in_flight_flush(buffer, redis_client, monkeypatch):
+    real_write = buffer._write_entries
+    writing = threading.Event()
+
+    def slow_write(entries):
+        writing.set()
+        time.sleep(0.05)
+        return real_write(entries)
+
+    monkeypatch.setattr(buffer, "_write_entries", slow_write)
+    for i in range(3):
+        buffer._batch.append(("u1", "t1", f'{{"n": {i}}}'))
+    flusher = threading.Thread(target=buffer.flush)
+    flusher.start()
+    assert writing.wait(1)
+
+    assert [m["n"] for m in buffer.replay_since("u1")] == [0, 1, 2]
+    flusher.join()